@@ -31,7 +31,8 @@ working_modules.update(dict.fromkeys(
       "rctime" , "select", "zipimport", "_lsprof",
      "crypt", "signal", "_rawffi", "termios", "zlib",
      "struct", "md5", "sha", "bz2", "_minimal_curses", "cStringIO",
-     "thread", "itertools", "pyexpat", "_ssl", "cpyext"]
+     "thread", "itertools", "pyexpat", "_ssl", "cpyext", "cPickle",
+     "array", "_collections", "_csv", "_hashlib", "_sha256", "_sha512"]
 ))
 
 working_oo_modules = default_modules.copy()
@@ -69,6 +70,8 @@ module_suggests = {
     # itself needs the interp-level struct module
     # because 'P' is missing from the app-level one
     "_rawffi": [("objspace.usemodules.struct", True)],
+    # cPickle has a fast path for reading from cStringIO objects
+    "cPickle": [("objspace.usemodules.cStringIO", True)],
     "cpyext": [("translation.secondaryentrypoints", "cpyext"),
                ("translation.shared", sys.platform == "win32")],
     }
@@ -82,6 +85,7 @@ module_import_dependencies = {
     "bz2"       : ["pypy.module.bz2.interp_bz2"],
     "pyexpat"   : ["pypy.module.pyexpat.interp_pyexpat"],
     "_ssl"      : ["pypy.module._ssl.interp_ssl"],
+    "_hashlib"  : ["pypy.module._hashlib.interp_hashlib"],
     "_minimal_curses": ["pypy.module._minimal_curses.fficurses"],
     }
 
@@ -239,12 +243,41 @@ pypy_optiondescription = OptionDescription("objspace", "Object Space Options", [
                    default=False,
                    requires=[("objspace.std.withshadowtracking", False)]),
 
+        BoolOption("withmapdict",
+                   "store the attributes of instances in an array described by "
+                   "a map shared with the other instances of the class",
+                   default=False,
+                   requires=[("objspace.std.withshadowtracking", False),
+                             ("objspace.std.withinlineddict", False),
+                             ("objspace.std.withsharingdict", False),
+                             ("objspace.std.getattributeshortcut", True),
+                             ("objspace.std.withtypeversion", True),
+                       ]),
+
+        BoolOption("withintdict",
+                   "store the keys of dictionaries that only contain ints "
+                   "unboxed",
+                   default=False),
+
+        BoolOption("withidentitydict",
+                   "store the keys of dictionaries that only contain "
+                   "instances of classes that don't override __eq__, "
+                   "__cmp__ and __hash__ by identity",
+                   default=False,
+                   # weakrefs needed, because of get_subclasses()
+                   requires=[("translation.rweakref", True)]),
+
         BoolOption("withrangelist",
                    "enable special range list implementation that does not "
                    "actually create the full list until the resulting "
                    "list is mutated",
                    default=False),
 
+        BoolOption("withliststrategies",
+                   "store lists that contain only ints, floats or strs "
+                   "unwrapped, until an object of another type is added",
+                   default=False),
+
         BoolOption("withtypeversion",
                    "version type objects when changing them",
                    cmdline=None,
@@ -323,6 +356,9 @@ def set_pypy_opt_level(config, level):
     if level in ['2', '3', 'jit']:
         config.objspace.opcodes.suggest(CALL_METHOD=True)
         config.objspace.std.suggest(withrangelist=True)
+        config.objspace.std.suggest(withliststrategies=True)
+        config.objspace.std.suggest(withintdict=True)
+        config.objspace.std.suggest(withidentitydict=True)
         config.objspace.std.suggest(withmethodcache=True)
         config.objspace.std.suggest(withprebuiltchar=True)
         config.objspace.std.suggest(builtinshortcut=True)
@@ -332,6 +368,8 @@ def set_pypy_opt_level(config, level):
         if type_system != 'ootype':
             config.objspace.std.suggest(withsharingdict=True)
         config.objspace.std.suggest(withinlineddict=True)
+    if level == 'jit' and type_system != 'ootype':
+        config.objspace.std.suggest(withmapdict=True)
 
     # extra costly optimizations only go in level 3
     if level == '3':
@@ -343,8 +381,11 @@ def set_pypy_opt_level(config, level):
     if level == 'mem':
         config.objspace.std.suggest(withprebuiltint=True)
         config.objspace.std.suggest(withrangelist=True)
+        config.objspace.std.suggest(withliststrategies=True)
         config.objspace.std.suggest(withprebuiltchar=True)
         config.objspace.std.suggest(withinlineddict=True)
+        if type_system != 'ootype':
+            config.objspace.std.suggest(withmapdict=True)
         config.objspace.std.suggest(withstrslice=True)
         config.objspace.std.suggest(withstrjoin=True)
         # xxx other options? ropes maybe?
@@ -52,9 +52,11 @@ translation_optiondescription = OptionDescription(
     # gc
     ChoiceOption("gc", "Garbage Collection Strategy",
                  ["boehm", "ref", "marksweep", "semispace", "statistics",
-                  "generation", "hybrid", "markcompact", "none"],
+                  "generation", "hybrid", "markcompact", "incmarksweep",
+                  "none"],
                   "ref", requires={
                      "ref": [("translation.rweakref", False), # XXX
+                             ("translation.compactdicts", False),
                              ("translation.gctransformer", "ref")],
                      "none": [("translation.rweakref", False), # XXX
                              ("translation.gctransformer", "none")],
@@ -65,6 +67,8 @@ translation_optiondescription = OptionDescription(
                      "hybrid": [("translation.gctransformer", "framework")],
                      "boehm": [("translation.gctransformer", "boehm")],
                      "markcompact": [("translation.gctransformer", "framework")],
+                     "incmarksweep": [("translation.gctransformer",
+                                       "framework")],
                      },
                   cmdline="--gc"),
     ChoiceOption("gctransformer", "GC transformer that is used - internal",
@@ -183,6 +187,11 @@ translation_optiondescription = OptionDescription(
                "attempt to pre-allocate the list",
                default=False,
                cmdline='--listcompr'),
+    BoolOption("compactdicts",
+               "Use a compact representation for RPython dicts, which "
+               "also preserves the insertion order",
+               default=False,
+               cmdline='--compactdicts'),
     IntOption("withsmallfuncsets",
               "Represent groups of less funtions than this as indices into an array",
                default=0),
@@ -336,7 +345,7 @@ OPT_TABLE = {
     '0':    'boehm       nobackendopt',
     '1':    'boehm       lowinline',
     'size': 'boehm       lowinline     remove_asserts',
-    'mem':  'markcompact lowinline     remove_asserts    removetypeptr',
+    'mem':  'markcompact lowinline     remove_asserts    removetypeptr compactdicts',
     '2':    'hybrid      extraopts',
     '3':    'hybrid      extraopts     remove_asserts',
     'jit':  'hybrid      extraopts     jit',
@@ -380,6 +389,8 @@ def set_opt_level(config, level):
                 raise NotImplementedError("JIT conflicts with stackless for now")
         elif word == 'removetypeptr':
             config.translation.suggest(gcremovetypeptr=True)
+        elif word == 'compactdicts':
+            config.translation.suggest(compactdicts=True)
         else:
             raise ValueError(word)
 
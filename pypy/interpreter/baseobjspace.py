@@ -148,6 +148,26 @@ class W_Root(object):
 
     __already_enqueued_for_destruction = False
 
+    # used by the instances using maps, see pypy.objspace.std.mapdict
+
+    def _get_mapdict_map(self):
+        return None
+
+    def _set_mapdict_map(self, map):
+        raise NotImplementedError
+
+    def _mapdict_read_storage(self, index):
+        raise NotImplementedError
+
+    def _mapdict_write_storage(self, index, w_value):
+        raise NotImplementedError
+
+    def _mapdict_storage_length(self):
+        raise NotImplementedError
+
+    def _set_mapdict_storage_and_map(self, storage, map):
+        raise NotImplementedError
+
     def _enqueue_for_destruction(self, space):
         """Put the object in the destructor queue of the space.
         At a later, safe point in time, UserDelAction will use
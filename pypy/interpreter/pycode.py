@@ -117,6 +117,14 @@ class PyCode(eval.Code):
 
         self._compute_flatcall()
 
+        # per-instruction inline caches, see pypy.objspace.std.frame
+        if self.space.config.objspace.std.withmapdict:
+            from pypy.objspace.std.mapdict import init_mapdict_cache
+            init_mapdict_cache(self)
+        if self.space.config.objspace.std.withcelldict:
+            from pypy.objspace.std.celldict import init_globals_cache
+            init_globals_cache(self)
+
     def _freeze_(self):
         if self.magic == cpython_magic:
             raise Exception("CPython host codes should not be rendered")
@@ -126,6 +126,8 @@ class TestTypeDef:
                                checks[2], checks[3]))
         subclasses = {}
         for key, subcls in typedef._subclass_cache.items():
+            if key[0] is not space.config:
+                continue
             cls = key[1]
             subclasses.setdefault(cls, {})
             subclasses[cls][subcls] = True
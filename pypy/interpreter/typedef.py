@@ -133,6 +133,15 @@ def _getusercls(config, cls, wants_dict, wants_slots, wants_del, weakrefable):
     typedef = cls.typedef
     if wants_dict and typedef.hasdict:
         wants_dict = False
+    if config.objspace.std.withmapdict and not typedef.hasdict:
+        # with mapdict, the dict, the slots and the weakref lifeline all
+        # live in the same storage: only the del feature needs its own class
+        if wants_del:
+            parentcls = get_unique_interplevel_subclass(config, cls, True, True,
+                                                        False, True)
+            return _usersubclswithfeature(config, parentcls, "del")
+        return _usersubclswithfeature(config, cls, "user", "dict", "weakref",
+                                      "slots")
     # Forest of if's - see the comment above.
     if wants_del:
         if wants_dict:
@@ -186,9 +195,21 @@ def _builduserclswithfeature(config, supercls, *features):
 
     def add(Proto):
         for key, value in Proto.__dict__.items():
-            if not key.startswith('__') or key == '__del__':
+            if ((not key.startswith('__') and not key.startswith('_mixin_'))
+                    or key == '__del__'):
+                if hasattr(value, "func_name"):
+                    # a fresh copy for each class, to let the annotator
+                    # see the exact class of 'self'
+                    value = func_with_new_name(value, value.func_name)
                 body[key] = value
 
+    if config.objspace.std.withmapdict and "dict" in features:
+        from pypy.objspace.std.mapdict import BaseMapdictObject, ObjectMixin
+        add(BaseMapdictObject)
+        add(ObjectMixin)
+        body["user_overridden_class"] = True
+        features = ()
+
     if "user" in features:     # generic feature needed by all subcls
         class Proto(object):
             user_overridden_class = True
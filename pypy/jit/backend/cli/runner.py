@@ -115,13 +115,16 @@ class CliCPU(model.AbstractCPU):
         name = 'Loop%d' % self.loopcount
         self.loopcount += 1
         cliloop = CliLoop(name, inputargs, operations)
+        looptoken.compiled_loop_token = model.CompiledLoopToken(
+            self, looptoken.number)
         looptoken.cliloop = cliloop
         cliloop.funcbox = ConstFunction(cliloop.name)
         self._attach_token_to_faildescrs(cliloop, operations)
         meth = Method(self, cliloop)
         cliloop.funcbox.holder.SetFunc(meth.compile())
 
-    def compile_bridge(self, faildescr, inputargs, operations):
+    def compile_bridge(self, faildescr, inputargs, operations,
+                       original_loop_token=None):
         from pypy.jit.backend.cli.method import Method
         op = faildescr._guard_op
         token = faildescr._loop_token
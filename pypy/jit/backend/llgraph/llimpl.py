@@ -689,6 +689,14 @@ class Frame(object):
 
     op_getarrayitem_gc_pure = op_getarrayitem_gc
 
+    def op_getarrayitem_raw(self, arraydescr, array, index):
+        if arraydescr.typeinfo == INT:
+            return do_getarrayitem_raw_int(array, index)
+        elif arraydescr.typeinfo == FLOAT:
+            return do_getarrayitem_raw_float(array, index)
+        else:
+            raise NotImplementedError
+
     def op_getfield_gc(self, fielddescr, struct):
         if fielddescr.typeinfo == REF:
             return do_getfield_gc_ptr(struct, fielddescr.ofs)
@@ -734,6 +742,14 @@ class Frame(object):
         else:
             raise NotImplementedError
 
+    def op_setarrayitem_raw(self, arraydescr, array, index, newvalue):
+        if arraydescr.typeinfo == INT:
+            do_setarrayitem_raw_int(array, index, newvalue)
+        elif arraydescr.typeinfo == FLOAT:
+            do_setarrayitem_raw_float(array, index, newvalue)
+        else:
+            raise NotImplementedError
+
     def op_setfield_gc(self, fielddescr, struct, newvalue):
         if fielddescr.typeinfo == REF:
             do_setfield_gc_ptr(struct, fielddescr.ofs, newvalue)
@@ -1271,7 +1287,7 @@ def do_setarrayitem_gc_float(array, index, newvalue):
 def do_setarrayitem_raw_float(array, index, newvalue):
     array = array.adr.ptr
     ITEMTYPE = lltype.typeOf(array).TO.OF
-    newvalue = cast_from_int(ITEMTYPE, newvalue)
+    newvalue = cast_from_float(ITEMTYPE, newvalue)
     array._obj.setitem(index, newvalue)
 
 def do_setarrayitem_gc_ptr(array, index, newvalue):
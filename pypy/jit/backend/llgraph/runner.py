@@ -117,7 +117,8 @@ class BaseCPU(model.AbstractCPU):
             self._descrs[key] = descr
             return descr
 
-    def compile_bridge(self, faildescr, inputargs, operations):
+    def compile_bridge(self, faildescr, inputargs, operations,
+                       original_loop_token=None):
         c = llimpl.compile_start()
         self._compile_loop_or_bridge(c, inputargs, operations)
         old, oldindex = faildescr._compiled_fail
@@ -130,6 +131,8 @@ class BaseCPU(model.AbstractCPU):
         is not.
         """
         c = llimpl.compile_start()
+        loopdescr.compiled_loop_token = model.CompiledLoopToken(
+            self, loopdescr.number)
         loopdescr._llgraph_compiled_version = c
         self._compile_loop_or_bridge(c, inputargs, operations)
 
@@ -34,6 +34,8 @@ class GcLLDescription(GcCache):
         return False
     def has_write_barrier_class(self):
         return None
+    def freeing_block(self, start, stop):
+        pass
 
 # ____________________________________________________________
 
@@ -240,6 +242,24 @@ class GcRootMap_asmgcc:
         self._gcmap[index+1] = callshapeaddr
         self._gcmap_curlength = index + 2
 
+    def freeing_block(self, start, stop):
+        """Called when the machine code in the range [start, stop[ is
+        freed: remove the corresponding entries from the gcmap, and
+        free their callshapes."""
+        PCALLSHAPE = lltype.Ptr(self.CALLSHAPE_ARRAY)
+        gcmap = self._gcmap
+        j = 0
+        for i in range(0, self._gcmap_curlength, 2):
+            retaddr = rffi.cast(lltype.Signed, gcmap[i])
+            if start <= retaddr < stop:
+                shape = llmemory.cast_adr_to_ptr(gcmap[i+1], PCALLSHAPE)
+                lltype.free(shape, flavor='raw')
+            else:
+                gcmap[j] = gcmap[i]
+                gcmap[j+1] = gcmap[i+1]
+                j += 2
+        self._gcmap_curlength = j
+
     def _enlarge_gcmap(self):
         newlength = 250 + self._gcmap_maxlength * 2
         newgcmap = lltype.malloc(self.GCMAP_ARRAY, newlength, flavor='raw')
@@ -304,18 +324,48 @@ class WriteBarrierDescr(AbstractDescr):
     def __init__(self, gc_ll_descr):
         self.llop1 = gc_ll_descr.llop1
         self.WB_FUNCPTR = gc_ll_descr.WB_FUNCPTR
+        self.WB_ARRAY_FUNCPTR = gc_ll_descr.WB_ARRAY_FUNCPTR
+        # if the GC uses card marking, the write barriers before
+        # SETARRAYITEM_GC get the index too, and the failing case is
+        # then remember_young_pointer_from_array()
+        self.has_write_barrier_from_array = (
+            gc_ll_descr.GCClass.TRANSLATION_PARAMS.get(
+                'card_page_indices', 0) > 0)
         self.fielddescr_tid = get_field_descr(gc_ll_descr,
                                               gc_ll_descr.GCClass.HDR, 'tid')
         self.jit_wb_if_flag = gc_ll_descr.GCClass.JIT_WB_IF_FLAG
         # if convenient for the backend, we also compute the info about
         # the flag as (byte-offset, single-byte-flag).
+        (self.jit_wb_if_flag_byteofs,
+         self.jit_wb_if_flag_singlebyte) = self._single_byte(
+            self.jit_wb_if_flag)
+        # with card marking, the backend can also check inline if the card
+        # of the index is already set, which is only possible if the array
+        # has JIT_WB_CARDS_SET.  The card number 'n' is then the bit at
+        # offset '-(n+1)' from the GC header, where n is the index shifted
+        # right by 'jit_wb_card_page_shift'.
+        if self.has_write_barrier_from_array:
+            self.jit_wb_cards_set = gc_ll_descr.GCClass.JIT_WB_CARDS_SET
+            (self.jit_wb_cards_set_byteofs,
+             self.jit_wb_cards_set_singlebyte) = self._single_byte(
+                self.jit_wb_cards_set)
+            card_page_indices = (
+                gc_ll_descr.GCClass.TRANSLATION_PARAMS['card_page_indices'])
+            shift = 0
+            while (1 << shift) < card_page_indices:
+                shift += 1
+            assert (1 << shift) == card_page_indices
+            self.jit_wb_card_page_shift = shift
+        else:
+            self.jit_wb_cards_set = 0
+
+    def _single_byte(self, flag):
         import struct
-        value = struct.pack("l", self.jit_wb_if_flag)
+        value = struct.pack("l", flag)
         assert value.count('\x00') == len(value) - 1    # only one byte is != 0
         i = 0
         while value[i] == '\x00': i += 1
-        self.jit_wb_if_flag_byteofs = i
-        self.jit_wb_if_flag_singlebyte = struct.unpack('b', value[i])[0]
+        return (i, struct.unpack('b', value[i])[0])
 
     def get_write_barrier_fn(self, cpu):
         llop1 = self.llop1
@@ -323,6 +373,15 @@ class WriteBarrierDescr(AbstractDescr):
         funcaddr = llmemory.cast_ptr_to_adr(funcptr)
         return cpu.cast_adr_to_int(funcaddr)
 
+    def get_write_barrier_from_array_fn(self, cpu):
+        # the function to call for a COND_CALL_GC_WB with 3 arguments
+        assert self.has_write_barrier_from_array
+        llop1 = self.llop1
+        funcptr = llop1.get_write_barrier_from_array_failing_case(
+            self.WB_ARRAY_FUNCPTR)
+        funcaddr = llmemory.cast_ptr_to_adr(funcptr)
+        return cpu.cast_adr_to_int(funcaddr)
+
 
 class GcLLDescr_framework(GcLLDescription):
     DEBUG = False    # forced to True by x86/test/test_zrpy_gc.py
@@ -391,6 +450,8 @@ class GcLLDescr_framework(GcLLDescription):
             [lltype.Signed, lltype.Signed], llmemory.GCREF))
         self.WB_FUNCPTR = lltype.Ptr(lltype.FuncType(
             [llmemory.Address, llmemory.Address], lltype.Void))
+        self.WB_ARRAY_FUNCPTR = lltype.Ptr(lltype.FuncType(
+            [llmemory.Address, llmemory.Address, lltype.Signed], lltype.Void))
         self.write_barrier_descr = WriteBarrierDescr(self)
         #
         def malloc_array(itemsize, tid, num_elem):
@@ -480,6 +541,9 @@ class GcLLDescr_framework(GcLLDescription):
         self.gcrefs.initialize()
         self.gcrootmap.initialize()
 
+    def freeing_block(self, start, stop):
+        self.gcrootmap.freeing_block(start, stop)
+
     def init_size_descr(self, S, descr):
         type_id = self.layoutbuilder.get_type_id(S)
         assert not self.layoutbuilder.is_weakref(type_id)
@@ -543,7 +607,8 @@ class GcLLDescr_framework(GcLLDescription):
         # Perform two kinds of rewrites in parallel:
         #
         # - Add COND_CALLs to the write barrier before SETFIELD_GC and
-        #   SETARRAYITEM_GC operations.
+        #   SETARRAYITEM_GC operations.  With card marking, the latter
+        #   also passes the index to the write barrier.
         #
         # - Remove all uses of ConstPtrs away from the assembler.
         #   Idea: when running on a moving GC, we can't (easily) encode
@@ -584,7 +649,8 @@ class GcLLDescr_framework(GcLLDescription):
                 v = op.args[2]
                 if isinstance(v, BoxPtr) or (isinstance(v, ConstPtr) and
                                              bool(v.value)): # store a non-NULL
-                    self._gen_write_barrier(newops, op.args[0], v)
+                    self._gen_write_barrier_array(newops, op.args[0],
+                                                  op.args[1], v)
                     op = ResOperation(rop.SETARRAYITEM_RAW, op.args, None,
                                       descr=op.descr)
             # ----------
@@ -597,6 +663,14 @@ class GcLLDescr_framework(GcLLDescription):
         newops.append(ResOperation(rop.COND_CALL_GC_WB, args, None,
                                    descr=self.write_barrier_descr))
 
+    def _gen_write_barrier_array(self, newops, v_base, v_index, v_value):
+        if self.write_barrier_descr.has_write_barrier_from_array:
+            args = [v_base, v_value, v_index]
+            newops.append(ResOperation(rop.COND_CALL_GC_WB, args, None,
+                                       descr=self.write_barrier_descr))
+        else:
+            self._gen_write_barrier(newops, v_base, v_value)
+
     def can_inline_malloc(self, descr):
         assert isinstance(descr, BaseSizeDescr)
         if descr.size < self.max_size_of_young_obj:
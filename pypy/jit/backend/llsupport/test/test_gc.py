@@ -112,6 +112,15 @@ def test_GcRootMap_asmgcc():
         expected_retaddr = rffi.cast(llmemory.Address, 123456789 + i)
         assert gcrootmap._gcmap[i*2+0] == expected_retaddr
         assert gcrootmap._gcmap[i*2+1] == expected_shapeaddr[i]
+    #
+    # free the code between 123456789 + 100 and 123456789 + 600
+    gcrootmap.freeing_block(123456789 + 100, 123456789 + 600)
+    assert gcrootmap._gcmap_curlength == 2 * 200
+    remaining = range(1, 100) + range(600, 700)
+    for j, i in enumerate(remaining):
+        expected_retaddr = rffi.cast(llmemory.Address, 123456789 + i)
+        assert gcrootmap._gcmap[j*2+2] == expected_retaddr
+        assert gcrootmap._gcmap[j*2+3] == expected_shapeaddr[i]
 
 
 class FakeLLOp:
@@ -147,6 +156,13 @@ class FakeLLOp:
     def get_write_barrier_failing_case(self, FPTRTYPE):
         return llhelper(FPTRTYPE, self._write_barrier_failing_case)
 
+    def _write_barrier_from_array_failing_case(self, adr_array, adr_newptr,
+                                               index):
+        self.record.append(('barrier_array', adr_array, adr_newptr, index))
+
+    def get_write_barrier_from_array_failing_case(self, FPTRTYPE):
+        return llhelper(FPTRTYPE, self._write_barrier_from_array_failing_case)
+
 
 class TestFramework:
 
@@ -267,6 +283,28 @@ class TestFramework:
         assert isinstance(wbdescr.jit_wb_if_flag_byteofs, int)
         assert isinstance(wbdescr.jit_wb_if_flag_singlebyte, int)
 
+    def test_gen_write_barrier_array(self):
+        gc_ll_descr = self.gc_ll_descr
+        llop1 = self.llop1
+        assert gc_ll_descr.write_barrier_descr.has_write_barrier_from_array
+        #
+        newops = []
+        v_base = BoxPtr()
+        v_index = BoxInt()
+        v_value = BoxPtr()
+        gc_ll_descr._gen_write_barrier_array(newops, v_base, v_index, v_value)
+        assert llop1.record == []
+        assert len(newops) == 1
+        assert newops[0].opnum == rop.COND_CALL_GC_WB
+        assert newops[0].args == [v_base, v_value, v_index]
+        assert newops[0].result is None
+        wbdescr = newops[0].descr
+        from pypy.rpython.memory.gc.generation import GCFLAG_CARDS_SET
+        assert wbdescr.jit_wb_cards_set == GCFLAG_CARDS_SET
+        assert isinstance(wbdescr.jit_wb_cards_set_byteofs, int)
+        assert isinstance(wbdescr.jit_wb_cards_set_singlebyte, int)
+        assert wbdescr.jit_wb_card_page_shift == 7    # 128 items per card
+
     def test_get_rid_of_debug_merge_point(self):
         operations = [
             ResOperation(rop.DEBUG_MERGE_POINT, [], None),
@@ -380,8 +418,8 @@ class TestFramework:
         assert len(operations) == 2
         #
         assert operations[0].opnum == rop.COND_CALL_GC_WB
-        assert operations[0].args[0] == v_base
-        assert operations[0].args[1] == v_value
+        # the hybrid GC uses card marking: the index is passed too
+        assert operations[0].args == [v_base, v_value, v_index]
         assert operations[0].result is None
         #
         assert operations[1].opnum == rop.SETARRAYITEM_RAW
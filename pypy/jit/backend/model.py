@@ -1,3 +1,5 @@
+from pypy.rlib.debug import debug_start, debug_print, debug_stop
+from pypy.rlib.jit import JitStats, LoopStats
 from pypy.jit.metainterp import history, compile
 
 
@@ -10,14 +12,24 @@ class AbstractCPU(object):
 
     def __init__(self):
         self.fail_descr_list = []
+        self.fail_descr_free_list = []
+        # counters about the loops and bridges compiled and freed; when
+        # translated, warmspot.py replaces this with the prebuilt
+        # 'jit_stats' that the interpreter can read
+        self.jit_stats = JitStats()
 
     def get_fail_descr_number(self, descr):
         assert isinstance(descr, history.AbstractFailDescr)
         n = descr.index
         if n < 0:
             lst = self.fail_descr_list
-            n = len(lst)
-            lst.append(descr)
+            if len(self.fail_descr_free_list) > 0:
+                n = self.fail_descr_free_list.pop()
+                assert lst[n] is None
+                lst[n] = descr
+            else:
+                n = len(lst)
+                lst.append(descr)
             descr.index = n
         return n
 
@@ -35,17 +47,41 @@ class AbstractCPU(object):
 
     def compile_loop(self, inputargs, operations, looptoken):
         """Assemble the given loop.
-        Extra attributes should be put in the LoopToken to
-        point to the compiled loop in assembler.
+        Should create and attach a fresh CompiledLoopToken to
+        looptoken.compiled_loop_token.  Extra attributes should be
+        put in the LoopToken to point to the compiled loop in assembler.
         """
         raise NotImplementedError
 
-    def compile_bridge(self, faildescr, inputargs, operations):
+    def compile_bridge(self, faildescr, inputargs, operations,
+                       original_loop_token=None):
         """Assemble the bridge.
         The FailDescr is the descr of the original guard that failed.
+        The original_loop_token is the LoopToken of the loop that the
+        bridge is attached to, even if the guard is itself in a bridge.
         """
         raise NotImplementedError    
 
+    def free_loop_and_bridges(self, compiled_loop_token):
+        """This method is called to free resources (machine code,
+        references to resume guards, etc.) allocated by the compilation
+        of a loop and all bridges attached to it.  After this call, the
+        frontend cannot use this compiled loop token any more.
+
+        It is called from the __del__ of the CompiledLoopToken, so it
+        must not raise.
+        """
+        # The base class only frees the resume descrs, which are
+        # already the largest consumers of memory.  We expect
+        # 'compiled_loop_token' to be freed soon, but be ready to
+        # handle several calls for the same one.
+        lst = self.fail_descr_list
+        faildescr_indices = compiled_loop_token.faildescr_indices
+        compiled_loop_token.faildescr_indices = []
+        for n in faildescr_indices:
+            lst[n] = None
+        self.fail_descr_free_list.extend(faildescr_indices)
+
     def execute_token(self, looptoken):
         """Execute the generated code referenced by the looptoken.
         Returns the descr of the last executed operation: either the one
@@ -231,3 +267,49 @@ class AbstractCPU(object):
 
     def force(self, force_token):
         raise NotImplementedError
+
+
+class CompiledLoopToken(object):
+    """Backend-side data about a compiled loop and its bridges.  It is
+    referenced only by the LoopToken; when the LoopToken dies, its
+    __del__ calls cpu.free_loop_and_bridges().
+    """
+    _x86_mc_blocks = None       # see backend/x86/assembler.py
+    _x86_mc2_blocks = None
+
+    def __init__(self, cpu, number):
+        self.cpu = cpu
+        self.number = number
+        # the 'descr_number' of all the resume descrs that belong to this
+        # loop or to a bridge attached to it; filled by the frontend
+        self.faildescr_indices = []
+        self.stats = LoopStats(number)
+        cpu.jit_stats.total_compiled_loops += 1
+        cpu.jit_stats.loops[number] = self.stats
+        debug_start("jit-mem-looptoken-alloc")
+        debug_print("allocating Loop #", self.number)
+        debug_stop("jit-mem-looptoken-alloc")
+
+    def record_faildescr_index(self, n):
+        self.faildescr_indices.append(n)
+
+    def compiling_a_bridge(self):
+        self.stats.bridge_count += 1
+        self.cpu.jit_stats.total_compiled_bridges += 1
+        debug_start("jit-mem-looptoken-alloc")
+        debug_print("allocating Bridge #", self.stats.bridge_count,
+                    "of Loop #", self.number)
+        debug_stop("jit-mem-looptoken-alloc")
+
+    def __del__(self):
+        debug_start("jit-mem-looptoken-free")
+        debug_print("freeing Loop #", self.number, "with",
+                    self.stats.bridge_count, "attached bridges")
+        self.cpu.free_loop_and_bridges(self)
+        stats = self.cpu.jit_stats
+        stats.total_freed_loops += 1
+        stats.total_freed_bridges += self.stats.bridge_count
+        if (self.number in stats.loops and
+                stats.loops[self.number] is self.stats):
+            del stats.loops[self.number]
+        debug_stop("jit-mem-looptoken-free")
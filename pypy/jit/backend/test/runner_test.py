@@ -1209,6 +1209,34 @@ class LLtypeBackendTest(BaseBackendTest):
             res = self.execute_operation(get_op, [s_box], 'int', descr=fd)
             assert res.getint()  == 32
 
+    def test_array_raw(self):
+        A = rffi.CArray(lltype.Signed)
+        a = lltype.malloc(A, 5, flavor='raw')
+        a_box = BoxInt(heaptracker.adr2int(llmemory.cast_ptr_to_adr(a)))
+        descr = self.cpu.arraydescrof(A)
+        self.execute_operation(rop.SETARRAYITEM_RAW, [a_box, BoxInt(3),
+                                                      BoxInt(-42)],
+                               'void', descr=descr)
+        assert a[3] == -42
+        res = self.execute_operation(rop.GETARRAYITEM_RAW, [a_box, BoxInt(3)],
+                                     'int', descr=descr)
+        assert res.getint() == -42
+        lltype.free(a, flavor='raw')
+        if not self.cpu.supports_floats:
+            return
+        A = rffi.CArray(lltype.Float)
+        a = lltype.malloc(A, 5, flavor='raw')
+        a_box = BoxInt(heaptracker.adr2int(llmemory.cast_ptr_to_adr(a)))
+        descr = self.cpu.arraydescrof(A)
+        self.execute_operation(rop.SETARRAYITEM_RAW, [a_box, BoxInt(2),
+                                                      BoxFloat(2.5)],
+                               'void', descr=descr)
+        assert a[2] == 2.5
+        res = self.execute_operation(rop.GETARRAYITEM_RAW, [a_box, BoxInt(2)],
+                                     'float', descr=descr)
+        assert res.getfloat() == 2.5
+        lltype.free(a, flavor='raw')
+
     def test_new_with_vtable(self):
         cpu = self.cpu
         t_box, T_box = self.alloc_instance(self.T)
@@ -35,8 +35,12 @@ class MachineCodeBlockWrapper(object):
         self.old_mcs = [] # keepalive
         self.bigsize = bigsize
         self._mc = self._instantiate_mc()
+        self._mc.users = 1     # never freed: contains the helpers
         self.function_name = None
         self.profile_agent = profile_agent
+        self.recorded_blocks = None
+        self.recorded_size = 0
+        self.recorded_start = 0
 
     def _instantiate_mc(self): # hook for testing
         return codebuf.MachineCodeBlock(self.bigsize)
@@ -68,11 +72,46 @@ class MachineCodeBlockWrapper(object):
             self.end_function(done=False)
             self.start_pos = new_mc.get_relative_pos()
 
+        if self.recorded_blocks is not None:
+            self.recorded_blocks.append(new_mc)
+            self.recorded_size += (self._mc.get_relative_pos() -
+                                   self.recorded_start)
+            self.recorded_start = new_mc.get_relative_pos()
+
         self._mc.done()
         self.old_mcs.append(self._mc)
         self._mc = new_mc
     make_new_mc._dont_inline_ = True
 
+    # The machine code of a loop or bridge can span several blocks.  We
+    # record which ones, and count in each block how many compiled loops
+    # use it; a block that is no longer used by any loop can be freed.
+    # We also count the number of bytes written in the meantime.
+
+    def start_recording(self):
+        self.recorded_blocks = [self._mc]
+        self.recorded_size = 0
+        self.recorded_start = self._mc.get_relative_pos()
+
+    def stop_recording(self):
+        blocks = self.recorded_blocks
+        self.recorded_blocks = None
+        self.recorded_size += (self._mc.get_relative_pos() -
+                               self.recorded_start)
+        for block in blocks:
+            block.users += 1
+        return blocks
+
+    def release_blocks(self, blocks, freed_blocks):
+        """Forget one user of each of the 'blocks'.  The blocks that end
+        up unused are removed from 'old_mcs' and appended to the list
+        'freed_blocks'; the caller must drop them afterwards."""
+        for block in blocks:
+            block.users -= 1
+            if block.users == 0 and block is not self._mc:
+                self.old_mcs.remove(block)
+                freed_blocks.append(block)
+
     def tell(self):
         return self._mc.tell()
 
@@ -210,6 +249,7 @@ class Assembler386(object):
         funcname = self._find_debug_merge_point(operations)
 
         self.make_sure_mc_exists()
+        self.start_recording_blocks()
         regalloc = RegAlloc(self, self.cpu.translate_support_code)
         arglocs = regalloc.prepare_loop(inputargs, operations, looptoken)
         looptoken._x86_arglocs = arglocs
@@ -241,12 +281,15 @@ class Assembler386(object):
         debug_print("Loop #", looptoken.number, "has address",
                     looptoken._x86_loop_code, "to", self.mc.tell())
         self.mc.end_function()
+        self.stop_recording_blocks(looptoken.compiled_loop_token)
         
 
-    def assemble_bridge(self, faildescr, inputargs, operations):
+    def assemble_bridge(self, faildescr, inputargs, operations,
+                        original_loop_token=None):
         funcname = self._find_debug_merge_point(operations)
 
         self.make_sure_mc_exists()
+        self.start_recording_blocks()
         arglocs = self.rebuild_faillocs_from_descr(
             faildescr._x86_failure_recovery_bytecode)
         if not we_are_translated():
@@ -276,6 +319,50 @@ class Assembler386(object):
                     descr_number,
                     "has address", adr_bridge, "to", self.mc.tell())
         self.mc.end_function()
+        if original_loop_token is not None:
+            compiled_loop_token = original_loop_token.compiled_loop_token
+        else:
+            compiled_loop_token = None     # for tests
+        self.stop_recording_blocks(compiled_loop_token)
+
+    def start_recording_blocks(self):
+        self.mc.start_recording()
+        self.mc2.start_recording()
+
+    def stop_recording_blocks(self, compiled_loop_token):
+        # attach to 'compiled_loop_token' the blocks of machine code
+        # just used, so that free_blocks() can release them later
+        mc_blocks = self.mc.stop_recording()
+        mc2_blocks = self.mc2.stop_recording()
+        if compiled_loop_token is not None:
+            if compiled_loop_token._x86_mc_blocks is None:
+                compiled_loop_token._x86_mc_blocks = []
+                compiled_loop_token._x86_mc2_blocks = []
+            compiled_loop_token._x86_mc_blocks.extend(mc_blocks)
+            compiled_loop_token._x86_mc2_blocks.extend(mc2_blocks)
+            compiled_loop_token.stats.asm_size += (self.mc.recorded_size +
+                                                   self.mc2.recorded_size)
+
+    def free_blocks(self, compiled_loop_token):
+        """Called when 'compiled_loop_token' is freed.  The blocks of
+        machine code that are not used by any other loop any more are
+        freed too.  Note that a block is typically shared by many loops,
+        so this frees memory only after all of them are gone."""
+        mc_blocks = compiled_loop_token._x86_mc_blocks
+        mc2_blocks = compiled_loop_token._x86_mc2_blocks
+        if mc_blocks is None:
+            return
+        compiled_loop_token._x86_mc_blocks = None
+        compiled_loop_token._x86_mc2_blocks = None
+        freed_blocks = []
+        self.mc.release_blocks(mc_blocks, freed_blocks)
+        self.mc2.release_blocks(mc2_blocks, freed_blocks)
+        gc_ll_descr = self.cpu.gc_ll_descr
+        for block in freed_blocks:
+            start = rffi.cast(lltype.Signed, block._data)
+            gc_ll_descr.freeing_block(start, start + block._size)
+            debug_print('[freeing machine code block at', start, ']')
+        # the blocks themselves are unmapped by their __del__
 
     def _find_debug_merge_point(self, operations):
         for op in operations:
@@ -1448,6 +1535,30 @@ class Assembler386(object):
                 imm8(descr.jit_wb_if_flag_singlebyte))
         mc.JZ(rel8_patched_later)
         jz_location = mc.get_relative_pos()
+        jc_location = 0
+        if len(op.args) == 3:
+            # [objptr, newvalue, index]: the card marking variant.  If the
+            # array already has some cards set, check if the card of
+            # 'index' is one of them; in this case there is nothing to do.
+            # The card is the bit at offset -((index >> shift) + 1) from
+            # the GC header, i.e. at offset ~(index >> shift).
+            loc_index = arglocs[2]
+            loc_tmp = arglocs[3]
+            arglocs = arglocs[:3] + arglocs[4:]
+            mc.TEST(mem8(loc_base, descr.jit_wb_cards_set_byteofs),
+                    imm8(descr.jit_wb_cards_set_singlebyte))
+            mc.JZ(rel8_patched_later)
+            jz2_location = mc.get_relative_pos()
+            mc.MOV(loc_tmp, loc_index)
+            mc.SHR(loc_tmp, imm8(descr.jit_wb_card_page_shift))
+            mc.NOT(loc_tmp)
+            mc.BT(mem(loc_base, 0), loc_tmp)
+            mc.JC(rel8_patched_later)
+            jc_location = mc.get_relative_pos()
+            # patch the JZ above
+            offset = mc.get_relative_pos() - jz2_location
+            assert 0 < offset <= 127
+            mc.overwrite(jz2_location-1, [chr(offset)])
         # the following is supposed to be the slow path, so whenever possible
         # we choose the most compact encoding over the most efficient one.
         for i in range(len(arglocs)-1, -1, -1):
@@ -1455,15 +1566,23 @@ class Assembler386(object):
         # misaligned stack in the call, but it's ok because the write barrier
         # is not going to call anything more.  Also, this assumes that the
         # write barrier does not touch the xmm registers.
-        mc.CALL(rel32(descr.get_write_barrier_fn(self.cpu)))
+        if len(op.args) == 3:
+            func = descr.get_write_barrier_from_array_fn(self.cpu)
+        else:
+            func = descr.get_write_barrier_fn(self.cpu)
+        mc.CALL(rel32(func))
         for i in range(len(arglocs)):
             loc = arglocs[i]
             assert isinstance(loc, REG)
             mc.POP(loc)
-        # patch the JZ above
+        # patch the JZ and the JC above
         offset = mc.get_relative_pos() - jz_location
         assert 0 < offset <= 127
         mc.overwrite(jz_location-1, [chr(offset)])
+        if jc_location:
+            offset = mc.get_relative_pos() - jc_location
+            assert 0 < offset <= 127
+            mc.overwrite(jc_location-1, [chr(offset)])
         self._stop_block()
 
     def genop_force_token(self, op, arglocs, resloc):
@@ -134,6 +134,9 @@ machine_code_dumper = MachineCodeDumper()
 
 
 class MachineCodeBlock(InMemoryCodeBuilder):
+    # number of compiled loops whose code is (partly) in this block;
+    # see MachineCodeBlockWrapper in assembler.py
+    users = 0
 
     def __init__(self, map_size):
         data = alloc(map_size)
@@ -663,6 +663,18 @@ class RegAlloc(object):
         # anyway by the following setfield_gc.  It avoids loading it twice
         # from the memory.
         arglocs = [loc_base, loc_newvalue]
+        if len(op.args) == 3:
+            # the write barrier of an array with card marking: the index
+            # is passed too.  It must be in a register, as it is popped
+            # back after the call.
+            loc_index = self.rm.make_sure_var_in_reg(op.args[2], op.args,
+                                                     imm_fine=False)
+            arglocs.append(loc_index)
+            # and a scratch register for the inlined check of the card
+            tmpbox = TempBox()
+            loc_tmp = self.rm.force_allocate_reg(tmpbox, op.args)
+            self.rm.possibly_free_var(tmpbox)
+            arglocs.append(loc_tmp)
         # add eax, ecx and edx as extra "arguments" to ensure they are
         # saved and restored.  Fish in self.rm to know which of these
         # registers really need to be saved (a bit of a hack).  Moreover,
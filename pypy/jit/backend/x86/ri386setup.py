@@ -452,6 +452,9 @@ TEST.mode2(MODRM, IMM32, ['\xF7', orbyte(0<<3), modrm(1), immediate(2)])
 TEST.mode2(AL,    IMM8,  ['\xA8', immediate(2,'b')])
 TEST.mode2(MODRM8,IMM8,  ['\xF6', orbyte(0<<3),modrm(1,'b'), immediate(2,'b')])
 
+BT = Instruction()
+BT.mode2(MODRM, REG,   ['\x0F\xA3', register(2,8), modrm(1)])
+
 INT = Instruction()
 INT.mode1(IMM8, ['\xCD', immediate(1, 'b')])
 
@@ -7,6 +7,7 @@ from pypy.jit.backend.x86.assembler import Assembler386
 from pypy.jit.backend.x86.regalloc import FORCE_INDEX_OFS
 from pypy.jit.backend.x86.profagent import ProfileAgent
 from pypy.jit.backend.llsupport.llmodel import AbstractLLCPU
+from pypy.jit.backend.model import CompiledLoopToken
 
 class CPU386(AbstractLLCPU):
     debug = True
@@ -47,10 +48,18 @@ class CPU386(AbstractLLCPU):
         self.profile_agent.shutdown()
 
     def compile_loop(self, inputargs, operations, looptoken):
+        looptoken.compiled_loop_token = CompiledLoopToken(self,
+                                                          looptoken.number)
         self.assembler.assemble_loop(inputargs, operations, looptoken)
 
-    def compile_bridge(self, faildescr, inputargs, operations):
-        self.assembler.assemble_bridge(faildescr, inputargs, operations)
+    def compile_bridge(self, faildescr, inputargs, operations,
+                       original_loop_token=None):
+        self.assembler.assemble_bridge(faildescr, inputargs, operations,
+                                       original_loop_token)
+
+    def free_loop_and_bridges(self, compiled_loop_token):
+        AbstractLLCPU.free_loop_and_bridges(self, compiled_loop_token)
+        self.assembler.free_blocks(compiled_loop_token)
 
     def set_future_value_int(self, index, intvalue):
         self.assembler.fail_boxes_int.setitem(index, intvalue)
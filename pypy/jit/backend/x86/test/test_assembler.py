@@ -11,6 +11,7 @@ class FakeCPU:
     supports_floats = True
 
 class FakeMC:
+    users = 0
     def __init__(self, base_address=0):
         self.content = []
         self._size = 100
@@ -258,3 +259,17 @@ def test_mc_wrapper_profile_agent():
         mc.writechr("x")
     mc.end_function()
     assert agent.functions == [("abc", 0, 4), ("cde", 5, 4), ("xyz", 9, 29), ("xyz", 200, 22)]
+
+def test_mc_wrapper_recorded_size():
+    mc = FakeMCWrapper(100)
+    for i in range(9):
+        mc.writechr("x")
+    first_mc = mc._mc
+    mc.start_recording()
+    for i in range(50):
+        mc.writechr("x")
+    blocks = mc.stop_recording()
+    assert blocks == [first_mc, mc._mc]
+    assert [block.users for block in blocks] == [2, 1]
+    # the 50 bytes, plus the JMP to the second block
+    assert mc.recorded_size == 51
@@ -79,6 +79,8 @@ def test_basic():
     #yield check, '\xDC\x44\x24\x08', 'FADD', mem(esp, 8)
     # JB +5
     yield check, '\x72\x05',                 'JB', rel8(+5)
+    # bt [edx], eax
+    yield check, '\x0F\xA3\x02',             'BT', mem(edx), eax
 
 
 ##def test_conditional():
@@ -705,6 +705,23 @@ class Transformer(object):
         from pypy.rpython.lltypesystem.rffi import size_and_sign, sizeof
         from pypy.rlib.rarithmetic import intmask
         assert not self._is_gc(op.args[0])
+        float_arg = op.args[0].concretetype is lltype.Float
+        float_res = op.result.concretetype is lltype.Float
+        if float_arg and float_res:
+            return
+        if float_res:
+            return SpaceOperation('cast_int_to_float', [op.args[0]],
+                                  op.result)
+        if float_arg:
+            # cast to a Signed first, then to the real target type
+            v1 = Variable(); v1.concretetype = lltype.Signed
+            op1 = SpaceOperation('cast_float_to_int', [op.args[0]], v1)
+            op2 = SpaceOperation('force_cast', [v1], op.result)
+            result = self.rewrite_op_force_cast(op2)
+            if result is None:
+                op1.result = op.result   # the target type is LONG or ULONG
+                return op1
+            return [op1] + result
         size1, unsigned1 = size_and_sign(op.args[0].concretetype)
         size2, unsigned2 = size_and_sign(op.result.concretetype)
         if size2 >= sizeof(lltype.Signed):
@@ -3,6 +3,7 @@ from pypy.rpython.lltypesystem import lltype, rclass
 from pypy.rpython.ootypesystem import ootype
 from pypy.rpython import rlist
 from pypy.rpython.lltypesystem import rstr as ll_rstr, rdict as ll_rdict
+from pypy.rpython.lltypesystem import rordereddict as ll_rordereddict
 from pypy.rpython.lltypesystem import rlist as lltypesystem_rlist
 from pypy.rpython.lltypesystem.lloperation import llop
 from pypy.rpython.ootypesystem import rdict as oo_rdict
@@ -273,6 +274,46 @@ class LLtypeHelpers:
         return LLtypeHelpers._dictnext_items(lltype.Ptr(RES), iter)
     _ll_1_dictiter_nextitems.need_result_type = True
 
+    # ---------- compact dicts (translation.compactdicts) ----------
+
+    def _ll_0_newodict(DICT):
+        return ll_rordereddict.ll_newdict(DICT)
+    _ll_0_newodict.need_result_type = True
+
+    _ll_2_odict_getitem = ll_rordereddict.ll_dict_getitem
+    _ll_3_odict_setitem = ll_rordereddict.ll_dict_setitem
+    _ll_2_odict_delitem = ll_rordereddict.ll_dict_delitem
+    _ll_3_odict_setdefault = ll_rordereddict.ll_setdefault
+    _ll_2_odict_contains = ll_rordereddict.ll_contains
+    _ll_3_odict_get = ll_rordereddict.ll_get
+    _ll_1_odict_copy = ll_rordereddict.ll_copy
+    _ll_1_odict_clear = ll_rordereddict.ll_clear
+    _ll_2_odict_update = ll_rordereddict.ll_update
+
+    _ll_1_odict_keys   = ll_rordereddict.ll_dict_keys
+    _ll_1_odict_values = ll_rordereddict.ll_dict_values
+    _ll_1_odict_items  = ll_rordereddict.ll_dict_items
+    _ll_1_odict_keys  .need_result_type = True
+    _ll_1_odict_values.need_result_type = True
+    _ll_1_odict_items .need_result_type = True
+
+    def _ll_1_newodictiter(ITER, d):
+        return ll_rordereddict.ll_dictiter(lltype.Ptr(ITER), d)
+    _ll_1_newodictiter.need_result_type = True
+
+    _odictnext_keys   = staticmethod(ll_rordereddict.ll_dictnext_group['keys'])
+    _odictnext_values = staticmethod(
+        ll_rordereddict.ll_dictnext_group['values'])
+    _odictnext_items  = staticmethod(ll_rordereddict.ll_dictnext_group['items'])
+
+    def _ll_1_odictiter_nextkeys(iter):
+        return LLtypeHelpers._odictnext_keys(None, iter)
+    def _ll_1_odictiter_nextvalues(iter):
+        return LLtypeHelpers._odictnext_values(None, iter)
+    def _ll_1_odictiter_nextitems(RES, iter):
+        return LLtypeHelpers._odictnext_items(lltype.Ptr(RES), iter)
+    _ll_1_odictiter_nextitems.need_result_type = True
+
     # ---------- strings and unicode ----------
 
     _ll_5_string_copy_contents = ll_rstr.copy_string_contents
@@ -803,6 +803,26 @@ class TestFlatten:
             self.encoding_test(f, [rffi.cast(FROM, 42)], expected,
                                transform=True)
 
+    def test_force_cast_float(self):
+        from pypy.rpython.lltypesystem import rffi
+        for FROM, TO, expected in [
+            (lltype.Signed, lltype.Float, "cast_int_to_float %i0 -> %f0"),
+            (rffi.SHORT, lltype.Float, "cast_int_to_float %i0 -> %f0"),
+            (lltype.Float, lltype.Signed, "cast_float_to_int %f0 -> %i0"),
+            (lltype.Float, rffi.UCHAR, """cast_float_to_int %f0 -> %i0
+                                          int_and %i0, $255 -> %i1"""),
+            ]:
+            expected = [s.strip() for s in expected.splitlines()]
+            if TO is lltype.Float:
+                expected.append('float_return %f0')
+            else:
+                expected.append('int_return %i' + str(len(expected) - 1))
+            expected = '\n'.join(expected)
+            def f(n):
+                return rffi.cast(TO, n)
+            self.encoding_test(f, [rffi.cast(FROM, 42)], expected,
+                               transform=True)
+
     def test_force_cast_pointer(self):
         from pypy.rpython.lltypesystem import rffi
         def h(p):
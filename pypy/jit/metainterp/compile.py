@@ -1,4 +1,5 @@
 
+import weakref
 from pypy.rpython.ootypesystem import ootype
 from pypy.objspace.flow.model import Constant, Variable
 from pypy.rlib.objectmodel import we_are_translated
@@ -76,8 +77,16 @@ def compile_new_loop(metainterp, old_loop_tokens, greenkey, start):
     if old_loop_token is not None:
         metainterp.staticdata.log("reusing old loop")
         return old_loop_token
-    send_loop_to_backend(metainterp_sd, loop, "loop")
+    if loop.peeled_loop is not None:
+        # the preamble jumps to the peeled loop, so compile the latter first
+        send_loop_to_backend(metainterp_sd, loop.peeled_loop, "loop")
+        send_loop_to_backend(metainterp_sd, loop, "preamble")
+    else:
+        send_loop_to_backend(metainterp_sd, loop, "loop")
+    metainterp_sd.memory_manager.keep_loop_alive(loop_token)
     insert_loop_token(old_loop_tokens, loop_token)
+    loop_token.greenkey = greenkey
+    jitdriver_sd.warmstate.on_compile(loop_token.number, greenkey)
     return loop_token
 
 def insert_loop_token(old_loop_tokens, loop_token):
@@ -113,29 +122,69 @@ def send_loop_to_backend(metainterp_sd, loop, type):
     metainterp_sd.profiler.end_backend()
     metainterp_sd.stats.add_new_loop(loop)
     if not we_are_translated():
-        if type != "entry bridge":
+        if type != "entry bridge" and type != "preamble":
             metainterp_sd.stats.compiled()
         else:
             loop._ignore_during_counting = True
     metainterp_sd.log("compiled new " + type)
-
-def send_bridge_to_backend(metainterp_sd, faildescr, inputargs, operations):
+    loop_token.compiled_loop_token.stats.location = _find_location(
+        loop.operations)
+    record_loop_or_bridge(loop_token, loop.operations)
+    # the TreeLoop itself may be kept alive by the stats, for tests;
+    # make sure it does not keep the loop token alive too
+    loop.token = None
+
+def send_bridge_to_backend(metainterp_sd, faildescr, inputargs, operations,
+                           original_loop_token):
     n = metainterp_sd.cpu.get_fail_descr_number(faildescr)
     metainterp_sd.logger_ops.log_bridge(inputargs, operations, n)
     if not we_are_translated():
         show_loop(metainterp_sd)
         TreeLoop.check_consistency_of(inputargs, operations)
         pass
+    original_loop_token.compiled_loop_token.compiling_a_bridge()
     metainterp_sd.profiler.start_backend()
     debug_start("jit-backend")
     try:
-        metainterp_sd.cpu.compile_bridge(faildescr, inputargs, operations)
+        metainterp_sd.cpu.compile_bridge(faildescr, inputargs, operations,
+                                         original_loop_token)
     finally:
         debug_stop("jit-backend")
     metainterp_sd.profiler.end_backend()
     if not we_are_translated():
         metainterp_sd.stats.compiled()
     metainterp_sd.log("compiled new bridge")            
+    record_loop_or_bridge(original_loop_token, operations)
+
+def record_loop_or_bridge(original_loop_token, operations):
+    """Record on 'original_loop_token' the data about the freshly
+    compiled 'operations', which are either its own loop or a bridge
+    attached to it.  See memmgr.py.
+    """
+    assert original_loop_token is not None
+    compiled_loop_token = original_loop_token.compiled_loop_token
+    compiled_loop_token.stats.trace_length += len(operations)
+    wref = weakref.ref(original_loop_token)
+    for op in operations:
+        descr = op.descr
+        if isinstance(descr, ResumeDescr):
+            descr.wref_original_loop_token = wref
+            if descr.index >= 0:
+                compiled_loop_token.record_faildescr_index(descr.index)
+        elif isinstance(descr, LoopToken):
+            # a JUMP or a CALL_ASSEMBLER: the code of the target loop
+            # must stay alive as long as our own code
+            if descr is not original_loop_token:
+                original_loop_token.record_jump_to(descr)
+            # the operations may be kept alive by the stats, for tests;
+            # make sure they don't keep the loop tokens alive too
+            op.descr = None
+
+def _find_location(operations):
+    for op in operations:
+        if op.opnum == rop.DEBUG_MERGE_POINT:
+            return op.args[0]._get_str()
+    return '?'
 
 # ____________________________________________________________
 
@@ -210,9 +259,25 @@ def make_done_loop_tokens():
             }
 
 class ResumeDescr(AbstractFailDescr):
+    # a weakref to the LoopToken of the loop that this guard belongs to
+    # (directly or via a bridge); set by record_loop_or_bridge()
+    wref_original_loop_token = None
+
     def __init__(self, original_greenkey):
         self.original_greenkey = original_greenkey
 
+    def get_original_loop_token(self):
+        # the loop is necessarily still alive if we are called from
+        # its code, e.g. after a guard failure
+        looptoken = self.wref_original_loop_token()
+        assert looptoken is not None
+        return looptoken
+
+    def record_failure(self):
+        # for pypyjit.get_stats()
+        looptoken = self.get_original_loop_token()
+        looptoken.compiled_loop_token.stats.record_guard_failure(self.index)
+
 class ResumeGuardDescr(ResumeDescr):
     _counter = 0        # if < 0, there is one counter per value;
     _counters = None    # they get stored in _counters then.
@@ -259,6 +324,7 @@ class ResumeGuardDescr(ResumeDescr):
             self._counter = cnt | i
 
     def handle_fail(self, metainterp_sd, jitdriver_sd):
+        self.record_failure()
         if self.must_compile(metainterp_sd, jitdriver_sd):
             return self._trace_and_compile_from_bridge(metainterp_sd,
                                                        jitdriver_sd)
@@ -322,8 +388,13 @@ class ResumeGuardDescr(ResumeDescr):
         inputargs = metainterp.history.inputargs
         if not we_are_translated():
             self._debug_suboperations = new_loop.operations
+        original_loop_token = self.get_original_loop_token()
         send_bridge_to_backend(metainterp.staticdata, self, inputargs,
-                               new_loop.operations)
+                               new_loop.operations, original_loop_token)
+        metainterp.staticdata.memory_manager.keep_loop_alive(
+            original_loop_token)
+        metainterp.jitdriver_sd.warmstate.on_compile_bridge(
+            original_loop_token.number, self.original_greenkey)
 
     def copy_all_attrbutes_into(self, res):
         # XXX a bit ugly to have to list them all here
@@ -351,6 +422,7 @@ class ResumeGuardForcedDescr(ResumeGuardDescr):
         # the virtualrefs and virtualizable have been forced by
         # handle_async_forcing() just a moment ago.
         from pypy.jit.metainterp.blackhole import resume_in_blackhole
+        self.record_failure()
         token = metainterp_sd.cpu.get_latest_force_token()
         all_virtuals = self.fetch_data(token)
         if all_virtuals is None:
@@ -488,10 +560,12 @@ class ResumeFromInterpDescr(ResumeDescr):
         jitdriver_sd = metainterp.jitdriver_sd
         metainterp.history.inputargs = self.redkey
         new_loop_token = make_loop_token(len(self.redkey), jitdriver_sd)
+        new_loop_token.greenkey = self.original_greenkey
         new_loop.greenkey = self.original_greenkey
         new_loop.inputargs = self.redkey
         new_loop.token = new_loop_token
         send_loop_to_backend(metainterp_sd, new_loop, "entry bridge")
+        metainterp_sd.memory_manager.keep_loop_alive(new_loop_token)
         # send the new_loop to warmspot.py, to be called directly the next time
         jitdriver_sd.warmstate.attach_unoptimized_bridge_from_interp(
             self.original_greenkey,
@@ -502,6 +576,10 @@ class ResumeFromInterpDescr(ResumeDescr):
         # it always goes at the end of the list, as it is the most
         # general loop token
         old_loop_tokens.append(new_loop_token)
+        metainterp.set_compiled_merge_points(self.original_greenkey,
+                                             old_loop_tokens)
+        jitdriver_sd.warmstate.on_compile(new_loop_token.number,
+                                          self.original_greenkey)
 
     def reset_counter_from_failure(self):
         pass
@@ -542,7 +620,10 @@ def prepare_last_operation(new_loop, target_loop_token):
     op = new_loop.operations[-1]
     if not isinstance(target_loop_token, TerminatingLoopToken):
         # normal case
-        op.descr = target_loop_token     # patch the jump target
+        if op.descr is None:
+            op.descr = target_loop_token     # patch the jump target
+        # else the optimizer already patched it, possibly to jump directly
+        # to the peeled loop of target_loop_token
     else:
         # The target_loop_token is a pseudo loop token,
         # e.g. loop_tokens_done_with_this_frame_void[0]
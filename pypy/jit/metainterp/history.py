@@ -700,12 +700,23 @@ class LoopToken(AbstractDescr):
     """
     terminating = False # see TerminatingLoopToken in compile.py
     outermost_jitdriver_sd = None
+    short_preamble = None   # see ShortPreamble in optimizeopt.py
     # specnodes = ...
     # and more data specified by the backend when the loop is compiled
     number = 0
+    generation = 0                  # see memmgr.py
+    compiled_loop_token = None      # see backend/model.py
+    greenkey = None                 # for the jitdriver hooks
 
     def __init__(self, number=0):
         self.number = number
+        self._keepalive_target_looptokens = []
+
+    def record_jump_to(self, target_loop_token):
+        """Keep 'target_loop_token' alive as long as 'self' is: the
+        code of 'self' contains a JUMP or a CALL_ASSEMBLER to it."""
+        if target_loop_token not in self._keepalive_target_looptokens:
+            self._keepalive_target_looptokens.append(target_loop_token)
 
     def repr_of_descr(self):
         return '<Loop%d>' % self.number
@@ -714,6 +725,8 @@ class TreeLoop(object):
     inputargs = None
     operations = None
     token = None
+    peeled_loop = None    # if the loop was peeled: the steady-state loop
+                          # that the 'operations' of the preamble jump to
 
     def __init__(self, name):
         self.name = name
@@ -0,0 +1,181 @@
+import sys
+from pypy.rlib.rarithmetic import ovfcheck
+
+MININT = -sys.maxint - 1
+MAXINT = sys.maxint
+
+
+class IntBound(object):
+    """A closed range [lower, upper] of the values that an integer box
+    can take.  Used by optimizeopt.py to remove overflow checks and
+    comparisons whose outcome is already known.  The bounds are always
+    valid machine integers; an unknown integer is [MININT, MAXINT].
+    """
+    _attrs_ = ('lower', 'upper')
+
+    def __init__(self, lower=MININT, upper=MAXINT):
+        self.lower = lower
+        self.upper = upper
+
+    def clone(self):
+        return IntBound(self.lower, self.upper)
+
+    def __repr__(self):
+        return '<IntBound [%d, %d]>' % (self.lower, self.upper)
+
+    # ----------
+
+    def is_constant(self):
+        return self.lower == self.upper
+
+    def is_bounded(self):
+        return self.lower != MININT or self.upper != MAXINT
+
+    def contains(self, val):
+        return self.lower <= val <= self.upper
+
+    def known_lt(self, other):
+        return self.upper < other.lower
+
+    def known_le(self, other):
+        return self.upper <= other.lower
+
+    def known_gt(self, other):
+        return other.known_lt(self)
+
+    def known_ge(self, other):
+        return other.known_le(self)
+
+    def known_disjoint(self, other):
+        return self.upper < other.lower or other.upper < self.lower
+
+    def known_nonnegative(self):
+        return self.lower >= 0
+
+    # ----------
+    # narrowing; each of these returns True if the bound changed
+
+    def intersect(self, other):
+        changed = False
+        if other.lower > self.lower:
+            self.lower = other.lower
+            changed = True
+        if other.upper < self.upper:
+            self.upper = other.upper
+            changed = True
+        return changed
+
+    def make_le_const(self, val):
+        if val < self.upper:
+            self.upper = val
+            return True
+        return False
+
+    def make_ge_const(self, val):
+        if val > self.lower:
+            self.lower = val
+            return True
+        return False
+
+    def make_lt(self, other):
+        # 'self < other' and 'other <= MAXINT' give 'self <= MAXINT-1'
+        # even if nothing is known about 'other'
+        if other.upper == MININT:
+            return False     # impossible; the guard will fail anyway
+        return self.make_le_const(other.upper - 1)
+
+    def make_le(self, other):
+        return self.make_le_const(other.upper)
+
+    def make_gt(self, other):
+        if other.lower == MAXINT:
+            return False
+        return self.make_ge_const(other.lower + 1)
+
+    def make_ge(self, other):
+        return self.make_ge_const(other.lower)
+
+    # ----------
+    # arithmetic.  The *_bound() methods return the range of the exact
+    # result, saturated to [MININT, MAXINT]; this is only the range of
+    # the machine-level result if the matching *_cannot_overflow()
+    # returns True, or if an overflow check was done.
+
+    def add_cannot_overflow(self, other):
+        try:
+            ovfcheck(self.lower + other.lower)
+            ovfcheck(self.upper + other.upper)
+        except OverflowError:
+            return False
+        return True
+
+    def sub_cannot_overflow(self, other):
+        try:
+            ovfcheck(self.lower - other.upper)
+            ovfcheck(self.upper - other.lower)
+        except OverflowError:
+            return False
+        return True
+
+    def mul_cannot_overflow(self, other):
+        try:
+            self._mul_corners(other)
+        except OverflowError:
+            return False
+        return True
+
+    def add_bound(self, other):
+        return IntBound(_saturated_add(self.lower, other.lower),
+                        _saturated_add(self.upper, other.upper))
+
+    def sub_bound(self, other):
+        return IntBound(_saturated_sub(self.lower, other.upper),
+                        _saturated_sub(self.upper, other.lower))
+
+    def mul_bound(self, other):
+        try:
+            p1, p2, p3, p4 = self._mul_corners(other)
+        except OverflowError:
+            return IntUnbounded()
+        return IntBound(min(min(p1, p2), min(p3, p4)),
+                        max(max(p1, p2), max(p3, p4)))
+
+    def _mul_corners(self, other):
+        # raises OverflowError if any of the products overflows
+        p1 = ovfcheck(self.lower * other.lower)
+        p2 = ovfcheck(self.lower * other.upper)
+        p3 = ovfcheck(self.upper * other.lower)
+        p4 = ovfcheck(self.upper * other.upper)
+        return (p1, p2, p3, p4)
+
+
+def _saturated_add(a, b):
+    try:
+        return ovfcheck(a + b)
+    except OverflowError:
+        if a > 0:
+            return MAXINT
+        else:
+            return MININT
+
+def _saturated_sub(a, b):
+    try:
+        return ovfcheck(a - b)
+    except OverflowError:
+        if a >= 0:
+            return MAXINT
+        else:
+            return MININT
+
+
+def IntUnbounded():
+    return IntBound(MININT, MAXINT)
+
+def IntLowerBound(lower):
+    return IntBound(lower, MAXINT)
+
+def IntUpperBound(upper):
+    return IntBound(MININT, upper)
+
+def ConstIntBound(value):
+    return IntBound(value, value)
@@ -0,0 +1,81 @@
+import math
+from pypy.rlib.debug import debug_start, debug_print, debug_stop
+from pypy.rlib.objectmodel import we_are_translated
+
+#
+# Logic to decide which loops are old and not used any more.
+#
+# All the long-lived references to a LoopToken are weakrefs (see
+# JitCell.get_entry_loop_token() and ResumeDescr.wref_original_loop_token),
+# apart from the 'alive_loops' dict of the MemoryManager, which is the
+# only place that keeps them alive.  A loop token also keeps alive the
+# loop tokens that its code can jump to (see LoopToken.record_jump_to()).
+#
+# The time is counted in "generations": we start a new generation every
+# time we trace something.  A loop that was not entered from the
+# interpreter during the last 'max_age' generations is removed from
+# 'alive_loops'.  The GC will then soon free its LoopToken, whose
+# CompiledLoopToken frees the machine code and the resume data.
+#
+
+class MemoryManager(object):
+
+    def __init__(self):
+        self.check_frequency = -1
+        # the generation is increased by one every time we start tracing;
+        # even a long-running process will not trace 2**31 times
+        self.current_generation = 1
+        self.next_check = -1
+        self.max_age = 0
+        self.alive_loops = {}
+
+    def set_max_age(self, max_age, check_frequency=0):
+        if max_age <= 0:
+            self.next_check = -1
+        else:
+            self.max_age = max_age
+            if check_frequency <= 0:
+                check_frequency = int(math.sqrt(max_age))
+            self.check_frequency = check_frequency
+            self.next_check = self.current_generation + 1
+
+    def next_generation(self):
+        self.current_generation += 1
+        if self.current_generation == self.next_check:
+            self.next_check = self.current_generation + self.check_frequency
+            self._kill_old_loops_now()
+
+    def keep_loop_alive(self, looptoken):
+        if looptoken.generation != self.current_generation:
+            looptoken.generation = self.current_generation
+            self.alive_loops[looptoken] = None
+
+    def _kill_old_loops_now(self):
+        debug_start("jit-mem-collect")
+        oldtotal = len(self.alive_loops)
+        debug_print("Current generation:", self.current_generation)
+        debug_print("Loop tokens before:", oldtotal)
+        max_generation = self.current_generation - (self.max_age - 1)
+        killed = []
+        for looptoken in self.alive_loops.keys():
+            if looptoken.generation < max_generation:
+                del self.alive_loops[looptoken]
+                killed.append(looptoken)
+        newtotal = len(self.alive_loops)
+        debug_print("Loop tokens freed: ", oldtotal - newtotal)
+        debug_print("Loop tokens left:  ", newtotal)
+        debug_stop("jit-mem-collect")
+        # call the on_invalidate() hook of the jitdriver only now, because
+        # it may run arbitrary code
+        for looptoken in killed:
+            jitdriver_sd = looptoken.outermost_jitdriver_sd
+            if jitdriver_sd is not None and looptoken.greenkey is not None:
+                jitdriver_sd.warmstate.on_invalidate(looptoken.number,
+                                                     looptoken.greenkey)
+        if not we_are_translated() and killed:
+            # on top of CPython, the LoopTokens are freed by refcounting
+            # as soon as the last reference goes away, except if they
+            # are part of a reference cycle
+            del killed[:]
+            from pypy.rlib import rgc
+            rgc.collect()
@@ -1,6 +1,7 @@
 from pypy.jit.metainterp.history import Box, BoxInt, LoopToken, BoxFloat,\
-     ConstFloat
+     ConstFloat, TreeLoop
 from pypy.jit.metainterp.history import Const, ConstInt, ConstPtr, ConstObj, REF
+from pypy.jit.metainterp.history import INT
 from pypy.jit.metainterp.resoperation import rop, ResOperation
 from pypy.jit.metainterp import jitprof
 from pypy.jit.metainterp.executor import execute_nonspec
@@ -17,13 +18,18 @@ from pypy.jit.metainterp.typesystem import llhelper, oohelper
 from pypy.rlib.objectmodel import we_are_translated
 from pypy.rpython.lltypesystem import lltype
 from pypy.jit.metainterp.history import AbstractDescr, make_hashable_int
+from pypy.jit.metainterp.intutils import IntBound, IntUnbounded
+from pypy.jit.metainterp.intutils import IntLowerBound, ConstIntBound
 
-def optimize_loop_1(metainterp_sd, loop):
+def optimize_loop_1(metainterp_sd, loop, unroll=False):
     """Optimize loop.operations to make it match the input of loop.specnodes
     and to remove internal overheadish operations.  Note that loop.specnodes
     must be applicable to the loop; you will probably get an AssertionError
-    if not.
+    if not.  If 'unroll' is True, first try to peel off one iteration of
+    the loop as a preamble (see peel_loop()).
     """
+    if unroll and peel_loop(metainterp_sd, loop):
+        return
     optimizer = Optimizer(metainterp_sd, loop)
     optimizer.setup_virtuals_and_constants()
     optimizer.propagate_forward()
@@ -44,16 +50,21 @@ LEVEL_CONSTANT   = '\x03'
 
 
 class OptValue(object):
-    _attrs_ = ('box', 'known_class', 'last_guard_index', 'level')
+    _attrs_ = ('box', 'known_class', 'last_guard_index', 'level',
+               'intbound')
     last_guard_index = -1
 
     level = LEVEL_UNKNOWN
     known_class = None
+    intbound = None
 
     def __init__(self, box):
         self.box = box
+        self.intbound = IntUnbounded()
         if isinstance(box, Const):
             self.level = LEVEL_CONSTANT
+            if box.type == INT:
+                self.intbound = ConstIntBound(box.getint())
         # invariant: box is a Const if and only if level == LEVEL_CONSTANT
 
     def force_box(self):
@@ -83,6 +94,8 @@ class OptValue(object):
         assert isinstance(constbox, Const)
         self.box = constbox
         self.level = LEVEL_CONSTANT
+        if constbox.type == INT:
+            self.intbound = ConstIntBound(constbox.getint())
 
     def get_constant_class(self, cpu):
         level = self.level
@@ -145,6 +158,10 @@ class ConstantValue(OptValue):
 
     def __init__(self, box):
         self.box = box
+        if box.type == INT:
+            self.intbound = ConstIntBound(box.getint())
+        else:
+            self.intbound = IntUnbounded()
 
 CONST_0      = ConstInt(0)
 CONST_1      = ConstInt(1)
@@ -411,6 +428,9 @@ class Optimizer(object):
         self.bool_boxes = {}
         self.loop_invariant_results = {}
         self.pure_operations = args_dict()
+        self.short_preamble = None
+        self.int_producers = {}
+        self.overflow_guard_removed = False
 
     def forget_numberings(self, virtualbox):
         self.metainterp_sd.profiler.count(jitprof.OPT_FORCINGS)
@@ -526,17 +546,20 @@ class Optimizer(object):
         self.exception_might_have_happened = False
         self.newoperations = []
         for op in self.loop.operations:
-            opnum = op.opnum
-            for value, func in optimize_ops:
-                if opnum == value:
-                    func(self, op)
-                    break
-            else:
-                self.optimize_default(op)
+            self.optimize_operation(op)
         self.loop.operations = self.newoperations
         # accumulate counters
         self.resumedata_memo.update_counters(self.metainterp_sd.profiler)
 
+    def optimize_operation(self, op):
+        opnum = op.opnum
+        for value, func in optimize_ops:
+            if opnum == value:
+                func(self, op)
+                break
+        else:
+            self.optimize_default(op)
+
     def emit_operation(self, op):
         self.heap_op_optimizer.emitting_operation(op)
         self._emit_operation(op)
@@ -554,7 +577,9 @@ class Optimizer(object):
         elif op.can_raise():
             self.exception_might_have_happened = True
         elif op.returns_bool_result():
-            self.bool_boxes[self.getvalue(op.result)] = None
+            boolvalue = self.getvalue(op.result)
+            self.bool_boxes[boolvalue] = None
+            boolvalue.intbound.intersect(IntBound(0, 1))
         self.newoperations.append(op)
 
     def store_final_boxes_in_guard(self, op):
@@ -619,17 +644,27 @@ class Optimizer(object):
 
     def optimize_JUMP(self, op):
         orgop = self.loop.operations[-1]
-        exitargs = []
         target_loop_token = orgop.descr
         assert isinstance(target_loop_token, LoopToken)
-        specnodes = target_loop_token.specnodes
-        assert len(op.args) == len(specnodes)
-        for i in range(len(specnodes)):
-            value = self.getvalue(op.args[i])
-            specnodes[i].teardown_virtual_node(self, value, exitargs)
+        exitargs = self.teardown_jump_args(op.args,
+                                           target_loop_token.specnodes)
+        short_preamble = target_loop_token.short_preamble
+        if (short_preamble is not None and
+            self.short_preamble_holds(short_preamble, exitargs)):
+            # jump directly to the peeled loop, skipping the preamble
+            exitargs = self.inline_short_preamble(short_preamble, exitargs)
+            op.descr = short_preamble.target
         op.args = exitargs[:]
         self.emit_operation(op)
 
+    def teardown_jump_args(self, args, specnodes):
+        assert len(args) == len(specnodes)
+        exitargs = []
+        for i in range(len(specnodes)):
+            value = self.getvalue(args[i])
+            specnodes[i].teardown_virtual_node(self, value, exitargs)
+        return exitargs
+
     def optimize_guard(self, op, constbox, emit_operation=True):
         value = self.getvalue(op.args[0])
         if value.is_constant():
@@ -641,6 +676,7 @@ class Optimizer(object):
         if emit_operation:
             self.emit_operation(op)
         value.make_constant(constbox)
+        self.propagate_bounds_backward(op.args[0])
 
     def optimize_GUARD_ISNULL(self, op):
         value = self.getvalue(op.args[0])
@@ -695,10 +731,11 @@ class Optimizer(object):
         assert isinstance(expectedclassbox, Const)
         realclassbox = value.get_constant_class(self.cpu)
         if realclassbox is not None:
-            # the following assert should always be true for now,
-            # because invalid loops that would fail it are detected
-            # earlier, in optimizefindnode.py.
-            assert realclassbox.same_constant(expectedclassbox)
+            # invalid loops that would fail this check are normally
+            # detected earlier, in optimizefindnode.py; but the body of
+            # a peeled loop can still see a class that contradicts it.
+            if not realclassbox.same_constant(expectedclassbox):
+                raise InvalidLoop
             return
         emit_operation = True
         if value.last_guard_index != -1:
@@ -731,10 +768,21 @@ class Optimizer(object):
         self.exception_might_have_happened = False
 
     def optimize_GUARD_NO_OVERFLOW(self, op):
+        if self.overflow_guard_removed:
+            # the previous INT_xxx_OVF was proven not to overflow
+            self.overflow_guard_removed = False
+            return
         # otherwise the default optimizer will clear fields, which is unwanted
         # in this case
         self.emit_operation(op)
 
+    def optimize_GUARD_OVERFLOW(self, op):
+        if self.overflow_guard_removed:
+            # the previous INT_xxx_OVF cannot overflow, so this path
+            # cannot be taken
+            raise InvalidLoop
+        self.emit_operation(op)
+
 
     def _optimize_nullness(self, op, box, expect_nonnull):
         value = self.getvalue(box)
@@ -746,12 +794,19 @@ class Optimizer(object):
             self.optimize_default(op)
 
     def optimize_INT_IS_TRUE(self, op):
-        if self.getvalue(op.args[0]) in self.bool_boxes:
-            self.make_equal_to(op.result, self.getvalue(op.args[0]))
+        value = self.getvalue(op.args[0])
+        if value in self.bool_boxes:
+            self.make_equal_to(op.result, value)
+            return
+        if not value.intbound.contains(0):
+            self.make_constant_int(op.result, 1)
             return
         self._optimize_nullness(op, op.args[0], True)
 
     def optimize_INT_IS_ZERO(self, op):
+        if not self.getvalue(op.args[0]).intbound.contains(0):
+            self.make_constant_int(op.result, 0)
+            return
         self._optimize_nullness(op, op.args[0], False)
 
     def _optimize_oois_ooisnot(self, op, expect_isnot):
@@ -882,6 +937,13 @@ class Optimizer(object):
         else:
             value.ensure_nonnull()
             self.optimize_default(op)
+            self.make_int_result_bound(op.result, IntLowerBound(0))
+
+    def optimize_STRLEN(self, op):
+        self.optimize_default(op)
+        self.make_int_result_bound(op.result, IntLowerBound(0))
+
+    optimize_UNICODELEN = optimize_STRLEN
 
     def optimize_GETARRAYITEM_GC(self, op):
         value = self.getvalue(op.args[0])
@@ -982,6 +1044,13 @@ class Optimizer(object):
             self.make_constant_int(op.result, 0)
         else:
             self.optimize_default(op)
+            # 'x & y' is between 0 and y if y is non-negative
+            if v2.intbound.known_nonnegative():
+                self.make_int_result_bound(op.result,
+                                           IntBound(0, v2.intbound.upper))
+            elif v1.intbound.known_nonnegative():
+                self.make_int_result_bound(op.result,
+                                           IntBound(0, v1.intbound.upper))
 
     def optimize_INT_OR(self, op):
         v1 = self.getvalue(op.args[0])
@@ -993,8 +1062,511 @@ class Optimizer(object):
         else:
             self.optimize_default(op)
 
+    # ----------
+    # integer bounds
+
+    def make_int_result_bound(self, box, bound):
+        value = self.getvalue(box)
+        if not value.is_constant():
+            value.intbound.intersect(bound)
+
+    def optimize_INT_ADD(self, op):
+        v1 = self.getvalue(op.args[0])
+        v2 = self.getvalue(op.args[1])
+        self.optimize_default(op)
+        if v1.intbound.add_cannot_overflow(v2.intbound):
+            self.make_int_result_bound(op.result,
+                                       v1.intbound.add_bound(v2.intbound))
+            self.int_producers[op.result] = op
+
+    def optimize_INT_SUB(self, op):
+        v1 = self.getvalue(op.args[0])
+        v2 = self.getvalue(op.args[1])
+        self.optimize_default(op)
+        if v1.intbound.sub_cannot_overflow(v2.intbound):
+            self.make_int_result_bound(op.result,
+                                       v1.intbound.sub_bound(v2.intbound))
+            self.int_producers[op.result] = op
+
+    def optimize_INT_MUL(self, op):
+        v1 = self.getvalue(op.args[0])
+        v2 = self.getvalue(op.args[1])
+        self.optimize_default(op)
+        if v1.intbound.mul_cannot_overflow(v2.intbound):
+            self.make_int_result_bound(op.result,
+                                       v1.intbound.mul_bound(v2.intbound))
+
+    def optimize_INT_ADD_OVF(self, op):
+        v1 = self.getvalue(op.args[0])
+        v2 = self.getvalue(op.args[1])
+        if v1.intbound.add_cannot_overflow(v2.intbound):
+            self._remove_overflow_check(op, rop.INT_ADD)
+            return
+        self.emit_operation(op)
+        # the result is only used if the following GUARD_NO_OVERFLOW
+        # passes, in which case it is the exact sum
+        self.make_int_result_bound(op.result,
+                                   v1.intbound.add_bound(v2.intbound))
+        self.int_producers[op.result] = op
+
+    def optimize_INT_SUB_OVF(self, op):
+        v1 = self.getvalue(op.args[0])
+        v2 = self.getvalue(op.args[1])
+        if v1.intbound.sub_cannot_overflow(v2.intbound):
+            self._remove_overflow_check(op, rop.INT_SUB)
+            return
+        self.emit_operation(op)
+        self.make_int_result_bound(op.result,
+                                   v1.intbound.sub_bound(v2.intbound))
+        self.int_producers[op.result] = op
+
+    def optimize_INT_MUL_OVF(self, op):
+        v1 = self.getvalue(op.args[0])
+        v2 = self.getvalue(op.args[1])
+        if v1.intbound.mul_cannot_overflow(v2.intbound):
+            self._remove_overflow_check(op, rop.INT_MUL)
+            return
+        self.emit_operation(op)
+
+    def _remove_overflow_check(self, op, opnum):
+        # don't mutate 'op' itself, it may still be needed by the caller
+        newop = ResOperation(opnum, op.args[:], op.result)
+        self.optimize_operation(newop)
+        self.overflow_guard_removed = True
+
+    def _optimize_int_comparison(self, op, known_true, known_false):
+        if known_true:
+            self.make_constant_int(op.result, 1)
+        elif known_false:
+            self.make_constant_int(op.result, 0)
+        else:
+            self.optimize_default(op)
+            self.int_producers[op.result] = op
+
+    def optimize_INT_LT(self, op):
+        v1 = self.getvalue(op.args[0])
+        v2 = self.getvalue(op.args[1])
+        self._optimize_int_comparison(op,
+            v1.intbound.known_lt(v2.intbound),
+            v1 is v2 or v1.intbound.known_ge(v2.intbound))
+
+    def optimize_INT_LE(self, op):
+        v1 = self.getvalue(op.args[0])
+        v2 = self.getvalue(op.args[1])
+        self._optimize_int_comparison(op,
+            v1 is v2 or v1.intbound.known_le(v2.intbound),
+            v1.intbound.known_gt(v2.intbound))
+
+    def optimize_INT_GT(self, op):
+        v1 = self.getvalue(op.args[0])
+        v2 = self.getvalue(op.args[1])
+        self._optimize_int_comparison(op,
+            v1.intbound.known_gt(v2.intbound),
+            v1 is v2 or v1.intbound.known_le(v2.intbound))
+
+    def optimize_INT_GE(self, op):
+        v1 = self.getvalue(op.args[0])
+        v2 = self.getvalue(op.args[1])
+        self._optimize_int_comparison(op,
+            v1 is v2 or v1.intbound.known_ge(v2.intbound),
+            v1.intbound.known_lt(v2.intbound))
+
+    def optimize_INT_EQ(self, op):
+        v1 = self.getvalue(op.args[0])
+        v2 = self.getvalue(op.args[1])
+        self._optimize_int_comparison(op, v1 is v2,
+            v1.intbound.known_disjoint(v2.intbound))
+
+    def optimize_INT_NE(self, op):
+        v1 = self.getvalue(op.args[0])
+        v2 = self.getvalue(op.args[1])
+        self._optimize_int_comparison(op,
+            v1.intbound.known_disjoint(v2.intbound), v1 is v2)
+
+    def propagate_bounds_backward(self, box):
+        # a guard just gave us new information about 'box': narrow the
+        # bounds of the arguments of the operation that produced it
+        try:
+            op = self.int_producers[box]
+        except KeyError:
+            return
+        opnum = op.opnum
+        for value, func in propagate_bounds_ops:
+            if opnum == value:
+                func(self, op)
+                break
+
+    def _narrow_lt(self, box1, box2):
+        # we know that 'box1 < box2'
+        v1 = self.getvalue(box1)
+        v2 = self.getvalue(box2)
+        if not v1.is_constant() and v1.intbound.make_lt(v2.intbound):
+            self.propagate_bounds_backward(box1)
+        if not v2.is_constant() and v2.intbound.make_gt(v1.intbound):
+            self.propagate_bounds_backward(box2)
+
+    def _narrow_le(self, box1, box2):
+        # we know that 'box1 <= box2'
+        v1 = self.getvalue(box1)
+        v2 = self.getvalue(box2)
+        if not v1.is_constant() and v1.intbound.make_le(v2.intbound):
+            self.propagate_bounds_backward(box1)
+        if not v2.is_constant() and v2.intbound.make_ge(v1.intbound):
+            self.propagate_bounds_backward(box2)
+
+    def _narrow_to(self, box, bound):
+        value = self.getvalue(box)
+        if not value.is_constant() and value.intbound.intersect(bound):
+            self.propagate_bounds_backward(box)
+
+    def _get_comparison_result(self, op):
+        # returns 1 or 0 if the result of 'op' is known, or -1
+        constbox = self.get_constant_box(op.result)
+        if constbox is None:
+            return -1
+        return constbox.getint()
+
+    def propagate_bounds_INT_LT(self, op):
+        r = self._get_comparison_result(op)
+        if r == 1:
+            self._narrow_lt(op.args[0], op.args[1])
+        elif r == 0:
+            self._narrow_le(op.args[1], op.args[0])
+
+    def propagate_bounds_INT_LE(self, op):
+        r = self._get_comparison_result(op)
+        if r == 1:
+            self._narrow_le(op.args[0], op.args[1])
+        elif r == 0:
+            self._narrow_lt(op.args[1], op.args[0])
+
+    def propagate_bounds_INT_GT(self, op):
+        r = self._get_comparison_result(op)
+        if r == 1:
+            self._narrow_lt(op.args[1], op.args[0])
+        elif r == 0:
+            self._narrow_le(op.args[0], op.args[1])
+
+    def propagate_bounds_INT_GE(self, op):
+        r = self._get_comparison_result(op)
+        if r == 1:
+            self._narrow_le(op.args[1], op.args[0])
+        elif r == 0:
+            self._narrow_lt(op.args[0], op.args[1])
+
+    def propagate_bounds_INT_EQ(self, op):
+        if self._get_comparison_result(op) == 1:
+            self._narrow_le(op.args[0], op.args[1])
+            self._narrow_le(op.args[1], op.args[0])
+
+    def propagate_bounds_INT_NE(self, op):
+        if self._get_comparison_result(op) == 0:
+            self._narrow_le(op.args[0], op.args[1])
+            self._narrow_le(op.args[1], op.args[0])
+
+    def propagate_bounds_INT_ADD(self, op):
+        v1 = self.getvalue(op.args[0])
+        v2 = self.getvalue(op.args[1])
+        r = self.getvalue(op.result)
+        self._narrow_to(op.args[0], r.intbound.sub_bound(v2.intbound))
+        self._narrow_to(op.args[1], r.intbound.sub_bound(v1.intbound))
+
+    def propagate_bounds_INT_SUB(self, op):
+        v1 = self.getvalue(op.args[0])
+        v2 = self.getvalue(op.args[1])
+        r = self.getvalue(op.result)
+        self._narrow_to(op.args[0], r.intbound.add_bound(v2.intbound))
+        self._narrow_to(op.args[1], v1.intbound.sub_bound(r.intbound))
+
+    propagate_bounds_INT_ADD_OVF = propagate_bounds_INT_ADD
+    propagate_bounds_INT_SUB_OVF = propagate_bounds_INT_SUB
+
+    # ----------
+    # loop peeling
+
+    def peel(self, operations, unsafe_fielddescrs):
+        """Optimize self.loop as a preamble, followed by the steady-state
+        loop optimized with what the preamble knows about the loop-invariant
+        values.  'operations' are the unoptimized operations of the loop,
+        which are copied for the steady-state loop.  Returns the latter,
+        or None if it cannot be built; in that case, the field descrs whose
+        value turned out to be modified by the loop are added to
+        'unsafe_fielddescrs' and the caller can try again.
+        """
+        loop = self.loop
+        specnodes = loop.token.specnodes
+        original_inputargs = loop.inputargs
+        original_jumpargs = operations[-1].args
+        #
+        # optimize the preamble, i.e. the first iteration of the loop
+        self.setup_virtuals_and_constants()
+        preamble_inputargs = loop.inputargs
+        self.exception_might_have_happened = False
+        self.newoperations = []
+        for i in range(len(loop.operations) - 1):
+            self.optimize_operation(loop.operations[i])
+        jumpop = loop.operations[-1]
+        assert jumpop.opnum == rop.JUMP
+        exitargs = self.teardown_jump_args(jumpop.args, specnodes)
+        heap = self.heap_op_optimizer
+        heap.force_all_lazy_setfields()
+        preamble_fields = heap.copy_cached_fields(unsafe_fielddescrs)
+        preamble_jump = ResOperation(rop.JUMP, exitargs[:], None)
+        self.emit_operation(preamble_jump)
+        preamble_operations = self.newoperations
+        #
+        # set up the state at the start of the peeled loop.  The input
+        # arguments that are passed unmodified around the loop are loop-
+        # invariant: they keep the same box, and so everything that we
+        # know about them.  The other ones are replaced with fresh boxes.
+        renamed = {}
+        body_inputargs = []
+        for i in range(len(original_inputargs)):
+            box = original_inputargs[i]
+            specnode = specnodes[i]
+            if (original_jumpargs[i] is box and
+                isinstance(specnode, NotSpecNode)):
+                newbox = box
+            else:
+                newbox = box.clonebox()
+            renamed[box] = newbox
+            specnode.setup_virtual_node(self, newbox, body_inputargs)
+        invariant, candidates = _find_invariant_operations(
+            preamble_inputargs, body_inputargs, preamble_operations)
+        self.reset_int_bounds(candidates)
+        # the fields read by the preamble are still known to the peeled
+        # loop, as long as the loop does not modify them
+        heap.preamble_fields = preamble_fields
+        heap.cached_fields = _copy_cached_fields(preamble_fields,
+                                                 unsafe_fielddescrs)
+        #
+        # optimize the peeled loop
+        self.exception_might_have_happened = False
+        self.newoperations = []
+        snapshots = {}
+        try:
+            for i in range(len(operations) - 1):
+                op = _rename_operation(operations[i], renamed, snapshots)
+                self.optimize_operation(op)
+            body_jumpargs = [_rename_box(box, renamed)
+                             for box in original_jumpargs]
+            body_exitargs = self.teardown_jump_args(body_jumpargs, specnodes)
+        except InvalidLoop:
+            return None
+        heap.force_all_lazy_setfields()
+        valid = True
+        for descr, value, fieldvalue in heap.used_preamble_fields:
+            if heap.read_cached_field(descr, value) is not fieldvalue:
+                unsafe_fielddescrs[descr] = None
+                valid = False
+        if not valid:
+            return None
+        #
+        # the values computed in the preamble and used by the peeled loop
+        # are passed to it as extra loop-invariant arguments
+        seen = {}
+        for box in body_inputargs:
+            seen[box] = None
+        extraargs = []
+        for op in self.newoperations:
+            _collect_extra_args(op.args, seen, extraargs)
+            if op.fail_args is not None:
+                _collect_extra_args(op.fail_args, seen, extraargs)
+            if op.result is not None:
+                seen[op.result] = None
+        _collect_extra_args(body_exitargs[:], seen, extraargs)
+        #
+        loop_token = compile.make_loop_token(
+            len(body_inputargs) + len(extraargs),
+            loop.token.outermost_jitdriver_sd)
+        body_jump = ResOperation(rop.JUMP, body_exitargs + extraargs, None,
+                                 descr=loop_token)
+        self.emit_operation(body_jump)
+        peeled_loop = TreeLoop(loop.name + ' (peeled)')
+        peeled_loop.inputargs = body_inputargs + extraargs
+        peeled_loop.operations = self.newoperations
+        peeled_loop.token = loop_token
+        #
+        preamble_jump.args = exitargs + extraargs
+        preamble_jump.descr = loop_token
+        loop.operations = preamble_operations
+        self.short_preamble = self.make_short_preamble(
+            preamble_inputargs, invariant, candidates, extraargs, loop_token)
+        self.resumedata_memo.update_counters(self.metainterp_sd.profiler)
+        return peeled_loop
+
+    def reset_int_bounds(self, candidates):
+        """Forget the integer bounds found by the preamble.  Some of them
+        come from guards on values that change from one iteration to the
+        next, and a bridge jumping to the peeled loop does not check these
+        guards.  Only the bounds that follow from the operations and the
+        guards of the short preamble, in 'candidates', are kept."""
+        for value in self.values.values():
+            if not value.is_constant():
+                value.intbound = IntUnbounded()
+        for op in candidates:
+            if op.is_guard():
+                self.propagate_bounds_backward(op.args[0])
+            elif op.returns_bool_result():
+                self.make_int_result_bound(op.result, IntBound(0, 1))
+            else:
+                self._reset_int_result_bound(op)
+
+    def _reset_int_result_bound(self, op):
+        opnum = op.opnum
+        if (opnum != rop.INT_ADD and opnum != rop.INT_SUB and
+            opnum != rop.INT_MUL and opnum != rop.INT_AND):
+            return
+        b1 = self.getvalue(op.args[0]).intbound
+        b2 = self.getvalue(op.args[1]).intbound
+        if opnum == rop.INT_ADD:
+            if b1.add_cannot_overflow(b2):
+                self.make_int_result_bound(op.result, b1.add_bound(b2))
+        elif opnum == rop.INT_SUB:
+            if b1.sub_cannot_overflow(b2):
+                self.make_int_result_bound(op.result, b1.sub_bound(b2))
+        elif opnum == rop.INT_MUL:
+            if b1.mul_cannot_overflow(b2):
+                self.make_int_result_bound(op.result, b1.mul_bound(b2))
+        else:
+            if b2.known_nonnegative():
+                self.make_int_result_bound(op.result, IntBound(0, b2.upper))
+            elif b1.known_nonnegative():
+                self.make_int_result_bound(op.result, IntBound(0, b1.upper))
+
+    def make_short_preamble(self, preamble_inputargs, invariant, candidates,
+                            extraargs, loop_token):
+        needed = {}
+        for box in extraargs:
+            if box not in invariant:
+                return None     # cannot be recomputed by a bridge
+            needed[box] = None
+        # keep only the guards and what is needed to compute 'extraargs'
+        operations = []
+        for i in range(len(candidates) - 1, -1, -1):
+            op = candidates[i]
+            if op.is_guard():
+                operations.append(ResOperation(op.opnum, op.args[:], None))
+            elif op.result in needed:
+                operations.append(ResOperation(op.opnum, op.args[:],
+                                               op.result, op.descr))
+            else:
+                continue
+            for arg in op.args:
+                if isinstance(arg, Box):
+                    needed[arg] = None
+        operations.reverse()
+        return ShortPreamble(preamble_inputargs, operations, extraargs,
+                             loop_token)
+
+    def short_preamble_holds(self, short_preamble, exitargs):
+        """Check, without emitting anything, that all the guards of the
+        short preamble are already known to pass at this point."""
+        values = {}
+        for i in range(len(exitargs)):
+            values[short_preamble.inputargs[i]] = self.getvalue(exitargs[i])
+        for op in short_preamble.operations:
+            argvalues = []
+            for arg in op.args:
+                if isinstance(arg, Const):
+                    argvalues.append(self.getvalue(arg))
+                else:
+                    value = values.get(arg, None)
+                    if value is None:
+                        break
+                    argvalues.append(value)
+            else:
+                if op.is_guard():
+                    if not self._guard_is_known_true(op, argvalues):
+                        return False
+                else:
+                    value = self._find_known_result(op, argvalues)
+                    if value is not None:
+                        values[op.result] = value
+                continue
+            if op.is_guard():
+                return False
+        return True
+
+    def _guard_is_known_true(self, op, argvalues):
+        value = argvalues[0]
+        opnum = op.opnum
+        if opnum == rop.GUARD_TRUE:
+            expected = CONST_1
+        elif opnum == rop.GUARD_FALSE:
+            expected = CONST_0
+        elif opnum == rop.GUARD_VALUE:
+            expected = op.args[1]
+        elif opnum == rop.GUARD_NONNULL:
+            return value.is_nonnull()
+        elif opnum == rop.GUARD_ISNULL:
+            return value.is_null()
+        elif opnum == rop.GUARD_CLASS or opnum == rop.GUARD_NONNULL_CLASS:
+            if not value.is_nonnull():
+                return False
+            realclassbox = value.get_constant_class(self.cpu)
+            expectedclassbox = op.args[1]
+            assert isinstance(expectedclassbox, Const)
+            return (realclassbox is not None and
+                    realclassbox.same_constant(expectedclassbox))
+        else:
+            return False
+        assert isinstance(expected, Const)
+        if not value.is_constant():
+            return False
+        box = value.box
+        assert isinstance(box, Const)
+        return box.same_constant(expected)
+
+    def _find_known_result(self, op, argvalues):
+        if op.is_always_pure():
+            for value in argvalues:
+                if not value.is_constant():
+                    break
+            else:
+                argboxes = [value.box for value in argvalues]
+                resbox = execute_nonspec(self.cpu, None,
+                                         op.opnum, argboxes, op.descr)
+                return ConstantValue(resbox.constbox())
+            args = [value.get_key_box() for value in argvalues]
+            args.append(ConstInt(op.opnum))
+            oldop = self.pure_operations.get(args, None)
+            if oldop is not None and oldop.descr is op.descr:
+                return self.getvalue(oldop.result)
+        if op.opnum == rop.GETFIELD_GC or op.opnum == rop.GETFIELD_GC_PURE:
+            structvalue = argvalues[0]
+            if structvalue.is_virtual():
+                return structvalue.getfield(op.descr, None)
+            heap = self.heap_op_optimizer
+            lazy_op = heap.lazy_setfields.get(op.descr, None)
+            if (lazy_op is not None and
+                self.getvalue(lazy_op.args[0]) is not structvalue):
+                return None
+            return heap.read_cached_field(op.descr, structvalue)
+        return None
+
+    def inline_short_preamble(self, short_preamble, exitargs):
+        """Emit the operations of the short preamble, whose guards are
+        known to pass, and return the arguments of a jump to the peeled
+        loop."""
+        renamed = {}
+        for i in range(len(exitargs)):
+            renamed[short_preamble.inputargs[i]] = exitargs[i]
+        for op in short_preamble.operations:
+            if op.is_guard():
+                continue
+            args = [_rename_box(arg, renamed) for arg in op.args]
+            result = op.result.clonebox()
+            renamed[op.result] = result
+            self.optimize_operation(ResOperation(op.opnum, args, result,
+                                                 op.descr))
+        extraargs = [self.getvalue(renamed[box]).force_box()
+                     for box in short_preamble.extraargs]
+        return exitargs + extraargs
+
 
 optimize_ops = _findall(Optimizer, 'optimize_')
+propagate_bounds_ops = _findall(Optimizer, 'propagate_bounds_')
 
 
 class CachedArrayItems(object):
@@ -1014,11 +1586,23 @@ class HeapOpOptimizer(object):
         # lazily written setfields (at most one per descr):  {descr: op}
         self.lazy_setfields = {}
         self.lazy_setfields_descrs = []     # keys (at least) of previous dict
+        # when optimizing a peeled loop: the fields cached at the end of
+        # the preamble, and the ones that the loop really relied upon
+        self.preamble_fields = None
+        self.used_preamble_fields = []
 
     def clean_caches(self):
         self.cached_fields.clear()
         self.cached_arrayitems.clear()
 
+    def copy_cached_fields(self, excluded_descrs):
+        return _copy_cached_fields(self.cached_fields, excluded_descrs)
+
+    def note_preamble_field(self, descr, value, fieldvalue):
+        d = self.preamble_fields.get(descr, None)
+        if d is not None and d.get(value, None) is fieldvalue:
+            self.used_preamble_fields.append((descr, value, fieldvalue))
+
     def cache_field_value(self, descr, value, fieldvalue, write=False):
         if write:
             # when seeing a setfield, we have to clear the cache for the same
@@ -1201,6 +1785,8 @@ class HeapOpOptimizer(object):
         # or has been written to recently
         fieldvalue = self.read_cached_field(op.descr, value)
         if fieldvalue is not None:
+            if self.preamble_fields is not None and op.opnum == rop.GETFIELD_GC:
+                self.note_preamble_field(op.descr, value, fieldvalue)
             self.optimizer.make_equal_to(op.result, fieldvalue)
             return
         # default case: produce the operation
@@ -1233,3 +1819,125 @@ class HeapOpOptimizer(object):
                                    write=True)
 
 
+# ____________________________________________________________
+# Loop peeling
+
+class ShortPreamble(object):
+    """What a bridge must do before it can jump directly to the peeled
+    loop instead of to the preamble: the guards of the preamble on loop-
+    invariant values, which must already be known to pass in the bridge,
+    and the operations that recompute the extra loop-invariant arguments
+    of the peeled loop.  Expressed in terms of the preamble's inputargs.
+    """
+    def __init__(self, inputargs, operations, extraargs, target):
+        self.inputargs = inputargs
+        self.operations = operations
+        self.extraargs = extraargs
+        self.target = target        # the LoopToken of the peeled loop
+
+def peel_loop(metainterp_sd, loop):
+    """Turn 'loop' into a preamble, i.e. one optimized iteration, ending
+    with a jump to 'loop.peeled_loop', which is the rest of the loop
+    optimized with everything that the preamble learned about the loop-
+    invariant values: their guards and pure operations are then only
+    done once, in the preamble.  Returns False, leaving 'loop' unmodified,
+    if that is not possible.
+    """
+    unsafe_fielddescrs = {}
+    while True:
+        preamble = TreeLoop(loop.name)
+        preamble.inputargs = loop.inputargs
+        preamble.operations = [op.clone() for op in loop.operations]
+        preamble.token = loop.token
+        optimizer = Optimizer(metainterp_sd, preamble)
+        num_unsafe = len(unsafe_fielddescrs)
+        peeled_loop = optimizer.peel(loop.operations, unsafe_fielddescrs)
+        if peeled_loop is not None:
+            break
+        if len(unsafe_fielddescrs) == num_unsafe:
+            return False
+        # some fields cached by the preamble are modified by the loop;
+        # try again without assuming that they are loop-invariant
+    loop.inputargs = preamble.inputargs
+    loop.operations = preamble.operations
+    loop.peeled_loop = peeled_loop
+    loop.token.short_preamble = optimizer.short_preamble
+    return True
+
+def _copy_cached_fields(cached_fields, excluded_descrs):
+    result = {}
+    for descr, d in cached_fields.iteritems():
+        if descr not in excluded_descrs:
+            result[descr] = d.copy()
+    return result
+
+def _rename_box(box, renamed):
+    if isinstance(box, Box):
+        return renamed.get(box, box)
+    return box
+
+def _rename_snapshot(snapshot, renamed, snapshots):
+    if snapshot is None:
+        return None
+    try:
+        return snapshots[snapshot]
+    except KeyError:
+        pass
+    prev = _rename_snapshot(snapshot.prev, renamed, snapshots)
+    boxes = [_rename_box(box, renamed) for box in snapshot.boxes]
+    result = resume.Snapshot(prev, boxes)
+    snapshots[snapshot] = result
+    return result
+
+def _rename_operation(op, renamed, snapshots):
+    args = [_rename_box(arg, renamed) for arg in op.args]
+    result = op.result
+    if result is not None:
+        result = result.clonebox()
+        renamed[op.result] = result
+    descr = op.descr
+    if descr is not None:
+        descr = descr.clone_if_mutable()
+    newop = ResOperation(op.opnum, args, result, descr)
+    if op.is_guard():
+        assert isinstance(descr, compile.ResumeGuardDescr)
+        descr.rd_snapshot = _rename_snapshot(descr.rd_snapshot, renamed,
+                                             snapshots)
+        if op.fail_args is not None:
+            newop.fail_args = [_rename_box(box, renamed)
+                               for box in op.fail_args]
+    return newop
+
+def _collect_extra_args(boxes, seen, extraargs):
+    for box in boxes:
+        if isinstance(box, Box) and box not in seen:
+            seen[box] = None
+            extraargs.append(box)
+
+def _all_in(boxes, known):
+    for box in boxes:
+        if isinstance(box, Box) and box not in known:
+            return False
+    return True
+
+def _find_invariant_operations(preamble_inputargs, body_inputargs,
+                               preamble_operations):
+    # collect the guards on loop-invariant values and the operations
+    # that can recompute loop-invariant values from the input arguments
+    invariant = {}
+    for i in range(len(preamble_inputargs)):
+        box = preamble_inputargs[i]
+        if body_inputargs[i] is box:
+            invariant[box] = None
+    candidates = []
+    for i in range(len(preamble_operations) - 1):
+        op = preamble_operations[i]
+        if not _all_in(op.args, invariant):
+            continue
+        if op.is_foldable_guard():
+            candidates.append(op)
+        elif op.result is not None and (op.is_always_pure() or
+                                        op.opnum == rop.GETFIELD_GC):
+            invariant[op.result] = None
+            candidates.append(op)
+    return invariant, candidates
@@ -1,12 +1,13 @@
 import py, os
+import weakref
 from pypy.rpython.lltypesystem import lltype, llmemory, rclass
-from pypy.rlib.objectmodel import we_are_translated
+from pypy.rlib.objectmodel import we_are_translated, keepalive_until_here
 from pypy.rlib.unroll import unrolling_iterable
 from pypy.rlib.debug import debug_start, debug_stop, debug_print
 from pypy.rlib.debug import make_sure_not_resized
 from pypy.rlib import nonconst
 
-from pypy.jit.metainterp import history, compile, resume
+from pypy.jit.metainterp import history, compile, resume, memmgr
 from pypy.jit.metainterp.history import Const, ConstInt, ConstPtr, ConstFloat
 from pypy.jit.metainterp.history import Box
 from pypy.jit.metainterp.resoperation import rop
@@ -684,14 +685,24 @@ class MIFrame(object):
     @arguments("int", "boxes3", "boxes3")
     def _opimpl_recursive_call(self, jdindex, greenboxes, redboxes):
         targetjitdriver_sd = self.metainterp.staticdata.jitdrivers_sd[jdindex]
+        warmrunnerstate = targetjitdriver_sd.warmstate
+        if (warmrunnerstate.inlining and
+                warmrunnerstate.can_inline_callable(greenboxes)):
+            portal_code = targetjitdriver_sd.mainjitcode
+            return self.metainterp.perform_call(portal_code,
+                                                greenboxes + redboxes,
+                                                greenkey=greenboxes)
+        return self.do_recursive_call(targetjitdriver_sd, greenboxes,
+                                      redboxes)
+
+    def do_recursive_call(self, targetjitdriver_sd, greenboxes, redboxes):
+        # generate a residual call to the portal, which is turned into a
+        # CALL_ASSEMBLER if there is already a loop for 'greenboxes'
         allboxes = greenboxes + redboxes
         portal_code = targetjitdriver_sd.mainjitcode
         warmrunnerstate = targetjitdriver_sd.warmstate
         token = None
         if warmrunnerstate.inlining:
-            if warmrunnerstate.can_inline_callable(greenboxes):
-                return self.metainterp.perform_call(portal_code, allboxes,
-                                                    greenkey=greenboxes)
             token = warmrunnerstate.get_assembler_token(greenboxes)
             # verify that we have all green args, needed to make sure
             # that assembler that we call is still correct
@@ -787,10 +798,11 @@ class MIFrame(object):
 
     @arguments("int")
     def opimpl_can_enter_jit(self, jdindex):
-        if self.metainterp.in_recursion:
-            from pypy.jit.metainterp.warmspot import CannotInlineCanEnterJit
-            raise CannotInlineCanEnterJit()
-        assert jdindex == self.metainterp.jitdriver_sd.index, (
+        # if we are in an inlined portal call, this is the back-edge of a
+        # loop in the inlined function; it is handled by the following
+        # jit_merge_point, see leave_inlined_loop()
+        assert self.metainterp.in_recursion or (
+            jdindex == self.metainterp.jitdriver_sd.index), (
             "found a can_enter_jit that does not match the current jitdriver")
         self.metainterp.seen_can_enter_jit = True
 
@@ -808,11 +820,11 @@ class MIFrame(object):
         self.debug_merge_point(jitdriver_sd, greenboxes)
         if self.metainterp.seen_can_enter_jit:
             self.metainterp.seen_can_enter_jit = False
-            # Assert that it's impossible to arrive here with in_recursion
-            # set to a non-zero value: seen_can_enter_jit can only be set
-            # to True by opimpl_can_enter_jit, which should be executed
-            # just before opimpl_jit_merge_point (no recursion inbetween).
-            assert not self.metainterp.in_recursion
+            if self.metainterp.in_recursion:
+                self.leave_inlined_loop(jitdriver_sd, greenboxes, redboxes)
+            # seen_can_enter_jit can only be set to True by
+            # opimpl_can_enter_jit, which should be executed just before
+            # opimpl_jit_merge_point (no recursion inbetween).
             assert jitdriver_sd is self.metainterp.jitdriver_sd
             # Set self.pc to point to jit_merge_point instead of just after:
             # if reached_can_enter_jit() raises SwitchToBlackhole, then the
@@ -823,6 +835,24 @@ class MIFrame(object):
             self.metainterp.reached_can_enter_jit(greenboxes, redboxes)
             self.pc = saved_pc
 
+    def leave_inlined_loop(self, jitdriver_sd, greenboxes, redboxes):
+        # We are tracing an inlined portal call and reached the header of
+        # a loop inside it.  Don't try to trace the loop: instead, leave
+        # the inlined frame and replace the rest of the call with a call
+        # to the portal starting at this loop header.  If the loop is
+        # already compiled, the call becomes a CALL_ASSEMBLER.
+        metainterp = self.metainterp
+        assert len(metainterp.framestack) >= 2
+        assert metainterp.framestack[-1] is self
+        try:
+            metainterp.finishframe(None)
+        except ChangeFrame:
+            pass
+        frame = metainterp.framestack[-1]
+        resbox = frame.do_recursive_call(jitdriver_sd, greenboxes, redboxes)
+        frame.make_result_of_lastop(resbox)
+        raise ChangeFrame
+
     def debug_merge_point(self, jitdriver_sd, greenkey):
         # debugging: produce a DEBUG_MERGE_POINT operation
         loc = jitdriver_sd.warmstate.get_location_str(greenkey)
@@ -1126,6 +1156,7 @@ class MetaInterpStaticData(object):
 
         self.profiler = ProfilerClass()
         self.warmrunnerdesc = warmrunnerdesc
+        self.memory_manager = memmgr.MemoryManager()
 
         backendmodule = self.cpu.__module__
         backendmodule = backendmodule.split('.')[-2]
@@ -1494,6 +1525,8 @@ class MetaInterp(object):
         debug_print('~~~ ABORTING TRACING')
         self.staticdata.stats.aborted()
         self.resumekey.reset_counter_from_failure()
+        self.jitdriver_sd.warmstate.on_abort(reason,
+                                             self.resumekey.original_greenkey)
 
     def blackhole_if_trace_too_long(self):
         warmrunnerstate = self.jitdriver_sd.warmstate
@@ -1535,6 +1568,7 @@ class MetaInterp(object):
         debug_start('jit-tracing')
         self.staticdata._setup_once()
         self.staticdata.profiler.start_tracing()
+        self.staticdata.memory_manager.next_generation()
         assert jitdriver_sd is self.jitdriver_sd
         self.create_empty_history()
         try:
@@ -1565,10 +1599,17 @@ class MetaInterp(object):
         debug_start('jit-tracing')
         self.staticdata.profiler.start_tracing()
         assert isinstance(key, compile.ResumeGuardDescr)
+        # the loop is still alive here, as we come from its code.  Keep it
+        # alive until the bridge is attached to it: starting a new
+        # generation can remove it from the alive loops of the memory
+        # manager.
+        original_loop_token = key.get_original_loop_token()
+        self.staticdata.memory_manager.next_generation()
         self.initialize_state_from_guard_failure(key)
         try:
             return self._handle_guard_failure(key)
         finally:
+            keepalive_until_here(original_loop_token)
             self.staticdata.profiler.end_tracing()
             debug_stop('jit-tracing')
 
@@ -1706,10 +1747,21 @@ class MetaInterp(object):
             raise NotImplementedError(opname[opnum])
 
     def get_compiled_merge_points(self, greenkey):
+        """Return a fresh list of the loop tokens compiled for 'greenkey'
+        that are still alive.  The cell only keeps weakrefs to them."""
+        cell = self.jitdriver_sd.warmstate.jit_cell_at_key(greenkey)
+        result = []
+        if cell.compiled_merge_points_wref is not None:
+            for wref in cell.compiled_merge_points_wref:
+                looptoken = wref()
+                if looptoken is not None:
+                    result.append(looptoken)
+        return result
+
+    def set_compiled_merge_points(self, greenkey, looptokens):
         cell = self.jitdriver_sd.warmstate.jit_cell_at_key(greenkey)
-        if cell.compiled_merge_points is None:
-            cell.compiled_merge_points = []
-        return cell.compiled_merge_points
+        cell.compiled_merge_points_wref = [weakref.ref(token)
+                                           for token in looptokens]
 
     def compile(self, original_boxes, live_arg_boxes, start):
         num_green_args = self.jitdriver_sd.num_green_args
@@ -1720,6 +1772,7 @@ class MetaInterp(object):
         loop_token = compile.compile_new_loop(self, old_loop_tokens,
                                               greenkey, start)
         if loop_token is not None: # raise if it *worked* correctly
+            self.set_compiled_merge_points(greenkey, old_loop_tokens)
             raise GenerateMergePoint(live_arg_boxes, loop_token)
         self.history.operations.pop()     # remove the JUMP
 
@@ -219,7 +219,8 @@ _oplist = [
     'UNICODESETITEM/3',
     'NEWUNICODE/1',
     #'RUNTIMENEW/1',     # ootype operation
-    'COND_CALL_GC_WB',  # [objptr, newvalue]   (for the write barrier)
+    'COND_CALL_GC_WB',  # [objptr, newvalue] or [objptr, newvalue, index]
+                        # (for the write barrier)
     'DEBUG_MERGE_POINT/1',      # debugging only
     'VIRTUAL_REF_FINISH/2',   # removed before it's passed to the backend
 
@@ -17,12 +17,16 @@ def _get_jitcodes(testself, CPUClass, func, values, type_system):
     from pypy.jit.metainterp import simple_optimize
 
     class FakeJitCell:
-        compiled_merge_points = None
+        compiled_merge_points_wref = None
 
     class FakeWarmRunnerState:
         def attach_unoptimized_bridge_from_interp(self, greenkey, newloop):
             pass
 
+        def on_compile(self, number, greenkey):
+            pass
+        on_compile_bridge = on_abort = on_invalidate = on_compile
+
         def jit_cell_at_key(self, greenkey):
             assert greenkey == []
             return self._cell
@@ -529,6 +533,26 @@ class BasicTests:
         assert res == -2
         self.check_loop_count(1)
 
+    def test_is_preheated(self):
+        def is_preheated(x):
+            return x == 2
+        myjitdriver = JitDriver(greens = ['x'], reds = ['y'],
+                                is_preheated = is_preheated)
+        def f(x, y):
+            while y >= 0:
+                myjitdriver.can_enter_jit(x=x, y=y)
+                myjitdriver.jit_merge_point(x=x, y=y)
+                y -= x
+            return y
+        #
+        res = self.meta_interp(f, [1, 2])    # too few iterations
+        assert res == -1
+        self.check_loop_count(0)
+        #
+        res = self.meta_interp(f, [2, 4])    # but enough if preheated
+        assert res == -2
+        self.check_loop_count(1)
+
     def test_format(self):
         def f(n):
             return len("<%d>" % n)
@@ -4,9 +4,11 @@ from pypy.jit.metainterp.specnode import NotSpecNode, ConstantSpecNode
 from pypy.jit.metainterp.compile import insert_loop_token, compile_new_loop
 from pypy.jit.metainterp.compile import ResumeGuardDescr
 from pypy.jit.metainterp.compile import ResumeGuardCountersInt
-from pypy.jit.metainterp import optimize, jitprof, typesystem
+from pypy.jit.metainterp import optimize, jitprof, typesystem, memmgr
 from pypy.jit.metainterp.test.oparser import parse
 from pypy.jit.metainterp.test.test_optimizefindnode import LLtypeMixin
+from pypy.jit.backend.model import CompiledLoopToken
+from pypy.rlib.jit import JitStats
 
 
 def test_insert_loop_token():
@@ -32,8 +34,12 @@ class FakeCPU:
     ts = typesystem.llhelper
     def __init__(self):
         self.seen = []
+        self.jit_stats = JitStats()
     def compile_loop(self, inputargs, operations, token):
         self.seen.append((inputargs, operations, token))
+        token.compiled_loop_token = CompiledLoopToken(self, token.number)
+    def free_loop_and_bridges(self, compiled_loop_token):
+        pass
 
 class FakeLogger:
     def log_loop(self, inputargs, operations, number=0, type=None):
@@ -42,6 +48,10 @@ class FakeLogger:
 class FakeState:
     optimize_loop = staticmethod(optimize.optimize_loop)
     debug_level = 0
+    def __init__(self):
+        self.compiled = []
+    def on_compile(self, number, greenkey):
+        self.compiled.append((number, greenkey))
 
 class FakeGlobalData:
     loopnumbering = 0
@@ -53,6 +63,7 @@ class FakeMetaInterpStaticData:
 
     stats = Stats()
     profiler = jitprof.EmptyProfiler()
+    memory_manager = memmgr.MemoryManager()
     def log(self, msg, event_kind=None):
         pass
 
@@ -91,6 +102,9 @@ def test_compile_new_loop():
     #
     assert len(cpu.seen) == 1
     assert cpu.seen[0][2] == loop_token
+    assert metainterp.jitdriver_sd.warmstate.compiled == [(1, [])]
+    stats = cpu.jit_stats.loops[1]
+    assert stats.trace_length == len(cpu.seen[0][1])
     #
     del cpu.seen[:]
     metainterp = FakeMetaInterp()
@@ -0,0 +1,65 @@
+import sys
+from pypy.jit.metainterp.intutils import IntBound, IntUnbounded, \
+     IntLowerBound, IntUpperBound, ConstIntBound, MININT, MAXINT
+
+
+def test_known_comparisons():
+    a = IntBound(0, 9)
+    b = IntBound(10, 20)
+    assert a.known_lt(b)
+    assert a.known_le(b)
+    assert b.known_gt(a)
+    assert b.known_ge(a)
+    assert a.known_disjoint(b)
+    c = IntBound(9, 15)
+    assert not a.known_lt(c)
+    assert a.known_le(c)
+    assert not a.known_disjoint(c)
+    assert not IntUnbounded().known_lt(IntUnbounded())
+
+def test_make_lt_unbounded():
+    # 'i < n' for an unknown 'n' still means that 'i + 1' cannot overflow
+    i = IntUnbounded()
+    assert i.make_lt(IntUnbounded())
+    assert i.upper == MAXINT - 1
+    assert i.add_cannot_overflow(ConstIntBound(1))
+    assert not IntUnbounded().add_cannot_overflow(ConstIntBound(1))
+
+def test_make_ge_and_intersect():
+    i = IntUnbounded()
+    assert i.make_ge(ConstIntBound(0))
+    assert not i.make_ge(ConstIntBound(-5))
+    assert i.lower == 0
+    assert i.intersect(IntUpperBound(100))
+    assert not i.intersect(IntLowerBound(-3))
+    assert (i.lower, i.upper) == (0, 100)
+    assert i.contains(0) and i.contains(100) and not i.contains(101)
+    assert not i.is_constant()
+    assert i.intersect(IntLowerBound(100))
+    assert i.is_constant()
+
+def test_add_sub_bound():
+    a = IntBound(-5, 10)
+    b = IntBound(3, 4)
+    r = a.add_bound(b)
+    assert (r.lower, r.upper) == (-2, 14)
+    r = a.sub_bound(b)
+    assert (r.lower, r.upper) == (-9, 7)
+    r = IntLowerBound(1).add_bound(ConstIntBound(1))
+    assert (r.lower, r.upper) == (2, MAXINT)
+    assert not IntLowerBound(1).add_cannot_overflow(ConstIntBound(1))
+    r = IntUpperBound(0).sub_bound(ConstIntBound(1))
+    assert (r.lower, r.upper) == (MININT, -1)
+    assert IntUpperBound(0).sub_cannot_overflow(IntBound(-5, 0))
+    assert not IntUpperBound(0).sub_cannot_overflow(IntLowerBound(0))
+
+def test_mul_bound():
+    a = IntBound(-3, 4)
+    b = IntBound(-2, 5)
+    r = a.mul_bound(b)
+    assert (r.lower, r.upper) == (-15, 20)
+    assert a.mul_cannot_overflow(b)
+    big = IntBound(0, sys.maxint // 2 + 1)
+    assert not big.mul_cannot_overflow(ConstIntBound(2))
+    r = big.mul_bound(ConstIntBound(2))
+    assert (r.lower, r.upper) == (MININT, MAXINT)
@@ -0,0 +1,215 @@
+import py
+from pypy.rlib.jit import JitDriver, OPTIMIZER_UNROLL
+from pypy.jit.metainterp.test import test_loop
+from pypy.jit.metainterp.test.test_basic import LLJitMixin, OOJitMixin
+from pypy.jit.codewriter.policy import StopAtXPolicy
+
+class LoopUnrollTest(test_loop.LoopTest):
+    optimizer = OPTIMIZER_UNROLL
+
+    # ====> test_loop.py
+
+    # The tests below are the ones of test_loop.py whose loop counts are
+    # changed by peeling; the other tests are inherited unmodified.
+
+    def test_loop_with_two_paths(self):
+        from pypy.rpython.lltypesystem import lltype
+        from pypy.rpython.lltypesystem.lloperation import llop
+        myjitdriver = JitDriver(greens = [], reds = ['x', 'y', 'res'])
+
+        def l(y, x, t):
+            llop.debug_print(lltype.Void, y, x, t)
+
+        def g(y, x, r):
+            if y <= 12:
+                res = x - 2
+            else:
+                res = x
+            l(y, x, r)
+            return res
+
+        def f(x, y):
+            res = 0
+            while y > 0:
+                myjitdriver.can_enter_jit(x=x, y=y, res=res)
+                myjitdriver.jit_merge_point(x=x, y=y, res=res)
+                res += g(y, x, res)
+                y -= 1
+            return res * 2
+        res = self.meta_interp(f, [6, 33], policy=StopAtXPolicy(l))
+        assert res == f(6, 33)
+        # the guard on 'y <= 12' fails both in the preamble and in the
+        # peeled loop, so it gets two bridges instead of one
+        self.check_loop_count(3)
+
+    def test_alternating_loops(self):
+        myjitdriver = JitDriver(greens = [], reds = ['pattern'])
+        def f(pattern):
+            while pattern > 0:
+                myjitdriver.can_enter_jit(pattern=pattern)
+                myjitdriver.jit_merge_point(pattern=pattern)
+                if pattern & 1:
+                    pass
+                else:
+                    pass
+                pattern >>= 1
+            return 42
+        self.meta_interp(f, [0xF0F0])
+        # the guard on 'pattern & 1' is duplicated in the preamble, the
+        # peeled loop and the entry bridge; the failures are spread over
+        # these copies and none of them reaches trace_eagerness, so no
+        # bridge is compiled
+        self.check_loop_count(1)
+
+    def test_adapt_bridge_to_merge_point(self):
+        myjitdriver = JitDriver(greens = [], reds = ['x', 'z'])
+
+        class Z(object):
+            def __init__(self, elem):
+                self.elem = elem
+
+        def externfn(z):
+            pass
+
+        def f(x, y):
+            z = Z(y)
+            while x > 0:
+                myjitdriver.can_enter_jit(x=x, z=z)
+                myjitdriver.jit_merge_point(x=x, z=z)
+                if x % 5 != 0:
+                    externfn(z)
+                z = Z(z.elem + 1)
+                x -= 1
+            return z.elem
+
+        expected = f(100, 5)
+        res = self.meta_interp(f, [100, 5], policy=StopAtXPolicy(externfn))
+        assert res == expected
+
+        self.check_loop_count(2)
+        self.check_tree_loop_count(3)   # 1 loop, its preamble, 1 bridge
+
+    def test_automatic_promotion(self):
+        myjitdriver = JitDriver(greens = ['i'],
+                                reds = ['res', 'a'])
+        CO_INCREASE = 0
+        CO_JUMP_BACK_3 = 1
+        
+        code = [CO_INCREASE, CO_INCREASE, CO_INCREASE,
+                CO_JUMP_BACK_3, CO_INCREASE]
+        
+        def main_interpreter_loop(a):
+            i = 0
+            res = 0
+            c = len(code)
+            while True:
+                myjitdriver.jit_merge_point(res=res, i=i, a=a)
+                if i >= c:
+                    break
+                elem = code[i]
+                if elem == CO_INCREASE:
+                    i += a
+                    res += a
+                else:
+                    if res > 100:
+                        i += 1
+                    else:
+                        i = i - 3
+                        myjitdriver.can_enter_jit(res=res, i=i, a=a)
+            return res
+
+        res = self.meta_interp(main_interpreter_loop, [1])
+        assert res == main_interpreter_loop(1)
+        # the guard_values on 'a' are only done in the preamble
+        self.check_loops({'int_add' : 3, 'int_gt' : 1,
+                          'guard_false' : 1, 'jump' : 1})
+
+    def test_invariant_getfield(self):
+        myjitdriver = JitDriver(greens = [], reds = ['n', 'res', 'a'])
+        class A(object):
+            pass
+        def f(n, x):
+            a = A()
+            a.x = x
+            res = 0
+            while n > 0:
+                myjitdriver.can_enter_jit(n=n, a=a, res=res)
+                myjitdriver.jit_merge_point(n=n, a=a, res=res)
+                res += a.x
+                n -= 1
+            return res
+        res = self.meta_interp(f, [30, 3])
+        assert res == 90
+        self.check_loops(getfield_gc=0, int_add=1, int_sub=1)
+
+    def test_modified_field_is_not_invariant(self):
+        myjitdriver = JitDriver(greens = [], reds = ['n', 'res', 'a'])
+        class A(object):
+            pass
+        def f(n, x):
+            a = A()
+            a.x = x
+            res = 0
+            while n > 0:
+                myjitdriver.can_enter_jit(n=n, a=a, res=res)
+                myjitdriver.jit_merge_point(n=n, a=a, res=res)
+                res += a.x
+                a.x += 1
+                n -= 1
+            return res
+        res = self.meta_interp(f, [30, 3])
+        assert res == f(30, 3)
+        self.check_loops(getfield_gc=1, setfield_gc=1)
+
+    def test_bridge_jumps_to_peeled_loop(self):
+        myjitdriver = JitDriver(greens = [], reds = ['n', 'res', 'a'])
+        class A(object):
+            pass
+        def f(n, x):
+            a = A()
+            a.x = x
+            res = 0
+            while n > 0:
+                myjitdriver.can_enter_jit(n=n, a=a, res=res)
+                myjitdriver.jit_merge_point(n=n, a=a, res=res)
+                if n % 3 == 0:
+                    res += 2
+                else:
+                    res += a.x
+                n -= 1
+            return res
+        res = self.meta_interp(f, [100, 3])
+        assert res == f(100, 3)
+        # the bridge reads the invariant field to jump to the peeled loop
+        self.check_loops(getfield_gc=1)
+
+    def test_bridge_does_not_see_bounds_of_the_preamble(self):
+        import sys
+        from pypy.rlib.rarithmetic import ovfcheck
+        myjitdriver = JitDriver(greens = [], reds = ['n', 'res', 'a'])
+        def f(n, a):
+            res = 0
+            while n > 0:
+                myjitdriver.can_enter_jit(n=n, a=a, res=res)
+                myjitdriver.jit_merge_point(n=n, a=a, res=res)
+                try:
+                    res += ovfcheck(a + 1)
+                except OverflowError:
+                    res -= 1000
+                # this guard is on a value that changes at every iteration:
+                # it must not let the peeled loop assume that 'a < 15'
+                if a < (n & 15):
+                    res += 1
+                if n == 20:
+                    a = sys.maxint
+                n -= 1
+            return res
+        res = self.meta_interp(f, [100, -5])
+        assert res == f(100, -5)
+
+
+class TestLLtype(LoopUnrollTest, LLJitMixin):
+    pass
+
+class TestOOtype(LoopUnrollTest, OOJitMixin):
+    pass
@@ -0,0 +1,184 @@
+from pypy.jit.metainterp.memmgr import MemoryManager
+from pypy.jit.metainterp.test.test_basic import LLJitMixin
+from pypy.jit.metainterp import pyjitpl
+from pypy.rlib.jit import JitDriver
+
+
+class FakeLoopToken:
+    generation = 0
+    outermost_jitdriver_sd = None
+
+
+class TestMemoryManager:
+
+    def test_disabled(self):
+        memmgr = MemoryManager()
+        memmgr.set_max_age(0)
+        tokens = [FakeLoopToken() for i in range(10)]
+        for token in tokens:
+            memmgr.keep_loop_alive(token)
+            memmgr.next_generation()
+        assert memmgr.alive_loops == dict.fromkeys(tokens)
+
+    def test_basic(self):
+        memmgr = MemoryManager()
+        memmgr.set_max_age(3, 1)
+        tokens = [FakeLoopToken() for i in range(10)]
+        for token in tokens:
+            memmgr.keep_loop_alive(token)
+            memmgr.next_generation()
+        assert memmgr.alive_loops == dict.fromkeys(tokens[8:])
+
+    def test_basic_2(self):
+        memmgr = MemoryManager()
+        memmgr.set_max_age(3, 1)
+        token = FakeLoopToken()
+        memmgr.keep_loop_alive(token)
+        for i in range(10):
+            memmgr.next_generation()
+            if i < 2:
+                assert memmgr.alive_loops == {token: None}
+            else:
+                assert memmgr.alive_loops == {}
+
+    def test_basic_3(self):
+        memmgr = MemoryManager()
+        memmgr.set_max_age(3, 1)
+        tokens = [FakeLoopToken() for i in range(10)]
+        for i in range(len(tokens)):
+            memmgr.keep_loop_alive(tokens[i])
+            memmgr.next_generation()
+            for j in range(0, i, 2):
+                assert tokens[j] in memmgr.alive_loops
+                memmgr.keep_loop_alive(tokens[j])
+        for i in range(len(tokens)):
+            if i < 8 and (i%2) != 0:
+                assert tokens[i] not in memmgr.alive_loops
+            else:
+                assert tokens[i] in memmgr.alive_loops
+
+    def test_check_frequency(self):
+        memmgr = MemoryManager()
+        memmgr.set_max_age(4)     # checks every 2 generations
+        assert memmgr.check_frequency == 2
+        token = FakeLoopToken()
+        memmgr.keep_loop_alive(token)
+        for i in range(4):
+            memmgr.next_generation()
+        assert memmgr.alive_loops == {token: None}
+        memmgr.next_generation()
+        memmgr.next_generation()
+        assert memmgr.alive_loops == {}
+
+
+class _TestIntegration:
+    # End-to-end tests: the loops are freed by the llgraph backend too,
+    # so we can check the counters in cpu.jit_stats.
+
+    def get_jit_stats(self):
+        return pyjitpl._warmrunnerdesc.metainterp_sd.cpu.jit_stats
+
+    def test_loop_kept_alive(self):
+        myjitdriver = JitDriver(greens=[], reds=['n'])
+        def g():
+            n = 10
+            while n > 0:
+                myjitdriver.can_enter_jit(n=n)
+                myjitdriver.jit_merge_point(n=n)
+                n = n - 1
+            return 21
+        def f():
+            myjitdriver.set_param('loop_longevity', 2)
+            for i in range(15):
+                g()
+            return 42
+
+        res = self.meta_interp(f, [])
+        assert res == 42
+        # the single loop is entered at every call to g(), so it stays alive
+        stats = self.get_jit_stats()
+        assert stats.total_compiled_loops == 2   # the loop and entry bridge
+        assert stats.total_freed_loops == 0
+
+    def test_target_loop_kept_alive_or_not(self):
+        myjitdriver = JitDriver(greens=['m'], reds=['n'])
+        def g(m):
+            n = 10
+            while n > 0:
+                myjitdriver.can_enter_jit(n=n, m=m)
+                myjitdriver.jit_merge_point(n=n, m=m)
+                n = n - 1
+            return 21
+        def f(longevity):
+            myjitdriver.set_param('loop_longevity', longevity)
+            for i in range(10):
+                g(5)       # g(5) is entered between every new loop
+                g(i + 10)  # a new loop for every iteration
+            return 42
+
+        # with a short longevity, the loop for g(5) stays alive but
+        # most of the others are thrown away
+        res = self.meta_interp(f, [3])
+        assert res == 42
+        stats = self.get_jit_stats()
+        assert stats.total_compiled_loops == 12
+        assert stats.total_freed_loops == 7
+
+        # with a long longevity, nothing is thrown away
+        res = self.meta_interp(f, [1000])
+        assert res == 42
+        stats = self.get_jit_stats()
+        assert stats.total_compiled_loops == 12
+        assert stats.total_freed_loops == 0
+
+    def test_throw_away_old_loops(self):
+        myjitdriver = JitDriver(greens=['m'], reds=['n'])
+        def g(m):
+            n = 10
+            while n > 0:
+                myjitdriver.can_enter_jit(n=n, m=m)
+                myjitdriver.jit_merge_point(n=n, m=m)
+                n = n - 1
+            return 21
+        def f():
+            myjitdriver.set_param('loop_longevity', 3)
+            g(2)
+            for i in range(10):
+                g(i + 10)
+            g(2)       # the loop for g(2) was thrown away, compile it again
+            return 42
+
+        res = self.meta_interp(f, [])
+        assert res == 42
+        stats = self.get_jit_stats()
+        assert stats.total_compiled_loops == 12
+        assert stats.total_freed_loops == 9
+
+    def test_bridge_with_short_longevity(self):
+        myjitdriver = JitDriver(greens=[], reds=['n', 'res'])
+        def g():
+            n = 30
+            res = 0
+            while n > 0:
+                myjitdriver.can_enter_jit(n=n, res=res)
+                myjitdriver.jit_merge_point(n=n, res=res)
+                if n % 3 == 0:
+                    res += 2
+                else:
+                    res += 1
+                n = n - 1
+            return res
+        def f():
+            # starting to trace the bridge begins a new generation, which
+            # must not free the loop that the bridge is attached to
+            myjitdriver.set_param('loop_longevity', 1)
+            return g()
+
+        res = self.meta_interp(f, [])
+        assert res == f()
+        stats = self.get_jit_stats()
+        assert stats.total_compiled_bridges >= 1
+
+
+class TestLLtype(_TestIntegration, LLJitMixin):
+    pass
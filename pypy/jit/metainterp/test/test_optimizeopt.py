@@ -209,6 +209,10 @@ class Storage(compile.ResumeGuardDescr):
         self.original_greenkey = original_greenkey
     def store_final_boxes(self, op, boxes):
         op.fail_args = boxes
+    def _clone_if_mutable(self):
+        res = Storage(self.metainterp_sd, self.original_greenkey)
+        self.copy_all_attrbutes_into(res)
+        return res
     def __eq__(self, other):
         return type(self) is type(other)      # xxx obscure
 
@@ -2008,8 +2012,6 @@ class BaseTestOptimizeOpt(BaseTest):
         [p1, p2]
         i1 = ptr_eq(p1, p2)
         i3 = int_add(i1, 1)
-        i3b = int_is_true(i3)
-        guard_true(i3b) []
         escape(i3)
         escape(i3)
         guard_true(i1) []
@@ -2052,6 +2054,124 @@ class BaseTestOptimizeOpt(BaseTest):
         """
         self.optimize_loop(ops, 'Not, Not', expected)
 
+    def test_bound_lt_removes_add_ovf(self):
+        ops = """
+        [i0, i1]
+        i2 = int_lt(i0, i1)
+        guard_true(i2) []
+        i3 = int_add_ovf(i0, 1)
+        guard_no_overflow() []
+        jump(i3, i1)
+        """
+        expected = """
+        [i0, i1]
+        i2 = int_lt(i0, i1)
+        guard_true(i2) []
+        i3 = int_add(i0, 1)
+        jump(i3, i1)
+        """
+        self.optimize_loop(ops, 'Not, Not', expected)
+
+    def test_bound_add_ovf_kept_if_unknown(self):
+        ops = """
+        [i0]
+        i1 = int_add_ovf(i0, 1)
+        guard_no_overflow() []
+        jump(i1)
+        """
+        self.optimize_loop(ops, 'Not', ops)
+
+    def test_bound_redundant_comparisons(self):
+        ops = """
+        [i0]
+        i1 = int_lt(i0, 10)
+        guard_true(i1) []
+        i2 = int_ge(i0, 0)
+        guard_true(i2) []
+        i3 = int_lt(i0, 20)
+        guard_true(i3) []
+        i4 = int_lt(i0, -5)
+        guard_false(i4) []
+        i5 = int_sub_ovf(i0, 1)
+        guard_no_overflow() []
+        i6 = int_gt(i5, 8)
+        guard_false(i6) []
+        i7 = int_mul_ovf(i0, 3)
+        guard_no_overflow() []
+        jump(i7)
+        """
+        expected = """
+        [i0]
+        i1 = int_lt(i0, 10)
+        guard_true(i1) []
+        i2 = int_ge(i0, 0)
+        guard_true(i2) []
+        i5 = int_sub(i0, 1)
+        i7 = int_mul(i0, 3)
+        jump(i7)
+        """
+        self.optimize_loop(ops, 'Not', expected)
+
+    def test_bound_backward_through_add(self):
+        ops = """
+        [i0]
+        i1 = int_add_ovf(i0, 5)
+        guard_no_overflow() []
+        i2 = int_lt(i1, 10)
+        guard_true(i2) []
+        i3 = int_lt(i0, 5)
+        guard_true(i3) []
+        jump(i1)
+        """
+        expected = """
+        [i0]
+        i1 = int_add_ovf(i0, 5)
+        guard_no_overflow() []
+        i2 = int_lt(i1, 10)
+        guard_true(i2) []
+        jump(i1)
+        """
+        self.optimize_loop(ops, 'Not', expected)
+
+    def test_bound_arraylen_index_check(self):
+        ops = """
+        [p0, i0]
+        i1 = arraylen_gc(p0, descr=arraydescr)
+        i2 = int_lt(i0, i1)
+        guard_true(i2) []
+        i3 = int_lt(i0, 0)
+        guard_false(i3) []
+        i4 = int_ge(i1, 0)
+        guard_true(i4) []
+        i5 = int_add_ovf(i0, 1)
+        guard_no_overflow() []
+        i6 = int_is_true(i5)
+        guard_true(i6) []
+        jump(p0, i5)
+        """
+        expected = """
+        [p0, i0]
+        i1 = arraylen_gc(p0, descr=arraydescr)
+        i2 = int_lt(i0, i1)
+        guard_true(i2) []
+        i3 = int_lt(i0, 0)
+        guard_false(i3) []
+        i5 = int_add(i0, 1)
+        jump(p0, i5)
+        """
+        self.optimize_loop(ops, 'Not, Not', expected)
+
+    def test_bound_guard_overflow_is_invalid(self):
+        ops = """
+        [i0]
+        i1 = int_and(i0, 255)
+        i2 = int_add_ovf(i1, 1)
+        guard_overflow() []
+        jump(i2)
+        """
+        py.test.raises(InvalidLoop, self.optimize_loop,
+                       ops, 'Not', ops)
+
 
     # ----------
 
@@ -5,7 +5,7 @@ from pypy.rlib.objectmodel import we_are_translated
 from pypy.jit.metainterp.test.test_basic import LLJitMixin, OOJitMixin
 from pypy.jit.codewriter.policy import StopAtXPolicy
 from pypy.rpython.annlowlevel import hlstr
-from pypy.jit.metainterp.warmspot import CannotInlineCanEnterJit, get_stats
+from pypy.jit.metainterp.warmspot import get_stats
 
 class RecursiveTests:
 
@@ -164,20 +164,19 @@ class RecursiveTests:
                                 inline=True) == 42
         self.check_loops(call_may_force = 1, call = 0)
 
-    def test_inline_faulty_can_inline(self):
+    def test_inline_function_with_loop(self):
         code = "021"
         subcode = "301"
         codes = [code, subcode]
 
         f = self.get_interpreter(codes, always_inline=True)
 
-        try:
-            self.meta_interp(f, [0, 0, 0], optimizer=OPTIMIZER_SIMPLE,
-                             inline=True)
-        except CannotInlineCanEnterJit:
-            pass
-        else:
-            py.test.fail("DID NOT RAISE")
+        res = self.meta_interp(f, [0, 0, 0], optimizer=OPTIMIZER_SIMPLE,
+                               inline=True)
+        assert res == f(0, 0, 0)
+        # the loop in 'subcode' is not inlined; the tracer leaves the
+        # inlined frame at its loop header and calls the loop instead
+        self.check_loops(call_assembler = 1, call_may_force = 0, call = 0)
 
     def test_guard_failure_in_inlined_function(self):
         def p(pc, code):
@@ -622,6 +621,28 @@ class RecursiveTests:
         self.meta_interp(portal, [2], inline=True)
         self.check_history(call_assembler=1)
 
+    def test_inline_function_with_loop_call_assembler(self):
+        driver = JitDriver(greens = ['codeno'], reds = ['i', 'j'],
+                           get_printable_location = lambda codeno : str(codeno))
+
+        def portal(codeno, j):
+            i = 0
+            while i < 10:
+                driver.can_enter_jit(codeno=codeno, i=i, j=j)
+                driver.jit_merge_point(codeno=codeno, i=i, j=j)
+                if codeno == 2:
+                    j += portal(1, i)
+                else:
+                    j += 1
+                i += 1
+            return j
+
+        res = self.meta_interp(portal, [2, 0], inline=True)
+        assert res == portal(2, 0)
+        # portal(1) is inlined up to its loop header, and the loop itself
+        # is already compiled
+        self.check_history(call_assembler=1, call_may_force=0)
+
     def test_recursion_cant_call_assembler_directly(self):
         driver = JitDriver(greens = ['codeno'], reds = ['i', 'j'],
                            get_printable_location = lambda codeno : str(codeno),
@@ -272,6 +272,91 @@ class WarmspotTests(object):
         self.check_enter_count_at_most(2)
         self.check_loops(call=0)
 
+    def test_on_compile_hooks(self):
+        class Record:
+            pass
+        record = Record()
+        record.loops = 0
+        record.bridges = 0
+        record.greens = 0
+        def on_compile(number, m):
+            record.loops += 1
+            record.greens += m
+        def on_compile_bridge(number, m):
+            record.bridges += 1
+            record.greens += m
+        mydriver = JitDriver(greens=['m'], reds=['n'],
+                             on_compile=on_compile,
+                             on_compile_bridge=on_compile_bridge)
+        def f(m, n):
+            while n > 0:
+                mydriver.can_enter_jit(m=m, n=n)
+                mydriver.jit_merge_point(m=m, n=n)
+                if n % 5 == 0:
+                    n -= 2
+                n -= 1
+            return record.loops * 100 + record.bridges * 10 + record.greens
+        res = self.meta_interp(f, [1, 100])
+        # the loop and its entry bridge, and one bridge
+        assert res == 213
+
+    def test_on_abort_hook(self):
+        from pypy.jit.metainterp.jitprof import ABORT_TOO_LONG
+        class Record:
+            pass
+        record = Record()
+        record.reasons = 0
+        def on_abort(reason, m):
+            assert m == 5
+            record.reasons += reason
+        mydriver = JitDriver(greens=['m'], reds=['n'], on_abort=on_abort)
+        @unroll_safe
+        def loop2(n):
+            for i in range(30):
+                n += 1
+            return n
+        def f(m, n):
+            while n > 0:
+                mydriver.can_enter_jit(m=m, n=n)
+                mydriver.jit_merge_point(m=m, n=n)
+                n = loop2(n) - 31
+            return record.reasons
+        res = self.meta_interp(f, [5, 20], trace_limit=20)
+        assert res > 0
+        assert res % ABORT_TOO_LONG == 0
+
+    def test_loop_stats(self):
+        from pypy.jit.metainterp import pyjitpl
+        def get_printable_location(m):
+            return 'm=%d' % m
+        mydriver = JitDriver(greens=['m'], reds=['n'],
+                             get_printable_location=get_printable_location)
+        def f(m, n):
+            while n > 0:
+                mydriver.can_enter_jit(m=m, n=n)
+                mydriver.jit_merge_point(m=m, n=n)
+                if n % 5 == 0:
+                    n -= 2
+                n -= 1
+            return n
+        def main(m, n):
+            for i in range(10):
+                f(m, n)
+            return 42
+        res = self.meta_interp(main, [7, 100])
+        assert res == 42
+        jit_stats = pyjitpl._warmrunnerdesc.metainterp_sd.cpu.jit_stats
+        numbers = jit_stats.loops.keys()
+        numbers.sort()
+        # the loop and its entry bridge
+        loop, entry_bridge = [jit_stats.loops[n] for n in numbers]
+        assert loop.location == entry_bridge.location == 'm=7'
+        assert loop.trace_length > 0
+        assert loop.bridge_count == 2
+        assert len(loop.guard_failures) == 2
+        assert entry_bridge.bridge_count == 0
+        assert loop.entry_count + entry_bridge.entry_count == 12
+
 
 class TestLLWarmspot(WarmspotTests, LLJitMixin):
     CPUClass = runner.LLtypeCPU
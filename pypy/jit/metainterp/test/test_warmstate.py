@@ -80,6 +80,23 @@ def test_make_jitcell_getter():
     assert cell1 is cell2
     assert get_jitcell is state.make_jitcell_getter()
 
+def test_make_jitcell_getter_preheated():
+    def is_preheated(x):
+        return x > 1.0
+    IS_PREHEATED = lltype.Ptr(lltype.FuncType([lltype.Float], lltype.Bool))
+    class FakeWarmRunnerDesc:
+        rtyper = None
+    class FakeJitDriverSD:
+        _green_args_spec = [lltype.Float]
+        _get_jitcell_at_ptr = None
+        _is_preheated_ptr = llhelper(IS_PREHEATED, is_preheated)
+    state = WarmEnterState(FakeWarmRunnerDesc(), FakeJitDriverSD())
+    get_jitcell = state.make_jitcell_getter()
+    cell1 = get_jitcell(1.75)
+    assert cell1.counter == state.THRESHOLD_LIMIT
+    cell2 = get_jitcell(0.5)
+    assert cell2.counter == 0
+
 def test_make_jitcell_getter_custom():
     from pypy.rpython.typesystem import LowLevelTypeSystem
     class FakeRTyper:
@@ -150,12 +167,15 @@ def test_attach_unoptimized_bridge_from_interp():
         _get_jitcell_at_ptr = None
     state = WarmEnterState(None, FakeJitDriverSD())
     get_jitcell = state.make_jitcell_getter()
+    class FakeLoopToken(object):
+        pass
+    looptoken = FakeLoopToken()
     state.attach_unoptimized_bridge_from_interp([ConstInt(5),
                                                  ConstFloat(2.25)],
-                                                "entry loop token")
+                                                looptoken)
     cell1 = get_jitcell(5, 2.25)
     assert cell1.counter < 0
-    assert cell1.entry_loop_token == "entry loop token"
+    assert cell1.get_entry_loop_token() is looptoken
 
 def test_make_jitdriver_callbacks_1():
     class FakeJitDriverSD:
@@ -63,8 +63,23 @@ class TranslationTest:
                 frame.i -= 1
             return total * 10
         #
+        class HookRecord:
+            events = 0
+        hookrecord = HookRecord()
+        def on_compile(number, g):
+            hookrecord.events += g
+        def on_compile_bridge(number, g):
+            hookrecord.events += number
+        def on_abort(reason, g):
+            hookrecord.events -= reason
+        def on_invalidate(number, g):
+            hookrecord.events -= number
         myjitdriver2 = JitDriver(greens = ['g'], reds = ['m', 'x'],
-                                 can_inline = lambda *args: False)
+                                 can_inline = lambda *args: False,
+                                 on_compile = on_compile,
+                                 on_compile_bridge = on_compile_bridge,
+                                 on_abort = on_abort,
+                                 on_invalidate = on_invalidate)
         def f2(g, m, x):
             while m > 0:
                 myjitdriver2.can_enter_jit(g=g, m=m, x=x)
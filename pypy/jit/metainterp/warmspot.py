@@ -25,6 +25,7 @@ from pypy.jit.metainterp.jitdriver import JitDriverStaticData
 from pypy.jit.codewriter import support, codewriter
 from pypy.jit.codewriter.policy import JitPolicy
 from pypy.rlib.jit import DEBUG_STEPS, DEBUG_DETAILED, DEBUG_OFF, DEBUG_PROFILE
+from pypy.rlib.jit import jit_stats
 
 # ____________________________________________________________
 # Bootstrapping
@@ -136,9 +137,6 @@ def debug_checks():
 class ContinueRunningNormallyBase(JitException):
     pass
 
-class CannotInlineCanEnterJit(JitException):
-    pass
-
 # ____________________________________________________________
 
 class WarmRunnerDesc(object):
@@ -271,6 +269,9 @@ class WarmRunnerDesc(object):
             annhelper = None
         cpu = CPUClass(self.translator.rtyper, self.stats, self.opt,
                        translate_support_code, gcdescr=self.gcdescr)
+        if translate_support_code:
+            # the counters that the interpreter can read
+            cpu.jit_stats = jit_stats
         self.cpu = cpu
 
     def build_meta_interp(self, ProfilerClass):
@@ -415,6 +416,7 @@ class WarmRunnerDesc(object):
                                                       can_be_None=True)
         s_BaseJitCell_not_None = annmodel.SomeInstance(classdef)
         s_Str = annmodel.SomeString()
+        s_Int = annmodel.SomeInteger()
         #
         annhelper = MixLevelHelperAnnotator(self.translator.rtyper)
         for jd in self.jitdrivers_sd:
@@ -430,6 +432,18 @@ class WarmRunnerDesc(object):
             jd._confirm_enter_jit_ptr = self._make_hook_graph(jd,
                 annhelper, jd.jitdriver.confirm_enter_jit, annmodel.s_Bool,
                 onlygreens=False)
+            jd._is_preheated_ptr = self._make_hook_graph(jd,
+                annhelper, jd.jitdriver.is_preheated, annmodel.s_Bool)
+            jd._on_compile_ptr = self._make_hook_graph(jd,
+                annhelper, jd.jitdriver.on_compile, annmodel.s_None, s_Int)
+            jd._on_compile_bridge_ptr = self._make_hook_graph(jd,
+                annhelper, jd.jitdriver.on_compile_bridge, annmodel.s_None,
+                s_Int)
+            jd._on_abort_ptr = self._make_hook_graph(jd,
+                annhelper, jd.jitdriver.on_abort, annmodel.s_None, s_Int)
+            jd._on_invalidate_ptr = self._make_hook_graph(jd,
+                annhelper, jd.jitdriver.on_invalidate, annmodel.s_None,
+                s_Int)
         annhelper.finish()
 
     def _make_hook_graph(self, jitdriver_sd, annhelper, func,
@@ -1,4 +1,4 @@
-import sys
+import sys, weakref
 from pypy.rpython.lltypesystem import lltype, llmemory, rstr
 from pypy.rpython.ootypesystem import ootype
 from pypy.rpython.annlowlevel import hlstr, llstr, cast_base_ptr_to_instance
@@ -8,6 +8,7 @@ from pypy.rlib.rarithmetic import intmask
 from pypy.rlib.nonconst import NonConstant
 from pypy.rlib.unroll import unrolling_iterable
 from pypy.rlib.jit import PARAMETERS, OPTIMIZER_SIMPLE, OPTIMIZER_FULL
+from pypy.rlib.jit import OPTIMIZER_UNROLL
 from pypy.rlib.jit import DEBUG_PROFILE
 from pypy.rlib.jit import BaseJitCell
 from pypy.rlib.debug import debug_start, debug_stop, debug_print
@@ -126,9 +127,18 @@ class JitCell(BaseJitCell):
     #     counter == -1: there is an entry bridge for this cell
     #     counter == -2: tracing is currently going on for this cell
     counter = 0
-    compiled_merge_points = None
+    compiled_merge_points_wref = None    # list of weakrefs to LoopToken
     dont_trace_here = False
-    entry_loop_token = None
+    wref_entry_loop_token = None         # (possibly) one weakref to the
+                                         # entry point, see memmgr.py
+
+    def get_entry_loop_token(self):
+        if self.wref_entry_loop_token is not None:
+            return self.wref_entry_loop_token()
+        return None
+
+    def set_entry_loop_token(self, looptoken):
+        self.wref_entry_loop_token = weakref.ref(looptoken)
 
 # ____________________________________________________________
 
@@ -145,6 +155,10 @@ class WarmEnterState(object):
             self.profiler = warmrunnerdesc.metainterp_sd.profiler
         except AttributeError:       # for tests
             self.profiler = None
+        try:
+            self.memory_manager = warmrunnerdesc.metainterp_sd.memory_manager
+        except AttributeError:       # for tests
+            self.memory_manager = None
         # initialize the state with the default values of the
         # parameters specified in rlib/jit.py
         for name, default_value in PARAMETERS.items():
@@ -166,6 +180,11 @@ class WarmEnterState(object):
     def set_param_inlining(self, value):
         self.inlining = value
 
+    def set_param_loop_longevity(self, value):
+        # note: the memory manager is shared by all the jitdrivers
+        if self.memory_manager is not None:
+            self.memory_manager.set_max_age(value)
+
     def set_param_optimizer(self, optimizer):
         if optimizer == OPTIMIZER_SIMPLE:
             from pypy.jit.metainterp import simple_optimize
@@ -175,6 +194,10 @@ class WarmEnterState(object):
             from pypy.jit.metainterp import optimize
             self.optimize_loop = optimize.optimize_loop
             self.optimize_bridge = optimize.optimize_bridge
+        elif optimizer == OPTIMIZER_UNROLL:
+            from pypy.jit.metainterp import optimize
+            self.optimize_loop = optimize.optimize_loop_unroll
+            self.optimize_bridge = optimize.optimize_bridge
         else:
             raise ValueError("unknown optimizer")
 
@@ -195,7 +218,7 @@ class WarmEnterState(object):
                                               entry_loop_token):
         cell = self.jit_cell_at_key(greenkey)
         cell.counter = -1
-        cell.entry_loop_token = entry_loop_token
+        cell.set_entry_loop_token(entry_loop_token)
 
     # ----------
 
@@ -212,7 +235,9 @@ class WarmEnterState(object):
         get_jitcell = self.make_jitcell_getter()
         set_future_values = self.make_set_future_values()
         self.make_jitdriver_callbacks()
+        self.make_jitdriver_hooks()
         confirm_enter_jit = self.confirm_enter_jit
+        memmgr = metainterp_sd.memory_manager
 
         def maybe_compile_and_run(*args):
             """Entry point to the JIT.  Called at the point with the
@@ -263,17 +288,26 @@ class WarmEnterState(object):
                 if not confirm_enter_jit(*args):
                     return
                 # machine code was already compiled for these greenargs
+                loop_token = cell.get_entry_loop_token()
+                if loop_token is None:
+                    # the loop was freed by the memory manager; count again
+                    cell.counter = 0
+                    return
                 # get the assembler and fill in the boxes
                 set_future_values(*args[num_green_args:])
-                loop_token = cell.entry_loop_token
 
             # ---------- execute assembler ----------
             while True:     # until interrupted by an exception
+                loop_token.compiled_loop_token.stats.entry_count += 1
                 metainterp_sd.profiler.start_running()
                 debug_start("jit-running")
                 fail_descr = metainterp_sd.cpu.execute_token(loop_token)
                 debug_stop("jit-running")
                 metainterp_sd.profiler.end_running()
+                # only record the loop as used now: tracing can start new
+                # generations while it runs, e.g. from a recursive portal
+                # call, and 'loop_token' keeps it from being freed meanwhile
+                memmgr.keep_loop_alive(loop_token)
                 if vinfo is not None:
                     vinfo.reset_vable_token(virtualizable)
                 loop_token = fail_descr.handle_fail(metainterp_sd,
@@ -330,6 +364,26 @@ class WarmEnterState(object):
         #
         return jit_getter
 
+    def _make_preheat_cell(self):
+        "NOT_RPYTHON"
+        try:
+            is_preheated_ptr = self.jitdriver_sd._is_preheated_ptr
+        except AttributeError:       # for tests
+            is_preheated_ptr = None
+        if is_preheated_ptr is None:
+            def preheat_cell(cell, *greenargs):
+                pass
+        else:
+            rtyper = self.warmrunnerdesc.rtyper
+            #
+            def preheat_cell(cell, *greenargs):
+                fn = support.maybe_on_top_of_llinterp(rtyper, is_preheated_ptr)
+                if fn(*greenargs):
+                    # the next increment reaches the bound: start tracing
+                    # the next time we see these greenargs
+                    cell.counter = self.THRESHOLD_LIMIT
+        return preheat_cell
+
     def _make_jitcell_getter_default(self):
         "NOT_RPYTHON"
         jitdriver_sd = self.jitdriver_sd
@@ -355,11 +409,44 @@ class WarmEnterState(object):
         #
         jitcell_dict = r_dict(comparekey, hashkey)
         #
+        def _cleanup_dict():
+            # decay all the counters, and kill the cells whose counter is
+            # too low or whose loop was freed by the memory manager
+            minimum = self.THRESHOLD_LIMIT // 20     # minimum 5%
+            killme = []
+            for key, cell in jitcell_dict.iteritems():
+                if cell.dont_trace_here:
+                    continue
+                if cell.counter >= 0:
+                    cell.counter = int(cell.counter * 0.92)
+                    if (cell.counter < minimum and
+                            cell.compiled_merge_points_wref is None):
+                        killme.append(key)
+                elif (cell.counter == -1
+                      and cell.get_entry_loop_token() is None):
+                    killme.append(key)
+            for key in killme:
+                del jitcell_dict[key]
+        #
+        def _maybe_cleanup_dict():
+            # once in a while, when many new cells have been put in
+            # the jitcell_dict, we do a cleanup phase
+            self._trigger_automatic_cleanup += 1
+            if self._trigger_automatic_cleanup > 20000:
+                self._trigger_automatic_cleanup = 0
+                _cleanup_dict()
+        #
+        self._trigger_automatic_cleanup = 0
+        self._jitcell_dict = jitcell_dict       # for tests
+        preheat_cell = self._make_preheat_cell()
+        #
         def get_jitcell(*greenargs):
             try:
                 cell = jitcell_dict[greenargs]
             except KeyError:
+                _maybe_cleanup_dict()
                 cell = JitCell()
+                preheat_cell(cell, *greenargs)
                 jitcell_dict[greenargs] = cell
             return cell
         return get_jitcell
@@ -369,6 +456,7 @@ class WarmEnterState(object):
         rtyper = self.warmrunnerdesc.rtyper
         get_jitcell_at_ptr = self.jitdriver_sd._get_jitcell_at_ptr
         set_jitcell_at_ptr = self.jitdriver_sd._set_jitcell_at_ptr
+        preheat_cell = self._make_preheat_cell()
         lltohlhack = {}
         #
         def get_jitcell(*greenargs):
@@ -407,6 +495,7 @@ class WarmEnterState(object):
                 fn = support.maybe_on_top_of_llinterp(rtyper,
                                                       set_jitcell_at_ptr)
                 fn(cellref, *greenargs)
+                preheat_cell(cell, *greenargs)
             return cell
         return get_jitcell
 
@@ -497,7 +586,10 @@ class WarmEnterState(object):
             cell = jit_getter(*greenargs)
             if cell.counter >= 0:
                 return None
-            return cell.entry_loop_token
+            loop_token = cell.get_entry_loop_token()
+            if loop_token is None and cell.counter == -1:
+                cell.counter = 0    # the loop was freed; count again
+            return loop_token
         self.get_assembler_token = get_assembler_token
         
         #
@@ -535,3 +627,30 @@ class WarmEnterState(object):
                                                       confirm_enter_jit_ptr)
                 return fn(*args)
         self.confirm_enter_jit = confirm_enter_jit
+
+    def make_jitdriver_hooks(self):
+        if hasattr(self, 'on_compile'):
+            return
+        #
+        unwrap_greenkey = self.make_unwrap_greenkey()
+        #
+        def make_hook(hook_ptr):
+            # returns a function hook(arg, greenkey) that calls the
+            # jitdriver's hook with 'arg' followed by the green args
+            if hook_ptr is None:
+                def hook(arg, greenkey):
+                    pass
+            else:
+                rtyper = self.warmrunnerdesc.rtyper
+                #
+                def hook(arg, greenkey):
+                    greenargs = unwrap_greenkey(greenkey)
+                    fn = support.maybe_on_top_of_llinterp(rtyper, hook_ptr)
+                    fn(arg, *greenargs)
+            return hook
+        #
+        jd = self.jitdriver_sd
+        self.on_compile = make_hook(jd._on_compile_ptr)
+        self.on_compile_bridge = make_hook(jd._on_compile_bridge_ptr)
+        self.on_abort = make_hook(jd._on_abort_ptr)
+        self.on_invalidate = make_hook(jd._on_invalidate_ptr)
@@ -0,0 +1,29 @@
+from pypy.interpreter.mixedmodule import MixedModule
+
+class Module(MixedModule):
+    """High performance data structures.
+- deque:        ordered collection accessible from endpoints only
+- defaultdict:  dict subclass with a default value factory
+"""
+
+    appleveldefs = {
+        'defaultdict': 'app_defaultdict.defaultdict',
+    }
+
+    interpleveldefs = {
+        'deque':       'interp_deque.W_Deque',
+    }
+
+    def setup_after_space_initialization(self):
+        """NOT_RPYTHON"""
+        # defaultdict.__missing__() is written at interp-level.  It is
+        # installed as a plain method of the app-level class, instead of
+        # being exposed in the module too: the annotator does not like
+        # to see the same builtin code in two different functions.
+        from pypy.interpreter.gateway import interp2app
+        from pypy.module._collections.interp_defaultdict import missing
+        space = self.space
+        w_defaultdict = space.getattr(space.wrap(self),
+                                      space.wrap('defaultdict'))
+        space.setattr(w_defaultdict, space.wrap('__missing__'),
+                      space.wrap(interp2app(missing)))
@@ -0,0 +1,54 @@
+# NOT_RPYTHON
+
+# The class itself lives at app-level because interp-level types cannot
+# be subclasses of 'dict'.  The only method that matters for speed,
+# __missing__(), is written at interp-level (see interp_defaultdict.py)
+# and installed on the class by the module's
+# setup_after_space_initialization().
+
+
+class defaultdict(dict):
+    __module__ = 'collections'
+
+    def __init__(self, *args, **kwds):
+        if len(args) > 0:
+            default_factory = args[0]
+            args = args[1:]
+            if not callable(default_factory) and default_factory is not None:
+                raise TypeError("first argument must be callable")
+        else:
+            default_factory = None
+        self.default_factory = default_factory
+        super(defaultdict, self).__init__(*args, **kwds)
+
+    def __repr__(self, recurse=set()):
+        # XXX not thread-safe, but good enough
+        if id(self) in recurse:
+            return "defaultdict(...)"
+        try:
+            recurse.add(id(self))
+            return "defaultdict(%s, %s)" % (repr(self.default_factory),
+                                            super(defaultdict, self).__repr__())
+        finally:
+            recurse.remove(id(self))
+
+    def copy(self):
+        return type(self)(self.default_factory, self)
+
+    def __copy__(self):
+        return self.copy()
+
+    def __reduce__(self):
+        """
+        __reduce__ must return a 5-tuple as follows:
+
+           - factory function
+           - tuple of args for the factory function
+           - additional state (here None)
+           - sequence iterator (here None)
+           - dictionary iterator (yielding successive (key, value) pairs
+
+           This API is used by pickle.py and copy.py.
+        """
+        return (type(self), (self.default_factory,), None, None,
+                self.iteritems())
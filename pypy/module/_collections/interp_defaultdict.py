@@ -0,0 +1,15 @@
+from pypy.interpreter.error import OperationError
+from pypy.interpreter.gateway import ObjSpace, W_Root
+
+
+def missing(space, w_self, w_key):
+    # An interp-level version of defaultdict.__missing__: the dict
+    # lookup that fails calls it directly, so a miss costs the call
+    # to the factory and a setitem, and no app-level frame.
+    w_default_factory = space.getattr(w_self, space.wrap('default_factory'))
+    if space.is_w(w_default_factory, space.w_None):
+        raise OperationError(space.w_KeyError, space.newtuple([w_key]))
+    w_value = space.call_function(w_default_factory)
+    space.setitem(w_self, w_key, w_value)
+    return w_value
+missing.unwrap_spec = [ObjSpace, W_Root, W_Root]
@@ -0,0 +1,86 @@
+from pypy.conftest import gettestobjspace
+
+
+class AppTestBasic:
+    def setup_class(cls):
+        cls.space = gettestobjspace(usemodules=['_collections'])
+
+    def test_basics(self):
+        from _collections import defaultdict
+        d = defaultdict(list)
+        l = d[5]
+        d[5].append(42)
+        d[5].append(43)
+        assert l == [42, 43]
+        l2 = []
+        d[5] = l2
+        d[5].append(44)
+        assert l == [42, 43] and l2 == [44]
+        assert d.default_factory is list
+        assert 5 in d and 6 not in d
+
+    def test_keyerror_without_factory(self):
+        from _collections import defaultdict
+        for d1 in [defaultdict(), defaultdict(None)]:
+            for key in ['foo', (1,)]:
+                try:
+                    d1[key]
+                except KeyError, err:
+                    assert err.args[0] == key
+                else:
+                    assert 0, "expected KeyError"
+        raises(TypeError, defaultdict, 1)
+
+    def test_get_and_contains_do_not_call_the_factory(self):
+        from _collections import defaultdict
+        calls = []
+        def factory():
+            calls.append(1)
+            return 5
+        d = defaultdict(factory, {'a': 1})
+        assert d.get('b') is None
+        assert 'b' not in d
+        assert calls == []
+        assert d['b'] == 5
+        assert calls == [1]
+        assert d == {'a': 1, 'b': 5}
+
+    def test_copy(self):
+        import copy
+        from _collections import defaultdict
+        def f():
+            return 42
+        d = defaultdict(f, {2: 3})
+        for d1 in [d.copy(), copy.copy(d), copy.deepcopy(d)]:
+            assert type(d1) is defaultdict
+            assert d1 == {2: 3}
+            assert d1.default_factory is f
+            assert d1[4] == 42
+            assert 4 not in d
+
+    def test_repr(self):
+        from _collections import defaultdict
+        d = defaultdict(None, {3: 4})
+        assert repr(d) == 'defaultdict(None, {3: 4})'
+        d = defaultdict(list)
+        d[1] = d
+        assert 'defaultdict(...)' in repr(d)
+
+    def test_subclass(self):
+        from _collections import defaultdict
+        class D(defaultdict):
+            pass
+        d = D(lambda: 'x', a=1)
+        assert d['a'] == 1
+        assert d['b'] == 'x'
+        assert dict(d) == {'a': 1, 'b': 'x'}
+
+    def test_pickle(self):
+        import pickle
+        from _collections import defaultdict
+        d = defaultdict(list, {'a': [1]})
+        for proto in range(3):
+            d1 = pickle.loads(pickle.dumps(d, proto))
+            assert type(d1) is defaultdict
+            assert d1 == d
+            assert d1.default_factory is list
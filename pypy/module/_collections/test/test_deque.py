@@ -0,0 +1,253 @@
+from pypy.conftest import gettestobjspace
+
+
+class AppTestBasic:
+    def setup_class(cls):
+        cls.space = gettestobjspace(usemodules=['_collections'])
+
+    def test_basics(self):
+        from _collections import deque
+        assert deque.__module__ == 'collections'
+
+        d = deque(xrange(-5125, -5000))
+        d.__init__(xrange(200))
+        for i in xrange(200, 400):
+            d.append(i)
+        for i in reversed(xrange(-200, 0)):
+            d.appendleft(i)
+        assert list(d) == range(-200, 400)
+        assert len(d) == 600
+
+        left = [d.popleft() for i in xrange(250)]
+        assert left == range(-200, 50)
+        assert list(d) == range(50, 400)
+
+        right = [d.pop() for i in xrange(250)]
+        right.reverse()
+        assert right == range(150, 400)
+        assert list(d) == range(50, 150)
+
+    def test_empty(self):
+        from _collections import deque
+        d = deque()
+        raises(IndexError, d.pop)
+        raises(IndexError, d.popleft)
+        # the block is re-centered once the deque is empty again
+        for i in range(200):
+            d.append(i)
+            assert d.popleft() == i
+        for i in range(200):
+            d.appendleft(i)
+            assert d.pop() == i
+        assert len(d) == 0
+        assert list(d) == []
+
+    def test_maxlen(self):
+        from _collections import deque
+        raises(ValueError, deque, 'abc', -1)
+        raises(ValueError, deque, 'abc', -2)
+        it = iter(range(10))
+        d = deque(it, maxlen=3)
+        assert list(it) == []
+        assert repr(d) == 'deque([7, 8, 9], maxlen=3)'
+        assert list(d) == range(7, 10)
+        d.appendleft(3)
+        assert list(d) == [3, 7, 8]
+        d.extend([20, 21])
+        assert list(d) == [8, 20, 21]
+        d.extendleft([-7, -6])
+        assert list(d) == [-6, -7, 8]
+        assert d.maxlen == 3
+        assert deque().maxlen is None
+        d = deque(range(200), maxlen=0)
+        assert list(d) == []
+        d.append(5)
+        assert list(d) == []
+
+    def test_comparisons(self):
+        from _collections import deque
+        d = deque('xabc')
+        d.popleft()
+        for e in [d, deque('abc'), deque('ab'), deque(), list(d)]:
+            assert (d == e) == (type(d) == type(e) and list(d) == list(e))
+            assert (d != e) == (not (type(d) == type(e) and list(d) == list(e)))
+
+        args = map(deque, ('', 'a', 'b', 'ab', 'ba', 'abc', 'xba', 'xabc', 'cba'))
+        for x in args:
+            for y in args:
+                assert (x == y) == (list(x) == list(y))
+                assert (x != y) == (list(x) != list(y))
+                assert (x <  y) == (list(x) <  list(y))
+                assert (x <= y) == (list(x) <= list(y))
+                assert (x >  y) == (list(x) >  list(y))
+                assert (x >= y) == (list(x) >= list(y))
+        raises(TypeError, hash, deque())
+
+    def test_extend(self):
+        from _collections import deque
+        d = deque('a')
+        d.extend('bcd')
+        assert list(d) == list('abcd')
+        d.extend(d)
+        assert list(d) == list('abcdabcd')
+        d += 'xy'
+        assert list(d) == list('abcdabcdxy')
+        raises(TypeError, d.extend, 1)
+
+    def test_extendleft(self):
+        from _collections import deque
+        d = deque('a')
+        d.extendleft('bcd')
+        assert list(d) == list(reversed('abcd'))
+        d.extendleft(d)
+        assert list(d) == list('abcddcba')
+        d = deque()
+        d.extendleft(range(1000))
+        assert list(d) == list(reversed(range(1000)))
+        raises(TypeError, d.extendleft, 1)
+
+    def test_getitem(self):
+        from _collections import deque
+        n = 200
+        l = xrange(1000, 1000 + n)
+        d = deque(l)
+        for j in xrange(-n, n):
+            assert d[j] == l[j]
+        raises(IndexError, "d[n]")
+        raises(IndexError, "d[-n-1]")
+        raises(TypeError, "d['a']")
+
+    def test_setitem_delitem(self):
+        from _collections import deque
+        n = 200
+        d = deque(xrange(n))
+        for i in xrange(n):
+            d[i] = 10 * i
+        assert list(d) == [10*i for i in xrange(n)]
+        l = list(d)
+        for i in xrange(1-n, 0, -3):
+            d[i] = 7 * i
+            l[i] = 7 * i
+        assert list(d) == l
+        raises(IndexError, "d[n] = 1")
+        for i in xrange(n // 2):
+            del d[i]
+            del l[i]
+        del d[-1]
+        del l[-1]
+        assert list(d) == l
+        raises(IndexError, "del d[len(d)]")
+
+    def test_rotate(self):
+        from _collections import deque
+        s = tuple('abcde')
+        n = len(s)
+        d = deque(s)
+        d.rotate(1)             # verify rot(1)
+        assert ''.join(d) == 'eabcd'
+        d = deque(s)
+        d.rotate(-1)            # verify rot(-1)
+        assert ''.join(d) == 'bcdea'
+        d.rotate()              # check default to 1
+        assert tuple(d) == s
+        d.rotate(500000002)
+        assert tuple(d) == tuple('deabc')
+        d.rotate(-5000002)
+        assert tuple(d) == tuple(s)
+        deque().rotate(5)
+
+    def test_remove(self):
+        from _collections import deque
+        d = deque('abcdefghcij')
+        d.remove('c')
+        assert d == deque('abdefghcij')
+        d.remove('c')
+        assert d == deque('abdefghij')
+        raises(ValueError, d.remove, 'c')
+        assert d == deque('abdefghij')
+
+    def test_remove_mutating(self):
+        from _collections import deque
+        class MutatingCmp(object):
+            def __eq__(self, other):
+                d.clear()
+                return True
+        d = deque([MutatingCmp()])
+        raises(IndexError, d.remove, 1)
+
+    def test_repr(self):
+        from _collections import deque
+        d = deque(xrange(200))
+        e = eval(repr(d), {'deque': deque})
+        assert list(d) == list(e)
+        d.append(d)
+        assert '...' in repr(d)
+
+    def test_clear(self):
+        from _collections import deque
+        d = deque(xrange(100))
+        assert len(d) == 100
+        d.clear()
+        assert len(d) == 0
+        assert list(d) == []
+        d.clear()               # clear an empty deque
+        assert list(d) == []
+
+    def test_iterators(self):
+        from _collections import deque
+        d = deque(range(150))
+        assert list(reversed(d)) == range(149, -1, -1)
+        it = iter(d)
+        assert len(it) == 150
+        it.next()
+        assert len(it) == 149
+        d.append(150)
+        raises(RuntimeError, it.next)
+        it = reversed(d)
+        d.popleft()
+        raises(RuntimeError, it.next)
+        it = iter(d)
+        d[3] = 'x'              # setitem does not change the length
+        assert list(it)[3] == 'x'
+
+    def test_copy_pickle(self):
+        from _collections import deque
+        import copy, pickle
+        d = deque(xrange(200), maxlen=100)
+        for e in [copy.copy(d), pickle.loads(pickle.dumps(d))]:
+            assert type(e) is deque
+            assert e == d and e is not d
+            assert e.maxlen == 100
+        d = deque('abc')
+        d.append(d)
+        e = pickle.loads(pickle.dumps(d))
+        assert e[-1] is e
+        assert list(e)[:3] == list('abc')
+
+    def test_subclass(self):
+        from _collections import deque
+        class Deque(deque):
+            pass
+        d = Deque('abc', 5)
+        d.x = 42
+        e = d.__copy__()
+        assert type(e) is Deque
+        assert list(e) == list('abc')
+        assert e.maxlen == 5
+        cls, args, state, items = d.__reduce__()
+        assert cls is Deque
+        assert args == ([], 5)
+        assert state == {'x': 42}
+        assert list(items) == list('abc')
+
+        class SubclassWithKwargs(deque):
+            def __init__(self, newarg=1):
+                deque.__init__(self)
+        SubclassWithKwargs(newarg=1)
+
+    def test_weakref(self):
+        from _collections import deque
+        import weakref
+        d = deque('gallahad')
+        p = weakref.proxy(d)
+        assert str(p) == str(d)
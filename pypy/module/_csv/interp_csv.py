@@ -0,0 +1,288 @@
+from pypy.interpreter.baseobjspace import Wrappable
+from pypy.interpreter.error import OperationError
+from pypy.interpreter.typedef import TypeDef, GetSetProperty
+from pypy.interpreter.gateway import interp2app, ObjSpace, W_Root
+from pypy.interpreter.gateway import NoneNotWrapped
+
+
+QUOTE_MINIMAL, QUOTE_ALL, QUOTE_NONNUMERIC, QUOTE_NONE = range(4)
+
+
+class CsvState(object):
+    """The dialect registry and the field size limit of a space."""
+    def __init__(self, space):
+        self.w_dialects = space.newdict()
+        self.field_limit = 128 * 1024      # max parsed field size
+
+def csv_error(space, msg):
+    w_module = space.getbuiltinmodule('_csv')
+    w_error = space.getattr(w_module, space.wrap('Error'))
+    return OperationError(w_error, space.wrap(msg))
+
+
+class W_Dialect(Wrappable):
+    # the characters that are not set are stored as '\0', which can
+    # never appear in the input (see interp_reader.py)
+
+    def __init__(self):
+        self.delimiter = ','
+        self.doublequote = True
+        self.escapechar = '\0'
+        self.lineterminator = '\r\n'
+        self.quotechar = '"'
+        self.quoting = QUOTE_MINIMAL
+        self.skipinitialspace = False
+        self.strict = False
+
+    def copy_from(self, other):
+        self.delimiter = other.delimiter
+        self.doublequote = other.doublequote
+        self.escapechar = other.escapechar
+        self.lineterminator = other.lineterminator
+        self.quotechar = other.quotechar
+        self.quoting = other.quoting
+        self.skipinitialspace = other.skipinitialspace
+        self.strict = other.strict
+
+
+def _get_bool(space, w_src, default):
+    if w_src is None:
+        return default
+    return space.is_true(w_src)
+
+def _get_int(space, w_src, default, attrname):
+    if w_src is None:
+        return default
+    if not space.is_true(space.isinstance(w_src, space.w_int)):
+        raise OperationError(space.w_TypeError, space.wrap(
+            '"%s" must be an integer' % (attrname,)))
+    return space.int_w(w_src)
+
+def _get_str(space, w_src, default, attrname):
+    if w_src is None:
+        return default
+    if space.is_w(w_src, space.w_None):
+        return ''
+    if not space.is_true(space.isinstance(w_src, space.w_str)):
+        raise OperationError(space.w_TypeError, space.wrap(
+            '"%s" must be a string' % (attrname,)))
+    return space.str_w(w_src)
+
+def _get_char(space, w_src, default, attrname):
+    if w_src is None:
+        return default
+    if space.is_w(w_src, space.w_None):
+        return '\0'
+    if space.is_true(space.isinstance(w_src, space.w_str)):
+        src = space.str_w(w_src)
+        if len(src) == 1:
+            return src[0]
+        if len(src) == 0:
+            return '\0'
+    raise OperationError(space.w_TypeError, space.wrap(
+        '"%s" must be an 1-character string' % (attrname,)))
+
+def _get_attr(space, w_dialect, w_value, attrname):
+    # an explicit keyword argument wins over the attribute of the dialect
+    if w_value is not None:
+        return w_value
+    return space.findattr(w_dialect, space.wrap(attrname))
+
+def _build_dialect(space, w_dialect, w_delimiter, w_doublequote,
+                   w_escapechar, w_lineterminator, w_quotechar, w_quoting,
+                   w_skipinitialspace, w_strict):
+    if w_dialect is not None:
+        if space.is_true(space.isinstance(w_dialect, space.w_basestring)):
+            w_dialect = get_dialect(space, w_dialect)
+
+        # Can we reuse this instance?
+        dialect = space.interpclass_w(w_dialect)
+        if (isinstance(dialect, W_Dialect) and
+            w_delimiter is None and
+            w_doublequote is None and
+            w_escapechar is None and
+            w_lineterminator is None and
+            w_quotechar is None and
+            w_quoting is None and
+            w_skipinitialspace is None and
+            w_strict is None):
+            return dialect
+
+        w_delimiter = _get_attr(space, w_dialect, w_delimiter,
+                                "delimiter")
+        w_doublequote = _get_attr(space, w_dialect, w_doublequote,
+                                  "doublequote")
+        w_escapechar = _get_attr(space, w_dialect, w_escapechar,
+                                 "escapechar")
+        w_lineterminator = _get_attr(space, w_dialect, w_lineterminator,
+                                     "lineterminator")
+        w_quotechar = _get_attr(space, w_dialect, w_quotechar,
+                                "quotechar")
+        w_quoting = _get_attr(space, w_dialect, w_quoting, "quoting")
+        w_skipinitialspace = _get_attr(space, w_dialect, w_skipinitialspace,
+                                       "skipinitialspace")
+        w_strict = _get_attr(space, w_dialect, w_strict, "strict")
+
+    dialect = W_Dialect()
+    dialect.delimiter = _get_char(space, w_delimiter, ',', 'delimiter')
+    dialect.doublequote = _get_bool(space, w_doublequote, True)
+    dialect.escapechar = _get_char(space, w_escapechar, '\0', 'escapechar')
+    dialect.lineterminator = _get_str(space, w_lineterminator, '\r\n',
+                                      'lineterminator')
+    dialect.quotechar = _get_char(space, w_quotechar, '"', 'quotechar')
+    tmp_quoting = _get_int(space, w_quoting, QUOTE_MINIMAL, 'quoting')
+    dialect.skipinitialspace = _get_bool(space, w_skipinitialspace, False)
+    dialect.strict = _get_bool(space, w_strict, False)
+
+    # validate options
+    if not (0 <= tmp_quoting < 4):
+        raise OperationError(space.w_TypeError,
+                             space.wrap('bad "quoting" value'))
+    if dialect.delimiter == '\0':
+        raise OperationError(space.w_TypeError,
+                             space.wrap('delimiter must be set'))
+    if w_quoting is None and dialect.quotechar == '\0':
+        tmp_quoting = QUOTE_NONE
+    if tmp_quoting != QUOTE_NONE and dialect.quotechar == '\0':
+        raise OperationError(space.w_TypeError,
+                        space.wrap('quotechar must be set if quoting enabled'))
+    if len(dialect.lineterminator) == 0:
+        raise OperationError(space.w_TypeError,
+                             space.wrap('lineterminator must be set'))
+    dialect.quoting = tmp_quoting
+    return dialect
+
+def W_Dialect___new__(space, w_subtype, w_dialect=NoneNotWrapped,
+                      w_delimiter=NoneNotWrapped,
+                      w_doublequote=NoneNotWrapped,
+                      w_escapechar=NoneNotWrapped,
+                      w_lineterminator=NoneNotWrapped,
+                      w_quotechar=NoneNotWrapped,
+                      w_quoting=NoneNotWrapped,
+                      w_skipinitialspace=NoneNotWrapped,
+                      w_strict=NoneNotWrapped):
+    dialect = _build_dialect(space, w_dialect, w_delimiter, w_doublequote,
+                             w_escapechar, w_lineterminator, w_quotechar,
+                             w_quoting, w_skipinitialspace, w_strict)
+    if space.is_w(w_subtype, space.gettypeobject(W_Dialect.typedef)):
+        return space.wrap(dialect)
+    else:
+        w_result = space.allocate_instance(W_Dialect, w_subtype)
+        subdialect = space.interp_w(W_Dialect, w_result)
+        W_Dialect.__init__(subdialect)
+        subdialect.copy_from(dialect)
+        return w_result
+W_Dialect___new__.unwrap_spec = [ObjSpace, W_Root, W_Root, W_Root, W_Root,
+                                 W_Root, W_Root, W_Root, W_Root, W_Root,
+                                 W_Root]
+
+
+def _get_escapechar(space, dialect):
+    if dialect.escapechar == '\0':
+        return space.w_None
+    return space.wrap(dialect.escapechar)
+
+def _get_quotechar(space, dialect):
+    if dialect.quotechar == '\0':
+        return space.w_None
+    return space.wrap(dialect.quotechar)
+
+def _make_getter(attrname):
+    def getter(space, dialect):
+        return space.wrap(getattr(dialect, attrname))
+    getter.func_name = '_get_' + attrname
+    return GetSetProperty(getter, cls=W_Dialect)
+
+
+W_Dialect.typedef = TypeDef(
+        'Dialect',
+        __module__ = '_csv',
+        __new__ = interp2app(W_Dialect___new__),
+
+        delimiter        = _make_getter('delimiter'),
+        doublequote      = _make_getter('doublequote'),
+        escapechar       = GetSetProperty(_get_escapechar, cls=W_Dialect),
+        lineterminator   = _make_getter('lineterminator'),
+        quotechar        = GetSetProperty(_get_quotechar, cls=W_Dialect),
+        quoting          = _make_getter('quoting'),
+        skipinitialspace = _make_getter('skipinitialspace'),
+        strict           = _make_getter('strict'),
+
+        __doc__ = """CSV dialect
+
+The Dialect type records CSV parsing and generation options.
+""")
+
+
+def register_dialect(space, w_name, w_dialect=NoneNotWrapped,
+                     w_delimiter=NoneNotWrapped,
+                     w_doublequote=NoneNotWrapped,
+                     w_escapechar=NoneNotWrapped,
+                     w_lineterminator=NoneNotWrapped,
+                     w_quotechar=NoneNotWrapped,
+                     w_quoting=NoneNotWrapped,
+                     w_skipinitialspace=NoneNotWrapped,
+                     w_strict=NoneNotWrapped):
+    """Create a mapping from a string name to a dialect class.
+    dialect = csv.register_dialect(name, dialect)"""
+    if not space.is_true(space.isinstance(w_name, space.w_basestring)):
+        raise OperationError(
+            space.w_TypeError,
+            space.wrap("dialect name must be a string or unicode"))
+
+    dialect = _build_dialect(space, w_dialect, w_delimiter, w_doublequote,
+                             w_escapechar, w_lineterminator, w_quotechar,
+                             w_quoting, w_skipinitialspace, w_strict)
+    state = space.fromcache(CsvState)
+    space.setitem(state.w_dialects, w_name, space.wrap(dialect))
+register_dialect.unwrap_spec = [ObjSpace, W_Root, W_Root, W_Root, W_Root,
+                                W_Root, W_Root, W_Root, W_Root, W_Root,
+                                W_Root]
+
+def unregister_dialect(space, w_name):
+    """Delete the name/dialect mapping associated with a string name.
+    csv.unregister_dialect(name)"""
+    state = space.fromcache(CsvState)
+    try:
+        space.delitem(state.w_dialects, w_name)
+    except OperationError, e:
+        if e.match(space, space.w_KeyError):
+            raise csv_error(space, 'unknown dialect')
+        raise
+unregister_dialect.unwrap_spec = [ObjSpace, W_Root]
+
+def get_dialect(space, w_name):
+    """Return the dialect instance associated with name.
+    dialect = csv.get_dialect(name)"""
+    state = space.fromcache(CsvState)
+    try:
+        return space.getitem(state.w_dialects, w_name)
+    except OperationError, e:
+        if e.match(space, space.w_KeyError):
+            raise csv_error(space, 'unknown dialect')
+        raise
+get_dialect.unwrap_spec = [ObjSpace, W_Root]
+
+def list_dialects(space):
+    """Return a list of all know dialect names
+    names = csv.list_dialects()"""
+    state = space.fromcache(CsvState)
+    return space.call_method(state.w_dialects, 'keys')
+list_dialects.unwrap_spec = [ObjSpace]
+
+def field_size_limit(space, w_limit=NoneNotWrapped):
+    """Sets an upper limit on parsed fields.
+    csv.field_size_limit([limit])
+
+    Returns old limit. If limit is not given, no new limit is set and
+    the old limit is returned"""
+    state = space.fromcache(CsvState)
+    old_limit = state.field_limit
+    if w_limit is not None:
+        if not space.is_true(space.isinstance(w_limit, space.w_int)):
+            raise OperationError(space.w_TypeError, space.wrap(
+                "int expected, got %s" %
+                (space.type(w_limit).getname(space, '?'),)))
+        state.field_limit = space.int_w(w_limit)
+    return space.wrap(old_limit)
+field_size_limit.unwrap_spec = [ObjSpace, W_Root]
@@ -0,0 +1,309 @@
+from pypy.interpreter.baseobjspace import Wrappable
+from pypy.interpreter.error import OperationError
+from pypy.interpreter.typedef import TypeDef
+from pypy.interpreter.typedef import interp_attrproperty_w, interp_attrproperty
+from pypy.interpreter.gateway import interp2app, ObjSpace, W_Root
+from pypy.interpreter.gateway import NoneNotWrapped
+from pypy.rlib.rstring import StringBuilder
+from pypy.module._csv.interp_csv import _build_dialect, csv_error, CsvState
+from pypy.module._csv.interp_csv import QUOTE_NONNUMERIC, QUOTE_NONE
+
+(START_RECORD, START_FIELD, ESCAPED_CHAR, IN_FIELD,
+ IN_QUOTED_FIELD, ESCAPE_IN_QUOTED_FIELD, QUOTE_IN_QUOTED_FIELD,
+ EAT_CRNL) = range(8)
+
+
+class W_Reader(Wrappable):
+    """The parser is a state machine that follows the one of CPython's
+    _csv.c.  Instead of dispatching on every character, the runs of
+    ordinary characters inside a field are found with a tight loop over
+    the line and copied into the field in one go; only the delimiters,
+    quotes, escapes and line ends go through the state machine.  A '\\0'
+    is fed to the state machine at the end of each line, which is why
+    the input lines themselves cannot contain any NUL byte."""
+
+    def __init__(self, space, dialect, w_iter):
+        self.space = space
+        self.dialect = dialect
+        self.w_iter = w_iter
+        self.line_num = 0
+        self.field_limit = space.fromcache(CsvState).field_limit
+        self.parse_reset()
+
+    def iter_w(self):
+        return self.space.wrap(self)
+    iter_w.unwrap_spec = ['self']
+
+    def error(self, msg):
+        raise csv_error(self.space, msg)
+    error._dont_inline_ = True
+
+    def parse_reset(self):
+        self.fields_w = []
+        self.field_builder = StringBuilder()
+        self.field_len = 0
+        self.numeric_field = False
+        self.state = START_RECORD
+
+    def save_field(self):
+        space = self.space
+        field = self.field_builder.build()
+        self.field_builder = StringBuilder()
+        self.field_len = 0
+        if self.numeric_field:
+            self.numeric_field = False
+            w_obj = space.call_function(space.w_float, space.wrap(field))
+        else:
+            w_obj = space.wrap(field)
+        self.fields_w.append(w_obj)
+
+    def add_char(self, c):
+        if self.field_len >= self.field_limit:
+            self.error("field larger than field limit (%d)" % (
+                self.field_limit,))
+        self.field_builder.append(c)
+        self.field_len += 1
+
+    def add_slice(self, line, start, stop):
+        if self.field_len + (stop - start) > self.field_limit:
+            self.error("field larger than field limit (%d)" % (
+                self.field_limit,))
+        self.field_builder.append_slice(line, start, stop)
+        self.field_len += stop - start
+
+    def next_w(self):
+        space = self.space
+        self.parse_reset()
+        # the field limit can only change between two rows
+        self.field_limit = space.fromcache(CsvState).field_limit
+        while True:
+            try:
+                w_line = space.next(self.w_iter)
+            except OperationError, e:
+                if e.match(space, space.w_StopIteration):
+                    # end of input
+                    if self.field_len > 0:
+                        raise csv_error(space, "newline inside string")
+                raise
+            self.line_num += 1
+            self.parse_line(space.str_w(w_line))
+            if self.state == START_RECORD:
+                break
+        fields_w = self.fields_w
+        self.fields_w = []
+        return space.newlist(fields_w)
+    next_w.unwrap_spec = ['self']
+
+    def parse_line(self, line):
+        dialect = self.dialect
+        pos = 0
+        end = len(line)
+        while pos < end:
+            state = self.state
+            if state == IN_FIELD:
+                stop = pos
+                while stop < end:
+                    c = line[stop]
+                    if (c == dialect.delimiter or c == dialect.escapechar or
+                        c == '\n' or c == '\r' or c == '\0'):
+                        break
+                    stop += 1
+                if stop > pos:
+                    self.add_slice(line, pos, stop)
+                    pos = stop
+                    continue
+            elif state == IN_QUOTED_FIELD:
+                stop = pos
+                while stop < end:
+                    c = line[stop]
+                    if (c == dialect.quotechar or c == dialect.escapechar or
+                        c == '\0'):
+                        break
+                    stop += 1
+                if stop > pos:
+                    self.add_slice(line, pos, stop)
+                    pos = stop
+                    continue
+            c = line[pos]
+            if c == '\0':
+                self.error("line contains NULL byte")
+            self.process_char(c)
+            pos += 1
+        self.process_char('\0')
+
+    def process_char(self, c):
+        dialect = self.dialect
+        state = self.state
+
+        if state == START_RECORD:
+            if c == '\0':
+                # empty line - return []
+                return
+            elif c == '\n' or c == '\r':
+                self.state = EAT_CRNL
+                return
+            # normal character - handle as START_FIELD
+            state = self.state = START_FIELD
+            # fall-through to the next case
+
+        if state == START_FIELD:
+            # expecting field
+            if c == '\n' or c == '\r' or c == '\0':
+                # save empty field - return [fields]
+                self.save_field()
+                if c == '\0':
+                    self.state = START_RECORD
+                else:
+                    self.state = EAT_CRNL
+            elif c == dialect.quotechar and dialect.quoting != QUOTE_NONE:
+                # start quoted field
+                self.state = IN_QUOTED_FIELD
+            elif c == dialect.escapechar:
+                # possible escaped character
+                self.state = ESCAPED_CHAR
+            elif c == ' ' and dialect.skipinitialspace:
+                # ignore space at start of field
+                pass
+            elif c == dialect.delimiter:
+                # save empty field
+                self.save_field()
+            else:
+                # begin new unquoted field
+                if dialect.quoting == QUOTE_NONNUMERIC:
+                    self.numeric_field = True
+                self.add_char(c)
+                self.state = IN_FIELD
+
+        elif state == ESCAPED_CHAR:
+            if c == '\0':
+                c = '\n'
+            self.add_char(c)
+            self.state = IN_FIELD
+
+        elif state == IN_FIELD:
+            # in unquoted field
+            if c == '\n' or c == '\r' or c == '\0':
+                # end of line - return [fields]
+                self.save_field()
+                if c == '\0':
+                    self.state = START_RECORD
+                else:
+                    self.state = EAT_CRNL
+            elif c == dialect.escapechar:
+                # possible escaped character
+                self.state = ESCAPED_CHAR
+            elif c == dialect.delimiter:
+                # save field - wait for new field
+                self.save_field()
+                self.state = START_FIELD
+            else:
+                # normal character - save in field
+                self.add_char(c)
+
+        elif state == IN_QUOTED_FIELD:
+            # in quoted field
+            if c == '\0':
+                pass
+            elif c == dialect.escapechar:
+                # possible escape character
+                self.state = ESCAPE_IN_QUOTED_FIELD
+            elif c == dialect.quotechar and dialect.quoting != QUOTE_NONE:
+                if dialect.doublequote:
+                    # doublequote; " represented by ""
+                    self.state = QUOTE_IN_QUOTED_FIELD
+                else:
+                    # end of quote part of field
+                    self.state = IN_FIELD
+            else:
+                # normal character - save in field
+                self.add_char(c)
+
+        elif state == ESCAPE_IN_QUOTED_FIELD:
+            if c == '\0':
+                c = '\n'
+            self.add_char(c)
+            self.state = IN_QUOTED_FIELD
+
+        elif state == QUOTE_IN_QUOTED_FIELD:
+            # doublequote - seen a quote in a quoted field
+            if dialect.quoting != QUOTE_NONE and c == dialect.quotechar:
+                # save "" as "
+                self.add_char(c)
+                self.state = IN_QUOTED_FIELD
+            elif c == dialect.delimiter:
+                # save field - wait for new field
+                self.save_field()
+                self.state = START_FIELD
+            elif c == '\n' or c == '\r' or c == '\0':
+                # end of line - return [fields]
+                self.save_field()
+                if c == '\0':
+                    self.state = START_RECORD
+                else:
+                    self.state = EAT_CRNL
+            elif not dialect.strict:
+                self.add_char(c)
+                self.state = IN_FIELD
+            else:
+                # illegal
+                self.error("'%s' expected after '%s'" % (
+                    dialect.delimiter, dialect.quotechar))
+
+        elif state == EAT_CRNL:
+            if c == '\n' or c == '\r':
+                pass
+            elif c == '\0':
+                self.state = START_RECORD
+            else:
+                self.error("new-line character seen in unquoted field - "
+                           "do you need to open the file "
+                           "in universal-newline mode?")
+
+        else:
+            raise AssertionError("unknown state: %d" % (state,))
+
+
+def csv_reader(space, w_iterator, w_dialect=NoneNotWrapped,
+                  w_delimiter        = NoneNotWrapped,
+                  w_doublequote      = NoneNotWrapped,
+                  w_escapechar       = NoneNotWrapped,
+                  w_lineterminator   = NoneNotWrapped,
+                  w_quotechar        = NoneNotWrapped,
+                  w_quoting          = NoneNotWrapped,
+                  w_skipinitialspace = NoneNotWrapped,
+                  w_strict           = NoneNotWrapped,
+                  ):
+    """
+    csv_reader = reader(iterable [, dialect='excel']
+                       [optional keyword args])
+    for row in csv_reader:
+        process(row)
+
+    The "iterable" argument can be any object that returns a line
+    of input for each iteration, such as a file object or a list.  The
+    optional \"dialect\" parameter is discussed below.  The function
+    also accepts optional keyword arguments which override settings
+    provided by the dialect.
+
+    The returned object is an iterator.  Each iteration returns a row
+    of the CSV file (which can span multiple input lines)"""
+    w_iter = space.iter(w_iterator)
+    dialect = _build_dialect(space, w_dialect, w_delimiter, w_doublequote,
+                             w_escapechar, w_lineterminator, w_quotechar,
+                             w_quoting, w_skipinitialspace, w_strict)
+    return W_Reader(space, dialect, w_iter)
+csv_reader.unwrap_spec = [ObjSpace, W_Root, W_Root, W_Root, W_Root, W_Root,
+                          W_Root, W_Root, W_Root, W_Root, W_Root]
+
+W_Reader.typedef = TypeDef(
+        'reader',
+        __module__ = '_csv',
+        dialect = interp_attrproperty_w('dialect', W_Reader),
+        line_num = interp_attrproperty('line_num', W_Reader),
+        __iter__ = interp2app(W_Reader.iter_w),
+        next = interp2app(W_Reader.next_w),
+        __doc__ = """CSV reader
+
+Reader objects are responsible for reading and parsing tabular data
+in CSV format.""")
+W_Reader.typedef.acceptable_as_base_class = False
@@ -0,0 +1,176 @@
+from pypy.interpreter.baseobjspace import Wrappable
+from pypy.interpreter.error import OperationError
+from pypy.interpreter.typedef import TypeDef
+from pypy.interpreter.typedef import interp_attrproperty_w
+from pypy.interpreter.gateway import interp2app, ObjSpace, W_Root
+from pypy.interpreter.gateway import NoneNotWrapped
+from pypy.rlib.rstring import StringBuilder
+from pypy.module._csv.interp_csv import _build_dialect, csv_error
+from pypy.module._csv.interp_csv import (QUOTE_ALL, QUOTE_NONNUMERIC,
+                                         QUOTE_NONE)
+
+
+class W_Writer(Wrappable):
+
+    def __init__(self, space, dialect, w_fileobj):
+        self.space = space
+        self.dialect = dialect
+        w_filewrite = space.findattr(w_fileobj, space.wrap('write'))
+        if w_filewrite is None or not space.is_true(
+                space.callable(w_filewrite)):
+            raise OperationError(space.w_TypeError, space.wrap(
+                'argument 1 must have a "write" method'))
+        self.w_filewrite = w_filewrite
+        # precompute this
+        special = dialect.delimiter + dialect.lineterminator
+        if dialect.escapechar != '\0':
+            special += dialect.escapechar
+        if dialect.quotechar != '\0':
+            special += dialect.quotechar
+        self.special_characters = special
+
+    def join_append(self, rec, field, quoted, quote_empty):
+        # write the field into 'rec', with the quotes and the escapes
+        # that it needs; like in CPython, only the characters that may
+        # need it go through the slow path
+        space = self.space
+        dialect = self.dialect
+        special = self.special_characters
+        buf = StringBuilder(len(field) + 2)
+        start = 0
+        for i in range(len(field)):
+            c = field[i]
+            if c not in special:
+                continue
+            buf.append_slice(field, start, i)
+            start = i
+            want_escape = False
+            if dialect.quoting == QUOTE_NONE:
+                want_escape = True
+            else:
+                if c == dialect.quotechar:
+                    if dialect.doublequote:
+                        buf.append(dialect.quotechar)
+                    else:
+                        want_escape = True
+                if not want_escape:
+                    quoted = True
+            if want_escape:
+                if dialect.escapechar == '\0':
+                    raise csv_error(space,
+                                    "need to escape, but no escapechar set")
+                buf.append(dialect.escapechar)
+        buf.append_slice(field, start, len(field))
+
+        # If field is empty check if it needs to be quoted
+        if len(field) == 0 and quote_empty:
+            if dialect.quoting == QUOTE_NONE:
+                raise csv_error(space,
+                                "single empty field record must be quoted")
+            quoted = True
+
+        if quoted:
+            rec.append(dialect.quotechar)
+            rec.append(buf.build())
+            rec.append(dialect.quotechar)
+        else:
+            rec.append(buf.build())
+
+    def writerow(self, w_fields):
+        """Construct and write a CSV record from a sequence of fields.
+        Non-string elements will be converted to string."""
+        space = self.space
+        dialect = self.dialect
+        try:
+            fields_w = space.listview(w_fields)
+        except OperationError, e:
+            if e.match(space, space.w_TypeError):
+                raise csv_error(space, "sequence expected")
+            raise
+        quote_empty = len(fields_w) == 1
+        rec = StringBuilder()
+        for i in range(len(fields_w)):
+            w_field = fields_w[i]
+            # If this is not the first field we need a field separator
+            if i > 0:
+                rec.append(dialect.delimiter)
+            if dialect.quoting == QUOTE_NONNUMERIC:
+                try:
+                    space.call_function(space.w_float, w_field)
+                except OperationError, e:
+                    if e.async(space):
+                        raise
+                    quoted = True
+                else:
+                    quoted = False
+            elif dialect.quoting == QUOTE_ALL:
+                quoted = True
+            else:
+                quoted = False
+            if space.is_w(w_field, space.w_None):
+                field = ""
+            else:
+                field = space.str_w(space.str(w_field))
+            self.join_append(rec, field, quoted, quote_empty)
+        # add line terminator
+        rec.append(dialect.lineterminator)
+        return space.call_function(self.w_filewrite, space.wrap(rec.build()))
+    writerow.unwrap_spec = ['self', W_Root]
+
+    def writerows(self, w_seqseq):
+        """Construct and write a series of sequences to a csv file.
+        Non-string elements will be converted to string."""
+        space = self.space
+        w_iter = space.iter(w_seqseq)
+        while True:
+            try:
+                w_seq = space.next(w_iter)
+            except OperationError, e:
+                if e.match(space, space.w_StopIteration):
+                    break
+                raise
+            self.writerow(w_seq)
+    writerows.unwrap_spec = ['self', W_Root]
+
+
+def csv_writer(space, w_fileobj, w_dialect=NoneNotWrapped,
+                  w_delimiter        = NoneNotWrapped,
+                  w_doublequote      = NoneNotWrapped,
+                  w_escapechar       = NoneNotWrapped,
+                  w_lineterminator   = NoneNotWrapped,
+                  w_quotechar        = NoneNotWrapped,
+                  w_quoting          = NoneNotWrapped,
+                  w_skipinitialspace = NoneNotWrapped,
+                  w_strict           = NoneNotWrapped,
+                  ):
+    """
+    csv_writer = csv.writer(fileobj [, dialect='excel']
+                            [optional keyword args])
+    for row in sequence:
+        csv_writer.writerow(row)
+
+    [or]
+
+    csv_writer = csv.writer(fileobj [, dialect='excel']
+                            [optional keyword args])
+    csv_writer.writerows(rows)
+
+    The \"fileobj\" argument can be any object that supports the file API."""
+    dialect = _build_dialect(space, w_dialect, w_delimiter, w_doublequote,
+                             w_escapechar, w_lineterminator, w_quotechar,
+                             w_quoting, w_skipinitialspace, w_strict)
+    return W_Writer(space, dialect, w_fileobj)
+csv_writer.unwrap_spec = [ObjSpace, W_Root, W_Root, W_Root, W_Root, W_Root,
+                          W_Root, W_Root, W_Root, W_Root, W_Root]
+
+W_Writer.typedef = TypeDef(
+        'writer',
+        __module__ = '_csv',
+        dialect = interp_attrproperty_w('dialect', W_Writer),
+        writerow = interp2app(W_Writer.writerow),
+        writerows = interp2app(W_Writer.writerows),
+        __doc__ = """CSV writer
+
+Writer objects are responsible for generating tabular data
+in CSV format from sequence input.""")
+W_Writer.typedef.acceptable_as_base_class = False
@@ -0,0 +1,113 @@
+from pypy.conftest import gettestobjspace
+
+
+class AppTestDialect(object):
+    def setup_class(cls):
+        cls.space = gettestobjspace(usemodules=['_csv'])
+
+    def test_register_dialect(self):
+        import _csv
+
+        attrs = [('delimiter', ','),
+                 ('doublequote', True),
+                 ('escapechar', None),
+                 ('lineterminator', '\r\n'),
+                 ('quotechar', '"'),
+                 ('quoting', _csv.QUOTE_MINIMAL),
+                 ('skipinitialspace', False),
+                 ('strict', False),
+                 ]
+
+        for changeattr, newvalue in [('delimiter', ':'),
+                                     ('doublequote', False),
+                                     ('escapechar', '/'),
+                                     ('lineterminator', '---\n'),
+                                     ('quotechar', '%'),
+                                     ('quoting', _csv.QUOTE_NONNUMERIC),
+                                     ('skipinitialspace', True),
+                                     ('strict', True)]:
+            kwargs = {changeattr: newvalue}
+            _csv.register_dialect('foo1', **kwargs)
+            d = _csv.get_dialect('foo1')
+            assert d.__class__.__name__ == 'Dialect'
+            for attr, default in attrs:
+                if attr == changeattr:
+                    expected = newvalue
+                else:
+                    expected = default
+                assert getattr(d, attr) == expected
+        _csv.unregister_dialect('foo1')
+        raises(_csv.Error, _csv.get_dialect, 'foo1')
+        raises(_csv.Error, _csv.unregister_dialect, 'foo1')
+        raises(TypeError, _csv.register_dialect, 42)
+
+    def test_list_dialects(self):
+        import _csv
+        _csv.register_dialect('foo2', delimiter=';')
+        assert 'foo2' in _csv.list_dialects()
+        _csv.unregister_dialect('foo2')
+        assert 'foo2' not in _csv.list_dialects()
+
+    def test_dialect_from_object(self):
+        import _csv
+        class Foo(object):
+            delimiter = ';'
+            quotechar = "'"
+        d = _csv.Dialect(Foo)
+        assert d.delimiter == ';'
+        assert d.quotechar == "'"
+        assert d.doublequote is True
+        # keyword arguments override the attributes of the dialect
+        d = _csv.Dialect(Foo, delimiter='\t')
+        assert d.delimiter == '\t'
+        assert d.quotechar == "'"
+        # an existing Dialect without overrides is reused
+        assert _csv.Dialect(d) is d
+        raises(TypeError, "d.delimiter = ','")
+
+    def test_bad_dialects(self):
+        import _csv
+        raises(TypeError, _csv.Dialect, delimiter='ab')
+        raises(TypeError, _csv.Dialect, delimiter=4)
+        raises(TypeError, _csv.Dialect, delimiter='')
+        raises(TypeError, _csv.Dialect, quoting=42)
+        raises(TypeError, _csv.Dialect, quoting='x')
+        raises(TypeError, _csv.Dialect, quotechar=None,
+               quoting=_csv.QUOTE_ALL)
+        raises(TypeError, _csv.Dialect, lineterminator='')
+        raises(TypeError, _csv.Dialect, lineterminator=5)
+        raises(TypeError, _csv.Dialect, foo=5)
+        # without a quotechar, quoting defaults to QUOTE_NONE
+        assert _csv.Dialect(quotechar=None).quoting == _csv.QUOTE_NONE
+
+    def test_csv_module_dialects(self):
+        import csv
+        assert csv.get_dialect('excel').delimiter == ','
+        assert csv.get_dialect('excel-tab').delimiter == '\t'
+        class bad(csv.excel):
+            delimiter = None
+        raises(csv.Error, bad)
+        class mydialect(csv.Dialect):
+            delimiter = ';'
+            quotechar = '"'
+            doublequote = True
+            skipinitialspace = False
+            lineterminator = '\n'
+            quoting = csv.QUOTE_MINIMAL
+        mydialect()
+
+    def test_subclass(self):
+        import _csv
+        class D(_csv.Dialect):
+            pass
+        d = D(delimiter=';')
+        assert type(d) is D
+        assert d.delimiter == ';'
+
+    def test_field_size_limit(self):
+        import _csv
+        old = _csv.field_size_limit()
+        assert _csv.field_size_limit(42) == old
+        assert _csv.field_size_limit() == 42
+        raises(TypeError, _csv.field_size_limit, 'x')
+        _csv.field_size_limit(old)
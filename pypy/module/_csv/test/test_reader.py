@@ -0,0 +1,119 @@
+from pypy.conftest import gettestobjspace
+
+
+class AppTestReader(object):
+    def setup_class(cls):
+        cls.space = gettestobjspace(usemodules=['_csv'])
+
+        w__read_test = cls.space.appexec([], r"""():
+            import _csv
+            def _read_test(input, expect, **kwargs):
+                reader = _csv.reader(input, **kwargs)
+                if expect == 'Error':
+                    raises(_csv.Error, list, reader)
+                    return
+                result = list(reader)
+                assert result == expect, 'result: %r\nexpect: %r' % (
+                    result, expect)
+            return _read_test
+        """)
+        if type(w__read_test) is type(lambda:0):
+            w__read_test = staticmethod(w__read_test)
+        cls.w__read_test = w__read_test
+
+    def test_simple_reader(self):
+        self._read_test(['foo:bar\n'], [['foo', 'bar']], delimiter=':')
+
+    def test_read_oddinputs(self):
+        self._read_test([], [])
+        self._read_test([''], [[]])
+        self._read_test(['"ab"c'], 'Error', strict=1)
+        # cannot handle null bytes for the moment
+        self._read_test(['ab\0c'], 'Error', strict=1)
+        self._read_test(['"ab"c'], [['abc']], doublequote=0)
+
+    def test_read_eol(self):
+        self._read_test(['a,b'], [['a','b']])
+        self._read_test(['a,b\n'], [['a','b']])
+        self._read_test(['a,b\r\n'], [['a','b']])
+        self._read_test(['a,b\r'], [['a','b']])
+        self._read_test(['a,b\rc,d'], 'Error')
+        self._read_test(['a,b\nc,d'], 'Error')
+        self._read_test(['a,b\r\nc,d'], 'Error')
+
+    def test_read_escape(self):
+        self._read_test(['a,\\b,c'], [['a', 'b', 'c']], escapechar='\\')
+        self._read_test(['a,b\\,c'], [['a', 'b,c']], escapechar='\\')
+        self._read_test(['a,"b\\,c"'], [['a', 'b,c']], escapechar='\\')
+        self._read_test(['a,"b,\\c"'], [['a', 'b,c']], escapechar='\\')
+        self._read_test(['a,"b,c\\""'], [['a', 'b,c"']], escapechar='\\')
+        self._read_test(['a,"b,c"\\'], [['a', 'b,c\\']], escapechar='\\')
+
+    def test_read_quoting(self):
+        self._read_test(['1,",3,",5'], [['1', ',3,', '5']])
+        self._read_test(['1,",3,",5'], [['1', '"', '3', '"', '5']],
+                        quotechar=None, escapechar='\\')
+        self._read_test(['1,",3,",5'], [['1', '"', '3', '"', '5']],
+                        quoting=3, escapechar='\\')
+        self._read_test(['1,",3,",5'], [[1.0, ',3,', 5.0]],
+                        quoting=2, quotechar='"')
+        self._read_test(['"a""b",c'], [['a"b', 'c']])
+        self._read_test(['"a""""b"'], [['a""b']])
+        self._read_test([',3,"5",7.3, 9'], [['', '3', '5', '7.3', ' 9']])
+        self._read_test(['a, "b,c"'], [['a', 'b,c']], skipinitialspace=True)
+
+    def test_read_bigfield(self):
+        # This exercises the buffer realloc functionality
+        import _csv
+        bigstring = 'X' * 50000
+        bigline = '%s,%s' % (bigstring, bigstring)
+        self._read_test([bigline], [[bigstring, bigstring]])
+        old = _csv.field_size_limit(100)
+        try:
+            self._read_test(['a' * 100], [['a' * 100]])
+            self._read_test(['a' * 101], 'Error')
+            self._read_test(['"%s"' % ('a' * 101,)], 'Error')
+        finally:
+            _csv.field_size_limit(old)
+
+    def test_read_linenum(self):
+        import _csv
+        r = _csv.reader(['line,1', 'line,2', 'line,3'])
+        assert r.line_num == 0
+        r.next()
+        assert r.line_num == 1
+        r.next()
+        assert r.line_num == 2
+        r.next()
+        assert r.line_num == 3
+        raises(StopIteration, r.next)
+        assert r.line_num == 3
+
+    def test_multiline_fields(self):
+        import _csv
+        r = _csv.reader(['a,"b\n', 'c\n', 'd",e\n', 'f,g'])
+        assert r.next() == ['a', 'b\nc\nd', 'e']
+        assert r.line_num == 3
+        assert r.next() == ['f', 'g']
+        self._read_test(['a,"b\n'], 'Error')
+
+    def test_streaming(self):
+        import _csv
+        def lines():
+            yield 'a,b\n'
+            yield 'c,d\n'
+            raise ValueError
+        r = _csv.reader(lines())
+        assert r.next() == ['a', 'b']
+        assert r.next() == ['c', 'd']
+        raises(ValueError, r.next)
+
+    def test_dialect(self):
+        import _csv
+        _csv.register_dialect('testing', delimiter='|')
+        try:
+            r = _csv.reader(['a|b'], 'testing')
+            assert r.dialect.delimiter == '|'
+            assert list(r) == [['a', 'b']]
+        finally:
+            _csv.unregister_dialect('testing')
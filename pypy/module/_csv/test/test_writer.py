@@ -0,0 +1,111 @@
+from pypy.conftest import gettestobjspace
+
+
+class AppTestWriter(object):
+    def setup_class(cls):
+        cls.space = gettestobjspace(usemodules=['_csv'])
+
+        w__write_test = cls.space.appexec([], r"""():
+            import _csv
+
+            class DummyFile(object):
+                def __init__(self):
+                    self._parts = []
+                    self.write = self._parts.append
+                def getvalue(self):
+                    return ''.join(self._parts)
+
+            def _write_test(fields, expect, **kwargs):
+                fileobj = DummyFile()
+                writer = _csv.writer(fileobj, **kwargs)
+                if type(fields) is list and fields and type(fields[0]) is list:
+                    writer.writerows(fields)
+                else:
+                    writer.writerow(fields)
+                result = fileobj.getvalue()
+                expect += kwargs.get('lineterminator', '\r\n')
+                assert result == expect, 'result: %r\nexpect: %r' % (
+                    result, expect)
+            return _write_test
+        """)
+        if type(w__write_test) is type(lambda:0):
+            w__write_test = staticmethod(w__write_test)
+        cls.w__write_test = w__write_test
+
+    def test_write_arg_valid(self):
+        import _csv as csv
+        self._write_test((), '')
+        self._write_test([None], '""')
+        raises(csv.Error, self._write_test,
+               [None], None, quoting = csv.QUOTE_NONE)
+        # Check that exceptions are passed up the chain
+        class BadList:
+            def __len__(self):
+                return 10;
+            def __getitem__(self, i):
+                if i > 2:
+                    raise IOError
+        raises(IOError, self._write_test, BadList(), '')
+        class BadItem:
+            def __str__(self):
+                raise IOError
+        raises(IOError, self._write_test, [BadItem()], '')
+        raises(csv.Error, self._write_test, 42, '')
+        raises(TypeError, csv.writer, 42)
+
+    def test_write_bigfield(self):
+        # This exercises the buffer realloc functionality
+        bigstring = 'X' * 50000
+        self._write_test([bigstring,bigstring], '%s,%s' % \
+                         (bigstring, bigstring))
+
+    def test_write_quoting(self):
+        import _csv as csv
+        self._write_test(['a',1,'p,q'], 'a,1,"p,q"')
+        raises(csv.Error, self._write_test,
+               ['a',1,'p,q'], 'a,1,p,q',
+               quoting = csv.QUOTE_NONE)
+        self._write_test(['a',1,'p,q'], 'a,1,"p,q"',
+                         quoting = csv.QUOTE_MINIMAL)
+        self._write_test(['a',1,'p,q'], '"a",1,"p,q"',
+                         quoting = csv.QUOTE_NONNUMERIC)
+        self._write_test(['a',1,'p,q'], '"a","1","p,q"',
+                         quoting = csv.QUOTE_ALL)
+        self._write_test(['a\nb',1], '"a\nb","1"',
+                         quoting = csv.QUOTE_ALL)
+
+    def test_write_escape(self):
+        import _csv as csv
+        self._write_test(['a',1,'p,q'], 'a,1,"p,q"',
+                         escapechar='\\')
+        raises(csv.Error, self._write_test,
+               ['a',1,'p,"q"'], 'a,1,"p,\\"q\\""',
+               escapechar=None, doublequote=False)
+        self._write_test(['a',1,'p,"q"'], 'a,1,"p,\\"q\\""',
+                         escapechar='\\', doublequote = False)
+        self._write_test(['"'], '""""',
+                         escapechar='\\', quoting = csv.QUOTE_MINIMAL)
+        self._write_test(['"'], '\\"',
+                         escapechar='\\', quoting = csv.QUOTE_MINIMAL,
+                         doublequote = False)
+        self._write_test(['"'], '\\"',
+                         escapechar='\\', quoting = csv.QUOTE_NONE)
+        self._write_test(['a',1,'p,q'], 'a,1,p\\,q',
+                         escapechar='\\', quoting = csv.QUOTE_NONE)
+
+    def test_writerows(self):
+        self._write_test([['a', 'b'], ['c', 'd']], 'a,b\r\nc,d')
+
+    def test_lineterminator(self):
+        self._write_test(['a', 'b'], 'a,b', lineterminator='\n')
+        self._write_test(['a\n', 'b'], '"a\n",b', lineterminator='\n')
+
+    def test_roundtrip(self):
+        import _csv
+        rows = [['a', 'b c', 'd,e', 'f"g', '', 'h\ni'], ['1', '', '3']]
+        parts = []
+        class F:
+            write = parts.append
+        _csv.writer(F()).writerows(rows)
+        lines = ''.join(parts).splitlines(True)
+        assert list(_csv.reader(lines)) == rows
@@ -0,0 +1,21 @@
+from pypy.interpreter.mixedmodule import MixedModule
+from pypy.module._hashlib.interp_hashlib import algorithms
+
+
+class Module(MixedModule):
+    """The hash algorithms of OpenSSL, used by the hashlib module."""
+
+    interpleveldefs = {
+        'new' : 'interp_hashlib.new',
+        'HASH': 'interp_hashlib.W_Hash',
+        }
+
+    for name in algorithms:
+        interpleveldefs['openssl_' + name] = 'interp_hashlib.new_' + name
+
+    appleveldefs = {
+        }
+
+    def startup(self, space):
+        from pypy.module._hashlib.interp_hashlib import init_digests
+        init_digests()
@@ -0,0 +1,261 @@
+from pypy.interpreter.gateway import ObjSpace
+from pypy.interpreter.error import OperationError
+from pypy.interpreter.typedef import TypeDef, interp_attrproperty
+from pypy.interpreter.gateway import interp2app
+from pypy.interpreter.baseobjspace import Wrappable
+from pypy.rpython.lltypesystem import rffi, lltype
+from pypy.rpython.tool import rffi_platform
+from pypy.translator.platform import platform
+from pypy.translator.tool.cbuild import ExternalCompilationInfo
+from pypy.tool.sourcetools import func_with_new_name
+from pypy.module.thread import ll_thread
+
+import sys
+
+if sys.platform == 'win32' and platform.name != 'mingw32':
+    libraries = ['libeay32', 'user32', 'advapi32', 'gdi32']
+else:
+    libraries = ['crypto']
+
+# A few small C helpers hide the differences between the versions of
+# OpenSSL, where some of these functions are only macros, or have been
+# renamed.
+eci = ExternalCompilationInfo(
+    libraries = libraries,
+    includes = ['openssl/evp.h'],
+    post_include_bits = [
+        "EVP_MD_CTX *pypy_EVP_MD_CTX_new(void);",
+        "void pypy_EVP_MD_CTX_free(EVP_MD_CTX *ctx);",
+        "int pypy_EVP_MD_size(const EVP_MD *md);",
+        "int pypy_EVP_MD_block_size(const EVP_MD *md);",
+        "void pypy_init_digests(void);"],
+    separate_module_sources = ["""
+        EVP_MD_CTX *pypy_EVP_MD_CTX_new(void) {
+        #if OPENSSL_VERSION_NUMBER < 0x10100000L
+            return EVP_MD_CTX_create();
+        #else
+            return EVP_MD_CTX_new();
+        #endif
+        }
+        void pypy_EVP_MD_CTX_free(EVP_MD_CTX *ctx) {
+        #if OPENSSL_VERSION_NUMBER < 0x10100000L
+            EVP_MD_CTX_destroy(ctx);
+        #else
+            EVP_MD_CTX_free(ctx);
+        #endif
+        }
+        int pypy_EVP_MD_size(const EVP_MD *md) {
+            return EVP_MD_size(md);
+        }
+        int pypy_EVP_MD_block_size(const EVP_MD *md) {
+            return EVP_MD_block_size(md);
+        }
+        void pypy_init_digests(void) {
+            OpenSSL_add_all_digests();
+        }
+        """],
+    export_symbols = ['pypy_EVP_MD_CTX_new', 'pypy_EVP_MD_CTX_free',
+                      'pypy_EVP_MD_size', 'pypy_EVP_MD_block_size',
+                      'pypy_init_digests'],
+    )
+
+eci = rffi_platform.configure_external_library(
+    'openssl', eci,
+    [dict(prefix='openssl-',
+          include_dir='inc32', library_dir='out32'),
+     ])
+
+# opaque structures
+EVP_MD = rffi.VOIDP
+EVP_MD_CTX = rffi.VOIDP
+
+def external(name, argtypes, restype, **kw):
+    kw['compilation_info'] = eci
+    kw.setdefault('threadsafe', False)
+    return rffi.llexternal(name, argtypes, restype, **kw)
+
+EVP_get_digestbyname = external('EVP_get_digestbyname', [rffi.CCHARP], EVP_MD)
+EVP_MD_CTX_new = external('pypy_EVP_MD_CTX_new', [], EVP_MD_CTX)
+EVP_MD_CTX_free = external('pypy_EVP_MD_CTX_free', [EVP_MD_CTX], lltype.Void)
+EVP_MD_size = external('pypy_EVP_MD_size', [EVP_MD], rffi.INT)
+EVP_MD_block_size = external('pypy_EVP_MD_block_size', [EVP_MD], rffi.INT)
+EVP_DigestInit = external('EVP_DigestInit', [EVP_MD_CTX, EVP_MD], rffi.INT)
+EVP_MD_CTX_copy = external('EVP_MD_CTX_copy', [EVP_MD_CTX, EVP_MD_CTX],
+                           rffi.INT)
+EVP_DigestFinal = external('EVP_DigestFinal',
+                           [EVP_MD_CTX, rffi.CCHARP, rffi.VOIDP], rffi.INT)
+init_digests = external('pypy_init_digests', [], lltype.Void)
+
+# Two versions of EVP_DigestUpdate(): hashing a big string releases the
+# GIL, so that other threads can run meanwhile; for small strings it
+# would cost more than the hashing itself.
+EVP_DigestUpdate = external('EVP_DigestUpdate',
+                            [EVP_MD_CTX, rffi.CCHARP, rffi.SIZE_T], rffi.INT)
+EVP_DigestUpdate_releasegil = external('EVP_DigestUpdate',
+                            [EVP_MD_CTX, rffi.CCHARP, rffi.SIZE_T], rffi.INT,
+                            threadsafe=True)
+
+# the same threshold as CPython's
+HASHLIB_GIL_MINSIZE = 2048
+
+algorithms = ('md5', 'sha1', 'sha224', 'sha256', 'sha384', 'sha512')
+
+
+class W_Hash(Wrappable):
+    ctx = lltype.nullptr(EVP_MD_CTX.TO)
+    lock = None
+
+    def __init__(self, space, name):
+        self.space = space
+        self.name = name
+        digest = getdigest(space, name)
+        self.digest_size = rffi.cast(lltype.Signed, EVP_MD_size(digest))
+        self.block_size = rffi.cast(lltype.Signed,
+                                    EVP_MD_block_size(digest))
+        ctx = EVP_MD_CTX_new()
+        if not ctx:
+            raise OperationError(space.w_MemoryError, space.w_None)
+        self.ctx = ctx
+        EVP_DigestInit(ctx, digest)
+
+    def __del__(self):
+        if self.ctx:
+            EVP_MD_CTX_free(self.ctx)
+
+    # While an update() of a big string runs without the GIL, the other
+    # threads must not use the same context.  A lock is only allocated
+    # for that on the first such update(), as most hash objects are only
+    # ever used by one thread.
+
+    def _acquire(self):
+        if self.lock is not None:
+            self.lock.acquire(True)
+
+    def _release(self):
+        if self.lock is not None:
+            self.lock.release()
+
+    def descr_repr(self, space):
+        addrstring = self.getaddrstring(space)
+        return space.wrap("<%s HASH object @ 0x%s>" % (self.name, addrstring))
+    descr_repr.unwrap_spec = ['self', ObjSpace]
+
+    def update(self, space, string):
+        length = len(string)
+        buf = rffi.get_nonmovingbuffer(string)
+        try:
+            if (space.config.objspace.usemodules.thread and
+                length >= HASHLIB_GIL_MINSIZE):
+                if self.lock is None:
+                    self.lock = ll_thread.allocate_lock()
+                self._acquire()
+                try:
+                    EVP_DigestUpdate_releasegil(self.ctx, buf, length)
+                finally:
+                    self._release()
+            else:
+                self._acquire()
+                try:
+                    EVP_DigestUpdate(self.ctx, buf, length)
+                finally:
+                    self._release()
+        finally:
+            rffi.free_nonmovingbuffer(string, buf)
+    update.unwrap_spec = ['self', ObjSpace, 'bufferstr']
+
+    def copy(self, space):
+        "Return a copy of the hash object."
+        w_hash = W_Hash(space, self.name)
+        self._acquire()
+        try:
+            EVP_MD_CTX_copy(w_hash.ctx, self.ctx)
+        finally:
+            self._release()
+        return space.wrap(w_hash)
+    copy.unwrap_spec = ['self', ObjSpace]
+
+    def digest(self, space):
+        "Return the digest value as a string of binary data."
+        return space.wrap(self._digest())
+    digest.unwrap_spec = ['self', ObjSpace]
+
+    def hexdigest(self, space):
+        "Return the digest value as a string of hexadecimal digits."
+        digest = self._digest()
+        hexdigits = '0123456789abcdef'
+        result = ['\0'] * (len(digest) * 2)
+        for i in range(len(digest)):
+            c = ord(digest[i])
+            result[i * 2] = hexdigits[c >> 4]
+            result[i * 2 + 1] = hexdigits[c & 0x0f]
+        return space.wrap(''.join(result))
+    hexdigest.unwrap_spec = ['self', ObjSpace]
+
+    def _digest(self):
+        # finalize a copy of the context, so that more data can still
+        # be added to this hash object afterwards
+        ctx = EVP_MD_CTX_new()
+        if not ctx:
+            raise OperationError(self.space.w_MemoryError,
+                                 self.space.w_None)
+        try:
+            self._acquire()
+            try:
+                EVP_MD_CTX_copy(ctx, self.ctx)
+            finally:
+                self._release()
+            digest_size = self.digest_size
+            buf = lltype.malloc(rffi.CCHARP.TO, digest_size, flavor='raw')
+            try:
+                EVP_DigestFinal(ctx, buf, lltype.nullptr(rffi.VOIDP.TO))
+                return rffi.charpsize2str(buf, digest_size)
+            finally:
+                lltype.free(buf, flavor='raw')
+        finally:
+            EVP_MD_CTX_free(ctx)
+
+
+W_Hash.typedef = TypeDef(
+    'HASH',
+    __module__ = '_hashlib',
+    __repr__ = interp2app(W_Hash.descr_repr),
+    update = interp2app(W_Hash.update),
+    copy = interp2app(W_Hash.copy),
+    digest = interp2app(W_Hash.digest),
+    hexdigest = interp2app(W_Hash.hexdigest),
+    name = interp_attrproperty('name', W_Hash),
+    digest_size = interp_attrproperty('digest_size', W_Hash),
+    digestsize = interp_attrproperty('digest_size', W_Hash),
+    block_size = interp_attrproperty('block_size', W_Hash),
+    )
+W_Hash.typedef.acceptable_as_base_class = False
+
+def getdigest(space, name):
+    c_name = rffi.str2charp(name)
+    try:
+        digest = EVP_get_digestbyname(c_name)
+    finally:
+        rffi.free_charp(c_name)
+    if not digest:
+        raise OperationError(space.w_ValueError,
+                             space.wrap("unsupported hash type"))
+    return digest
+
+def new(space, name, string=''):
+    """new(name, string='') - Return a new hash object for the named
+    algorithm, optionally initialized with a string."""
+    w_hash = W_Hash(space, name)
+    w_hash.update(space, string)
+    return space.wrap(w_hash)
+new.unwrap_spec = [ObjSpace, str, 'bufferstr']
+
+# shortcut functions
+def make_new_hash(name):
+    def new_hash(space, string=''):
+        return new(space, name, string)
+    new_hash.unwrap_spec = [ObjSpace, 'bufferstr']
+    return func_with_new_name(new_hash, 'new_' + name)
+
+for name in algorithms:
+    newname = 'new_%s' % (name,)
+    globals()[newname] = make_new_hash(name)
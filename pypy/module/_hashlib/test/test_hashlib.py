@@ -0,0 +1,86 @@
+import py
+from pypy.conftest import gettestobjspace
+
+
+class AppTestHashlib:
+    def setup_class(cls):
+        cls.space = gettestobjspace(usemodules=['_hashlib'])
+
+    def test_simple(self):
+        import _hashlib
+        assert isinstance(_hashlib.new('md5'), _hashlib.HASH)
+        assert _hashlib.new('md5').hexdigest() == (
+            'd41d8cd98f00b204e9800998ecf8427e')
+        assert _hashlib.new('md5', 'abc').hexdigest() == (
+            '900150983cd24fb0d6963f7d28e17f72')
+        raises(ValueError, _hashlib.new, 'no-such-hash')
+
+    def test_attributes(self):
+        import _hashlib
+        for name, expected_size in {'md5': 16,
+                                    'sha1': 20,
+                                    'sha224': 28,
+                                    'sha256': 32,
+                                    'sha384': 48,
+                                    'sha512': 64,
+                                    }.items():
+            h = _hashlib.new(name)
+            assert h.name == name
+            assert h.digest_size == expected_size
+            assert h.digestsize == expected_size
+            assert h.block_size in (64, 128)
+            assert repr(h).startswith('<%s HASH object @ 0x' % (name,))
+            #
+            h.update('abc')
+            h2 = h.copy()
+            h.update('def')
+            digest = h.digest()
+            hexdigest = h.hexdigest()
+            h2.update('d')
+            h2.update('ef')
+            assert digest == h2.digest()
+            assert hexdigest == h2.hexdigest()
+            assert len(digest) == h.digest_size
+            assert len(hexdigest) == h.digest_size * 2
+            # the digest can be asked again, and more data added
+            assert h.digest() == digest
+            h.update('x')
+            assert h.digest() != digest
+            # the shortcut functions
+            h3 = getattr(_hashlib, 'openssl_' + name)('abcdef')
+            assert h3.hexdigest() == hexdigest
+
+    def test_known_digests(self):
+        import _hashlib
+        h = _hashlib.openssl_sha256('abc')
+        assert h.hexdigest() == ('ba7816bf8f01cfea414140de5dae2223'
+                                 'b00361a396177a9cb410ff61f20015ad')
+        h = _hashlib.openssl_sha1(buffer('abc'))
+        assert h.hexdigest() == 'a9993e364706816aba3e25717850c26c9cd0d89d'
+
+    def test_big_update(self):
+        import _hashlib
+        h = _hashlib.new('sha1')
+        for i in range(10):
+            h.update('x' * 10000)
+        assert h.hexdigest() == _hashlib.new('sha1', 'x' * 100000).hexdigest()
+
+
+class AppTestHashlibThreads(AppTestHashlib):
+    def setup_class(cls):
+        cls.space = gettestobjspace(usemodules=['_hashlib', 'thread'])
+
+    def test_threads(self):
+        import _hashlib, thread, time
+        h = _hashlib.new('sha1')
+        data = 'abcdefgh' * 1000
+        done = []
+        def f():
+            for i in range(10):
+                h.update(data)
+            done.append(1)
+        for i in range(4):
+            thread.start_new_thread(f, ())
+        while len(done) < 4:
+            time.sleep(0.01)
+        assert h.hexdigest() == _hashlib.new('sha1', data * 40).hexdigest()
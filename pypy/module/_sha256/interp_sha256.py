@@ -0,0 +1,97 @@
+from pypy.rlib import rsha256
+from pypy.interpreter.baseobjspace import Wrappable
+from pypy.interpreter.typedef import TypeDef
+from pypy.interpreter.gateway import interp2app, ObjSpace, W_Root
+
+
+class W_SHA256(Wrappable, rsha256.RSHA256):
+    """
+    A subclass of RSHA256 that can be exposed to app-level.
+    """
+
+    def __init__(self, space):
+        self.space = space
+        self._init()
+
+    def update_w(self, string):
+        self.update(string)
+
+    def digest_w(self):
+        return self.space.wrap(self.digest())
+
+    def hexdigest_w(self):
+        return self.space.wrap(self.hexdigest())
+
+    def copy_w(self):
+        clone = W_SHA256(self.space)
+        clone._copyfrom(self)
+        return self.space.wrap(clone)
+
+
+class W_SHA224(W_SHA256):
+    """
+    Same as W_SHA256, with the initial state and the digest size of SHA-224.
+    """
+    digest_size = 28
+    _initial_state = rsha256.SHA224_INITIAL_STATE
+
+    def copy_w(self):
+        clone = W_SHA224(self.space)
+        clone._copyfrom(self)
+        return self.space.wrap(clone)
+
+
+def W_SHA256___new__(space, w_subtype, initialdata=''):
+    """
+    Create a new sha256 object and call its initializer.
+    """
+    w_sha = space.allocate_instance(W_SHA256, w_subtype)
+    sha = space.interp_w(W_SHA256, w_sha)
+    W_SHA256.__init__(sha, space)
+    sha.update(initialdata)
+    return w_sha
+
+def W_SHA224___new__(space, w_subtype, initialdata=''):
+    """
+    Create a new sha224 object and call its initializer.
+    """
+    w_sha = space.allocate_instance(W_SHA224, w_subtype)
+    sha = space.interp_w(W_SHA224, w_sha)
+    W_SHA224.__init__(sha, space)
+    sha.update(initialdata)
+    return w_sha
+
+
+W_SHA256.typedef = TypeDef(
+    'sha256',
+    __module__ = '_sha256',
+    __new__   = interp2app(W_SHA256___new__, unwrap_spec=[ObjSpace, W_Root,
+                                                          'bufferstr']),
+    update    = interp2app(W_SHA256.update_w, unwrap_spec=['self',
+                                                           'bufferstr']),
+    digest    = interp2app(W_SHA256.digest_w, unwrap_spec=['self']),
+    hexdigest = interp2app(W_SHA256.hexdigest_w, unwrap_spec=['self']),
+    copy      = interp2app(W_SHA256.copy_w, unwrap_spec=['self']),
+    digest_size = 32,
+    digestsize = 32,
+    block_size = 64,
+    __doc__   = """sha256(arg) -> return new sha256 object.
+
+If arg is present, the method call update(arg) is made.""")
+
+W_SHA224.typedef = TypeDef(
+    'sha224',
+    __module__ = '_sha256',
+    __new__   = interp2app(W_SHA224___new__, unwrap_spec=[ObjSpace, W_Root,
+                                                          'bufferstr']),
+    update    = interp2app(W_SHA224.update_w, unwrap_spec=['self',
+                                                           'bufferstr']),
+    digest    = interp2app(W_SHA224.digest_w, unwrap_spec=['self']),
+    hexdigest = interp2app(W_SHA224.hexdigest_w, unwrap_spec=['self']),
+    copy      = interp2app(W_SHA224.copy_w, unwrap_spec=['self']),
+    digest_size = 28,
+    digestsize = 28,
+    block_size = 64,
+    __doc__   = """sha224(arg) -> return new sha224 object.
+
+If arg is present, the method call update(arg) is made.""")
@@ -0,0 +1,88 @@
+"""
+Tests for the _sha256 module implemented at interp-level in
+pypy/module/_sha256.
+"""
+
+import py
+from pypy.conftest import gettestobjspace
+
+
+class AppTestSHA256(object):
+
+    def setup_class(cls):
+        """
+        Create a space with the _sha256 module and import it for use by
+        the tests.
+        """
+        cls.space = gettestobjspace(usemodules=['_sha256'])
+        cls.w__sha256 = cls.space.appexec([], """():
+            import _sha256
+            return _sha256
+        """)
+
+
+    def test_sizes(self):
+        """
+        Check the digest and block sizes of both kinds of objects.
+        """
+        d = self._sha256.sha256()
+        assert d.digest_size == d.digestsize == 32
+        assert d.block_size == 64
+        d = self._sha256.sha224()
+        assert d.digest_size == d.digestsize == 28
+        assert d.block_size == 64
+
+
+    def test_digests(self):
+        """
+        Feed the examples of FIPS 180-2 into the objects and check the
+        digests.
+        """
+        _sha256 = self._sha256
+        cases = [
+            (_sha256.sha256, "abc",
+             "ba7816bf8f01cfea414140de5dae2223"
+             "b00361a396177a9cb410ff61f20015ad"),
+            (_sha256.sha256,
+             "abcdbcdecdefdefgefghfghighijhijkijkljklmklmnlmnomnopnopq",
+             "248d6a61d20638b8e5c026930c3e6039"
+             "a33ce45964ff2167f6ecedd419db06c1"),
+            (_sha256.sha224, "abc",
+             "23097d223405d8228642a477bda255b32aadbce4bda0b3f7e36c9da7"),
+            (_sha256.sha224, "a" * 1000,
+             "4e8f0ce90b64661a2b5e84be6d93a7d9b76871062f1814433d04a03d"),
+            ]
+        for cls, input, expected in cases:
+            d = cls()
+            d.update(input)
+            assert d.hexdigest() == expected
+            assert d.digest() == expected.decode('hex')
+            assert cls(input).hexdigest() == expected
+            # the digest can be asked again, and more data added
+            assert d.hexdigest() == expected
+
+
+    def test_copy(self):
+        """
+        Test the copy() method.
+        """
+        _sha256 = self._sha256
+        for cls in [_sha256.sha256, _sha256.sha224]:
+            d1 = cls()
+            d1.update("abcde")
+            d2 = d1.copy()
+            assert type(d2) is cls
+            d2.update("fgh")
+            d1.update("jkl")
+            assert d1.hexdigest() == cls("abcdejkl").hexdigest()
+            assert d2.hexdigest() == cls("abcdefgh").hexdigest()
+
+
+    def test_buffer(self):
+        """
+        Test passing a buffer object.
+        """
+        _sha256 = self._sha256
+        d1 = _sha256.sha256(buffer("abcde"))
+        d1.update(buffer("jkl"))
+        assert d1.hexdigest() == _sha256.sha256("abcdejkl").hexdigest()
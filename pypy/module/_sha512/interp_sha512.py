@@ -0,0 +1,97 @@
+from pypy.rlib import rsha512
+from pypy.interpreter.baseobjspace import Wrappable
+from pypy.interpreter.typedef import TypeDef
+from pypy.interpreter.gateway import interp2app, ObjSpace, W_Root
+
+
+class W_SHA512(Wrappable, rsha512.RSHA512):
+    """
+    A subclass of RSHA512 that can be exposed to app-level.
+    """
+
+    def __init__(self, space):
+        self.space = space
+        self._init()
+
+    def update_w(self, string):
+        self.update(string)
+
+    def digest_w(self):
+        return self.space.wrap(self.digest())
+
+    def hexdigest_w(self):
+        return self.space.wrap(self.hexdigest())
+
+    def copy_w(self):
+        clone = W_SHA512(self.space)
+        clone._copyfrom(self)
+        return self.space.wrap(clone)
+
+
+class W_SHA384(W_SHA512):
+    """
+    Same as W_SHA512, with the initial state and the digest size of SHA-384.
+    """
+    digest_size = 48
+    _initial_state = rsha512.SHA384_INITIAL_STATE
+
+    def copy_w(self):
+        clone = W_SHA384(self.space)
+        clone._copyfrom(self)
+        return self.space.wrap(clone)
+
+
+def W_SHA512___new__(space, w_subtype, initialdata=''):
+    """
+    Create a new sha512 object and call its initializer.
+    """
+    w_sha = space.allocate_instance(W_SHA512, w_subtype)
+    sha = space.interp_w(W_SHA512, w_sha)
+    W_SHA512.__init__(sha, space)
+    sha.update(initialdata)
+    return w_sha
+
+def W_SHA384___new__(space, w_subtype, initialdata=''):
+    """
+    Create a new sha384 object and call its initializer.
+    """
+    w_sha = space.allocate_instance(W_SHA384, w_subtype)
+    sha = space.interp_w(W_SHA384, w_sha)
+    W_SHA384.__init__(sha, space)
+    sha.update(initialdata)
+    return w_sha
+
+
+W_SHA512.typedef = TypeDef(
+    'sha512',
+    __module__ = '_sha512',
+    __new__   = interp2app(W_SHA512___new__, unwrap_spec=[ObjSpace, W_Root,
+                                                          'bufferstr']),
+    update    = interp2app(W_SHA512.update_w, unwrap_spec=['self',
+                                                           'bufferstr']),
+    digest    = interp2app(W_SHA512.digest_w, unwrap_spec=['self']),
+    hexdigest = interp2app(W_SHA512.hexdigest_w, unwrap_spec=['self']),
+    copy      = interp2app(W_SHA512.copy_w, unwrap_spec=['self']),
+    digest_size = 64,
+    digestsize = 64,
+    block_size = 128,
+    __doc__   = """sha512(arg) -> return new sha512 object.
+
+If arg is present, the method call update(arg) is made.""")
+
+W_SHA384.typedef = TypeDef(
+    'sha384',
+    __module__ = '_sha512',
+    __new__   = interp2app(W_SHA384___new__, unwrap_spec=[ObjSpace, W_Root,
+                                                          'bufferstr']),
+    update    = interp2app(W_SHA384.update_w, unwrap_spec=['self',
+                                                           'bufferstr']),
+    digest    = interp2app(W_SHA384.digest_w, unwrap_spec=['self']),
+    hexdigest = interp2app(W_SHA384.hexdigest_w, unwrap_spec=['self']),
+    copy      = interp2app(W_SHA384.copy_w, unwrap_spec=['self']),
+    digest_size = 48,
+    digestsize = 48,
+    block_size = 128,
+    __doc__   = """sha384(arg) -> return new sha384 object.
+
+If arg is present, the method call update(arg) is made.""")
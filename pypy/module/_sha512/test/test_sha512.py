@@ -0,0 +1,83 @@
+"""
+Tests for the _sha512 module implemented at interp-level in
+pypy/module/_sha512.
+"""
+
+import py
+from pypy.conftest import gettestobjspace
+
+
+class AppTestSHA512(object):
+
+    def setup_class(cls):
+        """
+        Create a space with the _sha512 module and import it for use by
+        the tests.
+        """
+        cls.space = gettestobjspace(usemodules=['_sha512'])
+        cls.w__sha512 = cls.space.appexec([], """():
+            import _sha512
+            return _sha512
+        """)
+
+
+    def test_sizes(self):
+        """
+        Check the digest and block sizes of both kinds of objects.
+        """
+        d = self._sha512.sha512()
+        assert d.digest_size == d.digestsize == 64
+        assert d.block_size == 128
+        d = self._sha512.sha384()
+        assert d.digest_size == d.digestsize == 48
+        assert d.block_size == 128
+
+
+    def test_digests(self):
+        """
+        Feed the examples of FIPS 180-2 into the objects and check the
+        digests.
+        """
+        _sha512 = self._sha512
+        cases = [
+            (_sha512.sha512, "abc",
+             "ddaf35a193617abacc417349ae20413112e6fa4e89a97ea20a9eeee64b55d39a"
+             "2192992a274fc1a836ba3c23a3feebbd454d4423643ce80e2a9ac94fa54ca49f"),
+            (_sha512.sha384, "abc",
+             "cb00753f45a35e8bb5a03d699ac65007272c32ab0eded1631a8b605a43ff5bed"
+             "8086072ba1e7cc2358baeca134c825a7"),
+            ]
+        for cls, input, expected in cases:
+            d = cls()
+            d.update(input)
+            assert d.hexdigest() == expected
+            assert d.digest() == expected.decode('hex')
+            assert cls(input).hexdigest() == expected
+            # the digest can be asked again, and more data added
+            assert d.hexdigest() == expected
+
+
+    def test_copy(self):
+        """
+        Test the copy() method.
+        """
+        _sha512 = self._sha512
+        for cls in [_sha512.sha512, _sha512.sha384]:
+            d1 = cls()
+            d1.update("abcde")
+            d2 = d1.copy()
+            assert type(d2) is cls
+            d2.update("fgh")
+            d1.update("jkl")
+            assert d1.hexdigest() == cls("abcdejkl").hexdigest()
+            assert d2.hexdigest() == cls("abcdefgh").hexdigest()
+
+
+    def test_buffer(self):
+        """
+        Test passing a buffer object.
+        """
+        _sha512 = self._sha512
+        d1 = _sha512.sha512(buffer("abcde"))
+        d1.update(buffer("jkl"))
+        assert d1.hexdigest() == _sha512.sha512("abcdejkl").hexdigest()
@@ -19,6 +19,7 @@ copyrighted by: Copyright (c) 1997-2001 by Secret Labs AB
         'getlower':       'interp_sre.w_getlower',
         'getcodesize':    'interp_sre.w_getcodesize',
         '_State':         'interp_sre.make_state',
+        '_PatternCode':   'interp_sre.make_pattern_code',
         '_match':         'interp_sre.w_match',
         '_search':        'interp_sre.w_search',
     }
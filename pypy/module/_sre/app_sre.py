@@ -25,7 +25,7 @@ class SRE_Pattern(object):
         self.groups = groups
         self.groupindex = groupindex # Maps group names to group indices
         self._indexgroup = indexgroup # Maps indices to group names
-        self._code = code
+        self._code = _sre._PatternCode(code)
     
     def match(self, string, pos=0, endpos=sys.maxint):
         """If zero or more characters at the beginning of string match this
@@ -173,10 +173,32 @@ class W_GenericState(W_State):
         return ord(self.buffer.getitem(p))
 
 
+class W_PatternCode(Wrappable):
+    """The codes of a compiled pattern, unwrapped once and for all.  The
+    list of codes is green in the JIT-compiled loops of rsre, so using the
+    same list for all the searches with a pattern lets them share the
+    machine code specialized for it."""
+
+    def __init__(self, pattern_codes):
+        self.pattern_codes = pattern_codes
+
+W_PatternCode.typedef = TypeDef("W_PatternCode")
+
+def unwrap_pattern_codes(space, w_pattern_codes):
+    w_code = space.interpclass_w(w_pattern_codes)
+    if isinstance(w_code, W_PatternCode):
+        return w_code.pattern_codes
+    return [intmask(space.uint_w(code)) for code
+                                in space.unpackiterable(w_pattern_codes)]
+
+def make_pattern_code(space, w_pattern_codes):
+    pattern_codes = unwrap_pattern_codes(space, w_pattern_codes)
+    return space.wrap(W_PatternCode(pattern_codes))
+make_pattern_code.unwrap_spec = [ObjSpace, W_Root]
+
 def w_search(space, w_state, w_pattern_codes):
     state = space.interp_w(W_State, w_state)
-    pattern_codes = [intmask(space.uint_w(code)) for code
-                                    in space.unpackiterable(w_pattern_codes)]
+    pattern_codes = unwrap_pattern_codes(space, w_pattern_codes)
     try:
         res = state.search(pattern_codes)
     except RuntimeError:
@@ -186,8 +208,7 @@ def w_search(space, w_state, w_pattern_codes):
 
 def w_match(space, w_state, w_pattern_codes):
     state = space.interp_w(W_State, w_state)
-    pattern_codes = [intmask(space.uint_w(code)) for code
-                                    in space.unpackiterable(w_pattern_codes)]
+    pattern_codes = unwrap_pattern_codes(space, w_pattern_codes)
     try:
         res = state.match(pattern_codes)
     except RuntimeError:
@@ -0,0 +1,871 @@
+"""
+Interp-level implementation of the 'array' module.  The items of an
+array are stored unboxed in raw memory, in the C type of its typecode.
+"""
+
+import sys, operator
+from pypy.interpreter.baseobjspace import Wrappable, ObjSpace, W_Root
+from pypy.interpreter.buffer import RWBuffer
+from pypy.interpreter.error import OperationError, operationerrfmt
+from pypy.interpreter.gateway import interp2app, NoneNotWrapped
+from pypy.interpreter.typedef import TypeDef, GetSetProperty
+from pypy.interpreter.typedef import make_weakref_descr, no_hash_descr
+from pypy.rpython.lltypesystem import lltype, rffi
+from pypy.rlib.rarithmetic import ovfcheck
+from pypy.rlib.unroll import unrolling_iterable
+from pypy.rlib import jit
+
+
+def decode_slice(space, w_slice, length):
+    """Returns (start, step, slicelength) for the given slice object."""
+    w_indices = space.call_method(w_slice, "indices", space.wrap(length))
+    w_start, w_stop, w_step = space.fixedview(w_indices, 3)
+    start = space.int_w(w_start)
+    stop = space.int_w(w_stop)
+    step = space.int_w(w_step)
+    if step > 0 and stop > start:
+        slicelength = (stop - start - 1) // step + 1
+    elif step < 0 and stop < start:
+        slicelength = (start - stop - 1) // (-step) + 1
+    else:
+        slicelength = 0
+    return start, step, slicelength
+
+
+class W_ArrayBase(Wrappable):
+    """An array of values of one C type.  There is one subclass per
+    typecode, made by make_array() below; only its methods know the
+    type of the items, so that the JIT sees a raw load or store when
+    an item is read or written.
+    """
+    typecode = '?'      # overridden in the subclasses
+    itemsize = 0
+
+    def __init__(self, space):
+        self.space = space
+        self.len = 0
+        self.allocated = 0
+
+    # ---------- the primitives, implemented in the subclasses ----------
+
+    def setlen(self, newlen):
+        "Resizes the array, keeping the first items."
+        raise NotImplementedError
+
+    def item_w(self, index):
+        "Returns the wrapped item at the given index.  No bounds checks."
+        raise NotImplementedError
+
+    def setitem_w(self, index, w_item):
+        """Stores w_item at the given index, or raises an OperationError
+        without changing the array if it has not the right type."""
+        raise NotImplementedError
+
+    def charbuf(self):
+        "Returns the raw memory of the items as a CCHARP."
+        raise NotImplementedError
+
+    def new_array(self):
+        "Returns a new, empty array of the same typecode."
+        raise NotImplementedError
+
+    def copy_items(self, src, srcstart, srcstep, dststart, count):
+        """Copies 'count' items from 'src', an array of the same typecode,
+        to self.  The items read are srcstart + i * srcstep."""
+        raise NotImplementedError
+
+    def move_items(self, srcstart, dststart, count):
+        "Moves items within the array; the ranges may overlap."
+        raise NotImplementedError
+
+    def reverse(self):
+        raise NotImplementedError
+
+    def store_unicode(self, start, s):
+        raise NotImplementedError      # only for typecode 'u'
+
+    def load_unicode(self):
+        raise NotImplementedError      # only for typecode 'u'
+
+    # ---------- helpers ----------
+
+    def append_items_w(self, items_w):
+        # all or nothing: on a type error, the array is left unchanged
+        oldlen = self.len
+        self.setlen(oldlen + len(items_w))
+        try:
+            for i in range(len(items_w)):
+                self.setitem_w(oldlen + i, items_w[i])
+        except OperationError:
+            self.setlen(oldlen)
+            raise
+
+    def extend_from_array(self, other):
+        if other.typecode != self.typecode:
+            raise OperationError(self.space.w_TypeError, self.space.wrap(
+                "can only extend with array of same kind"))
+        oldlen = self.len
+        count = other.len      # may be self
+        self.setlen(oldlen + count)
+        self.copy_items(other, 0, 1, oldlen, count)
+
+    def extend(self, w_iterable):
+        space = self.space
+        other = space.interpclass_w(w_iterable)
+        if isinstance(other, W_ArrayBase):
+            self.extend_from_array(other)
+        else:
+            self.append_items_w(space.listview(w_iterable))
+
+    def fromstring(self, s):
+        itemsize = self.itemsize
+        if len(s) % itemsize != 0:
+            raise OperationError(self.space.w_ValueError, self.space.wrap(
+                "string length not a multiple of item size"))
+        oldlen = self.len
+        self.setlen(oldlen + len(s) // itemsize)
+        data = self.charbuf()
+        start = oldlen * itemsize
+        for i in range(len(s)):
+            data[start + i] = s[i]
+
+    def tostring(self):
+        if self.len == 0:
+            return ''
+        return rffi.charpsize2str(self.charbuf(), self.len * self.itemsize)
+
+    def check_unicode_array(self, funcname):
+        if self.typecode != 'u':
+            raise operationerrfmt(self.space.w_ValueError,
+                                  "%s() may only be called on type 'u' arrays",
+                                  funcname)
+
+    def getindex(self, w_index):
+        space = self.space
+        index = space.getindex_w(w_index, space.w_IndexError)
+        if index < 0:
+            index += self.len
+        return index
+
+    def copy(self):
+        result = self.new_array()
+        result.extend_from_array(self)
+        return result
+
+    # ---------- app-level interface ----------
+
+    def descr_get_typecode(space, self):
+        return space.wrap(self.typecode)
+
+    def descr_get_itemsize(space, self):
+        return space.wrap(self.itemsize)
+
+    def descr_len(self, space):
+        return space.wrap(self.len)
+    descr_len.unwrap_spec = ['self', ObjSpace]
+
+    def descr_getitem(self, space, w_index):
+        if space.is_true(space.isinstance(w_index, space.w_slice)):
+            start, step, slicelength = decode_slice(space, w_index, self.len)
+            result = self.new_array()
+            result.setlen(slicelength)
+            result.copy_items(self, start, step, 0, slicelength)
+            return space.wrap(result)
+        index = self.getindex(w_index)
+        if not (0 <= index < self.len):
+            raise OperationError(space.w_IndexError,
+                                 space.wrap("array index out of range"))
+        return self.item_w(index)
+    descr_getitem.unwrap_spec = ['self', ObjSpace, W_Root]
+
+    def descr_setitem(self, space, w_index, w_value):
+        if space.is_true(space.isinstance(w_index, space.w_slice)):
+            other = space.interpclass_w(w_value)
+            if (not isinstance(other, W_ArrayBase) or
+                    other.typecode != self.typecode):
+                raise OperationError(space.w_TypeError, space.wrap(
+                    "can only assign array of same kind to array slice"))
+            start, step, slicelength = decode_slice(space, w_index, self.len)
+            if other is self:
+                other = self.copy()
+            if step == 1:
+                count = other.len
+                oldlen = self.len
+                if count > slicelength:
+                    self.setlen(oldlen + count - slicelength)
+                self.move_items(start + slicelength, start + count,
+                                oldlen - start - slicelength)
+                if count < slicelength:
+                    self.setlen(oldlen + count - slicelength)
+                self.copy_items(other, 0, 1, start, count)
+            else:
+                if other.len != slicelength:
+                    raise operationerrfmt(space.w_ValueError,
+                        "attempt to assign array of size %d to extended "
+                        "slice of size %d", other.len, slicelength)
+                for i in range(slicelength):
+                    self.copy_items(other, i, 1, start + i * step, 1)
+            return
+        index = self.getindex(w_index)
+        if not (0 <= index < self.len):
+            raise OperationError(space.w_IndexError, space.wrap(
+                "array assignment index out of range"))
+        self.setitem_w(index, w_value)
+    descr_setitem.unwrap_spec = ['self', ObjSpace, W_Root, W_Root]
+
+    def descr_delitem(self, space, w_index):
+        if space.is_true(space.isinstance(w_index, space.w_slice)):
+            start, step, slicelength = decode_slice(space, w_index, self.len)
+            if slicelength == 0:
+                return
+            if step < 0:
+                start += step * (slicelength - 1)
+                step = -step
+            if step == 1:
+                self.move_items(start + slicelength, start,
+                                self.len - start - slicelength)
+                self.setlen(self.len - slicelength)
+                return
+            # extended slice: pack the items that are kept
+            dst = start
+            for i in range(start, self.len):
+                if (i - start) % step != 0 or i - start >= step * slicelength:
+                    self.move_items(i, dst, 1)
+                    dst += 1
+            self.setlen(dst)
+            return
+        index = self.getindex(w_index)
+        if not (0 <= index < self.len):
+            raise OperationError(space.w_IndexError, space.wrap(
+                "array assignment index out of range"))
+        self.move_items(index + 1, index, self.len - index - 1)
+        self.setlen(self.len - 1)
+    descr_delitem.unwrap_spec = ['self', ObjSpace, W_Root]
+
+    def descr_contains(self, space, w_item):
+        for i in range(self.len):
+            if space.eq_w(self.item_w(i), w_item):
+                return space.w_True
+        return space.w_False
+    descr_contains.unwrap_spec = ['self', ObjSpace, W_Root]
+
+    def descr_iter(self, space):
+        return space.wrap(W_ArrayIterator(self))
+    descr_iter.unwrap_spec = ['self', ObjSpace]
+
+    def descr_add(self, space, w_other):
+        other = space.interpclass_w(w_other)
+        if not isinstance(other, W_ArrayBase):
+            raise operationerrfmt(space.w_TypeError,
+                "can only append array (not \"%s\") to array",
+                space.type(w_other).getname(space, '?'))
+        if other.typecode != self.typecode:
+            raise OperationError(space.w_TypeError, space.wrap(
+                "bad argument type for built-in operation"))
+        result = self.copy()
+        result.extend_from_array(other)
+        return space.wrap(result)
+    descr_add.unwrap_spec = ['self', ObjSpace, W_Root]
+
+    def descr_inplace_add(self, space, w_other):
+        other = space.interpclass_w(w_other)
+        if not isinstance(other, W_ArrayBase):
+            raise operationerrfmt(space.w_TypeError,
+                "can only extend array with array (not \"%s\")",
+                space.type(w_other).getname(space, '?'))
+        self.extend_from_array(other)
+        return space.wrap(self)
+    descr_inplace_add.unwrap_spec = ['self', ObjSpace, W_Root]
+
+    def _repeat(self, space, w_times, result):
+        times = space.getindex_w(w_times, space.w_OverflowError)
+        oldlen = self.len
+        if times < 0:
+            times = 0
+        try:
+            newlen = ovfcheck(oldlen * times)
+        except OverflowError:
+            raise MemoryError
+        result.setlen(newlen)
+        for i in range(1, times):
+            result.copy_items(result, 0, 1, i * oldlen, oldlen)
+
+    def descr_mul(self, space, w_times):
+        result = self.copy()
+        self._repeat(space, w_times, result)
+        return space.wrap(result)
+    descr_mul.unwrap_spec = ['self', ObjSpace, W_Root]
+
+    def descr_inplace_mul(self, space, w_times):
+        self._repeat(space, w_times, self)
+        return space.wrap(self)
+    descr_inplace_mul.unwrap_spec = ['self', ObjSpace, W_Root]
+
+    def descr_repr(self, space):
+        if self.len == 0:
+            return space.wrap("array('%s')" % (self.typecode,))
+        if self.typecode == 'c':
+            w_items = space.wrap(self.tostring())
+        elif self.typecode == 'u':
+            w_items = space.wrap(self.load_unicode())
+        else:
+            w_items = self.descr_tolist(space)
+        return space.wrap("array('%s', %s)" % (
+            self.typecode, space.str_w(space.repr(w_items))))
+    descr_repr.unwrap_spec = ['self', ObjSpace]
+
+    def descr_reduce(self, space):
+        w_dict = space.findattr(space.wrap(self), space.wrap('__dict__'))
+        if w_dict is None:
+            w_dict = space.w_None
+        if self.len > 0:
+            w_args = space.newtuple([space.wrap(self.typecode),
+                                     space.wrap(self.tostring())])
+        else:
+            w_args = space.newtuple([space.wrap(self.typecode)])
+        return space.newtuple([space.type(space.wrap(self)), w_args, w_dict])
+    descr_reduce.unwrap_spec = ['self', ObjSpace]
+
+    def descr_copy(self, space):
+        return space.wrap(self.copy())
+    descr_copy.unwrap_spec = ['self', ObjSpace]
+
+    def descr_deepcopy(self, space, w_memo):
+        return space.wrap(self.copy())
+    descr_deepcopy.unwrap_spec = ['self', ObjSpace, W_Root]
+
+    def descr_buffer(self, space):
+        return space.wrap(ArrayBuffer(self))
+    descr_buffer.unwrap_spec = ['self', ObjSpace]
+
+    def descr_append(self, space, w_item):
+        self.append_items_w([w_item])
+    descr_append.unwrap_spec = ['self', ObjSpace, W_Root]
+
+    def descr_extend(self, space, w_iterable):
+        self.extend(w_iterable)
+    descr_extend.unwrap_spec = ['self', ObjSpace, W_Root]
+
+    def descr_insert(self, space, index, w_item):
+        oldlen = self.len
+        if index < 0:
+            index += oldlen
+            if index < 0:
+                index = 0
+        elif index > oldlen:
+            index = oldlen
+        self.setlen(oldlen + 1)
+        self.move_items(index, index + 1, oldlen - index)
+        try:
+            self.setitem_w(index, w_item)
+        except OperationError:
+            self.move_items(index + 1, index, oldlen - index)
+            self.setlen(oldlen)
+            raise
+    descr_insert.unwrap_spec = ['self', ObjSpace, int, W_Root]
+
+    def descr_pop(self, space, index=-1):
+        if self.len == 0:
+            raise OperationError(space.w_IndexError,
+                                 space.wrap("pop from empty array"))
+        if index < 0:
+            index += self.len
+        if not (0 <= index < self.len):
+            raise OperationError(space.w_IndexError,
+                                 space.wrap("pop index out of range"))
+        w_item = self.item_w(index)
+        self.move_items(index + 1, index, self.len - index - 1)
+        self.setlen(self.len - 1)
+        return w_item
+    descr_pop.unwrap_spec = ['self', ObjSpace, int]
+
+    def _find(self, w_item):
+        space = self.space
+        for i in range(self.len):
+            if space.eq_w(self.item_w(i), w_item):
+                return i
+        return -1
+
+    def descr_index(self, space, w_item):
+        index = self._find(w_item)
+        if index < 0:
+            raise OperationError(space.w_ValueError,
+                                 space.wrap("array.index(x): x not in list"))
+        return space.wrap(index)
+    descr_index.unwrap_spec = ['self', ObjSpace, W_Root]
+
+    def descr_remove(self, space, w_item):
+        index = self._find(w_item)
+        if index < 0:
+            raise OperationError(space.w_ValueError,
+                                 space.wrap("array.remove(x): x not in list"))
+        self.move_items(index + 1, index, self.len - index - 1)
+        self.setlen(self.len - 1)
+    descr_remove.unwrap_spec = ['self', ObjSpace, W_Root]
+
+    def descr_count(self, space, w_item):
+        count = 0
+        for i in range(self.len):
+            if space.eq_w(self.item_w(i), w_item):
+                count += 1
+        return space.wrap(count)
+    descr_count.unwrap_spec = ['self', ObjSpace, W_Root]
+
+    def descr_reverse(self, space):
+        self.reverse()
+    descr_reverse.unwrap_spec = ['self', ObjSpace]
+
+    def descr_byteswap(self, space):
+        itemsize = self.itemsize
+        data = self.charbuf()
+        for start in range(0, self.len * itemsize, itemsize):
+            i = start
+            j = start + itemsize - 1
+            while i < j:
+                c = data[i]
+                data[i] = data[j]
+                data[j] = c
+                i += 1
+                j -= 1
+    descr_byteswap.unwrap_spec = ['self', ObjSpace]
+
+    def descr_buffer_info(self, space):
+        address = rffi.cast(lltype.Signed, self.charbuf())
+        return space.newtuple([space.wrap(address), space.wrap(self.len)])
+    descr_buffer_info.unwrap_spec = ['self', ObjSpace]
+
+    def descr_tolist(self, space):
+        return space.newlist([self.item_w(i) for i in range(self.len)])
+    descr_tolist.unwrap_spec = ['self', ObjSpace]
+
+    def descr_fromlist(self, space, w_list):
+        if not space.is_true(space.isinstance(w_list, space.w_list)):
+            raise OperationError(space.w_TypeError,
+                                 space.wrap("arg must be list"))
+        self.append_items_w(space.listview(w_list))
+    descr_fromlist.unwrap_spec = ['self', ObjSpace, W_Root]
+
+    def descr_tostring(self, space):
+        return space.wrap(self.tostring())
+    descr_tostring.unwrap_spec = ['self', ObjSpace]
+
+    def descr_fromstring(self, space, s):
+        self.fromstring(s)
+    descr_fromstring.unwrap_spec = ['self', ObjSpace, 'bufferstr']
+
+    def descr_tounicode(self, space):
+        self.check_unicode_array('tounicode')
+        return space.wrap(self.load_unicode())
+    descr_tounicode.unwrap_spec = ['self', ObjSpace]
+
+    def descr_fromunicode(self, space, s):
+        self.check_unicode_array('fromunicode')
+        oldlen = self.len
+        self.setlen(oldlen + len(s))
+        self.store_unicode(oldlen, s)
+    descr_fromunicode.unwrap_spec = ['self', ObjSpace, unicode]
+
+    def descr_tofile(self, space, w_f):
+        space.call_method(w_f, 'write', space.wrap(self.tostring()))
+    descr_tofile.unwrap_spec = ['self', ObjSpace, W_Root]
+
+    def descr_fromfile(self, space, w_f, n):
+        if n < 0:
+            raise OperationError(space.w_ValueError,
+                                 space.wrap("negative count"))
+        try:
+            size = ovfcheck(n * self.itemsize)
+        except OverflowError:
+            raise MemoryError
+        w_data = space.call_method(w_f, 'read', space.wrap(size))
+        data = space.str_w(w_data)
+        # like CPython, keep the complete items that could be read
+        stop = len(data) - len(data) % self.itemsize
+        assert stop >= 0
+        self.fromstring(data[:stop])
+        if len(data) < size:
+            raise OperationError(space.w_EOFError,
+                                 space.wrap("not enough items in file"))
+    descr_fromfile.unwrap_spec = ['self', ObjSpace, W_Root, int]
+
+
+def _make_descr_cmp(name):
+    def descr_cmp(self, space, w_other):
+        other = space.interpclass_w(w_other)
+        if not isinstance(other, W_ArrayBase):
+            return space.w_NotImplemented
+        if (name == 'eq' or name == 'ne') and self.len != other.len:
+            return space.wrap(name == 'ne')
+        for i in range(min(self.len, other.len)):
+            w_item1 = self.item_w(i)
+            w_item2 = other.item_w(i)
+            if not space.eq_w(w_item1, w_item2):
+                return getattr(space, name)(w_item1, w_item2)
+        return space.wrap(getattr(operator, name)(self.len, other.len))
+    descr_cmp.unwrap_spec = ['self', ObjSpace, W_Root]
+    descr_cmp.func_name = 'descr_' + name
+    return descr_cmp
+
+W_ArrayBase.descr_eq = _make_descr_cmp('eq')
+W_ArrayBase.descr_ne = _make_descr_cmp('ne')
+W_ArrayBase.descr_lt = _make_descr_cmp('lt')
+W_ArrayBase.descr_le = _make_descr_cmp('le')
+W_ArrayBase.descr_gt = _make_descr_cmp('gt')
+W_ArrayBase.descr_ge = _make_descr_cmp('ge')
+
+
+class ArrayBuffer(RWBuffer):
+    """A view on the raw memory of an array.  It follows the array when
+    the latter is resized."""
+
+    def __init__(self, array):
+        self.array = array
+
+    def getlength(self):
+        return self.array.len * self.array.itemsize
+
+    def getitem(self, index):
+        return self.array.charbuf()[index]
+
+    def setitem(self, index, char):
+        self.array.charbuf()[index] = char
+
+    def getslice(self, start, stop):
+        if start == stop:
+            return ''
+        return rffi.charpsize2str(rffi.ptradd(self.array.charbuf(), start),
+                                  stop - start)
+
+    def setslice(self, start, string):
+        data = self.array.charbuf()
+        for i in range(len(string)):
+            data[start + i] = string[i]
+
+
+class W_ArrayIterator(Wrappable):
+
+    def __init__(self, array):
+        self.array = array
+        self.index = 0
+
+    def descr_iter(self, space):
+        return space.wrap(self)
+    descr_iter.unwrap_spec = ['self', ObjSpace]
+
+    def descr_next(self, space):
+        index = self.index
+        if index >= self.array.len:
+            raise OperationError(space.w_StopIteration, space.w_None)
+        self.index = index + 1
+        return self.array.item_w(index)
+    descr_next.unwrap_spec = ['self', ObjSpace]
+
+W_ArrayIterator.typedef = TypeDef(
+    'arrayiterator',
+    __iter__ = interp2app(W_ArrayIterator.descr_iter),
+    next     = interp2app(W_ArrayIterator.descr_next),
+)
+W_ArrayIterator.typedef.acceptable_as_base_class = False
+
+# ____________________________________________________________
+# the classes specialized for every typecode
+
+class TypeCode(object):
+    def __init__(self, typecode, T, name, signed=True):
+        self.typecode = typecode
+        self.T = T
+        self.name = name
+        self.itemsize = rffi.sizeof(T)
+        if T is lltype.Char:
+            self.kind = 'c'
+        elif T is lltype.UniChar:
+            self.kind = 'u'
+        elif T is lltype.Float or T is rffi.FLOAT:
+            self.kind = 'f'
+        elif self.itemsize < rffi.sizeof(lltype.Signed):
+            self.kind = 'i'     # range-checked integers fitting in a Signed
+            bits = self.itemsize * 8
+            if signed:
+                self.minval = -(1 << (bits - 1))
+                self.maxval = (1 << (bits - 1)) - 1
+            else:
+                self.minval = 0
+                self.maxval = (1 << bits) - 1
+        elif signed:
+            self.kind = 'l'     # exactly a Signed
+        else:
+            self.kind = 'L'     # exactly an Unsigned
+
+types = [
+    TypeCode('c', lltype.Char,       'character'),
+    TypeCode('b', rffi.SIGNEDCHAR,   'signed char'),
+    TypeCode('B', rffi.UCHAR,        'unsigned byte integer', signed=False),
+    TypeCode('u', lltype.UniChar,    'unicode character'),
+    TypeCode('h', rffi.SHORT,        'signed short integer'),
+    TypeCode('H', rffi.USHORT,       'unsigned short', signed=False),
+    TypeCode('i', rffi.INT,          'signed integer'),
+    TypeCode('I', rffi.UINT,         'unsigned int', signed=False),
+    TypeCode('l', lltype.Signed,     'signed long'),
+    TypeCode('L', lltype.Unsigned,   'unsigned long', signed=False),
+    TypeCode('f', rffi.FLOAT,        'float'),
+    TypeCode('d', lltype.Float,      'double'),
+]
+
+
+def make_array(mytype):
+    T = mytype.T
+    ARRAY = rffi.CArray(T)
+    kind = mytype.kind
+    maxlen = sys.maxint // mytype.itemsize
+
+    # the x86 backend reads the items of raw arrays either as bytes or
+    # as full words, zero-extended; the other item types are left out
+    # of the JIT (and single floats are not supported by it at all)
+    jit_visible = (T is lltype.Char or T is rffi.UCHAR or
+                   T is lltype.Float or
+                   (T is not rffi.FLOAT and
+                    mytype.itemsize == rffi.sizeof(lltype.Signed)))
+
+    if kind == 'c':
+        def unwrap_item(space, w_item):
+            s = space.str_w(w_item)
+            if len(s) != 1:
+                raise OperationError(space.w_TypeError,
+                                     space.wrap("array item must be char"))
+            return s[0]
+    elif kind == 'u':
+        def unwrap_item(space, w_item):
+            if space.is_true(space.isinstance(w_item, space.w_unicode)):
+                s = space.unicode_w(w_item)
+            else:
+                s = u''
+            if len(s) != 1:
+                raise OperationError(space.w_TypeError, space.wrap(
+                    "array item must be unicode character"))
+            return s[0]
+    elif kind == 'f':
+        def unwrap_item(space, w_item):
+            return rffi.cast(T, space.float_w(w_item))
+    elif kind == 'i':
+        minval = mytype.minval
+        maxval = mytype.maxval
+        def unwrap_item(space, w_item):
+            value = space.int_w(w_item)
+            if value < minval:
+                raise operationerrfmt(space.w_OverflowError,
+                                      "%s is less than minimum", mytype.name)
+            if value > maxval:
+                raise operationerrfmt(space.w_OverflowError,
+                                      "%s is greater than maximum",
+                                      mytype.name)
+            return rffi.cast(T, value)
+    elif kind == 'l':
+        def unwrap_item(space, w_item):
+            return space.int_w(w_item)
+    else:
+        def unwrap_item(space, w_item):
+            try:
+                return space.uint_w(w_item)
+            except OperationError, e:
+                if not e.match(space, space.w_ValueError):
+                    raise
+                raise operationerrfmt(space.w_OverflowError,
+                                      "%s is less than minimum", mytype.name)
+
+    if kind == 'i':
+        def wrap_item(space, item):
+            return space.wrap(rffi.cast(lltype.Signed, item))
+    elif kind == 'f':
+        def wrap_item(space, item):
+            return space.wrap(float(item))
+    else:
+        def wrap_item(space, item):
+            return space.wrap(item)
+
+    class W_Array(W_ArrayBase):
+        typecode = mytype.typecode
+        itemsize = mytype.itemsize
+
+        def __init__(self, space):
+            W_ArrayBase.__init__(self, space)
+            self.buffer = lltype.nullptr(ARRAY)
+
+        def __del__(self):
+            self.clear_all_weakrefs()
+            if self.buffer:
+                lltype.free(self.buffer, flavor='raw')
+
+        def setlen(self, newlen):
+            if newlen > self.allocated or newlen < (self.allocated >> 1):
+                if newlen > maxlen:
+                    raise MemoryError
+                allocated = newlen
+                if self.allocated < newlen < (maxlen >> 1):
+                    allocated += (newlen >> 3) + 6    # over-allocate
+                if allocated > 0:
+                    newbuffer = lltype.malloc(ARRAY, allocated, flavor='raw')
+                else:
+                    newbuffer = lltype.nullptr(ARRAY)
+                for i in range(min(self.len, newlen)):
+                    newbuffer[i] = self.buffer[i]
+                if self.buffer:
+                    lltype.free(self.buffer, flavor='raw')
+                self.buffer = newbuffer
+                self.allocated = allocated
+            self.len = newlen
+
+        def item_w(self, index):
+            return wrap_item(self.space, self.buffer[index])
+        if not jit_visible:
+            item_w = jit.dont_look_inside(item_w)
+
+        def setitem_w(self, index, w_item):
+            self.buffer[index] = unwrap_item(self.space, w_item)
+        if not jit_visible:
+            setitem_w = jit.dont_look_inside(setitem_w)
+
+        def charbuf(self):
+            return rffi.cast(rffi.CCHARP, self.buffer)
+
+        def new_array(self):
+            return W_Array(self.space)
+
+        def copy_items(self, src, srcstart, srcstep, dststart, count):
+            assert isinstance(src, W_Array)
+            srcbuffer = src.buffer
+            buffer = self.buffer
+            for i in range(count):
+                buffer[dststart + i] = srcbuffer[srcstart + i * srcstep]
+
+        def move_items(self, srcstart, dststart, count):
+            buffer = self.buffer
+            if dststart < srcstart:
+                for i in range(count):
+                    buffer[dststart + i] = buffer[srcstart + i]
+            else:
+                i = count - 1
+                while i >= 0:
+                    buffer[dststart + i] = buffer[srcstart + i]
+                    i -= 1
+
+        def reverse(self):
+            buffer = self.buffer
+            i = 0
+            j = self.len - 1
+            while i < j:
+                item = buffer[i]
+                buffer[i] = buffer[j]
+                buffer[j] = item
+                i += 1
+                j -= 1
+
+        if kind == 'u':
+            def store_unicode(self, start, s):
+                for i in range(len(s)):
+                    self.buffer[start + i] = s[i]
+
+            def load_unicode(self):
+                return u''.join([self.buffer[i] for i in range(self.len)])
+
+    W_Array.__name__ = 'W_Array_%s' % (mytype.typecode,)
+    mytype.w_class = W_Array
+
+for mytype in types:
+    make_array(mytype)
+
+unroll_typecodes = unrolling_iterable([(mytype.typecode, mytype.w_class)
+                                       for mytype in types])
+
+
+def allocate_array(space, w_subtype, typecode):
+    for tc, W_Array in unroll_typecodes:
+        if typecode == tc:
+            w_result = space.allocate_instance(W_Array, w_subtype)
+            a = space.interp_w(W_Array, w_result)
+            W_Array.__init__(a, space)
+            return a
+    raise OperationError(space.w_ValueError, space.wrap(
+        "bad typecode (must be c, b, B, u, h, H, i, I, l, L, f or d)"))
+
+def w_array(space, w_subtype, typecode, w_initializer=NoneNotWrapped):
+    if len(typecode) != 1:
+        raise OperationError(space.w_TypeError, space.wrap(
+            "array() argument 1 must be char, not str"))
+    a = allocate_array(space, w_subtype, typecode[0])
+    if w_initializer is not None:
+        if space.is_true(space.isinstance(w_initializer, space.w_str)):
+            a.fromstring(space.str_w(w_initializer))
+        elif (a.typecode == 'u' and
+              space.is_true(space.isinstance(w_initializer, space.w_unicode))):
+            s = space.unicode_w(w_initializer)
+            a.setlen(len(s))
+            a.store_unicode(0, s)
+        else:
+            other = space.interpclass_w(w_initializer)
+            if isinstance(other, W_ArrayBase) and other.typecode == typecode:
+                a.extend_from_array(other)
+            else:
+                a.append_items_w(space.listview(w_initializer))
+    return space.wrap(a)
+w_array.unwrap_spec = [ObjSpace, W_Root, str, W_Root]
+
+
+W_ArrayBase.typedef = TypeDef(
+    'array',
+    __doc__ = """array(typecode [, initializer]) -> array
+
+Return a new array whose items are restricted by typecode, and
+initialized from the optional initializer value, which must be a list,
+string or iterable over elements of the appropriate type.
+
+Arrays represent basic values and behave very much like lists, except
+the type of objects stored in them is constrained.""",
+    __module__ = 'array',
+    __new__ = interp2app(w_array),
+    __len__ = interp2app(W_ArrayBase.descr_len),
+    __getitem__ = interp2app(W_ArrayBase.descr_getitem),
+    __setitem__ = interp2app(W_ArrayBase.descr_setitem),
+    __delitem__ = interp2app(W_ArrayBase.descr_delitem),
+    __contains__ = interp2app(W_ArrayBase.descr_contains),
+    __iter__ = interp2app(W_ArrayBase.descr_iter),
+    __add__ = interp2app(W_ArrayBase.descr_add),
+    __iadd__ = interp2app(W_ArrayBase.descr_inplace_add),
+    __mul__ = interp2app(W_ArrayBase.descr_mul),
+    __rmul__ = interp2app(W_ArrayBase.descr_mul),
+    __imul__ = interp2app(W_ArrayBase.descr_inplace_mul),
+    __eq__ = interp2app(W_ArrayBase.descr_eq),
+    __ne__ = interp2app(W_ArrayBase.descr_ne),
+    __lt__ = interp2app(W_ArrayBase.descr_lt),
+    __le__ = interp2app(W_ArrayBase.descr_le),
+    __gt__ = interp2app(W_ArrayBase.descr_gt),
+    __ge__ = interp2app(W_ArrayBase.descr_ge),
+    __hash__ = no_hash_descr,
+    __repr__ = interp2app(W_ArrayBase.descr_repr),
+    __reduce__ = interp2app(W_ArrayBase.descr_reduce),
+    __copy__ = interp2app(W_ArrayBase.descr_copy),
+    __deepcopy__ = interp2app(W_ArrayBase.descr_deepcopy),
+    __buffer__ = interp2app(W_ArrayBase.descr_buffer),
+    __weakref__ = make_weakref_descr(W_ArrayBase),
+    typecode = GetSetProperty(W_ArrayBase.descr_get_typecode),
+    itemsize = GetSetProperty(W_ArrayBase.descr_get_itemsize),
+    append = interp2app(W_ArrayBase.descr_append),
+    buffer_info = interp2app(W_ArrayBase.descr_buffer_info),
+    byteswap = interp2app(W_ArrayBase.descr_byteswap),
+    count = interp2app(W_ArrayBase.descr_count),
+    extend = interp2app(W_ArrayBase.descr_extend),
+    fromfile = interp2app(W_ArrayBase.descr_fromfile),
+    fromlist = interp2app(W_ArrayBase.descr_fromlist),
+    fromstring = interp2app(W_ArrayBase.descr_fromstring),
+    fromunicode = interp2app(W_ArrayBase.descr_fromunicode),
+    index = interp2app(W_ArrayBase.descr_index),
+    insert = interp2app(W_ArrayBase.descr_insert),
+    pop = interp2app(W_ArrayBase.descr_pop),
+    read = interp2app(W_ArrayBase.descr_fromfile),
+    remove = interp2app(W_ArrayBase.descr_remove),
+    reverse = interp2app(W_ArrayBase.descr_reverse),
+    tofile = interp2app(W_ArrayBase.descr_tofile),
+    tolist = interp2app(W_ArrayBase.descr_tolist),
+    tostring = interp2app(W_ArrayBase.descr_tostring),
+    tounicode = interp2app(W_ArrayBase.descr_tounicode),
+    write = interp2app(W_ArrayBase.descr_tofile),
+)
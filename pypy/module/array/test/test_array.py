@@ -0,0 +1,298 @@
+from pypy.conftest import gettestobjspace
+from pypy.tool.udir import udir
+
+
+class AppTestArray:
+    def setup_class(cls):
+        cls.space = gettestobjspace(usemodules=('array', 'struct'))
+        cls.w_tmpname = cls.space.wrap(str(udir.join('test_array.data')))
+
+    def test_typecodes(self):
+        import array, struct
+        for tc in 'cbBuhHiIlLfd':
+            a = array.array(tc)
+            assert a.typecode == tc
+            assert len(a) == 0
+            if tc == 'u':
+                assert a.itemsize >= 2
+            else:
+                assert a.itemsize == struct.calcsize(tc)
+        raises(ValueError, array.array, 'x')
+        raises(TypeError, array.array, 'ii')
+        assert array.ArrayType is array.array
+        assert type(array.array('d')) is array.array
+
+    def test_initializer(self):
+        import array
+        assert array.array('i', [1, 2, 3]).tolist() == [1, 2, 3]
+        assert array.array('i', (1, 2, 3)).tolist() == [1, 2, 3]
+        assert array.array('i', iter([1, 2])).tolist() == [1, 2]
+        assert array.array('c', 'abc').tolist() == ['a', 'b', 'c']
+        assert array.array('u', u'ab').tolist() == [u'a', u'b']
+        a = array.array('i', [5, 6])
+        assert array.array('d', a).tolist() == [5.0, 6.0]
+        assert array.array('i', a.tostring()).tolist() == [5, 6]
+
+    def test_ranges(self):
+        import array
+        for tc, lo, hi in [('b', -128, 127), ('B', 0, 255),
+                           ('h', -32768, 32767), ('H', 0, 65535),
+                           ('i', -2**31, 2**31 - 1), ('I', 0, 2**32 - 1)]:
+            a = array.array(tc, [lo, hi])
+            assert a.tolist() == [lo, hi]
+            raises(OverflowError, a.append, lo - 1)
+            raises(OverflowError, a.append, hi + 1)
+            raises(TypeError, a.append, 1.5)
+            raises(TypeError, a.append, 'x')
+            assert a.tolist() == [lo, hi]
+        import sys
+        a = array.array('l', [sys.maxint, -sys.maxint - 1])
+        assert a.tolist() == [sys.maxint, -sys.maxint - 1]
+        raises(OverflowError, a.append, sys.maxint + 1)
+        a = array.array('L', [0, 2 * sys.maxint + 1])
+        assert a.tolist() == [0, 2 * sys.maxint + 1]
+        raises(OverflowError, a.append, -1)
+        raises(OverflowError, a.append, 2 * sys.maxint + 2)
+        raises(TypeError, array.array('c').append, 'ab')
+        raises(TypeError, array.array('c').append, 1)
+        raises(TypeError, array.array('u').append, 'a')
+        raises(TypeError, array.array('u').append, u'ab')
+
+    def test_floats(self):
+        import array
+        a = array.array('d', [1, 2.5, -1e300])
+        assert a.tolist() == [1.0, 2.5, -1e300]
+        a = array.array('f', [0.1, 2.5])
+        assert a[0] != 0.1 and abs(a[0] - 0.1) < 1e-6
+        assert a[1] == 2.5
+        raises(TypeError, a.append, 'x')
+
+    def test_list_methods(self):
+        import array
+        a = array.array('i')
+        for i in range(10):
+            a.append(i)
+        a.extend([10, 11])
+        a.extend(array.array('i', [12]))
+        raises(TypeError, a.extend, array.array('h', [13]))
+        assert a.tolist() == range(13)
+        a.insert(0, -1)
+        a.insert(-1, 100)
+        a.insert(1000, 200)
+        assert a.tolist() == [-1] + range(12) + [100, 12, 200]
+        raises(TypeError, a.insert, 0, 'x')
+        assert a.pop() == 200
+        assert a.pop(0) == -1
+        assert a.pop(-2) == 100
+        raises(IndexError, a.pop, 13)
+        assert a.index(5) == 5
+        raises(ValueError, a.index, 42)
+        a.remove(5)
+        raises(ValueError, a.remove, 5)
+        assert a.count(6) == 1
+        assert a.count(42) == 0
+        assert 6 in a
+        assert 5 not in a
+        a.reverse()
+        assert a.tolist() == [12, 11, 10, 9, 8, 7, 6, 4, 3, 2, 1, 0]
+        raises(IndexError, array.array('i').pop)
+        a.fromlist([1, 2])
+        raises(TypeError, a.fromlist, (1, 2))
+        raises(TypeError, a.fromlist, [1, 'x'])
+        assert a.tolist()[-3:] == [0, 1, 2]
+
+    def test_getitem_setitem(self):
+        import array
+        a = array.array('h', range(10))
+        assert a[0] == 0
+        assert a[-1] == 9
+        raises(IndexError, "a[10]")
+        raises(IndexError, "a[-11]")
+        a[3] = -7
+        a[-1] = 99
+        assert a[3] == -7 and a[9] == 99
+        raises(IndexError, "a[10] = 1")
+        raises(OverflowError, "a[0] = 2**20")
+        raises(TypeError, "a['x']")
+
+    def test_slices(self):
+        import array
+        a = array.array('i', range(10))
+        assert a[2:5] == array.array('i', [2, 3, 4])
+        assert a[::3].tolist() == [0, 3, 6, 9]
+        assert a[::-2].tolist() == [9, 7, 5, 3, 1]
+        assert a[5:2].tolist() == []
+        a[2:5] = array.array('i', [20, 30])
+        assert a.tolist() == [0, 1, 20, 30, 5, 6, 7, 8, 9]
+        a[1:2] = array.array('i', [10, 11, 12])
+        assert a.tolist() == [0, 10, 11, 12, 20, 30, 5, 6, 7, 8, 9]
+        a[::5] = array.array('i', [-1, -2, -3])
+        assert a.tolist() == [-1, 10, 11, 12, 20, -2, 5, 6, 7, 8, -3]
+        raises(ValueError, "a[::5] = array.array('i', [1])")
+        raises(TypeError, "a[1:2] = [1]")
+        raises(TypeError, "a[1:2] = array.array('h', [1])")
+        a[:] = a
+        assert len(a) == 11
+        a[3:] = a
+        assert a.tolist()[:3] == a.tolist()[3:6] == [-1, 10, 11]
+        del a[3:]
+        assert a.tolist() == [-1, 10, 11]
+        del a[0]
+        assert a.tolist() == [10, 11]
+        b = array.array('i', range(10))
+        del b[1::3]
+        assert b.tolist() == [0, 2, 3, 5, 6, 8, 9]
+        del b[::-2]
+        assert b.tolist() == [2, 5, 8]
+        del b[5:]
+        assert b.tolist() == [2, 5, 8]
+
+    def test_string_conversions(self):
+        import array, struct
+        a = array.array('h', [1, -2, 300])
+        s = a.tostring()
+        assert s == struct.pack('3h', 1, -2, 300)
+        b = array.array('h')
+        b.fromstring(s)
+        b.fromstring(buffer(s))
+        assert b.tolist() == [1, -2, 300] * 2
+        raises(ValueError, b.fromstring, 'abc')
+        c = array.array('c', 'hello')
+        assert c.tostring() == 'hello'
+        u = array.array('u', u'hi')
+        u.fromunicode(u'\u1234')
+        assert u.tounicode() == u'hi\u1234'
+        raises(ValueError, a.tounicode)
+        raises(ValueError, a.fromunicode, u'x')
+
+    def test_file(self):
+        import array
+        a = array.array('d', [1.5, 2.5, 3.5])
+        f = open(self.tmpname, 'wb')
+        a.tofile(f)
+        a.write(f)
+        f.close()
+        b = array.array('d')
+        f = open(self.tmpname, 'rb')
+        b.fromfile(f, 4)
+        raises(EOFError, b.fromfile, f, 3)
+        f.close()
+        assert b.tolist() == [1.5, 2.5, 3.5, 1.5, 2.5, 3.5]
+
+    def test_buffer(self):
+        import array, struct
+        a = array.array('i', [1, 2, 3])
+        buf = buffer(a)
+        assert len(buf) == 3 * a.itemsize
+        assert str(buf) == a.tostring()
+        assert struct.unpack_from('i', a, a.itemsize) == (2,)
+        struct.pack_into('i', a, 0, 42)
+        assert a[0] == 42
+        # the buffer follows the array when it grows
+        a.extend(range(100))
+        assert len(buf) == 103 * a.itemsize
+        assert buf[:a.itemsize] == struct.pack('i', 42)
+
+    def test_readinto(self):
+        import array
+        f = open(self.tmpname, 'wb')
+        f.write('abcdefgh')
+        f.close()
+        a = array.array('c', 'x' * 6)
+        f = open(self.tmpname, 'rb')
+        assert f.readinto(a) == 6
+        f.close()
+        assert a.tostring() == 'abcdef'
+
+    def test_byteswap(self):
+        import array
+        a = array.array('h', [1, 256])
+        a.byteswap()
+        assert a.tolist() == [256, 1]
+        a = array.array('i', [1])
+        a.byteswap()
+        assert a[0] == 1 << 24
+        a = array.array('d', [1.0])
+        a.byteswap()
+        a.byteswap()
+        assert a[0] == 1.0
+
+    def test_compare(self):
+        import array
+        a = array.array('i', [1, 2, 3])
+        assert a == array.array('i', [1, 2, 3])
+        assert a == array.array('d', [1.0, 2.0, 3.0])
+        assert a != array.array('i', [1, 2])
+        assert a < array.array('i', [1, 2, 4])
+        assert a > array.array('i', [1, 2])
+        assert a <= a and a >= a
+        assert not a == [1, 2, 3]
+        raises(TypeError, hash, a)
+
+    def test_add_mul(self):
+        import array
+        a = array.array('i', [1, 2])
+        assert (a + array.array('i', [3])).tolist() == [1, 2, 3]
+        raises(TypeError, "a + array.array('d', [3])")
+        raises(TypeError, "a + [3]")
+        assert (a * 3).tolist() == [1, 2] * 3
+        assert (2 * a).tolist() == [1, 2] * 2
+        assert (a * -1).tolist() == []
+        b = a
+        a += array.array('i', [3])
+        a *= 2
+        assert b is a
+        assert a.tolist() == [1, 2, 3, 1, 2, 3]
+        raises(TypeError, "a += [1]")
+
+    def test_iter(self):
+        import array
+        a = array.array('B', [1, 2, 3])
+        assert list(a) == [1, 2, 3]
+        it = iter(a)
+        assert it.next() == 1
+        assert [x for x in it] == [2, 3]
+
+    def test_repr(self):
+        import array
+        assert repr(array.array('i')) == "array('i')"
+        assert repr(array.array('i', [1, 2])) == "array('i', [1, 2])"
+        assert repr(array.array('c', 'ab')) == "array('c', 'ab')"
+        assert repr(array.array('u', u'ab')) == "array('u', u'ab')"
+
+    def test_copy_pickle(self):
+        import array, copy, pickle
+        a = array.array('d', [1.5, -3.0])
+        for b in [copy.copy(a), copy.deepcopy(a),
+                  pickle.loads(pickle.dumps(a))]:
+            assert b == a and b is not a
+            b.append(1)
+            assert len(a) == 2
+        assert pickle.loads(pickle.dumps(array.array('i'))) == \
+               array.array('i')
+
+    def test_buffer_info(self):
+        import array
+        a = array.array('l', range(10))
+        address, length = a.buffer_info()
+        assert address != 0
+        assert length == 10
+
+    def test_subclass(self):
+        import array
+        class A(array.array):
+            def total(self):
+                return sum(self)
+        a = A('i', [1, 2, 3])
+        assert isinstance(a, array.array)
+        assert type(a) is A
+        assert a.total() == 6
+        a.x = 5
+        a.append(4)
+        assert a.total() == 10
+
+    def test_weakref(self):
+        import array, weakref
+        a = array.array('i')
+        r = weakref.ref(a)
+        assert r() is a
@@ -0,0 +1,32 @@
+from pypy.interpreter.mixedmodule import MixedModule
+
+class Module(MixedModule):
+    """C implementation and optimization of the Python pickle module.
+
+This is an interp-level implementation of the pickle protocols 0, 1 and 2,
+producing the same data as the pure Python pickle module."""
+
+    appleveldefs = {
+        'PickleError':         'app_cpickle.PickleError',
+        'PicklingError':       'app_cpickle.PicklingError',
+        'UnpicklingError':     'app_cpickle.UnpicklingError',
+        'UnpickleableError':   'app_cpickle.UnpickleableError',
+        'BadPickleGet':        'app_cpickle.BadPickleGet',
+    }
+
+    interpleveldefs = {
+        'Pickler':             'interp_pickle.Pickler',
+        'Unpickler':           'interp_pickle.Unpickler',
+        'dump':                'interp_pickle.dump',
+        'dumps':               'interp_pickle.dumps',
+        'load':                'interp_pickle.load',
+        'loads':               'interp_pickle.loads',
+        'HIGHEST_PROTOCOL':    'space.wrap(2)',
+        'format_version':      'space.wrap("2.0")',
+        'compatible_formats':  'space.newlist([space.wrap("1.0"),'
+                                            ' space.wrap("1.1"),'
+                                            ' space.wrap("1.2"),'
+                                            ' space.wrap("1.3"),'
+                                            ' space.wrap("2.0")])',
+        '__version__':         'space.wrap("1.71")',
+    }
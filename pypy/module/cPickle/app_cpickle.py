@@ -0,0 +1,22 @@
+"""
+Application-level definitions for the cPickle module.
+
+NOT_RPYTHON
+"""
+
+class PickleError(Exception):
+    """A common base class for the other pickling exceptions."""
+
+class PicklingError(PickleError):
+    """This exception is raised when an unpicklable object is passed to the
+    dump() method."""
+
+class UnpicklingError(PickleError):
+    """This exception is raised when there is a problem unpickling an
+    object, such as a security violation."""
+
+class UnpickleableError(PicklingError):
+    pass
+
+class BadPickleGet(UnpicklingError):
+    pass
@@ -0,0 +1,1322 @@
+from pypy.interpreter import gateway
+from pypy.interpreter.baseobjspace import Wrappable
+from pypy.interpreter.error import OperationError
+from pypy.interpreter.gateway import interp2app, ObjSpace, W_Root
+from pypy.interpreter.typedef import TypeDef, GetSetProperty
+from pypy.interpreter.function import Function, BuiltinFunction
+from pypy.interpreter.module import Module
+from pypy.module.__builtin__.interp_classobj import W_ClassObject
+from pypy.module.__builtin__.interp_classobj import W_InstanceObject
+from pypy.module._codecs.interp_codecs import CodecState
+from pypy.module.cStringIO.interp_stringio import W_InputOutputType
+from pypy.rlib.rstring import StringBuilder
+from pypy.rlib.rstruct import ieee
+from pypy.rlib import runicode
+
+# the opcodes, see pickletools.py for their description
+MARK            = '('
+STOP            = '.'
+POP             = '0'
+POP_MARK        = '1'
+DUP             = '2'
+FLOAT           = 'F'
+INT             = 'I'
+BININT          = 'J'
+BININT1         = 'K'
+LONG            = 'L'
+BININT2         = 'M'
+NONE            = 'N'
+PERSID          = 'P'
+BINPERSID       = 'Q'
+REDUCE          = 'R'
+STRING          = 'S'
+BINSTRING       = 'T'
+SHORT_BINSTRING = 'U'
+UNICODE         = 'V'
+BINUNICODE      = 'X'
+APPEND          = 'a'
+BUILD           = 'b'
+GLOBAL          = 'c'
+DICT            = 'd'
+EMPTY_DICT      = '}'
+APPENDS         = 'e'
+GET             = 'g'
+BINGET          = 'h'
+INST            = 'i'
+LONG_BINGET     = 'j'
+LIST            = 'l'
+EMPTY_LIST      = ']'
+OBJ             = 'o'
+PUT             = 'p'
+BINPUT          = 'q'
+LONG_BINPUT     = 'r'
+SETITEM         = 's'
+TUPLE           = 't'
+EMPTY_TUPLE     = ')'
+SETITEMS        = 'u'
+BINFLOAT        = 'G'
+TRUE            = 'I01\n'
+FALSE           = 'I00\n'
+
+PROTO           = '\x80'
+NEWOBJ          = '\x81'
+EXT1            = '\x82'
+EXT2            = '\x83'
+EXT4            = '\x84'
+TUPLE1          = '\x85'
+TUPLE2          = '\x86'
+TUPLE3          = '\x87'
+NEWTRUE         = '\x88'
+NEWFALSE        = '\x89'
+LONG1           = '\x8a'
+LONG4           = '\x8b'
+
+HIGHEST_PROTOCOL = 2
+BATCHSIZE = 1000
+
+
+app = gateway.applevel(r'''
+    # NOT_RPYTHON  -- instantiate() needs real old-style classes
+    classmap = {}
+
+    def whichmodule(func, funcname):
+        """Figure out the module in which a function occurs: search
+        sys.modules for it, or return "__main__".
+        """
+        if func in classmap:
+            return classmap[func]
+        import sys
+        for name, module in sys.modules.items():
+            if module is None:
+                continue # skip dummy package entries
+            if name != '__main__' and getattr(module, funcname, None) is func:
+                break
+        else:
+            name = '__main__'
+        classmap[func] = name
+        return name
+
+    def encode_long(x):
+        """Encode a long to a two's complement little-endian binary string.
+        """
+        if x == 0:
+            return ''
+        if x > 0:
+            ashex = '%x' % x
+            if len(ashex) & 1:
+                ashex = '0' + ashex
+            elif int(ashex[0], 16) >= 8:
+                ashex = '00' + ashex
+        else:
+            nibbles = len('%x' % -x)
+            nibbles += nibbles & 1
+            ashex = '%x' % (x + (1L << (nibbles * 4)))
+            ashex = '0' * (nibbles - len(ashex)) + ashex
+            if int(ashex[0], 16) < 8:
+                ashex = 'ff' + ashex
+        bytes = [chr(int(ashex[i:i+2], 16)) for i in range(0, len(ashex), 2)]
+        bytes.reverse()
+        return ''.join(bytes)
+
+    def decode_long(data):
+        """Decode a long from a two's complement little-endian binary string.
+        """
+        if not data:
+            return 0L
+        ashex = ''.join(['%02x' % ord(c) for c in data[::-1]])
+        n = long(ashex, 16)
+        if data[-1] >= '\x80':
+            n -= 1L << (len(data) * 8)
+        return n
+
+    class _EmptyClass:
+        pass
+
+    def instantiate(klass, args):
+        if (not args and type(klass) is type(_EmptyClass) and
+                not hasattr(klass, "__getinitargs__")):
+            value = _EmptyClass()
+            value.__class__ = klass
+            return value
+        try:
+            return klass(*args)
+        except TypeError, err:
+            import sys
+            raise TypeError, "in constructor for %s: %s" % (
+                klass.__name__, str(err)), sys.exc_info()[2]
+''', filename=__file__)
+
+whichmodule = app.interphook('whichmodule')
+encode_long = app.interphook('encode_long')
+decode_long = app.interphook('decode_long')
+instantiate = app.interphook('instantiate')
+
+
+def pickle_error(space, name, msg):
+    w_module = space.getbuiltinmodule('cPickle')
+    w_error = space.getattr(w_module, space.wrap(name))
+    return OperationError(w_error, space.wrap(msg))
+
+def import_module(space, w_name):
+    w_modules = space.sys.get('modules')
+    w_module = space.finditem(w_modules, w_name)
+    if w_module is None:
+        w_import = space.builtin.get('__import__')
+        space.call_function(w_import, w_name)
+        w_module = space.getitem(w_modules, w_name)
+    return w_module
+
+def check_protocol(space, w_protocol):
+    if w_protocol is None or space.is_w(w_protocol, space.w_None):
+        return 0
+    protocol = space.int_w(w_protocol)
+    if protocol < 0:
+        return HIGHEST_PROTOCOL
+    if protocol > HIGHEST_PROTOCOL:
+        raise OperationError(space.w_ValueError, space.wrap(
+            "pickle protocol must be <= %d" % HIGHEST_PROTOCOL))
+    return protocol
+
+def pack_int4(x):
+    return (chr(x & 0xff) + chr((x >> 8) & 0xff) +
+            chr((x >> 16) & 0xff) + chr((x >> 24) & 0xff))
+
+def unpack_int4(s):
+    x = (ord(s[0]) | (ord(s[1]) << 8) | (ord(s[2]) << 16) |
+         (ord(s[3]) << 24))
+    if x >= 0x80000000:
+        x -= 0x100000000    # sign-extend on 64-bit machines
+    return x
+
+def _append_hex(builder, code, digits):
+    for i in range(digits - 1, -1, -1):
+        builder.append("0123456789abcdef"[(code >> (i * 4)) & 0xf])
+
+def raw_unicode_escape(u):
+    # like u.encode('raw-unicode-escape'), but also escaping the
+    # backslashes and the newlines, which protocol 0 cannot store
+    builder = StringBuilder(len(u))
+    for ch in u:
+        code = ord(ch)
+        if code >= 0x10000:
+            builder.append('\\U')
+            _append_hex(builder, code, 8)
+        elif code >= 0x100 or ch == u'\\' or ch == u'\n':
+            builder.append('\\u')
+            _append_hex(builder, code, 4)
+        else:
+            builder.append(chr(code))
+    return builder.build()
+
+
+class PickleCache(object):
+    """The types that the pickler dispatches on, and the tables of the
+    copy_reg module."""
+
+    def __init__(self, space):
+        self.space = space
+        self.w_NoneType = space.type(space.w_None)
+        self.w_InstanceType = space.gettypeobject(W_InstanceObject.typedef)
+        self.w_ClassType = space.gettypeobject(W_ClassObject.typedef)
+        self.w_FunctionType = space.gettypeobject(Function.typedef)
+        self.w_BuiltinFunctionType = space.gettypeobject(
+            BuiltinFunction.typedef)
+        self.w_copy_reg = None
+
+    def get_copy_reg(self, name):
+        space = self.space
+        if self.w_copy_reg is None:
+            self.w_copy_reg = import_module(space, space.wrap('copy_reg'))
+        return space.getattr(self.w_copy_reg, space.wrap(name))
+
+    def module_dicts(self):
+        # the dicts of the modules in sys.modules, which are pickled as
+        # getattr(module, '__dict__').  Rebuilt when the number of
+        # modules changes.
+        space = self.space
+        w_modules = space.sys.get('modules')
+        num_modules = space.int_w(space.len(w_modules))
+        if num_modules != self.num_modules:
+            module_dicts_w = {}
+            w_values = space.call_method(w_modules, 'values')
+            for w_module in space.listview(w_values):
+                module = space.interpclass_w(w_module)
+                if isinstance(module, Module):
+                    module_dicts_w[module.w_dict] = w_module
+            self.module_dicts_w = module_dicts_w
+            self.num_modules = num_modules
+        return self.module_dicts_w
+    num_modules = -1
+    module_dicts_w = None
+
+
+class W_Pickler(Wrappable):
+
+    def __init__(self, space, w_file, protocol):
+        self.space = space
+        self.cache = space.fromcache(PickleCache)
+        self.w_file = w_file       # or None: see getvalue()
+        self.proto = protocol
+        self.bin = protocol >= 1
+        self.fast = False
+        self.memo = {}             # {w_obj: memo index}
+        self.output = StringBuilder()
+        self.nesting = 0
+        self.w_persistent_id = None
+        self.w_inst_persistent_id = None
+
+    def write(self, s):
+        self.output.append(s)
+
+    def flush(self):
+        if self.w_file is not None:
+            data = self.output.build()
+            self.output = StringBuilder()
+            self.space.call_method(self.w_file, 'write', self.space.wrap(data))
+
+    def dump(self, w_obj):
+        if self.proto >= 2:
+            self.write(PROTO + chr(self.proto))
+        self.save(w_obj)
+        self.write(STOP)
+        self.flush()
+
+    def memoize(self, w_obj):
+        if self.fast:
+            return
+        index = len(self.memo)
+        self.write_put(index)
+        self.memo[w_obj] = index
+
+    def write_put(self, i):
+        if self.bin:
+            if i < 256:
+                self.write(BINPUT + chr(i))
+            else:
+                self.write(LONG_BINPUT + pack_int4(i))
+        else:
+            self.write(PUT + str(i) + '\n')
+
+    def write_get(self, i):
+        if self.bin:
+            if i < 256:
+                self.write(BINGET + chr(i))
+            else:
+                self.write(LONG_BINGET + pack_int4(i))
+        else:
+            self.write(GET + str(i) + '\n')
+
+    def save(self, w_obj):
+        space = self.space
+        self.nesting += 1
+        try:
+            if self.nesting > space.sys.recursionlimit:
+                raise OperationError(space.w_RuntimeError, space.wrap(
+                    "maximum recursion depth exceeded"))
+            self._save(w_obj)
+        finally:
+            self.nesting -= 1
+
+    def _save(self, w_obj):
+        space = self.space
+        cache = self.cache
+        if self.w_persistent_id is not None:
+            w_pid = space.call_function(self.w_persistent_id, w_obj)
+            if not space.is_w(w_pid, space.w_None):
+                self.save_pers(w_pid)
+                return
+        w_type = space.type(w_obj)
+        # these are never memoized
+        if space.is_w(w_type, cache.w_NoneType):
+            self.write(NONE)
+            return
+        if space.is_w(w_type, space.w_bool):
+            self.save_bool(space.is_true(w_obj))
+            return
+        if space.is_w(w_type, space.w_int):
+            self.save_int(space.int_w(w_obj))
+            return
+        if space.is_w(w_type, space.w_float):
+            self.save_float(w_obj)
+            return
+        # check the memo
+        index = self.memo.get(w_obj, -1)
+        if index >= 0:
+            self.write_get(index)
+            return
+        # dispatch on the exact type, like pickle.py
+        if space.is_w(w_type, space.w_str):
+            self.save_string(w_obj)
+        elif space.is_w(w_type, space.w_unicode):
+            self.save_unicode(w_obj)
+        elif space.is_w(w_type, space.w_tuple):
+            self.save_tuple(w_obj)
+        elif space.is_w(w_type, space.w_list):
+            self.save_list(w_obj)
+        elif space.is_w(w_type, space.w_dict):
+            self.save_dict(w_obj)
+        elif space.is_w(w_type, space.w_long):
+            self.save_long(w_obj)
+        elif space.is_w(w_type, cache.w_InstanceType):
+            self.save_inst(w_obj)
+        elif space.is_w(w_type, cache.w_FunctionType):
+            self.save_function(w_obj)
+        elif (space.is_w(w_type, cache.w_ClassType) or
+              space.is_w(w_type, cache.w_BuiltinFunctionType) or
+              space.is_true(space.issubtype(w_type, space.w_type))):
+            self.save_global(w_obj, None)
+        else:
+            if self.w_inst_persistent_id is not None:
+                w_pid = space.call_function(self.w_inst_persistent_id, w_obj)
+                if not space.is_w(w_pid, space.w_None):
+                    self.save_pers(w_pid)
+                    return
+            self.save_with_reduce(w_obj, w_type, None)
+
+    def save_with_reduce(self, w_obj, w_type, operr):
+        # 'operr' is the error to raise if there is no way to reduce w_obj
+        space = self.space
+        w_dispatch_table = self.cache.get_copy_reg('dispatch_table')
+        w_reduce = space.finditem(w_dispatch_table, w_type)
+        if w_reduce is not None:
+            w_rv = space.call_function(w_reduce, w_obj)
+        else:
+            w_reduce = space.findattr(w_obj, space.wrap('__reduce_ex__'))
+            if w_reduce is not None:
+                w_rv = space.call_function(w_reduce, space.wrap(self.proto))
+            else:
+                w_reduce = space.findattr(w_obj, space.wrap('__reduce__'))
+                if w_reduce is not None:
+                    w_rv = space.call_function(w_reduce)
+                elif operr is not None:
+                    raise operr
+                else:
+                    raise pickle_error(space, 'PicklingError',
+                        "Can't pickle %s object: %s" % (
+                            space.str_w(space.repr(space.getattr(w_type,
+                                                 space.wrap('__name__')))),
+                            space.str_w(space.repr(w_obj))))
+        w_rvtype = space.type(w_rv)
+        if space.is_w(w_rvtype, space.w_str):
+            self.save_global(w_obj, w_rv)
+            return
+        if not space.is_w(w_rvtype, space.w_tuple):
+            raise pickle_error(space, 'PicklingError',
+                               "%s must return string or tuple" %
+                               space.str_w(space.str(w_reduce)))
+        rv_w = space.fixedview(w_rv)
+        if not 2 <= len(rv_w) <= 5:
+            raise pickle_error(space, 'PicklingError',
+                               "Tuple returned by %s must have "
+                               "two to five elements" %
+                               space.str_w(space.str(w_reduce)))
+        self.save_reduce(rv_w, w_obj)
+
+    def save_pers(self, w_pid):
+        if self.bin:
+            self.save(w_pid)
+            self.write(BINPERSID)
+        else:
+            self.write(PERSID + self.space.str_w(self.space.str(w_pid)) +
+                       '\n')
+
+    def save_reduce(self, rv_w, w_obj):
+        space = self.space
+        w_func = rv_w[0]
+        w_args = rv_w[1]
+        w_state = w_listitems = w_dictitems = space.w_None
+        if len(rv_w) > 2:
+            w_state = rv_w[2]
+        if len(rv_w) > 3:
+            w_listitems = rv_w[3]
+        if len(rv_w) > 4:
+            w_dictitems = rv_w[4]
+        if not space.is_true(space.isinstance(w_args, space.w_tuple)):
+            raise pickle_error(space, 'PicklingError',
+                               "args from reduce() should be a tuple")
+        if not space.is_true(space.callable(w_func)):
+            raise pickle_error(space, 'PicklingError',
+                               "func from reduce should be callable")
+
+        w_name = space.findattr(w_func, space.wrap('__name__'))
+        if (self.proto >= 2 and w_name is not None and
+                space.eq_w(w_name, space.wrap('__newobj__'))):
+            # protocol 2 special case: use NEWOBJ to call
+            # cls.__new__(cls, *args) at unpickling time
+            args_w = space.fixedview(w_args)
+            if len(args_w) == 0:
+                raise pickle_error(space, 'PicklingError',
+                    "__newobj__ arglist is empty")
+            w_cls = args_w[0]
+            if space.findattr(w_cls, space.wrap('__new__')) is None:
+                raise pickle_error(space, 'PicklingError',
+                    "args[0] from __newobj__ args has no __new__")
+            if w_obj is not None and not space.is_w(w_cls,
+                    space.getattr(w_obj, space.wrap('__class__'))):
+                raise pickle_error(space, 'PicklingError',
+                    "args[0] from __newobj__ args has the wrong class")
+            self.save(w_cls)
+            self.save(space.newtuple(args_w[1:]))
+            self.write(NEWOBJ)
+        else:
+            self.save(w_func)
+            self.save(w_args)
+            self.write(REDUCE)
+
+        if w_obj is not None:
+            self.memoize(w_obj)
+
+        if not space.is_w(w_listitems, space.w_None):
+            self.batch_appends(w_listitems)
+        if not space.is_w(w_dictitems, space.w_None):
+            self.batch_setitems(w_dictitems)
+        if not space.is_w(w_state, space.w_None):
+            self.save(w_state)
+            self.write(BUILD)
+
+    def save_bool(self, value):
+        if self.proto >= 2:
+            if value:
+                self.write(NEWTRUE)
+            else:
+                self.write(NEWFALSE)
+        else:
+            if value:
+                self.write(TRUE)
+            else:
+                self.write(FALSE)
+
+    def save_int(self, x):
+        if self.bin:
+            if x >= 0:
+                if x <= 0xff:
+                    self.write(BININT1 + chr(x))
+                    return
+                if x <= 0xffff:
+                    self.write(BININT2 + chr(x & 0xff) + chr(x >> 8))
+                    return
+            high_bits = x >> 31
+            if high_bits == 0 or high_bits == -1:
+                # fits in a 4-byte signed int
+                self.write(BININT + pack_int4(x))
+                return
+        self.write(INT + str(x) + '\n')
+
+    def save_long(self, w_obj):
+        space = self.space
+        if self.proto >= 2:
+            bytes = space.str_w(encode_long(space, w_obj))
+            n = len(bytes)
+            if n < 256:
+                self.write(LONG1 + chr(n))
+            else:
+                self.write(LONG4 + pack_int4(n))
+            self.write(bytes)
+        else:
+            self.write(LONG + space.str_w(space.repr(w_obj)) + '\n')
+
+    def save_float(self, w_obj):
+        space = self.space
+        if self.bin:
+            result = []
+            ieee.pack_float(result, space.float_w(w_obj), 8, True)
+            self.write(BINFLOAT + ''.join(result))
+        else:
+            self.write(FLOAT + space.str_w(space.repr(w_obj)) + '\n')
+
+    def save_string(self, w_obj):
+        space = self.space
+        if self.bin:
+            s = space.str_w(w_obj)
+            n = len(s)
+            if n < 256:
+                self.write(SHORT_BINSTRING + chr(n))
+            else:
+                self.write(BINSTRING + pack_int4(n))
+            self.write(s)
+        else:
+            self.write(STRING + space.str_w(space.repr(w_obj)) + '\n')
+        self.memoize(w_obj)
+
+    def save_unicode(self, w_obj):
+        space = self.space
+        u = space.unicode_w(w_obj)
+        if self.bin:
+            state = space.fromcache(CodecState)
+            s = runicode.unicode_encode_utf_8(u, len(u), 'strict',
+                    errorhandler=state.encode_error_handler)
+            self.write(BINUNICODE + pack_int4(len(s)))
+            self.write(s)
+        else:
+            self.write(UNICODE + raw_unicode_escape(u) + '\n')
+        self.memoize(w_obj)
+
+    def save_tuple(self, w_obj):
+        items_w = self.space.fixedview(w_obj)
+        n = len(items_w)
+        if n == 0:
+            if self.proto:
+                self.write(EMPTY_TUPLE)
+            else:
+                self.write(MARK + TUPLE)
+            return
+        if n <= 3 and self.proto >= 2:
+            for w_item in items_w:
+                self.save(w_item)
+            index = self.memo.get(w_obj, -1)
+            if index >= 0:
+                # the tuple is recursive: it was built by saving its items
+                for i in range(n):
+                    self.write(POP)
+                self.write_get(index)
+            else:
+                if n == 1:
+                    self.write(TUPLE1)
+                elif n == 2:
+                    self.write(TUPLE2)
+                else:
+                    self.write(TUPLE3)
+                self.memoize(w_obj)
+            return
+        self.write(MARK)
+        for w_item in items_w:
+            self.save(w_item)
+        index = self.memo.get(w_obj, -1)
+        if index >= 0:
+            # the tuple is recursive, see above
+            if self.proto:
+                self.write(POP_MARK)
+            else:
+                for i in range(n + 1):
+                    self.write(POP)
+            self.write_get(index)
+            return
+        self.write(TUPLE)
+        self.memoize(w_obj)
+
+    def save_list(self, w_obj):
+        if self.bin:
+            self.write(EMPTY_LIST)
+        else:
+            self.write(MARK + LIST)
+        self.memoize(w_obj)
+        items_w = self.space.listview(w_obj)
+        if not self.bin:
+            for w_item in items_w:
+                self.save(w_item)
+                self.write(APPEND)
+            return
+        start = 0
+        while start < len(items_w):
+            stop = min(start + BATCHSIZE, len(items_w))
+            if stop - start > 1:
+                self.write(MARK)
+                for i in range(start, stop):
+                    self.save(items_w[i])
+                self.write(APPENDS)
+            else:
+                self.save(items_w[start])
+                self.write(APPEND)
+            start = stop
+
+    def save_dict(self, w_obj):
+        space = self.space
+        w_module = self.cache.module_dicts().get(w_obj, None)
+        if w_module is not None:
+            # PyPy extension: module dicts are pickled by reference
+            self.save_reduce([space.builtin.get('getattr'),
+                              space.newtuple([w_module,
+                                              space.wrap('__dict__')])],
+                             None)
+            return
+        if self.bin:
+            self.write(EMPTY_DICT)
+        else:
+            self.write(MARK + DICT)
+        self.memoize(w_obj)
+        self.batch_setitems(space.call_method(w_obj, 'iteritems'))
+
+    def _next_batch(self, w_iter):
+        space = self.space
+        batch_w = []
+        while len(batch_w) < BATCHSIZE:
+            try:
+                w_item = space.next(w_iter)
+            except OperationError, e:
+                if not e.match(space, space.w_StopIteration):
+                    raise
+                break
+            batch_w.append(w_item)
+        return batch_w
+
+    def batch_appends(self, w_items):
+        # the listitems of a reduce() result: an iterator over the items
+        space = self.space
+        w_iter = space.iter(w_items)
+        while True:
+            batch_w = self._next_batch(w_iter)
+            if not self.bin:
+                for w_item in batch_w:
+                    self.save(w_item)
+                    self.write(APPEND)
+            elif len(batch_w) > 1:
+                self.write(MARK)
+                for w_item in batch_w:
+                    self.save(w_item)
+                self.write(APPENDS)
+            elif len(batch_w) == 1:
+                self.save(batch_w[0])
+                self.write(APPEND)
+            if len(batch_w) < BATCHSIZE:
+                break
+
+    def batch_setitems(self, w_items):
+        # an iterator over (key, value) pairs
+        space = self.space
+        w_iter = space.iter(w_items)
+        while True:
+            batch_w = self._next_batch(w_iter)
+            if not self.bin:
+                for w_item in batch_w:
+                    self.save_item(w_item)
+                    self.write(SETITEM)
+            elif len(batch_w) > 1:
+                self.write(MARK)
+                for w_item in batch_w:
+                    self.save_item(w_item)
+                self.write(SETITEMS)
+            elif len(batch_w) == 1:
+                self.save_item(batch_w[0])
+                self.write(SETITEM)
+            if len(batch_w) < BATCHSIZE:
+                break
+
+    def save_item(self, w_item):
+        w_key, w_value = self.space.fixedview(w_item, 2)
+        self.save(w_key)
+        self.save(w_value)
+
+    def save_inst(self, w_obj):
+        space = self.space
+        w_cls = space.getattr(w_obj, space.wrap('__class__'))
+        w_getinitargs = space.findattr(w_obj, space.wrap('__getinitargs__'))
+        if w_getinitargs is not None:
+            args_w = space.listview(space.call_function(w_getinitargs))
+        else:
+            args_w = []
+        self.write(MARK)
+        if self.bin:
+            self.save(w_cls)
+            for w_arg in args_w:
+                self.save(w_arg)
+            self.write(OBJ)
+        else:
+            for w_arg in args_w:
+                self.save(w_arg)
+            w_module = space.getattr(w_cls, space.wrap('__module__'))
+            w_name = space.getattr(w_cls, space.wrap('__name__'))
+            self.write(INST + space.str_w(w_module) + '\n' +
+                       space.str_w(w_name) + '\n')
+        self.memoize(w_obj)
+        w_getstate = space.findattr(w_obj, space.wrap('__getstate__'))
+        if w_getstate is not None:
+            w_state = space.call_function(w_getstate)
+        else:
+            w_state = space.getattr(w_obj, space.wrap('__dict__'))
+        self.save(w_state)
+        self.write(BUILD)
+
+    def save_global(self, w_obj, w_name):
+        space = self.space
+        if w_name is None:
+            w_name = space.getattr(w_obj, space.wrap('__name__'))
+        name = space.str_w(w_name)
+        w_module = space.findattr(w_obj, space.wrap('__module__'))
+        if w_module is None or space.is_w(w_module, space.w_None):
+            w_module = whichmodule(space, w_obj, w_name)
+        module = space.str_w(w_module)
+        try:
+            w_mod = import_module(space, w_module)
+            w_klass = space.getattr(w_mod, w_name)
+        except OperationError, e:
+            if not (e.match(space, space.w_ImportError) or
+                    e.match(space, space.w_KeyError) or
+                    e.match(space, space.w_AttributeError)):
+                raise
+            raise pickle_error(space, 'PicklingError',
+                               "Can't pickle %s: it's not found as %s.%s" %
+                               (space.str_w(space.repr(w_obj)), module, name))
+        if not space.is_w(w_klass, w_obj):
+            raise pickle_error(space, 'PicklingError',
+                               "Can't pickle %s: it's not the same object "
+                               "as %s.%s" %
+                               (space.str_w(space.repr(w_obj)), module, name))
+        if self.proto >= 2:
+            w_registry = self.cache.get_copy_reg('_extension_registry')
+            w_code = space.finditem(w_registry,
+                                    space.newtuple([w_module, w_name]))
+            if w_code is not None:
+                code = space.int_w(w_code)
+                if code <= 0xff:
+                    self.write(EXT1 + chr(code))
+                elif code <= 0xffff:
+                    self.write(EXT2 + chr(code & 0xff) + chr(code >> 8))
+                else:
+                    self.write(EXT4 + pack_int4(code))
+                return
+        self.write(GLOBAL + module + '\n' + name + '\n')
+        self.memoize(w_obj)
+
+    def save_function(self, w_obj):
+        # functions that are not found as globals are pickled by
+        # reduce(), which PyPy supports for them
+        space = self.space
+        try:
+            self.save_global(w_obj, None)
+        except OperationError, e:
+            w_error = space.getattr(space.getbuiltinmodule('cPickle'),
+                                    space.wrap('PicklingError'))
+            if not e.match(space, w_error):
+                raise
+            self.save_with_reduce(w_obj, space.type(w_obj), e)
+
+    # ____________________________________________________________
+    # app-level interface
+
+    def descr_dump(self, w_obj):
+        self.dump(w_obj)
+        return self
+    descr_dump.unwrap_spec = ['self', W_Root]
+
+    def descr_clear_memo(self):
+        self.memo.clear()
+    descr_clear_memo.unwrap_spec = ['self']
+
+    def descr_getvalue(self):
+        data = self.output.build()
+        self.output = StringBuilder()
+        return self.space.wrap(data)
+    descr_getvalue.unwrap_spec = ['self']
+
+
+def descr_get_persistent_id(space, self):
+    if self.w_persistent_id is None:
+        raise OperationError(space.w_AttributeError,
+                             space.wrap("persistent_id"))
+    return self.w_persistent_id
+
+def descr_set_persistent_id(space, self, w_value):
+    self.w_persistent_id = w_value
+
+def descr_get_inst_persistent_id(space, self):
+    if self.w_inst_persistent_id is None:
+        raise OperationError(space.w_AttributeError,
+                             space.wrap("inst_persistent_id"))
+    return self.w_inst_persistent_id
+
+def descr_set_inst_persistent_id(space, self, w_value):
+    self.w_inst_persistent_id = w_value
+
+def descr_get_fast(space, self):
+    return space.wrap(self.fast)
+
+def descr_set_fast(space, self, w_value):
+    self.fast = space.is_true(w_value)
+
+def descr_get_binary(space, self):
+    return space.wrap(self.bin)
+
+W_Pickler.typedef = TypeDef(
+    'Pickler',
+    dump = interp2app(W_Pickler.descr_dump),
+    clear_memo = interp2app(W_Pickler.descr_clear_memo),
+    getvalue = interp2app(W_Pickler.descr_getvalue),
+    persistent_id = GetSetProperty(descr_get_persistent_id,
+                                   descr_set_persistent_id, cls=W_Pickler),
+    inst_persistent_id = GetSetProperty(descr_get_inst_persistent_id,
+                                        descr_set_inst_persistent_id,
+                                        cls=W_Pickler),
+    fast = GetSetProperty(descr_get_fast, descr_set_fast, cls=W_Pickler),
+    binary = GetSetProperty(descr_get_binary, cls=W_Pickler),
+)
+W_Pickler.typedef.acceptable_as_base_class = False
+
+# ____________________________________________________________
+
+class W_Unpickler(Wrappable):
+
+    def __init__(self, space, w_file, data):
+        self.space = space
+        self.cache = space.fromcache(PickleCache)
+        # either read from the string 'data', or from the file w_file
+        self.w_file = w_file
+        self.stringio = None
+        if w_file is not None:
+            stringio = space.interpclass_w(w_file)
+            if isinstance(stringio, W_InputOutputType):
+                self.stringio = stringio
+        self.data = data
+        self.pos = 0
+        self.memo = {}             # {memo index: w_obj}
+        self.stack_w = []
+        self.marks = []            # positions of the MARKs in stack_w
+        self.w_persistent_load = None
+        self.w_find_global = None
+
+    def raise_eof(self):
+        raise OperationError(self.space.w_EOFError, self.space.w_None)
+
+    def read(self, n):
+        if self.w_file is None:
+            start = self.pos
+            stop = start + n
+            if stop > len(self.data):
+                self.raise_eof()
+            self.pos = stop
+            return self.data[start:stop]
+        if self.stringio is not None:
+            self.stringio.check_closed()
+            data = self.stringio.read(n)
+        else:
+            w_data = self.space.call_method(self.w_file, 'read',
+                                            self.space.wrap(n))
+            data = self.space.str_w(w_data)
+        if len(data) < n:
+            self.raise_eof()
+        return data
+
+    def read1(self):
+        if self.w_file is None:
+            pos = self.pos
+            if pos >= len(self.data):
+                self.raise_eof()
+            self.pos = pos + 1
+            return self.data[pos]
+        return self.read(1)[0]
+
+    def readline(self):
+        # returns the line without its final '\n'
+        if self.w_file is None:
+            start = self.pos
+            stop = self.data.find('\n', start)
+            if stop < 0:
+                self.raise_eof()
+            self.pos = stop + 1
+            return self.data[start:stop]
+        if self.stringio is not None:
+            self.stringio.check_closed()
+            line = self.stringio.readline(-1)
+        else:
+            line = self.space.str_w(self.space.call_method(self.w_file,
+                                                           'readline'))
+        if not line.endswith('\n'):
+            self.raise_eof()
+        stop = len(line) - 1
+        assert stop >= 0
+        return line[:stop]
+
+    def read_int4(self):
+        return unpack_int4(self.read(4))
+
+    # ____________________________________________________________
+
+    def push(self, w_obj):
+        self.stack_w.append(w_obj)
+
+    def pop(self):
+        if len(self.stack_w) <= self.top_mark():
+            raise pickle_error(self.space, 'UnpicklingError',
+                               "unpickling stack underflow")
+        return self.stack_w.pop()
+
+    def top(self):
+        if len(self.stack_w) <= self.top_mark():
+            raise pickle_error(self.space, 'UnpicklingError',
+                               "unpickling stack underflow")
+        return self.stack_w[-1]
+
+    def top_mark(self):
+        if self.marks:
+            return self.marks[-1]
+        return 0
+
+    def _new_pop_mark():
+        def pop_mark(self):
+            # returns the items pushed after the last MARK, and removes them
+            if not self.marks:
+                raise pickle_error(self.space, 'UnpicklingError',
+                                   "could not find MARK")
+            k = self.marks.pop()
+            items_w = [None] * (len(self.stack_w) - k)
+            for i in range(len(items_w)):
+                items_w[i] = self.stack_w[k + i]
+            del self.stack_w[k:]
+            return items_w
+        return pop_mark
+    pop_mark = _new_pop_mark()
+    pop_mark_mutable = _new_pop_mark()    # for space.newlist()
+
+    def load(self):
+        space = self.space
+        self.stack_w = []
+        self.marks = []
+        while True:
+            op = self.read1()
+            if op == STOP:
+                break
+            self.dispatch(op)
+        w_result = self.pop()
+        if self.marks or self.stack_w:
+            raise pickle_error(space, 'UnpicklingError',
+                               "unpickling stack not empty at STOP")
+        return w_result
+
+    def dispatch(self, op):
+        space = self.space
+        if op == MARK:
+            self.marks.append(len(self.stack_w))
+        elif op == NONE:
+            self.push(space.w_None)
+        elif op == BININT:
+            self.push(space.wrap(self.read_int4()))
+        elif op == BININT1:
+            self.push(space.wrap(ord(self.read1())))
+        elif op == BININT2:
+            s = self.read(2)
+            self.push(space.wrap(ord(s[0]) | (ord(s[1]) << 8)))
+        elif op == INT:
+            self.load_int()
+        elif op == NEWTRUE:
+            self.push(space.w_True)
+        elif op == NEWFALSE:
+            self.push(space.w_False)
+        elif op == LONG:
+            self.push(space.call_function(space.w_long,
+                                          space.wrap(self.readline()),
+                                          space.wrap(0)))
+        elif op == LONG1:
+            n = ord(self.read1())
+            self.push(decode_long(space, space.wrap(self.read(n))))
+        elif op == LONG4:
+            n = self.read_int4()
+            if n < 0:
+                raise pickle_error(space, 'UnpicklingError',
+                                   "LONG pickle has negative byte count")
+            self.push(decode_long(space, space.wrap(self.read(n))))
+        elif op == FLOAT:
+            self.push(space.call_function(space.w_float,
+                                          space.wrap(self.readline())))
+        elif op == BINFLOAT:
+            self.push(space.wrap(ieee.unpack_float(self.read(8), True)))
+        elif op == SHORT_BINSTRING:
+            n = ord(self.read1())
+            self.push(space.wrap(self.read(n)))
+        elif op == BINSTRING:
+            n = self.read_int4()
+            if n < 0:
+                raise pickle_error(space, 'UnpicklingError',
+                                   "BINSTRING pickle has negative byte count")
+            self.push(space.wrap(self.read(n)))
+        elif op == STRING:
+            self.load_string()
+        elif op == BINUNICODE:
+            n = self.read_int4()
+            if n < 0:
+                raise pickle_error(space, 'UnpicklingError',
+                                   "BINUNICODE pickle has negative length")
+            s = self.read(n)
+            state = space.fromcache(CodecState)
+            u, _ = runicode.str_decode_utf_8(s, len(s), 'strict', True,
+                                             state.decode_error_handler)
+            self.push(space.wrap(u))
+        elif op == UNICODE:
+            self.push(space.call_method(space.wrap(self.readline()),
+                                        'decode',
+                                        space.wrap('raw-unicode-escape')))
+        elif op == EMPTY_TUPLE:
+            self.push(space.newtuple([]))
+        elif op == TUPLE1:
+            w_1 = self.pop()
+            self.push(space.newtuple([w_1]))
+        elif op == TUPLE2:
+            w_2 = self.pop()
+            w_1 = self.pop()
+            self.push(space.newtuple([w_1, w_2]))
+        elif op == TUPLE3:
+            w_3 = self.pop()
+            w_2 = self.pop()
+            w_1 = self.pop()
+            self.push(space.newtuple([w_1, w_2, w_3]))
+        elif op == TUPLE:
+            self.push(space.newtuple(self.pop_mark()))
+        elif op == EMPTY_LIST:
+            self.push(space.newlist([]))
+        elif op == LIST:
+            self.push(space.newlist(self.pop_mark_mutable()))
+        elif op == EMPTY_DICT:
+            self.push(space.newdict())
+        elif op == DICT:
+            items_w = self.pop_mark()
+            w_dict = space.newdict()
+            for i in range(0, len(items_w) - 1, 2):
+                space.setitem(w_dict, items_w[i], items_w[i + 1])
+            self.push(w_dict)
+        elif op == APPEND:
+            w_value = self.pop()
+            space.call_method(self.top(), 'append', w_value)
+        elif op == APPENDS:
+            items_w = self.pop_mark_mutable()
+            space.call_method(self.top(), 'extend', space.newlist(items_w))
+        elif op == SETITEM:
+            w_value = self.pop()
+            w_key = self.pop()
+            space.setitem(self.top(), w_key, w_value)
+        elif op == SETITEMS:
+            items_w = self.pop_mark()
+            w_dict = self.top()
+            for i in range(0, len(items_w) - 1, 2):
+                space.setitem(w_dict, items_w[i], items_w[i + 1])
+        elif op == PUT:
+            self.memo[self.memo_key(self.readline())] = self.top()
+        elif op == BINPUT:
+            self.memo[ord(self.read1())] = self.top()
+        elif op == LONG_BINPUT:
+            self.memo[self.read_int4()] = self.top()
+        elif op == GET:
+            self.load_get(self.memo_key(self.readline()))
+        elif op == BINGET:
+            self.load_get(ord(self.read1()))
+        elif op == LONG_BINGET:
+            self.load_get(self.read_int4())
+        elif op == POP:
+            if len(self.stack_w) > self.top_mark():
+                self.stack_w.pop()
+            else:
+                self.pop_mark()    # pops the MARK itself
+        elif op == POP_MARK:
+            self.pop_mark()
+        elif op == DUP:
+            self.push(self.top())
+        elif op == GLOBAL:
+            module = self.readline()
+            name = self.readline()
+            self.push(self.find_class(module, name))
+        elif op == EXT1:
+            self.load_ext(ord(self.read1()))
+        elif op == EXT2:
+            s = self.read(2)
+            self.load_ext(ord(s[0]) | (ord(s[1]) << 8))
+        elif op == EXT4:
+            self.load_ext(self.read_int4())
+        elif op == REDUCE:
+            w_args = self.pop()
+            w_func = self.pop()
+            self.push(space.call(w_func, w_args))
+        elif op == NEWOBJ:
+            w_args = self.pop()
+            w_cls = self.pop()
+            w_new = space.getattr(w_cls, space.wrap('__new__'))
+            args_w = [w_cls] + space.fixedview(w_args)
+            self.push(space.call(w_new, space.newtuple(args_w)))
+        elif op == INST:
+            module = self.readline()
+            name = self.readline()
+            w_klass = self.find_class(module, name)
+            args_w = self.pop_mark()
+            self.push(instantiate(space, w_klass, space.newtuple(args_w)))
+        elif op == OBJ:
+            args_w = self.pop_mark()
+            if len(args_w) == 0:
+                raise pickle_error(space, 'UnpicklingError',
+                                   "OBJ without a class")
+            w_klass = args_w[0]
+            w_args = space.newtuple(args_w[1:])
+            self.push(instantiate(space, w_klass, w_args))
+        elif op == BUILD:
+            w_state = self.pop()
+            self.load_build(self.top(), w_state)
+        elif op == PERSID:
+            self.load_persid(space.wrap(self.readline()))
+        elif op == BINPERSID:
+            self.load_persid(self.pop())
+        elif op == PROTO:
+            proto = ord(self.read1())
+            if proto > HIGHEST_PROTOCOL:
+                raise OperationError(space.w_ValueError, space.wrap(
+                    "unsupported pickle protocol: %d" % proto))
+        else:
+            raise pickle_error(space, 'UnpicklingError',
+                               "invalid load key, '%s'." % op)
+
+    def load_int(self):
+        space = self.space
+        data = self.readline()
+        if data == '00':
+            self.push(space.w_False)
+        elif data == '01':
+            self.push(space.w_True)
+        else:
+            # int() gives a long if the value is too large
+            self.push(space.call_function(space.w_int, space.wrap(data)))
+
+    def load_string(self):
+        space = self.space
+        rep = self.readline()
+        if (len(rep) < 2 or rep[0] != rep[-1] or
+                (rep[0] != '"' and rep[0] != "'")):
+            raise OperationError(space.w_ValueError,
+                                 space.wrap("insecure string pickle"))
+        stop = len(rep) - 1
+        assert stop >= 1
+        w_rep = space.wrap(rep[1:stop])
+        self.push(space.call_method(w_rep, 'decode',
+                                    space.wrap('string-escape')))
+
+    def memo_key(self, line):
+        space = self.space
+        return space.int_w(space.call_function(space.w_int,
+                                               space.wrap(line)))
+
+    def load_get(self, key):
+        try:
+            w_obj = self.memo[key]
+        except KeyError:
+            raise pickle_error(self.space, 'BadPickleGet', str(key))
+        self.push(w_obj)
+
+    def find_class(self, module, name):
+        space = self.space
+        if self.w_find_global is not None:
+            return space.call_function(self.w_find_global,
+                                       space.wrap(module), space.wrap(name))
+        w_module = import_module(space, space.wrap(module))
+        return space.getattr(w_module, space.wrap(name))
+
+    def load_ext(self, code):
+        space = self.space
+        w_code = space.wrap(code)
+        w_cache = self.cache.get_copy_reg('_extension_cache')
+        w_obj = space.finditem(w_cache, w_code)
+        if w_obj is None:
+            w_registry = self.cache.get_copy_reg('_inverted_registry')
+            w_key = space.finditem(w_registry, w_code)
+            if w_key is None:
+                raise OperationError(space.w_ValueError, space.wrap(
+                    "unregistered extension code %d" % code))
+            w_module, w_name = space.fixedview(w_key, 2)
+            w_obj = self.find_class(space.str_w(w_module),
+                                    space.str_w(w_name))
+            space.setitem(w_cache, w_code, w_obj)
+        self.push(w_obj)
+
+    def load_persid(self, w_pid):
+        space = self.space
+        if self.w_persistent_load is None:
+            raise pickle_error(space, 'UnpicklingError',
+                               "A load persistent id instruction was "
+                               "encountered, but no persistent_load "
+                               "function was specified.")
+        self.push(space.call_function(self.w_persistent_load, w_pid))
+
+    def load_build(self, w_inst, w_state):
+        space = self.space
+        w_setstate = space.findattr(w_inst, space.wrap('__setstate__'))
+        if w_setstate is not None:
+            space.call_function(w_setstate, w_state)
+            return
+        w_slotstate = None
+        if (space.is_true(space.isinstance(w_state, space.w_tuple)) and
+                space.int_w(space.len(w_state)) == 2):
+            w_state, w_slotstate = space.fixedview(w_state, 2)
+        if space.is_true(w_state):
+            w_dict = space.getattr(w_inst, space.wrap('__dict__'))
+            space.call_method(w_dict, 'update', w_state)
+        if w_slotstate is not None and space.is_true(w_slotstate):
+            w_items = space.call_method(w_slotstate, 'items')
+            for w_item in space.listview(w_items):
+                w_key, w_value = space.fixedview(w_item, 2)
+                space.setattr(w_inst, w_key, w_value)
+
+    # ____________________________________________________________
+    # app-level interface
+
+    def descr_load(self):
+        return self.load()
+    descr_load.unwrap_spec = ['self']
+
+
+def descr_get_persistent_load(space, self):
+    if self.w_persistent_load is None:
+        raise OperationError(space.w_AttributeError,
+                             space.wrap("persistent_load"))
+    return self.w_persistent_load
+
+def descr_set_persistent_load(space, self, w_value):
+    self.w_persistent_load = w_value
+
+def descr_get_find_global(space, self):
+    if self.w_find_global is None:
+        raise OperationError(space.w_AttributeError,
+                             space.wrap("find_global"))
+    return self.w_find_global
+
+def descr_set_find_global(space, self, w_value):
+    if space.is_w(w_value, space.w_None):
+        self.w_find_global = None
+    else:
+        self.w_find_global = w_value
+
+W_Unpickler.typedef = TypeDef(
+    'Unpickler',
+    load = interp2app(W_Unpickler.descr_load),
+    persistent_load = GetSetProperty(descr_get_persistent_load,
+                                     descr_set_persistent_load,
+                                     cls=W_Unpickler),
+    find_global = GetSetProperty(descr_get_find_global,
+                                 descr_set_find_global, cls=W_Unpickler),
+)
+W_Unpickler.typedef.acceptable_as_base_class = False
+
+# ____________________________________________________________
+
+def Pickler(space, w_file=None, w_protocol=None):
+    """Pickler(file, protocol=0) -- Create a pickler.
+
+This takes a file-like object for writing a pickle data stream.  If the
+file is omitted, or is an integer taken as the protocol, the data is
+kept and returned by getvalue()."""
+    if w_file is None or space.is_w(w_file, space.w_None):
+        return W_Pickler(space, None, check_protocol(space, w_protocol))
+    if space.is_true(space.isinstance(w_file, space.w_int)):
+        return W_Pickler(space, None, check_protocol(space, w_file))
+    return W_Pickler(space, w_file, check_protocol(space, w_protocol))
+Pickler.unwrap_spec = [ObjSpace, W_Root, W_Root]
+
+def Unpickler(space, w_file):
+    """Unpickler(file) -- Create an unpickler."""
+    return W_Unpickler(space, w_file, '')
+Unpickler.unwrap_spec = [ObjSpace, W_Root]
+
+def dump(space, w_obj, w_file, w_protocol=None):
+    """dump(obj, file, protocol=0) -- Write an object in pickle format
+to the given file."""
+    W_Pickler(space, w_file, check_protocol(space, w_protocol)).dump(w_obj)
+dump.unwrap_spec = [ObjSpace, W_Root, W_Root, W_Root]
+
+def dumps(space, w_obj, w_protocol=None):
+    """dumps(obj, protocol=0) -- Return a string containing an object in
+pickle format."""
+    pickler = W_Pickler(space, None, check_protocol(space, w_protocol))
+    pickler.dump(w_obj)
+    return space.wrap(pickler.output.build())
+dumps.unwrap_spec = [ObjSpace, W_Root, W_Root]
+
+def load(space, w_file):
+    """load(file) -- Load a pickle from the given file."""
+    return W_Unpickler(space, w_file, '').load()
+load.unwrap_spec = [ObjSpace, W_Root]
+
+def loads(space, data):
+    """loads(string) -- Load a pickle from the given string."""
+    return W_Unpickler(space, None, data).load()
+loads.unwrap_spec = [ObjSpace, str]
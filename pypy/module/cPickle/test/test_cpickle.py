@@ -0,0 +1,228 @@
+from pypy.conftest import gettestobjspace
+
+
+class AppTestCPickle:
+    def setup_class(cls):
+        cls.space = gettestobjspace(usemodules=('cPickle', 'cStringIO',
+                                                'struct'))
+        cls.w_check = cls.space.appexec([], """():
+            import cPickle, pickle
+            def check(obj, expected=None):
+                if expected is None:
+                    expected = obj
+                for proto in range(3):
+                    s = cPickle.dumps(obj, proto)
+                    # same data as the pure Python pickle module
+                    assert s == pickle.dumps(obj, proto)
+                    res = cPickle.loads(s)
+                    assert res == expected
+                    assert type(res) is type(expected)
+                return res
+            return check
+        """)
+
+    def test_simple(self):
+        for obj in [None, True, False, 0, 1, -1, 255, 256, 65535, 65536,
+                    -2**31, 2**31 - 1, 2**31, -2**31 - 1, 2**62, 0L, 1L, -1L,
+                    255L, 2L**70, -2L**70, -128L, 0.0, -1.5, 1e300,
+                    '', 'abc', 'x' * 300, '\n\\\'"\x00\xff',
+                    u'', u'abc', u'\n\\\u1234\U00012345\xe9',
+                    (), (1,), (1, 2), (1, 2, 3), (1, 2, 3, 4),
+                    [], [1, 'a'], range(2500), {}, {'a': 1, 2: [3]},
+                    dict.fromkeys(range(1500))]:
+            self.check(obj)
+
+    def test_memo(self):
+        import cPickle
+        l = [1, 2]
+        t = (l, l, 'abc')
+        res = self.check([t, t, t[2]])
+        assert res[0] is res[1]
+        assert res[0][0] is res[0][1]
+        assert res[2] is res[0][2]
+
+    def test_recursive(self):
+        import cPickle
+        l = []
+        l.append(l)
+        d = {}
+        d['d'] = d
+        t = ([],)
+        t[0].append(t)
+        for proto in range(3):
+            res = cPickle.loads(cPickle.dumps(l, proto))
+            assert res[0] is res
+            res = cPickle.loads(cPickle.dumps(d, proto))
+            assert res['d'] is res
+            res = cPickle.loads(cPickle.dumps(t, proto))
+            assert res[0][0] is res
+
+    def test_globals(self):
+        import cPickle, os
+        self.check(len)
+        self.check(os.path.join)
+        self.check(ValueError)
+        self.check(cPickle.PicklingError)
+        class H(object):
+            pass
+        raises(cPickle.PicklingError, cPickle.dumps, H)
+
+    def test_new_style_instances(self):
+        import cPickle
+        class A(object):
+            pass
+        import __builtin__
+        __builtin__.A = A
+        A.__module__ = '__builtin__'
+        try:
+            a = A()
+            a.x = 5
+            a.y = [a]
+            for proto in range(3):
+                b = cPickle.loads(cPickle.dumps(a, proto))
+                assert type(b) is A
+                assert b.x == 5
+                assert b.y[0] is b
+        finally:
+            del __builtin__.A
+
+    def test_old_style_instances(self):
+        import cPickle
+        class B:
+            def __init__(self, x):
+                self.x = x
+        class C:
+            def __getinitargs__(self):
+                return (5,)
+            def __init__(self, x):
+                self.x = x * 2
+            def __getstate__(self):
+                return {'y': self.x}
+        import __builtin__
+        __builtin__.B = B
+        __builtin__.C = C
+        B.__module__ = C.__module__ = '__builtin__'
+        try:
+            for proto in range(3):
+                b = cPickle.loads(cPickle.dumps(B(42), proto))
+                assert b.__class__ is B
+                assert b.x == 42
+                c = cPickle.loads(cPickle.dumps(C(1), proto))
+                assert c.x == 10
+                assert c.y == 2
+        finally:
+            del __builtin__.B, __builtin__.C
+
+    def test_reduce(self):
+        import cPickle
+        class D(object):
+            def __reduce__(self):
+                return (int, ('42',))
+        res = cPickle.loads(cPickle.dumps(D(), 2))
+        assert res == 42
+        class E(object):
+            def __reduce__(self):
+                return 42
+        raises(cPickle.PicklingError, cPickle.dumps, E())
+        class F(object):
+            def __reduce__(self):
+                return (int,)
+        raises(cPickle.PicklingError, cPickle.dumps, F())
+
+    def test_file(self):
+        import cPickle, cStringIO, StringIO
+        for cls in [cStringIO.StringIO, StringIO.StringIO]:
+            f = cls()
+            cPickle.dump([1, 2], f)
+            cPickle.dump('abc', f, 2)
+            f.seek(0)
+            assert cPickle.load(f) == [1, 2]
+            assert cPickle.load(f) == 'abc'
+            raises(EOFError, cPickle.load, f)
+            if cls is cStringIO.StringIO:
+                f = cls(f.getvalue())
+                assert cPickle.load(f) == [1, 2]
+                assert cPickle.Unpickler(f).load() == 'abc'
+
+    def test_pickler_objects(self):
+        import cPickle, cStringIO
+        f = cStringIO.StringIO()
+        p = cPickle.Pickler(f, 1)
+        assert p.binary
+        l = [1]
+        p.dump(l)
+        p.dump(l)       # only a reference to the memo
+        p.clear_memo()
+        p.dump(l)
+        f.seek(0)
+        u = cPickle.Unpickler(f)
+        assert u.load() == [1]
+        assert u.load() == [1]
+        assert u.load() == [1]
+        assert len(f.getvalue()) < 3 * len(cPickle.dumps(l, 1))
+        #
+        p = cPickle.Pickler(2)
+        p.dump((1, 2))
+        assert cPickle.loads(p.getvalue()) == (1, 2)
+
+    def test_persistent(self):
+        import cPickle, cStringIO
+        for proto in range(3):
+            f = cStringIO.StringIO()
+            p = cPickle.Pickler(f, proto)
+            p.persistent_id = lambda obj: obj == 42 and 'x42' or None
+            p.dump([1, 42])
+            u = cPickle.Unpickler(cStringIO.StringIO(f.getvalue()))
+            raises(cPickle.UnpicklingError, u.load)
+            u = cPickle.Unpickler(cStringIO.StringIO(f.getvalue()))
+            u.persistent_load = lambda pid: pid.upper()
+            assert u.load() == [1, 'X42']
+
+    def test_find_global(self):
+        import cPickle, cStringIO
+        u = cPickle.Unpickler(cStringIO.StringIO(cPickle.dumps(len)))
+        u.find_global = lambda module, name: (module, name)
+        assert u.load() == ('__builtin__', 'len')
+
+    def test_protocol(self):
+        import cPickle
+        assert cPickle.HIGHEST_PROTOCOL == 2
+        assert cPickle.dumps(1, -1) == cPickle.dumps(1, 2)
+        raises(ValueError, cPickle.dumps, 1, 3)
+        raises(ValueError, cPickle.loads, '\x80\x03K\x01.')
+
+    def test_bad_data(self):
+        import cPickle
+        raises(EOFError, cPickle.loads, '')
+        raises(EOFError, cPickle.loads, 'K')
+        raises(cPickle.UnpicklingError, cPickle.loads, 'a.')
+        raises(cPickle.UnpicklingError, cPickle.loads, 'e.')
+        raises(cPickle.BadPickleGet, cPickle.loads, 'h\x05.')
+        raises(cPickle.UnpicklingError, cPickle.loads, '\xff.')
+
+    def test_compatibility(self):
+        # the pure Python pickle module can load our pickles and the
+        # other way around
+        import cPickle, pickle
+        class G(object):
+            def __init__(self, x):
+                self.x = x
+            def __eq__(self, other):
+                return type(other) is G and other.x == self.x
+        import __builtin__
+        __builtin__.G = G
+        G.__module__ = '__builtin__'
+        try:
+            obj = [G(1), G((2, G(3))), {'a': G(u'\u1234')}]
+            for proto in range(3):
+                assert pickle.loads(cPickle.dumps(obj, proto)) == obj
+                assert cPickle.loads(pickle.dumps(obj, proto)) == obj
+        finally:
+            del __builtin__.G
+
+    def test_recursion_limit(self):
+        import cPickle, sys
+        l = []
+        for i in range(sys.getrecursionlimit() + 10):
+            l = [l]
+        raises(RuntimeError, cPickle.dumps, l)
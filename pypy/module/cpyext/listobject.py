@@ -19,7 +19,7 @@ def PyList_New(space, len):
     PySequence_SetItem()  or expose the object to Python code before
     setting all items to a real object with PyList_SetItem().
     """
-    return space.newlist([None] * len)
+    return W_ListObject([None] * len)
 
 @cpython_api([PyObject, Py_ssize_t, PyObject], rffi.INT_real, error=-1)
 def PyList_SetItem(space, w_list, index, w_item):
@@ -32,6 +32,7 @@ def PyList_SetItem(space, w_list, index, w_item):
     Py_DecRef(space, w_item)
     if not isinstance(w_list, W_ListObject):
         PyErr_BadInternalCall(space)
+    w_list.switch_to_object_strategy(space)
     wrappeditems = w_list.wrappeditems
     if index < 0 or index >= len(wrappeditems):
         raise OperationError(space.w_IndexError, space.wrap(
@@ -47,6 +48,9 @@ def PyList_GetItem(space, w_list, index):
     IndexError exception."""
     if not isinstance(w_list, W_ListObject):
         PyErr_BadInternalCall(space)
+    # the returned reference is borrowed: it must stay alive as long as
+    # the list, so make sure the list holds the wrapped items
+    w_list.switch_to_object_strategy(space)
     wrappeditems = w_list.wrappeditems
     if index < 0 or index >= len(wrappeditems):
         raise OperationError(space.w_IndexError, space.wrap(
@@ -58,7 +62,7 @@ def PyList_GetItem(space, w_list, index):
 def PyList_Append(space, w_list, w_item):
     if not isinstance(w_list, W_ListObject):
         PyErr_BadInternalCall(space)
-    w_list.append(w_item)
+    w_list.append(space, w_item)
     return 0
 
 @cpython_api([PyObject, Py_ssize_t, PyObject], rffi.INT_real, error=-1)
@@ -74,7 +78,7 @@ def PyList_GET_SIZE(space, w_list):
     """Macro form of PyList_Size() without error checking.
     """
     assert isinstance(w_list, W_ListObject)
-    return len(w_list.wrappeditems)
+    return w_list.length()
 
 
 @cpython_api([PyObject], Py_ssize_t, error=-1)
@@ -12,6 +12,13 @@ class Module(MixedModule):
         'disable_finalizers': 'interp_gc.disable_finalizers',
         'estimate_heap_size': 'interp_gc.estimate_heap_size',
         'garbage' : 'space.newlist([])',
+        'get_stats': 'interp_gc.get_stats',
+        'GcRef': 'referents.W_GcRef',
+        'get_rpy_roots': 'referents.get_rpy_roots',
+        'get_rpy_referents': 'referents.get_rpy_referents',
+        'get_rpy_memory_usage': 'referents.get_rpy_memory_usage',
+        'get_rpy_type_index': 'referents.get_rpy_type_index',
+        'dump_rpy_heap': 'referents.dump_rpy_heap',
         #'dump_heap_stats': 'interp_gc.dump_heap_stats',
     }
 
@@ -2,6 +2,7 @@ from pypy.interpreter.gateway import ObjSpace
 from pypy.interpreter.error import OperationError
 from pypy.rlib import rgc
 from pypy.rlib.streamio import open_file_as_stream
+from pypy.rpython.memory.gc.base import PAUSE_HISTOGRAM_SIZE
 
 def collect(space):
     "Run a full collection."
@@ -22,6 +23,36 @@ def disable_finalizers(space):
     space.user_del_action.finalizers_lock_count += 1
 disable_finalizers.unwrap_spec = [ObjSpace]
 
+def get_stats(space):
+    """Return a dict with the number of minor and major collections,
+    the total and maximum pause times in seconds, the number of bytes
+    promoted out of the nursery so far, and a histogram of the pauses:
+    'pause_histogram'[0] counts the pauses shorter than 1 microsecond,
+    and 'pause_histogram'[i] the ones between 2**(i-1) and 2**i
+    microseconds, apart from the last item which counts all the longer
+    ones."""
+    stats = rgc.get_stats()
+    if not stats:
+        raise OperationError(space.w_NotImplementedError,
+                             space.wrap("operation not implemented by this GC"))
+    w_result = space.newdict()
+    space.setitem(w_result, space.wrap('minor_collections'),
+                  space.wrap(stats.minor_collections))
+    space.setitem(w_result, space.wrap('major_collections'),
+                  space.wrap(stats.major_collections))
+    space.setitem(w_result, space.wrap('total_pause_time'),
+                  space.wrap(stats.total_pause_time))
+    space.setitem(w_result, space.wrap('max_pause_time'),
+                  space.wrap(stats.max_pause_time))
+    space.setitem(w_result, space.wrap('bytes_promoted'),
+                  space.wrap(stats.bytes_promoted))
+    histogram_w = [space.wrap(stats.pause_histogram[i])
+                   for i in range(PAUSE_HISTOGRAM_SIZE)]
+    space.setitem(w_result, space.wrap('pause_histogram'),
+                  space.newlist(histogram_w))
+    return w_result
+get_stats.unwrap_spec = [ObjSpace]
+
 # ____________________________________________________________
 
 import sys
@@ -0,0 +1,83 @@
+"""
+Walking the RPython-level object graph from app-level, for debugging
+memory leaks.  The objects are returned as opaque GcRef handles: they
+are the RPython objects, not the app-level objects they may implement.
+"""
+
+from pypy.interpreter.baseobjspace import Wrappable
+from pypy.interpreter.typedef import TypeDef
+from pypy.interpreter.gateway import ObjSpace, W_Root
+from pypy.interpreter.error import OperationError
+from pypy.rlib import rgc
+
+
+class W_GcRef(Wrappable):
+    def __init__(self, gcref):
+        self.gcref = gcref
+
+W_GcRef.typedef = TypeDef("GcRef")
+W_GcRef.typedef.acceptable_as_base_class = False
+
+
+def unwrap_gcref(space, w_obj):
+    gcref = space.interpclass_w(w_obj)
+    if isinstance(gcref, W_GcRef):
+        return gcref.gcref
+    return rgc.cast_instance_to_gcref(w_obj)
+
+def wrap_gcrefs(space, array):
+    result_w = []
+    for i in range(len(array)):
+        gcref = array[i]
+        if gcref:       # get_rpy_roots() may leave some NULLs at the end
+            result_w.append(space.wrap(W_GcRef(gcref)))
+    return space.newlist(result_w)
+
+def missing_operation(space):
+    return OperationError(space.w_NotImplementedError,
+                          space.wrap("operation not implemented by this GC"))
+
+# ____________________________________________________________
+
+def get_rpy_roots(space):
+    """Return the list of the roots of the GC, as GcRef objects."""
+    roots = rgc.get_rpy_roots()
+    if not roots:
+        raise missing_operation(space)
+    return wrap_gcrefs(space, roots)
+get_rpy_roots.unwrap_spec = [ObjSpace]
+
+def get_rpy_referents(space, w_obj):
+    """Return the list of the objects directly referenced by the given
+    object or GcRef, as GcRef objects."""
+    referents = rgc.get_rpy_referents(unwrap_gcref(space, w_obj))
+    if not referents:
+        raise missing_operation(space)
+    return wrap_gcrefs(space, referents)
+get_rpy_referents.unwrap_spec = [ObjSpace, W_Root]
+
+def get_rpy_memory_usage(space, w_obj):
+    """Return the size in bytes of the given object or GcRef, not
+    counting the objects it references."""
+    size = rgc.get_rpy_memory_usage(unwrap_gcref(space, w_obj))
+    if size < 0:
+        raise missing_operation(space)
+    return space.wrap(size)
+get_rpy_memory_usage.unwrap_spec = [ObjSpace, W_Root]
+
+def get_rpy_type_index(space, w_obj):
+    """Return an integer identifying the RPython type of the given
+    object or GcRef.  The same numbers are used in dump_rpy_heap()."""
+    index = rgc.get_rpy_type_index(unwrap_gcref(space, w_obj))
+    if index < 0:
+        raise missing_operation(space)
+    return space.wrap(index)
+get_rpy_type_index.unwrap_spec = [ObjSpace, W_Root]
+
+def dump_rpy_heap(space, fd):
+    """Write a binary dump of all the RPython objects reachable from the
+    roots to the file descriptor 'fd'."""
+    if not rgc.dump_rpy_heap(fd):
+        raise OperationError(space.w_IOError,
+                             space.wrap("cannot dump the heap"))
+dump_rpy_heap.unwrap_spec = [ObjSpace, int]
@@ -110,3 +110,67 @@ class AppTestGcDumpHeap(object):
         import gc
         gc.dump_heap_stats(self.fname)
 
+
+class AppTestGcIntrospection(object):
+    def setup_class(cls):
+        from pypy.rlib import rgc
+        space = gettestobjspace()
+        class FakeStats(object):
+            minor_collections = 5
+            major_collections = 2
+            total_pause_time = 0.25
+            max_pause_time = 0.125
+            bytes_promoted = 4096
+            pause_histogram = [0] * 32
+            pause_histogram[3] = 6
+            pause_histogram[31] = 1
+        w_a = space.newlist([])
+        w_b = space.newlist([w_a])
+        roots = [w_b, None]
+        referents = {w_b: [w_a]}
+        cls._saved = {}
+        def fake(name, func):
+            cls._saved[name] = getattr(rgc, name)
+            setattr(rgc, name, func)
+        fake('get_stats', lambda: FakeStats())
+        fake('get_rpy_roots', lambda: roots)
+        fake('get_rpy_referents', lambda gcref: referents[gcref])
+        fake('get_rpy_memory_usage', lambda gcref: 16 * (gcref is w_b))
+        fake('get_rpy_type_index', lambda gcref: 42)
+        fake('dump_rpy_heap', lambda fd: fd == 1234)
+        cls.space = space
+        cls.w_b = w_b
+
+    def teardown_class(cls):
+        from pypy.rlib import rgc
+        for name, func in cls._saved.items():
+            setattr(rgc, name, func)
+
+    def test_get_stats(self):
+        import gc
+        assert gc.get_stats() == {'minor_collections': 5,
+                                  'major_collections': 2,
+                                  'total_pause_time': 0.25,
+                                  'max_pause_time': 0.125,
+                                  'bytes_promoted': 4096,
+                                  'pause_histogram': [0, 0, 0, 6] +
+                                                     [0] * 27 + [1]}
+
+    def test_get_rpy_roots_and_referents(self):
+        import gc
+        roots = gc.get_rpy_roots()
+        assert len(roots) == 1
+        assert type(roots[0]) is gc.GcRef
+        assert gc.get_rpy_memory_usage(roots[0]) == 16
+        referents = gc.get_rpy_referents(roots[0])
+        assert len(referents) == 1
+        assert gc.get_rpy_memory_usage(referents[0]) == 0
+        # app-level objects can be passed directly too
+        assert len(gc.get_rpy_referents(self.b)) == 1
+        assert gc.get_rpy_memory_usage(self.b) == 16
+        assert gc.get_rpy_type_index(self.b) == 42
+
+    def test_dump_rpy_heap(self):
+        import gc
+        gc.dump_rpy_heap(1234)
+        raises(IOError, gc.dump_rpy_heap, 5)
@@ -1,4 +1,3 @@
-
 from pypy.interpreter.mixedmodule import MixedModule 
 
 class Module(MixedModule):
@@ -7,7 +6,27 @@ class Module(MixedModule):
     
     interpleveldefs = {
         'zeros'    : 'numarray.zeros',
-        'minimum'  : 'ufunc.minimum',
+        'array'    : 'numarray.array',
+        'dot'      : 'numarray.dot',
+        'ndarray'  : 'numarray.BaseArray',
+        'dtype'    : 'dtype.W_Dtype',
+        'bool_'    : 'dtype.bool_dtype',
+        'int32'    : 'dtype.int32_dtype',
+        'int64'    : 'dtype.int64_dtype',
+        'float64'  : 'dtype.float64_dtype',
+
+        'add'           : 'ufunc.add',
+        'subtract'      : 'ufunc.subtract',
+        'multiply'      : 'ufunc.multiply',
+        'divide'        : 'ufunc.divide',
+        'minimum'       : 'ufunc.minimum',
+        'maximum'       : 'ufunc.maximum',
+        'equal'         : 'ufunc.equal',
+        'not_equal'     : 'ufunc.not_equal',
+        'less'          : 'ufunc.less',
+        'less_equal'    : 'ufunc.less_equal',
+        'greater'       : 'ufunc.greater',
+        'greater_equal' : 'ufunc.greater_equal',
         }
 
     appleveldefs = {}
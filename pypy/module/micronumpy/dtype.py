@@ -0,0 +1,112 @@
+from pypy.interpreter.baseobjspace import ObjSpace, W_Root, Wrappable
+from pypy.interpreter.error import OperationError
+from pypy.interpreter.typedef import TypeDef, interp_attrproperty
+from pypy.interpreter.gateway import interp2app
+from pypy.rpython.lltypesystem import lltype, rffi
+from pypy.rlib.rarithmetic import LONG_BIT
+
+# The element types supported by micronumpy.  Each dtype describes how
+# an element is stored in the raw memory of an array ('T') and in which
+# type the interp-level loops compute with it ('C').  They are ordered
+# by 'num', which is used to find the common type of two arrays.
+
+class W_Dtype(Wrappable):
+    def __init__(self, num, name, kind, T, C):
+        self.num = num
+        self.name = name
+        self.kind = kind        # 'b'ool, 'i'nteger or 'f'loat
+        self.T = T
+        self.C = C
+
+    def unwrap(self, space, w_value):
+        "Unwrap w_value into the computation type of this dtype."
+        raise NotImplementedError
+
+    def wrap(self, space, value):
+        "Wrap a value of the computation type of this dtype."
+        raise NotImplementedError
+
+    def descr_repr(self, space):
+        return space.wrap("dtype('%s')" % self.name)
+    descr_repr.unwrap_spec = ['self', ObjSpace]
+
+W_Dtype.typedef = TypeDef(
+    'dtype',
+    __repr__ = interp2app(W_Dtype.descr_repr),
+    __str__  = interp2app(W_Dtype.descr_repr),
+    name     = interp_attrproperty('name', cls=W_Dtype),
+)
+
+
+class W_BoolDtype(W_Dtype):
+    def unwrap(self, space, w_value):
+        return int(space.is_true(w_value))
+
+    def wrap(self, space, value):
+        return space.newbool(bool(value))
+
+class W_Int32Dtype(W_Dtype):
+    def unwrap(self, space, w_value):
+        return space.int_w(space.int(w_value))
+
+    def wrap(self, space, value):
+        return space.wrap(value)
+
+class W_Int64Dtype(W_Dtype):
+    def unwrap(self, space, w_value):
+        return space.r_longlong_w(space.int(w_value))
+
+    def wrap(self, space, value):
+        if LONG_BIT == 64:
+            return space.wrap(rffi.cast(lltype.Signed, value))
+        return space.wrap(value)
+
+class W_Float64Dtype(W_Dtype):
+    def unwrap(self, space, w_value):
+        return space.float_w(space.float(w_value))
+
+    def wrap(self, space, value):
+        return space.wrap(value)
+
+bool_dtype = W_BoolDtype(0, 'bool', 'b', lltype.Bool, lltype.Signed)
+int32_dtype = W_Int32Dtype(1, 'int32', 'i', rffi.INT, lltype.Signed)
+int64_dtype = W_Int64Dtype(2, 'int64', 'i', rffi.LONGLONG,
+                           lltype.SignedLongLong)
+float64_dtype = W_Float64Dtype(3, 'float64', 'f', lltype.Float, lltype.Float)
+
+ALL_DTYPES = [bool_dtype, int32_dtype, int64_dtype, float64_dtype]
+
+def find_result_dtype(dtype1, dtype2):
+    if dtype1.num >= dtype2.num:
+        return dtype1
+    return dtype2
+
+def find_scalar_dtype(space, w_value):
+    if space.is_true(space.isinstance(w_value, space.w_bool)):
+        return bool_dtype
+    if space.is_true(space.isinstance(w_value, space.w_int)):
+        return int64_dtype
+    if space.is_true(space.isinstance(w_value, space.w_long)):
+        return int64_dtype
+    return float64_dtype
+
+def unpack_dtype(space, w_dtype):
+    """Accepts None (float64, like numpy), a dtype object, one of the
+    builtin types bool, int and float, or the name of a dtype."""
+    if space.is_w(w_dtype, space.w_None):
+        return float64_dtype
+    if isinstance(w_dtype, W_Dtype):
+        return w_dtype
+    if space.is_w(w_dtype, space.w_bool):
+        return bool_dtype
+    if space.is_w(w_dtype, space.w_int):
+        return int64_dtype
+    if space.is_w(w_dtype, space.w_float):
+        return float64_dtype
+    if space.is_true(space.isinstance(w_dtype, space.w_str)):
+        name = space.str_w(w_dtype)
+        for dtype in ALL_DTYPES:
+            if dtype.name == name:
+                return dtype
+    raise OperationError(space.w_TypeError,
+                         space.wrap("data type not understood"))
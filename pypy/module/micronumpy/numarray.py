@@ -1,51 +1,565 @@
-
+import weakref
 from pypy.interpreter.baseobjspace import ObjSpace, W_Root, Wrappable
 from pypy.interpreter.error import OperationError
-from pypy.interpreter.typedef import TypeDef
+from pypy.interpreter.typedef import TypeDef, GetSetProperty
 from pypy.interpreter.gateway import interp2app, NoneNotWrapped
-from pypy.rlib.debug import make_sure_not_resized
+from pypy.rpython.lltypesystem import lltype, rffi
+from pypy.rlib.jit import JitDriver
+from pypy.rlib.rarithmetic import INFINITY, NAN
+from pypy.rlib.unroll import unrolling_iterable
+from pypy.module.micronumpy import dtype as _dtype
+from pypy.module.micronumpy.signature import get_signature
+
+# The operations between arrays.  Every virtual array class is made for
+# one of them, so that the JIT sees no dispatching in the loops.
+ADD, SUB, MUL, DIV, MINIMUM, MAXIMUM = range(6)
+EQ, NE, LT, LE, GT, GE = range(6)
+
+BINOP_NAMES = ['add', 'subtract', 'multiply', 'divide', 'minimum', 'maximum']
+COMPARE_NAMES = ['equal', 'not_equal', 'less', 'less_equal', 'greater',
+                 'greater_equal']
+
 
-class BaseNumArray(Wrappable):
-    pass
+class BaseArray(Wrappable):
+    """An array is either concrete (a NumArray, whose elements are stored
+    in raw memory) or virtual: the lazy result of an operation between
+    arrays, computed only when one of its elements is read.  Thus
+    'a + b * c' makes no temporary array, and computing it is a single
+    loop over the operands.
 
-class NumArray(BaseNumArray):
-    def __init__(self, space, dim, dtype):
-        self.dim = dim
+    The eval_*() methods return the element at the given position,
+    converted to the type in their name.
+    """
+
+    def __init__(self, space, dtype, shape, size):
         self.space = space
-        # ignore dtype for now
-        self.storage = [0] * dim
-        make_sure_not_resized(self.storage)
-
-    def descr_getitem(self, index):
-        space = self.space
-        try:
-            return space.wrap(self.storage[index])
-        except IndexError:
-            raise OperationError(space.w_IndexError,
-                                 space.wrap("list index out of range"))
-    descr_getitem.unwrap_spec = ['self', int]
-
-    def descr_setitem(self, index, value):
-        space = self.space
-        try:
-            self.storage[index] = value
-        except IndexError:
-            raise OperationError(space.w_IndexError,
-                                 space.wrap("list index out of range"))
-        return space.w_None
-    descr_setitem.unwrap_spec = ['self', int, int]
+        self.dtype = dtype
+        self.shape = shape
+        self.size = size
+        # weakrefs to the virtual arrays that must be computed before
+        # this array is modified
+        self.invalidates = []
+        self.invalidates_limit = 16
+
+    def eval_float(self, i):
+        raise NotImplementedError
+
+    def eval_int(self, i):
+        raise NotImplementedError
+
+    def eval_longlong(self, i):
+        raise NotImplementedError
+
+    def get_concrete(self):
+        raise NotImplementedError
+
+    def add_invalidates(self, other):
+        if len(self.invalidates) >= self.invalidates_limit:
+            self.invalidates = [ref for ref in self.invalidates
+                                    if ref() is not None]
+            self.invalidates_limit = 2 * len(self.invalidates) + 16
+        assert other is not None
+        self.invalidates.append(weakref.ref(other))
+
+    def invalidated(self):
+        invalidates = self.invalidates
+        if invalidates:
+            self.invalidates = []
+            self.invalidates_limit = 16
+            for ref in invalidates:
+                other = ref()
+                if other is not None:
+                    other.get_concrete()
+
+    def _unpack_index(self, space, w_index):
+        if len(self.shape) == 1:
+            return compute_pos(space, [space.int_w(w_index)], self.shape)
+        indexes = [space.int_w(w_i) for w_i in space.fixedview(w_index)]
+        if len(indexes) != len(self.shape):
+            raise OperationError(space.w_IndexError, space.wrap(
+                'Wrong index'))
+        return compute_pos(space, indexes, self.shape)
+
+    def descr_getitem(self, w_index):
+        pos = self._unpack_index(self.space, w_index)
+        return self.get_concrete().getitem(pos)
+    descr_getitem.unwrap_spec = ['self', W_Root]
+
+    def descr_setitem(self, w_index, w_value):
+        pos = self._unpack_index(self.space, w_index)
+        concrete = self.get_concrete()
+        concrete.invalidated()
+        concrete.setitem_w(pos, w_value)
+    descr_setitem.unwrap_spec = ['self', W_Root, W_Root]
 
     def descr_len(self):
-        return self.space.wrap(len(self.storage))
+        return self.space.wrap(self.shape[0])
     descr_len.unwrap_spec = ['self']
 
-NumArray.typedef = TypeDef(
+    def descr_get_dtype(space, self):
+        return space.wrap(self.dtype)
+
+    def descr_get_shape(space, self):
+        return space.newtuple([space.wrap(d) for d in self.shape])
+
+    def descr_sum(self):
+        return reduce_array(self.space, ADD, self)
+    descr_sum.unwrap_spec = ['self']
+
+    def descr_min(self):
+        return self._reduce_nonempty(MINIMUM, 'min')
+    descr_min.unwrap_spec = ['self']
+
+    def descr_max(self):
+        return self._reduce_nonempty(MAXIMUM, 'max')
+    descr_max.unwrap_spec = ['self']
+
+    def _reduce_nonempty(self, opnum, name):
+        if self.size == 0:
+            raise OperationError(self.space.w_ValueError, self.space.wrap(
+                "zero-size array to %s() has no identity" % (name,)))
+        return reduce_array(self.space, opnum, self)
+
+    def descr_dot(self, w_other):
+        return dot(self.space, self, w_other)
+    descr_dot.unwrap_spec = ['self', W_Root]
+
+def _make_binop_descr(opnum, reversed=False):
+    if reversed:
+        def descr_binop(self, w_other):
+            return binop_w(self.space, opnum, w_other, self)
+    else:
+        def descr_binop(self, w_other):
+            return binop_w(self.space, opnum, self, w_other)
+    descr_binop.unwrap_spec = [BaseArray, W_Root]
+    return interp2app(descr_binop)
+
+def _make_compare_descr(opnum):
+    def descr_compare(self, w_other):
+        return compare_w(self.space, opnum, self, w_other)
+    descr_compare.unwrap_spec = [BaseArray, W_Root]
+    return interp2app(descr_compare)
+
+BaseArray.typedef = TypeDef(
     'NumArray',
-    __getitem__ = interp2app(NumArray.descr_getitem),
-    __setitem__ = interp2app(NumArray.descr_setitem),
-    __len__     = interp2app(NumArray.descr_len),
+    __getitem__ = interp2app(BaseArray.descr_getitem),
+    __setitem__ = interp2app(BaseArray.descr_setitem),
+    __len__     = interp2app(BaseArray.descr_len),
+    __add__     = _make_binop_descr(ADD),
+    __sub__     = _make_binop_descr(SUB),
+    __mul__     = _make_binop_descr(MUL),
+    __div__     = _make_binop_descr(DIV),
+    __truediv__ = _make_binop_descr(DIV),
+    __radd__    = _make_binop_descr(ADD, reversed=True),
+    __rsub__    = _make_binop_descr(SUB, reversed=True),
+    __rmul__    = _make_binop_descr(MUL, reversed=True),
+    __rdiv__    = _make_binop_descr(DIV, reversed=True),
+    __rtruediv__= _make_binop_descr(DIV, reversed=True),
+    __eq__      = _make_compare_descr(EQ),
+    __ne__      = _make_compare_descr(NE),
+    __lt__      = _make_compare_descr(LT),
+    __le__      = _make_compare_descr(LE),
+    __gt__      = _make_compare_descr(GT),
+    __ge__      = _make_compare_descr(GE),
+    dtype       = GetSetProperty(BaseArray.descr_get_dtype),
+    shape       = GetSetProperty(BaseArray.descr_get_shape),
+    sum         = interp2app(BaseArray.descr_sum),
+    min         = interp2app(BaseArray.descr_min),
+    max         = interp2app(BaseArray.descr_max),
+    dot         = interp2app(BaseArray.descr_dot),
 )
 
+
+class NumArray(BaseArray):
+    """A concrete array, of one of the subclasses made by
+    make_dtype_classes() below."""
+
+    def get_concrete(self):
+        return self
+
+    def getitem(self, pos):
+        raise NotImplementedError
+
+    def setitem_w(self, pos, w_value):
+        raise NotImplementedError
+
+    def compute_from(self, node):
+        raise NotImplementedError
+
+
+class VirtualArray(BaseArray):
+    """The result of an operation, computed the first time it is needed."""
+
+    def __init__(self, space, dtype, shape, size):
+        BaseArray.__init__(self, space, dtype, shape, size)
+        self.forced_result = None
+
+    def get_concrete(self):
+        result = self.forced_result
+        if result is None:
+            result = new_array(self.space, self.dtype, self.shape, self.size)
+            result.compute_from(self)
+            # from now on, modifying self means modifying the result
+            result.invalidates = self.invalidates
+            result.invalidates_limit = self.invalidates_limit
+            self.invalidates = []
+            self.forced_result = result
+            self.del_sources()
+        return result
+
+    def del_sources(self):
+        raise NotImplementedError
+
+
+class Scalar(BaseArray):
+    """A scalar operand, seen as an array of the shape of the other
+    operand."""
+
+    def add_invalidates(self, other):
+        pass        # never modified
+
+# ____________________________________________________________
+# the classes specialized for every dtype
+
+def _float_div(x, y):
+    if y == 0.0:
+        if x == 0.0 or x != x:
+            return NAN
+        elif x > 0.0:
+            return INFINITY
+        else:
+            return -INFINITY
+    return x / y
+
+def make_dtype_classes(dtype):
+    ARRAY = rffi.CArray(dtype.T)
+    T = dtype.T
+    C = dtype.C
+    is_float = dtype.kind == 'f'
+    is_bool = dtype.kind == 'b'
+
+    # the JIT does not support integers larger than a machine word
+    # (int64 on 32-bit hosts), so these loops are then not seen by it
+    jit_visible = rffi.sizeof(C) <= rffi.sizeof(lltype.Signed)
+
+    if C is lltype.Float:
+        def read(node, i):
+            return node.eval_float(i)
+    elif C is lltype.Signed:
+        def read(node, i):
+            return node.eval_int(i)
+    else:
+        def read(node, i):
+            return node.eval_longlong(i)
+
+    def _binop(opnum, x, y):
+        if opnum == ADD:
+            return x + y
+        elif opnum == SUB:
+            return x - y
+        elif opnum == MUL:
+            return x * y
+        elif opnum == DIV:
+            if is_float:
+                return _float_div(x, y)
+            if y == 0:
+                return rffi.cast(C, 0)      # like numpy
+            if y == -1:
+                return -x      # don't crash on 'MININT // -1'
+            return x // y
+        elif opnum == MINIMUM:
+            if x <= y or x != x:
+                return x
+            return y
+        else:
+            assert opnum == MAXIMUM
+            if x >= y or x != x:
+                return x
+            return y
+
+    def _compare(opnum, x, y):
+        if opnum == EQ:
+            return x == y
+        elif opnum == NE:
+            return x != y
+        elif opnum == LT:
+            return x < y
+        elif opnum == LE:
+            return x <= y
+        elif opnum == GT:
+            return x > y
+        else:
+            assert opnum == GE
+            return x >= y
+
+    def get_printable_force(signature):
+        return 'numpy force %s' % (signature.key,)
+
+    def get_printable_reduce(opnum, signature):
+        return 'numpy %s.reduce %s' % (BINOP_NAMES[opnum], signature.key)
+
+    # the reds must be listed with the ints first, then the pointers,
+    # then the floats
+    if is_float:
+        reduce_reds = ['i', 'size', 'node', 'acc']
+    else:
+        reduce_reds = ['i', 'size', 'acc', 'node']
+    force_driver = JitDriver(greens=['signature'],
+                             reds=['i', 'size', 'node', 'result'],
+                             get_printable_location=get_printable_force)
+    reduce_driver = JitDriver(greens=['opnum', 'signature'],
+                              reds=reduce_reds,
+                              get_printable_location=get_printable_reduce)
+
+    array_signature = get_signature(dtype.name)
+    scalar_signature = get_signature('scalar:' + dtype.name)
+
+    class W_TypedArray(NumArray):
+        _immutable_fields_ = ['storage']
+
+        def __init__(self, space, shape, size):
+            NumArray.__init__(self, space, dtype, shape, size)
+            self.storage = lltype.malloc(ARRAY, size, flavor='raw', zero=True)
+            self.signature = array_signature
+
+        def __del__(self):
+            lltype.free(self.storage, flavor='raw')
+
+        def getitem(self, pos):
+            return dtype.wrap(self.space, rffi.cast(C, self.storage[pos]))
+
+        def setitem_w(self, pos, w_value):
+            value = dtype.unwrap(self.space, w_value)
+            self.storage[pos] = rffi.cast(T, value)
+
+        def eval_float(self, i):
+            return rffi.cast(lltype.Float, self.storage[i])
+
+        def eval_int(self, i):
+            return rffi.cast(lltype.Signed, self.storage[i])
+
+        def eval_longlong(self, i):
+            return rffi.cast(lltype.SignedLongLong, self.storage[i])
+
+        def compute_from(self, node):
+            signature = node.signature
+            size = self.size
+            result = self
+            i = 0
+            while i < size:
+                if jit_visible:
+                    force_driver.can_enter_jit(signature=signature, i=i,
+                                               size=size, node=node,
+                                               result=result)
+                    force_driver.jit_merge_point(signature=signature, i=i,
+                                                 size=size, node=node,
+                                                 result=result)
+                result.storage[i] = rffi.cast(T, read(node, i))
+                i += 1
+
+    W_TypedArray.__name__ = 'W_%sArray' % (dtype.name.capitalize(),)
+
+    class W_Scalar(Scalar):
+        def __init__(self, space, w_value, shape, size):
+            Scalar.__init__(self, space, dtype, shape, size)
+            self.value = dtype.unwrap(space, w_value)
+            self.signature = scalar_signature
+
+        def eval_float(self, i):
+            return rffi.cast(lltype.Float, self.value)
+
+        def eval_int(self, i):
+            return rffi.cast(lltype.Signed, self.value)
+
+        def eval_longlong(self, i):
+            return rffi.cast(lltype.SignedLongLong, self.value)
+
+    W_Scalar.__name__ = 'W_%sScalar' % (dtype.name.capitalize(),)
+
+    def make_call2_class(opnum, name, compute, result_dtype):
+        # the result is computed from two arrays of the given dtype
+        class Call2(VirtualArray):
+            def __init__(self, space, left, right):
+                VirtualArray.__init__(self, space, result_dtype, left.shape,
+                                      left.size)
+                self.left = left
+                self.right = right
+                self.signature = get_signature('%s:%s(%s, %s)' % (
+                    name, dtype.name, left.signature.key,
+                    right.signature.key))
+                left.add_invalidates(self)
+                right.add_invalidates(self)
+
+            def del_sources(self):
+                self.left = None
+                self.right = None
+
+            def _eval(self, i):
+                result = self.forced_result
+                if result is not None:
+                    return read(result, i)
+                return compute(opnum, read(self.left, i),
+                               read(self.right, i))
+
+            def eval_float(self, i):
+                return rffi.cast(lltype.Float, self._eval(i))
+
+            def eval_int(self, i):
+                return rffi.cast(lltype.Signed, self._eval(i))
+
+            def eval_longlong(self, i):
+                return rffi.cast(lltype.SignedLongLong, self._eval(i))
+
+        Call2.__name__ = 'W_%s_%s' % (name.capitalize(), dtype.name)
+        return Call2
+
+    call2_classes = [(opnum, make_call2_class(opnum, BINOP_NAMES[opnum],
+                                              _binop, dtype))
+                     for opnum in range(len(BINOP_NAMES))]
+    compare_classes = [(opnum, make_call2_class(opnum, COMPARE_NAMES[opnum],
+                                                _compare, _dtype.bool_dtype))
+                       for opnum in range(len(COMPARE_NAMES))]
+
+    def reduce(opnum, node):
+        signature = node.signature
+        size = node.size
+        if opnum == ADD:
+            acc = rffi.cast(C, 0)
+            i = 0
+        else:
+            assert size > 0
+            acc = read(node, 0)
+            i = 1
+        while i < size:
+            if jit_visible:
+                reduce_driver.can_enter_jit(opnum=opnum, signature=signature,
+                                            i=i, size=size, node=node,
+                                            acc=acc)
+                reduce_driver.jit_merge_point(opnum=opnum,
+                                              signature=signature, i=i,
+                                              size=size, node=node, acc=acc)
+            acc = _binop(opnum, acc, read(node, i))
+            i += 1
+        if is_bool and opnum == ADD:
+            return node.space.wrap(acc)     # the number of True items
+        return dtype.wrap(node.space, acc)
+
+    return W_TypedArray, W_Scalar, call2_classes, compare_classes, reduce
+
+_array_classes = []
+_scalar_classes = []
+_call2_classes = []
+_compare_classes = []
+_reducers = []
+for _dt in _dtype.ALL_DTYPES:
+    _array, _scalar, _call2s, _compares, _reduce = make_dtype_classes(_dt)
+    _array_classes.append((_dt, _array))
+    _scalar_classes.append((_dt, _scalar))
+    _call2_classes += [(_dt, _op, _cls) for _op, _cls in _call2s]
+    _compare_classes += [(_dt, _op, _cls) for _op, _cls in _compares]
+    _reducers.append((_dt, _reduce))
+_array_classes = unrolling_iterable(_array_classes)
+_scalar_classes = unrolling_iterable(_scalar_classes)
+_call2_classes = unrolling_iterable(_call2_classes)
+_compare_classes = unrolling_iterable(_compare_classes)
+_reducers = unrolling_iterable(_reducers)
+del _dt, _array, _scalar, _call2s, _compares, _reduce
+
+def new_array(space, dtype, shape, size):
+    for array_dtype, cls in _array_classes:
+        if dtype is array_dtype:
+            return cls(space, shape, size)
+    raise AssertionError("unknown dtype %s" % (dtype.name,))
+
+def new_scalar(space, dtype, w_value, shape, size):
+    for scalar_dtype, cls in _scalar_classes:
+        if dtype is scalar_dtype:
+            return cls(space, w_value, shape, size)
+    raise AssertionError("unknown dtype %s" % (dtype.name,))
+
+def new_binop(space, opnum, left, right):
+    dtype = _dtype.find_result_dtype(left.dtype, right.dtype)
+    for call2_dtype, call2_opnum, cls in _call2_classes:
+        if dtype is call2_dtype and opnum == call2_opnum:
+            return cls(space, left, right)
+    raise AssertionError("unknown operation")
+
+def new_compare(space, opnum, left, right):
+    dtype = _dtype.find_result_dtype(left.dtype, right.dtype)
+    for compare_dtype, compare_opnum, cls in _compare_classes:
+        if dtype is compare_dtype and opnum == compare_opnum:
+            return cls(space, left, right)
+    raise AssertionError("unknown operation")
+
+def reduce_array(space, opnum, node):
+    for reduce_dtype, func in _reducers:
+        if node.dtype is reduce_dtype:
+            return func(opnum, node)
+    raise AssertionError("unknown dtype %s" % (node.dtype.name,))
+
+# ____________________________________________________________
+# operations between arrays and scalars
+
+def _kind_rank(dtype):
+    if dtype.kind == 'b':
+        return 0
+    elif dtype.kind == 'i':
+        return 1
+    else:
+        return 2
+
+def _convert_operands(space, w_a, w_b):
+    """Returns the two operands of a binary operation as arrays of the
+    same shape.  A scalar operand is seen as an array of the shape of the
+    other operand; like in numpy, it only changes the dtype of the result
+    if it is of a different kind (e.g. a float multiplied with an array
+    of ints)."""
+    if isinstance(w_a, BaseArray):
+        a = w_a
+        if isinstance(w_b, BaseArray):
+            b = w_b
+        else:
+            b = _scalar_operand(space, w_b, a)
+    elif isinstance(w_b, BaseArray):
+        b = w_b
+        a = _scalar_operand(space, w_a, b)
+    else:
+        raise OperationError(space.w_TypeError,
+                             space.wrap("expecting NumArray object"))
+    if a.shape != b.shape:
+        raise OperationError(space.w_ValueError,
+                             space.wrap("shape mismatch: objects cannot be "
+                                        "broadcast to a single shape"))
+    return a, b
+
+def _scalar_operand(space, w_value, other):
+    dtype = _dtype.find_scalar_dtype(space, w_value)
+    if _kind_rank(dtype) <= _kind_rank(other.dtype):
+        dtype = other.dtype
+    return new_scalar(space, dtype, w_value, other.shape, other.size)
+
+def binop_w(space, opnum, w_a, w_b):
+    a, b = _convert_operands(space, w_a, w_b)
+    return space.wrap(new_binop(space, opnum, a, b))
+
+def compare_w(space, opnum, w_a, w_b):
+    a, b = _convert_operands(space, w_a, w_b)
+    return space.wrap(new_compare(space, opnum, a, b))
+
+def dot(space, w_a, w_b):
+    if not isinstance(w_a, BaseArray) or not isinstance(w_b, BaseArray):
+        raise OperationError(space.w_TypeError,
+                             space.wrap("expecting NumArray object"))
+    if len(w_a.shape) != 1 or len(w_b.shape) != 1:
+        raise OperationError(space.w_ValueError,
+                             space.wrap("dot() only supports 1-d arrays"))
+    a, b = _convert_operands(space, w_a, w_b)
+    # computed in one loop, without making the array of the products
+    return reduce_array(space, ADD, new_binop(space, MUL, a, b))
+dot.unwrap_spec = [ObjSpace, W_Root, W_Root]
+
+# ____________________________________________________________
+
 def compute_pos(space, indexes, dim):
     current = 1
     pos = 0
@@ -61,67 +575,40 @@ def compute_pos(space, indexes, dim):
         current *= d
     return pos
 
-class MultiDimArray(BaseNumArray):
-    def __init__(self, space, dim, dtype):
-        self.dim = dim
-        self.space = space
-        # ignore dtype for now
-        size = 1
-        for el in dim:
-            size *= el
-        self.storage = [0] * size
-        make_sure_not_resized(self.storage)
-
-    def _unpack_indexes(self, space, w_index):
-        indexes = [space.int_w(w_i) for w_i in space.fixedview(w_index)]
-        if len(indexes) != len(self.dim):
-            raise OperationError(space.w_IndexError, space.wrap(
-                'Wrong index'))
-        return indexes
-
-    def descr_getitem(self, w_index):
-        space = self.space
-        indexes = self._unpack_indexes(space, w_index)
-        pos = compute_pos(space, indexes, self.dim)
-        return space.wrap(self.storage[pos])
-    descr_getitem.unwrap_spec = ['self', W_Root]
-
-    def descr_setitem(self, w_index, value):
-        space = self.space
-        indexes = self._unpack_indexes(space, w_index)
-        pos = compute_pos(space, indexes, self.dim)
-        self.storage[pos] = value
-        return space.w_None
-    descr_setitem.unwrap_spec = ['self', W_Root, int]
-
-    def descr_len(self):
-        return self.space.wrap(self.dim[0])
-    descr_len.unwrap_spec = ['self']
-
-MultiDimArray.typedef = TypeDef(
-    'NumArray',
-    __getitem__ = interp2app(MultiDimArray.descr_getitem),
-    __setitem__ = interp2app(MultiDimArray.descr_setitem),
-    __len__     = interp2app(MultiDimArray.descr_len),
-)
-
 def unpack_dim(space, w_dim):
     if space.is_true(space.isinstance(w_dim, space.w_int)):
         return [space.int_w(w_dim)]
     dim_w = space.fixedview(w_dim)
     return [space.int_w(w_i) for w_i in dim_w]
 
-def unpack_dtype(space, w_dtype):
-    if space.is_w(w_dtype, space.w_int):
-        return 'i'
-    else:
-        raise NotImplementedError
-
-def zeros(space, w_dim, w_dtype):
+def zeros(space, w_dim, w_dtype=NoneNotWrapped):
     dim = unpack_dim(space, w_dim)
-    dtype = unpack_dtype(space, w_dtype)
-    if len(dim) == 1:
-        return space.wrap(NumArray(space, dim[0], dtype))
-    else:
-        return space.wrap(MultiDimArray(space, dim, dtype))
+    size = 1
+    for d in dim:
+        if d < 0:
+            raise OperationError(space.w_ValueError,
+                                 space.wrap("negative dimensions are not "
+                                            "allowed"))
+        size *= d
+    if w_dtype is None:
+        w_dtype = space.w_None
+    dtype = _dtype.unpack_dtype(space, w_dtype)
+    return space.wrap(new_array(space, dtype, dim, size))
 zeros.unwrap_spec = [ObjSpace, W_Root, W_Root]
+
+def array(space, w_items, w_dtype=NoneNotWrapped):
+    items_w = space.fixedview(w_items)
+    if w_dtype is None and not items_w:
+        dtype = _dtype.float64_dtype        # like numpy
+    elif w_dtype is None:
+        dtype = _dtype.bool_dtype
+        for w_item in items_w:
+            dtype = _dtype.find_result_dtype(
+                dtype, _dtype.find_scalar_dtype(space, w_item))
+    else:
+        dtype = _dtype.unpack_dtype(space, w_dtype)
+    result = new_array(space, dtype, [len(items_w)], len(items_w))
+    for i in range(len(items_w)):
+        result.setitem_w(i, items_w[i])
+    return space.wrap(result)
+array.unwrap_spec = [ObjSpace, W_Root, W_Root]
@@ -0,0 +1,24 @@
+# The signature of an array is a description of the shape of its
+# expression tree, e.g. 'add:float64(float64, scalar:float64)'.  It is
+# the green key of the JitDrivers that force or reduce an expression, so
+# that the JIT compiles one fused loop for every kind of expression.
+# Signatures are interned, which makes them comparable by identity.
+
+class Signature(object):
+    _immutable_fields_ = ['key']
+
+    def __init__(self, key):
+        self.key = key
+
+    def __repr__(self):
+        return '<Signature %s>' % (self.key,)
+
+_signatures = {}
+
+def get_signature(key):
+    try:
+        return _signatures[key]
+    except KeyError:
+        signature = Signature(key)
+        _signatures[key] = signature
+        return signature
@@ -40,6 +40,154 @@ class AppTestNumpy(object):
         assert len(x) == 5
         raises(ValueError, minimum, ar, zeros(3, dtype=int))
 
+    def test_dtypes(self):
+        from numpy import zeros, array, float64, int32, int64, bool_
+        assert zeros(3).dtype is float64
+        assert zeros(3, dtype=int).dtype is int64
+        assert zeros(3, dtype='int32').dtype is int32
+        assert zeros(3, dtype=bool).dtype is bool_
+        assert float64.name == 'float64'
+        assert repr(int32) == "dtype('int32')"
+        raises(TypeError, zeros, 3, dtype='xyz')
+        assert array([1, 2]).dtype is int64
+        assert array([1, 2.5]).dtype is float64
+        assert array([True, False]).dtype is bool_
+        assert array([]).dtype is float64
+        assert array([], dtype=int).dtype is int64
+        assert array([1, 2], dtype=float64)[1] == 2.0
+
+    def test_storage(self):
+        from numpy import zeros
+        ar = zeros(3, dtype='int32')
+        ar[0] = 2 ** 31 + 5
+        assert ar[0] == -2 ** 31 + 5
+        ar = zeros(3, dtype=bool)
+        ar[1] = 42
+        assert ar[1] is True
+        assert ar[0] is False
+        ar = zeros(3)
+        ar[2] = 1.5
+        assert ar[2] == 1.5
+        assert isinstance(ar[0], float)
+
+    def test_binops(self):
+        from numpy import array, add, subtract, multiply, divide, maximum
+        a = array([1, 2, 3, -7])
+        b = array([4, 5, 6, 2])
+        assert list(a + b) == [5, 7, 9, -5]
+        assert list(subtract(a, b)) == [-3, -3, -3, -9]
+        assert list(multiply(a, b)) == [4, 10, 18, -14]
+        assert list(b / a) == [4, 2, 2, -1]
+        assert list(a / b) == [0, 0, 0, -4]
+        assert list(maximum(a, b)) == [4, 5, 6, 2]
+        assert list(add(a, b)) == list(a + b)
+        # like numpy, an integer division by zero gives zero
+        assert list(divide(a, array([1, 0, 1, 1]))) == [1, 0, 3, -7]
+        raises(ValueError, "a + array([1, 2])")
+        raises(TypeError, add, 1, 2)
+
+    def test_binops_scalar(self):
+        from numpy import array, int32, float64
+        a = array([1, 2, 3], dtype='int32')
+        b = a * 2
+        assert b.dtype is int32
+        assert list(b) == [2, 4, 6]
+        assert list(10 - a) == [9, 8, 7]
+        c = a * 0.5
+        assert c.dtype is float64
+        assert list(c) == [0.5, 1.0, 1.5]
+
+    def test_float_division(self):
+        from numpy import array
+        a = array([1.0, -1.0, 0.0, 3.0])
+        b = array([0.0, 0.0, 0.0, 2.0])
+        c = a / b
+        assert c[0] == float('inf')
+        assert c[1] == float('-inf')
+        assert c[2] != c[2]
+        assert c[3] == 1.5
+
+    def test_coercion(self):
+        from numpy import array, float64, int64
+        a = array([1, 2, 3], dtype='int32')
+        b = array([0.5, 0.5, 0.5])
+        c = a + b
+        assert c.dtype is float64
+        assert list(c) == [1.5, 2.5, 3.5]
+        d = array([True, False, True]) + array([1, 2, 3])
+        assert d.dtype is int64
+        assert list(d) == [2, 2, 4]
+
+    def test_comparisons(self):
+        from numpy import array, less, equal, bool_
+        a = array([1, 2, 3])
+        b = array([3.0, 2.0, 1.0])
+        c = a < b
+        assert c.dtype is bool_
+        assert list(c) == [True, False, False]
+        assert list(a == b) == [False, True, False]
+        assert list(a >= 2) == [False, True, True]
+        assert list(less(b, a)) == [False, False, True]
+        assert list(equal(a, a)) == [True, True, True]
+
+    def test_reductions(self):
+        from numpy import array, zeros
+        a = array([3, -1, 8, 2])
+        assert a.sum() == 12
+        assert a.min() == -1
+        assert a.max() == 8
+        b = array([1.5, 2.5])
+        assert b.sum() == 4.0
+        assert zeros(0).sum() == 0.0
+        raises(ValueError, zeros(0).min)
+        c = array([True, False, True])
+        assert c.sum() == 2
+        assert c.max() is True
+        assert c.min() is False
+
+    def test_lazy_operations(self):
+        from numpy import array
+        a = array([1.0, 2.0, 3.0])
+        b = array([4.0, 5.0, 6.0])
+        c = a + b
+        d = c * a
+        e = d - 1
+        a[0] = 100.0        # c, d and e are computed before a is changed
+        assert list(c) == [5.0, 7.0, 9.0]
+        assert list(d) == [5.0, 14.0, 27.0]
+        assert list(e) == [4.0, 13.0, 26.0]
+        assert list(a + b) == [104.0, 7.0, 9.0]
+
+    def test_setitem_lazy(self):
+        from numpy import array
+        a = array([1, 2, 3])
+        b = a * 2
+        c = b + 1
+        b[1] = 42
+        assert list(b) == [2, 42, 6]
+        assert list(c) == [3, 5, 7]
+        assert (b + 1)[1] == 43
+        assert b.sum() == 50
+
+    def test_lazy_reductions(self):
+        from numpy import array
+        a = array([1, 2, 3])
+        b = array([3, 2, 1])
+        assert (a * b).sum() == 10
+        assert (a - b).min() == -2
+        assert (a - b).max() == 2
+        assert (a < b).sum() == 1
+
+    def test_dot(self):
+        from numpy import array, dot, zeros
+        a = array([1, 2, 3])
+        b = array([4.0, 5.0, 6.0])
+        assert dot(a, a) == 14
+        assert dot(a, b) == 32.0
+        assert a.dot(b) == 32.0
+        raises(ValueError, dot, a, array([1, 2]))
+        raises(ValueError, dot, zeros((2, 2)), zeros((2, 2)))
+
 class AppTestMultiDim(object):
     def setup_class(cls):
         cls.space = gettestobjspace(usemodules=('micronumpy',))
@@ -63,3 +211,17 @@ class AppTestMultiDim(object):
     def test_len(self):
         from numpy import zeros
         assert len(zeros((3, 2, 1), dtype=int)) == 3
+
+    def test_shape(self):
+        from numpy import zeros
+        assert zeros((3, 2)).shape == (3, 2)
+        assert zeros(5).shape == (5,)
+
+    def test_multidim_binop(self):
+        from numpy import zeros
+        a = zeros((2, 2))
+        a[1, 0] = 3.0
+        b = a + a
+        assert b[1, 0] == 6.0
+        assert b.sum() == 6.0
+        raises(ValueError, "a + zeros(4)")
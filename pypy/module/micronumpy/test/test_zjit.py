@@ -0,0 +1,172 @@
+from pypy.jit.metainterp.test.test_basic import LLJitMixin
+from pypy.rlib.objectmodel import specialize
+from pypy.rpython.lltypesystem import rffi
+from pypy.interpreter.baseobjspace import W_Root
+from pypy.module.micronumpy import numarray
+from pypy.module.micronumpy.numarray import VirtualArray, ADD, SUB, MUL, LT
+from pypy.module.micronumpy.dtype import float64_dtype, int64_dtype
+from pypy.module.micronumpy.dtype import int32_dtype
+
+
+class W_Float(W_Root):
+    def __init__(self, floatval):
+        self.floatval = floatval
+
+class FakeSpace(object):
+    def _freeze_(self):
+        return True
+
+    @specialize.argtype(1)
+    def wrap(self, x):
+        if isinstance(x, W_Root):
+            return x
+        return W_Float(float(x))
+
+    def newbool(self, b):
+        return W_Float(float(b))
+
+    def float_w(self, w_x):
+        assert isinstance(w_x, W_Float)
+        return w_x.floatval
+
+    def float(self, w_x):
+        return w_x
+
+def new_float_array(space, n):
+    a = numarray.new_array(space, float64_dtype, [n], n)
+    for i in range(n):
+        a.storage[i] = float(i)
+    return a
+
+
+class TestNumpyLazy(object):
+    def setup_class(cls):
+        cls.space = FakeSpace()
+
+    def test_virtual(self):
+        a = new_float_array(self.space, 5)
+        b = numarray.new_binop(self.space, MUL, a, a)
+        c = numarray.new_binop(self.space, ADD, a, b)
+        assert isinstance(c, VirtualArray)
+        assert c.signature.key == 'add:float64(float64, ' \
+                                  'multiply:float64(float64, float64))'
+        assert c.signature is numarray.new_binop(self.space, ADD, a, b
+                                                 ).signature
+        assert c.eval_float(3) == 12.0
+        assert c.forced_result is None
+        result = c.get_concrete()
+        assert c.forced_result is result
+        assert [result.storage[i] for i in range(5)] == [0, 2, 6, 12, 20]
+        assert b.forced_result is None    # fused in the loop computing c
+        assert c.left is None
+
+    def test_invalidate(self):
+        a = new_float_array(self.space, 5)
+        b = numarray.new_binop(self.space, ADD, a, a)
+        a.invalidated()
+        assert b.forced_result is not None
+        assert a.invalidates == []
+
+    def test_invalidates_list_is_pruned(self):
+        a = new_float_array(self.space, 5)
+        for i in range(100):
+            numarray.new_binop(self.space, ADD, a, a)
+        assert len(a.invalidates) < 50
+
+
+class TestNumpyJit(LLJitMixin):
+    def setup_class(cls):
+        cls.space = FakeSpace()
+
+    def test_fused_expression(self):
+        space = self.space
+        def f(n, opnum):
+            a = new_float_array(space, n)
+            b = new_float_array(space, n)
+            c = numarray.new_binop(space, MUL, b, a)
+            d = numarray.new_binop(space, opnum, a, c)
+            result = d.get_concrete()
+            return result.eval_float(n - 1)
+
+        res = self.meta_interp(f, [30, ADD], listops=True)
+        assert res == 29.0 + 29.0 * 29.0
+        # one loop, with no temporary array for 'b * a'
+        self.check_loops(getarrayitem_raw=3, float_add=1, float_mul=1,
+                         setarrayitem_raw=1, int_add=1, int_lt=1)
+        self.check_loops(new_array=0, call=0, new_with_vtable=0)
+
+    def test_reduce(self):
+        space = self.space
+        def f(n, opnum):
+            a = numarray.new_array(space, int64_dtype, [n], n)
+            for i in range(n):
+                a.storage[i] = i
+            b = numarray.new_binop(space, SUB, a, a)
+            w_res = numarray.reduce_array(space, opnum,
+                                          numarray.new_binop(space, ADD, a, b))
+            assert isinstance(w_res, W_Float)
+            return w_res.floatval
+
+        res = self.meta_interp(f, [30, ADD], listops=True)
+        assert res == 435.0
+        # the sum of 'a + (a - a)', without computing any array
+        self.check_loops(getarrayitem_raw=3, int_sub=1, int_add=3,
+                         int_lt=1, guard_true=1, jump=1)
+        self.check_loops(setarrayitem_raw=0, call=0)
+
+    def test_dot(self):
+        space = self.space
+        def f(n, opnum):
+            a = new_float_array(space, n)
+            # this is how dot() is computed
+            w_res = numarray.reduce_array(space, opnum,
+                                          numarray.new_binop(space, MUL, a, a))
+            assert isinstance(w_res, W_Float)
+            return w_res.floatval
+
+        res = self.meta_interp(f, [30, ADD], listops=True)
+        assert res == 8555.0
+        self.check_loops(getarrayitem_raw=2, float_mul=1, float_add=1,
+                         int_add=1, int_lt=1, call=0)
+
+    def test_int32(self):
+        space = self.space
+        def f(n, opnum):
+            a = numarray.new_array(space, int32_dtype, [n], n)
+            for i in range(n):
+                a.storage[i] = rffi.cast(rffi.INT, i)
+            b = numarray.new_binop(space, MUL, a, a)
+            c = numarray.new_binop(space, opnum, a, b)
+            result = c.get_concrete()
+            assert result.dtype is int32_dtype
+            return result.eval_int(n - 1)
+
+        res = self.meta_interp(f, [30, ADD], listops=True)
+        assert res == 29 + 29 * 29
+        # the int32 items are computed with as machine words, and the
+        # result is wrapped around to 32 bits (int_sub, int_and and one
+        # int_add) before it is written back; no call, no temporary array
+        self.check_loops(getarrayitem_raw=3, int_mul=1, int_add=3,
+                         int_sub=1, int_and=1, setarrayitem_raw=1, int_lt=1)
+        self.check_loops(new_array=0, call=0, new_with_vtable=0)
+
+    def test_bool(self):
+        space = self.space
+        def f(n, cmpnum, opnum):
+            a = new_float_array(space, n)
+            b = numarray.new_array(space, float64_dtype, [n], n)
+            for i in range(n):
+                b.storage[i] = 10.0
+            c = numarray.new_compare(space, cmpnum, a, b)
+            assert c.dtype.name == 'bool'
+            # sum() of a bool array counts the True items
+            w_res = numarray.reduce_array(space, opnum, c)
+            assert isinstance(w_res, W_Float)
+            return w_res.floatval
+
+        res = self.meta_interp(f, [30, LT, ADD], listops=True)
+        assert res == 10.0
+        # the comparison is fused in the loop of the reduce
+        self.check_loops(getarrayitem_raw=2, float_lt=1, int_add=2,
+                         int_lt=1, call=0)
+        self.check_loops(setarrayitem_raw=0, new_array=0)
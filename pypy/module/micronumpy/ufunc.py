@@ -1,22 +1,30 @@
-
-from numarray import NumArray
 from pypy.interpreter.baseobjspace import ObjSpace, W_Root
-from pypy.interpreter.error import OperationError
+from pypy.module.micronumpy import numarray
+
+def _make_binop_ufunc(opnum):
+    def ufunc(space, w_a, w_b):
+        return numarray.binop_w(space, opnum, w_a, w_b)
+    ufunc.unwrap_spec = [ObjSpace, W_Root, W_Root]
+    ufunc.func_name = numarray.BINOP_NAMES[opnum]
+    return ufunc
+
+def _make_compare_ufunc(opnum):
+    def ufunc(space, w_a, w_b):
+        return numarray.compare_w(space, opnum, w_a, w_b)
+    ufunc.unwrap_spec = [ObjSpace, W_Root, W_Root]
+    ufunc.func_name = numarray.COMPARE_NAMES[opnum]
+    return ufunc
+
+add = _make_binop_ufunc(numarray.ADD)
+subtract = _make_binop_ufunc(numarray.SUB)
+multiply = _make_binop_ufunc(numarray.MUL)
+divide = _make_binop_ufunc(numarray.DIV)
+minimum = _make_binop_ufunc(numarray.MINIMUM)
+maximum = _make_binop_ufunc(numarray.MAXIMUM)
 
-def minimum(space, w_a, w_b):
-    if not isinstance(w_a, NumArray) or not isinstance(w_b, NumArray):
-        raise OperationError(space.w_TypeError,
-                             space.wrap("expecting NumArrat object"))
-    if w_a.dim != w_b.dim:
-        raise OperationError(space.w_ValueError,
-                             space.wrap("minimum of arrays of different length"))
-    res = NumArray(space, w_a.dim, 'i')
-    for i in range(len(w_a.storage)):
-        one = w_a.storage[i]
-        two = w_b.storage[i]
-        if one < two:
-            res.storage[i] = one
-        else:
-            res.storage[i] = two
-    return space.wrap(res)
-minimum.unwrap_spec = [ObjSpace, W_Root, W_Root]
+equal = _make_compare_ufunc(numarray.EQ)
+not_equal = _make_compare_ufunc(numarray.NE)
+less = _make_compare_ufunc(numarray.LT)
+less_equal = _make_compare_ufunc(numarray.LE)
+greater = _make_compare_ufunc(numarray.GT)
+greater_equal = _make_compare_ufunc(numarray.GE)
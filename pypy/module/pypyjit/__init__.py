@@ -2,10 +2,19 @@ from pypy.interpreter.mixedmodule import MixedModule
 
 class Module(MixedModule):
     appleveldefs = {
+        'save_warmup_profile': 'app_warmup.save_warmup_profile',
+        'load_warmup_profile': 'app_warmup.load_warmup_profile',
     }
 
     interpleveldefs = {
         'set_param':    'interp_jit.set_param',
+        'get_memory_stats': 'interp_jit.get_memory_stats',
+        'get_stats':    'interp_jit.get_stats',
+        'set_compile_hook': 'interp_jit.set_compile_hook',
+        'set_abort_hook': 'interp_jit.set_abort_hook',
+        'set_invalidate_hook': 'interp_jit.set_invalidate_hook',
+        'get_warmup_profile': 'interp_jit.get_warmup_profile',
+        'set_warmup_profile': 'interp_jit.set_warmup_profile',
     }
 
     def setup_after_space_initialization(self):
@@ -15,5 +24,10 @@ class Module(MixedModule):
         from pypy.rlib.jit import PARAMETERS
         space = self.space
         # XXX this is not really the default compiled into a pypy-c-jit XXX
-        w_obj = space.wrap(PARAMETERS)
+        defaults = PARAMETERS.copy()
+        # the translation driver turns inlining on for the jitdrivers of a
+        # pypy-c-jit (apply_jit(inline=True)); it is off by default for the
+        # other interpreters.  See also leave_inlined_loop() in pyjitpl.py.
+        defaults['inlining'] = True
+        w_obj = space.wrap(defaults)
         space.setattr(space.wrap(self), space.wrap('defaults'), w_obj)
@@ -0,0 +1,45 @@
+# NOT_RPYTHON
+
+def _build_id():
+    # a profile is only used by the same build that wrote it
+    import sys
+    return 'pypyjit warmup profile: ' + ' '.join(sys.version.split())
+
+def save_warmup_profile(filename):
+    """Save to 'filename' the places where the JIT compiled loops so far.
+    Loading this file with load_warmup_profile() at the start of a later
+    process makes the JIT trace these places as soon as they are reached,
+    instead of waiting for them to become hot again.
+    """
+    import os, pypyjit
+    keys = [key for key in pypyjit.get_warmup_profile() if '\n' not in key]
+    tmpname = '%s.%d.tmp' % (filename, os.getpid())
+    f = open(tmpname, 'w')
+    try:
+        f.write(_build_id() + '\n')
+        for key in keys:
+            f.write(key + '\n')
+    finally:
+        f.close()
+    os.rename(tmpname, filename)
+
+def load_warmup_profile(filename):
+    """Load a file written by save_warmup_profile().  Returns the number of
+    places that the JIT will trace eagerly.  A missing file, or a file
+    written by a different build of PyPy, is ignored and gives 0.  Code
+    whose source changed in the meantime is not affected.
+    """
+    import pypyjit
+    try:
+        f = open(filename, 'r')
+    except IOError:
+        return 0
+    try:
+        lines = f.read().split('\n')
+    finally:
+        f.close()
+    if lines[0] != _build_id():
+        return 0
+    keys = [line for line in lines[1:] if line]
+    pypyjit.set_warmup_profile(keys)
+    return len(keys)
@@ -5,15 +5,15 @@ This is transformed to become a JIT by code elsewhere: pypy/jit/*
 
 from pypy.tool.pairtype import extendabletype
 from pypy.rlib.rarithmetic import r_uint, intmask
-from pypy.rlib.jit import JitDriver, hint, we_are_jitted
+from pypy.rlib.jit import JitDriver, hint, we_are_jitted, jit_stats
 import pypy.interpreter.pyopcode   # for side-effects
 from pypy.interpreter.error import OperationError, operationerrfmt
-from pypy.interpreter.gateway import ObjSpace, Arguments
-from pypy.interpreter.pycode import PyCode, CO_CONTAINSLOOP
+from pypy.interpreter.gateway import ObjSpace, W_Root, Arguments
+from pypy.interpreter.pycode import PyCode
 from pypy.interpreter.pyframe import PyFrame
 from pypy.interpreter.pyopcode import ExitFrame
 from opcode import opmap
-from pypy.rlib.objectmodel import we_are_translated
+from pypy.rlib.objectmodel import we_are_translated, compute_hash
 
 PyFrame._virtualizable2_ = ['last_instr', 'pycode',
                             'valuestackdepth', 'valuestack_w[*]',
@@ -24,9 +24,6 @@ PyFrame._virtualizable2_ = ['last_instr', 'pycode',
 
 JUMP_ABSOLUTE = opmap['JUMP_ABSOLUTE']
 
-def can_inline(next_instr, bytecode):
-    return not bool(bytecode.co_flags & CO_CONTAINSLOOP)
-
 def get_printable_location(next_instr, bytecode):
     from pypy.tool.stdlib_opcode import opcode_method_names
     name = opcode_method_names[ord(bytecode.co_code[next_instr])]
@@ -38,11 +35,104 @@ def get_jitcell_at(next_instr, bytecode):
 def set_jitcell_at(newcell, next_instr, bytecode):
     bytecode.jit_cells[next_instr] = newcell
 
+def is_preheated(next_instr, bytecode):
+    profile = bytecode.space.fromcache(WarmupProfile)
+    if len(profile.preheated) == 0:
+        return False
+    key = warmup_key(next_instr, bytecode)
+    if key not in profile.preheated:
+        return False
+    del profile.preheated[key]     # only the first time
+    return True
+
 def confirm_enter_jit(next_instr, bytecode, frame, ec):
     return (frame.w_f_trace is None and
             ec.profilefunc is None and
             ec.w_tracefunc is None)
 
+# The hooks called by the JIT, which forward the events to the app-level
+# hooks installed with set_compile_hook() and friends.  They are called
+# in the middle of the JIT's work, so the app-level hooks should not do
+# much; in particular, events are not reported while a hook is running.
+
+class HookCache(object):
+    def __init__(self, space):
+        self.w_compile_hook = space.w_None
+        self.w_abort_hook = space.w_None
+        self.w_invalidate_hook = space.w_None
+        self.in_hook = False
+
+def call_hook(space, w_hook, args_w):
+    cache = space.fromcache(HookCache)
+    if cache.in_hook or space.is_w(w_hook, space.w_None):
+        return
+    cache.in_hook = True
+    try:
+        try:
+            space.call(w_hook, space.newtuple(args_w))
+        except OperationError, e:
+            e.write_unraisable(space, "jit hook ", w_hook)
+    finally:
+        cache.in_hook = False
+
+# The warmup profile: the places where loops were compiled, recorded so
+# that a later process can start tracing there right away (see
+# app_warmup.py).  A compiled loop cannot be reused by another process
+# because it contains addresses of this process; so we only save where the
+# loops start, identified by the code object and the position in it.
+
+class WarmupProfile(object):
+    def __init__(self, space):
+        self.compiled = {}     # keys of the loops compiled so far
+        self.preheated = {}    # keys loaded from a previous process
+
+def warmup_key(next_instr, bytecode):
+    # the hash of co_code makes the key change if the source is edited
+    return '%d %d %d %d %s %s' % (compute_hash(bytecode.co_code),
+                                  len(bytecode.co_code),
+                                  intmask(next_instr),
+                                  bytecode.co_firstlineno,
+                                  bytecode.co_name,
+                                  bytecode.co_filename)
+
+def on_compile(loop_number, next_instr, bytecode):
+    space = bytecode.space
+    profile = space.fromcache(WarmupProfile)
+    profile.compiled[warmup_key(next_instr, bytecode)] = None
+    w_hook = space.fromcache(HookCache).w_compile_hook
+    call_hook(space, w_hook, [space.wrap('loop'), space.wrap(bytecode),
+                              space.wrap(intmask(next_instr)),
+                              space.wrap(loop_number)])
+
+def on_compile_bridge(loop_number, next_instr, bytecode):
+    space = bytecode.space
+    w_hook = space.fromcache(HookCache).w_compile_hook
+    call_hook(space, w_hook, [space.wrap('bridge'), space.wrap(bytecode),
+                              space.wrap(intmask(next_instr)),
+                              space.wrap(loop_number)])
+
+def on_abort(reason, next_instr, bytecode):
+    from pypy.jit.metainterp import jitprof
+    if reason == jitprof.ABORT_TOO_LONG:
+        reason_str = 'trace too long'
+    elif reason == jitprof.ABORT_BRIDGE:
+        reason_str = 'bridge'
+    elif reason == jitprof.ABORT_ESCAPE:
+        reason_str = 'escape'
+    else:
+        reason_str = '?'
+    space = bytecode.space
+    w_hook = space.fromcache(HookCache).w_abort_hook
+    call_hook(space, w_hook, [space.wrap(reason_str), space.wrap(bytecode),
+                              space.wrap(intmask(next_instr))])
+
+def on_invalidate(loop_number, next_instr, bytecode):
+    space = bytecode.space
+    w_hook = space.fromcache(HookCache).w_invalidate_hook
+    call_hook(space, w_hook, [space.wrap(bytecode),
+                              space.wrap(intmask(next_instr)),
+                              space.wrap(loop_number)])
+
 
 class PyPyJitDriver(JitDriver):
     reds = ['frame', 'ec']
@@ -57,11 +147,20 @@ class PyPyJitDriver(JitDriver):
 ##        blockstack = frame.blockstack
 ##        return (valuestackdepth, blockstack)
 
-pypyjitdriver = PyPyJitDriver(can_inline = can_inline,
-                              get_printable_location = get_printable_location,
+# Note that there is no can_inline: functions that contain loops are
+# inlined too.  When the tracer reaches the header of a loop inside an
+# inlined function, it stops inlining and emits a call to the portal at
+# that loop header instead, which becomes a CALL_ASSEMBLER if the loop is
+# already compiled (see leave_inlined_loop() in pyjitpl.py).
+pypyjitdriver = PyPyJitDriver(get_printable_location = get_printable_location,
                               get_jitcell_at = get_jitcell_at,
                               set_jitcell_at = set_jitcell_at,
-                              confirm_enter_jit = confirm_enter_jit)
+                              confirm_enter_jit = confirm_enter_jit,
+                              is_preheated = is_preheated,
+                              on_compile = on_compile,
+                              on_compile_bridge = on_compile_bridge,
+                              on_abort = on_abort,
+                              on_invalidate = on_invalidate)
 
 class __extend__(PyFrame):
 
@@ -131,3 +230,99 @@ def set_param(space, args):
                                   "no JIT parameter '%s'", key)
 
 set_param.unwrap_spec = [ObjSpace, Arguments]
+
+def get_memory_stats(space):
+    '''Return a dict with the number of loops and bridges compiled by the
+    JIT so far, and the number of them that were freed again because they
+    were not used any more (see the 'loop_longevity' parameter).
+    '''
+    w_result = space.newdict()
+    for name, value in [
+            ('compiled_loops',   jit_stats.total_compiled_loops),
+            ('compiled_bridges', jit_stats.total_compiled_bridges),
+            ('freed_loops',      jit_stats.total_freed_loops),
+            ('freed_bridges',    jit_stats.total_freed_bridges)]:
+        space.setitem(w_result, space.wrap(name), space.wrap(value))
+    return w_result
+
+get_memory_stats.unwrap_spec = [ObjSpace]
+
+def get_stats(space):
+    '''Return a dict {loop number: dict of counters} about the loops
+    compiled by the JIT that are still alive.  The counters are:
+        * location:       the place in the Python code where the loop starts
+        * entries:        how many times the loop was entered from the
+                          interpreter
+        * bridges:        number of bridges attached to the loop
+        * guard_failures: a dict {guard number: number of failures}, for
+                          the guards of the loop and of its bridges
+        * trace_length:   number of operations of the loop and its bridges
+        * asm_size:       size of their machine code (0 if unknown)
+    '''
+    w_result = space.newdict()
+    for loopstats in jit_stats.loops.values():
+        w_failures = space.newdict()
+        for index, count in loopstats.guard_failures.items():
+            space.setitem(w_failures, space.wrap(index), space.wrap(count))
+        w_loop = space.newdict()
+        for name, w_value in [
+                ('location',       space.wrap(loopstats.location)),
+                ('entries',        space.wrap(loopstats.entry_count)),
+                ('bridges',        space.wrap(loopstats.bridge_count)),
+                ('guard_failures', w_failures),
+                ('trace_length',   space.wrap(loopstats.trace_length)),
+                ('asm_size',       space.wrap(loopstats.asm_size))]:
+            space.setitem(w_loop, space.wrap(name), w_value)
+        space.setitem(w_result, space.wrap(loopstats.number), w_loop)
+    return w_result
+
+get_stats.unwrap_spec = [ObjSpace]
+
+def set_compile_hook(space, w_hook):
+    '''Install a function called as hook(kind, code, next_instr,
+    loop_number) every time the JIT compiled a loop (kind == 'loop') or a
+    bridge attached to the loop (kind == 'bridge').  Pass None to remove
+    the hook.
+    '''
+    space.fromcache(HookCache).w_compile_hook = w_hook
+
+set_compile_hook.unwrap_spec = [ObjSpace, W_Root]
+
+def set_abort_hook(space, w_hook):
+    '''Install a function called as hook(reason, code, next_instr) every
+    time the JIT gave up tracing, with reason one of 'trace too long',
+    'bridge' or 'escape'.  Pass None to remove the hook.
+    '''
+    space.fromcache(HookCache).w_abort_hook = w_hook
+
+set_abort_hook.unwrap_spec = [ObjSpace, W_Root]
+
+def set_invalidate_hook(space, w_hook):
+    '''Install a function called as hook(code, next_instr, loop_number)
+    every time the JIT threw away a loop because it was not used any more
+    (see the 'loop_longevity' parameter).  Pass None to remove the hook.
+    '''
+    space.fromcache(HookCache).w_invalidate_hook = w_hook
+
+set_invalidate_hook.unwrap_spec = [ObjSpace, W_Root]
+
+def get_warmup_profile(space):
+    '''Return the list of keys describing where the JIT compiled loops so
+    far.  See save_warmup_profile().
+    '''
+    profile = space.fromcache(WarmupProfile)
+    return space.newlist([space.wrap(key) for key in profile.compiled])
+
+get_warmup_profile.unwrap_spec = [ObjSpace]
+
+def set_warmup_profile(space, w_keys):
+    '''Make the JIT start tracing immediately, instead of waiting for the
+    threshold, when it reaches one of the places described by the given
+    keys (as returned by get_warmup_profile() in a previous process).
+    '''
+    profile = space.fromcache(WarmupProfile)
+    profile.preheated.clear()
+    for w_key in space.listview(w_keys):
+        profile.preheated[space.str_w(w_key)] = None
+
+set_warmup_profile.unwrap_spec = [ObjSpace, W_Root]
@@ -1,9 +1,36 @@
 from pypy.conftest import gettestobjspace
+from pypy.interpreter.gateway import interp2app, ObjSpace
+from pypy.interpreter.pycode import PyCode
+from pypy.rlib.rarithmetic import r_uint
+from pypy.tool.udir import udir
 
 class AppTestPyPyJIT:
     def setup_class(cls):
         space = gettestobjspace(usemodules=('pypyjit',))
         cls.space = space
+        from pypy.module.pypyjit import interp_jit
+        from pypy.jit.metainterp.jitprof import ABORT_TOO_LONG
+        w_f = space.appexec([], """():
+            def f():
+                pass
+            return f
+        """)
+        pycode = space.interp_w(PyCode, space.getattr(w_f,
+                                                      space.wrap('func_code')))
+        # simulate the events, which are sent by the JIT only
+        def send_events(space):
+            interp_jit.on_compile(3, r_uint(12), pycode)
+            interp_jit.on_compile_bridge(3, r_uint(12), pycode)
+            interp_jit.on_abort(ABORT_TOO_LONG, r_uint(6), pycode)
+            interp_jit.on_invalidate(3, r_uint(12), pycode)
+        def is_preheated(space):
+            return space.wrap(interp_jit.is_preheated(r_uint(12), pycode))
+        cls.w_f = w_f
+        cls.w_send_events = space.wrap(interp2app(send_events,
+                                                  unwrap_spec=[ObjSpace]))
+        cls.w_is_preheated = space.wrap(interp2app(is_preheated,
+                                                   unwrap_spec=[ObjSpace]))
+        cls.w_tmpname = space.wrap(str(udir.join('warmup_profile')))
 
     def test_setup(self):
         # this just checks that the module is setting up things correctly, and
@@ -24,3 +51,92 @@ class AppTestPyPyJIT:
                 i += 1
 
         assert list(gen(3)) == [0, 1, 4]
+
+    def test_defaults(self):
+        import pypyjit
+        assert pypyjit.defaults['inlining']
+        assert pypyjit.defaults['threshold'] > 0
+
+    def test_get_memory_stats(self):
+        import pypyjit
+        stats = pypyjit.get_memory_stats()
+        assert sorted(stats) == ['compiled_bridges', 'compiled_loops',
+                                 'freed_bridges', 'freed_loops']
+        # there is no JIT on top of py.py
+        assert stats['compiled_loops'] == 0
+        pypyjit.set_param(loop_longevity=500)
+
+    def test_get_stats(self):
+        import pypyjit
+        # there is no JIT on top of py.py
+        assert pypyjit.get_stats() == {}
+
+    def test_hooks(self):
+        import pypyjit
+        events = []
+        def compile_hook(*args):
+            events.append(('compile',) + args)
+        def abort_hook(*args):
+            events.append(('abort',) + args)
+        def invalidate_hook(*args):
+            events.append(('invalidate',) + args)
+        pypyjit.set_compile_hook(compile_hook)
+        pypyjit.set_abort_hook(abort_hook)
+        pypyjit.set_invalidate_hook(invalidate_hook)
+        try:
+            self.send_events()
+        finally:
+            pypyjit.set_compile_hook(None)
+            pypyjit.set_abort_hook(None)
+            pypyjit.set_invalidate_hook(None)
+        code = self.f.func_code
+        assert events == [('compile', 'loop', code, 12, 3),
+                          ('compile', 'bridge', code, 12, 3),
+                          ('abort', 'trace too long', code, 6),
+                          ('invalidate', code, 12, 3)]
+        self.send_events()
+        assert len(events) == 4
+
+    def test_hook_raising(self):
+        import pypyjit, sys, StringIO
+        def compile_hook(*args):
+            raise ValueError
+        pypyjit.set_compile_hook(compile_hook)
+        prev_stderr = sys.stderr
+        sys.stderr = StringIO.StringIO()
+        try:
+            self.send_events()
+            err = sys.stderr.getvalue()
+        finally:
+            sys.stderr = prev_stderr
+            pypyjit.set_compile_hook(None)
+        assert 'ValueError' in err
+        assert 'jit hook' in err
+
+    def test_warmup_profile(self):
+        import pypyjit
+        assert not self.is_preheated()
+        self.send_events()
+        keys = pypyjit.get_warmup_profile()
+        assert len(keys) == 1
+        assert 'test_jit_setup' not in keys[0]    # the file name is <string>
+        assert ' f ' in keys[0]
+        pypyjit.save_warmup_profile(self.tmpname)
+        #
+        assert pypyjit.load_warmup_profile(self.tmpname) == 1
+        assert self.is_preheated()
+        assert not self.is_preheated()    # only the first time
+        #
+        pypyjit.set_warmup_profile(['1 2 12 3 f <unknown>'])
+        assert not self.is_preheated()
+        pypyjit.set_warmup_profile([])
+
+    def test_warmup_profile_other_build(self):
+        import pypyjit
+        assert pypyjit.load_warmup_profile(self.tmpname + '-missing') == 0
+        f = open(self.tmpname + '-other', 'w')
+        f.write('pypyjit warmup profile: some other build\n')
+        f.write(pypyjit.get_warmup_profile()[0] + '\n')
+        f.close()
+        assert pypyjit.load_warmup_profile(self.tmpname + '-other') == 0
+        assert not self.is_preheated()
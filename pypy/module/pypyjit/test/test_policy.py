@@ -36,7 +36,8 @@ def test_pypy_module():
     assert pypypolicy.look_inside_pypy_module('__builtin__.abstractinst')
     assert pypypolicy.look_inside_pypy_module('__builtin__.functional')
     assert pypypolicy.look_inside_pypy_module('exceptions.interp_exceptions')
-    for modname in 'pypyjit', 'signal', 'micronumpy', 'math', 'imp':
+    for modname in ('pypyjit', 'signal', 'micronumpy', 'math', 'imp', '_sre',
+                    'array', '_collections', '_csv'):
         assert pypypolicy.look_inside_pypy_module(modname)
         assert pypypolicy.look_inside_pypy_module(modname + '.foo')
 
@@ -603,6 +603,22 @@ class PyPyCJITTests(object):
         # XXX I would like here to say that it's 0, but unfortunately
         #     call that can raise is not exchanged into getarrayitem_gc
 
+    def test_array_sum(self):
+        self.run_source('''
+        from array import array
+
+        def main():
+            img = array("i", range(128) * 5) * 480
+            l, i = 0, 0
+            while i < 640 * 480:
+                l += img[i]
+                i += 1
+            return l
+        ''', 60, ([], 19507200))
+        bytecode, = self.get_by_bytecode('BINARY_SUBSCR')
+        assert bytecode.get_opnames('getarrayitem_raw')
+        assert not bytecode.get_opnames('call')
+
     def test_overflow_checking(self):
         self.run_source('''
         def main():
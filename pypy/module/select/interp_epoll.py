@@ -0,0 +1,134 @@
+from pypy.interpreter.typedef import TypeDef, GetSetProperty
+from pypy.interpreter.baseobjspace import Wrappable
+from pypy.interpreter.gateway import W_Root, ObjSpace, interp2app
+from pypy.interpreter.error import OperationError, operationerrfmt
+from pypy.interpreter.error import wrap_oserror
+from pypy.module.select.interp_select import as_fd_w
+from pypy.rlib import repoll
+
+defaultevents = repoll.EPOLLIN | repoll.EPOLLOUT | repoll.EPOLLPRI
+
+# the default maximum number of events returned by a single poll()
+DEFAULT_MAXEVENTS = 1023
+
+
+class W_Epoll(Wrappable):
+    def __init__(self, space, epfd):
+        self.space = space
+        self.epfd = epfd
+
+    def __del__(self):
+        if self.epfd >= 0:
+            epfd = self.epfd
+            self.epfd = -1
+            try:
+                repoll.epoll_close(epfd)
+            except OSError:
+                pass
+
+    def check_closed(self):
+        if self.epfd < 0:
+            raise OperationError(self.space.w_ValueError,
+                self.space.wrap("I/O operation on closed epoll fd"))
+
+    def close(self, space):
+        if self.epfd >= 0:
+            epfd = self.epfd
+            self.epfd = -1
+            try:
+                repoll.epoll_close(epfd)
+            except OSError, e:
+                raise wrap_oserror(space, e, exception_name='w_IOError')
+    close.unwrap_spec = ['self', ObjSpace]
+
+    def fileno(self, space):
+        self.check_closed()
+        return space.wrap(self.epfd)
+    fileno.unwrap_spec = ['self', ObjSpace]
+
+    def _ctl(self, space, op, w_fd, events):
+        self.check_closed()
+        fd = as_fd_w(space, w_fd)
+        try:
+            repoll.epoll_ctl(self.epfd, op, fd, events)
+        except OSError, e:
+            raise wrap_oserror(space, e, exception_name='w_IOError')
+
+    def register(self, space, w_fd, events=defaultevents):
+        self._ctl(space, repoll.EPOLL_CTL_ADD, w_fd, events)
+    register.unwrap_spec = ['self', ObjSpace, W_Root, int]
+
+    def modify(self, space, w_fd, events):
+        self._ctl(space, repoll.EPOLL_CTL_MOD, w_fd, events)
+    modify.unwrap_spec = ['self', ObjSpace, W_Root, int]
+
+    def unregister(self, space, w_fd):
+        self._ctl(space, repoll.EPOLL_CTL_DEL, w_fd, 0)
+    unregister.unwrap_spec = ['self', ObjSpace, W_Root]
+
+    def poll(self, space, timeout=-1.0, maxevents=-1):
+        self.check_closed()
+        if timeout < 0:
+            timeout_ms = -1
+        else:
+            timeout_ms = int(timeout * 1000 + 0.5)
+        if maxevents == -1:
+            maxevents = DEFAULT_MAXEVENTS
+        elif maxevents < 1:
+            raise operationerrfmt(space.w_ValueError,
+                "maxevents must be greater than 0, not %d", maxevents)
+        try:
+            retval = repoll.epoll_wait(self.epfd, maxevents, timeout_ms)
+        except OSError, e:
+            raise wrap_oserror(space, e, exception_name='w_IOError')
+
+        retval_w = []
+        for fd, revents in retval:
+            retval_w.append(space.newtuple([space.wrap(fd),
+                                            space.wrap(revents)]))
+        return space.newlist(retval_w)
+    poll.unwrap_spec = ['self', ObjSpace, float, int]
+
+
+def descr_epoll__new__(space, w_subtype, sizehint=-1):
+    if sizehint < -1 or sizehint == 0:
+        raise OperationError(space.w_ValueError,
+                             space.wrap("sizehint must be greater than zero"))
+    try:
+        epfd = repoll.epoll_create(sizehint)
+    except OSError, e:
+        raise wrap_oserror(space, e, exception_name='w_IOError')
+    epoll = space.allocate_instance(W_Epoll, w_subtype)
+    W_Epoll.__init__(epoll, space, epfd)
+    return space.wrap(epoll)
+descr_epoll__new__.unwrap_spec = [ObjSpace, W_Root, int]
+
+def descr_epoll_fromfd(space, w_subtype, fd):
+    epoll = space.allocate_instance(W_Epoll, w_subtype)
+    W_Epoll.__init__(epoll, space, fd)
+    return space.wrap(epoll)
+descr_epoll_fromfd.unwrap_spec = [ObjSpace, W_Root, int]
+
+def descr_epoll_closed(space, epoll):
+    return space.newbool(epoll.epfd < 0)
+
+epollmethods = {}
+for methodname in 'close fileno register modify unregister poll'.split():
+    method = getattr(W_Epoll, methodname)
+    assert hasattr(method,'unwrap_spec'), methodname
+    assert method.im_func.func_code.co_argcount == len(method.unwrap_spec), methodname
+    epollmethods[methodname] = interp2app(method, unwrap_spec=method.unwrap_spec)
+
+W_Epoll.typedef = TypeDef(
+    'select.epoll',
+    __doc__ = """select.epoll([sizehint=-1])
+
+Returns an epolling object.  sizehint must be a positive integer
+or -1 for the default size.  The hint is used to optimize internal
+data structures.  It doesn't limit the maximum number of monitored
+events.""",
+    __new__ = interp2app(descr_epoll__new__),
+    fromfd = interp2app(descr_epoll_fromfd, as_classmethod=True),
+    closed = GetSetProperty(descr_epoll_closed, cls=W_Epoll,
+                            doc="True if the epoll handler is closed"),
+    **epollmethods)
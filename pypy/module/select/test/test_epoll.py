@@ -0,0 +1,96 @@
+import py, sys
+from pypy.conftest import gettestobjspace
+
+class AppTestEpoll:
+    def setup_class(cls):
+        if not sys.platform.startswith('linux'):
+            py.test.skip("epoll is only available on Linux")
+        cls.space = gettestobjspace(usemodules=('select',))
+
+    def test_create(self):
+        import select
+        ep = select.epoll()
+        assert isinstance(ep.fileno(), int)
+        assert not ep.closed
+        ep.close()
+        assert ep.closed
+        raises(ValueError, ep.fileno)
+        ep.close()     # no-op
+        raises(ValueError, select.epoll, 0)
+        raises(ValueError, select.epoll, -2)
+        ep = select.epoll(16)
+        ep.close()
+
+    def test_fromfd(self):
+        import select
+        ep = select.epoll()
+        ep2 = select.epoll.fromfd(ep.fileno())
+        assert ep2.fileno() == ep.fileno()
+        ep.close()
+        raises(IOError, ep2.register, 0)
+
+    def test_register_unregister(self):
+        import os, select, errno
+        readend, writeend = os.pipe()
+        ep = select.epoll()
+        try:
+            ep.register(readend, select.EPOLLIN)
+            ep.register(writeend)
+            exc = raises(IOError, ep.register, readend)
+            assert exc.value.errno == errno.EEXIST
+            ep.modify(writeend, select.EPOLLOUT)
+            ep.unregister(readend)
+            exc = raises(IOError, ep.unregister, readend)
+            assert exc.value.errno == errno.ENOENT
+            exc = raises(IOError, ep.modify, readend, select.EPOLLIN)
+            assert exc.value.errno == errno.ENOENT
+            raises(ValueError, ep.register, -1)
+            raises(TypeError, ep.register, "foo")
+        finally:
+            ep.close()
+            os.close(readend)
+            os.close(writeend)
+
+    def test_poll(self):
+        import os, time, select
+        readend, writeend = os.pipe()
+        ep = select.epoll()
+        try:
+            ep.register(readend, select.EPOLLIN)
+            start = time.time()
+            assert ep.poll(0.3) == []
+            assert time.time() - start > 0.25
+            ep.register(writeend, select.EPOLLOUT)
+            assert ep.poll(0) == [(writeend, select.EPOLLOUT)]
+            os.write(writeend, 'X')
+            events = ep.poll(1)
+            assert sorted(events) == sorted([(readend, select.EPOLLIN),
+                                             (writeend, select.EPOLLOUT)])
+            assert len(ep.poll(-1, 1)) == 1
+            raises(ValueError, ep.poll, 1, 0)
+            os.close(writeend)
+            writeend = -1
+            events = ep.poll(1)
+            assert len(events) == 1
+            assert events[0][0] == readend
+            assert events[0][1] & select.EPOLLHUP
+        finally:
+            ep.close()
+            os.close(readend)
+            if writeend >= 0:
+                os.close(writeend)
+        raises(ValueError, ep.poll)
+
+    def test_fileobject(self):
+        import os, select
+        readend, writeend = os.pipe()
+        f = os.fdopen(writeend, 'w')
+        ep = select.epoll()
+        try:
+            ep.register(f, select.EPOLLOUT)
+            assert ep.poll(0) == [(writeend, select.EPOLLOUT)]
+            ep.unregister(f)
+        finally:
+            ep.close()
+            f.close()
+            os.close(readend)
@@ -12,7 +12,7 @@ like: (on the left, without the new bytecodes; on the right, with them)
 
 from pypy.interpreter import function
 from pypy.objspace.descroperation import object_getattribute
-from pypy.rlib import rstack # for resume points
+from pypy.rlib import jit, rstack # for resume points
 
 # This module exports two extra methods for StdObjSpaceFrame implementing
 # the LOOKUP_METHOD and CALL_METHOD opcodes in an efficient way, as well
@@ -33,6 +33,12 @@ def LOOKUP_METHOD(f, nameindex, *ignored):
     w_name = f.getname_w(nameindex)
     w_value = None
 
+    if space.config.objspace.std.withmapdict and not jit.we_are_jitted():
+        # first try the inline cache of the instances with maps
+        from pypy.objspace.std.mapdict import LOOKUP_METHOD_mapdict
+        if LOOKUP_METHOD_mapdict(f, nameindex, w_obj):
+            return
+
     w_type = space.type(w_obj)
     if w_type.has_object_getattribute():
         name = space.str_w(w_name)
@@ -48,6 +54,12 @@ def LOOKUP_METHOD(f, nameindex, *ignored):
                 if w_value is None:
                     # fast method path: a function object in the class,
                     # nothing in the instance
+                    if (space.config.objspace.std.withmapdict and
+                            not jit.we_are_jitted()):
+                        from pypy.objspace.std.mapdict import \
+                            LOOKUP_METHOD_mapdict_fill_cache_method
+                        LOOKUP_METHOD_mapdict_fill_cache_method(
+                            f.getcode(), nameindex, w_obj, w_type, w_descr)
                     f.pushvalue(w_descr)
                     f.pushvalue(w_obj)
                     return
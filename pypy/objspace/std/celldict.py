@@ -139,3 +139,68 @@ class ModuleDictIteratorImplementation(IteratorImplementation):
                 return (self.space.wrap(key), cell.w_value)
         else:
             return None, None
+
+# ____________________________________________________________
+# inline cache for the LOAD_GLOBAL bytecode
+
+class GlobalCacheEntry(object):
+    """The cells of a name in the globals and in the builtins.  The
+    cells of a ModuleDictImplementation never change, they are only
+    emptied when the name is deleted or the dict becomes an r_dict.
+    'builtins_cell' is None if the builtins have no cell for the name."""
+
+    def __init__(self, w_globals, globals_cell, builtins, w_builtins_dict,
+                 builtins_cell):
+        self.w_globals = w_globals
+        self.globals_cell = globals_cell
+        self.builtins = builtins
+        self.w_builtins_dict = w_builtins_dict
+        self.builtins_cell = builtins_cell
+
+def init_globals_cache(pycode):
+    num_entries = len(pycode.co_names_w)
+    pycode._globals_caches = [None] * num_entries
+
+def LOAD_GLOBAL_caching(f, nameindex):
+    # not used when we_are_jitted(): the JIT uses getcell() directly
+    entry = f.getcode()._globals_caches[nameindex]
+    if entry is not None and entry.w_globals is f.w_globals:
+        w_globals = entry.w_globals
+        if w_globals.r_dict_content is None:
+            w_value = entry.globals_cell.w_value
+            if w_value is not None:
+                return w_value
+            builtins_cell = entry.builtins_cell
+            if (builtins_cell is not None and
+                    entry.builtins is f.get_builtin() and
+                    entry.w_builtins_dict.r_dict_content is None):
+                w_value = builtins_cell.w_value
+                if w_value is not None:
+                    return w_value
+    return LOAD_GLOBAL_slowpath(f, nameindex)
+LOAD_GLOBAL_caching._always_inline_ = True
+
+def LOAD_GLOBAL_slowpath(f, nameindex):
+    from pypy.interpreter.module import Module
+    varname = f.getname_u(nameindex)
+    w_value = f._load_global(varname)
+    w_globals = f.w_globals
+    builtins = f.get_builtin()
+    assert isinstance(builtins, Module)
+    w_builtins_dict = builtins.w_dict
+    if (isinstance(w_globals, ModuleDictImplementation) and
+            w_globals.r_dict_content is None and
+            isinstance(w_builtins_dict, ModuleDictImplementation) and
+            w_builtins_dict.r_dict_content is None):
+        # only cache the cells that already exist: creating empty ones
+        # would change the size of the dicts seen by app-level code.
+        # Without a cell in the globals, a later assignment to the name
+        # would not be noticed by the cache.
+        globals_cell = w_globals.getcell(varname, False)
+        if globals_cell is not None:
+            entry = GlobalCacheEntry(w_globals, globals_cell, builtins,
+                                     w_builtins_dict,
+                                     w_builtins_dict.getcell(varname, False))
+            f.getcode()._globals_caches[nameindex] = entry
+    return w_value
+LOAD_GLOBAL_slowpath._dont_inline_ = True
@@ -60,6 +60,11 @@ class W_DictMultiObject(W_Object):
         elif instance or strdict or module:
             assert w_type is None
             return StrDictImplementation(space)
+        elif ((space.config.objspace.std.withintdict or
+               space.config.objspace.std.withidentitydict) and
+              (w_type is None or space.is_w(w_type, space.w_dict))):
+            from pypy.objspace.std.keytypedict import KeyTypeDictImplementation
+            return KeyTypeDictImplementation(space)
         else:
             if w_type is None:
                 w_type = space.w_dict
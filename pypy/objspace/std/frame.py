@@ -2,6 +2,7 @@
 
 import operator
 
+from pypy.rlib import jit
 from pypy.rlib.unroll import unrolling_iterable
 from pypy.interpreter import pyopcode, function
 from pypy.interpreter.pyframe import PyFrame
@@ -20,7 +21,7 @@ class BaseFrame(PyFrame):
         w = f.popvalue()
         v = f.popvalue()
         if type(v) is W_ListObject:
-            v.append(w)
+            v.append(f.space, w)
         else:
             f.space.call_method(v, 'append', w)
 
@@ -58,7 +59,7 @@ def list_BINARY_SUBSCR(f, oparg, next_instr):
     w_1 = f.popvalue()
     if type(w_1) is W_ListObject and type(w_2) is intobject.W_IntObject:
         try:
-            w_result = w_1.wrappeditems[w_2.intval]
+            w_result = w_1.getitem(f.space, w_2.intval)
         except IndexError:
             raise OperationError(f.space.w_IndexError,
                 f.space.wrap("list index out of range"))
@@ -66,6 +67,23 @@ def list_BINARY_SUBSCR(f, oparg, next_instr):
         w_result = f.space.getitem(w_1, w_2)
     f.pushvalue(w_result)
 
+def mapdict_LOAD_ATTR(f, nameindex, next_instr):
+    w_obj = f.popvalue()
+    if jit.we_are_jitted():
+        w_value = f.space.getattr(w_obj, f.getname_w(nameindex))
+    else:
+        from pypy.objspace.std.mapdict import LOAD_ATTR_caching
+        w_value = LOAD_ATTR_caching(f.getcode(), w_obj, nameindex)
+    f.pushvalue(w_value)
+
+def celldict_LOAD_GLOBAL(f, nameindex, next_instr):
+    if jit.we_are_jitted():
+        w_value = f._load_global(f.getname_u(nameindex))
+    else:
+        from pypy.objspace.std.celldict import LOAD_GLOBAL_caching
+        w_value = LOAD_GLOBAL_caching(f, nameindex)
+    f.pushvalue(w_value)
+
 def CALL_LIKELY_BUILTIN(f, oparg, next_instr):
     w_globals = f.w_globals
     num = oparg >> 8
@@ -145,6 +163,10 @@ def build_frame(space):
             StdObjSpaceFrame.BINARY_ADD = int_BINARY_ADD
     if space.config.objspace.std.optimized_list_getitem:
         StdObjSpaceFrame.BINARY_SUBSCR = list_BINARY_SUBSCR
+    if space.config.objspace.std.withmapdict:
+        StdObjSpaceFrame.LOAD_ATTR = mapdict_LOAD_ATTR
+    if space.config.objspace.std.withcelldict:
+        StdObjSpaceFrame.LOAD_GLOBAL = celldict_LOAD_GLOBAL
     if space.config.objspace.opcodes.CALL_LIKELY_BUILTIN:
         StdObjSpaceFrame.CALL_LIKELY_BUILTIN = CALL_LIKELY_BUILTIN
     if space.config.objspace.opcodes.CALL_METHOD:
@@ -0,0 +1,232 @@
+""" A dict implementation for plain dicts whose keys are all ints, or all
+instances of user-defined classes that compare and hash by identity.
+The former are stored unboxed, the latter in a dict that doesn't call
+__eq__ and __hash__.  An empty dict can switch between the two kinds; any
+other key makes the dict fall back to the general r_dict."""
+
+from pypy.objspace.std.dictmultiobject import IteratorImplementation
+from pypy.objspace.std.dictmultiobject import W_DictMultiObject
+from pypy.objspace.std.typeobject import ComparesByIdentityVersion
+
+
+def _never_equal_to_identity_key(space, w_lookup_type):
+    # builtin types whose __eq__ never claims to be equal to an instance
+    # of a class that doesn't override __eq__ or __cmp__
+    return (space.is_w(w_lookup_type, space.w_NoneType) or
+            space.is_w(w_lookup_type, space.w_int) or
+            space.is_w(w_lookup_type, space.w_bool) or
+            space.is_w(w_lookup_type, space.w_float) or
+            space.is_w(w_lookup_type, space.w_str)
+            )
+
+def _never_equal_to_int(space, w_lookup_type):
+    return (space.is_w(w_lookup_type, space.w_NoneType) or
+            space.is_w(w_lookup_type, space.w_str)
+            )
+
+
+class KeyTypeDictImplementation(W_DictMultiObject):
+    """Exactly one of 'intcontent' and 'identitycontent' is a dict, until
+    the implementation falls back to the r_dict; then both are None.
+    'identity_version' is the ComparesByIdentityVersion that was current
+    when the identity dict was made: the keys may no longer compare by
+    identity if it changed."""
+
+    intcontent = None
+    identitycontent = None
+    identity_version = None
+
+    def __init__(self, space):
+        self.space = space
+        if space.config.objspace.std.withintdict:
+            self.intcontent = {}
+        else:
+            self._switch_to_identity()
+
+    def _switch_to_ints(self):
+        self.intcontent = {}
+        self.identitycontent = None
+        self.identity_version = None
+
+    def _switch_to_identity(self):
+        self.intcontent = None
+        self.identitycontent = {}
+        version = self.space.fromcache(ComparesByIdentityVersion).version
+        self.identity_version = version
+
+    def _is_int_key(self, w_key):
+        space = self.space
+        return (space.config.objspace.std.withintdict and
+                space.is_w(space.type(w_key), space.w_int))
+
+    def _is_identity_key(self, w_key):
+        space = self.space
+        return (space.config.objspace.std.withidentitydict and
+                space.type(w_key).compares_by_identity())
+
+    def _identity_still_valid(self):
+        """Return False, after falling back to the r_dict, if a class of
+        the keys may have started to override __eq__, __cmp__ or
+        __hash__."""
+        if self.identitycontent is None:
+            return True
+        version = self.space.fromcache(ComparesByIdentityVersion).version
+        if self.identity_version is version:
+            return True
+        if len(self.identitycontent) == 0:
+            self.identity_version = version
+            return True
+        self._as_rdict()
+        return False
+
+    def impl_setitem(self, w_key, w_value):
+        if not self._identity_still_valid():
+            self.setitem(w_key, w_value)
+            return
+        space = self.space
+        if self._is_int_key(w_key):
+            if self.intcontent is None:
+                if len(self.identitycontent) > 0:
+                    self._as_rdict().setitem(w_key, w_value)
+                    return
+                self._switch_to_ints()
+            self.intcontent[space.int_w(w_key)] = w_value
+        elif self._is_identity_key(w_key):
+            if self.identitycontent is None:
+                if len(self.intcontent) > 0:
+                    self._as_rdict().setitem(w_key, w_value)
+                    return
+                self._switch_to_identity()
+            self.identitycontent[w_key] = w_value
+        else:
+            self._as_rdict().setitem(w_key, w_value)
+
+    def impl_setitem_str(self, key, w_value, shadows_type=True):
+        self._as_rdict().setitem_str(key, w_value)
+
+    def impl_delitem(self, w_key):
+        if not self._identity_still_valid():
+            self.delitem(w_key)
+            return
+        space = self.space
+        w_key_type = space.type(w_key)
+        if self.intcontent is not None:
+            if (space.is_w(w_key_type, space.w_int) or
+                    space.is_w(w_key_type, space.w_bool)):
+                del self.intcontent[space.int_w(w_key)]
+                return
+            elif (_never_equal_to_int(space, w_key_type) or
+                  self._is_identity_key(w_key)):
+                raise KeyError
+        else:
+            if self._is_identity_key(w_key):
+                del self.identitycontent[w_key]
+                return
+            elif _never_equal_to_identity_key(space, w_key_type):
+                raise KeyError
+        if self.impl_length() == 0:
+            raise KeyError
+        self._as_rdict().delitem(w_key)
+
+    def impl_length(self):
+        if self.intcontent is not None:
+            return len(self.intcontent)
+        return len(self.identitycontent)
+
+    def impl_getitem_str(self, key):
+        if not self._identity_still_valid():
+            return self.getitem_str(key)
+        # a str is never equal to an int or to an identity key
+        return None
+
+    def impl_getitem(self, w_key):
+        if not self._identity_still_valid():
+            return self.getitem(w_key)
+        space = self.space
+        w_lookup_type = space.type(w_key)
+        if self.intcontent is not None:
+            if (space.is_w(w_lookup_type, space.w_int) or
+                    space.is_w(w_lookup_type, space.w_bool)):
+                return self.intcontent.get(space.int_w(w_key), None)
+            elif (_never_equal_to_int(space, w_lookup_type) or
+                  self._is_identity_key(w_key)):
+                return None
+        else:
+            if self._is_identity_key(w_key):
+                return self.identitycontent.get(w_key, None)
+            elif _never_equal_to_identity_key(space, w_lookup_type):
+                return None
+        if self.impl_length() == 0:
+            return None
+        return self._as_rdict().getitem(w_key)
+
+    def impl_iter(self):
+        if self.intcontent is not None:
+            return IntDictIteratorImplementation(self.space, self)
+        return IdentityDictIteratorImplementation(self.space, self)
+
+    def impl_keys(self):
+        space = self.space
+        if self.intcontent is not None:
+            return [space.wrap(key) for key in self.intcontent.iterkeys()]
+        return self.identitycontent.keys()
+
+    def impl_values(self):
+        if self.intcontent is not None:
+            return self.intcontent.values()
+        return self.identitycontent.values()
+
+    def impl_items(self):
+        space = self.space
+        if self.intcontent is not None:
+            return [space.newtuple([space.wrap(key), w_value])
+                        for (key, w_value) in self.intcontent.iteritems()]
+        return [space.newtuple([w_key, w_value])
+                    for (w_key, w_value) in self.identitycontent.iteritems()]
+
+    def impl_clear(self):
+        if self.intcontent is not None:
+            self.intcontent.clear()
+        else:
+            self.identitycontent.clear()
+
+    def _as_rdict(self):
+        r_dict_content = self.initialize_as_rdict()
+        if self.intcontent is not None:
+            for k, w_v in self.intcontent.items():
+                r_dict_content[self.space.wrap(k)] = w_v
+        else:
+            for w_k, w_v in self.identitycontent.items():
+                r_dict_content[w_k] = w_v
+        self._clear_fields()
+        return self
+
+    def _clear_fields(self):
+        self.intcontent = None
+        self.identitycontent = None
+        self.identity_version = None
+
+
+class IntDictIteratorImplementation(IteratorImplementation):
+    def __init__(self, space, dictimplementation):
+        IteratorImplementation.__init__(self, space, dictimplementation)
+        self.iterator = dictimplementation.intcontent.iteritems()
+
+    def next_entry(self):
+        # note that this 'for' loop only runs once, at most
+        for key, w_value in self.iterator:
+            return self.space.wrap(key), w_value
+        else:
+            return None, None
+
+class IdentityDictIteratorImplementation(IteratorImplementation):
+    def __init__(self, space, dictimplementation):
+        IteratorImplementation.__init__(self, space, dictimplementation)
+        self.iterator = dictimplementation.identitycontent.iteritems()
+
+    def next_entry(self):
+        # note that this 'for' loop only runs once, at most
+        for item in self.iterator:
+            return item
+        else:
+            return None, None
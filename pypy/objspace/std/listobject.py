@@ -1,36 +1,721 @@
+import sys
 from pypy.objspace.std.model import registerimplementation, W_Object
 from pypy.objspace.std.register_all import register_all
 from pypy.objspace.std.multimethod import FailedToImplement
 from pypy.interpreter.error import OperationError, operationerrfmt
 from pypy.objspace.std.inttype import wrapint
+from pypy.objspace.std.stringtype import wrapstr
 from pypy.objspace.std.listtype import get_list_index
 from pypy.objspace.std.sliceobject import W_SliceObject, normalize_simple_slice
 
 from pypy.objspace.std import slicetype
 from pypy.interpreter import gateway, baseobjspace
-from pypy.rlib.listsort import TimSort
+from pypy.rlib.listsort import TimSort, make_timsort_class
+from pypy.rlib.rarithmetic import isnan
+from pypy.rlib import jit
+from pypy.rlib.debug import make_sure_not_resized
 from pypy.interpreter.argument import Signature
 
 class W_ListObject(W_Object):
+    """A list.  How the items are stored depends on its 'strategy', which
+    is one of the prebuilt ListStrategy instances below.  With the
+    'withliststrategies' option, lists that only contain ints, floats or
+    strs keep them unwrapped in 'intitems', 'floatitems' or 'stritems',
+    and switch to a list of wrapped objects in 'wrappeditems' as soon as
+    an item of another type is added.  Without the option, all lists
+    store their items in 'wrappeditems'.
+    """
     from pypy.objspace.std.listtype import list_typedef as typedef
-    
+
+    intitems = None
+    floatitems = None
+    stritems = None
+
     def __init__(w_self, wrappeditems):
+        w_self.strategy = object_strategy
         w_self.wrappeditems = wrappeditems
 
+    @staticmethod
+    def from_wrappeditems(space, list_w):
+        """Make a new list with the items 'list_w', picking the most
+        compact strategy for them.  'list_w' is not copied if it ends up
+        being used as 'wrappeditems'."""
+        if not space.config.objspace.std.withliststrategies:
+            return W_ListObject(list_w)
+        if len(list_w) == 0:
+            return empty_strategy.new_list()
+        strategy = get_strategy_from_item(space, list_w[0])
+        if strategy is not object_strategy:
+            for w_item in list_w:
+                if not strategy.is_correct_type(space, w_item):
+                    return W_ListObject(list_w)
+            return strategy.new_list_from_wrappeditems(space, list_w)
+        return W_ListObject(list_w)
+
     def __repr__(w_self):
         """ representation for debugging purposes """
-        return "%s(%s)" % (w_self.__class__.__name__, w_self.wrappeditems)
+        return "%s(%s, %s)" % (w_self.__class__.__name__,
+                               w_self.strategy.__class__.__name__,
+                               w_self._get_storage_for_repr())
+
+    def _get_storage_for_repr(w_self):
+        "NOT_RPYTHON"
+        for storage in [w_self.wrappeditems, w_self.intitems,
+                        w_self.floatitems, w_self.stritems]:
+            if storage is not None:
+                return storage
+        return []
 
     def unwrap(w_list, space):
-        items = [space.unwrap(w_item) for w_item in w_list.wrappeditems]# XXX generic mixed types unwrap
+        items = [space.unwrap(w_item) for w_item in w_list.getitems(space)]# XXX generic mixed types unwrap
         return list(items)
 
-    def append(w_list, w_item):
-        w_list.wrappeditems.append(w_item)
+    def get_strategy(w_self):
+        # the strategy is a prebuilt instance: let the JIT know which one
+        return jit.hint(w_self.strategy, promote=True)
+
+    def clear_storage(w_self):
+        w_self.wrappeditems = None
+        w_self.intitems = None
+        w_self.floatitems = None
+        w_self.stritems = None
+
+    def set_wrappeditems(w_self, items_w):
+        object_strategy.init_storage(w_self, items_w)
+
+    def switch_to_object_strategy(w_self, space):
+        """Make sure that the items are stored in 'wrappeditems'."""
+        if w_self.strategy is not object_strategy:
+            w_self.set_wrappeditems(w_self.getitems_copy(space))
+
+    def clear(w_self, space):
+        if space.config.objspace.std.withliststrategies:
+            empty_strategy.init_storage(w_self)
+        else:
+            w_self.set_wrappeditems([])
+
+    # the following methods are implemented by the strategy; getitem(),
+    # setitem(), pop() and delitem() raise IndexError for a bad index
+
+    def length(w_self):
+        return w_self.get_strategy().length(w_self)
+
+    def getitem(w_self, space, index):
+        return w_self.get_strategy().getitem(space, w_self, index)
+
+    def getitems(w_self, space):
+        """Return the items as a list of wrapped objects.  This may be
+        the storage of the list itself: don't modify it."""
+        return w_self.get_strategy().getitems(space, w_self)
+
+    def getitems_copy(w_self, space):
+        return w_self.get_strategy().getitems_copy(space, w_self)
+
+    def getitems_fixedsize(w_self, space):
+        """Like getitems_copy(), but the result must not be resized."""
+        return w_self.get_strategy().getitems_fixedsize(space, w_self)
+
+    def getslice(w_self, space, start, step, slicelength):
+        return w_self.get_strategy().getslice(space, w_self, start, step,
+                                              slicelength)
+
+    def setitem(w_self, space, index, w_item):
+        w_self.get_strategy().setitem(space, w_self, index, w_item)
+
+    def setslice(w_self, space, start, step, slicelength, sequence_w):
+        w_self.get_strategy().setslice(space, w_self, start, step,
+                                       slicelength, sequence_w)
+
+    def append(w_self, space, w_item):
+        w_self.get_strategy().append(space, w_self, w_item)
+
+    def insert(w_self, space, index, w_item):
+        w_self.get_strategy().insert(space, w_self, index, w_item)
+
+    def extend(w_self, space, w_other):
+        assert isinstance(w_other, W_ListObject)
+        w_self.get_strategy().extend(space, w_self, w_other)
+
+    def pop(w_self, space, index):
+        return w_self.get_strategy().pop(space, w_self, index)
+
+    def delitem(w_self, index):
+        w_self.get_strategy().delitem(w_self, index)
+
+    def deleteslice(w_self, start, step, slicelength):
+        w_self.get_strategy().deleteslice(w_self, start, step, slicelength)
+
+    def mul(w_self, times):
+        return w_self.get_strategy().mul(w_self, times)
+
+    def inplace_mul(w_self, times):
+        w_self.get_strategy().inplace_mul(w_self, times)
+
+    def reverse(w_self):
+        w_self.get_strategy().reverse(w_self)
+
+    def find(w_self, space, w_item, start, stop):
+        """Return the index of the first item equal to 'w_item' between
+        'start' and 'stop', or -1."""
+        return w_self.get_strategy().find(space, w_self, w_item, start, stop)
+
+    def equal_storage(w_self, space, w_other):
+        # only called if both lists have the same strategy and length
+        return w_self.get_strategy().equal_storage(space, w_self, w_other)
+
+    def sort_unwrapped(w_self, reverse):
+        """Sort the items without calling app-level code, if the strategy
+        can do that.  Return False if it cannot."""
+        return w_self.get_strategy().sort_unwrapped(w_self, reverse)
 
 registerimplementation(W_ListObject)
 
 
+def normalize_index(length, index):
+    if index < 0:
+        index += length
+        if index < 0:
+            raise IndexError
+    elif index >= length:
+        raise IndexError
+    return index
+
+def get_strategy_from_item(space, w_item):
+    if space.config.objspace.std.withliststrategies:
+        for strategy in unwrapped_strategies:
+            if strategy.is_correct_type(space, w_item):
+                return strategy
+    return object_strategy
+
+def find_generic(space, w_list, w_item, start, stop):
+    # needs to be safe against eq_w() mutating the w_list behind our back
+    i = start
+    while i < stop and i < w_list.length(): # intentionally always calling length!
+        if space.eq_w(w_list.getitem(space, i), w_item):
+            return i
+        i += 1
+    return -1
+
+
+class ListStrategy(object):
+    """The abstract base class of the list strategies.  The strategies
+    are stateless and prebuilt; the W_ListObject is passed to all the
+    methods.  See W_ListObject for the meaning of the methods."""
+
+    def init_empty(self, w_list):
+        "Switch the empty 'w_list' to this strategy."
+        raise NotImplementedError
+
+    def new_list_from_wrappeditems(self, space, items_w):
+        raise NotImplementedError
+
+    def init_from_wrappeditems(self, space, w_list, items_w):
+        "Store 'items_w' into 'w_list'; they must fit this strategy."
+        raise NotImplementedError
+
+    def length(self, w_list):
+        raise NotImplementedError
+
+    def getitem(self, space, w_list, index):
+        raise NotImplementedError
+
+    def getitems(self, space, w_list):
+        raise NotImplementedError
+
+    def getitems_copy(self, space, w_list):
+        raise NotImplementedError
+
+    def getitems_fixedsize(self, space, w_list):
+        raise NotImplementedError
+
+    def getslice(self, space, w_list, start, step, slicelength):
+        raise NotImplementedError
+
+    def setitem(self, space, w_list, index, w_item):
+        raise NotImplementedError
+
+    def setslice(self, space, w_list, start, step, slicelength, sequence_w):
+        raise NotImplementedError
+
+    def append(self, space, w_list, w_item):
+        raise NotImplementedError
+
+    def insert(self, space, w_list, index, w_item):
+        raise NotImplementedError
+
+    def extend(self, space, w_list, w_other):
+        raise NotImplementedError
+
+    def pop(self, space, w_list, index):
+        raise NotImplementedError
+
+    def delitem(self, w_list, index):
+        raise NotImplementedError
+
+    def deleteslice(self, w_list, start, step, slicelength):
+        raise NotImplementedError
+
+    def mul(self, w_list, times):
+        raise NotImplementedError
+
+    def inplace_mul(self, w_list, times):
+        raise NotImplementedError
+
+    def reverse(self, w_list):
+        raise NotImplementedError
+
+    def find(self, space, w_list, w_item, start, stop):
+        raise NotImplementedError
+
+    def equal_storage(self, space, w_list1, w_list2):
+        raise NotImplementedError
+
+    def sort_unwrapped(self, w_list, reverse):
+        raise NotImplementedError
+
+
+class EmptyListStrategy(ListStrategy):
+    """The strategy of the empty lists, which have no storage at all.
+    The first item added picks the strategy of the list."""
+
+    def init_storage(self, w_list):
+        w_list.clear_storage()
+        w_list.strategy = self
+
+    def new_list(self):
+        w_list = W_ListObject(None)
+        self.init_storage(w_list)
+        return w_list
+
+    def init_empty(self, w_list):
+        pass
+
+    def init_from_wrappeditems(self, space, w_list, items_w):
+        assert len(items_w) == 0
+        self.init_storage(w_list)
+
+    def switch_to_strategy_for(self, space, w_list, w_item):
+        get_strategy_from_item(space, w_item).init_empty(w_list)
+
+    def length(self, w_list):
+        return 0
+
+    def getitem(self, space, w_list, index):
+        raise IndexError
+
+    def getitems(self, space, w_list):
+        return []
+
+    def getitems_copy(self, space, w_list):
+        return []
+
+    def getitems_fixedsize(self, space, w_list):
+        return []
+
+    def getslice(self, space, w_list, start, step, slicelength):
+        return self.new_list()
+
+    def setitem(self, space, w_list, index, w_item):
+        raise IndexError
+
+    def setslice(self, space, w_list, start, step, slicelength, sequence_w):
+        assert slicelength == 0
+        if len(sequence_w) == 0:
+            return
+        if step != 1:
+            raise operationerrfmt(space.w_ValueError, "attempt to "
+                  "assign sequence of size %d to extended slice of size %d",
+                  len(sequence_w), slicelength)
+        w_list.extend(space, W_ListObject.from_wrappeditems(space,
+                                                            sequence_w))
+
+    def append(self, space, w_list, w_item):
+        self.switch_to_strategy_for(space, w_list, w_item)
+        w_list.append(space, w_item)
+
+    def insert(self, space, w_list, index, w_item):
+        self.switch_to_strategy_for(space, w_list, w_item)
+        w_list.append(space, w_item)
+
+    def extend(self, space, w_list, w_other):
+        strategy = w_other.get_strategy()
+        if strategy is not self:
+            strategy.init_empty(w_list)
+            w_list.extend(space, w_other)
+
+    def pop(self, space, w_list, index):
+        raise IndexError
+
+    def delitem(self, w_list, index):
+        raise IndexError
+
+    def deleteslice(self, w_list, start, step, slicelength):
+        pass
+
+    def mul(self, w_list, times):
+        return self.new_list()
+
+    def inplace_mul(self, w_list, times):
+        pass
+
+    def reverse(self, w_list):
+        pass
+
+    def find(self, space, w_list, w_item, start, stop):
+        return -1
+
+    def equal_storage(self, space, w_list1, w_list2):
+        return True
+
+    def sort_unwrapped(self, w_list, reverse):
+        return True
+
+
+class AbstractUnwrappedStrategy(object):
+    """The methods of the strategies that store the items in an RPython
+    list.  The subclasses define the attributes 'emptyitem' and
+    'sorterclass', and the methods get_storage(), set_storage(),
+    is_correct_type(), unwrap() and wrap()."""
+    _mixin_ = True
+
+    def init_storage(self, w_list, items):
+        w_list.clear_storage()
+        w_list.strategy = self
+        self.set_storage(w_list, items)
+
+    def init_empty(self, w_list):
+        self.init_storage(w_list, [])
+
+    def new_list(self, items):
+        w_list = W_ListObject(None)
+        self.init_storage(w_list, items)
+        return w_list
+
+    def new_list_from_wrappeditems(self, space, items_w):
+        return self.new_list(self.unwrap_items(space, items_w))
+
+    def init_from_wrappeditems(self, space, w_list, items_w):
+        self.init_storage(w_list, self.unwrap_items(space, items_w))
+
+    def unwrap_items(self, space, items_w):
+        return [self.unwrap(space, w_item) for w_item in items_w]
+
+    def length(self, w_list):
+        return len(self.get_storage(w_list))
+
+    def getitem(self, space, w_list, index):
+        items = self.get_storage(w_list)
+        index = normalize_index(len(items), index)
+        return self.wrap(space, items[index])
+
+    def getitems(self, space, w_list):
+        return [self.wrap(space, item) for item in self.get_storage(w_list)]
+
+    # getitems_copy() and getitems_fixedsize() build lists of their own:
+    # the annotator must not mix them up with the storage of the lists
+
+    def getitems_copy(self, space, w_list):
+        return [self.wrap(space, item) for item in self.get_storage(w_list)]
+
+    def getitems_fixedsize(self, space, w_list):
+        items_w = [self.wrap(space, item) for item in self.get_storage(w_list)]
+        make_sure_not_resized(items_w)
+        return items_w
+
+    def getslice(self, space, w_list, start, step, slicelength):
+        items = self.get_storage(w_list)
+        if step == 1 and 0 <= start:
+            stop = start + slicelength
+            assert stop >= 0
+            return self.new_list(items[start:stop])
+        subitems = [self.emptyitem] * slicelength
+        for i in range(slicelength):
+            subitems[i] = items[start]
+            start += step
+        return self.new_list(subitems)
+
+    def setitem(self, space, w_list, index, w_item):
+        items = self.get_storage(w_list)
+        index = normalize_index(len(items), index)
+        if self.is_correct_type(space, w_item):
+            items[index] = self.unwrap(space, w_item)
+        else:
+            w_list.switch_to_object_strategy(space)
+            w_list.setitem(space, index, w_item)
+
+    def setslice(self, space, w_list, start, step, slicelength, sequence_w):
+        for w_item in sequence_w:
+            if not self.is_correct_type(space, w_item):
+                w_list.switch_to_object_strategy(space)
+                w_list.setslice(space, start, step, slicelength, sequence_w)
+                return
+        sequence2 = self.unwrap_items(space, sequence_w)
+        assert slicelength >= 0
+        items = self.get_storage(w_list)
+        oldsize = len(items)
+        len2 = len(sequence2)
+        if step == 1:  # Support list resizing for non-extended slices
+            delta = slicelength - len2
+            if delta < 0:
+                delta = -delta
+                newsize = oldsize + delta
+                # XXX support this in rlist!
+                items += [self.emptyitem] * delta
+                lim = start+len2
+                i = newsize - 1
+                while i >= lim:
+                    items[i] = items[i-delta]
+                    i -= 1
+            elif start >= 0:
+                del items[start:start+delta]
+            else:
+                assert delta==0
+        elif len2 != slicelength:  # No resize for extended slices
+            raise operationerrfmt(space.w_ValueError, "attempt to "
+                  "assign sequence of size %d to extended slice of size %d",
+                  len2, slicelength)
+
+        if sequence2 is items:
+            if step > 0:
+                # Always copy starting from the right to avoid
+                # having to make a shallow copy in the case where
+                # the source and destination lists are the same list.
+                i = len2 - 1
+                start += i*step
+                while i >= 0:
+                    items[start] = sequence2[i]
+                    start -= step
+                    i -= 1
+                return
+            else:
+                # Make a shallow copy to more easily handle the reversal case
+                sequence2 = list(sequence2)
+        for i in range(len2):
+            items[start] = sequence2[i]
+            start += step
+
+    def append(self, space, w_list, w_item):
+        if self.is_correct_type(space, w_item):
+            self.get_storage(w_list).append(self.unwrap(space, w_item))
+        else:
+            w_list.switch_to_object_strategy(space)
+            w_list.append(space, w_item)
+
+    def insert(self, space, w_list, index, w_item):
+        if self.is_correct_type(space, w_item):
+            self.get_storage(w_list).insert(index, self.unwrap(space, w_item))
+        else:
+            w_list.switch_to_object_strategy(space)
+            w_list.insert(space, index, w_item)
+
+    def extend(self, space, w_list, w_other):
+        if w_other.strategy is self:
+            items = self.get_storage(w_list)
+            items += self.get_storage(w_other)
+        elif w_other.length() > 0:
+            w_list.switch_to_object_strategy(space)
+            w_list.extend(space, w_other)
+
+    def pop(self, space, w_list, index):
+        items = self.get_storage(w_list)
+        index = normalize_index(len(items), index)
+        return self.wrap(space, items.pop(index))
+
+    def delitem(self, w_list, index):
+        items = self.get_storage(w_list)
+        index = normalize_index(len(items), index)
+        del items[index]
+
+    def deleteslice(self, w_list, start, step, slicelength):
+        if slicelength==0:
+            return
+
+        if step < 0:
+            start = start + step * (slicelength-1)
+            step = -step
+
+        items = self.get_storage(w_list)
+        if step == 1:
+            assert start >= 0
+            assert slicelength >= 0
+            del items[start:start+slicelength]
+        else:
+            n = len(items)
+            i = start
+
+            for discard in range(1, slicelength):
+                j = i+1
+                i += step
+                while j < i:
+                    items[j-discard] = items[j]
+                    j += 1
+
+            j = i+1
+            while j < n:
+                items[j-slicelength] = items[j]
+                j += 1
+            start = n - slicelength
+            assert start >= 0 # annotator hint
+            del items[start:]
+
+    def mul(self, w_list, times):
+        return self.new_list(self.get_storage(w_list) * times)
+
+    def inplace_mul(self, w_list, times):
+        items = self.get_storage(w_list)
+        items *= times
+
+    def reverse(self, w_list):
+        self.get_storage(w_list).reverse()
+
+    def find(self, space, w_list, w_item, start, stop):
+        if not self.is_correct_type(space, w_item):
+            return find_generic(space, w_list, w_item, start, stop)
+        # comparing the unwrapped items cannot run app-level code
+        items = self.get_storage(w_list)
+        item = self.unwrap(space, w_item)
+        i = start
+        while i < stop and i < len(items):
+            if items[i] == item:
+                return i
+            i += 1
+        return -1
+
+    def equal_storage(self, space, w_list1, w_list2):
+        return self.get_storage(w_list1) == self.get_storage(w_list2)
+
+    def sort_unwrapped(self, w_list, reverse):
+        items = self.get_storage(w_list)
+        sorter = self.sorterclass(items, len(items))
+        # same trick as below to keep a reverse sort stable
+        if reverse:
+            items.reverse()
+        sorter.sort()
+        if reverse:
+            items.reverse()
+        return True
+
+
+class ObjectListStrategy(AbstractUnwrappedStrategy, ListStrategy):
+    emptyitem = None
+
+    def get_storage(self, w_list):
+        return w_list.wrappeditems
+
+    def set_storage(self, w_list, items_w):
+        w_list.wrappeditems = items_w
+
+    def is_correct_type(self, space, w_item):
+        return True
+
+    def unwrap_items(self, space, items_w):
+        return items_w
+
+    def unwrap(self, space, w_item):
+        return w_item
+
+    def wrap(self, space, w_item):
+        return w_item
+
+    def getitems(self, space, w_list):
+        return w_list.wrappeditems
+
+    def getitems_copy(self, space, w_list):
+        return w_list.wrappeditems[:]
+
+    def getitems_fixedsize(self, space, w_list):
+        items_w = w_list.wrappeditems[:]
+        make_sure_not_resized(items_w)
+        return items_w
+
+    def extend(self, space, w_list, w_other):
+        items_w = w_list.wrappeditems
+        items_w += w_other.getitems(space)
+
+    def find(self, space, w_list, w_item, start, stop):
+        return find_generic(space, w_list, w_item, start, stop)
+
+    def equal_storage(self, space, w_list1, w_list2):
+        return equal_items(space, w_list1, w_list2)
+
+    def sort_unwrapped(self, w_list, reverse):
+        return False
+
+
+class IntegerListStrategy(AbstractUnwrappedStrategy, ListStrategy):
+    emptyitem = 0
+    sorterclass = make_timsort_class()
+
+    def get_storage(self, w_list):
+        return w_list.intitems
+
+    def set_storage(self, w_list, items):
+        w_list.intitems = items
+
+    def is_correct_type(self, space, w_item):
+        return space.is_w(space.type(w_item), space.w_int)
+
+    def unwrap(self, space, w_item):
+        return space.int_w(w_item)
+
+    def wrap(self, space, item):
+        return wrapint(space, item)
+
+
+class FloatListStrategy(AbstractUnwrappedStrategy, ListStrategy):
+    emptyitem = 0.0
+    sorterclass = make_timsort_class()
+
+    def get_storage(self, w_list):
+        return w_list.floatitems
+
+    def set_storage(self, w_list, items):
+        w_list.floatitems = items
+
+    def is_correct_type(self, space, w_item):
+        # NaNs are kept wrapped, because 'x in [x]' relies on the identity
+        # of the object to be true for them
+        return (space.is_w(space.type(w_item), space.w_float) and
+                not isnan(space.float_w(w_item)))
+
+    def unwrap(self, space, w_item):
+        return space.float_w(w_item)
+
+    def wrap(self, space, item):
+        return space.newfloat(item)
+
+
+class StringListStrategy(AbstractUnwrappedStrategy, ListStrategy):
+    emptyitem = ''
+    sorterclass = make_timsort_class()
+
+    def get_storage(self, w_list):
+        return w_list.stritems
+
+    def set_storage(self, w_list, items):
+        w_list.stritems = items
+
+    def is_correct_type(self, space, w_item):
+        return space.is_w(space.type(w_item), space.w_str)
+
+    def unwrap(self, space, w_item):
+        return space.str_w(w_item)
+
+    def wrap(self, space, item):
+        return wrapstr(space, item)
+
+
+empty_strategy = EmptyListStrategy()
+object_strategy = ObjectListStrategy()
+int_strategy = IntegerListStrategy()
+float_strategy = FloatListStrategy()
+str_strategy = StringListStrategy()
+unwrapped_strategies = [int_strategy, float_strategy, str_strategy]
+from pypy.rlib.unroll import unrolling_iterable
+unwrapped_strategies = unrolling_iterable(unwrapped_strategies)
+
+# ____________________________________________________________
+
 init_signature = Signature(['sequence'], None, None)
 init_defaults = [None]
 
@@ -38,84 +723,66 @@ def init__List(space, w_list, __args__):
     # this is on the silly side
     w_iterable, = __args__.parse_obj(
             None, 'list', init_signature, init_defaults)
-    #
-    # this is the old version of the loop at the end of this function:
-    #
-    #   w_list.wrappeditems = space.unpackiterable(w_iterable)
-    #
-    # This is commented out to avoid assigning a new RPython list to
-    # 'wrappeditems', which defeats the W_FastSeqIterObject optimization.
-    #
-    items_w = w_list.wrappeditems
-    del items_w[:]
-    if w_iterable is not None:
-        w_iterator = space.iter(w_iterable)
-        while True:
-            try:
-                w_item = space.next(w_iterator)
-            except OperationError, e:
-                if not e.match(space, space.w_StopIteration):
-                    raise
-                break  # done
-            items_w.append(w_item)
+    w_list.clear(space)
+    if w_iterable is None:
+        return
+    if type(w_iterable) is W_ListObject:
+        w_list.extend(space, w_iterable)
+        return
+    w_iterator = space.iter(w_iterable)
+    while True:
+        try:
+            w_item = space.next(w_iterator)
+        except OperationError, e:
+            if not e.match(space, space.w_StopIteration):
+                raise
+            break  # done
+        w_list.append(space, w_item)
 
 def len__List(space, w_list):
-    result = len(w_list.wrappeditems)
+    result = w_list.length()
     return wrapint(space, result)
 
 def getitem__List_ANY(space, w_list, w_index):
     try:
-        return w_list.wrappeditems[get_list_index(space, w_index)]
+        return w_list.getitem(space, get_list_index(space, w_index))
     except IndexError:
         raise OperationError(space.w_IndexError,
                              space.wrap("list index out of range"))
 
 def getitem__List_Slice(space, w_list, w_slice):
     # XXX consider to extend rlist's functionality?
-    length = len(w_list.wrappeditems)
+    length = w_list.length()
     start, stop, step, slicelength = w_slice.indices4(space, length)
     assert slicelength >= 0
-    if step == 1 and 0 <= start <= stop:
-        return W_ListObject(w_list.wrappeditems[start:stop])
-    w_res = W_ListObject([None] * slicelength)
-    items_w = w_list.wrappeditems
-    subitems_w = w_res.wrappeditems
-    for i in range(slicelength):
-        subitems_w[i] = items_w[start]
-        start += step
-    return w_res
+    return w_list.getslice(space, start, step, slicelength)
 
 def getslice__List_ANY_ANY(space, w_list, w_start, w_stop):
-    length = len(w_list.wrappeditems)
+    length = w_list.length()
     start, stop = normalize_simple_slice(space, length, w_start, w_stop)
-    return W_ListObject(w_list.wrappeditems[start:stop])
+    return w_list.getslice(space, start, 1, stop - start)
 
 def setslice__List_ANY_ANY_ANY(space, w_list, w_start, w_stop, w_sequence):
-    length = len(w_list.wrappeditems)
+    length = w_list.length()
     start, stop = normalize_simple_slice(space, length, w_start, w_stop)
     _setitem_slice_helper(space, w_list, start, 1, stop-start, w_sequence)
 
 def delslice__List_ANY_ANY(space, w_list, w_start, w_stop):
-    length = len(w_list.wrappeditems)
+    length = w_list.length()
     start, stop = normalize_simple_slice(space, length, w_start, w_stop)
-    _delitem_slice_helper(space, w_list, start, 1, stop-start)
+    w_list.deleteslice(start, 1, stop-start)
 
 def contains__List_ANY(space, w_list, w_obj):
-    # needs to be safe against eq_w() mutating the w_list behind our back
-    i = 0
-    items_w = w_list.wrappeditems
-    while i < len(items_w): # intentionally always calling len!
-        if space.eq_w(items_w[i], w_obj):
-            return space.w_True
-        i += 1
-    return space.w_False
+    return space.newbool(w_list.find(space, w_obj, 0, sys.maxint) >= 0)
 
 def iter__List(space, w_list):
     from pypy.objspace.std import iterobject
-    return iterobject.W_FastListIterObject(w_list, w_list.wrappeditems)
+    return iterobject.W_FastListIterObject(w_list)
 
 def add__List_List(space, w_list1, w_list2):
-    return W_ListObject(w_list1.wrappeditems + w_list2.wrappeditems)
+    w_res = w_list1.getslice(space, 0, 1, w_list1.length())
+    w_res.extend(space, w_list2)
+    return w_res
 
 
 def inplace_add__List_ANY(space, w_list1, w_iterable2):
@@ -133,7 +800,7 @@ def mul_list_times(space, w_list, w_times):
         if e.match(space, space.w_TypeError):
             raise FailedToImplement
         raise
-    return W_ListObject(w_list.wrappeditems * times)
+    return w_list.mul(times)
 
 def mul__List_ANY(space, w_list, w_times):
     return mul_list_times(space, w_list, w_times)
@@ -148,63 +815,64 @@ def inplace_mul__List_ANY(space, w_list, w_times):
         if e.match(space, space.w_TypeError):
             raise FailedToImplement
         raise
-    w_list.wrappeditems *= times
+    w_list.inplace_mul(times)
     return w_list
 
 def eq__List_List(space, w_list1, w_list2):
-    # needs to be safe against eq_w() mutating the w_lists behind our back
-    items1_w = w_list1.wrappeditems
-    items2_w = w_list2.wrappeditems
-    return equal_wrappeditems(space, items1_w, items2_w)
-
-def equal_wrappeditems(space, items1_w, items2_w):
-    if len(items1_w) != len(items2_w):
+    if w_list1.length() != w_list2.length():
         return space.w_False
+    if w_list1.strategy is w_list2.strategy:
+        return space.newbool(w_list1.equal_storage(space, w_list2))
+    return space.newbool(equal_items(space, w_list1, w_list2))
+
+def equal_items(space, w_list1, w_list2):
+    # needs to be safe against eq_w() mutating the w_lists behind our back
+    if w_list1.length() != w_list2.length():
+        return False
     i = 0
-    while i < len(items1_w) and i < len(items2_w):
-        if not space.eq_w(items1_w[i], items2_w[i]):
-            return space.w_False
+    while i < w_list1.length() and i < w_list2.length():
+        if not space.eq_w(w_list1.getitem(space, i),
+                          w_list2.getitem(space, i)):
+            return False
         i += 1
-    return space.w_True
+    return True
 
-def lessthan_unwrappeditems(space, items1_w, items2_w):
+def lessthan_unwrappeditems(space, w_list1, w_list2):
     # needs to be safe against eq_w() mutating the w_lists behind our back
     # Search for the first index where items are different
     i = 0
-    while i < len(items1_w) and i < len(items2_w):
-        w_item1 = items1_w[i]
-        w_item2 = items2_w[i]
+    while i < w_list1.length() and i < w_list2.length():
+        w_item1 = w_list1.getitem(space, i)
+        w_item2 = w_list2.getitem(space, i)
         if not space.eq_w(w_item1, w_item2):
             return space.lt(w_item1, w_item2)
         i += 1
     # No more items to compare -- compare sizes
-    return space.newbool(len(items1_w) < len(items2_w))
+    return space.newbool(w_list1.length() < w_list2.length())
 
-def greaterthan_unwrappeditems(space, items1_w, items2_w):
+def greaterthan_unwrappeditems(space, w_list1, w_list2):
     # needs to be safe against eq_w() mutating the w_lists behind our back
     # Search for the first index where items are different
     i = 0
-    while i < len(items1_w) and i < len(items2_w):
-        w_item1 = items1_w[i]
-        w_item2 = items2_w[i]
+    while i < w_list1.length() and i < w_list2.length():
+        w_item1 = w_list1.getitem(space, i)
+        w_item2 = w_list2.getitem(space, i)
         if not space.eq_w(w_item1, w_item2):
             return space.gt(w_item1, w_item2)
         i += 1
     # No more items to compare -- compare sizes
-    return space.newbool(len(items1_w) > len(items2_w))
+    return space.newbool(w_list1.length() > w_list2.length())
 
 def lt__List_List(space, w_list1, w_list2):
-    return lessthan_unwrappeditems(space, w_list1.wrappeditems,
-        w_list2.wrappeditems)
+    return lessthan_unwrappeditems(space, w_list1, w_list2)
 
 def gt__List_List(space, w_list1, w_list2):
-    return greaterthan_unwrappeditems(space, w_list1.wrappeditems,
-        w_list2.wrappeditems)
+    return greaterthan_unwrappeditems(space, w_list1, w_list2)
 
 def delitem__List_ANY(space, w_list, w_idx):
     idx = get_list_index(space, w_idx)
     try:
-        del w_list.wrappeditems[idx]
+        w_list.delitem(idx)
     except IndexError:
         raise OperationError(space.w_IndexError,
                              space.wrap("list deletion index out of range"))
@@ -213,100 +881,26 @@ def delitem__List_ANY(space, w_list, w_idx):
 
 def delitem__List_Slice(space, w_list, w_slice):
     start, stop, step, slicelength = w_slice.indices4(space,
-                                                      len(w_list.wrappeditems))
-    _delitem_slice_helper(space, w_list, start, step, slicelength)
-
-def _delitem_slice_helper(space, w_list, start, step, slicelength):
-    if slicelength==0:
-        return
-
-    if step < 0:
-        start = start + step * (slicelength-1)
-        step = -step
-        
-    if step == 1:
-        assert start >= 0
-        assert slicelength >= 0
-        del w_list.wrappeditems[start:start+slicelength]
-    else:
-        items = w_list.wrappeditems
-        n = len(items)
-        i = start
-
-        for discard in range(1, slicelength):
-            j = i+1
-            i += step
-            while j < i:
-                items[j-discard] = items[j]
-                j += 1
-
-        j = i+1
-        while j < n:
-            items[j-slicelength] = items[j]
-            j += 1
-        start = n - slicelength
-        assert start >= 0 # annotator hint
-        del items[start:]
+                                                      w_list.length())
+    w_list.deleteslice(start, step, slicelength)
 
 def setitem__List_ANY_ANY(space, w_list, w_index, w_any):
     idx = get_list_index(space, w_index)
     try:
-        w_list.wrappeditems[idx] = w_any
+        w_list.setitem(space, idx, w_any)
     except IndexError:
         raise OperationError(space.w_IndexError,
                              space.wrap("list index out of range"))
     return space.w_None
 
 def setitem__List_Slice_ANY(space, w_list, w_slice, w_iterable):
-    oldsize = len(w_list.wrappeditems)
+    oldsize = w_list.length()
     start, stop, step, slicelength = w_slice.indices4(space, oldsize)
     _setitem_slice_helper(space, w_list, start, step, slicelength, w_iterable)
 
 def _setitem_slice_helper(space, w_list, start, step, slicelength, w_iterable):
     sequence2 = space.listview(w_iterable)
-    assert slicelength >= 0
-    items = w_list.wrappeditems
-    oldsize = len(items)
-    len2 = len(sequence2)
-    if step == 1:  # Support list resizing for non-extended slices
-        delta = slicelength - len2
-        if delta < 0:
-            delta = -delta
-            newsize = oldsize + delta
-            # XXX support this in rlist!
-            items += [None] * delta
-            lim = start+len2
-            i = newsize - 1
-            while i >= lim:
-                items[i] = items[i-delta]
-                i -= 1
-        elif start >= 0:
-            del items[start:start+delta]
-        else:
-            assert delta==0
-    elif len2 != slicelength:  # No resize for extended slices
-        raise operationerrfmt(space.w_ValueError, "attempt to "
-              "assign sequence of size %d to extended slice of size %d",
-              len2, slicelength)
-
-    if sequence2 is items:
-        if step > 0:
-            # Always copy starting from the right to avoid
-            # having to make a shallow copy in the case where
-            # the source and destination lists are the same list.
-            i = len2 - 1
-            start += i*step
-            while i >= 0:
-                items[start] = sequence2[i]
-                start -= step
-                i -= 1
-            return
-        else:
-            # Make a shallow copy to more easily handle the reversal case
-            sequence2 = list(sequence2)
-    for i in range(len2):
-        items[start] = sequence2[i]
-        start += step
+    w_list.setslice(space, start, step, slicelength, sequence2)
 
 app = gateway.applevel("""
     def listrepr(currently_in_repr, l):
@@ -322,12 +916,12 @@ app = gateway.applevel("""
                 del currently_in_repr[list_id]
             except:
                 pass
-""", filename=__file__) 
+""", filename=__file__)
 
 listrepr = app.interphook("listrepr")
 
 def repr__List(space, w_list):
-    if len(w_list.wrappeditems) == 0:
+    if w_list.length() == 0:
         return space.wrap('[]')
     ec = space.getexecutioncontext()
     w_currently_in_repr = ec._py_repr
@@ -337,64 +931,59 @@ def repr__List(space, w_list):
 
 def list_insert__List_ANY_ANY(space, w_list, w_where, w_any):
     where = space.int_w(w_where)
-    length = len(w_list.wrappeditems)
+    length = w_list.length()
     if where < 0:
         where += length
         if where < 0:
             where = 0
     elif where > length:
         where = length
-    w_list.wrappeditems.insert(where, w_any)
+    w_list.insert(space, where, w_any)
     return space.w_None
 
 def list_append__List_ANY(space, w_list, w_any):
-    w_list.wrappeditems.append(w_any)
+    w_list.append(space, w_any)
     return space.w_None
 
 def list_extend__List_List(space, w_list, w_other):
-    w_list.wrappeditems += w_other.wrappeditems
+    w_list.extend(space, w_other)
     return space.w_None
 
 def list_extend__List_ANY(space, w_list, w_any):
-    w_list.wrappeditems += space.listview(w_any)
+    w_other = W_ListObject.from_wrappeditems(space, space.listview(w_any))
+    w_list.extend(space, w_other)
     return space.w_None
 
 # note that the default value will come back wrapped!!!
 def list_pop__List_ANY(space, w_list, w_idx=-1):
-    items = w_list.wrappeditems
-    if len(items)== 0:
+    if w_list.length() == 0:
         raise OperationError(space.w_IndexError,
                              space.wrap("pop from empty list"))
     idx = space.int_w(w_idx)
     try:
-        return items.pop(idx)
+        return w_list.pop(space, idx)
     except IndexError:
         raise OperationError(space.w_IndexError,
                              space.wrap("pop index out of range"))
 
 def list_remove__List_ANY(space, w_list, w_any):
     # needs to be safe against eq_w() mutating the w_list behind our back
-    items = w_list.wrappeditems
-    i = 0
-    while i < len(items):
-        if space.eq_w(items[i], w_any):
-            if i < len(items): # if this is wrong the list was changed
-                del items[i]
-            return space.w_None
-        i += 1
+    i = w_list.find(space, w_any, 0, sys.maxint)
+    if i >= 0:
+        if i < w_list.length(): # if this is wrong the list was changed
+            w_list.delitem(i)
+        return space.w_None
     raise OperationError(space.w_ValueError,
                          space.wrap("list.remove(x): x not in list"))
 
 def list_index__List_ANY_ANY_ANY(space, w_list, w_any, w_start, w_stop):
     # needs to be safe against eq_w() mutating the w_list behind our back
-    items = w_list.wrappeditems
-    size = len(items)
-    i = slicetype.adapt_bound(space, size, w_start)
+    size = w_list.length()
+    start = slicetype.adapt_bound(space, size, w_start)
     stop = slicetype.adapt_bound(space, size, w_stop)
-    while i < stop and i < len(items):
-        if space.eq_w(items[i], w_any):
-            return space.wrap(i)
-        i += 1
+    i = w_list.find(space, w_any, start, stop)
+    if i >= 0:
+        return space.wrap(i)
     raise OperationError(space.w_ValueError,
                          space.wrap("list.index(x): x not in list"))
 
@@ -402,15 +991,16 @@ def list_count__List_ANY(space, w_list, w_any):
     # needs to be safe against eq_w() mutating the w_list behind our back
     count = 0
     i = 0
-    items = w_list.wrappeditems
-    while i < len(items):
-        if space.eq_w(items[i], w_any):
-            count += 1
+    while True:
+        i = w_list.find(space, w_any, i, sys.maxint)
+        if i < 0:
+            break
+        count += 1
         i += 1
     return space.wrap(count)
 
 def list_reverse__List(space, w_list):
-    w_list.wrappeditems.reverse()
+    w_list.reverse()
     return space.w_None
 
 # ____________________________________________________________
@@ -465,17 +1055,25 @@ def list_sort__List_ANY_ANY_ANY(space, w_list, w_cmp, w_keyfunc, w_reverse):
     has_key = not space.is_w(w_keyfunc, space.w_None)
     has_reverse = space.is_true(w_reverse)
 
+    # lists of ints, floats or strs can be sorted without wrapping them
+    if not has_cmp and not has_key:
+        if w_list.sort_unwrapped(has_reverse):
+            return space.w_None
+
     # create and setup a TimSort instance
-    if has_cmp: 
-        if has_key: 
+    if has_cmp:
+        if has_key:
             sorterclass = CustomKeyCompareSort
-        else: 
+        else:
             sorterclass = CustomCompareSort
-    else: 
-        if has_key: 
+    else:
+        if has_key:
             sorterclass = CustomKeySort
-        else: 
+        else:
             sorterclass = SimpleSort
+    # the items are sorted wrapped, and unwrapped again at the end
+    strategy = w_list.get_strategy()
+    w_list.switch_to_object_strategy(space)
     items = w_list.wrappeditems
     sorter = sorterclass(items, len(items))
     sorter.space = space
@@ -485,8 +1083,8 @@ def list_sort__List_ANY_ANY_ANY(space, w_list, w_cmp, w_keyfunc, w_reverse):
         # The list is temporarily made empty, so that mutations performed
         # by comparison functions can't affect the slice of memory we're
         # sorting (allowing mutations during sorting is an IndexError or
-        # core-dump factory, since wrappeditems may change).
-        w_list.wrappeditems = []
+        # core-dump factory, since the storage may change).
+        w_list.set_wrappeditems([])
 
         # wrap each item in a KeyContainer if needed
         if has_key:
@@ -516,10 +1114,14 @@ def list_sort__List_ANY_ANY_ANY(space, w_list, w_cmp, w_keyfunc, w_reverse):
                     sorter.list[i] = w_obj.w_item
 
         # check if the user mucked with the list during the sort
-        mucked = len(w_list.wrappeditems) > 0
+        mucked = w_list.length() > 0
 
-        # put the items back into the list
-        w_list.wrappeditems = sorter.list
+        # put the items back into the list, with its previous strategy:
+        # they are the same objects, so they still fit it
+        if mucked:
+            w_list.set_wrappeditems(sorter.list)
+        else:
+            strategy.init_from_wrappeditems(space, w_list, sorter.list)
 
     if mucked:
         raise OperationError(space.w_ValueError,
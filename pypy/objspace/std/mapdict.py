@@ -0,0 +1,666 @@
+from pypy.rlib import jit
+from pypy.rlib.debug import make_sure_not_resized
+from pypy.interpreter.baseobjspace import W_Root
+from pypy.interpreter.error import OperationError
+from pypy.objspace.std.dictmultiobject import W_DictMultiObject
+from pypy.objspace.std.dictmultiobject import IteratorImplementation
+from pypy.objspace.std.dictmultiobject import _is_sane_hash
+
+# ____________________________________________________________
+# attribute shapes
+
+NUM_DIGITS = 4
+
+# the second part of a selector: the kind of attribute stored
+DICT = 0            # an entry of the (not materialized) __dict__
+SPECIAL = 1         # "dict" or "weakref": the real __dict__, the lifeline
+SLOTS_STARTING_FROM = 2     # __slots__ number n is SLOTS_STARTING_FROM + n
+
+
+class AbstractAttribute(object):
+    """A map: it describes which attributes an instance has and at which
+    position of the instance's storage each of them lives.  Maps are
+    shared between all the instances that got the same attributes in the
+    same order, and they are immutable, so the JIT can promote them."""
+
+    _immutable_fields_ = ['terminator']
+    cache_attrs = None
+    _size_estimate = 0
+
+    def __init__(self, space, terminator):
+        self.space = space
+        assert isinstance(terminator, Terminator)
+        self.terminator = terminator
+
+    def read(self, obj, selector):
+        index = self.index(selector)
+        if index < 0:
+            return self.terminator._read_terminator(obj, selector)
+        return obj._mapdict_read_storage(index)
+
+    def write(self, obj, selector, w_value):
+        index = self.index(selector)
+        if index < 0:
+            return self.terminator._write_terminator(obj, selector, w_value)
+        obj._mapdict_write_storage(index, w_value)
+        return True
+
+    def delete(self, obj, selector):
+        return None
+
+    def index(self, selector):
+        return self._index(selector[0], selector[1])
+
+    @jit.purefunction
+    def _index(self, name, kind):
+        return -1
+
+    def copy(self, obj):
+        raise NotImplementedError("abstract base class")
+
+    def length(self):
+        raise NotImplementedError("abstract base class")
+
+    def set_terminator(self, obj, terminator):
+        raise NotImplementedError("abstract base class")
+
+    def size_estimate(self):
+        return self._size_estimate >> NUM_DIGITS
+
+    def search(self, kind):
+        return None
+
+    @jit.purefunction
+    def _get_new_attr(self, name, kind):
+        selector = name, kind
+        cache = self.cache_attrs
+        if cache is None:
+            cache = self.cache_attrs = {}
+        attr = cache.get(selector, None)
+        if attr is None:
+            attr = PlainAttribute(selector, self)
+            cache[selector] = attr
+        return attr
+
+    @jit.unroll_safe
+    def add_attr(self, obj, selector, w_value):
+        attr = self._get_new_attr(selector[0], selector[1])
+        oldattr = obj._get_mapdict_map()
+        if not jit.we_are_jitted():
+            # keep a running average of the final length of the instances
+            # going through this map, to allocate their storage in one go
+            oldattr._size_estimate += (attr.size_estimate() -
+                                       oldattr.size_estimate())
+        if attr.length() > obj._mapdict_storage_length():
+            # note that attr.size_estimate() is always >= attr.length()
+            new_storage = [None] * attr.size_estimate()
+            for i in range(obj._mapdict_storage_length()):
+                new_storage[i] = obj._mapdict_read_storage(i)
+            obj._set_mapdict_storage_and_map(new_storage, attr)
+        else:
+            obj._set_mapdict_map(attr)
+        obj._mapdict_write_storage(attr.position, w_value)
+
+    def materialize_r_dict(self, space, obj, w_d):
+        raise NotImplementedError("abstract base class")
+
+    def remove_dict_entries(self, obj):
+        raise NotImplementedError("abstract base class")
+
+    def __repr__(self):
+        return "<%s>" % (self.__class__.__name__,)
+
+
+class Terminator(AbstractAttribute):
+    _immutable_fields_ = ['w_cls']
+
+    def __init__(self, space, w_cls):
+        AbstractAttribute.__init__(self, space, self)
+        self.w_cls = w_cls
+
+    def _read_terminator(self, obj, selector):
+        return None
+
+    def _write_terminator(self, obj, selector, w_value):
+        obj._get_mapdict_map().add_attr(obj, selector, w_value)
+        return True
+
+    def copy(self, obj):
+        result = Object()
+        result.space = self.space
+        result._init_empty(self)
+        return result
+
+    def length(self):
+        return 0
+
+    def set_terminator(self, obj, terminator):
+        result = Object()
+        result.space = self.space
+        result._init_empty(terminator)
+        return result
+
+    def remove_dict_entries(self, obj):
+        return self.copy(obj)
+
+    def __repr__(self):
+        return "<%s w_cls=%s>" % (self.__class__.__name__, self.w_cls)
+
+
+class DictTerminator(Terminator):
+    """The terminator of the types whose instances have a __dict__."""
+
+    _immutable_fields_ = ['devolved_dict_terminator']
+
+    def __init__(self, space, w_cls):
+        Terminator.__init__(self, space, w_cls)
+        self.devolved_dict_terminator = DevolvedDictTerminator(space, w_cls)
+
+    def materialize_r_dict(self, space, obj, w_d):
+        result = Object()
+        result.space = space
+        result._init_empty(self.devolved_dict_terminator)
+        return result
+
+
+class NoDictTerminator(Terminator):
+    """The terminator of the types whose instances only have __slots__."""
+
+    def _write_terminator(self, obj, selector, w_value):
+        if selector[1] == DICT:
+            return False
+        return Terminator._write_terminator(self, obj, selector, w_value)
+
+
+class DevolvedDictTerminator(Terminator):
+    """Used once the __dict__ of an instance was turned into a real
+    dictionary: from then on, the DICT attributes are stored in there."""
+
+    def _read_terminator(self, obj, selector):
+        if selector[1] == DICT:
+            w_dict = obj.getdict()
+            return self.space.finditem_str(w_dict, selector[0])
+        return Terminator._read_terminator(self, obj, selector)
+
+    def _write_terminator(self, obj, selector, w_value):
+        if selector[1] == DICT:
+            w_dict = obj.getdict()
+            self.space.setitem_str(w_dict, selector[0], w_value)
+            return True
+        return Terminator._write_terminator(self, obj, selector, w_value)
+
+    def delete(self, obj, selector):
+        if selector[1] == DICT:
+            space = self.space
+            w_dict = obj.getdict()
+            try:
+                space.delitem(w_dict, space.wrap(selector[0]))
+            except OperationError, e:
+                if not e.match(space, space.w_KeyError):
+                    raise
+                return None
+            return Terminator.copy(self, obj)
+        return Terminator.delete(self, obj, selector)
+
+    def remove_dict_entries(self, obj):
+        assert 0, "should be unreachable"
+
+    def set_terminator(self, obj, terminator):
+        if not isinstance(terminator, DevolvedDictTerminator):
+            assert isinstance(terminator, DictTerminator)
+            terminator = terminator.devolved_dict_terminator
+        return Terminator.set_terminator(self, obj, terminator)
+
+
+class PlainAttribute(AbstractAttribute):
+    _immutable_fields_ = ['selector', 'position', 'back']
+
+    def __init__(self, selector, back):
+        AbstractAttribute.__init__(self, back.space, back.terminator)
+        self.selector = selector
+        self.position = back.length()
+        self.back = back
+        self._size_estimate = self.length() << NUM_DIGITS
+
+    def _copy_attr(self, obj, new_obj):
+        w_value = self.read(obj, self.selector)
+        new_obj._get_mapdict_map().add_attr(new_obj, self.selector, w_value)
+
+    def delete(self, obj, selector):
+        if selector == self.selector:
+            # ok, attribute is deleted
+            return self.back.copy(obj)
+        new_obj = self.back.delete(obj, selector)
+        if new_obj is not None:
+            self._copy_attr(obj, new_obj)
+        return new_obj
+
+    @jit.purefunction
+    def _index(self, name, kind):
+        attr = self
+        while isinstance(attr, PlainAttribute):
+            if attr.selector[0] == name and attr.selector[1] == kind:
+                return attr.position
+            attr = attr.back
+        return -1
+
+    def copy(self, obj):
+        new_obj = self.back.copy(obj)
+        self._copy_attr(obj, new_obj)
+        return new_obj
+
+    def length(self):
+        return self.position + 1
+
+    def set_terminator(self, obj, terminator):
+        new_obj = self.back.set_terminator(obj, terminator)
+        self._copy_attr(obj, new_obj)
+        return new_obj
+
+    def search(self, kind):
+        if self.selector[1] == kind:
+            return self
+        return self.back.search(kind)
+
+    def materialize_r_dict(self, space, obj, w_d):
+        new_obj = self.back.materialize_r_dict(space, obj, w_d)
+        if self.selector[1] == DICT:
+            w_attr = space.wrap(self.selector[0])
+            w_d.r_dict_content[w_attr] = obj._mapdict_read_storage(
+                self.position)
+        else:
+            self._copy_attr(obj, new_obj)
+        return new_obj
+
+    def remove_dict_entries(self, obj):
+        new_obj = self.back.remove_dict_entries(obj)
+        if self.selector[1] != DICT:
+            self._copy_attr(obj, new_obj)
+        return new_obj
+
+    def __repr__(self):
+        return "<PlainAttribute %s %s %r>" % (self.selector, self.position,
+                                              self.back)
+
+# ____________________________________________________________
+# object implementation
+
+class BaseMapdictObject:
+    """The objspace interface of the instances whose attributes are
+    described by a map.  Copied into the interp-level user subclasses
+    built by pypy.interpreter.typedef."""
+
+    _mixin_ = True
+
+    def _init_empty(self, map):
+        raise NotImplementedError("abstract base class")
+
+    def _get_mapdict_map(self):
+        return jit.hint(self._mapdict_map, promote=True)
+
+    def _set_mapdict_map(self, map):
+        self._mapdict_map = map
+
+    # _____________________________________________
+    # objspace interface
+
+    def getdictvalue(self, space, attrname):
+        return self._get_mapdict_map().read(self, (attrname, DICT))
+
+    def setdictvalue(self, space, attrname, w_value, shadows_type=True):
+        return self._get_mapdict_map().write(self, (attrname, DICT), w_value)
+
+    def deldictvalue(self, space, w_name):
+        attrname = space.str_w(w_name)
+        new_obj = self._get_mapdict_map().delete(self, (attrname, DICT))
+        if new_obj is None:
+            return False
+        _become(self, new_obj)
+        return True
+
+    def getdict(self):
+        map = self._get_mapdict_map()
+        if isinstance(map.terminator, NoDictTerminator):
+            return None
+        w_dict = map.read(self, ("dict", SPECIAL))
+        if w_dict is not None:
+            assert isinstance(w_dict, W_DictMultiObject)
+            return w_dict
+        w_dict = MapDictImplementation(self.space, self)
+        flag = map.write(self, ("dict", SPECIAL), w_dict)
+        assert flag
+        return w_dict
+
+    def setdict(self, space, w_dict):
+        from pypy.interpreter.typedef import check_new_dictionary
+        w_dict = check_new_dictionary(space, w_dict)
+        w_olddict = self.getdict()
+        assert isinstance(w_olddict, W_DictMultiObject)
+        if w_olddict.r_dict_content is None:
+            # moves the attributes out of the instance into the old dict
+            w_olddict._as_rdict()
+        flag = self._get_mapdict_map().write(self, ("dict", SPECIAL), w_dict)
+        assert flag
+
+    def getclass(self, space):
+        return self._get_mapdict_map().terminator.w_cls
+
+    def setclass(self, space, w_cls):
+        new_obj = self._get_mapdict_map().set_terminator(self,
+                                                         w_cls.terminator)
+        _become(self, new_obj)
+
+    def user_setup(self, space, w_subtype):
+        self.space = space
+        assert not self.typedef.hasdict
+        self._init_empty(w_subtype.terminator)
+
+    def getslotvalue(self, index):
+        key = ("slot", SLOTS_STARTING_FROM + index)
+        return self._get_mapdict_map().read(self, key)
+
+    def setslotvalue(self, index, w_value):
+        key = ("slot", SLOTS_STARTING_FROM + index)
+        self._get_mapdict_map().write(self, key, w_value)
+
+    # used by _weakref implemenation
+
+    def getweakref(self):
+        from pypy.module._weakref.interp__weakref import WeakrefLifeline
+        lifeline = self._get_mapdict_map().read(self, ("weakref", SPECIAL))
+        if lifeline is None:
+            return None
+        assert isinstance(lifeline, WeakrefLifeline)
+        return lifeline
+
+    def setweakref(self, space, weakreflifeline):
+        from pypy.module._weakref.interp__weakref import WeakrefLifeline
+        assert (weakreflifeline is None or
+                isinstance(weakreflifeline, WeakrefLifeline))
+        self._get_mapdict_map().write(self, ("weakref", SPECIAL),
+                                      weakreflifeline)
+
+
+def _become(w_obj, new_obj):
+    # 'new_obj' is a temporary Object: steal its map and its storage
+    w_obj._set_mapdict_storage_and_map(new_obj._mapdict_storage,
+                                       new_obj._mapdict_map)
+
+
+class ObjectMixin(object):
+    """The storage of the attributes: a fixed-size list, reallocated
+    when the map grows past its end.  It only contains wrapped objects;
+    see doc/interpreter-optimizations.txt for why ints and floats are
+    not stored unboxed."""
+
+    _mixin_ = True
+
+    def _init_empty(self, map):
+        self._mapdict_map = map
+        self._mapdict_storage = make_sure_not_resized(
+            [None] * map.size_estimate())
+
+    def _mapdict_read_storage(self, index):
+        return self._mapdict_storage[index]
+
+    def _mapdict_write_storage(self, index, w_value):
+        self._mapdict_storage[index] = w_value
+
+    def _mapdict_storage_length(self):
+        return len(self._mapdict_storage)
+
+    def _set_mapdict_storage_and_map(self, storage, map):
+        self._mapdict_storage = storage
+        self._mapdict_map = map
+
+
+class Object(ObjectMixin, BaseMapdictObject, W_Root):
+    """Only used as a temporary while reshaping an instance, and in
+    the tests."""
+
+# ____________________________________________________________
+# dict implementation
+
+class MapDictImplementation(W_DictMultiObject):
+    """The __dict__ of a mapdict instance: a view on the instance's DICT
+    attributes, until something forces it to become a real dictionary."""
+
+    def __init__(self, space, w_obj):
+        self.space = space
+        self.w_obj = w_obj
+
+    def impl_getitem(self, w_lookup):
+        space = self.space
+        w_lookup_type = space.type(w_lookup)
+        if space.is_w(w_lookup_type, space.w_str):
+            return self.impl_getitem_str(space.str_w(w_lookup))
+        elif _is_sane_hash(space, w_lookup_type):
+            return None
+        else:
+            return self._as_rdict().getitem(w_lookup)
+
+    def impl_getitem_str(self, key):
+        return self.w_obj.getdictvalue(self.space, key)
+
+    def impl_setitem_str(self, key, w_value, shadows_type=True):
+        flag = self.w_obj.setdictvalue(self.space, key, w_value, shadows_type)
+        assert flag
+
+    def impl_setitem(self, w_key, w_value):
+        space = self.space
+        if space.is_w(space.type(w_key), space.w_str):
+            self.impl_setitem_str(space.str_w(w_key), w_value)
+        else:
+            self._as_rdict().setitem(w_key, w_value)
+
+    def impl_delitem(self, w_key):
+        space = self.space
+        w_key_type = space.type(w_key)
+        if space.is_w(w_key_type, space.w_str):
+            flag = self.w_obj.deldictvalue(space, w_key)
+            if not flag:
+                raise KeyError
+        elif _is_sane_hash(space, w_key_type):
+            raise KeyError
+        else:
+            self._as_rdict().delitem(w_key)
+
+    def impl_length(self):
+        res = 0
+        curr = self.w_obj._get_mapdict_map().search(DICT)
+        while curr is not None:
+            curr = curr.back.search(DICT)
+            res += 1
+        return res
+
+    def impl_iter(self):
+        return MapDictIteratorImplementation(self.space, self)
+
+    def _dict_attributes(self):
+        # in the order in which they were added
+        result = []
+        curr = self.w_obj._get_mapdict_map().search(DICT)
+        while curr is not None:
+            result.append(curr)
+            curr = curr.back.search(DICT)
+        result.reverse()
+        return result
+
+    def impl_keys(self):
+        space = self.space
+        return [space.wrap(attr.selector[0])
+                    for attr in self._dict_attributes()]
+
+    def impl_values(self):
+        w_obj = self.w_obj
+        return [w_obj._mapdict_read_storage(attr.position)
+                    for attr in self._dict_attributes()]
+
+    def impl_items(self):
+        space = self.space
+        w_obj = self.w_obj
+        return [space.newtuple([space.wrap(attr.selector[0]),
+                                w_obj._mapdict_read_storage(attr.position)])
+                    for attr in self._dict_attributes()]
+
+    def impl_clear(self):
+        w_obj = self.w_obj
+        new_obj = w_obj._get_mapdict_map().remove_dict_entries(w_obj)
+        _become(w_obj, new_obj)
+
+    def _as_rdict(self):
+        self.initialize_as_rdict()
+        space = self.space
+        w_obj = self.w_obj
+        materialize_r_dict(space, w_obj, self)
+        self._clear_fields()
+        return self
+
+    def _clear_fields(self):
+        self.w_obj = None
+
+
+def materialize_r_dict(space, obj, w_d):
+    map = obj._get_mapdict_map()
+    assert obj.getdict() is w_d
+    new_obj = map.materialize_r_dict(space, obj, w_d)
+    _become(obj, new_obj)
+
+
+class MapDictIteratorImplementation(IteratorImplementation):
+    def __init__(self, space, dictimplementation):
+        IteratorImplementation.__init__(self, space, dictimplementation)
+        self.w_obj = dictimplementation.w_obj
+        self.attributes = dictimplementation._dict_attributes()
+
+    def next_entry(self):
+        if self.pos < len(self.attributes):
+            name = self.attributes[self.pos].selector[0]
+            w_value = self.w_obj.getdictvalue(self.space, name)
+            if w_value is not None:
+                return self.space.wrap(name), w_value
+        return None, None
+
+# ____________________________________________________________
+# inline caches for the LOAD_ATTR and LOOKUP_METHOD bytecodes
+
+class CacheEntry(object):
+    """One per name of a code object.  Valid for the instances with the
+    given map, as long as the version_tag of their class is unchanged.
+    Note that the map, and so the class, is kept alive by the entry."""
+
+    map = None
+    version_tag = None
+    index = 0
+    w_method = None     # for LOOKUP_METHOD
+
+    def is_valid_for_map(self, map):
+        # note that 'map' can be None here
+        if map is self.map and map is not None:
+            version_tag = map.terminator.w_cls.version_tag()
+            return version_tag is self.version_tag
+        return False
+
+INVALID_CACHE_ENTRY = CacheEntry()
+
+def init_mapdict_cache(pycode):
+    num_entries = len(pycode.co_names_w)
+    pycode._mapdict_caches = [INVALID_CACHE_ENTRY] * num_entries
+
+def _fill_cache(pycode, nameindex, map, version_tag, index, w_method=None):
+    entry = pycode._mapdict_caches[nameindex]
+    if entry is INVALID_CACHE_ENTRY:
+        entry = CacheEntry()
+        pycode._mapdict_caches[nameindex] = entry
+    entry.map = map
+    entry.version_tag = version_tag
+    entry.index = index
+    entry.w_method = w_method
+
+class CacheCounters(object):
+    """Only with the withmethodcachecounter option: the number of hits
+    and misses of the caches above, by attribute name."""
+
+    def __init__(self, space):
+        assert space.config.objspace.std.withmethodcachecounter
+        self.hits = {}
+        self.misses = {}
+
+def _count(pycode, nameindex, hit):
+    space = pycode.space
+    counters = space.fromcache(CacheCounters)
+    name = space.str_w(pycode.co_names_w[nameindex])
+    if hit:
+        counters.hits[name] = counters.hits.get(name, 0) + 1
+    else:
+        counters.misses[name] = counters.misses.get(name, 0) + 1
+
+def LOAD_ATTR_caching(pycode, w_obj, nameindex):
+    # not used when we_are_jitted(): the JIT promotes the map instead
+    entry = pycode._mapdict_caches[nameindex]
+    map = w_obj._get_mapdict_map()
+    if entry.is_valid_for_map(map) and entry.w_method is None:
+        w_value = w_obj._mapdict_read_storage(entry.index)
+        if w_value is not None:     # else, a deleted slot
+            if pycode.space.config.objspace.std.withmethodcachecounter:
+                _count(pycode, nameindex, True)
+            return w_value
+    return LOAD_ATTR_slowpath(pycode, w_obj, nameindex, map)
+LOAD_ATTR_caching._always_inline_ = True
+
+def LOAD_ATTR_slowpath(pycode, w_obj, nameindex, map):
+    from pypy.interpreter.typedef import Member
+    space = pycode.space
+    if space.config.objspace.std.withmethodcachecounter:
+        _count(pycode, nameindex, False)
+    w_name = pycode.co_names_w[nameindex]
+    if map is not None:
+        w_type = map.terminator.w_cls
+        version_tag = w_type.version_tag()
+        if (version_tag is not None and
+                w_type.getattribute_if_not_from_object() is None):
+            name = space.str_w(w_name)
+            w_descr = w_type.lookup(name)
+            if w_descr is None or not space.is_data_descr(w_descr):
+                index = map.index((name, DICT))
+            else:
+                index = -1
+                descr = space.interpclass_w(w_descr)
+                if isinstance(descr, Member):
+                    index = map.index(("slot",
+                                       SLOTS_STARTING_FROM + descr.index))
+            if index >= 0:
+                w_value = w_obj._mapdict_read_storage(index)
+                if w_value is not None:
+                    _fill_cache(pycode, nameindex, map, version_tag, index)
+                    return w_value
+    return space.getattr(w_obj, w_name)
+LOAD_ATTR_slowpath._dont_inline_ = True
+
+def LOOKUP_METHOD_mapdict(f, nameindex, w_obj):
+    pycode = f.getcode()
+    entry = pycode._mapdict_caches[nameindex]
+    if entry.is_valid_for_map(w_obj._get_mapdict_map()):
+        w_method = entry.w_method
+        if w_method is not None:
+            if pycode.space.config.objspace.std.withmethodcachecounter:
+                _count(pycode, nameindex, True)
+            f.pushvalue(w_method)
+            f.pushvalue(w_obj)
+            return True
+    return False
+
+def LOOKUP_METHOD_mapdict_fill_cache_method(pycode, nameindex, w_obj, w_type,
+                                            w_method):
+    # called when 'w_method' was found in the class and nothing in the
+    # instance: if the instance has a map, the same holds for all the
+    # instances with that map, until the class is changed
+    version_tag = w_type.version_tag()
+    if version_tag is None:
+        return
+    map = w_obj._get_mapdict_map()
+    if map is None or isinstance(map.terminator, DevolvedDictTerminator):
+        return
+    _fill_cache(pycode, nameindex, map, version_tag, -1, w_method)
+    if pycode.space.config.objspace.std.withmethodcachecounter:
+        _count(pycode, nameindex, False)
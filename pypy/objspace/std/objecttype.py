@@ -40,6 +40,11 @@ def descr_set___class__(space, w_obj, w_newcls):
     # XXX taint space should raise a TaintError here if w_oldcls is tainted
     assert isinstance(w_oldcls, W_TypeObject)
     if w_oldcls.get_full_instance_layout() == w_newcls.get_full_instance_layout():
+        if (w_oldcls.compares_by_identity() and
+                not w_newcls.compares_by_identity()):
+            # 'w_obj' may be the key of dicts storing their keys by identity
+            from pypy.objspace.std.typeobject import ComparesByIdentityVersion
+            space.fromcache(ComparesByIdentityVersion).bump()
         w_obj.setclass(space, w_newcls)
     else:
         raise operationerrfmt(space.w_TypeError,
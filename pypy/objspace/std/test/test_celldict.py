@@ -29,3 +29,114 @@ class TestCellDict(object):
         assert d.getitem("a") is None
         assert d.getcell("a", False) is acell
         assert d.length() == 0
+
+
+class TestGlobalCaching(object):
+    def setup_class(cls):
+        cls.space = gettestobjspace(**{"objspace.std.withcelldict": True})
+
+    def test_cache_is_filled(self):
+        space = self.space
+        w_d = space.newdict(module=True)
+        space.exec_("x = 5\ndef f():\n    return len, x\n", w_d, w_d)
+        w_f = space.getitem(w_d, space.wrap("f"))
+        space.call_function(w_f)
+        code = w_f.code
+        names = [space.str_w(w_name) for w_name in code.co_names_w]
+        entry = code._globals_caches[names.index("x")]
+        assert entry.w_globals is w_d
+        assert entry.globals_cell is w_d.getcell("x", False)
+        # no cell is created for 'len' in the globals, so it is not cached
+        assert code._globals_caches[names.index("len")] is None
+        assert w_d.getcell("len", False) is None
+        space.setitem(w_d, space.wrap("x"), space.wrap(6))
+        w_res = space.call_function(w_f)
+        assert space.int_w(space.getitem(w_res, space.wrap(1))) == 6
+
+    def test_cache_uses_the_builtins_cell(self):
+        space = self.space
+        w_d = space.newdict(module=True)
+        space.exec_("len = 5\ndef f():\n    return len\n", w_d, w_d)
+        space.delitem(w_d, space.wrap("len"))
+        w_f = space.getitem(w_d, space.wrap("f"))
+        space.call_function(w_f)
+        code = w_f.code
+        names = [space.str_w(w_name) for w_name in code.co_names_w]
+        entry = code._globals_caches[names.index("len")]
+        assert entry.globals_cell.w_value is None
+        assert entry.builtins is space.builtin
+        assert entry.builtins_cell.w_value is not None
+        # the cached builtins cell is only used for the same builtins
+        from pypy.interpreter.module import Module
+        entry.builtins = Module(space, None)
+        space.call_function(w_f)
+        new_entry = code._globals_caches[names.index("len")]
+        assert new_entry is not entry
+        assert new_entry.builtins is space.builtin
+
+
+class AppTestGlobalCaching(object):
+    def setup_class(cls):
+        cls.space = gettestobjspace(**{"objspace.std.withcelldict": True})
+
+    def test_global_lookups(self):
+        d = {"__builtins__": __builtins__}
+        exec """if 1:
+            x = 1
+            def f():
+                return x, len
+            """ in d
+        f = d["f"]
+        assert f() == (1, len)
+        assert f() == (1, len)
+        d["x"] = 2
+        assert f() == (2, len)
+        d["len"] = 3
+        assert f() == (2, 3)
+        del d["len"]
+        assert f() == (2, len)
+        del d["x"]
+        raises(NameError, f)
+        d["x"] = 4
+        assert f() == (4, len)
+
+    def test_globals_become_r_dict(self):
+        d = {"__builtins__": __builtins__}
+        exec """if 1:
+            def f():
+                return len
+            """ in d
+        f = d["f"]
+        assert f() is len
+        assert f() is len
+        d[1] = 2            # no longer a cell dict
+        d["len"] = 5
+        assert f() == 5
+
+    def test_loading_globals_does_not_change_the_dicts(self):
+        import types
+        d = types.ModuleType("m").__dict__     # a module dict
+        d["__builtins__"] = __builtins__
+        exec """if 1:
+            a = 1
+            def f():
+                return len
+            def g():
+                return undefined_name
+            """ in d
+        for key in d:
+            assert d["f"]() is len
+            raises(NameError, d["g"])
+        assert sorted(d.keys()) == ["__builtins__", "__doc__", "__name__",
+                                    "a", "f", "g"]
+
+    def test_other_globals(self):
+        def f():
+            return y
+        code = f.func_code
+        import types
+        g1 = types.FunctionType(code, {"y": 1})
+        g2 = types.FunctionType(code, {"y": 2})
+        for i in range(3):
+            assert g1() == 1
+            assert g2() == 2
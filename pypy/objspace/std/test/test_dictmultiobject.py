@@ -624,6 +624,8 @@ class Config:
             withsmalldicts = False
             withcelldict = False
             withshadowtracking = False
+            withintdict = False
+            withidentitydict = False
         class opcodes:
             CALL_LIKELY_BUILTIN = False
 
@@ -0,0 +1,166 @@
+from pypy.conftest import gettestobjspace
+from pypy.objspace.std.keytypedict import KeyTypeDictImplementation
+from pypy.objspace.std.test import test_dictmultiobject
+
+OPTIONS = {"objspace.std.withintdict": True,
+           "objspace.std.withidentitydict": True}
+
+
+class TestKeyTypeDict(object):
+    def setup_class(cls):
+        cls.space = gettestobjspace(**OPTIONS)
+
+    def test_int_keys(self):
+        space = self.space
+        w = space.wrap
+        w_d = space.newdict()
+        assert isinstance(w_d, KeyTypeDictImplementation)
+        space.setitem(w_d, w(1), w("a"))
+        space.setitem(w_d, w(2), w("b"))
+        assert w_d.intcontent.keys() == [1, 2]
+        assert space.eq_w(space.getitem(w_d, space.w_True), w("a"))
+        assert space.eq_w(space.len(w_d), w(2))
+        assert not space.is_true(space.contains(w_d, w("1")))
+        space.delitem(w_d, w(2))
+        assert w_d.intcontent.keys() == [1]
+        assert w_d.r_dict_content is None
+        # a float may be equal to an int key: use the generic lookup
+        assert space.eq_w(space.getitem(w_d, w(1.0)), w("a"))
+        assert w_d.intcontent is None
+        assert w_d.r_dict_content is not None
+
+    def test_other_key_devolves(self):
+        space = self.space
+        w = space.wrap
+        w_d = space.newdict()
+        space.setitem(w_d, w(1), w(2))
+        space.setitem(w_d, w("x"), w(3))
+        assert w_d.intcontent is None
+        assert w_d.r_dict_content is not None
+        assert space.eq_w(space.getitem(w_d, w(1)), w(2))
+        assert space.eq_w(space.getitem(w_d, w("x")), w(3))
+
+    def test_identity_keys(self):
+        space = self.space
+        w_A, w_B = space.fixedview(space.appexec([], """():
+            class A(object):
+                pass
+            class B(object):
+                def __eq__(self, other):
+                    return True
+                def __hash__(self):
+                    return 1
+            return A, B
+        """))
+        w_a = space.call_function(w_A)
+        w_d = space.newdict()
+        space.setitem(w_d, w_a, space.wrap(5))
+        assert w_d.identitycontent.keys() == [w_a]
+        assert space.getitem(w_d, w_a) is not None
+        assert not space.is_true(space.contains(w_d, space.wrap(1)))
+        assert w_d.r_dict_content is None
+        space.setitem(w_d, space.call_function(w_B), space.wrap(6))
+        assert w_d.identitycontent is None
+        assert space.eq_w(space.len(w_d), space.wrap(2))
+
+    def test_empty_dict_switches_kind(self):
+        space = self.space
+        w_A = space.appexec([], """():
+            class A(object):
+                pass
+            return A
+        """)
+        w_d = space.newdict()
+        space.setitem(w_d, space.call_function(w_A), space.wrap(1))
+        assert w_d.identitycontent is not None
+        space.call_method(w_d, "clear")
+        space.setitem(w_d, space.wrap(3), space.wrap(1))
+        assert w_d.intcontent.keys() == [3]
+
+    def test_class_gets_eq(self):
+        space = self.space
+        w_A = space.appexec([], """():
+            class A(object):
+                pass
+            return A
+        """)
+        w_a = space.call_function(w_A)
+        w_d = space.newdict()
+        space.setitem(w_d, w_a, space.wrap(1))
+        assert w_d.identitycontent is not None
+        space.appexec([w_A], """(A):
+            A.__eq__ = lambda self, other: True
+        """)
+        assert space.eq_w(space.getitem(w_d, w_a), space.wrap(1))
+        assert w_d.identitycontent is None
+        assert w_d.r_dict_content is not None
+
+
+class AppTest_KeyTypeDict(test_dictmultiobject.AppTest_DictObject):
+    def setup_class(cls):
+        cls.space = gettestobjspace(**OPTIONS)
+
+    def test_int_keys(self):
+        d = {}
+        for i in range(10):
+            d[i] = i * i
+        assert d[3] == 9
+        assert d.get(True) == 1
+        assert d.get("3") is None
+        assert d.get(3.0) == 9
+        assert sorted(d.keys()) == range(10)
+        del d[False]
+        assert 0 not in d
+        raises(KeyError, "del d['x']")
+
+    def test_identity_keys(self):
+        class A(object):
+            pass
+        class B(object):
+            def __init__(self, value):
+                self.value = value
+            def __eq__(self, other):
+                return self.value == other
+            def __hash__(self):
+                return hash(self.value)
+        a1, a2 = A(), A()
+        d = {a1: 1, a2: 2}
+        assert d[a1] == 1
+        assert d[a2] == 2
+        assert A() not in d
+        assert 1 not in d
+        assert sorted(d.values()) == [1, 2]
+        d[B(7)] = 3
+        assert d[7] == 3
+        assert d[a1] == 1
+
+    def test_class_changes(self):
+        class A(object):
+            pass
+        class B(object):
+            def __eq__(self, other):
+                return True
+            def __hash__(self):
+                return 42
+        a = A()
+        d = {a: 1}
+        A.__hash__ = lambda self: 42
+        A.__eq__ = lambda self, other: True
+        assert d[a] == 1
+        assert d[B()] == 1
+        class C(object):
+            pass
+        c = C()
+        d2 = {c: 2}
+        c.__class__ = B
+        assert d2[B()] == 2
+
+    def test_mixed_lookup(self):
+        d = {1: 'a'}
+        class A(object):
+            pass
+        assert A() not in d
+        assert d.get(None) is None
+        d2 = {A(): 1}
+        assert None not in d2
+        assert 1.5 not in d2
@@ -791,3 +791,213 @@ class AppTestListFastSubscr:
             assert l[i] == i
         assert l[3:] == [3, 4]
         raises(TypeError, operator.getitem, l, "str")
+
+
+class TestW_ListStrategies(object):
+
+    def setup_class(cls):
+        cls.space = gettestobjspace(**{"objspace.std.withliststrategies":
+                                       True})
+
+    def test_from_wrappeditems(self):
+        from pypy.objspace.std import listobject
+        space = self.space
+        w = space.wrap
+        assert space.newlist([]).strategy is listobject.empty_strategy
+        assert space.newlist([w(1), w(2)]).strategy is listobject.int_strategy
+        assert space.newlist([w(1.5)]).strategy is listobject.float_strategy
+        assert space.newlist([w('a')]).strategy is listobject.str_strategy
+        w_list = space.newlist([w(1), w('a')])
+        assert w_list.strategy is listobject.object_strategy
+        # NaNs are not stored unwrapped
+        w_list = space.newlist([w(float('nan'))])
+        assert w_list.strategy is listobject.object_strategy
+        # bools are not ints
+        w_list = space.newlist([w(1), space.w_True])
+        assert w_list.strategy is listobject.object_strategy
+
+    def test_switch_to_object(self):
+        from pypy.objspace.std import listobject
+        space = self.space
+        w = space.wrap
+        w_list = space.newlist([])
+        w_list.append(space, w(5))
+        assert w_list.strategy is listobject.int_strategy
+        assert w_list.intitems == [5]
+        w_list.insert(space, 0, w(4))
+        assert w_list.intitems == [4, 5]
+        w_list.setitem(space, 1, w('x'))
+        assert w_list.strategy is listobject.object_strategy
+        assert w_list.intitems is None
+        assert space.unwrap(w_list) == [4, 'x']
+
+    def test_extend(self):
+        from pypy.objspace.std import listobject
+        space = self.space
+        w = space.wrap
+        w_list = space.newlist([w('a')])
+        w_list.extend(space, space.newlist([w('b')]))
+        assert w_list.stritems == ['a', 'b']
+        w_list.extend(space, space.newlist([]))
+        assert w_list.strategy is listobject.str_strategy
+        w_list.extend(space, space.newlist([w(1)]))
+        assert w_list.strategy is listobject.object_strategy
+        assert space.unwrap(w_list) == ['a', 'b', 1]
+
+    def test_slices(self):
+        from pypy.objspace.std import listobject
+        space = self.space
+        w = space.wrap
+        w_list = space.newlist([w(i) for i in range(6)])
+        w_slice = w_list.getslice(space, 4, -2, 2)
+        assert w_slice.intitems == [4, 2]
+        w_list.setslice(space, 1, 1, 2, [w(7), w(8), w(9)])
+        assert w_list.intitems == [0, 7, 8, 9, 3, 4, 5]
+        w_list.deleteslice(0, 2, 4)
+        assert w_list.intitems == [7, 9, 4]
+        w_list.setslice(space, 0, 1, 1, [w(None)])
+        assert w_list.strategy is listobject.object_strategy
+        assert space.unwrap(w_list) == [None, 9, 4]
+
+    def test_sort_unwrapped(self):
+        space = self.space
+        w = space.wrap
+        w_list = space.newlist([w(3.5), w(-1.0), w(2.0)])
+        space.call_method(w_list, 'sort')
+        assert w_list.floatitems == [-1.0, 2.0, 3.5]
+        space.call_method(w_list, 'sort', space.w_None, space.w_None,
+                          space.w_True)
+        assert w_list.floatitems == [3.5, 2.0, -1.0]
+
+    def test_sort_keeps_strategy(self):
+        from pypy.objspace.std import listobject
+        space = self.space
+        w = space.wrap
+        w_neg = space.appexec([], "(): return lambda x: -x")
+        w_list = space.newlist([w(3), w(1), w(2)])
+        space.call_method(w_list, 'sort', space.w_None, w_neg)
+        assert w_list.intitems == [3, 2, 1]
+        w_cmp = space.appexec([], "(): return lambda a, b: cmp(len(a), len(b))")
+        w_list = space.newlist([w('ccc'), w('a'), w('bb')])
+        space.call_method(w_list, 'sort', w_cmp)
+        assert w_list.stritems == ['a', 'bb', 'ccc']
+        w_list = space.newlist([])
+        space.call_method(w_list, 'sort', space.w_None, w_neg)
+        assert w_list.strategy is listobject.empty_strategy
+        # a list modified during the sort ends up with wrapped items
+        w_list = space.newlist([w(1), w(2)])
+        w_key = space.appexec([w_list], """(l):
+            def key(x):
+                l.append('x')
+                return x
+            return key""")
+        space.raises_w(space.w_ValueError, space.call_method, w_list, 'sort',
+                       space.w_None, w_key)
+        assert w_list.strategy is listobject.object_strategy
+
+    def test_operations_keep_strategy(self):
+        from pypy.objspace.std import listobject
+        space = self.space
+        w_d = space.newdict()
+        space.exec_("""if 1:
+            ints = [1, 2, 3]
+            sliced = ints[1:]
+            stepped = ints[::-2]
+            multiplied = [1.5, 2.5] * 3
+            rmultiplied = 2 * ['a']
+            inplace = [1]
+            inplace *= 4
+            from_gen = [1]
+            from_gen.extend(x + 1 for x in ints)
+            from_tuple = ['a']
+            from_tuple.extend(('b', 'c'))
+            from_set = [0.5]
+            from_set += set([1.5])
+            from_empty = []
+            from_empty.extend(iter(ints))
+            assigned = [1, 2, 3]
+            assigned[1:2] = (5, 6)
+            assigned[::2] = [7, 8]
+        """, w_d, w_d)
+        def strategy(name):
+            return space.getitem(w_d, space.wrap(name)).strategy
+        for name in ['ints', 'sliced', 'stepped', 'inplace', 'from_gen',
+                     'from_empty', 'assigned']:
+            assert strategy(name) is listobject.int_strategy
+        for name in ['multiplied', 'from_set']:
+            assert strategy(name) is listobject.float_strategy
+        for name in ['rmultiplied', 'from_tuple']:
+            assert strategy(name) is listobject.str_strategy
+
+
+class AppTestW_ListObjectWithStrategies(AppTestW_ListObject):
+
+    def setup_class(cls):
+        cls.space = gettestobjspace(**{"objspace.std.withliststrategies":
+                                       True})
+
+    def test_mixed_types(self):
+        l = [1, 2, 3]
+        l.append("x")
+        assert l == [1, 2, 3, "x"]
+        l = ["a", "b"]
+        l[0] = 1.5
+        assert l == [1.5, "b"]
+        l = [1.5]
+        l.insert(0, 2)
+        assert l == [2, 1.5]
+        l = [1, 2]
+        l[1:1] = ["x"]
+        assert l == [1, "x", 2]
+        l = []
+        l.extend([1, 2])
+        l.extend(["a"])
+        assert l == [1, 2, "a"]
+        assert [1, 2] + ["a"] == [1, 2, "a"]
+        assert [1, 2] * 2 == [1, 2, 1, 2]
+
+    def test_find_in_unwrapped(self):
+        l = [1, 2, 3, 2]
+        assert 2 in l
+        assert 2.0 in l
+        assert "2" not in l
+        assert l.index(2) == 1
+        assert l.index(2, 2) == 3
+        assert l.count(2) == 2
+        l.remove(2)
+        assert l == [1, 3, 2]
+        class Eq(object):
+            def __eq__(self, other):
+                return other == 3
+        assert l.index(Eq()) == 1
+        l = ["a", "b"]
+        assert u"b" in l
+
+    def test_compare_mixed(self):
+        assert [1, 2] == [1.0, 2.0]
+        assert [1, 2] != [1, 2, 3]
+        assert ["a", "b"] < ["a", "c"]
+        assert [1, 2.5] > [1, 2]
+        assert [0.0] == [-0.0]
+
+    def test_sort_stable_reverse(self):
+        # the compiler would merge the constants 0.0 and -0.0
+        l = [0.0, float('-0.0'), 1.0]
+        l.sort(reverse=True)
+        assert l == [1.0, 0.0, -0.0]
+        assert str(l[1]) == '0.0'
+        assert str(l[2]) == '-0.0'
+        l = ["b", "c", "a"]
+        l.sort()
+        assert l == ["a", "b", "c"]
+        l.sort(key=lambda x: -ord(x))
+        assert l == ["c", "b", "a"]
+
+    def test_iter_after_switch(self):
+        l = [1, 2, 3]
+        result = []
+        for x in l:
+            if x == 1:
+                l.append("x")
+            result.append(x)
+        assert result == [1, 2, 3, "x"]
@@ -0,0 +1,577 @@
+from pypy.conftest import gettestobjspace
+from pypy.objspace.std.test.test_dictmultiobject import FakeSpace
+from pypy.objspace.std.mapdict import *
+
+class MapdictFakeSpace(FakeSpace):
+    def finditem_str(self, w_dict, key):
+        return w_dict.getitem_str(key)
+    def setitem_str(self, w_dict, key, w_value):
+        w_dict.setitem_str(key, w_value)
+    def delitem(self, w_dict, w_key):
+        w_dict.delitem(w_key)
+
+space = MapdictFakeSpace()
+
+class Class(object):
+    def __init__(self, hasdict=True):
+        self.hasdict = hasdict
+        if hasdict:
+            self.terminator = DictTerminator(space, self)
+        else:
+            self.terminator = NoDictTerminator(space, self)
+
+    def instantiate(self, sp=None):
+        if sp is None:
+            sp = space
+        result = Object()
+        result.space = sp
+        result._init_empty(self.terminator)
+        return result
+
+def test_plain_attribute():
+    w_cls = "class"
+    aa = PlainAttribute(("b", DICT),
+                        PlainAttribute(("a", DICT),
+                                       Terminator(space, w_cls)))
+    assert aa.space is space
+    assert aa.terminator.w_cls is w_cls
+    assert aa.terminator is aa.back.terminator
+    assert aa.length() == 2
+    assert aa.index(("a", DICT)) == 0
+    assert aa.index(("b", DICT)) == 1
+    assert aa.index(("c", DICT)) == -1
+    assert aa.index(("a", SPECIAL)) == -1
+
+    obj = Object()
+    obj._mapdict_map, obj._mapdict_storage = aa, [10, 20]
+    assert obj.getdictvalue(space, "a") == 10
+    assert obj.getdictvalue(space, "b") == 20
+    assert obj.getdictvalue(space, "c") is None
+
+def test_huge_chain():
+    current = Terminator(space, "cls")
+    for i in range(20000):
+        current = PlainAttribute((str(i), DICT), current)
+    assert current.index(("0", DICT)) == 0
+
+def test_search():
+    aa = PlainAttribute(("b", DICT),
+                        PlainAttribute(("a", DICT),
+                                       Terminator(None, None)))
+    assert aa.search(DICT) is aa
+    assert aa.search(SLOTS_STARTING_FROM) is None
+    assert aa.search(SPECIAL) is None
+    bb = PlainAttribute(("C", SPECIAL), PlainAttribute(("A", SLOTS_STARTING_FROM), aa))
+    assert bb.search(DICT) is aa
+    assert bb.search(SLOTS_STARTING_FROM) is bb.back
+    assert bb.search(SPECIAL) is bb
+
+def test_add_attribute():
+    cls = Class()
+    obj = cls.instantiate()
+    obj.setdictvalue(space, "a", 10)
+    assert obj._mapdict_storage == [10]
+    assert obj.getdictvalue(space, "a") == 10
+    assert obj.getdictvalue(space, "b") is None
+    assert obj.getdictvalue(space, "c") is None
+    obj.setdictvalue(space, "a", 20)
+    assert obj.getdictvalue(space, "a") == 20
+    assert obj.getdictvalue(space, "b") is None
+    assert obj.getdictvalue(space, "c") is None
+
+    obj.setdictvalue(space, "b", 30)
+    assert obj._mapdict_storage == [20, 30]
+    assert obj.getdictvalue(space, "a") == 20
+    assert obj.getdictvalue(space, "b") == 30
+    assert obj.getdictvalue(space, "c") is None
+    obj.setdictvalue(space, "b", 40)
+    assert obj.getdictvalue(space, "a") == 20
+    assert obj.getdictvalue(space, "b") == 40
+    assert obj.getdictvalue(space, "c") is None
+
+    obj2 = cls.instantiate()
+    obj2.setdictvalue(space, "a", 50)
+    obj2.setdictvalue(space, "b", 60)
+    assert obj2.getdictvalue(space, "a") == 50
+    assert obj2.getdictvalue(space, "b") == 60
+    assert obj2._mapdict_map is obj._mapdict_map
+
+def test_delete():
+    for i, dattr in enumerate(["a", "b", "c"]):
+        c = Class()
+        obj = c.instantiate()
+        obj.setdictvalue(space, "a", 50)
+        obj.setdictvalue(space, "b", 60)
+        obj.setdictvalue(space, "c", 70)
+        assert obj._mapdict_storage == [50, 60, 70]
+        res = obj.deldictvalue(space, dattr)
+        assert res
+        s = [50, 60, 70]
+        del s[i]
+        assert obj._mapdict_storage[:2] == s
+        assert obj.getdictvalue(space, dattr) is None
+        assert not obj.deldictvalue(space, dattr)
+
+    c = Class()
+    obj = c.instantiate()
+    obj.setdictvalue(space, "a", 50)
+    obj.setdictvalue(space, "b", 60)
+    obj.deldictvalue(space, "a")
+    obj.setdictvalue(space, "a", 70)
+    assert obj._mapdict_storage == [60, 70]
+    assert obj.getdictvalue(space, "a") == 70
+    assert obj.getdictvalue(space, "b") == 60
+
+def test_class():
+    c = Class()
+    obj = c.instantiate()
+    assert obj.getclass(space) is c
+    obj.setdictvalue(space, "a", 50)
+    assert obj.getclass(space) is c
+    obj.setdictvalue(space, "b", 60)
+    assert obj.getclass(space) is c
+    obj.setdictvalue(space, "c", 70)
+    assert obj.getclass(space) is c
+
+    c2 = Class()
+    obj.setclass(space, c2)
+    assert obj.getclass(space) is c2
+    assert obj._mapdict_storage == [50, 60, 70]
+
+def test_special():
+    from pypy.module._weakref.interp__weakref import WeakrefLifeline
+    lifeline1 = WeakrefLifeline(space)
+    lifeline2 = WeakrefLifeline(space)
+    c = Class()
+    obj = c.instantiate()
+    assert obj.getweakref() is None
+    obj.setdictvalue(space, "a", 50)
+    obj.setdictvalue(space, "b", 60)
+    obj.setdictvalue(space, "c", 70)
+    obj.setweakref(space, lifeline1)
+    assert obj.getdictvalue(space, "a") == 50
+    assert obj.getdictvalue(space, "b") == 60
+    assert obj.getdictvalue(space, "c") == 70
+    assert obj._mapdict_storage == [50, 60, 70, lifeline1]
+    assert obj.getweakref() is lifeline1
+
+    obj2 = c.instantiate()
+    obj2.setdictvalue(space, "a", 150)
+    obj2.setdictvalue(space, "b", 160)
+    obj2.setdictvalue(space, "c", 170)
+    obj2.setweakref(space, lifeline2)
+    assert obj2._mapdict_storage == [150, 160, 170, lifeline2]
+    assert obj2.getweakref() is lifeline2
+    assert obj2._mapdict_map is obj._mapdict_map
+
+    assert obj.getdictvalue(space, "weakref") is None
+    obj.setdictvalue(space, "weakref", 41)
+    assert obj.getweakref() is lifeline1
+    assert obj.getdictvalue(space, "weakref") == 41
+
+def test_slots():
+    cls = Class()
+    obj = cls.instantiate()
+    a = 0
+    b = 1
+    c = 2
+    obj.setslotvalue(a, 50)
+    obj.setslotvalue(b, 60)
+    obj.setslotvalue(c, 70)
+    assert obj.getslotvalue(a) == 50
+    assert obj.getslotvalue(b) == 60
+    assert obj.getslotvalue(c) == 70
+    assert obj._mapdict_storage == [50, 60, 70]
+
+    obj.setdictvalue(space, "a", 5)
+    obj.setdictvalue(space, "b", 6)
+    obj.setdictvalue(space, "c", 7)
+    assert obj.getdictvalue(space, "a") == 5
+    assert obj.getdictvalue(space, "b") == 6
+    assert obj.getdictvalue(space, "c") == 7
+    assert obj.getslotvalue(a) == 50
+    assert obj.getslotvalue(b) == 60
+    assert obj.getslotvalue(c) == 70
+    assert obj._mapdict_storage == [50, 60, 70, 5, 6, 7]
+
+    obj2 = cls.instantiate()
+    obj2.setslotvalue(a, 501)
+    obj2.setslotvalue(b, 601)
+    obj2.setslotvalue(c, 701)
+    obj2.setdictvalue(space, "a", 51)
+    obj2.setdictvalue(space, "b", 61)
+    obj2.setdictvalue(space, "c", 71)
+    assert obj2._mapdict_storage == [501, 601, 701, 51, 61, 71]
+    assert obj._mapdict_map is obj2._mapdict_map
+
+def test_slots_no_dict():
+    cls = Class(hasdict=False)
+    obj = cls.instantiate()
+    a = 0
+    b = 1
+    obj.setslotvalue(a, 50)
+    obj.setslotvalue(b, 60)
+    assert obj.getslotvalue(a) == 50
+    assert obj.getslotvalue(b) == 60
+    assert obj._mapdict_storage == [50, 60]
+    assert not obj.setdictvalue(space, "a", 70)
+    assert obj.getdict() is None
+
+def test_size_prediction():
+    for i in range(10):
+        c = Class()
+        assert c.terminator.size_estimate() == 0
+        for j in range(1000):
+            obj = c.instantiate()
+            for a in "abcdefghij"[:i]:
+                obj.setdictvalue(space, a, 50)
+        assert c.terminator.size_estimate() == i
+    for i in range(1, 10):
+        c = Class()
+        assert c.terminator.size_estimate() == 0
+        for j in range(1000):
+            obj = c.instantiate()
+            for a in "abcdefghij"[:i]:
+                obj.setdictvalue(space, a, 50)
+            obj = c.instantiate()
+            for a in "klmnopqars":
+                obj.setdictvalue(space, a, 50)
+        assert c.terminator.size_estimate() in [(i + 10) // 2,
+                                                (i + 11) // 2]
+
+# ___________________________________________________________
+# dict tests
+
+def get_impl():
+    cls = Class()
+    w_obj = cls.instantiate()
+    return w_obj.getdict()
+
+def test_dict_is_lazy():
+    cls = Class()
+    obj = cls.instantiate()
+    obj.setdictvalue(space, "a", 1)
+    assert obj._mapdict_storage == [1]
+    w_d = obj.getdict()
+    assert isinstance(w_d, MapDictImplementation)
+    assert obj.getdict() is w_d
+    assert w_d.r_dict_content is None
+    assert w_d.getitem_str("a") == 1
+
+def test_dict_operations():
+    w_d = get_impl()
+    w_d.setitem_str("hello", 1)
+    w_d.setitem_str("world", 2)
+    assert w_d.length() == 2
+    assert w_d.getitem_str("hello") == 1
+    assert w_d.w_obj.getdictvalue(space, "world") == 2
+    assert w_d.keys() == ["hello", "world"]
+    assert w_d.values() == [1, 2]
+    assert w_d.items() == [("hello", 1), ("world", 2)]
+    w_d.delitem("hello")
+    assert w_d.keys() == ["world"]
+    w_d.clear()
+    assert w_d.length() == 0
+    assert w_d.r_dict_content is None
+
+def test_materialize_r_dict():
+    cls = Class()
+    obj = cls.instantiate()
+    obj.setdictvalue(space, "a", 5)
+    obj.setdictvalue(space, "b", 6)
+    obj.setslotvalue(0, 7)
+    obj.setdictvalue(space, "c", 8)
+    w_d = obj.getdict()
+    assert obj._mapdict_map.length() == 5
+    w_d._as_rdict()
+    assert dict(w_d.r_dict_content.items()) == {"a": 5, "b": 6, "c": 8}
+    # the slot and the dict itself stay in the instance
+    assert obj._mapdict_map.length() == 2
+    assert obj.getslotvalue(0) == 7
+    assert obj.getdict() is w_d
+    assert obj.getdictvalue(space, "a") == 5
+    obj.setdictvalue(space, "d", 9)
+    assert w_d.r_dict_content["d"] == 9
+    assert obj.deldictvalue(space, "a")
+    assert "a" not in w_d.r_dict_content
+    assert obj.getslotvalue(0) == 7
+
+
+class AppTestWithMapDict(object):
+
+    def setup_class(cls):
+        cls.space = gettestobjspace(**{"objspace.std.withmapdict": True})
+
+    def test_simple(self):
+        class A(object):
+            pass
+        a = A()
+        a.x = 5
+        a.y = 6
+        a.zz = 7
+        assert a.x == 5
+        assert a.y == 6
+        assert a.zz == 7
+        del a.y
+        assert not hasattr(a, "y")
+        raises(AttributeError, "del a.y")
+
+    def test_dict(self):
+        class A(object):
+            pass
+        a = A()
+        a.x = 5
+        a.y = 6
+        d = a.__dict__
+        assert d == {"x": 5, "y": 6}
+        assert a.__dict__ is d
+        d["z"] = 7
+        assert a.z == 7
+        a.w = 8
+        assert d["w"] == 8
+        del d["x"]
+        assert not hasattr(a, "x")
+        d[1] = 2
+        assert d == {"y": 6, "z": 7, "w": 8, 1: 2}
+        a.t = 9
+        assert d["t"] == 9
+        del a.y
+        assert "y" not in d
+        assert sorted(d.keys()) == [1, "t", "w", "z"]
+        raises(AttributeError, "del a.y")
+
+    def test_setdict(self):
+        class A(object):
+            pass
+        a = A()
+        a.x = 5
+        a.y = 6
+        old = a.__dict__
+        a.__dict__ = {"z": 7}
+        assert old == {"x": 5, "y": 6}
+        assert a.z == 7
+        assert not hasattr(a, "x")
+        a.x = 1
+        assert a.__dict__ == {"x": 1, "z": 7}
+        assert old == {"x": 5, "y": 6}
+        raises(TypeError, "a.__dict__ = 1")
+
+    def test_iteration(self):
+        class A(object):
+            pass
+        a = A()
+        for name in "abcdef":
+            setattr(a, name, ord(name))
+        assert list(a.__dict__) == list("abcdef")
+        assert a.__dict__.items() == [(c, ord(c)) for c in "abcdef"]
+        def f():
+            for key in a.__dict__:
+                a.g = 1
+        raises(RuntimeError, f)
+
+    def test_slot_and_dict(self):
+        class A(object):
+            __slots__ = ["a", "__dict__"]
+        a = A()
+        a.a = 1
+        a.b = 2
+        assert a.__dict__ == {"b": 2}
+        del a.a
+        raises(AttributeError, "a.a")
+        a.a = 3
+        assert a.a == 3
+        assert a.b == 2
+
+    def test_slots_only(self):
+        class A(object):
+            __slots__ = ["x", "y"]
+        a = A()
+        a.x = 1
+        raises(AttributeError, "a.z = 2")
+        raises(AttributeError, "a.__dict__")
+        assert a.x == 1
+        raises(AttributeError, "a.y")
+
+    def test_weakref(self):
+        import weakref
+        class A(object):
+            pass
+        a = A()
+        a.x = 1
+        r = weakref.ref(a)
+        assert r() is a
+        assert a.__dict__ == {"x": 1}
+        a.__dict__ = {}
+        assert weakref.ref(a) is r
+
+    def test_change_class(self):
+        class A(object):
+            def f(self):
+                return 42
+        class B(object):
+            def f(self):
+                return 43
+        a = A()
+        a.x = 5
+        assert a.f() == 42
+        a.__class__ = B
+        assert type(a) is B
+        assert a.f() == 43
+        assert a.x == 5
+        d = a.__dict__
+        a.__class__ = A
+        assert a.x == 5
+        assert a.__dict__ is d
+
+    def test_del(self):
+        l = []
+        class A(object):
+            def __del__(self):
+                l.append(self.x)
+        a = A()
+        a.x = 42
+        del a
+        import gc
+        gc.collect()
+        assert l == [42]
+
+    def test_subclass_of_builtin(self):
+        class A(list):
+            pass
+        a = A([1, 2])
+        a.x = 5
+        assert a.x == 5
+        assert a.__dict__ == {"x": 5}
+        assert a == [1, 2]
+
+
+class AppTestWithMapDictAndCounters(object):
+    def setup_class(cls):
+        cls.space = gettestobjspace(
+            **{"objspace.std.withmapdict": True,
+               "objspace.std.withmethodcachecounter": True,
+               "objspace.opcodes.CALL_METHOD": True})
+
+    def setup_method(self, meth):
+        self.space.appexec([], """():
+            import __pypy__
+            __pypy__.reset_method_cache_counter()
+        """)
+
+    def test_simple(self):
+        import __pypy__
+        class A(object):
+            pass
+        a = A()
+        a.x = 42
+        def f():
+            return a.x
+        #
+        res = [f() for i in range(10)]
+        assert res == [42] * 10
+        assert __pypy__.mapdict_cache_counter("x") == (9, 1)
+        #
+        a.y = "foo"     # new map for 'a': one more miss
+        res = [f() for i in range(10)]
+        assert res == [42] * 10
+        assert __pypy__.mapdict_cache_counter("x") == (9 + 9, 2)
+        #
+        A.x = 5         # the class changed: one more miss
+        res = [f() for i in range(10)]
+        assert res == [42] * 10
+        assert __pypy__.mapdict_cache_counter("x") == (9 + 9 + 9, 3)
+
+    def test_property_shadows_instance(self):
+        import __pypy__
+        class A(object):
+            pass
+        a = A()
+        a.x = 42
+        def f():
+            return a.x
+        assert [f() for i in range(5)] == [42] * 5
+        A.x = property(lambda self: 43)
+        assert [f() for i in range(5)] == [43] * 5
+        del A.x
+        assert [f() for i in range(5)] == [42] * 5
+
+    def test_same_map_different_values(self):
+        class A(object):
+            pass
+        objs = []
+        for i in range(10):
+            a = A()
+            a.x = i
+            objs.append(a)
+        def f(a):
+            return a.x
+        assert [f(a) for a in objs] == range(10)
+
+    def test_slots(self):
+        import __pypy__
+        class A(object):
+            __slots__ = ["x"]
+        a = A()
+        a.x = 42
+        def f():
+            return a.x
+        assert [f() for i in range(10)] == [42] * 10
+        assert __pypy__.mapdict_cache_counter("x") == (9, 1)
+        del a.x
+        raises(AttributeError, f)
+        a.x = 43
+        assert f() == 43
+
+    def test_devolved_dict(self):
+        class A(object):
+            pass
+        a = A()
+        a.x = 42
+        def f():
+            return a.x
+        assert [f() for i in range(5)] == [42] * 5
+        a.__dict__[1] = 2
+        a.__dict__["x"] = 43
+        assert [f() for i in range(5)] == [43] * 5
+
+    def test_custom_getattribute(self):
+        class A(object):
+            pass
+        a = A()
+        a.x = 42
+        def f():
+            return a.x
+        assert [f() for i in range(5)] == [42] * 5
+        A.__getattribute__ = lambda self, name: 44
+        assert [f() for i in range(5)] == [44] * 5
+
+    def test_call_method_uses_cache(self):
+        import __pypy__
+        class A(object):
+            def f(self):
+                return 42
+        a = A()
+        a.x = 1
+        def g():
+            return a.f()
+        assert [g() for i in range(10)] == [42] * 10
+        assert __pypy__.mapdict_cache_counter("f") == (9, 1)
+        a.f = lambda: 43    # the instance shadows the method now
+        assert [g() for i in range(10)] == [43] * 10
+        del a.f
+        A.f = lambda self: 44
+        assert [g() for i in range(10)] == [44] * 10
+
+    def test_change_class(self):
+        class A(object):
+            def f(self):
+                return 42
+        class B(object):
+            def f(self):
+                return 43
+        a = A()
+        def g():
+            return a.f()
+        assert [g() for i in range(5)] == [42] * 5
+        a.__class__ = B
+        assert [g() for i in range(5)] == [43] * 5
@@ -305,3 +305,7 @@ class AppTestDescriptorWithGetAttributeShortcut(
     # ====> ../../test/test_descriptor.py
 
     OPTIONS = {"objspace.std.getattributeshortcut": True}
+
+
+class AppTestWithMapDict(AppTestUserObject):
+    OPTIONS = {"objspace.std.withmapdict": True}
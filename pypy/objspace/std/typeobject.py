@@ -48,6 +48,22 @@ def _mangle(name, klass):
 class VersionTag(object):
     pass
 
+# values of W_TypeObject.compares_by_identity_status
+UNKNOWN = 0
+COMPARES_BY_IDENTITY = 1
+OVERRIDES_EQ_CMP_OR_HASH = 2
+
+class ComparesByIdentityVersion(object):
+    """The version changes whenever a type that compared by identity stops
+    doing so.  Dicts that store their keys by identity use it to know that
+    they must fall back to calling __eq__ and __hash__."""
+
+    def __init__(self, space):
+        self.bump()
+
+    def bump(self):
+        self.version = VersionTag()
+
 class MethodCache(object):
 
     def __init__(self, space):
@@ -75,12 +91,16 @@ class W_TypeObject(W_Object):
                           'weakrefable',
                           'hasdict',
                           'nslots',
-                          'instancetypedef']
+                          'instancetypedef',
+                          'terminator']
 
     # for config.objspace.std.getattributeshortcut
     # (False is a conservative default, fixed during real usage)
     uses_object_getattribute = False
 
+    # for config.objspace.std.withidentitydict
+    compares_by_identity_status = UNKNOWN
+
     # used to cache the type __new__ function if it comes from a builtin type
     # != 'type', in that case call__Type will also assumes the result
     # of the __new__ is an instance of the type
@@ -108,6 +128,15 @@ class W_TypeObject(W_Object):
             custom_metaclass = not space.is_w(space.type(w_self), space.w_type)
         w_self.w_same_layout_as = get_parent_layout(w_self)
 
+        if space.config.objspace.std.withmapdict:
+            from pypy.objspace.std.mapdict import DictTerminator, NoDictTerminator
+            if w_self.hasdict:
+                w_self.terminator = DictTerminator(space, w_self)
+            else:
+                w_self.terminator = NoDictTerminator(space, w_self)
+        else:
+            w_self.terminator = None
+
         if space.config.objspace.std.withtypeversion:
             if custom_metaclass or not is_mro_purely_of_types(w_self.mro_w):
                 pass
@@ -117,14 +146,24 @@ class W_TypeObject(W_Object):
                 # itself changes
                 w_self._version_tag = VersionTag()
 
-    def mutated(w_self):
+    def mutated(w_self, key=None):
+        """Must be called before the type changes.  'key' is the name of
+        the changed attribute, or None if the change is of another kind."""
         space = w_self.space
         assert w_self.is_heaptype() or not space.config.objspace.std.immutable_builtintypes
         if (not space.config.objspace.std.withtypeversion and
             not space.config.objspace.std.getattributeshortcut and
+            not space.config.objspace.std.withidentitydict and
             not space.config.objspace.std.newshortcut):
             return
 
+        if (space.config.objspace.std.withidentitydict and
+                (key is None or key == '__eq__' or
+                 key == '__cmp__' or key == '__hash__')):
+            if w_self.compares_by_identity_status == COMPARES_BY_IDENTITY:
+                space.fromcache(ComparesByIdentityVersion).bump()
+            w_self.compares_by_identity_status = UNKNOWN
+
         if space.config.objspace.std.getattributeshortcut:
             w_self.uses_object_getattribute = False
             # ^^^ conservative default, fixed during real usage
@@ -139,7 +178,7 @@ class W_TypeObject(W_Object):
         subclasses_w = w_self.get_subclasses()
         for w_subclass in subclasses_w:
             assert isinstance(w_subclass, W_TypeObject)
-            w_subclass.mutated()
+            w_subclass.mutated(key)
 
     def version_tag(w_self):
         if (not we_are_jitted() or w_self.is_heaptype() or not
@@ -178,6 +217,25 @@ class W_TypeObject(W_Object):
     def has_object_getattribute(w_self):
         return w_self.getattribute_if_not_from_object() is None
 
+    def compares_by_identity(w_self):
+        """Return True if the instances of this user-defined type use the
+        __eq__, __cmp__ and __hash__ of 'object', i.e. if they can be
+        compared and hashed by identity.  Only computed with the
+        withidentitydict option; the result is cached until mutated()."""
+        space = w_self.space
+        if not space.config.objspace.std.withidentitydict:
+            return False
+        if not w_self.is_heaptype():
+            return False
+        if w_self.compares_by_identity_status == UNKNOWN:
+            w_self.compares_by_identity_status = COMPARES_BY_IDENTITY
+            for name in ['__eq__', '__cmp__', '__hash__']:
+                if w_self.lookup(name) is not space.w_object.lookup(name):
+                    status = OVERRIDES_EQ_CMP_OR_HASH
+                    w_self.compares_by_identity_status = status
+                    break
+        return w_self.compares_by_identity_status == COMPARES_BY_IDENTITY
+
     def ready(w_self):
         for w_base in w_self.bases_w:
             if not isinstance(w_base, W_TypeObject):
@@ -774,7 +832,7 @@ def setattr__Type_ANY_ANY(space, w_type, w_name, w_value):
     if name == "__del__" and name not in w_type.dict_w:
         msg = "a __del__ method added to an existing type will not be called"
         space.warn(msg, space.w_RuntimeWarning)
-    w_type.mutated()
+    w_type.mutated(name)
     w_type.dict_w[name] = w_value
 
 def delattr__Type_ANY(space, w_type, w_name):
@@ -795,7 +853,7 @@ def delattr__Type_ANY(space, w_type, w_name):
     except KeyError:
         raise OperationError(space.w_AttributeError, w_name)
     else:
-        w_type.mutated()
+        w_type.mutated(name)
         return
 
 
@@ -225,6 +225,7 @@ class JitHintError(Exception):
 
 OPTIMIZER_SIMPLE = 0
 OPTIMIZER_FULL = 1
+OPTIMIZER_UNROLL = 2    # like OPTIMIZER_FULL, but peels loops
 
 DEBUG_OFF = 0
 DEBUG_PROFILE = 1
@@ -237,11 +238,65 @@ PARAMETERS = {'threshold': 1000,
               'inlining': False,
               'optimizer': OPTIMIZER_FULL,
               'debug' : DEBUG_STEPS,
+              'loop_longevity': 1000,
               }
 unroll_parameters = unrolling_iterable(PARAMETERS.keys())
 
 # ____________________________________________________________
 
+class JitStats(object):
+    """Counters about the loops and bridges compiled by the JIT, and
+    about the ones that were freed again because they were not used
+    any more (see the 'loop_longevity' parameter).  The translated JIT
+    updates the prebuilt 'jit_stats' instance below, which can be read
+    by the interpreter; without a JIT, all counters stay at zero.
+    """
+    def __init__(self):
+        self.total_compiled_loops = 0
+        self.total_compiled_bridges = 0
+        self.total_freed_loops = 0
+        self.total_freed_bridges = 0
+        self.loops = {}     # {loop number: LoopStats} for the loops alive
+
+class LoopStats(object):
+    """Counters about one compiled loop and the bridges attached to it,
+    kept in JitStats.loops for as long as the loop is alive.
+    """
+    def __init__(self, number):
+        self.number = number
+        self.location = ''      # of the first merge point of the loop
+        self.trace_length = 0   # number of operations, after optimization
+        self.asm_size = 0       # bytes of machine code, bridges included
+        self.entry_count = 0    # entered from the interpreter
+        self.bridge_count = 0
+        self.guard_failures = {}    # {fail descr number: count}
+
+    def record_guard_failure(self, index):
+        self.guard_failures[index] = self.guard_failures.get(index, 0) + 1
+
+jit_stats = JitStats()
+
+def _annotate_jit_stats(number, location):
+    # Never called, only annotated (see ExtEnterLeaveMarker.annotate_hooks()).
+    # The JitStats and LoopStats are only updated by the JIT, which is
+    # annotated after the interpreter and cannot generalize annotations
+    # any more: make sure the annotator already sees values as general
+    # as the ones that the JIT stores.
+    jit_stats.total_compiled_loops = number
+    jit_stats.total_compiled_bridges = number
+    jit_stats.total_freed_loops = number
+    jit_stats.total_freed_bridges = number
+    loopstats = LoopStats(number)
+    loopstats.location = location
+    loopstats.trace_length = number
+    loopstats.asm_size = number
+    loopstats.entry_count = number
+    loopstats.bridge_count = number
+    loopstats.record_guard_failure(number)
+    jit_stats.loops[number] = loopstats
+
+# ____________________________________________________________
+
 class JitDriver:    
     """Base class to declare fine-grained user control on the JIT.  So
     far, there must be a singleton instance of JitDriver.  This style
@@ -254,7 +309,8 @@ class JitDriver:
     def __init__(self, greens=None, reds=None, virtualizables=None,
                  get_jitcell_at=None, set_jitcell_at=None,
                  can_inline=None, get_printable_location=None,
-                 confirm_enter_jit=None):
+                 confirm_enter_jit=None, is_preheated=None, on_compile=None,
+                 on_compile_bridge=None, on_abort=None, on_invalidate=None):
         if greens is not None:
             self.greens = greens
         if reds is not None:
@@ -272,6 +328,18 @@ class JitDriver:
         self.get_printable_location = get_printable_location
         self.can_inline = can_inline
         self.confirm_enter_jit = confirm_enter_jit
+        # is_preheated(*greens) is called the first time the JIT sees a
+        # given set of greens; if it returns True, tracing starts the next
+        # time they are reached instead of waiting for the threshold
+        self.is_preheated = is_preheated
+        # hooks called by the JIT, with one extra argument in front of
+        # the greens: the number of the loop for on_compile(),
+        # on_compile_bridge() and on_invalidate(), and the reason (one
+        # of the ABORT_* counters of jitprof.py) for on_abort()
+        self.on_compile = on_compile
+        self.on_compile_bridge = on_compile_bridge
+        self.on_abort = on_abort
+        self.on_invalidate = on_invalidate
 
     def _freeze_(self):
         return True
@@ -379,6 +447,7 @@ class ExtEnterLeaveMarker(ExtRegistryEntry):
         return annmodel.s_None
 
     def annotate_hooks(self, **kwds_s):
+        from pypy.annotation import model as annmodel
         driver = self.instance.im_self
         s_jitcell = self.bookkeeper.valueoftype(BaseJitCell)
         self.annotate_hook(driver.get_jitcell_at, driver.greens, **kwds_s)
@@ -386,6 +455,14 @@ class ExtEnterLeaveMarker(ExtRegistryEntry):
                            **kwds_s)
         self.annotate_hook(driver.can_inline, driver.greens, **kwds_s)
         self.annotate_hook(driver.get_printable_location, driver.greens, **kwds_s)
+        self.annotate_hook(driver.is_preheated, driver.greens, **kwds_s)
+        s_int = annmodel.SomeInteger()
+        for hook in [driver.on_compile, driver.on_compile_bridge,
+                     driver.on_abort, driver.on_invalidate]:
+            self.annotate_hook(hook, driver.greens, [s_int], **kwds_s)
+        s_func = self.bookkeeper.immutablevalue(_annotate_jit_stats)
+        self.bookkeeper.emulate_pbc_call('jitdriver._annotate_jit_stats',
+                                         s_func, [s_int, annmodel.SomeString()])
 
     def annotate_hook(self, func, variables, args_s=[], **kwds_s):
         if func is None:
@@ -29,6 +29,21 @@ USE_KARATSUBA = True # set to False for comparison
 KARATSUBA_CUTOFF = 70
 KARATSUBA_SQUARE_CUTOFF = 2 * KARATSUBA_CUTOFF
 
+# Above TOOMCOOK_CUTOFF digits, balanced multiplications use the Toom-3
+# algorithm, which does 5 multiplications of numbers a third of the size
+# instead of the 9 ones of two levels of Karatsuba.
+
+USE_TOOMCOOK = True
+TOOMCOOK_CUTOFF = 3 * KARATSUBA_CUTOFF
+
+# Divisions where both the divisor and the quotient have more than
+# DIVIDE_CUTOFF digits use a recursive divide-and-conquer algorithm, whose
+# cost is that of a few multiplications instead of quadratic.  This is
+# also the size above which conversions between bigints and strings of
+# decimal digits are done by divide-and-conquer.
+
+DIVIDE_CUTOFF = 2 * KARATSUBA_CUTOFF
+
 # For exponentiation, use the binary left-to-right algorithm
 # unless the exponent contains more than FIVEARY_CUTOFF digits.
 # In that case, do 5 bits at a time.  The potential drawback is that
@@ -842,6 +857,9 @@ def _k_mul(a, b):
     if 2 * asize <= bsize:
         return _k_lopsided_mul(a, b)
 
+    if USE_TOOMCOOK and asize > TOOMCOOK_CUTOFF:
+        return _tc_mul(a, b)
+
     # Split a & b into hi & lo pieces.
     shift = bsize >> 1
     ah, al = _kmul_split(a, shift)
@@ -1020,6 +1038,111 @@ def _k_lopsided_mul(a, b):
     return ret
 
 
+def _tc_split(n, size):
+    """
+    A helper for Toom-3 multiplication (tc_mul).
+    Splits the bigint "n" in three pieces of "size" digits, such that
+    abs(n) == (hi << 2*size) + (mid << size) + lo, viewing the shifts as
+    being by digits.  The sign bit is ignored, and the return values
+    are >= 0.
+    """
+    size_n = n._numdigits()
+    size_lo = min(size_n, size)
+    size_mid = min(size_n, 2 * size)
+
+    lo = rbigint(n.digits[:size_lo], 1)
+    mid = rbigint(n.digits[size_lo:size_mid], 1)
+    hi = rbigint(n.digits[size_mid:], 1)
+    lo._normalize()
+    mid._normalize()
+    hi._normalize()
+    return hi, mid, lo
+
+def _tc_divexact3(x):
+    """Divides x by 3, keeping the sign; the division must be exact."""
+    q, rem = _divrem1(x, 3)
+    assert rem == 0
+    if q.sign != 0:
+        q.sign = x.sign
+    return q
+
+def _tc_mul(a, b):
+    """
+    Toom-3 multiplication.  Ignores the input signs, and returns the
+    absolute value of the product.  Called by k_mul for numbers of
+    balanced sizes, a being the smallest one.
+    See Knuth Vol. 2 Chapter 4.3.3, and M. Bodrato, "Towards Optimal
+    Toom-Cook Multiplication for Univariate and Multivariate Polynomials
+    in Characteristic 2 and 0" (2007) for the interpolation sequence.
+    """
+    asize = a._numdigits()
+    bsize = b._numdigits()
+    # Split a & b into three pieces of k digits, seen as the coefficients
+    # of polynomials p(X) and q(X) of degree 2 with X = BASE**k.  The
+    # product is the polynomial r = p*q of degree 4 at that X.  We get
+    # it from its values at the points 0, 1, -1, -2 and infinity, each
+    # of which is a product of numbers of k digits.
+    k = (bsize + 2) // 3
+    a2, a1, a0 = _tc_split(a, k)
+    if a is b:
+        b2, b1, b0 = a2, a1, a0
+    else:
+        b2, b1, b0 = _tc_split(b, k)
+
+    # 1. Evaluation.  The values at -1 and -2 may be negative.
+    t = a0.add(a2)
+    pa_1 = t.add(a1)
+    pa_m1 = t.sub(a1)
+    pa_m2 = pa_m1.add(a2).lshift(1).sub(a0)
+    if a is b:
+        pb_1, pb_m1, pb_m2 = pa_1, pa_m1, pa_m2
+    else:
+        t = b0.add(b2)
+        pb_1 = t.add(b1)
+        pb_m1 = t.sub(b1)
+        pb_m2 = pb_m1.add(b2).lshift(1).sub(b0)
+
+    # 2. Pointwise multiplication.  These recursively use Karatsuba or
+    # Toom-3 again, depending on the size.
+    r0 = a0.mul(b0)
+    r1 = pa_1.mul(pb_1)
+    rm1 = pa_m1.mul(pb_m1)
+    rm2 = pa_m2.mul(pb_m2)
+    rinf = a2.mul(b2)
+
+    # 3. Interpolation, with Bodrato's sequence.  The divisions are exact.
+    r3 = _tc_divexact3(rm2.sub(r1))
+    r1 = r1.sub(rm1).rshift(1)
+    r2 = rm1.sub(r0)
+    r3 = r2.sub(r3).rshift(1).add(rinf.lshift(1))
+    r2 = r2.add(r1).sub(rinf)
+    r1 = r1.sub(r3)
+    # now r0...r4 (with r4 == rinf) are the coefficients of r, which are
+    # all >= 0, as those of p and q are.
+
+    # 4. Recomposition.  None of the coefficients times its power of X
+    # is larger than the product, so each of them fits in the result
+    # space above its position.
+    ret = rbigint([0] * (asize + bsize), 1)
+    assert r0._numdigits() <= 2 * k
+    ret.digits[:r0._numdigits()] = r0.digits
+    _tc_add_at(ret, k, r1)
+    _tc_add_at(ret, 2 * k, r2)
+    _tc_add_at(ret, 3 * k, r3)
+    _tc_add_at(ret, 4 * k, rinf)
+    ret._normalize()
+    return ret
+
+def _tc_add_at(ret, shift, r):
+    """Adds the bigint r >= 0 into ret, starting at the digit shift."""
+    if r.sign == 0:
+        return
+    assert r.sign > 0
+    i = ret._numdigits() - shift
+    assert i >= r._numdigits()
+    _v_iadd(ret, shift, i, r, r._numdigits())
+
+
 def _inplace_divrem1(pout, pin, n, size=0):
     """
     Divide bigint pin by non-zero digit n, storing quotient
@@ -1106,12 +1229,12 @@ def _v_isub(x, xofs, m, y, n):
     return borrow
 
 
-def _muladd1(a, n, extra=widen_digit(0)):
+def _muladd1(a, n, extra=0):
     """Multiply by a single digit and add a single digit, ignoring the sign.
     """
     size_a = a._numdigits()
     z = rbigint([0] * (size_a+1), 1)
-    carry = extra
+    carry = widen_digit(extra)
     assert carry & MASK == carry
     i = 0
     while i < size_a:
@@ -1215,6 +1338,8 @@ def _divrem(a, b):
     if size_b == 1:
         z, urem = _divrem1(a, b._digit(0))
         rem = rbigint([urem], int(urem != 0))
+    elif size_b > DIVIDE_CUTOFF and size_a - size_b > DIVIDE_CUTOFF:
+        z, rem = _dc_divrem(a, b)
     else:
         z, rem = _x_divrem(a, b)
     # Set the signs.
@@ -1227,6 +1352,97 @@ def _divrem(a, b):
         rem.sign = - rem.sign
     return z, rem
 
+def _digits_slice(n, lo, hi):
+    """Returns the bigint made of the digits lo to hi of abs(n), that is
+    abs(n) // BASE**lo % BASE**(hi-lo)."""
+    size_n = n._numdigits()
+    if hi > size_n:
+        hi = size_n
+    if lo >= hi:
+        return rbigint()
+    z = rbigint(n.digits[lo:hi], 1)
+    z._normalize()
+    return z
+
+def _digits_lshift(n, count):
+    """Returns n * BASE**count."""
+    if n.sign == 0 or count == 0:
+        return n
+    return rbigint([0] * count + n.digits, n.sign)
+
+def _dc_divrem(a, b):
+    """
+    Divide-and-conquer division of abs(a) by abs(b), returning the
+    quotient and the remainder, both >= 0.  This is the recursive
+    division of Burnikel and Ziegler, "Fast Recursive Division" (1998):
+    a is cut into blocks of as many digits as b, and each block is
+    divided by b by dividing twice a number of 3 half-blocks by one of
+    2 half-blocks, which recursively divides by the high half of b and
+    corrects the result with a multiplication by the low half.
+    """
+    # Normalize: shift a and b left so that the highest bit of the top
+    # digit of b is set.  The quotient is unchanged, and the remainder
+    # is shifted back at the end.
+    n = b._numdigits()
+    top = b.digits[n - 1]
+    shift = 0
+    while top < (1 << (SHIFT - 1)):
+        top <<= 1
+        shift += 1
+    a = a.abs().lshift(shift)
+    b = b.abs().lshift(shift)
+    assert b._numdigits() == n
+
+    nblocks = (a._numdigits() + n - 1) // n
+    q = rbigint([0] * (nblocks * n), 1)
+    rem = rbigint()
+    i = nblocks - 1
+    while i >= 0:
+        block = _digits_slice(a, i * n, (i + 1) * n)
+        qi, rem = _div2n1n(_digits_lshift(rem, n).add(block), b, n)
+        if qi.sign != 0:
+            q.digits[i * n : i * n + qi._numdigits()] = qi.digits
+        i -= 1
+    q._normalize()
+    return q, rem.rshift(shift)
+
+def _div2n1n(a, b, n):
+    """Divides a >= 0 by the normalized b of n digits, knowing that
+    a < b * BASE**n.  Returns the quotient and the remainder."""
+    if n <= DIVIDE_CUTOFF:
+        return _divrem(a, b)
+    pad = n & 1
+    if pad:
+        # make n even; shifting both a and b keeps b normalized
+        a = _digits_lshift(a, 1)
+        b = _digits_lshift(b, 1)
+        n += 1
+    half_n = n >> 1
+    b1 = _digits_slice(b, half_n, n)
+    b2 = _digits_slice(b, 0, half_n)
+    q1, rem = _div3n2n(_digits_slice(a, n, a._numdigits()),
+                       _digits_slice(a, half_n, n), b, b1, b2, half_n)
+    q2, rem = _div3n2n(rem, _digits_slice(a, 0, half_n), b, b1, b2, half_n)
+    if pad:
+        rem = _digits_slice(rem, 1, rem._numdigits())
+    return _digits_lshift(q1, half_n).add(q2), rem
+
+def _div3n2n(a12, a3, b, b1, b2, n):
+    """Divides a12 * BASE**n + a3 by b == b1 * BASE**n + b2, where b1 and
+    b2 have n digits and a12 < b * BASE**n."""
+    if _digits_slice(a12, n, a12._numdigits()).eq(b1):
+        # the quotient of a12 by b1 would not fit in n digits
+        q = rbigint([MASK] * n, 1)
+        rem = a12.sub(_digits_lshift(b1, n)).add(b1)
+    else:
+        q, rem = _div2n1n(a12, b1, n)
+    rem = _digits_lshift(rem, n).add(a3).sub(q.mul(b2))
+    # the estimated quotient q is at most 2 too large
+    while rem.sign < 0:
+        q = q.sub(rbigint([1], 1))
+        rem = rem.add(b)
+    return q, rem
+
 # ______________ conversions to double _______________
 
 def _AsScaledDouble(v):
@@ -1341,6 +1557,9 @@ def _format(a, digits, prefix='', suffix=''):
     base = len(digits)
     assert base >= 2 and base <= 36
 
+    if (base & (base - 1)) != 0 and size_a > DIVIDE_CUTOFF:
+        return _dc_format(a, digits, prefix, suffix)
+
     # Compute a rough upper bound for the length of the string
     i = base
     bits = 0
@@ -1448,6 +1667,58 @@ def _format(a, digits, prefix='', suffix=''):
     return ''.join(s[p:])
 
 
+def _dc_format(a, digits, prefix, suffix):
+    """
+    Divide-and-conquer conversion of a bigint to a string, for a base
+    that is not a power of 2.  abs(a) is divided by a power of the base
+    that has about half its size, and both the quotient and the remainder
+    are converted recursively; the powers of the base are computed once
+    by repeated squaring.  This is subquadratic if division is.
+    """
+    base = len(digits)
+    # pts[0] == base ** chunk is the largest power of base with about
+    # DIVIDE_CUTOFF digits; pts[i] == pts[0] ** (2 ** i) has chunk << i
+    # characters, and the last one has at least half the size of a.
+    pt = rbigint.fromint(base)
+    chunk = 1
+    while 2 * pt._numdigits() <= DIVIDE_CUTOFF:
+        pt = pt.mul(pt)
+        chunk *= 2
+    pts = [pt]
+    while 2 * (pts[-1]._numdigits() - 1) < a._numdigits():
+        pts.append(pts[-1].mul(pts[-1]))
+    output = []
+    _dc_format_rec(a.abs(), len(pts) - 1, pts, chunk, digits, output, 0)
+    result = prefix + ''.join(output) + suffix
+    if a.sign < 0:
+        result = '-' + result
+    return result
+
+def _dc_format_rec(x, i, pts, chunk, digits, output, size):
+    """Appends to output the string of x >= 0, which must be smaller than
+    pts[i] ** 2.  If size is not 0, it is padded with zeroes on the left
+    to exactly size characters."""
+    if i < 0:
+        if x.sign == 0:
+            s = ''     # only zeroes, added below
+        else:
+            s = _format(x, digits)
+        if size:
+            assert len(s) <= size
+            s = digits[0] * (size - len(s)) + s
+        output.append(s)
+        return
+    top, bot = _divrem(x, pts[i])
+    bot_size = chunk << i
+    if size == 0 and top.sign == 0:
+        _dc_format_rec(bot, i - 1, pts, chunk, digits, output, 0)
+    else:
+        if size:
+            size -= bot_size
+        _dc_format_rec(top, i - 1, pts, chunk, digits, output, size)
+        _dc_format_rec(bot, i - 1, pts, chunk, digits, output, bot_size)
+
+
 def _bitwise(a, op, b): # '&', '|', '^'
     """ Bitwise and/or/xor operations """
 
@@ -1614,6 +1885,16 @@ def _decimalstr_to_bigint(s):
     elif s[p] == '+':
         p += 1
 
+    if lim - p > DIVIDE_CUTOFF * DEC_PER_DIGIT:
+        a = _dc_decimal_to_bigint(s, p, lim, {})
+    else:
+        a = _decimal_to_bigint(s, p, lim)
+    if sign:
+        a.sign = -1
+    return a
+
+def _decimal_to_bigint(s, p, lim):
+    # converts the decimal digits s[p:lim] in quadratic time
     a = rbigint.fromint(0)
     cnt = DEC_PER_DIGIT
     tens = 1
@@ -1627,8 +1908,22 @@ def _decimalstr_to_bigint(s):
             a = _muladd1(a, tens, dig)
             tens = 1
             dig = 0
-    if sign:
-        a.sign = -1
     return a
 
-
+def _dc_decimal_to_bigint(s, p, lim, pow10_cache):
+    # converts the decimal digits s[p:lim] by divide-and-conquer: the
+    # high and low halves are converted recursively, and combined with a
+    # multiplication by a power of 10.  The few different powers needed
+    # are cached in pow10_cache.
+    if lim - p <= DIVIDE_CUTOFF * DEC_PER_DIGIT:
+        return _decimal_to_bigint(s, p, lim)
+    nlow = (lim - p) // 2
+    mid = lim - nlow
+    hi = _dc_decimal_to_bigint(s, p, mid, pow10_cache)
+    lo = _dc_decimal_to_bigint(s, mid, lim, pow10_cache)
+    try:
+        pow10 = pow10_cache[nlow]
+    except KeyError:
+        pow10 = rbigint.fromint(10).pow(rbigint.fromint(nlow))
+        pow10_cache[nlow] = pow10
+    return hi.mul(pow10).add(lo)
@@ -0,0 +1,120 @@
+"""
+An RPython interface to the Linux epoll() system calls.
+
+Unlike rpoll.poll(), which has to pass the whole set of interesting file
+descriptors to the kernel on every call, the set is kept by the kernel
+in an epoll file descriptor: it is changed with epoll_ctl() and waited
+for with epoll_wait(), whose cost only depends on the number of ready
+file descriptors.  The GIL is released during epoll_wait().
+"""
+
+from pypy.rpython.lltypesystem import lltype, rffi
+from pypy.rlib.rposix import get_errno as geterrno
+from pypy.rpython.tool import rffi_platform as platform
+from pypy.translator.tool.cbuild import ExternalCompilationInfo
+
+eci = ExternalCompilationInfo(
+    includes = ['sys/epoll.h', 'unistd.h', 'errno.h'],
+)
+
+class CConfig:
+    _compilation_info_ = eci
+    epoll_data = platform.Struct('union epoll_data', [('fd', rffi.INT)])
+
+eventnames = '''EPOLLIN EPOLLPRI EPOLLOUT EPOLLERR EPOLLHUP EPOLLET
+                EPOLLONESHOT EPOLLRDNORM EPOLLRDBAND EPOLLWRNORM
+                EPOLLWRBAND EPOLLMSG'''.split()
+
+for name in eventnames + ['EPOLL_CTL_ADD', 'EPOLL_CTL_MOD', 'EPOLL_CTL_DEL']:
+    setattr(CConfig, name, platform.DefinedConstantInteger(name))
+
+cConfig = platform.configure(CConfig)
+
+class CConfig2:
+    _compilation_info_ = eci
+    epoll_event = platform.Struct('struct epoll_event',
+                                  [('events', rffi.UINT),
+                                   ('data', cConfig['epoll_data'])])
+
+cConfig.update(platform.configure(CConfig2))
+
+eventnames = [name for name in eventnames if cConfig[name] is not None]
+for name in eventnames:
+    globals()[name] = cConfig[name]
+
+EPOLL_CTL_ADD = cConfig['EPOLL_CTL_ADD']
+EPOLL_CTL_MOD = cConfig['EPOLL_CTL_MOD']
+EPOLL_CTL_DEL = cConfig['EPOLL_CTL_DEL']
+
+epoll_event = cConfig['epoll_event']
+epoll_eventarray = rffi.CArray(epoll_event)
+
+def external(name, args, result, **kwds):
+    return rffi.llexternal(name, args, result, compilation_info=eci, **kwds)
+
+# only epoll_wait() may block, so it is the only one releasing the GIL
+c_epoll_create = external('epoll_create', [rffi.INT], rffi.INT,
+                          threadsafe=False)
+c_epoll_ctl = external('epoll_ctl',
+                       [rffi.INT, rffi.INT, rffi.INT, lltype.Ptr(epoll_event)],
+                       rffi.INT, threadsafe=False)
+c_epoll_wait = external('epoll_wait',
+                        [rffi.INT, lltype.Ptr(epoll_eventarray), rffi.INT,
+                         rffi.INT],
+                        rffi.INT)
+c_close = external('close', [rffi.INT], rffi.INT, threadsafe=False)
+
+# ____________________________________________________________
+
+DEFAULT_SIZEHINT = 1023
+
+def epoll_create(sizehint=-1):
+    """Create a new epoll file descriptor.  'sizehint' is only a hint
+    for the kernel about the number of file descriptors; -1 picks a
+    default.  Raises OSError."""
+    if sizehint <= 0:
+        sizehint = DEFAULT_SIZEHINT
+    epfd = rffi.cast(lltype.Signed, c_epoll_create(sizehint))
+    if epfd < 0:
+        raise OSError(geterrno(), "epoll_create failed")
+    return epfd
+
+def epoll_close(epfd):
+    """Close an epoll file descriptor.  Raises OSError."""
+    if rffi.cast(lltype.Signed, c_close(epfd)) < 0:
+        raise OSError(geterrno(), "close failed")
+
+def epoll_ctl(epfd, op, fd, events=0):
+    """Add, modify or remove (depending on 'op', one of EPOLL_CTL_ADD,
+    EPOLL_CTL_MOD or EPOLL_CTL_DEL) the file descriptor 'fd' in the
+    interest set of 'epfd'.  Raises OSError."""
+    ev = lltype.malloc(epoll_event, flavor='raw')
+    try:
+        rffi.setintfield(ev, 'c_events', events)
+        rffi.setintfield(ev.c_data, 'c_fd', fd)
+        res = rffi.cast(lltype.Signed, c_epoll_ctl(epfd, op, fd, ev))
+        if res < 0:
+            raise OSError(geterrno(), "epoll_ctl failed")
+    finally:
+        lltype.free(ev, flavor='raw')
+
+def epoll_wait(epfd, maxevents, timeout=-1):
+    """Wait for at most 'maxevents' events.  'timeout' is an integer in
+    milliseconds, -1 meaning infinite.  Returns a list [(fd, events)].
+    Raises OSError."""
+    assert maxevents > 0
+    evs = lltype.malloc(epoll_eventarray, maxevents, flavor='raw')
+    try:
+        nfds = rffi.cast(lltype.Signed,
+                         c_epoll_wait(epfd, evs, maxevents, timeout))
+        if nfds < 0:
+            raise OSError(geterrno(), "epoll_wait failed")
+        retval = []
+        for i in range(nfds):
+            ev = evs[i]
+            fd = rffi.cast(lltype.Signed, ev.c_data.c_fd)
+            revents = rffi.cast(lltype.Signed, ev.c_events)
+            retval.append((fd, revents))
+    finally:
+        lltype.free(evs, flavor='raw')
+    return retval
@@ -204,6 +204,122 @@ class DumpHeapEntry(ExtRegistryEntry):
         hop.exception_is_here()
         return hop.genop('gc_heap_stats', [], resulttype=hop.r_result)
 
+# Heap inspection and statistics.  These are only supported after
+# translation with a framework GC; with the other GCs they return NULL
+# or -1.  They can't be run directly.
+
+def get_stats():
+    """Return a pointer to a GC_STATS structure with the number of
+    collections, the pause times and the number of bytes promoted out
+    of the nursery so far."""
+    raise NotImplementedError
+
+def get_rpy_roots():
+    """Return an array of GCREFs to all the roots of the GC."""
+    raise NotImplementedError
+
+def get_rpy_referents(gcref):
+    """Return an array of GCREFs to the objects 'gcref' references."""
+    raise NotImplementedError
+
+def get_rpy_memory_usage(gcref):
+    """Return the size in bytes of 'gcref', including the GC header."""
+    raise NotImplementedError
+
+def get_rpy_type_index(gcref):
+    """Return an integer identifying the RPython type of 'gcref'."""
+    raise NotImplementedError
+
+def dump_rpy_heap(fd):
+    """Write a binary dump of the heap to the file descriptor 'fd'.
+    See pypy.rpython.memory.gc.base.HeapDumper for the format.
+    Returns False if the GC doesn't support it or writing failed."""
+    raise NotImplementedError
+
+def cast_instance_to_gcref(x):
+    # before translation, the instance is used as its own gcref; it is
+    # only meaningful for the fake functions installed by the tests
+    if not we_are_translated():
+        return x
+    from pypy.rpython.annlowlevel import cast_instance_to_base_ptr
+    from pypy.rpython.lltypesystem import lltype, llmemory
+    return lltype.cast_opaque_ptr(llmemory.GCREF,
+                                  cast_instance_to_base_ptr(x))
+cast_instance_to_gcref._annspecialcase_ = 'specialize:argtype(0)'
+
+class GetStatsEntry(ExtRegistryEntry):
+    _about_ = get_stats
+
+    def compute_result_annotation(self):
+        from pypy.annotation import model as annmodel
+        from pypy.rpython.memory.gc.base import GC_STATS
+        from pypy.rpython.lltypesystem import lltype
+        return annmodel.SomePtr(lltype.Ptr(GC_STATS))
+
+    def specialize_call(self, hop):
+        hop.exception_is_here()
+        return hop.genop('gc_get_stats', [], resulttype=hop.r_result)
+
+class GetRpyRootsEntry(ExtRegistryEntry):
+    _about_ = get_rpy_roots
+
+    def compute_result_annotation(self):
+        from pypy.annotation import model as annmodel
+        from pypy.rpython.memory.gc.base import ARRAY_OF_GCREF
+        from pypy.rpython.lltypesystem import lltype
+        return annmodel.SomePtr(lltype.Ptr(ARRAY_OF_GCREF))
+
+    def specialize_call(self, hop):
+        hop.exception_is_here()
+        return hop.genop('gc_get_rpy_roots', [], resulttype=hop.r_result)
+
+class GetRpyReferentsEntry(ExtRegistryEntry):
+    _about_ = get_rpy_referents
+
+    def compute_result_annotation(self, s_gcref):
+        from pypy.annotation import model as annmodel
+        from pypy.rpython.memory.gc.base import ARRAY_OF_GCREF
+        from pypy.rpython.lltypesystem import lltype, llmemory
+        assert annmodel.SomePtr(llmemory.GCREF).contains(s_gcref)
+        return annmodel.SomePtr(lltype.Ptr(ARRAY_OF_GCREF))
+
+    def specialize_call(self, hop):
+        vlist = hop.inputargs(hop.args_r[0])
+        hop.exception_is_here()
+        return hop.genop('gc_get_rpy_referents', vlist,
+                         resulttype=hop.r_result)
+
+class GetRpyMemoryUsageEntry(ExtRegistryEntry):
+    _about_ = (get_rpy_memory_usage, get_rpy_type_index)
+
+    def compute_result_annotation(self, s_gcref):
+        from pypy.annotation import model as annmodel
+        from pypy.rpython.lltypesystem import llmemory
+        assert annmodel.SomePtr(llmemory.GCREF).contains(s_gcref)
+        return annmodel.SomeInteger()
+
+    def specialize_call(self, hop):
+        vlist = hop.inputargs(hop.args_r[0])
+        hop.exception_cannot_occur()
+        if self.instance is get_rpy_memory_usage:
+            opname = 'gc_get_rpy_memory_usage'
+        else:
+            opname = 'gc_get_rpy_type_index'
+        return hop.genop(opname, vlist, resulttype=hop.r_result)
+
+class DumpRpyHeapEntry(ExtRegistryEntry):
+    _about_ = dump_rpy_heap
+
+    def compute_result_annotation(self, s_fd):
+        from pypy.annotation import model as annmodel
+        return annmodel.s_Bool
+
+    def specialize_call(self, hop):
+        from pypy.rpython.lltypesystem import lltype
+        vlist = hop.inputargs(lltype.Signed)
+        hop.exception_cannot_occur()
+        return hop.genop('gc_dump_rpy_heap', vlist, resulttype=hop.r_result)
+
 def malloc_nonmovable(TP, n=None, zero=False):
     """ Allocate a non-moving buffer or return nullptr.
     When running directly, will pretend that gc is always
@@ -0,0 +1,262 @@
+"""An implementation of SHA-224 and SHA-256 in RPython.
+
+   See also the pure Python implementation in lib_pypy/_sha256.py.
+   This follows the text of the NIST standard FIPS PUB 180-2, with
+   the same framework as the SHA-1 implementation in rsha.py.
+"""
+
+from pypy.rlib.rarithmetic import r_uint, r_ulonglong
+
+# We reuse helpers from rmd5 and rsha too
+from pypy.rlib.rmd5 import _mask
+from pypy.rlib.rsha import _string2uintlist
+
+
+def _rotateRight(x, n):
+    "Rotate x (32 bit) right n bits circularly."
+    x = _mask(x)
+    return (x >> n) | (x << (32-n))
+
+def _shiftRight(x, n):
+    "Shift x (32 bit) right n bits."
+    return _mask(x) >> n
+
+def _state2string(H, count):
+    result = []
+    for i in range(count):
+        a = H[i]
+        result.append(chr((a>>24)&0xFF))
+        result.append(chr((a>>16)&0xFF))
+        result.append(chr((a>>8)&0xFF))
+        result.append(chr(a&0xFF))
+    return ''.join(result)
+
+def _state2hexstring(H, count):
+    hx = '0123456789abcdef'
+    result = []
+    for i in range(count):
+        a = H[i]
+        for shift in [28, 24, 20, 16, 12, 8, 4, 0]:
+            result.append(hx[(a>>shift)&0xF])
+    return ''.join(result)
+
+
+# ======================================================================
+# The SHA-256 transformation
+#
+# ======================================================================
+
+K = [r_uint(x) for x in [
+    0x428a2f98, 0x71374491, 0xb5c0fbcf, 0xe9b5dba5, 0x3956c25b, 0x59f111f1,
+    0x923f82a4, 0xab1c5ed5, 0xd807aa98, 0x12835b01, 0x243185be, 0x550c7dc3,
+    0x72be5d74, 0x80deb1fe, 0x9bdc06a7, 0xc19bf174, 0xe49b69c1, 0xefbe4786,
+    0x0fc19dc6, 0x240ca1cc, 0x2de92c6f, 0x4a7484aa, 0x5cb0a9dc, 0x76f988da,
+    0x983e5152, 0xa831c66d, 0xb00327c8, 0xbf597fc7, 0xc6e00bf3, 0xd5a79147,
+    0x06ca6351, 0x14292967, 0x27b70a85, 0x2e1b2138, 0x4d2c6dfc, 0x53380d13,
+    0x650a7354, 0x766a0abb, 0x81c2c92e, 0x92722c85, 0xa2bfe8a1, 0xa81a664b,
+    0xc24b8b70, 0xc76c51a3, 0xd192e819, 0xd6990624, 0xf40e3585, 0x106aa070,
+    0x19a4c116, 0x1e376c08, 0x2748774c, 0x34b0bcb5, 0x391c0cb3, 0x4ed8aa4a,
+    0x5b9cca4f, 0x682e6ff3, 0x748f82ee, 0x78a5636f, 0x84c87814, 0x8cc70208,
+    0x90befffa, 0xa4506ceb, 0xbef9a3f7, 0xc67178f2]]
+
+SHA256_INITIAL_STATE = [r_uint(x) for x in [
+    0x6a09e667, 0xbb67ae85, 0x3c6ef372, 0xa54ff53a,
+    0x510e527f, 0x9b05688c, 0x1f83d9ab, 0x5be0cd19]]
+
+SHA224_INITIAL_STATE = [r_uint(x) for x in [
+    0xc1059ed8, 0x367cd507, 0x3070dd17, 0xf70e5939,
+    0xffc00b31, 0x68581511, 0x64f98fa7, 0xbefa4fa4]]
+
+
+class RSHA256(object):
+    """RPython-level SHA-256 object.
+    """
+    _mixin_ = True        # for interp_sha256.py
+
+    digest_size = 32
+    block_size = 64
+    _initial_state = SHA256_INITIAL_STATE
+
+    def __init__(self, initialdata=''):
+        self._init()
+        self.update(initialdata)
+
+
+    def _init(self):
+        "Initialisation."
+        self.count = r_ulonglong(0)   # total number of bytes
+        self.input = ""   # pending unprocessed data, < 64 bytes
+        self.uintbuffer = [r_uint(0)] * 64
+
+        # Initial 256 bit message digest (8 times 32 bit).
+        initial_state = self._initial_state
+        self.H = [r_uint(0)] * 8
+        for i in range(8):
+            self.H[i] = initial_state[i]
+
+    def _transform(self, W):
+
+        for t in range(16, 64):
+            w15 = W[t-15]
+            w2 = W[t-2]
+            s0 = (_rotateRight(w15, 7) ^ _rotateRight(w15, 18) ^
+                  _shiftRight(w15, 3))
+            s1 = (_rotateRight(w2, 17) ^ _rotateRight(w2, 19) ^
+                  _shiftRight(w2, 10))
+            W[t] = W[t-16] + s0 + W[t-7] + s1
+
+        H = self.H
+        a = H[0]
+        b = H[1]
+        c = H[2]
+        d = H[3]
+        e = H[4]
+        f = H[5]
+        g = H[6]
+        h = H[7]
+
+        for t in range(64):
+            S1 = _rotateRight(e, 6) ^ _rotateRight(e, 11) ^ _rotateRight(e, 25)
+            ch = (e & f) ^ ((~ e) & g)
+            temp1 = h + S1 + ch + K[t] + W[t]
+            S0 = _rotateRight(a, 2) ^ _rotateRight(a, 13) ^ _rotateRight(a, 22)
+            maj = (a & b) ^ (a & c) ^ (b & c)
+            temp2 = S0 + maj
+            h = g
+            g = f
+            f = e
+            e = d + temp1
+            d = c
+            c = b
+            b = a
+            a = temp1 + temp2
+
+        H[0] = H[0] + a
+        H[1] = H[1] + b
+        H[2] = H[2] + c
+        H[3] = H[3] + d
+        H[4] = H[4] + e
+        H[5] = H[5] + f
+        H[6] = H[6] + g
+        H[7] = H[7] + h
+
+
+    def _finalize(self, digestfunc):
+        """Logic to add the final padding and extract the digest.
+        """
+        # Save the state before adding the padding
+        count = self.count
+        input = self.input
+        H = self.H
+        self.H = H[:]
+
+        index = len(input)
+        if index < 56:
+            padLen = 56 - index
+        else:
+            padLen = 120 - index
+
+        if padLen:
+            self.update('\200' + '\000' * (padLen-1))
+
+        # Append length (before padding).
+        assert len(self.input) == 56
+        W = self.uintbuffer
+        _string2uintlist(self.input, 0, 14, W)
+        length_in_bits = count << 3
+        W[14] = r_uint(length_in_bits >> 32)
+        W[15] = r_uint(length_in_bits)
+        self._transform(W)
+
+        # Store state in digest.
+        digest = digestfunc(self.H, self.digest_size // 4)
+
+        # Restore the saved state in case this instance is still used
+        self.count = count
+        self.input = input
+        self.H = H
+
+        return digest
+
+
+    # Down from here all methods follow the Python Standard Library
+    # API of the hashlib objects.
+
+    def update(self, inBuf):
+        """Add to the current message.
+
+        Repeated calls are equivalent to a single call with the
+        concatenation of all the arguments, i.e. m.update(a); m.update(b)
+        is equivalent to m.update(a+b).
+        """
+
+        leninBuf = len(inBuf)
+        self.count += leninBuf
+        index = len(self.input)
+        partLen = 64 - index
+        assert partLen > 0
+
+        if leninBuf >= partLen:
+            W = self.uintbuffer
+            self.input = self.input + inBuf[:partLen]
+            _string2uintlist(self.input, 0, 16, W)
+            self._transform(W)
+            i = partLen
+            while i + 64 <= leninBuf:
+                _string2uintlist(inBuf, i, 16, W)
+                self._transform(W)
+                i = i + 64
+            else:
+                self.input = inBuf[i:leninBuf]
+        else:
+            self.input = self.input + inBuf
+
+
+    def digest(self):
+        """Return the digest of the strings passed to the update()
+        method so far, as a string of digest_size bytes.
+        """
+        return self._finalize(_state2string)
+
+
+    def hexdigest(self):
+        """Like digest() except the digest is returned as a string of
+        hexadecimal digits, twice as long.
+        """
+        return self._finalize(_state2hexstring)
+
+
+    def copy(self):
+        """Return a clone object.
+        """
+        clone = RSHA256()
+        clone._copyfrom(self)
+        return clone
+
+    def _copyfrom(self, other):
+        """Copy all state from 'other' into 'self'.
+        """
+        self.count = other.count
+        self.input = other.input
+        self.H = other.H[:]
+
+
+class RSHA224(RSHA256):
+    """RPython-level SHA-224 object: SHA-256 with another initial state,
+    and a digest truncated to 224 bits.
+    """
+    digest_size = 28
+    _initial_state = SHA224_INITIAL_STATE
+
+    def copy(self):
+        """Return a clone object.
+        """
+        clone = RSHA224()
+        clone._copyfrom(self)
+        return clone
+
+
+# synonyms to build new objects, like the functions of the same name
+# in the hashlib module.
+sha256 = RSHA256
+sha224 = RSHA224
@@ -0,0 +1,278 @@
+"""An implementation of SHA-384 and SHA-512 in RPython.
+
+   See also the pure Python implementation in lib_pypy/_sha512.py.
+   This is the same algorithm as the one of rsha256.py, on 64-bit words
+   held in r_ulonglong's.
+"""
+
+from pypy.rlib.rarithmetic import r_ulonglong, intmask
+
+
+def _rotateRight(x, n):
+    "Rotate x (64 bit) right n bits circularly."
+    return (x >> n) | (x << (64-n))
+
+def _string2ulonglonglist(s, start, count, result):
+    """Build a list of count r_ulonglong's by unpacking the string
+    s[start:start+8*count] in big-endian order.
+    """
+    for i in range(count):
+        p = start + i * 8
+        x = r_ulonglong(0)
+        for j in range(8):
+            x = (x << 8) | r_ulonglong(ord(s[p+j]))
+        result[i] = x
+
+def _state2string(H, count):
+    result = []
+    for i in range(count):
+        a = H[i]
+        for shift in [56, 48, 40, 32, 24, 16, 8, 0]:
+            result.append(chr(intmask((a>>shift)&0xFF)))
+    return ''.join(result)
+
+def _state2hexstring(H, count):
+    hx = '0123456789abcdef'
+    result = []
+    for i in range(count):
+        a = H[i]
+        for shift in [60, 56, 52, 48, 44, 40, 36, 32,
+                      28, 24, 20, 16, 12, 8, 4, 0]:
+            result.append(hx[intmask((a>>shift)&0xF)])
+    return ''.join(result)
+
+
+# ======================================================================
+# The SHA-512 transformation
+#
+# ======================================================================
+
+K = [r_ulonglong(x) for x in [
+    0x428a2f98d728ae22L, 0x7137449123ef65cdL, 0xb5c0fbcfec4d3b2fL,
+    0xe9b5dba58189dbbcL, 0x3956c25bf348b538L, 0x59f111f1b605d019L,
+    0x923f82a4af194f9bL, 0xab1c5ed5da6d8118L, 0xd807aa98a3030242L,
+    0x12835b0145706fbeL, 0x243185be4ee4b28cL, 0x550c7dc3d5ffb4e2L,
+    0x72be5d74f27b896fL, 0x80deb1fe3b1696b1L, 0x9bdc06a725c71235L,
+    0xc19bf174cf692694L, 0xe49b69c19ef14ad2L, 0xefbe4786384f25e3L,
+    0x0fc19dc68b8cd5b5L, 0x240ca1cc77ac9c65L, 0x2de92c6f592b0275L,
+    0x4a7484aa6ea6e483L, 0x5cb0a9dcbd41fbd4L, 0x76f988da831153b5L,
+    0x983e5152ee66dfabL, 0xa831c66d2db43210L, 0xb00327c898fb213fL,
+    0xbf597fc7beef0ee4L, 0xc6e00bf33da88fc2L, 0xd5a79147930aa725L,
+    0x06ca6351e003826fL, 0x142929670a0e6e70L, 0x27b70a8546d22ffcL,
+    0x2e1b21385c26c926L, 0x4d2c6dfc5ac42aedL, 0x53380d139d95b3dfL,
+    0x650a73548baf63deL, 0x766a0abb3c77b2a8L, 0x81c2c92e47edaee6L,
+    0x92722c851482353bL, 0xa2bfe8a14cf10364L, 0xa81a664bbc423001L,
+    0xc24b8b70d0f89791L, 0xc76c51a30654be30L, 0xd192e819d6ef5218L,
+    0xd69906245565a910L, 0xf40e35855771202aL, 0x106aa07032bbd1b8L,
+    0x19a4c116b8d2d0c8L, 0x1e376c085141ab53L, 0x2748774cdf8eeb99L,
+    0x34b0bcb5e19b48a8L, 0x391c0cb3c5c95a63L, 0x4ed8aa4ae3418acbL,
+    0x5b9cca4f7763e373L, 0x682e6ff3d6b2b8a3L, 0x748f82ee5defb2fcL,
+    0x78a5636f43172f60L, 0x84c87814a1f0ab72L, 0x8cc702081a6439ecL,
+    0x90befffa23631e28L, 0xa4506cebde82bde9L, 0xbef9a3f7b2c67915L,
+    0xc67178f2e372532bL, 0xca273eceea26619cL, 0xd186b8c721c0c207L,
+    0xeada7dd6cde0eb1eL, 0xf57d4f7fee6ed178L, 0x06f067aa72176fbaL,
+    0x0a637dc5a2c898a6L, 0x113f9804bef90daeL, 0x1b710b35131c471bL,
+    0x28db77f523047d84L, 0x32caab7b40c72493L, 0x3c9ebe0a15c9bebcL,
+    0x431d67c49c100d4cL, 0x4cc5d4becb3e42b6L, 0x597f299cfc657e2aL,
+    0x5fcb6fab3ad6faecL, 0x6c44198c4a475817L]]
+
+SHA512_INITIAL_STATE = [r_ulonglong(x) for x in [
+    0x6a09e667f3bcc908L, 0xbb67ae8584caa73bL, 0x3c6ef372fe94f82bL,
+    0xa54ff53a5f1d36f1L, 0x510e527fade682d1L, 0x9b05688c2b3e6c1fL,
+    0x1f83d9abfb41bd6bL, 0x5be0cd19137e2179L]]
+
+SHA384_INITIAL_STATE = [r_ulonglong(x) for x in [
+    0xcbbb9d5dc1059ed8L, 0x629a292a367cd507L, 0x9159015a3070dd17L,
+    0x152fecd8f70e5939L, 0x67332667ffc00b31L, 0x8eb44a8768581511L,
+    0xdb0c2e0d64f98fa7L, 0x47b5481dbefa4fa4L]]
+
+
+class RSHA512(object):
+    """RPython-level SHA-512 object.
+    """
+    _mixin_ = True        # for interp_sha512.py
+
+    digest_size = 64
+    block_size = 128
+    _initial_state = SHA512_INITIAL_STATE
+
+    def __init__(self, initialdata=''):
+        self._init()
+        self.update(initialdata)
+
+
+    def _init(self):
+        "Initialisation."
+        self.count = r_ulonglong(0)   # total number of bytes
+        self.input = ""   # pending unprocessed data, < 128 bytes
+        self.ulonglongbuffer = [r_ulonglong(0)] * 80
+
+        # Initial 512 bit message digest (8 times 64 bit).
+        initial_state = self._initial_state
+        self.H = [r_ulonglong(0)] * 8
+        for i in range(8):
+            self.H[i] = initial_state[i]
+
+    def _transform(self, W):
+
+        for t in range(16, 80):
+            w15 = W[t-15]
+            w2 = W[t-2]
+            s0 = _rotateRight(w15, 1) ^ _rotateRight(w15, 8) ^ (w15 >> 7)
+            s1 = _rotateRight(w2, 19) ^ _rotateRight(w2, 61) ^ (w2 >> 6)
+            W[t] = W[t-16] + s0 + W[t-7] + s1
+
+        H = self.H
+        a = H[0]
+        b = H[1]
+        c = H[2]
+        d = H[3]
+        e = H[4]
+        f = H[5]
+        g = H[6]
+        h = H[7]
+
+        for t in range(80):
+            S1 = _rotateRight(e, 14) ^ _rotateRight(e, 18) ^ _rotateRight(e, 41)
+            ch = (e & f) ^ ((~ e) & g)
+            temp1 = h + S1 + ch + K[t] + W[t]
+            S0 = _rotateRight(a, 28) ^ _rotateRight(a, 34) ^ _rotateRight(a, 39)
+            maj = (a & b) ^ (a & c) ^ (b & c)
+            temp2 = S0 + maj
+            h = g
+            g = f
+            f = e
+            e = d + temp1
+            d = c
+            c = b
+            b = a
+            a = temp1 + temp2
+
+        H[0] = H[0] + a
+        H[1] = H[1] + b
+        H[2] = H[2] + c
+        H[3] = H[3] + d
+        H[4] = H[4] + e
+        H[5] = H[5] + f
+        H[6] = H[6] + g
+        H[7] = H[7] + h
+
+
+    def _finalize(self, digestfunc):
+        """Logic to add the final padding and extract the digest.
+        """
+        # Save the state before adding the padding
+        count = self.count
+        input = self.input
+        H = self.H
+        self.H = H[:]
+
+        index = len(input)
+        if index < 112:
+            padLen = 112 - index
+        else:
+            padLen = 240 - index
+
+        if padLen:
+            self.update('\200' + '\000' * (padLen-1))
+
+        # Append length (before padding), as a 128-bit number of bits.
+        assert len(self.input) == 112
+        W = self.ulonglongbuffer
+        _string2ulonglonglist(self.input, 0, 14, W)
+        W[14] = count >> 61
+        W[15] = count << 3
+        self._transform(W)
+
+        # Store state in digest.
+        digest = digestfunc(self.H, self.digest_size // 8)
+
+        # Restore the saved state in case this instance is still used
+        self.count = count
+        self.input = input
+        self.H = H
+
+        return digest
+
+
+    # Down from here all methods follow the Python Standard Library
+    # API of the hashlib objects.
+
+    def update(self, inBuf):
+        """Add to the current message.
+
+        Repeated calls are equivalent to a single call with the
+        concatenation of all the arguments, i.e. m.update(a); m.update(b)
+        is equivalent to m.update(a+b).
+        """
+
+        leninBuf = len(inBuf)
+        self.count += leninBuf
+        index = len(self.input)
+        partLen = 128 - index
+        assert partLen > 0
+
+        if leninBuf >= partLen:
+            W = self.ulonglongbuffer
+            self.input = self.input + inBuf[:partLen]
+            _string2ulonglonglist(self.input, 0, 16, W)
+            self._transform(W)
+            i = partLen
+            while i + 128 <= leninBuf:
+                _string2ulonglonglist(inBuf, i, 16, W)
+                self._transform(W)
+                i = i + 128
+            else:
+                self.input = inBuf[i:leninBuf]
+        else:
+            self.input = self.input + inBuf
+
+
+    def digest(self):
+        """Return the digest of the strings passed to the update()
+        method so far, as a string of digest_size bytes.
+        """
+        return self._finalize(_state2string)
+
+
+    def hexdigest(self):
+        """Like digest() except the digest is returned as a string of
+        hexadecimal digits, twice as long.
+        """
+        return self._finalize(_state2hexstring)
+
+
+    def copy(self):
+        """Return a clone object.
+        """
+        clone = RSHA512()
+        clone._copyfrom(self)
+        return clone
+
+    def _copyfrom(self, other):
+        """Copy all state from 'other' into 'self'.
+        """
+        self.count = other.count
+        self.input = other.input
+        self.H = other.H[:]
+
+
+class RSHA384(RSHA512):
+    """RPython-level SHA-384 object: SHA-512 with another initial state,
+    and a digest truncated to 384 bits.
+    """
+    digest_size = 48
+    _initial_state = SHA384_INITIAL_STATE
+
+    def copy(self):
+        """Return a clone object.
+        """
+        clone = RSHA384()
+        clone._copyfrom(self)
+        return clone
+
+
+# synonyms to build new objects, like the functions of the same name
+# in the hashlib module.
+sha512 = RSHA512
+sha384 = RSHA384
@@ -4,6 +4,7 @@ Character categories and charsets.
 import sys
 from pypy.rlib.rlocale import tolower, isalnum
 from pypy.rlib.unroll import unrolling_iterable
+from pypy.rlib.jit import purefunction, unroll_safe
 
 # Note: the unicode parts of this module require you to call
 # rsre.set_unicode_db() first, to select one of the modules
@@ -58,6 +59,15 @@ def getlower(char_ord, flags):
     return char_ord
 
 
+@purefunction
+def get_code(pattern_codes, index):
+    """Read one code of a pattern.  The codes of a pattern never change
+    once compiled: when the JIT sees both arguments as constants, the read
+    is constant-folded, which specializes the machine code for the pattern.
+    """
+    return pattern_codes[index]
+
+
 class MatchContextBase(object):
 
     UNDECIDED = 0
@@ -65,7 +75,7 @@ class MatchContextBase(object):
     NOT_MATCHED = 2
 
     def peek_code(self, peek=0):
-        return self.pattern_codes[self.code_position + peek]
+        return get_code(self.pattern_codes, self.code_position + peek)
 
     def skip_code(self, skip_count):
         self.code_position = self.code_position + skip_count
@@ -154,14 +164,14 @@ category_dispatch_unroll = unrolling_iterable(category_dispatch_table)
 SET_OK = -1
 SET_NOT_OK = -2
 
-def check_charset(char_code, context):
-    """Checks whether a character matches set of arbitrary length. Currently
-    assumes the set starts at the first member of pattern_codes."""
-    pattern_codes = context.pattern_codes
-    index = context.code_position
+@unroll_safe
+def check_charset(pattern_codes, index, char_code):
+    """Checks whether a character matches the set of arbitrary length that
+    starts at pattern_codes[index].  The loop only depends on the codes of
+    the set, so the JIT unrolls it completely for a constant pattern."""
     negated = SET_OK
     while index >= 0:
-        opcode = pattern_codes[index]
+        opcode = get_code(pattern_codes, index)
         i = 0
         for function in set_dispatch_unroll:
             if function is not None and opcode == i:
@@ -181,14 +191,14 @@ def set_failure(pat, index, char_code):
 
 def set_literal(pat, index, char_code):
     # <LITERAL> <code>
-    if pat[index+1] == char_code:
+    if get_code(pat, index+1) == char_code:
         return SET_OK
     else:
         return index + 2
 
 def set_category(pat, index, char_code):
     # <CATEGORY> <code>
-    if category_dispatch(pat[index+1], char_code):
+    if category_dispatch(get_code(pat, index+1), char_code):
         return SET_OK
     else:
         return index + 2
@@ -208,14 +218,14 @@ def set_charset(pat, index, char_code):
 
 def set_range(pat, index, char_code):
     # <RANGE> <lower> <upper>
-    if pat[index+1] <= char_code <= pat[index+2]:
+    if get_code(pat, index+1) <= char_code <= get_code(pat, index+2):
         return SET_OK
     return index + 3
 
 def set_bigcharset(pat, index, char_code):
     # <BIGCHARSET> <blockcount> <256 blockindices> <blocks>
     # XXX this function probably needs a makeover
-    count = pat[index+1]
+    count = get_code(pat, index+1)
     index += 2
     if char_code < 65536:
         block_index = char_code >> 8
@@ -11,8 +11,25 @@ Core routines for regular expression matching and searching.
 
 from pypy.rlib.rsre import rsre_char
 from pypy.rlib.rsre.rsre_char import SRE_INFO_PREFIX, SRE_INFO_LITERAL
-from pypy.rlib.rsre.rsre_char import OPCODE_INFO, MAXREPEAT
+from pypy.rlib.rsre.rsre_char import OPCODE_INFO, OPCODE_LITERAL, MAXREPEAT
+from pypy.rlib.rsre.rsre_char import get_code
 from pypy.rlib.unroll import unrolling_iterable
+from pypy.rlib.jit import JitDriver
+
+# The JitDrivers of the loops that scan the string.  The pattern codes
+# are always green: the JIT compiles one loop per pattern (and per
+# position in the pattern), in which all the reads of pattern codes are
+# constant-folded by rsre_char.get_code().  As this file is execfile'd
+# once per State class, each copy gets its own drivers.
+
+search_driver = JitDriver(greens=['pattern_codes'],
+                          reds=['string_position', 'state'])
+fast_search_driver = JitDriver(greens=['pattern_codes'],
+                               reds=['i', 'string_position', 'state'])
+cr_in_driver = JitDriver(greens=['set_position', 'ignore', 'pattern_codes'],
+                         reds=['count', 'maxcount', 'ctx'])
+cr_literal_driver = JitDriver(greens=['chr', 'ignore', 'negate'],
+                              reds=['count', 'maxcount', 'ctx'])
 
 #### Core classes
 
@@ -191,66 +208,92 @@ StateMixin._MatchContext = MatchContext    # for tests
 #### Main opcode dispatch loop
 
 def search(state, pattern_codes):
-    flags = 0
     if pattern_codes[0] == OPCODE_INFO:
         # optimization info block
         # <INFO> <1=skip> <2=flags> <3=min> <4=max> <5=prefix info>
         if pattern_codes[2] & SRE_INFO_PREFIX and pattern_codes[5] > 1:
             return fast_search(state, pattern_codes)
-        flags = pattern_codes[2]
-        offset = pattern_codes[1] + 1
-        assert offset >= 0
-        #pattern_codes = pattern_codes[offset:]
 
     string_position = state.start
+    if string_position > state.end:
+        return False
     while string_position <= state.end:
-        state.reset()
-        state.start = state.string_position = string_position
-        if match(state, pattern_codes):
-            return True
+        search_driver.can_enter_jit(pattern_codes=pattern_codes,
+                                    string_position=string_position,
+                                    state=state)
+        search_driver.jit_merge_point(pattern_codes=pattern_codes,
+                                      string_position=string_position,
+                                      state=state)
+        if search_can_start_at(state, pattern_codes, string_position):
+            state.reset()
+            state.start = state.string_position = string_position
+            if match(state, pattern_codes):
+                return True
         string_position += 1
+    # leave the state as if matching had been tried at the last position
+    state.reset()
+    state.start = state.string_position = state.end
     return False
 
+def search_can_start_at(state, pattern_codes, string_position):
+    """Quick check done by search() before trying to match at a position:
+    if the pattern starts with a literal, the match can only start at that
+    character.  The pattern codes read here are constants in a JIT-compiled
+    search loop, so the check becomes a single guard."""
+    pstart = 0
+    if get_code(pattern_codes, 0) == OPCODE_INFO:
+        pstart = get_code(pattern_codes, 1) + 1
+    if get_code(pattern_codes, pstart) == OPCODE_LITERAL:
+        if string_position >= state.end:
+            return False
+        return (state.get_char_ord(string_position) ==
+                get_code(pattern_codes, pstart + 1))
+    return True
+
 def fast_search(state, pattern_codes):
     """Skips forward in a string as fast as possible using information from
     an optimization info block."""
     # pattern starts with a known prefix
     # <5=length> <6=skip> <7=prefix data> <overlap data>
-    flags = pattern_codes[2]
-    prefix_len = pattern_codes[5]
-    assert prefix_len >= 0
-    prefix_skip = pattern_codes[6] # don't really know what this is good for
-    assert prefix_skip >= 0
-    prefix = pattern_codes[7:7 + prefix_len]
-    overlap_offset = 7 + prefix_len - 1
-    assert overlap_offset >= 0
-    pattern_offset = pattern_codes[1] + 1
-    assert pattern_offset >= 0
+    # All the values read from the info block are constants in the
+    # JIT-compiled loop; only i and string_position vary.
     i = 0
     string_position = state.string_position
-    end = state.end
-    while string_position < end:
-        while True:
-            char_ord = state.get_char_ord(string_position)
-            if char_ord != prefix[i]:
-                if i == 0:
-                    break
-                else:
-                    i = pattern_codes[overlap_offset + i]
-            else:
-                i += 1
-                if i == prefix_len:
-                    # found a potential match
-                    state.start = string_position + 1 - prefix_len
-                    state.string_position = string_position + 1 \
-                                                 - prefix_len + prefix_skip
-                    if flags & SRE_INFO_LITERAL:
-                        return True # matched all of pure literal pattern
-                    start = pattern_offset + 2 * prefix_skip
-                    if match(state, pattern_codes, start):
-                        return True
-                    i = pattern_codes[overlap_offset + i]
-                break
+    while string_position < state.end:
+        fast_search_driver.can_enter_jit(pattern_codes=pattern_codes,
+                                         i=i,
+                                         string_position=string_position,
+                                         state=state)
+        fast_search_driver.jit_merge_point(pattern_codes=pattern_codes,
+                                           i=i,
+                                           string_position=string_position,
+                                           state=state)
+        prefix_len = get_code(pattern_codes, 5)
+        overlap_offset = 7 + prefix_len - 1
+        assert overlap_offset >= 0
+        char_ord = state.get_char_ord(string_position)
+        if char_ord != pattern_codes[7 + i]:
+            if i > 0:
+                # retry the same character further back in the prefix
+                i = pattern_codes[overlap_offset + i]
+                continue
+        else:
+            i += 1
+            if i == prefix_len:
+                # found a potential match
+                prefix_skip = get_code(pattern_codes, 6)
+                assert prefix_skip >= 0
+                state.start = string_position + 1 - prefix_len
+                state.string_position = string_position + 1 \
+                                             - prefix_len + prefix_skip
+                if get_code(pattern_codes, 2) & SRE_INFO_LITERAL:
+                    return True # matched all of pure literal pattern
+                pattern_offset = get_code(pattern_codes, 1) + 1
+                start = pattern_offset + 2 * prefix_skip
+                assert start >= 0
+                if match(state, pattern_codes, start):
+                    return True
+                i = pattern_codes[overlap_offset + i]
         string_position += 1
     return False
 
@@ -395,7 +438,8 @@ def general_op_in(ctx, ignore=False):
     char_code = ctx.peek_char()
     if ignore:
         char_code = ctx.state.lower(char_code)
-    if not rsre_char.check_charset(char_code, ctx):
+    if not rsre_char.check_charset(ctx.pattern_codes, ctx.code_position,
+                                   char_code):
         ctx.has_matched = ctx.NOT_MATCHED
         return
     ctx.skip_code(skip - 1)
@@ -904,21 +948,31 @@ opcode_dispatch_unroll = unrolling_iterable(enumerate(opcode_dispatch_table))
 
 ##### count_repetitions dispatch
 
+# general_cr_in() and general_cr_literal() are not specialized on 'ignore'
+# and 'negate' any more: they contain a jit_merge_point, and a JitDriver
+# needs a single graph with variables (not constants) for its greens.
+# The JIT still compiles a separate loop for every combination, because
+# 'ignore' and 'negate' are greens.
+
 def general_cr_in(ctx, maxcount, ignore):
-    code_position = ctx.code_position
+    pattern_codes = ctx.pattern_codes
+    set_position = ctx.code_position + 6    # the set code
     count = 0
     while count < maxcount:
-        ctx.code_position = code_position
-        ctx.skip_code(6) # set op pointer to the set code
+        cr_in_driver.can_enter_jit(set_position=set_position, ignore=ignore,
+                                   pattern_codes=pattern_codes,
+                                   count=count, maxcount=maxcount, ctx=ctx)
+        cr_in_driver.jit_merge_point(set_position=set_position, ignore=ignore,
+                                     pattern_codes=pattern_codes,
+                                     count=count, maxcount=maxcount, ctx=ctx)
         char_code = ctx.peek_char(count)
         if ignore:
             char_code = ctx.state.lower(char_code)
-        if not rsre_char.check_charset(char_code, ctx):
+        if not rsre_char.check_charset(pattern_codes, set_position,
+                                       char_code):
             break
         count += 1
-    ctx.code_position = code_position
     return count
-general_cr_in._annspecialcase_ = 'specialize:arg(2)'
 
 def cr_in(ctx, maxcount):
     return general_cr_in(ctx, maxcount, False)
@@ -941,6 +995,12 @@ def general_cr_literal(ctx, maxcount, ignore, negate):
     chr = ctx.peek_code(5)
     count = 0
     while count < maxcount:
+        cr_literal_driver.can_enter_jit(chr=chr, ignore=ignore,
+                                        negate=negate, count=count,
+                                        maxcount=maxcount, ctx=ctx)
+        cr_literal_driver.jit_merge_point(chr=chr, ignore=ignore,
+                                          negate=negate, count=count,
+                                          maxcount=maxcount, ctx=ctx)
         char_code = ctx.peek_char(count)
         if ignore:
             char_code = ctx.state.lower(char_code)
@@ -952,7 +1012,6 @@ def general_cr_literal(ctx, maxcount, ignore, negate):
                 break
         count += 1
     return count
-general_cr_literal._annspecialcase_ = 'specialize:arg(2,3)'
 
 def cr_literal(ctx, maxcount):
     return general_cr_literal(ctx, maxcount, False, False)
@@ -0,0 +1,53 @@
+from pypy.jit.metainterp.test.test_basic import LLJitMixin
+from pypy.rlib.rarithmetic import intmask
+from pypy.rlib.rsre import rsre
+from pypy.rlib.rsre.test import test_search
+
+get_code = test_search.TestSearch.get_code.im_func
+
+
+class TestJitRSre(LLJitMixin):
+
+    def meta_interp_search(self, regexp, strings, **kwds):
+        pattern_codes = [intmask(code) for code in get_code(None, regexp)]
+        # the codes are read out of a list of two prebuilt lists, with an
+        # index given as argument: a green must not be seen as a constant
+        # by the annotator
+        all_codes = [pattern_codes, pattern_codes[:]]
+        def main(n, k):
+            state = rsre.SimpleStringState(strings[n])
+            if not state.search(all_codes[k]):
+                return -1
+            return state.start * 1000 + state.string_position
+        expected = [main(n, 0) for n in range(len(strings))]
+        res = self.meta_interp(main, [len(strings) - 1, 0], **kwds)
+        assert res == expected[-1]
+
+    def test_search_literal(self):
+        self.meta_interp_search(r'x\d+', ['.' * 100 + 'x123'])
+        # the loop that skips the positions not starting with 'x' is
+        # compiled without any call to match()
+        self.check_loops(call=0, strgetitem=1, int_add=1)
+
+    def test_search_no_match(self):
+        self.meta_interp_search(r'a[bc]d', ['abdx' * 20 + 'abe'])
+
+    def test_fast_search(self):
+        self.meta_interp_search(r'<foo>', ['<fo' * 30 + '<foo>'])
+        self.check_loops(call=0)
+
+    def test_repeat_in(self):
+        self.meta_interp_search(r'[a-f0-9]+', ['-' + 'a1b2c3d4ef' * 10 + '-'])
+        # the set is checked with constant-folded pattern codes
+        self.check_loops(getarrayitem_gc=0, call=0)
+
+    def test_repeat_in_ignore(self):
+        self.meta_interp_search(r'(?i)[a-f0-9]+',
+                                ['-' + 'A1b2C3d4Ef' * 10 + '-'])
+        # 'ignore' is a green of general_cr_in(): the IGNORE variant gets
+        # its own loop, in which the set is still constant-folded
+        self.check_loops(getarrayitem_gc=0, call=0)
+
+    def test_repeat_literal(self):
+        self.meta_interp_search(r'xa*y', ['x' + 'a' * 100 + 'y'])
+        self.check_loops(call=0)
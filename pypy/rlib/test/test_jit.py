@@ -1,6 +1,6 @@
 import py
 from pypy.rlib.jit import hint, we_are_jitted, JitDriver, purefunction_promote
-from pypy.rlib.jit import JitHintError
+from pypy.rlib.jit import JitHintError, LoopStats, jit_stats
 from pypy.translator.translator import TranslationContext, graphof
 from pypy.rpython.test.tool import BaseRtypingTest, LLRtypeMixin, OORtypeMixin
 from pypy.rpython.lltypesystem import lltype
@@ -85,6 +85,24 @@ class BaseTestJIT(BaseRtypingTest):
         get_printable_location_args = getargs(get_printable_location)
         assert can_inline_args == get_printable_location_args == [lltype.Float]
 
+    def test_annotate_jit_stats(self):
+        from pypy.annotation import model as annmodel
+        myjitdriver = JitDriver(greens=[], reds=['n'])
+        def fn(n):
+            while n > 0:
+                myjitdriver.jit_merge_point(n=n)
+                n -= 1
+            return jit_stats.total_compiled_loops + len(jit_stats.loops)
+
+        t, rtyper, fngraph = self.gengraph(fn, [int])
+        bk = t.annotator.bookkeeper
+        attrs = bk.getuniqueclassdef(LoopStats).attrs
+        assert isinstance(attrs['location'].s_value, annmodel.SomeString)
+        for name in ['number', 'trace_length', 'asm_size', 'entry_count',
+                     'bridge_count']:
+            s_value = attrs[name].s_value
+            assert not s_value.is_constant() and not s_value.nonneg
+
     def test_annotate_argumenterror(self):
         myjitdriver = JitDriver(greens=['m'], reds=['n'])
         def fn(n):
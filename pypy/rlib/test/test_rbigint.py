@@ -1,6 +1,6 @@
 from __future__ import division
 import py
-import operator, sys
+import operator, sys, string
 from random import random, randint, sample
 from pypy.rlib.rbigint import rbigint, SHIFT, MASK, KARATSUBA_CUTOFF
 from pypy.rlib import rbigint as lobj
@@ -419,6 +419,68 @@ class TestInternalFunctions(object):
         ret = lobj._k_lopsided_mul(f1, f2)
         assert ret.tolong() == f1.tolong() * f2.tolong()
 
+    def test__tc_mul(self):
+        digs = lobj.TOOMCOOK_CUTOFF * 3
+        f1 = rbigint([lobj.MASK] * digs, 1)
+        f2 = lobj._x_add(f1, rbigint([1], 1))
+        ret = lobj._tc_mul(f1, f2)
+        assert ret.tolong() == f1.tolong() * f2.tolong()
+        ret = lobj._tc_mul(f1, f1)
+        assert ret.tolong() == f1.tolong() ** 2
+
+    def test__tc_mul_unbalanced(self):
+        x = 3 ** (SHIFT * (lobj.TOOMCOOK_CUTOFF + 2) // 2)
+        y = 7 ** (SHIFT * (lobj.TOOMCOOK_CUTOFF + 2) // 3)
+        ret = lobj._tc_mul(rbigint.fromlong(x), rbigint.fromlong(y))
+        assert ret.tolong() == x * y
+
+    def test_mul_toomcook(self, monkeypatch):
+        monkeypatch.setattr(lobj, 'KARATSUBA_CUTOFF', 3)
+        monkeypatch.setattr(lobj, 'KARATSUBA_SQUARE_CUTOFF', 6)
+        monkeypatch.setattr(lobj, 'TOOMCOOK_CUTOFF', 5)
+        for i in range(20):
+            x = long(randint(0, 1 << 30)) ** randint(1, 40)
+            y = long(randint(0, 1 << 30)) ** randint(1, 40)
+            for sx, sy in (1, 1), (1, -1), (-1, -1), (-1, 1):
+                f1 = rbigint.fromlong(sx * x)
+                f2 = rbigint.fromlong(sy * y)
+                assert f1.mul(f2).tolong() == sx * x * sy * y
+            assert f1.mul(f1).tolong() == x * x
+
+    def test__dc_divrem(self):
+        x = 3 ** (SHIFT * 4 * lobj.DIVIDE_CUTOFF // 3) + 12345
+        y = 7 ** (SHIFT * 2 * lobj.DIVIDE_CUTOFF // 5) - 1
+        div, rem = lobj._dc_divrem(rbigint.fromlong(x), rbigint.fromlong(y))
+        assert (div.tolong(), rem.tolong()) == divmod(x, y)
+        div, rem = lobj._dc_divrem(rbigint.fromlong(y * x),
+                                   rbigint.fromlong(y))
+        assert (div.tolong(), rem.tolong()) == (x, 0)
+
+    def test_divmod_dc(self, monkeypatch):
+        monkeypatch.setattr(lobj, 'DIVIDE_CUTOFF', 2)
+        for i in range(20):
+            x = long(randint(0, 1 << 30)) ** randint(1, 40)
+            y = long(randint(1, 1 << 30)) ** randint(1, 20)
+            for sx, sy in (1, 1), (1, -1), (-1, -1), (-1, 1):
+                f1 = rbigint.fromlong(sx * x)
+                f2 = rbigint.fromlong(sy * y)
+                div, mod = f1.divmod(f2)
+                assert (div.tolong(), mod.tolong()) == divmod(sx*x, sy*y)
+
+    def test_str_dc(self, monkeypatch):
+        monkeypatch.setattr(lobj, 'DIVIDE_CUTOFF', 2)
+        for x in [10 ** 200, 10 ** 200 - 1, -(10 ** 200), 17 ** 150,
+                  (10 ** 60 + 1) * 10 ** 100, 7 ** 300 * 10 ** 42]:
+            f1 = rbigint.fromlong(x)
+            assert f1.str() == str(x)
+            assert f1.repr() == repr(x)
+            letters = str(x).translate(string.maketrans('0123456789',
+                                                        'abcdefghij'))
+            assert f1.format('abcdefghij', '<', '>') == (
+                letters.replace('-', '-<', 1) if x < 0 else '<' + letters) + '>'
+            assert rbigint.fromdecimalstr(str(x)).tolong() == x
+            assert rbigint.fromdecimalstr('+' + str(abs(x))).tolong() == abs(x)
+
     def test_longlong(self):
         max = 1L << (r_longlong.BITS-1)
         f1 = rbigint.fromlong(max-1)    # fits in r_longlong
@@ -459,6 +521,15 @@ class TestTranslatable(object):
         res = interpret(test, [])
         assert "".join(res.chars) == test()
 
+    def test_divmod_str(self):
+        def test(i):
+            x = rbigint.fromdecimalstr(''.join(['12345678901234567890'] * i))
+            y = rbigint.fromint(987654321).pow(rbigint.fromint(i))
+            div, mod = x.divmod(y)
+            return div.str() + ' ' + mod.str()
+        res = interpret(test, [3])
+        assert "".join(res.chars) == test(3)
+
     def test_add(self):
         x = rbigint.fromint(-2147483647)
         y = rbigint.fromint(-1)
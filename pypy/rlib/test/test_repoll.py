@@ -0,0 +1,80 @@
+import os, sys, errno, py
+
+if not sys.platform.startswith('linux'):
+    py.test.skip("epoll is only available on Linux")
+
+from pypy.rlib.repoll import *
+
+def test_simple():
+    def f():
+        readend, writeend = os.pipe()
+        epfd = epoll_create()
+        try:
+            epoll_ctl(epfd, EPOLL_CTL_ADD, readend, EPOLLIN)
+            epoll_ctl(epfd, EPOLL_CTL_ADD, writeend, EPOLLOUT)
+            events = epoll_wait(epfd, 10, 0)
+            assert events == [(writeend, EPOLLOUT)]
+
+            os.write(writeend, 'X')
+            events = epoll_wait(epfd, 10, 1000)
+            assert len(events) == 2
+            assert (readend, EPOLLIN) in events
+
+            # maxevents limits the number of returned events
+            events = epoll_wait(epfd, 1, 0)
+            assert len(events) == 1
+
+            epoll_ctl(epfd, EPOLL_CTL_MOD, writeend, EPOLLIN)
+            epoll_ctl(epfd, EPOLL_CTL_DEL, readend)
+            events = epoll_wait(epfd, 10, 0)
+            assert events == []
+        finally:
+            epoll_close(epfd)
+            os.close(readend)
+            os.close(writeend)
+    f()
+
+def test_errors():
+    def f():
+        readend, writeend = os.pipe()
+        epfd = epoll_create()
+        try:
+            try:
+                epoll_ctl(epfd, EPOLL_CTL_DEL, readend)
+            except OSError, e:
+                assert e.errno == errno.ENOENT
+            else:
+                assert False
+            epoll_ctl(epfd, EPOLL_CTL_ADD, readend, EPOLLIN)
+            try:
+                epoll_ctl(epfd, EPOLL_CTL_ADD, readend, EPOLLIN)
+            except OSError, e:
+                assert e.errno == errno.EEXIST
+            else:
+                assert False
+        finally:
+            epoll_close(epfd)
+            os.close(readend)
+            os.close(writeend)
+    f()
+
+def test_translate():
+    from pypy.translator.c.test.test_genc import compile
+
+    def func():
+        readend, writeend = os.pipe()
+        epfd = epoll_create()
+        epoll_ctl(epfd, EPOLL_CTL_ADD, readend, EPOLLIN)
+        epoll_ctl(epfd, EPOLL_CTL_ADD, writeend, EPOLLOUT)
+        os.write(writeend, 'X')
+        res = 0
+        for fd, events in epoll_wait(epfd, 5, 1000):
+            if fd == readend:
+                res += events
+        epoll_close(epfd)
+        os.close(readend)
+        os.close(writeend)
+        return res
+
+    fn = compile(func, [])
+    assert fn() == EPOLLIN
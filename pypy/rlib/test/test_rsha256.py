@@ -0,0 +1,56 @@
+# Testing the SHA-224 and SHA-256 modules, with the examples from the
+# Federal Information Processing Standards Publication 180-2
+
+from pypy.rlib import rsha256
+
+
+class TestSHA256:
+    def check(self, cls, data, digest):
+        computed = cls(data).hexdigest()
+        assert computed == digest
+        d = cls()
+        d.update(data)
+        computed = d.digest()
+        assert computed == digest.decode('hex')
+
+    def test_sha256(self):
+        self.check(rsha256.sha256, "",
+            "e3b0c44298fc1c149afbf4c8996fb92427ae41e4649b934ca495991b7852b855")
+        self.check(rsha256.sha256, "abc",
+            "ba7816bf8f01cfea414140de5dae2223b00361a396177a9cb410ff61f20015ad")
+        self.check(rsha256.sha256,
+            "abcdbcdecdefdefgefghfghighijhijkijkljklmklmnlmnomnopnopq",
+            "248d6a61d20638b8e5c026930c3e6039a33ce45964ff2167f6ecedd419db06c1")
+
+    def test_sha224(self):
+        self.check(rsha256.sha224, "abc",
+            "23097d223405d8228642a477bda255b32aadbce4bda0b3f7e36c9da7")
+        self.check(rsha256.sha224,
+            "abcdbcdecdefdefgefghfghighijhijkijkljklmklmnlmnomnopnopq",
+            "75388b16512776cc5dba5da1fd890150b0c6455cb4f58b1952522525")
+
+    def test_copy(self):
+        import hashlib
+        for cls, name in [(rsha256.sha256, 'sha256'),
+                          (rsha256.sha224, 'sha224')]:
+            for repeat in [1, 10, 100]:
+                d1 = cls("abc" * repeat)
+                d2 = d1.copy()
+                assert type(d2) is cls
+                d1.update("def" * repeat)
+                d2.update("gh" * repeat)
+                h = hashlib.new(name, "abc"*repeat+"def"*repeat)
+                assert d1.digest() == h.digest()
+                h = hashlib.new(name, "abc"*repeat+"gh"*repeat)
+                assert d2.digest() == h.digest()
+
+    def test_random(self):
+        import random, hashlib
+        for i in range(20):
+            input = ''.join([chr(random.randrange(256))
+                             for i in range(random.randrange(1000))])
+            m1 = rsha256.RSHA256()
+            m1.update(input)
+            assert m1.hexdigest() == hashlib.sha256(input).hexdigest()
+            m1.update(input)
+            assert m1.hexdigest() == hashlib.sha256(input*2).hexdigest()
@@ -0,0 +1,59 @@
+# Testing the SHA-384 and SHA-512 modules, with the examples from the
+# Federal Information Processing Standards Publication 180-2
+
+from pypy.rlib import rsha512
+
+LONG_INPUT = ("abcdefghbcdefghicdefghijdefghijkefghijklfghijklmghijklmn"
+              "hijklmnoijklmnopjklmnopqklmnopqrlmnopqrsmnopqrstnopqrstu")
+
+
+class TestSHA512:
+    def check(self, cls, data, digest):
+        computed = cls(data).hexdigest()
+        assert computed == digest
+        d = cls()
+        d.update(data)
+        computed = d.digest()
+        assert computed == digest.decode('hex')
+
+    def test_sha512(self):
+        self.check(rsha512.sha512, "abc",
+            "ddaf35a193617abacc417349ae20413112e6fa4e89a97ea20a9eeee64b55d39a"
+            "2192992a274fc1a836ba3c23a3feebbd454d4423643ce80e2a9ac94fa54ca49f")
+        self.check(rsha512.sha512, LONG_INPUT,
+            "8e959b75dae313da8cf4f72814fc143f8f7779c6eb9f7fa17299aeadb6889018"
+            "501d289e4900f7e4331b99dec4b5433ac7d329eeb6dd26545e96e55b874be909")
+
+    def test_sha384(self):
+        self.check(rsha512.sha384, "abc",
+            "cb00753f45a35e8bb5a03d699ac65007272c32ab0eded1631a8b605a43ff5bed"
+            "8086072ba1e7cc2358baeca134c825a7")
+        self.check(rsha512.sha384, LONG_INPUT,
+            "09330c33f71147e83d192fc782cd1b4753111b173b3b05d22fa08086e3b0f712"
+            "fcc7c71a557e2db966c3e9fa91746039")
+
+    def test_copy(self):
+        import hashlib
+        for cls, name in [(rsha512.sha512, 'sha512'),
+                          (rsha512.sha384, 'sha384')]:
+            for repeat in [1, 10, 100]:
+                d1 = cls("abc" * repeat)
+                d2 = d1.copy()
+                assert type(d2) is cls
+                d1.update("def" * repeat)
+                d2.update("gh" * repeat)
+                h = hashlib.new(name, "abc"*repeat+"def"*repeat)
+                assert d1.digest() == h.digest()
+                h = hashlib.new(name, "abc"*repeat+"gh"*repeat)
+                assert d2.digest() == h.digest()
+
+    def test_random(self):
+        import random, hashlib
+        for i in range(20):
+            input = ''.join([chr(random.randrange(256))
+                             for i in range(random.randrange(1000))])
+            m1 = rsha512.RSHA512()
+            m1.update(input)
+            assert m1.hexdigest() == hashlib.sha512(input).hexdigest()
+            m1.update(input)
+            assert m1.hexdigest() == hashlib.sha512(input*2).hexdigest()
@@ -833,6 +833,24 @@ class LLFrame(object):
     def op_gc_heap_stats(self):
         raise NotImplementedError
 
+    def op_gc_get_stats(self):
+        raise NotImplementedError
+
+    def op_gc_get_rpy_roots(self):
+        raise NotImplementedError
+
+    def op_gc_get_rpy_referents(self, gcref):
+        raise NotImplementedError
+
+    def op_gc_get_rpy_memory_usage(self, gcref):
+        raise NotImplementedError
+
+    def op_gc_get_rpy_type_index(self, gcref):
+        raise NotImplementedError
+
+    def op_gc_dump_rpy_heap(self, fd):
+        raise NotImplementedError
+
     def op_gc_obtain_free_space(self, size):
         raise NotImplementedError
 
@@ -925,6 +943,9 @@ class LLFrame(object):
     def op_get_write_barrier_failing_case(self):
         raise NotImplementedError("get_write_barrier_failing_case")
 
+    def op_get_write_barrier_from_array_failing_case(self):
+        raise NotImplementedError("get_write_barrier_from_array_failing_case")
+
     def op_yield_current_frame_to_caller(self):
         raise NotImplementedError("yield_current_frame_to_caller")
 
@@ -2,7 +2,7 @@ from pypy.tool.pairtype import pairtype
 from pypy.annotation import model as annmodel
 from pypy.objspace.flow.model import Constant
 from pypy.rpython.rdict import AbstractDictRepr, AbstractDictIteratorRepr,\
-     rtype_newdict
+     rtype_newdict, ll_dict_module
 from pypy.rpython.lltypesystem import lltype
 from pypy.rlib.rarithmetic import r_uint, intmask
 from pypy.rlib.objectmodel import hlinvoke
@@ -628,6 +628,7 @@ def rtype_r_dict(hop):
                                      r_dict.r_rdict_hashfn)
     cDICT = hop.inputconst(lltype.Void, r_dict.DICT)
     hop.exception_cannot_occur()
+    ll_newdict = ll_dict_module(hop.rtyper).ll_newdict
     v_result = hop.gendirectcall(ll_newdict, cDICT)
     if r_dict.r_rdict_eqfn.lowleveltype != lltype.Void:
         cname = hop.inputconst(lltype.Void, 'fnkeyeq')
@@ -0,0 +1,817 @@
+from pypy.tool.pairtype import pairtype
+from pypy.objspace.flow.model import Constant
+from pypy.rpython.rdict import AbstractDictRepr, AbstractDictIteratorRepr,\
+     rtype_newdict
+from pypy.rpython.lltypesystem import lltype, llmemory, rffi
+from pypy.rpython.lltypesystem.rdict import ll_keyhash_custom, \
+     ll_keyeq_custom, recast, PERTURB_SHIFT
+from pypy.rpython.error import TyperError
+from pypy.rlib.rarithmetic import r_uint, intmask, LONG_BIT
+from pypy.rlib import objectmodel
+from pypy.rpython import rmodel
+
+# ____________________________________________________________
+#
+#  compact, insertion-ordered implementation of RPython dictionaries,
+#  used instead of the one in rdict.py if the 'translation.compactdicts'
+#  option is enabled.  The entries are stored in insertion order in a
+#  dense array, which is only 2/3 of the size of the hash table; the hash
+#  table itself only contains small integers giving the position of the
+#  entries, and is an array of bytes, shorts, ints or longs depending on
+#  its size.
+#
+#    struct dictentry {
+#        DICTKEY key;
+#        bool f_valid;      # (optional) the entry was not deleted
+#        DICTVALUE value;
+#        int f_hash;        # (optional) key hash, if hard to recompute
+#    }
+#
+#    struct dicttable {
+#        int num_live_items;
+#        int num_ever_used_items;   # number of entries used so far
+#        int lookup_function_no;    # FUNC_BYTE, FUNC_SHORT, ...
+#        GCREF indexes;             # hash table of the positions
+#        Array *entries;
+#        (Function DICTKEY, DICTKEY -> bool) *fnkeyeq;
+#        (Function DICTKEY -> int) *fnkeyhash;
+#    }
+#
+#  A slot of the hash table contains FREE, DELETED, or the position in
+#  'entries' plus VALID_OFFSET.
+#
+
+FREE = 0
+DELETED = 1
+VALID_OFFSET = 2
+
+FLAG_LOOKUP = 0
+FLAG_STORE = 1
+FLAG_DELETE = 2
+
+FUNC_BYTE, FUNC_SHORT, FUNC_INT, FUNC_LONG = range(4)
+
+DICTINDEX_BYTE  = lltype.Ptr(lltype.GcArray(rffi.UCHAR))
+DICTINDEX_SHORT = lltype.Ptr(lltype.GcArray(rffi.USHORT))
+DICTINDEX_INT   = lltype.Ptr(lltype.GcArray(rffi.UINT))
+DICTINDEX_LONG  = lltype.Ptr(lltype.GcArray(lltype.Unsigned))
+
+if LONG_BIT > 32:
+    MAX_INT_INDEXES = 1 << 32
+else:
+    MAX_INT_INDEXES = 0     # an int is not smaller than a long
+
+
+class DictRepr(AbstractDictRepr):
+
+    def __init__(self, rtyper, key_repr, value_repr, dictkey, dictvalue,
+                 custom_eq_hash=None):
+        self.rtyper = rtyper
+        self.DICT = lltype.GcForwardReference()
+        self.lowleveltype = lltype.Ptr(self.DICT)
+        self.custom_eq_hash = custom_eq_hash is not None
+        if not isinstance(key_repr, rmodel.Repr):  # not computed yet, done by setup()
+            assert callable(key_repr)
+            self._key_repr_computer = key_repr
+        else:
+            self.external_key_repr, self.key_repr = self.pickkeyrepr(key_repr)
+        if not isinstance(value_repr, rmodel.Repr):  # not computed yet, done by setup()
+            assert callable(value_repr)
+            self._value_repr_computer = value_repr
+        else:
+            self.external_value_repr, self.value_repr = self.pickrepr(value_repr)
+        self.dictkey = dictkey
+        self.dictvalue = dictvalue
+        self.dict_cache = {}
+        self._custom_eq_hash_repr = custom_eq_hash
+        # setup() needs to be called to finish this initialization
+
+    def _externalvsinternal(self, rtyper, item_repr):
+        return rmodel.externalvsinternal(self.rtyper, item_repr)
+
+    def _setup_repr(self):
+        if 'key_repr' not in self.__dict__:
+            key_repr = self._key_repr_computer()
+            self.external_key_repr, self.key_repr = self.pickkeyrepr(key_repr)
+        if 'value_repr' not in self.__dict__:
+            self.external_value_repr, self.value_repr = self.pickrepr(self._value_repr_computer())
+        if isinstance(self.DICT, lltype.GcForwardReference):
+            self.DICTKEY = self.key_repr.lowleveltype
+            self.DICTVALUE = self.value_repr.lowleveltype
+
+            # compute the shape of the DICTENTRY structure
+            entryfields = []
+            entrymeths = {
+                'allocate': lltype.typeMethod(_ll_malloc_entries),
+                'must_clear_key':   (isinstance(self.DICTKEY, lltype.Ptr)
+                                     and self.DICTKEY._needsgc()),
+                'must_clear_value': (isinstance(self.DICTVALUE, lltype.Ptr)
+                                     and self.DICTVALUE._needsgc()),
+                }
+
+            # * the key
+            entryfields.append(("key", self.DICTKEY))
+
+            # * the entries that are not used yet are never looked at, so
+            #   we only need to know if an entry was deleted: try to encode
+            #   it as a dummy object, otherwise we need an explicit flag
+            s_key   = self.dictkey.s_value
+            s_value = self.dictvalue.s_value
+            dummykeyobj = self.key_repr.get_ll_dummyval_obj(self.rtyper,
+                                                            s_key)
+            dummyvalueobj = self.value_repr.get_ll_dummyval_obj(self.rtyper,
+                                                                s_value)
+            if dummykeyobj:
+                entrymeths['dummy_obj'] = dummykeyobj
+                entrymeths['valid'] = ll_valid_from_key
+                entrymeths['mark_deleted'] = ll_mark_deleted_in_key
+                # the key is overwritten by 'dummy' when the entry is deleted
+                entrymeths['must_clear_key'] = False
+            elif dummyvalueobj:
+                entrymeths['dummy_obj'] = dummyvalueobj
+                entrymeths['valid'] = ll_valid_from_value
+                entrymeths['mark_deleted'] = ll_mark_deleted_in_value
+                # value is overwritten by 'dummy' when entry is deleted
+                entrymeths['must_clear_value'] = False
+            else:
+                entryfields.append(("f_valid", lltype.Bool))
+                entrymeths['valid'] = ll_valid_from_flag
+                entrymeths['mark_deleted'] = ll_mark_deleted_in_flag
+
+            # * the value
+            entryfields.append(("value", self.DICTVALUE))
+
+            # * the hash, if needed
+            if self.custom_eq_hash:
+                fasthashfn = None
+            else:
+                fasthashfn = self.key_repr.get_ll_fasthash_function()
+            if fasthashfn is None:
+                entryfields.append(("f_hash", lltype.Signed))
+                entrymeths['hash'] = ll_hash_from_cache
+            else:
+                entrymeths['hash'] = ll_hash_recomputed
+                entrymeths['fasthashfn'] = fasthashfn
+
+            # Build the lltype data structures
+            self.DICTENTRY = lltype.Struct("odictentry", *entryfields)
+            self.DICTENTRYARRAY = lltype.GcArray(self.DICTENTRY,
+                                                 adtmeths=entrymeths)
+            fields =          [ ("num_live_items", lltype.Signed),
+                                ("num_ever_used_items", lltype.Signed),
+                                ("lookup_function_no", lltype.Signed),
+                                ("indexes", llmemory.GCREF),
+                                ("entries", lltype.Ptr(self.DICTENTRYARRAY)) ]
+            if self.custom_eq_hash:
+                self.r_rdict_eqfn, self.r_rdict_hashfn = self._custom_eq_hash_repr()
+                fields.extend([ ("fnkeyeq", self.r_rdict_eqfn.lowleveltype),
+                                ("fnkeyhash", self.r_rdict_hashfn.lowleveltype) ])
+                adtmeths = {
+                    'keyhash':        ll_keyhash_custom,
+                    'keyeq':          ll_keyeq_custom,
+                    'r_rdict_eqfn':   self.r_rdict_eqfn,
+                    'r_rdict_hashfn': self.r_rdict_hashfn,
+                    'paranoia':       True,
+                    }
+            else:
+                # figure out which functions must be used to hash and compare
+                ll_keyhash = self.key_repr.get_ll_hash_function()
+                ll_keyeq = self.key_repr.get_ll_eq_function()  # can be None
+                ll_keyhash = lltype.staticAdtMethod(ll_keyhash)
+                if ll_keyeq is not None:
+                    ll_keyeq = lltype.staticAdtMethod(ll_keyeq)
+                adtmeths = {
+                    'keyhash':  ll_keyhash,
+                    'keyeq':    ll_keyeq,
+                    'paranoia': False,
+                    }
+            adtmeths['KEY']   = self.DICTKEY
+            adtmeths['VALUE'] = self.DICTVALUE
+            adtmeths['allocate'] = lltype.typeMethod(_ll_malloc_dict)
+            self.DICT.become(lltype.GcStruct("odicttable", adtmeths=adtmeths,
+                                             *fields))
+
+
+    def convert_const(self, dictobj):
+        # get object from bound dict methods
+        #dictobj = getattr(dictobj, '__self__', dictobj)
+        if dictobj is None:
+            return lltype.nullptr(self.DICT)
+        if not isinstance(dictobj, (dict, objectmodel.r_dict)):
+            raise TyperError("expected a dict: %r" % (dictobj,))
+        try:
+            key = Constant(dictobj)
+            return self.dict_cache[key]
+        except KeyError:
+            self.setup()
+            l_dict = ll_newdict_size(self.DICT, len(dictobj))
+            self.dict_cache[key] = l_dict
+            r_key = self.key_repr
+            if r_key.lowleveltype == llmemory.Address:
+                raise TypeError("No prebuilt dicts of address keys")
+            r_value = self.value_repr
+            if isinstance(dictobj, objectmodel.r_dict):
+                if self.r_rdict_eqfn.lowleveltype != lltype.Void:
+                    l_fn = self.r_rdict_eqfn.convert_const(dictobj.key_eq)
+                    l_dict.fnkeyeq = l_fn
+                if self.r_rdict_hashfn.lowleveltype != lltype.Void:
+                    l_fn = self.r_rdict_hashfn.convert_const(dictobj.key_hash)
+                    l_dict.fnkeyhash = l_fn
+
+                for dictkeycontainer, dictvalue in dictobj._dict.items():
+                    llkey = r_key.convert_const(dictkeycontainer.key)
+                    llvalue = r_value.convert_const(dictvalue)
+                    ll_dict_insertclean(l_dict, llkey, llvalue,
+                                        dictkeycontainer.hash)
+                return l_dict
+
+            else:
+                for dictkey, dictvalue in dictobj.items():
+                    llkey = r_key.convert_const(dictkey)
+                    llvalue = r_value.convert_const(dictvalue)
+                    ll_dict_insertclean(l_dict, llkey, llvalue,
+                                        l_dict.keyhash(llkey))
+                return l_dict
+
+    def rtype_len(self, hop):
+        v_dict, = hop.inputargs(self)
+        return hop.gendirectcall(ll_dict_len, v_dict)
+
+    def rtype_is_true(self, hop):
+        v_dict, = hop.inputargs(self)
+        return hop.gendirectcall(ll_dict_is_true, v_dict)
+
+    def make_iterator_repr(self, *variant):
+        return DictIteratorRepr(self, *variant)
+
+    def rtype_method_get(self, hop):
+        v_dict, v_key, v_default = hop.inputargs(self, self.key_repr,
+                                                 self.value_repr)
+        hop.exception_cannot_occur()
+        v_res = hop.gendirectcall(ll_get, v_dict, v_key, v_default)
+        return self.recast_value(hop.llops, v_res)
+
+    def rtype_method_setdefault(self, hop):
+        v_dict, v_key, v_default = hop.inputargs(self, self.key_repr,
+                                                 self.value_repr)
+        hop.exception_cannot_occur()
+        v_res = hop.gendirectcall(ll_setdefault, v_dict, v_key, v_default)
+        return self.recast_value(hop.llops, v_res)
+
+    def rtype_method_copy(self, hop):
+        v_dict, = hop.inputargs(self)
+        hop.exception_cannot_occur()
+        return hop.gendirectcall(ll_copy, v_dict)
+
+    def rtype_method_update(self, hop):
+        v_dic1, v_dic2 = hop.inputargs(self, self)
+        hop.exception_cannot_occur()
+        return hop.gendirectcall(ll_update, v_dic1, v_dic2)
+
+    def _rtype_method_kvi(self, hop, ll_func):
+        v_dic, = hop.inputargs(self)
+        r_list = hop.r_result
+        cLIST = hop.inputconst(lltype.Void, r_list.lowleveltype.TO)
+        hop.exception_cannot_occur()
+        return hop.gendirectcall(ll_func, cLIST, v_dic)
+
+    def rtype_method_keys(self, hop):
+        return self._rtype_method_kvi(hop, ll_dict_keys)
+
+    def rtype_method_values(self, hop):
+        return self._rtype_method_kvi(hop, ll_dict_values)
+
+    def rtype_method_items(self, hop):
+        return self._rtype_method_kvi(hop, ll_dict_items)
+
+    def rtype_method_iterkeys(self, hop):
+        hop.exception_cannot_occur()
+        return DictIteratorRepr(self, "keys").newiter(hop)
+
+    def rtype_method_itervalues(self, hop):
+        hop.exception_cannot_occur()
+        return DictIteratorRepr(self, "values").newiter(hop)
+
+    def rtype_method_iteritems(self, hop):
+        hop.exception_cannot_occur()
+        return DictIteratorRepr(self, "items").newiter(hop)
+
+    def rtype_method_clear(self, hop):
+        v_dict, = hop.inputargs(self)
+        hop.exception_cannot_occur()
+        return hop.gendirectcall(ll_clear, v_dict)
+
+class __extend__(pairtype(DictRepr, rmodel.Repr)):
+
+    def rtype_getitem((r_dict, r_key), hop):
+        v_dict, v_key = hop.inputargs(r_dict, r_dict.key_repr)
+        if not r_dict.custom_eq_hash:
+            hop.has_implicit_exception(KeyError)   # record that we know about it
+        hop.exception_is_here()
+        v_res = hop.gendirectcall(ll_dict_getitem, v_dict, v_key)
+        return r_dict.recast_value(hop.llops, v_res)
+
+    def rtype_delitem((r_dict, r_key), hop):
+        v_dict, v_key = hop.inputargs(r_dict, r_dict.key_repr)
+        if not r_dict.custom_eq_hash:
+            hop.has_implicit_exception(KeyError)   # record that we know about it
+        hop.exception_is_here()
+        return hop.gendirectcall(ll_dict_delitem, v_dict, v_key)
+
+    def rtype_setitem((r_dict, r_key), hop):
+        v_dict, v_key, v_value = hop.inputargs(r_dict, r_dict.key_repr, r_dict.value_repr)
+        if r_dict.custom_eq_hash:
+            hop.exception_is_here()
+        else:
+            hop.exception_cannot_occur()
+        hop.gendirectcall(ll_dict_setitem, v_dict, v_key, v_value)
+
+    def rtype_contains((r_dict, r_key), hop):
+        v_dict, v_key = hop.inputargs(r_dict, r_dict.key_repr)
+        hop.exception_is_here()
+        return hop.gendirectcall(ll_contains, v_dict, v_key)
+
+class __extend__(pairtype(DictRepr, DictRepr)):
+    def convert_from_to((r_dict1, r_dict2), v, llops):
+        # check that we don't convert from Dicts with
+        # different key/value types
+        if r_dict1.dictkey is None or r_dict2.dictkey is None:
+            return NotImplemented
+        if r_dict1.dictkey is not r_dict2.dictkey:
+            return NotImplemented
+        if r_dict1.dictvalue is None or r_dict2.dictvalue is None:
+            return NotImplemented
+        if r_dict1.dictvalue is not r_dict2.dictvalue:
+            return NotImplemented
+        return v
+
+# ____________________________________________________________
+#
+#  Low-level methods.  These can be run for testing, but are meant to
+#  be direct_call'ed from rtyped flow graphs, which means that they will
+#  get flowed and annotated, mostly with SomePtr.
+
+def ll_valid_from_flag(entries, i):
+    return entries[i].f_valid
+
+def ll_mark_deleted_in_flag(entries, i):
+    entries[i].f_valid = False
+
+def ll_valid_from_key(entries, i):
+    ENTRIES = lltype.typeOf(entries).TO
+    dummy = ENTRIES.dummy_obj.ll_dummy_value
+    return entries[i].key != dummy
+
+def ll_mark_deleted_in_key(entries, i):
+    ENTRIES = lltype.typeOf(entries).TO
+    dummy = ENTRIES.dummy_obj.ll_dummy_value
+    entries[i].key = dummy
+
+def ll_valid_from_value(entries, i):
+    ENTRIES = lltype.typeOf(entries).TO
+    dummy = ENTRIES.dummy_obj.ll_dummy_value
+    return entries[i].value != dummy
+
+def ll_mark_deleted_in_value(entries, i):
+    ENTRIES = lltype.typeOf(entries).TO
+    dummy = ENTRIES.dummy_obj.ll_dummy_value
+    entries[i].value = dummy
+
+def ll_hash_from_cache(entries, i):
+    return entries[i].f_hash
+
+def ll_hash_recomputed(entries, i):
+    ENTRIES = lltype.typeOf(entries).TO
+    return ENTRIES.fasthashfn(entries[i].key)
+
+def ll_dict_len(d):
+    return d.num_live_items
+
+def ll_dict_is_true(d):
+    # check if a dict is True, allowing for None
+    return bool(d) and d.num_live_items != 0
+
+def ll_dict_getitem(d, key):
+    index = ll_dict_lookup(d, key, d.keyhash(key), FLAG_LOOKUP)
+    if index >= 0:
+        return d.entries[index].value
+    else:
+        raise KeyError
+ll_dict_getitem.oopspec = 'odict.getitem(d, key)'
+
+def ll_dict_setitem(d, key, value):
+    hash = d.keyhash(key)
+    index = ll_dict_lookup(d, key, hash, FLAG_STORE)
+    if index >= 0:
+        d.entries[index].value = value
+    else:
+        # the hash table already points to the next unused entry
+        _ll_dict_append_entry(d, key, value, hash)
+        if d.num_ever_used_items == len(d.entries):
+            ll_dict_resize(d)
+ll_dict_setitem.oopspec = 'odict.setitem(d, key, value)'
+
+def _ll_dict_append_entry(d, key, value, hash):
+    ENTRY = lltype.typeOf(d.entries).TO.OF
+    entry = d.entries[d.num_ever_used_items]
+    entry.key = key
+    entry.value = value
+    if hasattr(ENTRY, 'f_hash'):  entry.f_hash = hash
+    if hasattr(ENTRY, 'f_valid'): entry.f_valid = True
+    d.num_ever_used_items += 1
+    d.num_live_items += 1
+
+def ll_dict_insertclean(d, key, value, hash):
+    # Internal routine used by convert_const() to insert an item which is
+    # known to be absent from the dict, which must not be full.  This
+    # routine never calls d.keyhash() and d.keyeq().
+    ll_dict_store_clean(d, hash, d.num_ever_used_items)
+    _ll_dict_append_entry(d, key, value, hash)
+
+def ll_dict_delitem(d, key):
+    index = ll_dict_lookup(d, key, d.keyhash(key), FLAG_DELETE)
+    if index < 0:
+        raise KeyError
+    d.entries.mark_deleted(index)
+    d.num_live_items -= 1
+    # clear the key and the value if they are GC pointers
+    ENTRIES = lltype.typeOf(d.entries).TO
+    ENTRY = ENTRIES.OF
+    entry = d.entries[index]
+    if ENTRIES.must_clear_key:
+        key = entry.key   # careful about destructor side effects:
+                          # keep key alive until entry.value has also
+                          # been zeroed (if it must be)
+        entry.key = lltype.nullptr(ENTRY.key.TO)
+    if ENTRIES.must_clear_value:
+        entry.value = lltype.nullptr(ENTRY.value.TO)
+    num_entries = len(d.entries)
+    if (num_entries > _ll_num_entries(DICT_INITSIZE) and
+            d.num_live_items < num_entries / 4):
+        ll_dict_resize(d)
+ll_dict_delitem.oopspec = 'odict.delitem(d, key)'
+
+def _ll_num_entries(size):
+    # the length of the 'entries' array that goes with a hash table
+    # of the given size
+    return (size * 2) // 3
+
+def ll_dict_resize(d):
+    # make room for twice the number of live items; this also shrinks
+    # the dict if many entries were deleted
+    new_estimate = d.num_live_items * 2
+    new_size = DICT_INITSIZE
+    while _ll_num_entries(new_size) < new_estimate:
+        new_size *= 2
+    # copy the live entries, in order, to the start of a new array
+    old_entries = d.entries
+    old_used = d.num_ever_used_items
+    d.entries = lltype.typeOf(old_entries).TO.allocate(
+        _ll_num_entries(new_size))
+    _ll_copy_live_entries(d.entries, old_entries, old_used)
+    d.num_ever_used_items = d.num_live_items
+    ll_dict_reindex(d, new_size)
+
+def _ll_copy_live_entries(entries, old_entries, old_used):
+    ENTRY = lltype.typeOf(entries).TO.OF
+    i = 0
+    j = 0
+    while i < old_used:
+        if old_entries.valid(i):
+            entry = entries[j]
+            old_entry = old_entries[i]
+            entry.key = old_entry.key
+            entry.value = old_entry.value
+            if hasattr(ENTRY, 'f_hash'):  entry.f_hash = old_entry.f_hash
+            if hasattr(ENTRY, 'f_valid'): entry.f_valid = True
+            j += 1
+        i += 1
+
+def ll_dict_reindex(d, new_size):
+    # build a new hash table of the given size, using the smallest kind
+    # of integers that can hold the positions of the entries
+    if new_size <= 256:
+        indexes = lltype.malloc(DICTINDEX_BYTE.TO, new_size, zero=True)
+        _ll_dict_reindex(d, indexes, FUNC_BYTE)
+    elif new_size <= 65536:
+        indexes = lltype.malloc(DICTINDEX_SHORT.TO, new_size, zero=True)
+        _ll_dict_reindex(d, indexes, FUNC_SHORT)
+    elif new_size <= MAX_INT_INDEXES:
+        indexes = lltype.malloc(DICTINDEX_INT.TO, new_size, zero=True)
+        _ll_dict_reindex(d, indexes, FUNC_INT)
+    else:
+        indexes = lltype.malloc(DICTINDEX_LONG.TO, new_size, zero=True)
+        _ll_dict_reindex(d, indexes, FUNC_LONG)
+
+def _ll_dict_reindex(d, indexes, fun):
+    d.indexes = lltype.cast_opaque_ptr(llmemory.GCREF, indexes)
+    d.lookup_function_no = fun
+    entries = d.entries
+    i = 0
+    while i < d.num_ever_used_items:
+        if entries.valid(i):
+            _ll_dict_store_clean(indexes, entries.hash(i), i)
+        i += 1
+
+# ------- a port of CPython's dictobject.c's lookdict implementation -------
+
+def ll_dict_lookup(d, key, hash, store_flag):
+    # Returns the position of the entry with the given key, or -1.
+    # With FLAG_STORE, if the key is not found, the hash table is
+    # updated to point to the next unused entry, which the caller must
+    # fill; with FLAG_DELETE, the slot of the key is marked as deleted.
+    fun = d.lookup_function_no
+    if fun == FUNC_BYTE:
+        indexes = lltype.cast_opaque_ptr(DICTINDEX_BYTE, d.indexes)
+        return _ll_dict_lookup(d, indexes, key, hash, store_flag)
+    elif fun == FUNC_SHORT:
+        indexes = lltype.cast_opaque_ptr(DICTINDEX_SHORT, d.indexes)
+        return _ll_dict_lookup(d, indexes, key, hash, store_flag)
+    elif MAX_INT_INDEXES and fun == FUNC_INT:
+        indexes = lltype.cast_opaque_ptr(DICTINDEX_INT, d.indexes)
+        return _ll_dict_lookup(d, indexes, key, hash, store_flag)
+    else:
+        indexes = lltype.cast_opaque_ptr(DICTINDEX_LONG, d.indexes)
+        return _ll_dict_lookup(d, indexes, key, hash, store_flag)
+
+def _ll_dict_lookup(d, indexes, key, hash, store_flag):
+    INDEX = lltype.typeOf(indexes).TO.OF
+    entries = d.entries
+    ENTRIES = lltype.typeOf(entries).TO
+    direct_compare = not hasattr(ENTRIES, 'no_direct_compare')
+    mask = len(indexes) - 1
+    i = hash & mask
+    freeslot = -1
+    perturb = r_uint(hash)
+    # In the loop, a deleted slot is by far (factor of 100s) the least
+    # likely outcome, so test for that last.
+    while 1:
+        index = rffi.cast(lltype.Signed, indexes[i])
+        if index >= VALID_OFFSET:
+            index -= VALID_OFFSET
+            checkingkey = entries[index].key
+            if direct_compare and checkingkey == key:
+                if store_flag == FLAG_DELETE:
+                    indexes[i] = rffi.cast(INDEX, DELETED)
+                return index   # found the entry
+            if d.keyeq is not None and entries.hash(index) == hash:
+                # correct hash, maybe the key is e.g. a different pointer to
+                # an equal object
+                found = d.keyeq(checkingkey, key)
+                if d.paranoia:
+                    if (entries != d.entries or
+                        not entries.valid(index) or
+                        entries[index].key != checkingkey):
+                        # the compare did major nasty stuff to the dict:
+                        # start over
+                        return ll_dict_lookup(d, key, hash, store_flag)
+                if found:
+                    if store_flag == FLAG_DELETE:
+                        indexes[i] = rffi.cast(INDEX, DELETED)
+                    return index   # found the entry
+        elif index == FREE:
+            if store_flag == FLAG_STORE:
+                if freeslot == -1:
+                    freeslot = i
+                indexes[freeslot] = rffi.cast(INDEX, d.num_ever_used_items +
+                                                     VALID_OFFSET)
+            return -1
+        elif freeslot == -1:
+            freeslot = i
+        # compute the next index using unsigned arithmetic
+        i = r_uint(i)
+        i = (i << 2) + i + perturb + 1
+        i = intmask(i) & mask
+        # keep 'i' as a signed number here, to consistently pass signed
+        # arguments to the small helper methods.
+        perturb >>= PERTURB_SHIFT
+
+def ll_dict_store_clean(d, hash, index):
+    fun = d.lookup_function_no
+    if fun == FUNC_BYTE:
+        indexes = lltype.cast_opaque_ptr(DICTINDEX_BYTE, d.indexes)
+        _ll_dict_store_clean(indexes, hash, index)
+    elif fun == FUNC_SHORT:
+        indexes = lltype.cast_opaque_ptr(DICTINDEX_SHORT, d.indexes)
+        _ll_dict_store_clean(indexes, hash, index)
+    elif MAX_INT_INDEXES and fun == FUNC_INT:
+        indexes = lltype.cast_opaque_ptr(DICTINDEX_INT, d.indexes)
+        _ll_dict_store_clean(indexes, hash, index)
+    else:
+        indexes = lltype.cast_opaque_ptr(DICTINDEX_LONG, d.indexes)
+        _ll_dict_store_clean(indexes, hash, index)
+
+def _ll_dict_store_clean(indexes, hash, index):
+    # a simplified version of _ll_dict_lookup() which assumes that the
+    # key is new, and the hash table doesn't contain deleted slots.
+    # It only finds the next free slot for the given hash.
+    INDEX = lltype.typeOf(indexes).TO.OF
+    mask = len(indexes) - 1
+    i = hash & mask
+    perturb = r_uint(hash)
+    while rffi.cast(lltype.Signed, indexes[i]) != FREE:
+        i = r_uint(i)
+        i = (i << 2) + i + perturb + 1
+        i = intmask(i) & mask
+        perturb >>= PERTURB_SHIFT
+    indexes[i] = rffi.cast(INDEX, index + VALID_OFFSET)
+
+# ____________________________________________________________
+#
+#  Irregular operations.
+
+DICT_INITSIZE = 8
+
+def ll_newdict(DICT):
+    d = DICT.allocate()
+    _ll_dict_init(d, DICT_INITSIZE)
+    return d
+ll_newdict.oopspec = 'newodict()'
+
+def ll_newdict_size(DICT, length_estimate):
+    n = DICT_INITSIZE
+    while _ll_num_entries(n) <= length_estimate:
+        n *= 2
+    d = DICT.allocate()
+    _ll_dict_init(d, n)
+    return d
+ll_newdict_size.oopspec = 'newodict()'
+
+def _ll_dict_init(d, size):
+    d.entries = lltype.typeOf(d).TO.entries.TO.allocate(_ll_num_entries(size))
+    d.num_live_items = 0
+    d.num_ever_used_items = 0
+    ll_dict_reindex(d, size)
+
+def _ll_malloc_dict(DICT):
+    return lltype.malloc(DICT)
+def _ll_malloc_entries(ENTRIES, n):
+    return lltype.malloc(ENTRIES, n, zero=True)
+
+# ____________________________________________________________
+#
+#  Iteration.
+
+class DictIteratorRepr(AbstractDictIteratorRepr):
+
+    def __init__(self, r_dict, variant="keys"):
+        self.r_dict = r_dict
+        self.variant = variant
+        self.lowleveltype = lltype.Ptr(lltype.GcStruct('odictiter',
+                                         ('dict', r_dict.lowleveltype),
+                                         ('index', lltype.Signed)))
+        self.ll_dictiter = ll_dictiter
+        self.ll_dictnext = ll_dictnext_group[variant]
+
+
+def ll_dictiter(ITERPTR, d):
+    iter = lltype.malloc(ITERPTR.TO)
+    iter.dict = d
+    iter.index = 0
+    return iter
+ll_dictiter.oopspec = 'newodictiter(d)'
+
+def _make_ll_dictnext(kind):
+    # make three versions of the following function: keys, values, items
+    def ll_dictnext(RETURNTYPE, iter):
+        # note that RETURNTYPE is None for keys and values
+        dict = iter.dict
+        if dict:
+            entries = dict.entries
+            index = iter.index
+            entries_len = dict.num_ever_used_items
+            while index < entries_len:
+                entry = entries[index]
+                is_valid = entries.valid(index)
+                index = index + 1
+                if is_valid:
+                    iter.index = index
+                    if RETURNTYPE is lltype.Void:
+                        return None
+                    elif kind == 'items':
+                        r = lltype.malloc(RETURNTYPE.TO)
+                        r.item0 = recast(RETURNTYPE.TO.item0, entry.key)
+                        r.item1 = recast(RETURNTYPE.TO.item1, entry.value)
+                        return r
+                    elif kind == 'keys':
+                        return entry.key
+                    elif kind == 'values':
+                        return entry.value
+            # clear the reference to the dict and prevent restarts
+            iter.dict = lltype.nullptr(lltype.typeOf(iter).TO.dict.TO)
+        raise StopIteration
+    ll_dictnext.oopspec = 'odictiter.next%s(iter)' % kind
+    return ll_dictnext
+
+ll_dictnext_group = {'keys'  : _make_ll_dictnext('keys'),
+                     'values': _make_ll_dictnext('values'),
+                     'items' : _make_ll_dictnext('items')}
+
+# _____________________________________________________________
+# methods
+
+def ll_get(dict, key, default):
+    index = ll_dict_lookup(dict, key, dict.keyhash(key), FLAG_LOOKUP)
+    if index >= 0:
+        return dict.entries[index].value
+    else:
+        return default
+ll_get.oopspec = 'odict.get(dict, key, default)'
+
+def ll_setdefault(dict, key, default):
+    hash = dict.keyhash(key)
+    index = ll_dict_lookup(dict, key, hash, FLAG_STORE)
+    if index >= 0:
+        return dict.entries[index].value
+    else:
+        _ll_dict_append_entry(dict, key, default, hash)
+        if dict.num_ever_used_items == len(dict.entries):
+            ll_dict_resize(dict)
+        return default
+ll_setdefault.oopspec = 'odict.setdefault(dict, key, default)'
+
+def ll_copy(dict):
+    DICT = lltype.typeOf(dict).TO
+    d = DICT.allocate()
+    d.entries = DICT.entries.TO.allocate(len(dict.entries))
+    d.num_live_items = dict.num_live_items
+    d.num_ever_used_items = dict.num_live_items
+    if hasattr(DICT, 'fnkeyeq'):   d.fnkeyeq   = dict.fnkeyeq
+    if hasattr(DICT, 'fnkeyhash'): d.fnkeyhash = dict.fnkeyhash
+    _ll_copy_live_entries(d.entries, dict.entries, dict.num_ever_used_items)
+    ll_dict_reindex(d, _ll_dict_size(dict))
+    return d
+ll_copy.oopspec = 'odict.copy(dict)'
+
+def _ll_dict_size(d):
+    # the size of the hash table of 'd'
+    fun = d.lookup_function_no
+    if fun == FUNC_BYTE:
+        return len(lltype.cast_opaque_ptr(DICTINDEX_BYTE, d.indexes))
+    elif fun == FUNC_SHORT:
+        return len(lltype.cast_opaque_ptr(DICTINDEX_SHORT, d.indexes))
+    elif MAX_INT_INDEXES and fun == FUNC_INT:
+        return len(lltype.cast_opaque_ptr(DICTINDEX_INT, d.indexes))
+    else:
+        return len(lltype.cast_opaque_ptr(DICTINDEX_LONG, d.indexes))
+
+def ll_clear(d):
+    if (d.num_ever_used_items == 0 and
+            len(d.entries) == _ll_num_entries(DICT_INITSIZE)):
+        return
+    _ll_dict_init(d, DICT_INITSIZE)
+ll_clear.oopspec = 'odict.clear(d)'
+
+def ll_update(dic1, dic2):
+    entries = dic2.entries
+    d2len = dic2.num_ever_used_items
+    i = 0
+    while i < d2len:
+        if entries.valid(i):
+            entry = entries[i]
+            ll_dict_setitem(dic1, entry.key, entry.value)
+        i += 1
+ll_update.oopspec = 'odict.update(dic1, dic2)'
+
+# this is an implementation of keys(), values() and items()
+# in a single function.
+# note that by specialization on func, three different
+# and very efficient functions are created.
+
+def _make_ll_keys_values_items(kind):
+    def ll_kvi(LIST, dic):
+        res = LIST.ll_newlist(dic.num_live_items)
+        entries = dic.entries
+        dlen = dic.num_ever_used_items
+        items = res.ll_items()
+        i = 0
+        p = 0
+        while i < dlen:
+            if entries.valid(i):
+                ELEM = lltype.typeOf(items).TO.OF
+                if ELEM is not lltype.Void:
+                    entry = entries[i]
+                    if kind == 'items':
+                        r = lltype.malloc(ELEM.TO)
+                        r.item0 = recast(ELEM.TO.item0, entry.key)
+                        r.item1 = recast(ELEM.TO.item1, entry.value)
+                        items[p] = r
+                    elif kind == 'keys':
+                        items[p] = recast(ELEM, entry.key)
+                    elif kind == 'values':
+                        items[p] = recast(ELEM, entry.value)
+                p += 1
+            i += 1
+        assert p == res.ll_length()
+        return res
+    ll_kvi.oopspec = 'odict.%s(dic)' % kind
+    return ll_kvi
+
+ll_dict_keys   = _make_ll_keys_values_items('keys')
+ll_dict_values = _make_ll_keys_values_items('values')
+ll_dict_items  = _make_ll_keys_values_items('items')
+
+def ll_contains(d, key):
+    index = ll_dict_lookup(d, key, d.keyhash(key), FLAG_LOOKUP)
+    return index >= 0
+ll_contains.oopspec = 'odict.contains(d, key)'
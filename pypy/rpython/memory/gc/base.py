@@ -1,16 +1,34 @@
-from pypy.rpython.lltypesystem import lltype, llmemory, llarena
+import sys, time
+from pypy.rpython.lltypesystem import lltype, llmemory, llarena, rffi
 from pypy.rlib.debug import ll_assert
 from pypy.rpython.memory.gcheader import GCHeaderBuilder
 from pypy.rpython.memory.support import DEFAULT_CHUNK_SIZE
 from pypy.rpython.memory.support import get_address_stack, get_address_deque
 from pypy.rpython.memory.support import AddressDict
 from pypy.rpython.lltypesystem.llmemory import NULL, raw_malloc_usage
+from pypy.rlib.objectmodel import free_non_gc_object
 
 TYPEID_MAP = lltype.GcStruct('TYPEID_MAP', ('count', lltype.Signed),
                              ('size', lltype.Signed),
                              ('links', lltype.Array(lltype.Signed)))
 ARRAY_TYPEID_MAP = lltype.GcArray(lltype.Ptr(TYPEID_MAP))
 
+# the pauses are counted in buckets of increasing size: bucket 0 is for
+# the pauses shorter than 1 microsecond, bucket i > 0 for the pauses
+# between 2**(i-1) and 2**i microseconds, and the last bucket for all
+# the longer ones
+PAUSE_HISTOGRAM_SIZE = 32
+PAUSE_HISTOGRAM = lltype.FixedSizeArray(lltype.Signed, PAUSE_HISTOGRAM_SIZE)
+
+GC_STATS = lltype.GcStruct('GC_STATS',
+                           ('minor_collections', lltype.Signed),
+                           ('major_collections', lltype.Signed),
+                           ('total_pause_time', lltype.Float),
+                           ('max_pause_time', lltype.Float),
+                           ('bytes_promoted', lltype.Signed),
+                           ('pause_histogram', PAUSE_HISTOGRAM))
+ARRAY_OF_GCREF = lltype.GcArray(llmemory.GCREF)
+
 class GCBase(object):
     _alloc_flavor_ = "raw"
     moving_gc = False
@@ -31,6 +49,18 @@ class GCBase(object):
         # and in its overriden versions! for the benefit of test_transformed_gc
         self.finalizer_lock_count = 0
         self.run_finalizers = self.AddressDeque()
+        # statistics returned by get_stats()
+        self.stat_minor_collections = 0
+        self.stat_major_collections = 0
+        self.stat_total_pause_time = 0.0
+        self.stat_max_pause_time = 0.0
+        self.stat_bytes_promoted = 0
+        self.stat_pause_histogram = lltype.malloc(PAUSE_HISTOGRAM,
+                                                  flavor='raw')
+        i = 0
+        while i < PAUSE_HISTOGRAM_SIZE:
+            self.stat_pause_histogram[i] = 0
+            i += 1
 
     def _teardown(self):
         pass
@@ -192,6 +222,38 @@ class GCBase(object):
                 length -= 1
     trace._annspecialcase_ = 'specialize:arg(2)'
 
+    def trace_partial(self, obj, start, stop, callback, arg):
+        """Like trace(), but only walk the array part, for indices in
+        range(start, stop).  Must only be called if has_gcptr_in_varsize().
+        """
+        typeid = self.get_type_id(obj)
+        if self.is_gcarrayofgcptr(typeid):
+            # a performance shortcut for GcArray(gcptr)
+            item = obj + llmemory.gcarrayofptr_itemsoffset
+            item += llmemory.gcarrayofptr_singleitemoffset * start
+            while start < stop:
+                if self.points_to_valid_gc_object(item):
+                    callback(item, arg)
+                item += llmemory.gcarrayofptr_singleitemoffset
+                start += 1
+            return
+        ll_assert(self.has_gcptr_in_varsize(typeid),
+                  "trace_partial() on object without has_gcptr_in_varsize()")
+        item = obj + self.varsize_offset_to_variable_part(typeid)
+        offsets = self.varsize_offsets_to_gcpointers_in_var_part(typeid)
+        itemlength = self.varsize_item_sizes(typeid)
+        item += itemlength * start
+        while start < stop:
+            j = 0
+            while j < len(offsets):
+                itemobj = item + offsets[j]
+                if self.points_to_valid_gc_object(itemobj):
+                    callback(itemobj, arg)
+                j += 1
+            item += itemlength
+            start += 1
+    trace_partial._annspecialcase_ = 'specialize:arg(4)'
+
     def points_to_valid_gc_object(self, addr):
         return self.is_valid_gc_object(addr.address[0])
 
@@ -253,6 +315,240 @@ class GCBase(object):
         finally:
             self.finalizer_lock_count -= 1
 
+    # ____________________________________________________________
+    # Statistics and heap inspection, exported by pypy.rlib.rgc.
+    # The methods that return GC objects are called by the framework
+    # gctransformer with minimal_transform=False.
+
+    def stat_record_pause(self, start_time):
+        """To call at the end of a collection (or of a step of an
+        incremental collection) that started at 'start_time', as
+        returned by time.time()."""
+        pause = time.time() - start_time
+        self.stat_total_pause_time += pause
+        if pause > self.stat_max_pause_time:
+            self.stat_max_pause_time = pause
+        self.stat_pause_histogram[pause_histogram_bucket(pause)] += 1
+
+    def get_stats(self):
+        stats = lltype.malloc(GC_STATS)
+        stats.minor_collections = self.stat_minor_collections
+        stats.major_collections = self.stat_major_collections
+        stats.total_pause_time = self.stat_total_pause_time
+        stats.max_pause_time = self.stat_max_pause_time
+        stats.bytes_promoted = self.stat_bytes_promoted
+        i = 0
+        while i < PAUSE_HISTOGRAM_SIZE:
+            stats.pause_histogram[i] = self.stat_pause_histogram[i]
+            i += 1
+        return stats
+
+    def enumerate_all_roots(self, callback):
+        """For each root object, invoke callback(obj, gc).  'callback'
+        should not be a bound method.  This cannot be used to do a
+        collection in a moving GC, because the addresses cannot be
+        updated: it is only there for inspection."""
+        # overridden in the GCs that have an additional list of roots,
+        # like the prebuilt objects pointing to the heap
+        callback2 = _convert_root_callback(callback)
+        self.root_walker.walk_roots(callback2, callback2, callback2)
+        self.run_finalizers.foreach(callback, self)
+    enumerate_all_roots._annspecialcase_ = 'specialize:arg(1)'
+
+    def get_rpy_roots(self):
+        """Return an array of all the roots."""
+        while True:
+            self._rpy_count = 0
+            self.enumerate_all_roots(_count_rpy_object)
+            roots = lltype.malloc(ARRAY_OF_GCREF, self._rpy_count)
+            # the roots may have moved if the malloc() above collected,
+            # and there may be fewer roots now, leaving NULLs at the end,
+            # or more of them, in which case we count them again
+            self._rpy_list = roots
+            self._rpy_count = 0
+            self.enumerate_all_roots(_append_rpy_object)
+            self._rpy_list = lltype.nullptr(ARRAY_OF_GCREF)
+            if self._rpy_count <= len(roots):
+                return roots
+
+    def get_rpy_referents(self, gcref):
+        """Return an array of the objects directly referenced by
+        'gcref'."""
+        self._rpy_count = 0
+        self.trace(llmemory.cast_ptr_to_adr(gcref), _count_rpy_ref, self)
+        referents = lltype.malloc(ARRAY_OF_GCREF, self._rpy_count)
+        self._rpy_list = referents
+        self._rpy_count = 0
+        self.trace(llmemory.cast_ptr_to_adr(gcref), _append_rpy_ref, self)
+        self._rpy_list = lltype.nullptr(ARRAY_OF_GCREF)
+        return referents
+
+    def get_rpy_memory_usage(self, gcref):
+        """Return the number of bytes used by 'gcref', including its
+        GC header."""
+        obj = llmemory.cast_ptr_to_adr(gcref)
+        size = self.size_gc_header() + self.get_size(obj)
+        return llmemory.raw_malloc_usage(size)
+
+    def get_rpy_type_index(self, gcref):
+        """Return an integer identifying the RPython type of 'gcref',
+        the same as used by heap_stats()."""
+        obj = llmemory.cast_ptr_to_adr(gcref)
+        return self.get_member_index(self.get_type_id(obj))
+
+    def dump_rpy_heap(self, fd):
+        """Write a dump of all the objects reachable from the roots to
+        the file descriptor 'fd'.  Returns False if writing failed.
+        See HeapDumper for the format."""
+        heapdump = HeapDumper(self, fd)
+        heapdump.add_roots()
+        heapdump.walk()
+        heapdump.flush()
+        ok = heapdump.ok
+        heapdump.delete()
+        return ok
+
+
+def _convert_root_callback(callback):
+    # walk_roots() passes the address of the root; the callbacks of
+    # enumerate_all_roots() want the object itself
+    def callback2(gc, root):
+        callback(root.address[0], gc)
+    return callback2
+_convert_root_callback._annspecialcase_ = 'specialize:memo'
+
+def pause_histogram_bucket(pause):
+    """Return the index in the pause histogram for a pause of 'pause'
+    seconds."""
+    microseconds = int(pause * 1000000.0)
+    bucket = 0
+    while microseconds > 0 and bucket < PAUSE_HISTOGRAM_SIZE - 1:
+        microseconds >>= 1
+        bucket += 1
+    return bucket
+
+def _count_rpy_object(obj, gc):
+    gc._rpy_count += 1
+
+def _append_rpy_object(obj, gc):
+    # 'gc._rpy_list' itself is seen as a static root, because it is
+    # stored in the prebuilt gc instance; it was not there when counting
+    if obj == llmemory.cast_ptr_to_adr(gc._rpy_list):
+        return
+    index = gc._rpy_count
+    if index < len(gc._rpy_list):
+        gc._rpy_list[index] = llmemory.cast_adr_to_ptr(obj, llmemory.GCREF)
+    gc._rpy_count = index + 1     # counts the roots that did not fit too
+
+def _count_rpy_ref(pointer, gc):
+    _count_rpy_object(pointer.address[0], gc)
+
+def _append_rpy_ref(pointer, gc):
+    _append_rpy_object(pointer.address[0], gc)
+
+
+if sys.platform == 'win32':
+    underscore_on_windows = '_'
+else:
+    underscore_on_windows = ''
+
+def _emulated_raw_os_write(fd, buf, size):
+    "NOT_RPYTHON: for the tests running on top of CPython"
+    import os, array
+    count = size // rffi.sizeof(rffi.LONG)
+    data = array.array('l', [buf[i] for i in range(count)]).tostring()
+    return rffi.cast(rffi.SIZE_T, os.write(fd, data))
+
+raw_os_write = rffi.llexternal(underscore_on_windows + 'write',
+                               [rffi.INT, rffi.LONGP, rffi.SIZE_T],
+                               rffi.SIZE_T,
+                               _callable=_emulated_raw_os_write,
+                               sandboxsafe=True, _nowrapper=True)
+
+class HeapDumper(object):
+    """Writes the heap as a stream of machine words, in the native
+    byte order.  Each object is written as its address, its type index
+    (see get_rpy_type_index()), its size in bytes (see
+    get_rpy_memory_usage()), the addresses of the objects it references,
+    and finally -1.  The first record is a pseudo-object at address 0,
+    with type index -1 and size 0, which references all the roots.
+    """
+    _alloc_flavor_ = "raw"
+    BUFSIZE = 8192     # words
+
+    def __init__(self, gc, fd):
+        self.gc = gc
+        self.fd = rffi.cast(rffi.INT, fd)
+        self.ok = True
+        self.writebuffer = lltype.malloc(rffi.LONGP.TO, self.BUFSIZE,
+                                         flavor='raw')
+        self.buffer_pos = 0
+        self.seen = gc.AddressDict()
+        self.pending = gc.AddressStack()
+
+    def delete(self):
+        self.seen.delete()
+        self.pending.delete()
+        lltype.free(self.writebuffer, flavor='raw')
+        free_non_gc_object(self)
+
+    def flush(self):
+        if self.buffer_pos > 0:
+            if self.ok:
+                bytes = self.buffer_pos * rffi.sizeof(rffi.LONG)
+                count = raw_os_write(self.fd, self.writebuffer,
+                                     rffi.cast(rffi.SIZE_T, bytes))
+                if rffi.cast(lltype.Signed, count) != bytes:
+                    self.ok = False
+            self.buffer_pos = 0
+    flush._dont_inline_ = True
+
+    def write(self, value):
+        x = self.buffer_pos
+        self.writebuffer[x] = rffi.cast(rffi.LONG, value)
+        x += 1
+        self.buffer_pos = x
+        if x == self.BUFSIZE:
+            self.flush()
+    write._always_inline_ = True
+
+    def add(self, obj):
+        if not self.seen.contains(obj):
+            self.seen.add(obj)
+            self.pending.append(obj)
+
+    def add_roots(self):
+        self.write(0)
+        self.write(-1)
+        self.write(0)
+        self.gc._heapdumper = self
+        self.gc.enumerate_all_roots(_dump_root)
+        self.gc._heapdumper = None
+        self.write(-1)
+
+    def writeobj(self, obj):
+        gc = self.gc
+        gcref = llmemory.cast_adr_to_ptr(obj, llmemory.GCREF)
+        self.write(llmemory.cast_adr_to_int(obj))
+        self.write(gc.get_rpy_type_index(gcref))
+        self.write(gc.get_rpy_memory_usage(gcref))
+        gc.trace(obj, _dump_ref, self)
+        self.write(-1)
+
+    def walk(self):
+        while self.pending.non_empty():
+            self.writeobj(self.pending.pop())
+
+def _dump_root(obj, gc):
+    heapdump = gc._heapdumper
+    heapdump.write(llmemory.cast_adr_to_int(obj))
+    heapdump.add(obj)
+
+def _dump_ref(pointer, heapdump):
+    obj = pointer.address[0]
+    heapdump.write(llmemory.cast_adr_to_int(obj))
+    heapdump.add(obj)
+
 
 class MovingGCBase(GCBase):
     moving_gc = True
@@ -338,6 +634,7 @@ def choose_gc_from_config(config):
                "generation": "generation.GenerationGC",
                "hybrid": "hybrid.HybridGC",
                "markcompact" : "markcompact.MarkCompactGC",
+               "incmarksweep": "incmarksweep.IncrementalMarkSweepGC",
                }
     try:
         modulename, classname = classes[config.translation.gc].split('.')
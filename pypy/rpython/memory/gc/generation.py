@@ -1,4 +1,4 @@
-import sys
+import sys, time
 from pypy.rpython.memory.gc.semispace import SemiSpaceGC
 from pypy.rpython.memory.gc.semispace import GCFLAG_EXTERNAL, GCFLAG_FORWARDED
 from pypy.rpython.memory.gc.semispace import GC_HASH_TAKEN_ADDR
@@ -8,10 +8,15 @@ from pypy.rpython.memory.support import DEFAULT_CHUNK_SIZE
 from pypy.rlib.objectmodel import free_non_gc_object
 from pypy.rlib.debug import ll_assert
 from pypy.rlib.debug import debug_print, debug_start, debug_stop
-from pypy.rlib.rarithmetic import intmask, LONG_BIT
+from pypy.rlib.rarithmetic import intmask, r_uint, LONG_BIT
 from pypy.rpython.lltypesystem.lloperation import llop
 
 WORD = LONG_BIT // 8
+if LONG_BIT == 32:
+    LONG_BIT_SHIFT = 5
+else:
+    assert LONG_BIT == 64
+    LONG_BIT_SHIFT = 6
 
 # The following flag is never set on young objects, i.e. the ones living
 # in the nursery.  It is initially set on all prebuilt and old objects,
@@ -27,6 +32,28 @@ GCFLAG_NO_YOUNG_PTRS = SemiSpaceGC.first_unused_gcflag << 0
 # 'last_generation_root_objects'.
 GCFLAG_NO_HEAP_PTRS = SemiSpaceGC.first_unused_gcflag << 1
 
+# The following flag is set on the large arrays that use card marking
+# (see HybridGC, which is the only one to create them).  They are
+# allocated with extra words in front of the GC header: each bit of
+# these words is a "card" standing for 'card_page_indices' items of the
+# array.  When a young pointer is stored in the array, instead of
+# recording the whole array in 'old_objects_pointing_to_young', the
+# write barrier only sets the corresponding card, and the next minor
+# collection only traces the items of the cards that are set.
+# The card number 'n' is the bit 'LONG_BIT-1-(n % LONG_BIT)' of the word
+# number 'n // LONG_BIT', counting the words backwards from the header.
+# On little-endian machines, this is the bit at offset '-(n+1)' from the
+# GC header, which the JIT can test with a single x86 'BT' instruction.
+GCFLAG_HAS_CARDS = SemiSpaceGC.first_unused_gcflag << 2
+
+# The following flag is set on the arrays with GCFLAG_HAS_CARDS that
+# have some cards set; they are then listed in 'old_objects_with_cards_set'.
+GCFLAG_CARDS_SET = SemiSpaceGC.first_unused_gcflag << 3
+
+def card_bit(bitindex):
+    # the mask of the card 'bitindex' in its word; see GCFLAG_HAS_CARDS
+    return r_uint(1) << (LONG_BIT - 1 - (bitindex & (LONG_BIT - 1)))
+
 class GenerationGC(SemiSpaceGC):
     """A basic generational GC: it's a SemiSpaceGC with an additional
     nursery for young objects.  A write barrier is used to ensure that
@@ -37,7 +64,7 @@ class GenerationGC(SemiSpaceGC):
     inline_simple_malloc_varsize = True
     needs_write_barrier = True
     prebuilt_gc_objects_are_static_roots = False
-    first_unused_gcflag = SemiSpaceGC.first_unused_gcflag << 2
+    first_unused_gcflag = SemiSpaceGC.first_unused_gcflag << 4
 
     # the following values override the default arguments of __init__ when
     # translating to a real backend.
@@ -48,6 +75,11 @@ class GenerationGC(SemiSpaceGC):
 
     nursery_hash_base = -1
 
+    # the number of array items per card; 0 means no card marking.
+    # Overridden by HybridGC, as only large non-moving arrays have cards.
+    card_page_indices = 0
+    card_page_shift = 0
+
     def __init__(self, config, chunk_size=DEFAULT_CHUNK_SIZE,
                  nursery_size=32*WORD,
                  min_nursery_size=32*WORD,
@@ -81,6 +113,8 @@ class GenerationGC(SemiSpaceGC):
         # may contain static prebuilt objects as well.  More precisely,
         # it lists exactly the old and static objects whose
         # GCFLAG_NO_YOUNG_PTRS bit is not set.
+        self.old_objects_with_cards_set = self.AddressStack()
+        # ^^^ the arrays whose GCFLAG_CARDS_SET bit is set.
         self.young_objects_with_weakrefs = self.AddressStack()
 
         self.last_generation_root_objects = self.AddressStack()
@@ -281,6 +315,12 @@ class GenerationGC(SemiSpaceGC):
             obj = oldlist.pop()
             hdr = self.header(obj)
             hdr.tid |= GCFLAG_NO_YOUNG_PTRS
+        # Same with the cards, which are all cleared.
+        cardlist = self.old_objects_with_cards_set
+        while cardlist.non_empty():
+            obj = cardlist.pop()
+            self.header(obj).tid &= ~GCFLAG_CARDS_SET
+            self.clear_cards(obj)
 
     def weakrefs_grow_older(self):
         while self.young_objects_with_weakrefs.non_empty():
@@ -335,8 +375,11 @@ class GenerationGC(SemiSpaceGC):
             debug_start("gc-minor")
             debug_print("--- minor collect ---")
             debug_print("nursery:", self.nursery, "to", self.nursery_top)
+            start_time = time.time()
             # a nursery-only collection
             scan = beginning = self.free
+            if self.old_objects_with_cards_set.non_empty():
+                self.collect_cardrefs_to_nursery()
             self.collect_oldrefs_to_nursery()
             self.collect_roots_in_nursery()
             scan = self.scan_objects_just_copied_out_of_nursery(scan)
@@ -350,6 +393,9 @@ class GenerationGC(SemiSpaceGC):
             llarena.arena_reset(self.nursery, self.nursery_size, 2)
             debug_print("survived (fraction of the size):",
                         float(scan - beginning) / self.nursery_size)
+            self.stat_minor_collections += 1
+            self.stat_bytes_promoted += scan - beginning
+            self.stat_record_pause(start_time)
             debug_stop("gc-minor")
             #self.debug_check_consistency()   # -- quite expensive
         else:
@@ -391,6 +437,64 @@ class GenerationGC(SemiSpaceGC):
             self.trace_and_drag_out_of_nursery(obj)
         debug_print("collect_oldrefs_to_nursery", count)
 
+    def collect_cardrefs_to_nursery(self):
+        # Follow the old_objects_with_cards_set list and move out of the
+        # nursery the young objects referenced from the items of the
+        # cards that are set.
+        oldlist = self.old_objects_with_cards_set
+        while oldlist.non_empty():
+            obj = oldlist.pop()
+            hdr = self.header(obj)
+            hdr.tid &= ~GCFLAG_CARDS_SET
+            if hdr.tid & GCFLAG_NO_YOUNG_PTRS == 0:
+                # the whole array is also in old_objects_pointing_to_young
+                # and will be traced anyway: just clear the cards
+                self.clear_cards(obj)
+                continue
+            typeid = self.get_type_id(obj)
+            length = (obj + self.varsize_offset_to_length(typeid)).signed[0]
+            nwords = self.card_marking_words_for_length(length)
+            word_index = 0
+            while word_index < nwords:
+                addr_word = self.get_card_word(obj, word_index)
+                word = r_uint(addr_word.signed[0])
+                if word:
+                    addr_word.signed[0] = 0
+                    start = word_index << (self.card_page_shift +
+                                           LONG_BIT_SHIFT)
+                    while word:
+                        if word & card_bit(0):
+                            stop = start + self.card_page_indices
+                            if stop > length:
+                                stop = length
+                            self.trace_partial(obj, start, stop,
+                                               self._trace_drag_out, None)
+                        word <<= 1
+                        start += self.card_page_indices
+                word_index += 1
+
+    def card_marking_words_for_length(self, length):
+        # the number of words needed for the cards of an array of
+        # the given length, i.e. one bit per 'card_page_indices' items
+        num_bits = ((length - 1) >> self.card_page_shift) + 1
+        return (num_bits + (LONG_BIT - 1)) >> LONG_BIT_SHIFT
+
+    def get_card_word(self, obj, word_index):
+        # the card words are stored just before the GC header, the
+        # first one being the nearest to the header
+        size_gc_header = self.gcheaderbuilder.size_gc_header
+        addr_hdr = llarena.getfakearenaaddress(obj - size_gc_header)
+        return addr_hdr - WORD * (word_index + 1)
+
+    def clear_cards(self, obj):
+        typeid = self.get_type_id(obj)
+        length = (obj + self.varsize_offset_to_length(typeid)).signed[0]
+        nwords = self.card_marking_words_for_length(length)
+        word_index = 0
+        while word_index < nwords:
+            self.get_card_word(obj, word_index).signed[0] = 0
+            word_index += 1
+
     def collect_roots_in_nursery(self):
         # we don't need to trace prebuilt GcStructs during a minor collect:
         # if a prebuilt GcStruct contains a pointer to a young object,
@@ -450,11 +554,33 @@ class GenerationGC(SemiSpaceGC):
     # (the JIT assumes it is of the shape
     #  "if newvalue.int0 & JIT_WB_IF_FLAG: remember_young_pointer()")
     JIT_WB_IF_FLAG = GCFLAG_NO_YOUNG_PTRS
+    # the JIT also inlines the check of write_barrier_from_array() that
+    # the card of the index is already set, if JIT_WB_CARDS_SET is set
+    JIT_WB_CARDS_SET = GCFLAG_CARDS_SET
 
     def write_barrier(self, newvalue, addr_struct):
         if self.header(addr_struct).tid & GCFLAG_NO_YOUNG_PTRS:
             self.remember_young_pointer(addr_struct, newvalue)
 
+    def write_barrier_from_array(self, newvalue, addr_array, index):
+        # used instead of write_barrier() for 'addr_array[index] = newvalue'
+        # if card_page_indices > 0
+        tid = self.header(addr_array).tid
+        if tid & GCFLAG_NO_YOUNG_PTRS:
+            if tid & GCFLAG_CARDS_SET:
+                # Nothing to do if the card of 'index' is already set:
+                # the next minor collection will trace the whole card
+                # anyway.  This also means that the array is not
+                # GCFLAG_NO_HEAP_PTRS, which is only put back by full
+                # collections, after they cleared all the cards.
+                bitindex = index >> self.card_page_shift
+                addr_word = self.get_card_word(addr_array,
+                                               bitindex >> LONG_BIT_SHIFT)
+                if r_uint(addr_word.signed[0]) & card_bit(bitindex):
+                    return
+            self.remember_young_pointer_from_array(addr_array, newvalue,
+                                                   index)
+
     def _setup_wb(self):
         # The purpose of attaching remember_young_pointer to the instance
         # instead of keeping it as a regular method is to help the JIT call it.
@@ -483,6 +609,31 @@ class GenerationGC(SemiSpaceGC):
             self.write_into_last_generation_obj(addr_struct, addr)
         remember_young_pointer._dont_inline_ = True
         self.remember_young_pointer = remember_young_pointer
+        #
+        def remember_young_pointer_from_array(addr_array, addr, index):
+            # Like remember_young_pointer(), but for the store of 'addr'
+            # at the given 'index' of an array.  If the array has cards,
+            # we only set the card of 'index'; the array keeps its
+            # GCFLAG_NO_YOUNG_PTRS.  Same hack as above about the SSE
+            # registers.
+            objhdr = self.header(addr_array)
+            if objhdr.tid & GCFLAG_HAS_CARDS == 0:
+                remember_young_pointer(addr_array, addr)
+                return
+            if not self.is_valid_gc_object(addr):
+                return
+            if self.is_in_nursery(addr):
+                bitindex = index >> self.card_page_shift
+                addr_word = self.get_card_word(addr_array,
+                                               bitindex >> LONG_BIT_SHIFT)
+                addr_word.signed[0] |= intmask(card_bit(bitindex))
+                if objhdr.tid & GCFLAG_CARDS_SET == 0:
+                    self.old_objects_with_cards_set.append(addr_array)
+                    objhdr.tid |= GCFLAG_CARDS_SET
+            self.write_into_last_generation_obj(addr_array, addr)
+        remember_young_pointer_from_array._dont_inline_ = True
+        self.remember_young_pointer_from_array = (
+            remember_young_pointer_from_array)
 
     def write_into_last_generation_obj(self, addr_struct, addr):
         objhdr = self.header(addr_struct)
@@ -511,8 +662,10 @@ class GenerationGC(SemiSpaceGC):
         if dest_hdr.tid & GCFLAG_NO_YOUNG_PTRS == 0:
             return True
         # ^^^ a fast path of write-barrier
-        if source_hdr.tid & GCFLAG_NO_YOUNG_PTRS == 0:
+        if (source_hdr.tid & GCFLAG_NO_YOUNG_PTRS == 0 or
+            source_hdr.tid & GCFLAG_CARDS_SET != 0):
             # there might be an object in source that is in nursery
+            # (possibly only in the cards that are set)
             self.old_objects_pointing_to_young.append(dest_addr)
             dest_hdr.tid &= ~GCFLAG_NO_YOUNG_PTRS
         if dest_hdr.tid & GCFLAG_NO_HEAP_PTRS:
@@ -566,6 +719,11 @@ class GenerationGC(SemiSpaceGC):
     def _track_heap_ext(self, adr, ignored):
         self.trace(adr, self.track_heap_parent, adr)
 
+    def enumerate_all_roots(self, callback):
+        self.last_generation_root_objects.foreach(callback, self)
+        SemiSpaceGC.enumerate_all_roots(self, callback)
+    enumerate_all_roots._annspecialcase_ = 'specialize:arg(1)'
+
     def debug_check_object(self, obj):
         """Check the invariants about 'obj' that should be true
         between collections."""
@@ -574,10 +732,23 @@ class GenerationGC(SemiSpaceGC):
         if tid & GCFLAG_NO_YOUNG_PTRS:
             ll_assert(not self.is_in_nursery(obj),
                       "nursery object with GCFLAG_NO_YOUNG_PTRS")
-            self.trace(obj, self._debug_no_nursery_pointer, None)
+            if tid & GCFLAG_CARDS_SET:
+                # young pointers are allowed, but only in the marked cards
+                self._debug_check_clean_cards(obj)
+            else:
+                self.trace(obj, self._debug_no_nursery_pointer, None)
         elif not self.is_in_nursery(obj):
             ll_assert(self._d_oopty.contains(obj),
                       "missing from old_objects_pointing_to_young")
+        if tid & GCFLAG_CARDS_SET:
+            ll_assert(tid & GCFLAG_HAS_CARDS != 0,
+                      "GCFLAG_CARDS_SET without GCFLAG_HAS_CARDS")
+            ll_assert(self._d_owcs.contains(obj),
+                      "missing from old_objects_with_cards_set")
+            ll_assert(tid & GCFLAG_NO_HEAP_PTRS == 0,
+                      "GCFLAG_CARDS_SET with GCFLAG_NO_HEAP_PTRS")
+        elif tid & GCFLAG_HAS_CARDS:
+            self._debug_check_no_cards_set(obj)
         if tid & GCFLAG_NO_HEAP_PTRS:
             ll_assert(self.is_last_generation(obj),
                       "GCFLAG_NO_HEAP_PTRS on non-3rd-generation object")
@@ -586,6 +757,32 @@ class GenerationGC(SemiSpaceGC):
             ll_assert(self._d_lgro.contains(obj),
                       "missing from last_generation_root_objects")
 
+    def _debug_check_no_cards_set(self, obj):
+        typeid = self.get_type_id(obj)
+        length = (obj + self.varsize_offset_to_length(typeid)).signed[0]
+        nwords = self.card_marking_words_for_length(length)
+        word_index = 0
+        while word_index < nwords:
+            ll_assert(self.get_card_word(obj, word_index).signed[0] == 0,
+                      "cards set but no GCFLAG_CARDS_SET")
+            word_index += 1
+
+    def _debug_check_clean_cards(self, obj):
+        typeid = self.get_type_id(obj)
+        length = (obj + self.varsize_offset_to_length(typeid)).signed[0]
+        step = self.card_page_indices
+        start = 0
+        while start < length:
+            bitindex = start >> self.card_page_shift
+            word = self.get_card_word(obj, bitindex >> LONG_BIT_SHIFT)
+            if not (r_uint(word.signed[0]) & card_bit(bitindex)):
+                stop = start + step
+                if stop > length:
+                    stop = length
+                self.trace_partial(obj, start, stop,
+                                   self._debug_no_nursery_pointer, None)
+            start += step
+
     def _debug_no_nursery_pointer(self, root, ignored):
         ll_assert(not self.is_in_nursery(root.address[0]),
                   "GCFLAG_NO_YOUNG_PTRS but found a young pointer")
@@ -597,9 +794,11 @@ class GenerationGC(SemiSpaceGC):
     def debug_check_consistency(self):
         if self.DEBUG:
             self._d_oopty = self.old_objects_pointing_to_young.stack2dict()
+            self._d_owcs = self.old_objects_with_cards_set.stack2dict()
             self._d_lgro = self.last_generation_root_objects.stack2dict()
             SemiSpaceGC.debug_check_consistency(self)
             self._d_oopty.delete()
+            self._d_owcs.delete()
             self._d_lgro.delete()
             self.old_objects_pointing_to_young.foreach(
                 self._debug_check_flag_1, None)
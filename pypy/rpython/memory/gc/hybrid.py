@@ -5,6 +5,7 @@ from pypy.rpython.memory.gc.semispace import GCFLAG_EXTERNAL, GCFLAG_FORWARDED
 from pypy.rpython.memory.gc.semispace import GCFLAG_HASHMASK
 from pypy.rpython.memory.gc.generation import GCFLAG_NO_YOUNG_PTRS
 from pypy.rpython.memory.gc.generation import GCFLAG_NO_HEAP_PTRS
+from pypy.rpython.memory.gc.generation import GCFLAG_HAS_CARDS
 from pypy.rpython.memory.gc.semispace import GC_HASH_TAKEN_ADDR
 from pypy.rpython.memory.gc.semispace import GC_HASH_HASFIELD
 from pypy.rpython.lltypesystem import lltype, llmemory, llarena
@@ -87,14 +88,29 @@ class HybridGC(GenerationGC):
     TRANSLATION_PARAMS['large_object_gcptrs'] = 31*1024    # XXX adjust
     TRANSLATION_PARAMS['min_nursery_size'] = 128*1024
     # condition: large_object <= large_object_gcptrs < min_nursery_size/4
+    TRANSLATION_PARAMS['card_page_indices'] = 128
+    # ^^^ the number of items of the large arrays of GC pointers that are
+    #     covered by each card; must be a power of two, or 0 to disable
+    #     card marking
 
     def __init__(self, *args, **kwds):
         large_object = kwds.pop('large_object', 6*WORD)
         large_object_gcptrs = kwds.pop('large_object_gcptrs', 8*WORD)
         self.generation3_collect_threshold = kwds.pop(
             'generation3_collect_threshold', GENERATION3_COLLECT_THRESHOLD)
+        card_page_indices = kwds.pop('card_page_indices', 4)
         GenerationGC.__init__(self, *args, **kwds)
 
+        # The large arrays of GC pointers use card marking, with one
+        # card for every 'card_page_indices' items.
+        self.card_page_indices = card_page_indices
+        if card_page_indices > 0:
+            self.card_page_shift = 0
+            while (1 << self.card_page_shift) < card_page_indices:
+                self.card_page_shift += 1
+            assert (1 << self.card_page_shift) == card_page_indices, (
+                "card_page_indices must be a power of two")
+
         # Objects whose total size is at least 'large_object' bytes are
         # allocated separately in a mark-n-sweep fashion.  If the object
         # has GC pointers in its varsized part, we use instead the
@@ -190,8 +206,15 @@ class HybridGC(GenerationGC):
         else:
             nonlarge_max = self.nonlarge_max
         if force_nonmovable or raw_malloc_usage(totalsize) > nonlarge_max:
-            result = self.malloc_varsize_marknsweep(totalsize)
+            cardheadersize = 0
+            if (self.card_page_indices > 0 and
+                    self.has_gcptr_in_varsize(typeid)):
+                cardheadersize = (WORD *
+                                  self.card_marking_words_for_length(length))
+            result = self.malloc_varsize_marknsweep(totalsize, cardheadersize)
             flags = self.GCFLAGS_FOR_NEW_EXTERNAL_OBJECTS | GCFLAG_UNVISITED
+            if cardheadersize > 0:
+                flags |= GCFLAG_HAS_CARDS
         else:
             result = self.malloc_varsize_collecting_nursery(totalsize)
             flags = self.GCFLAGS_FOR_NEW_YOUNG_OBJECTS
@@ -235,17 +258,22 @@ class HybridGC(GenerationGC):
             self.semispace_collect()
             debug_stop("gc-rawsize-collect")
 
-    def malloc_varsize_marknsweep(self, totalsize):
+    def malloc_varsize_marknsweep(self, totalsize, cardheadersize=0):
         # In order to free the large objects from time to time, we
         # arbitrarily force a full collect() if none occurs when we have
         # allocated self.space_size + rawmalloced bytes of large objects.
-        self._check_rawsize_alloced(raw_malloc_usage(totalsize))
-        result = self.allocate_external_object(totalsize)
-        if not result:
-            raise MemoryError()
-        # The parent classes guarantee zero-filled allocations, so we
-        # need to follow suit.
-        llmemory.raw_memclear(result, totalsize)
+        self._check_rawsize_alloced(raw_malloc_usage(totalsize) +
+                                    cardheadersize)
+        if cardheadersize > 0:
+            result = self.allocate_external_object_with_cards(
+                totalsize, cardheadersize)
+        else:
+            result = self.allocate_external_object(totalsize)
+            if not result:
+                raise MemoryError()
+            # The parent classes guarantee zero-filled allocations, so we
+            # need to follow suit.
+            llmemory.raw_memclear(result, totalsize)
         size_gc_header = self.gcheaderbuilder.size_gc_header
         self.gen2_rawmalloced_objects.append(result + size_gc_header)
         return result
@@ -255,6 +283,30 @@ class HybridGC(GenerationGC):
         # If so, we'd also use arena_reset() in malloc_varsize_marknsweep().
         return llmemory.raw_malloc(totalsize)
 
+    def allocate_external_object_with_cards(self, totalsize, cardheadersize):
+        # Allocate a zero-filled object preceded by 'cardheadersize' bytes
+        # of card words.  Returns the address of the GC header.
+        allocsize = cardheadersize + raw_malloc_usage(totalsize)
+        arena = llarena.arena_malloc(allocsize, True)
+        if not arena:
+            raise MemoryError()
+        # reserve the card words one by one; this is only needed for
+        # the emulation, after translation arena_reserve() does nothing
+        i = 0
+        while i < cardheadersize:
+            llarena.arena_reserve(arena + i, llmemory.sizeof(lltype.Signed))
+            i += WORD
+        result = arena + cardheadersize
+        llarena.arena_reserve(result, totalsize)
+        return result
+
+    def free_external_object_with_cards(self, obj):
+        typeid = self.get_type_id(obj)
+        length = (obj + self.varsize_offset_to_length(typeid)).signed[0]
+        cardheadersize = WORD * self.card_marking_words_for_length(length)
+        addr = obj - self.gcheaderbuilder.size_gc_header
+        llarena.arena_free(llarena.getfakearenaaddress(addr) - cardheadersize)
+
     def init_gc_object_immortal(self, addr, typeid,
                                 flags=(GCFLAG_NO_YOUNG_PTRS |
                                        GCFLAG_NO_HEAP_PTRS |
@@ -459,8 +511,11 @@ class HybridGC(GenerationGC):
                 if debug:
                     dead_count+=1
                     dead_size+=raw_malloc_usage(self.get_size_incl_hash(obj))
-                addr = obj - self.gcheaderbuilder.size_gc_header
-                llmemory.raw_free(addr)
+                if tid & GCFLAG_HAS_CARDS:
+                    self.free_external_object_with_cards(obj)
+                else:
+                    addr = obj - self.gcheaderbuilder.size_gc_header
+                    llmemory.raw_free(addr)
             else:
                 if debug:
                     alive_count+=1
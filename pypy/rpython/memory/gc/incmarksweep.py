@@ -0,0 +1,1029 @@
+"""
+A generational GC whose old generation is never moved: it is collected
+by an incremental mark-and-sweep, done in bounded steps that are
+interleaved with the minor collections.
+
+Young objects are allocated in a nursery, exactly like with the
+GenerationGC.  When the nursery is full, a minor collection copies the
+surviving objects into the old space (see oldspace.py), which is made
+of pages of blocks of the same size.  Objects too large for that space,
+or with a finalizer, are allocated old directly.
+
+A major collection goes through the following states:
+
+  * STATE_SCANNING: no major collection is in progress.  The next one
+    starts at the end of the minor collection that finds that the old
+    generation has grown above 'next_major_collection_threshold'.
+
+  * STATE_MARKING: the roots are walked and the live objects are marked
+    with GCFLAG_VISITED, a few at a time, at the end of every minor
+    collection.  In-between, the write barrier records all old objects
+    that are modified (not only the ones that receive a pointer to a
+    young object).  The following minor collection traces them again,
+    as well as the stack roots, so that no live object is missed
+    (incremental update).  Objects promoted or allocated during this
+    phase are marked immediately.  The marking finishes in a step where
+    nothing is left to trace; finalizers and weakrefs are dealt with at
+    that point.
+
+  * STATE_SWEEPING: the old objects without GCFLAG_VISITED are freed,
+    a few pages at a time.  New objects are only allocated in pages
+    that were already swept (or in fresh pages), so they don't need to
+    be marked.
+
+The amount of work done in each step is proportional to the size of the
+nursery, so that a major collection keeps pace with the allocations.
+
+id() and identityhash() return the address of the object.  For young
+objects, a place in the old space (a "shadow") is reserved, and the
+object is moved there when it survives the minor collection.
+"""
+
+import sys, time
+from pypy.rpython.lltypesystem import lltype, llmemory, llarena, llgroup
+from pypy.rpython.lltypesystem.lloperation import llop
+from pypy.rpython.lltypesystem.llmemory import NULL, raw_malloc_usage
+from pypy.rpython.memory.gc.base import MovingGCBase
+from pypy.rpython.memory.gc.oldspace import OldSpace
+from pypy.rpython.memory.gc.generation import nursery_size_from_env
+from pypy.rpython.memory.gc.generation import estimate_best_nursery_size
+from pypy.rpython.memory.support import DEFAULT_CHUNK_SIZE
+from pypy.rlib.rarithmetic import ovfcheck, LONG_BIT
+from pypy.rlib.debug import ll_assert, debug_print, debug_start, debug_stop
+
+WORD = LONG_BIT // 8
+
+first_gcflag = 1 << (LONG_BIT//2)
+
+# The following flag is never set on young objects.  It is initially set
+# on all prebuilt and old objects, and gets cleared by the write_barrier()
+# when we write in them a pointer to a young object, or any pointer
+# during the marking phase of a major collection.
+GCFLAG_NO_YOUNG_PTRS = first_gcflag << 0
+
+# The following flag is set on prebuilt objects, unless the object is
+# already listed in 'prebuilt_root_objects'.  When a pointer is written
+# inside an object with GCFLAG_NO_HEAP_PTRS set, the write_barrier clears
+# the flag and adds the object to 'prebuilt_root_objects'.
+GCFLAG_NO_HEAP_PTRS = first_gcflag << 1
+
+# The mark bit of the major collections.  It is always set on prebuilt
+# objects, which are never freed.
+GCFLAG_VISITED = first_gcflag << 2
+
+# Set on young objects that were copied out of the nursery during the
+# current minor collection; they are overwritten with a FORWARDSTUB.
+GCFLAG_FORWARDED = first_gcflag << 3
+
+# Set on young objects that have a shadow, i.e. a reserved place in the
+# old space, because their id() or identityhash() was asked for.
+GCFLAG_HAS_SHADOW = first_gcflag << 4
+
+# Used by the finalizer ordering algorithm.
+GCFLAG_FINALIZATION_ORDERING = first_gcflag << 5
+
+# Set on the prebuilt objects that have an extra field containing
+# their hash.
+GCFLAG_HASHFIELD = first_gcflag << 6
+
+STATE_SCANNING = 0
+STATE_MARKING = 1
+STATE_SWEEPING = 2
+
+memoryError = MemoryError()
+
+
+class IncrementalMarkSweepGC(MovingGCBase):
+    _alloc_flavor_ = "raw"
+    inline_simple_malloc = True
+    inline_simple_malloc_varsize = True
+    needs_write_barrier = True
+    prebuilt_gc_objects_are_static_roots = False
+    malloc_zero_filled = True
+    first_unused_gcflag = first_gcflag << 7
+
+    HDR = lltype.Struct('header', ('tid', lltype.Signed))
+    typeid_is_in_field = 'tid'
+    withhash_flag_is_in_field = 'tid', GCFLAG_HASHFIELD
+    # ^^^ prebuilt objects may have the flag GCFLAG_HASHFIELD;
+    #     then they are one word longer, the extra word storing the hash.
+
+    FORWARDSTUB = lltype.GcStruct('forwarding_stub',
+                                  ('forw', llmemory.Address))
+    FORWARDSTUBPTR = lltype.Ptr(FORWARDSTUB)
+
+    object_minimal_size = llmemory.sizeof(FORWARDSTUB)
+
+    # the following values override the default arguments of __init__ when
+    # translating to a real backend.
+    TRANSLATION_PARAMS = {
+        # Automatically adjust the size of the nursery to the L2 cache
+        # size.  The 'nursery_size' below is only used if the size
+        # cannot be found.
+        'nursery_size': 896*1024,
+        'auto_nursery_size': True,
+
+        # The system page size.  Like obmalloc.c, we assume that it is 4K
+        # for 32-bit systems; unlike obmalloc.c, we assume that it is 8K
+        # for 64-bit systems, for consistent results.
+        'page_size': 1024*WORD,
+
+        # The size of an arena.  Arenas are groups of pages allocated
+        # together.
+        'arena_size': 65536*WORD,
+
+        # The maximum size of an object allocated in the pages of the old
+        # space.  Larger objects are allocated with arena_malloc().
+        'small_request_threshold': 35*WORD,
+
+        # Full collection threshold: after a major collection, we record
+        # the total size consumed; and after every minor collection, if
+        # the total size is now more than 'major_collection_threshold'
+        # times, we start the next major collection.
+        'major_collection_threshold': 1.82,
+
+        # The minimal threshold, in bytes, that starts a major collection.
+        'min_heap_size': 8*1024*1024,
+
+        # The work done by each step of a major collection, as a multiple
+        # of the nursery size: this many bytes of objects are traced or
+        # swept in every step.
+        'major_step_factor': 2,
+        }
+
+    def __init__(self, config, chunk_size=DEFAULT_CHUNK_SIZE,
+                 nursery_size=32*WORD,
+                 auto_nursery_size=False,
+                 page_size=16*WORD,
+                 arena_size=64*WORD,
+                 small_request_threshold=5*WORD,
+                 major_collection_threshold=1.82,
+                 min_heap_size=64*WORD,
+                 major_step_factor=2):
+        MovingGCBase.__init__(self, config, chunk_size)
+        assert small_request_threshold % WORD == 0
+        assert nursery_size >= 4 * small_request_threshold
+        self.initial_nursery_size = nursery_size
+        self.auto_nursery_size = auto_nursery_size
+        self.page_size = page_size
+        self.arena_size = arena_size
+        self.small_request_threshold = small_request_threshold
+        self.major_collection_threshold = major_collection_threshold
+        self.min_heap_size = min_heap_size
+        self.major_step_factor = major_step_factor
+        self.max_heap_size = 0
+        self.nursery = NULL
+        self.nursery_free = NULL
+        self.nursery_top = NULL
+        self._setup_wb()
+
+    def setup(self):
+        # all runtime mutable values' setup should happen here
+        # and in its overriden versions! for the benefit of test_transformed_gc
+        MovingGCBase.setup(self)
+        self.oldspace = OldSpace(self.page_size, self.arena_size,
+                                 self.small_request_threshold)
+        #
+        # A list of the old and prebuilt objects whose
+        # GCFLAG_NO_YOUNG_PTRS bit is not set.  It also contains the
+        # objects just copied out of the nursery during a minor collection.
+        self.old_objects_pointing_to_young = self.AddressStack()
+        #
+        # A list of the prebuilt objects whose GCFLAG_NO_HEAP_PTRS bit is
+        # not set: they are roots for the major collections.
+        self.prebuilt_root_objects = self.AddressStack()
+        #
+        self.young_objects_with_weakrefs = self.AddressStack()
+        self.old_objects_with_weakrefs = self.AddressStack()
+        self.objects_with_finalizers = self.AddressDeque()
+        #
+        # {young object: address of its shadow}
+        self.young_objects_shadows = self.AddressDict()
+        #
+        # The marking stack of the major collections.
+        self.objects_to_trace = self.AddressStack()
+        #
+        # The objects allocated with arena_malloc(), and the ones of them
+        # that are not swept yet by the current major collection.
+        self.rawmalloced_objects = self.AddressStack()
+        self.rawmalloced_objects_to_sweep = self.AddressStack()
+        self.rawmalloced_total_size = 0
+        self.size_allocated_externally = 0
+        #
+        self.gc_state = STATE_SCANNING
+        self.next_major_collection_threshold = self.min_heap_size
+        #
+        newsize = self.initial_nursery_size
+        if self.auto_nursery_size:
+            size = nursery_size_from_env()
+            if size <= 0:
+                size = estimate_best_nursery_size()
+            if size > 0:
+                newsize = size
+        if newsize < 4 * self.small_request_threshold:
+            newsize = 4 * self.small_request_threshold
+        self.allocate_nursery(newsize)
+
+    def allocate_nursery(self, newsize):
+        debug_start("gc-set-nursery-size")
+        debug_print("nursery size:", newsize)
+        self.nursery_size = newsize
+        self.nursery = llarena.arena_malloc(newsize, True)
+        if not self.nursery:
+            raise MemoryError("cannot allocate nursery")
+        self.nursery_free = self.nursery
+        self.nursery_top = self.nursery + newsize
+        self.major_step_size = self.major_step_factor * newsize
+        debug_stop("gc-set-nursery-size")
+
+    def set_max_heap_size(self, size):
+        self.max_heap_size = size
+
+    def is_in_nursery(self, addr):
+        ll_assert(llmemory.cast_adr_to_int(addr) & 1 == 0,
+                  "odd-valued (i.e. tagged) pointer unexpected here")
+        return self.nursery <= addr < self.nursery_top
+
+    def get_total_memory_used(self):
+        """Return the total memory used by the old objects, not counting
+        the memory freed by the current major collection so far."""
+        return self.oldspace.total_memory_used + self.rawmalloced_total_size
+
+    # ____________________________________________________________
+    # Allocation
+
+    def malloc_fixedsize_clear(self, typeid, size, can_collect,
+                               has_finalizer=False, contains_weakptr=False):
+        size_gc_header = self.gcheaderbuilder.size_gc_header
+        totalsize = size_gc_header + size
+        rawtotalsize = raw_malloc_usage(totalsize)
+        if (has_finalizer or not can_collect or
+            rawtotalsize > self.small_request_threshold):
+            # "non-simple" case or object too big: don't use the nursery
+            ll_assert(not contains_weakptr or not has_finalizer,
+                      "wrong case for mallocing weakref")
+            obj = self.external_malloc(typeid, 0, can_collect)
+            if has_finalizer:
+                self.objects_with_finalizers.append(obj)
+            if contains_weakptr:
+                self.old_objects_with_weakrefs.append(obj)
+            return llmemory.cast_adr_to_ptr(obj, llmemory.GCREF)
+        result = self.nursery_free
+        if rawtotalsize > self.nursery_top - result:
+            result = self.collect_and_reserve(totalsize)
+        llarena.arena_reserve(result, totalsize)
+        # GCFLAG_NO_YOUNG_PTRS is never set on young objs
+        self.init_gc_object(result, typeid, flags=0)
+        self.nursery_free = result + totalsize
+        if contains_weakptr:
+            self.young_objects_with_weakrefs.append(result + size_gc_header)
+        return llmemory.cast_adr_to_ptr(result+size_gc_header, llmemory.GCREF)
+
+    def malloc_varsize_clear(self, typeid, length, size, itemsize,
+                             offset_to_length, can_collect):
+        size_gc_header = self.gcheaderbuilder.size_gc_header
+        nonvarsize = size_gc_header + size
+        # Only use the nursery if there are not too many items.  The
+        # following computation is usually constant-folded, because
+        # 'size' and 'itemsize' are constants (the latter due to
+        # inlining).
+        maxlength = self.small_request_threshold - raw_malloc_usage(nonvarsize)
+        if not raw_malloc_usage(itemsize):
+            too_many_items = maxlength < 0
+        else:
+            maxlength = maxlength // raw_malloc_usage(itemsize)
+            too_many_items = length > maxlength
+        if not can_collect or too_many_items:
+            obj = self.external_malloc(typeid, length, can_collect)
+            return llmemory.cast_adr_to_ptr(obj, llmemory.GCREF)
+        # with the above checks we know now that totalsize is not more
+        # than small_request_threshold; in particular, the + and *
+        # cannot overflow
+        totalsize = nonvarsize + itemsize * length
+        totalsize = llarena.round_up_for_allocation(totalsize)
+        result = self.nursery_free
+        if raw_malloc_usage(totalsize) > self.nursery_top - result:
+            result = self.collect_and_reserve(totalsize)
+        llarena.arena_reserve(result, totalsize)
+        # GCFLAG_NO_YOUNG_PTRS is never set on young objs
+        self.init_gc_object(result, typeid, flags=0)
+        (result + size_gc_header + offset_to_length).signed[0] = length
+        self.nursery_free = result + totalsize
+        return llmemory.cast_adr_to_ptr(result+size_gc_header, llmemory.GCREF)
+
+    def collect_and_reserve(self, totalsize):
+        """To call when nursery_free overflows nursery_top.
+        Do a minor collection, and possibly also a step of the major
+        collection.  Returns the address where 'totalsize' bytes can
+        be reserved in the nursery."""
+        while True:
+            self.minor_collection_and_step()
+            # The nursery might not be empty now, because of
+            # execute_finalizers().  If it is almost full again,
+            # we need to fix it with another minor collection.
+            result = self.nursery_free
+            if raw_malloc_usage(totalsize) <= self.nursery_top - result:
+                return result
+
+    def external_malloc(self, typeid, length, can_collect):
+        """Allocate an object outside the nursery: in the old space if
+        it is small enough, or else with arena_malloc()."""
+        size_gc_header = self.gcheaderbuilder.size_gc_header
+        nonvarsize = size_gc_header + self.fixed_size(typeid)
+        if length == 0:
+            totalsize = nonvarsize
+        else:
+            itemsize = self.varsize_item_sizes(typeid)
+            try:
+                varsize = ovfcheck(itemsize * length)
+                totalsize = ovfcheck(nonvarsize + varsize)
+            except OverflowError:
+                raise memoryError
+        totalsize = llarena.round_up_for_allocation(totalsize)
+        rawtotalsize = raw_malloc_usage(totalsize)
+        #
+        # Objects allocated here also make the major collection progress,
+        # as if they had been allocated in the nursery.
+        if can_collect:
+            self.size_allocated_externally += rawtotalsize
+            if self.size_allocated_externally > self.nursery_size:
+                self.minor_collection_and_step()
+            self.check_max_heap_size(rawtotalsize)
+        #
+        if rawtotalsize <= self.small_request_threshold:
+            result = self.oldspace.malloc(totalsize)
+            llarena.arena_reset(result, totalsize, 2)
+        else:
+            result = llarena.arena_malloc(rawtotalsize, True)
+            if not result:
+                raise memoryError
+            self.rawmalloced_objects.append(result + size_gc_header)
+            self.rawmalloced_total_size += rawtotalsize
+        llarena.arena_reserve(result, totalsize)
+        #
+        # During the marking phase, new objects are created marked.
+        # GCFLAG_NO_YOUNG_PTRS is not set, because the object may receive
+        # pointers to young objects from initializing stores, which have
+        # no write barrier; instead, it is added to the list
+        # 'old_objects_pointing_to_young'.
+        flags = 0
+        if self.gc_state == STATE_MARKING:
+            flags |= GCFLAG_VISITED
+        self.init_gc_object(result, typeid, flags)
+        obj = result + size_gc_header
+        if self.is_varsize(typeid):
+            (obj + self.varsize_offset_to_length(typeid)).signed[0] = length
+        self.old_objects_pointing_to_young.append(obj)
+        return obj
+
+    def check_max_heap_size(self, extra):
+        if self.max_heap_size > 0:
+            if self.get_total_memory_used() + extra > self.max_heap_size:
+                self.collect()
+                if self.get_total_memory_used() + extra > self.max_heap_size:
+                    raise memoryError
+
+    def malloc_varsize_nonmovable(self, typeid, length):
+        obj = self.external_malloc(typeid, length, True)
+        return llmemory.cast_adr_to_ptr(obj, llmemory.GCREF)
+
+    def malloc_nonmovable(self, typeid, length, zero):
+        # helper for testing, same as GCBase.malloc
+        return self.external_malloc(typeid, length or 0, True)
+
+    def can_malloc_nonmovable(self):
+        return True
+
+    def can_move(self, addr):
+        return self.is_in_nursery(addr)
+
+    def shrink_array(self, addr, smallerlength):
+        # only young objects are shrunk in-place; the old ones are in
+        # blocks of a fixed size anyway.
+        if (self.is_in_nursery(addr) and
+            self.header(addr).tid & GCFLAG_HAS_SHADOW == 0):
+            size_gc_header = self.gcheaderbuilder.size_gc_header
+            typeid = self.get_type_id(addr)
+            totalsmallersize = (
+                size_gc_header + self.fixed_size(typeid) +
+                self.varsize_item_sizes(typeid) * smallerlength)
+            llarena.arena_shrink_obj(addr - size_gc_header, totalsmallersize)
+            #
+            offset_to_length = self.varsize_offset_to_length(typeid)
+            (addr + offset_to_length).signed[0] = smallerlength
+            return True
+        else:
+            return False
+
+    # ____________________________________________________________
+    # Object header
+
+    def combine(self, typeid16, flags):
+        return llop.combine_ushort(lltype.Signed, typeid16, flags)
+
+    def get_type_id(self, addr):
+        tid = self.header(addr).tid
+        ll_assert(tid & GCFLAG_FORWARDED == 0, "get_type_id on forwarded obj")
+        return llop.extract_ushort(llgroup.HALFWORD, tid)
+
+    def init_gc_object(self, addr, typeid16, flags=0):
+        hdr = llmemory.cast_adr_to_ptr(addr, lltype.Ptr(self.HDR))
+        hdr.tid = self.combine(typeid16, flags)
+
+    def init_gc_object_immortal(self, addr, typeid16, flags=0):
+        # prebuilt objects are never freed, so they are always "marked"
+        flags |= GCFLAG_NO_YOUNG_PTRS | GCFLAG_NO_HEAP_PTRS | GCFLAG_VISITED
+        self.init_gc_object(addr, typeid16, flags)
+
+    def is_forwarded(self, obj):
+        return self.header(obj).tid & GCFLAG_FORWARDED != 0
+
+    def get_forwarding_address(self, obj):
+        return llmemory.cast_adr_to_ptr(obj, self.FORWARDSTUBPTR).forw
+
+    def set_forwarding_address(self, obj, newobj, objsize):
+        # To mark an object as forwarded, we set the GCFLAG_FORWARDED and
+        # overwrite the object with a FORWARDSTUB.  Doing so is a bit
+        # long-winded on llarena, but it all melts down to two memory
+        # writes after translation to C.
+        size_gc_header = self.gcheaderbuilder.size_gc_header
+        stubsize = llmemory.sizeof(self.FORWARDSTUB)
+        tid = self.header(obj).tid
+        hdraddr = obj - size_gc_header
+        llarena.arena_reset(hdraddr, size_gc_header + objsize, False)
+        llarena.arena_reserve(hdraddr, size_gc_header + stubsize)
+        hdr = llmemory.cast_adr_to_ptr(hdraddr, lltype.Ptr(self.HDR))
+        hdr.tid = tid | GCFLAG_FORWARDED
+        stub = llmemory.cast_adr_to_ptr(obj, self.FORWARDSTUBPTR)
+        stub.forw = newobj
+
+    # ____________________________________________________________
+    # Write barrier
+
+    # for the JIT: a minimal description of the write_barrier() method
+    # (the JIT assumes it is of the shape
+    #  "if addr_struct.int0 & JIT_WB_IF_FLAG: remember_young_pointer()")
+    JIT_WB_IF_FLAG = GCFLAG_NO_YOUNG_PTRS
+
+    def write_barrier(self, newvalue, addr_struct):
+        if self.header(addr_struct).tid & GCFLAG_NO_YOUNG_PTRS:
+            self.remember_young_pointer(addr_struct, newvalue)
+
+    def _setup_wb(self):
+        # The purpose of attaching remember_young_pointer to the instance
+        # instead of keeping it as a regular method is to help the JIT call
+        # it; see GenerationGC._setup_wb().
+        def remember_young_pointer(addr_struct, addr):
+            ll_assert(not self.is_in_nursery(addr_struct),
+                      "nursery object with GCFLAG_NO_YOUNG_PTRS")
+            # if we have tagged pointers around, we first need to check
+            # whether we have valid pointer here, otherwise we can do it
+            # after the is_in_nursery check
+            if (self.config.taggedpointers and
+                not self.is_valid_gc_object(addr)):
+                return
+            #
+            # During the marking phase, the objects that are modified
+            # must be traced again by the next minor collection, even if
+            # 'addr' is not young.
+            if self.is_in_nursery(addr) or self.gc_state == STATE_MARKING:
+                self.old_objects_pointing_to_young.append(addr_struct)
+                self.header(addr_struct).tid &= ~GCFLAG_NO_YOUNG_PTRS
+            elif (not self.config.taggedpointers and
+                  not self.is_valid_gc_object(addr)):
+                return
+            #
+            # A prebuilt object that receives a pointer becomes a root
+            # for the major collections.
+            objhdr = self.header(addr_struct)
+            if objhdr.tid & GCFLAG_NO_HEAP_PTRS:
+                objhdr.tid &= ~GCFLAG_NO_HEAP_PTRS
+                self.prebuilt_root_objects.append(addr_struct)
+        remember_young_pointer._dont_inline_ = True
+        self.remember_young_pointer = remember_young_pointer
+
+    def assume_young_pointers(self, addr_struct):
+        objhdr = self.header(addr_struct)
+        if objhdr.tid & GCFLAG_NO_YOUNG_PTRS:
+            self.old_objects_pointing_to_young.append(addr_struct)
+            objhdr.tid &= ~GCFLAG_NO_YOUNG_PTRS
+        if objhdr.tid & GCFLAG_NO_HEAP_PTRS:
+            objhdr.tid &= ~GCFLAG_NO_HEAP_PTRS
+            self.prebuilt_root_objects.append(addr_struct)
+
+    def writebarrier_before_copy(self, source_addr, dest_addr):
+        """ This has the same effect as calling writebarrier over
+        each element in dest copied from source, except it might reset
+        one of the following flags a bit too eagerly, which means we'll have
+        a bit more objects to track, but being on the safe side.
+        """
+        source_hdr = self.header(source_addr)
+        dest_hdr = self.header(dest_addr)
+        if dest_hdr.tid & GCFLAG_NO_YOUNG_PTRS == 0:
+            return True
+        # ^^^ a fast path of write-barrier
+        if (source_hdr.tid & GCFLAG_NO_YOUNG_PTRS == 0 or
+            self.gc_state == STATE_MARKING):
+            # there might be an object in source that is in nursery,
+            # or we are marking and 'dest' must be traced again
+            self.old_objects_pointing_to_young.append(dest_addr)
+            dest_hdr.tid &= ~GCFLAG_NO_YOUNG_PTRS
+        if dest_hdr.tid & GCFLAG_NO_HEAP_PTRS:
+            if source_hdr.tid & GCFLAG_NO_HEAP_PTRS == 0:
+                # ^^^ equivalent of addr from source not being prebuilt
+                dest_hdr.tid &= ~GCFLAG_NO_HEAP_PTRS
+                self.prebuilt_root_objects.append(dest_addr)
+        return True
+
+    # ____________________________________________________________
+    # id() and identityhash()
+
+    def id(self, gcobj):
+        obj = llmemory.cast_ptr_to_adr(gcobj)
+        if self.is_valid_gc_object(obj) and self.is_in_nursery(obj):
+            obj = self._find_shadow(obj)
+        return llmemory.cast_adr_to_int(obj)
+
+    def identityhash(self, gcobj):
+        obj = llmemory.cast_ptr_to_adr(gcobj)
+        if self.is_in_nursery(obj):
+            obj = self._find_shadow(obj)
+        elif self.header(obj).tid & GCFLAG_HASHFIELD:
+            # the hash is in a field at the end
+            obj += self.get_size(obj)
+            return obj.signed[0]
+        return llmemory.cast_adr_to_int(obj)
+
+    def _find_shadow(self, obj):
+        """Return the address where the young 'obj' will be moved by
+        the next minor collection, reserving it if needed."""
+        if self.header(obj).tid & GCFLAG_HAS_SHADOW:
+            return self.young_objects_shadows.get(obj)
+        size_gc_header = self.gcheaderbuilder.size_gc_header
+        totalsize = size_gc_header + self.get_size(obj)
+        shadowhdr = self._malloc_out_of_nursery(totalsize)
+        # If 'obj' dies young, the shadow stays around as a dead object
+        # until the next major collection frees it: give it a header.
+        self.init_gc_object(shadowhdr, self.get_type_id(obj), 0)
+        shadow = shadowhdr + size_gc_header
+        self.young_objects_shadows.setitem(obj, shadow)
+        self.header(obj).tid |= GCFLAG_HAS_SHADOW
+        return shadow
+
+    def _malloc_out_of_nursery(self, totalsize):
+        # all the objects of the nursery fit in the old space
+        totalsize = llarena.round_up_for_allocation(totalsize)
+        result = self.oldspace.malloc(totalsize)
+        llarena.arena_reserve(result, totalsize)
+        return result
+
+    # ____________________________________________________________
+    # Minor collections
+
+    def minor_collection_and_step(self):
+        self.minor_collection()
+        self.size_allocated_externally = 0
+        self.major_collection_step_if_needed()
+        if self.run_finalizers.non_empty():
+            self.execute_finalizers()
+
+    def minor_collection(self):
+        debug_start("gc-minor")
+        start_time = time.time()
+        # First, find the roots that point to young objects.  All nursery
+        # objects found are copied out of the nursery and added to the
+        # list 'old_objects_pointing_to_young'.
+        self.collect_roots_in_nursery()
+        #
+        # Now trace the objects from 'old_objects_pointing_to_young'.
+        # This also copies the young objects they reference, and so on.
+        self.collect_oldrefs_to_nursery()
+        #
+        # Young weakrefs and shadows.
+        if self.young_objects_with_weakrefs.non_empty():
+            self.invalidate_young_weakrefs()
+        if self.young_objects_shadows.length() > 0:
+            self.young_objects_shadows.clear()
+        #
+        # All nursery objects are dead now: clear the nursery.
+        debug_print("survived (fraction of the size):",
+                    float(self.nursery_free - self.nursery) /
+                    self.nursery_size)
+        llarena.arena_reset(self.nursery, self.nursery_size, 2)
+        self.nursery_free = self.nursery
+        self.stat_minor_collections += 1
+        self.stat_record_pause(start_time)
+        debug_stop("gc-minor")
+
+    def collect_roots_in_nursery(self):
+        # we don't need to trace prebuilt GcStructs during a minor collect:
+        # if a prebuilt GcStruct contains a pointer to a young object,
+        # then the write_barrier must have ensured that the prebuilt
+        # GcStruct is in the list self.old_objects_pointing_to_young.
+        self.root_walker.walk_roots(
+            IncrementalMarkSweepGC._trace_drag_out1,  # stack roots
+            IncrementalMarkSweepGC._trace_drag_out1,  # static in prebuilt non-gc
+            None)                                     # static in prebuilt gc
+
+    def collect_oldrefs_to_nursery(self):
+        # Follow the old_objects_pointing_to_young list and move the
+        # young objects they point to out of the nursery.
+        oldlist = self.old_objects_pointing_to_young
+        while oldlist.non_empty():
+            obj = oldlist.pop()
+            self.header(obj).tid |= GCFLAG_NO_YOUNG_PTRS
+            self.trace(obj, self._trace_drag_out, None)
+
+    def _trace_drag_out1(self, root):
+        self._trace_drag_out(root, None)
+
+    def _trace_drag_out(self, root, ignored):
+        obj = root.address[0]
+        #
+        if not self.is_in_nursery(obj):
+            # An old or prebuilt object.  During the marking phase, this
+            # is how the roots and the modified objects are traced again.
+            if self.gc_state == STATE_MARKING:
+                if self.header(obj).tid & GCFLAG_VISITED == 0:
+                    self.objects_to_trace.append(obj)
+            return
+        #
+        # If 'obj' was already forwarded, change it to its forwarding address.
+        hdr = self.header(obj)
+        if hdr.tid & GCFLAG_FORWARDED:
+            root.address[0] = self.get_forwarding_address(obj)
+            return
+        #
+        # First visit to 'obj': copy it out of the nursery, into its
+        # shadow if it has one.
+        size_gc_header = self.gcheaderbuilder.size_gc_header
+        size = self.get_size(obj)
+        totalsize = size_gc_header + size
+        if hdr.tid & GCFLAG_HAS_SHADOW:
+            newobj = self.young_objects_shadows.get(obj)
+            ll_assert(newobj != NULL, "GCFLAG_HAS_SHADOW but no shadow found")
+            newhdr = newobj - size_gc_header
+        else:
+            newhdr = self._malloc_out_of_nursery(totalsize)
+            newobj = newhdr + size_gc_header
+        llmemory.raw_memcopy(obj - size_gc_header, newhdr, totalsize)
+        self.stat_bytes_promoted += raw_malloc_usage(totalsize)
+        #
+        # Objects promoted during the marking phase are marked.  Their
+        # GCFLAG_NO_YOUNG_PTRS is not set yet: they are added below to
+        # 'old_objects_pointing_to_young', so that the young objects
+        # they reference are copied too.
+        newtid = hdr.tid & ~GCFLAG_HAS_SHADOW
+        if self.gc_state == STATE_MARKING:
+            newtid |= GCFLAG_VISITED
+        self.header(newobj).tid = newtid
+        #
+        self.set_forwarding_address(obj, newobj, size)
+        root.address[0] = newobj
+        self.old_objects_pointing_to_young.append(newobj)
+
+    # The code relies on the fact that no weakref can be an old object
+    # weakly pointing to a young object.  Indeed, weakrefs are immutable
+    # so they cannot point to an object that was created after it.
+    def invalidate_young_weakrefs(self):
+        # walk over the list of objects that contain weakrefs and are in the
+        # nursery.  if the object it references survives then update the
+        # weakref; otherwise invalidate the weakref
+        while self.young_objects_with_weakrefs.non_empty():
+            obj = self.young_objects_with_weakrefs.pop()
+            if not self.is_forwarded(obj):
+                continue # weakref itself dies
+            obj = self.get_forwarding_address(obj)
+            offset = self.weakpointer_offset(self.get_type_id(obj))
+            pointing_to = (obj + offset).address[0]
+            if self.is_in_nursery(pointing_to):
+                if self.is_forwarded(pointing_to):
+                    (obj + offset).address[0] = self.get_forwarding_address(
+                        pointing_to)
+                else:
+                    (obj + offset).address[0] = NULL
+                    continue    # no need to remember this weakref any longer
+            self.old_objects_with_weakrefs.append(obj)
+
+    # ____________________________________________________________
+    # Major collections
+
+    def collect(self, gen=1):
+        """Do a minor (gen=0) or a complete major collection."""
+        self.minor_collection()
+        if gen > 0:
+            debug_start("gc-collect")
+            # finish the major collection in progress, if any; its
+            # marking started too long ago to free the objects that died
+            # recently, so we run another complete one afterwards.
+            self.finish_major_collection()
+            self.major_collection_step(sys.maxint)
+            self.finish_major_collection()
+            debug_stop("gc-collect")
+            if self.run_finalizers.non_empty():
+                self.execute_finalizers()
+
+    def finish_major_collection(self):
+        while self.gc_state != STATE_SCANNING:
+            self.major_collection_step(sys.maxint)
+
+    def major_collection_step_if_needed(self):
+        total = self.get_total_memory_used()
+        threshold = self.next_major_collection_threshold
+        if self.gc_state == STATE_SCANNING:
+            if total > threshold:
+                self.major_collection_step(self.major_step_size)
+        elif (self.gc_state == STATE_MARKING and
+              total > threshold * self.major_collection_threshold):
+            # the program allocates faster than we mark: finish the
+            # marking now, to bound the memory usage
+            self.major_collection_step(sys.maxint)
+        else:
+            self.major_collection_step(self.major_step_size)
+
+    def major_collection_step(self, budget):
+        """Do one step of the major collection, starting a new one if none
+        is in progress.  It must be called just after a minor collection.
+        'budget' is roughly the number of bytes of objects to process."""
+        debug_start("gc-major-step")
+        start_time = time.time()
+        ll_assert(not self.old_objects_pointing_to_young.non_empty(),
+                  "major_collection_step() not just after a minor collection")
+        #
+        if self.gc_state == STATE_SCANNING:
+            self.start_marking()
+        #
+        if self.gc_state == STATE_MARKING:
+            if self.visit_objects(budget):
+                # Nothing left to trace just after a minor collection,
+                # which traced the roots and the modified objects again:
+                # the marking is finished.
+                self.finish_marking()
+        #
+        elif self.gc_state == STATE_SWEEPING:
+            if self.sweep(budget):
+                self.finish_sweeping()
+        #
+        self.stat_record_pause(start_time)
+        debug_stop("gc-major-step")
+
+    def start_marking(self):
+        debug_print("starting a major collection, total memory used:",
+                    self.get_total_memory_used())
+        self.gc_state = STATE_MARKING
+        #
+        # the roots: the stack, the prebuilt objects that were modified,
+        # and the objects waiting for their finalizer to be called
+        self.root_walker.walk_roots(
+            IncrementalMarkSweepGC._collect_root,  # stack roots
+            IncrementalMarkSweepGC._collect_root,  # static in prebuilt non-gc
+            None)                                  # static in prebuilt gc
+        self.prebuilt_root_objects.foreach(self._trace_prebuilt_root, None)
+        pending = self.run_finalizers
+        self.run_finalizers = self.AddressDeque()
+        while pending.non_empty():
+            obj = pending.popleft()
+            self.objects_to_trace.append(obj)
+            self.run_finalizers.append(obj)
+        pending.delete()
+
+    def _collect_root(self, root):
+        self.objects_to_trace.append(root.address[0])
+
+    def _trace_prebuilt_root(self, obj, ignored):
+        # prebuilt objects always have GCFLAG_VISITED, so they are
+        # traced directly instead of being added to 'objects_to_trace'
+        self.trace(obj, self._collect_ref, None)
+
+    def _collect_ref(self, pointer, ignored):
+        obj = pointer.address[0]
+        if self.header(obj).tid & GCFLAG_VISITED == 0:
+            self.objects_to_trace.append(obj)
+
+    def visit_objects(self, budget):
+        """Mark and trace the objects from 'objects_to_trace', until about
+        'budget' bytes of objects have been traced.  Returns True if there
+        is nothing left to trace."""
+        pending = self.objects_to_trace
+        size_gc_header = self.gcheaderbuilder.size_gc_header
+        while pending.non_empty():
+            obj = pending.pop()
+            hdr = self.header(obj)
+            if hdr.tid & GCFLAG_VISITED:
+                continue
+            hdr.tid |= GCFLAG_VISITED
+            self.trace(obj, self._collect_ref, None)
+            budget -= raw_malloc_usage(size_gc_header + self.get_size(obj))
+            if budget <= 0:
+                return not pending.non_empty()
+        return True
+
+    def finish_marking(self):
+        if self.objects_with_finalizers.non_empty():
+            self.deal_with_objects_with_finalizers()
+        if self.old_objects_with_weakrefs.non_empty():
+            self.invalidate_old_weakrefs()
+        #
+        # Start sweeping.  The objects allocated from now on don't need
+        # to be marked, as they are never seen by this sweeping.
+        self.gc_state = STATE_SWEEPING
+        self.oldspace.mass_free_prepare()
+        ll_assert(not self.rawmalloced_objects_to_sweep.non_empty(),
+                  "rawmalloced_objects_to_sweep not empty")
+        objects = self.rawmalloced_objects_to_sweep
+        self.rawmalloced_objects_to_sweep = self.rawmalloced_objects
+        self.rawmalloced_objects = objects
+
+    def sweep(self, budget):
+        """Free the objects that are not marked, until about 'budget'
+        bytes have been processed.  Returns True when done."""
+        size_gc_header = self.gcheaderbuilder.size_gc_header
+        pending = self.rawmalloced_objects_to_sweep
+        while pending.non_empty():
+            if budget <= 0:
+                return False
+            obj = pending.pop()
+            totalsize = size_gc_header + self.get_size(obj)
+            rawtotalsize = raw_malloc_usage(
+                llarena.round_up_for_allocation(totalsize))
+            hdr = self.header(obj)
+            if hdr.tid & GCFLAG_VISITED:
+                hdr.tid &= ~GCFLAG_VISITED
+                self.rawmalloced_objects.append(obj)
+            else:
+                self.rawmalloced_total_size -= rawtotalsize
+                llarena.arena_free(obj - size_gc_header)
+            budget -= rawtotalsize
+        #
+        max_pages = budget // self.page_size + 1
+        return self.oldspace.mass_free_incremental(self._free_if_unvisited,
+                                                   max_pages)
+
+    def _free_if_unvisited(self, hdr):
+        obj = hdr + self.gcheaderbuilder.size_gc_header
+        hdr = self.header(obj)
+        if hdr.tid & GCFLAG_VISITED:
+            hdr.tid &= ~GCFLAG_VISITED
+            return False     # survives
+        return True      # dies
+
+    def finish_sweeping(self):
+        self.gc_state = STATE_SCANNING
+        self.stat_major_collections += 1
+        total = self.get_total_memory_used()
+        threshold = int(total * self.major_collection_threshold)
+        if threshold < self.min_heap_size:
+            threshold = self.min_heap_size
+        self.next_major_collection_threshold = threshold
+        debug_print("major collection finished, total memory used:", total)
+        debug_print("next major collection threshold:", threshold)
+        self.debug_check_consistency()
+
+    # ----------
+    # Finalizers
+
+    def deal_with_objects_with_finalizers(self):
+        # Walk over list of objects with finalizers.
+        # If it is not surviving, add it to the list of to-be-called
+        # finalizers and make it survive, to make the finalizer runnable.
+        # We try to run the finalizers in a "reasonable" order, like
+        # CPython does.  The details of this algorithm are in
+        # pypy/doc/discussion/finalizer-order.txt.
+        new_with_finalizer = self.AddressDeque()
+        marked = self.AddressDeque()
+        pending = self.AddressStack()
+        self.tmpstack = self.AddressStack()
+        while self.objects_with_finalizers.non_empty():
+            x = self.objects_with_finalizers.popleft()
+            ll_assert(self._finalization_state(x) != 1,
+                      "bad finalization state 1")
+            if self.header(x).tid & GCFLAG_VISITED:
+                new_with_finalizer.append(x)
+                continue
+            marked.append(x)
+            pending.append(x)
+            while pending.non_empty():
+                y = pending.pop()
+                state = self._finalization_state(y)
+                if state == 0:
+                    self._bump_finalization_state_from_0_to_1(y)
+                    self.trace(y, self._append_if_nonnull, pending)
+                elif state == 2:
+                    self._recursively_bump_finalization_state_from_2_to_3(y)
+            self._recursively_bump_finalization_state_from_1_to_2(x)
+
+        while marked.non_empty():
+            x = marked.popleft()
+            state = self._finalization_state(x)
+            ll_assert(state >= 2, "unexpected finalization state < 2")
+            if state == 2:
+                self.run_finalizers.append(x)
+                # we must also fix the state from 2 to 3 here, otherwise
+                # we leave the GCFLAG_FINALIZATION_ORDERING bit behind
+                # which will confuse the next collection
+                self._recursively_bump_finalization_state_from_2_to_3(x)
+            else:
+                new_with_finalizer.append(x)
+
+        self.tmpstack.delete()
+        pending.delete()
+        marked.delete()
+        self.objects_with_finalizers.delete()
+        self.objects_with_finalizers = new_with_finalizer
+
+    def _append_if_nonnull(pointer, stack):
+        stack.append(pointer.address[0])
+    _append_if_nonnull = staticmethod(_append_if_nonnull)
+
+    def _finalization_state(self, obj):
+        tid = self.header(obj).tid
+        if tid & GCFLAG_VISITED:
+            if tid & GCFLAG_FINALIZATION_ORDERING:
+                return 2
+            else:
+                return 3
+        else:
+            if tid & GCFLAG_FINALIZATION_ORDERING:
+                return 1
+            else:
+                return 0
+
+    def _bump_finalization_state_from_0_to_1(self, obj):
+        ll_assert(self._finalization_state(obj) == 0,
+                  "unexpected finalization state != 0")
+        hdr = self.header(obj)
+        hdr.tid |= GCFLAG_FINALIZATION_ORDERING
+
+    def _recursively_bump_finalization_state_from_2_to_3(self, obj):
+        ll_assert(self._finalization_state(obj) == 2,
+                  "unexpected finalization state != 2")
+        pending = self.tmpstack
+        ll_assert(not pending.non_empty(), "tmpstack not empty")
+        pending.append(obj)
+        while pending.non_empty():
+            y = pending.pop()
+            hdr = self.header(y)
+            if hdr.tid & GCFLAG_FINALIZATION_ORDERING:     # state 2 ?
+                hdr.tid &= ~GCFLAG_FINALIZATION_ORDERING   # change to state 3
+                self.trace(y, self._append_if_nonnull, pending)
+
+    def _recursively_bump_finalization_state_from_1_to_2(self, obj):
+        # recursively convert objects from state 1 to state 2.
+        # The call to visit_objects() will add the GCFLAG_VISITED
+        # recursively.
+        self.objects_to_trace.append(obj)
+        self.visit_objects(sys.maxint)
+
+    # --------
+    # Weakrefs
+
+    def invalidate_old_weakrefs(self):
+        # walk over list of objects that contain weakrefs
+        # if the object it references is not marked, invalidate the weakref
+        new_with_weakref = self.AddressStack()
+        while self.old_objects_with_weakrefs.non_empty():
+            obj = self.old_objects_with_weakrefs.pop()
+            if self.header(obj).tid & GCFLAG_VISITED == 0:
+                continue # weakref itself dies
+            offset = self.weakpointer_offset(self.get_type_id(obj))
+            pointing_to = (obj + offset).address[0]
+            if self.header(pointing_to).tid & GCFLAG_VISITED:
+                new_with_weakref.append(obj)
+            else:
+                (obj + offset).address[0] = NULL
+        self.old_objects_with_weakrefs.delete()
+        self.old_objects_with_weakrefs = new_with_weakref
+
+    def enumerate_all_roots(self, callback):
+        self.prebuilt_root_objects.foreach(callback, self)
+        MovingGCBase.enumerate_all_roots(self, callback)
+    enumerate_all_roots._annspecialcase_ = 'specialize:arg(1)'
+
+    # ____________________________________________________________
+    # Debugging
+
+    def debug_check_object(self, obj):
+        """Check the invariants about 'obj' that should be true
+        between collections, when the nursery is empty."""
+        ll_assert(not self.is_in_nursery(obj),
+                  "object in the nursery after a minor collection")
+        tid = self.header(obj).tid
+        ll_assert(tid & GCFLAG_NO_YOUNG_PTRS != 0,
+                  "missing GCFLAG_NO_YOUNG_PTRS after a minor collection")
+        ll_assert(tid & (GCFLAG_FORWARDED | GCFLAG_HAS_SHADOW) == 0,
+                  "GCFLAG_FORWARDED or GCFLAG_HAS_SHADOW on an old object")
+        ll_assert(tid & GCFLAG_FINALIZATION_ORDERING == 0,
+                  "unexpected GCFLAG_FINALIZATION_ORDERING")
+        if tid & GCFLAG_NO_HEAP_PTRS:
+            ll_assert(tid & GCFLAG_VISITED != 0,
+                      "prebuilt object without GCFLAG_VISITED")
+        elif self.gc_state == STATE_SCANNING:
+            ll_assert(tid & GCFLAG_VISITED == 0 or
+                      self._d_prebuilt.contains(obj),
+                      "GCFLAG_VISITED left on an old object")
+
+    def debug_check_consistency(self):
+        if self.DEBUG:
+            self._d_prebuilt = self.prebuilt_root_objects.stack2dict()
+            MovingGCBase.debug_check_consistency(self)
+            self._d_prebuilt.delete()
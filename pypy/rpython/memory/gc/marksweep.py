@@ -386,6 +386,8 @@ class MarkSweepGC(GCBase):
         end_time = time.time()
         compute_time = start_time - self.prev_collect_end_time
         collect_time = end_time - start_time
+        self.stat_major_collections += 1
+        self.stat_record_pause(start_time)
 
         garbage_collected = old_malloced - (curr_heap_size - self.heap_usage)
 
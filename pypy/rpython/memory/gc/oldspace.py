@@ -0,0 +1,413 @@
+"""
+The non-moving space used by the IncrementalMarkSweepGC for its old
+objects.  Small blocks are allocated in pages, which are themselves
+allocated in large arenas.  Each page only contains blocks of one size:
+the size class of a block is its size in words.  Freed blocks are
+chained together inside the page, and are reused first.
+
+Freeing is done by mass_free_prepare() followed by any number of calls
+to mass_free_incremental(), which frees the blocks for which a
+callback returns True.  The pages that are not swept yet are kept in
+separate lists, so that blocks allocated in the meantime always come
+from pages that were already swept (or from fresh pages).
+"""
+
+from pypy.rpython.lltypesystem import lltype, llmemory, llarena, rffi
+from pypy.rlib.rarithmetic import LONG_BIT
+from pypy.rlib.debug import ll_assert
+
+WORD = LONG_BIT // 8
+NULL = llmemory.NULL
+WORD_POWER_2 = {32: 2, 64: 3}[LONG_BIT]
+assert 1 << WORD_POWER_2 == WORD
+
+
+# Terminology: the memory is subdivided into "arenas" containing "pages".
+# A page contains a number of allocated objects, called "blocks".
+
+ARENA_PTR = lltype.Ptr(lltype.ForwardReference())
+ARENA = lltype.Struct('ArenaReference',
+    # -- The address of the arena, as returned by arena_malloc()
+    ('base', llmemory.Address),
+    # -- The number of free and the total number of pages in the arena
+    ('nfreepages', lltype.Signed),
+    ('totalpages', lltype.Signed),
+    # -- A chained list of free pages in the arena.  Each free page
+    #    starts with the address of the next one.
+    ('freepages', llmemory.Address),
+    # -- The next arena in the list of all arenas
+    ('nextarena', ARENA_PTR),
+    # -- The next arena in the list of arenas with free pages
+    ('nextfreearena', ARENA_PTR),
+    )
+ARENA_PTR.TO.become(ARENA)
+ARENA_NULL = lltype.nullptr(ARENA)
+
+PAGE_PTR = lltype.Ptr(lltype.ForwardReference())
+PAGE_HEADER = lltype.Struct('PageHeader',
+    # -- The following pointer makes a chained list of pages.  For non-full
+    #    pages, it is a chained list of pages having the same size class,
+    #    rooted in 'page_for_size[size_class]'.  For full pages, it is a
+    #    different chained list rooted in 'full_page_for_size[size_class]'.
+    ('nextpage', PAGE_PTR),
+    # -- The arena this page is part of.
+    ('arena', ARENA_PTR),
+    # -- The number of free blocks.  The numbers of uninitialized and
+    #    allocated blocks can be deduced from the context if needed.
+    ('nfree', lltype.Signed),
+    # -- The chained list of free blocks.  It ends as a pointer to the
+    #    first uninitialized block (pointing to data that is uninitialized,
+    #    or to the end of the page).
+    ('freeblock', llmemory.Address),
+    )
+PAGE_PTR.TO.become(PAGE_HEADER)
+PAGE_NULL = lltype.nullptr(PAGE_HEADER)
+
+# ____________________________________________________________
+
+
+class OldSpace(object):
+    _alloc_flavor_ = "raw"
+
+    def __init__(self, page_size, arena_size, small_request_threshold):
+        # 'small_request_threshold' is the largest size that we
+        # can ask with self.malloc().
+        self.page_size = page_size
+        self.arena_size = arena_size
+        self.small_request_threshold = small_request_threshold
+        #
+        # 'page_for_size': for each size N, a chained list of pages that
+        # have free space for blocks of size N.  'full_page_for_size'
+        # is the chained list of pages that are completely full.  The
+        # 'old_*' versions hold the pages that were not swept yet
+        # during a mass_free_incremental().
+        length = small_request_threshold // WORD + 1
+        self.page_for_size = self._new_page_ptr_list(length)
+        self.full_page_for_size = self._new_page_ptr_list(length)
+        self.old_page_for_size = self._new_page_ptr_list(length)
+        self.old_full_page_for_size = self._new_page_ptr_list(length)
+        self.nblocks_for_size = lltype.malloc(rffi.CArray(lltype.Signed),
+                                              length, flavor='raw')
+        self.hdrsize = llmemory.raw_malloc_usage(llmemory.sizeof(PAGE_HEADER))
+        assert page_size > self.hdrsize
+        self.nblocks_for_size[0] = 0    # unused
+        i = 1
+        while i < length:     # (no range(): the GC is not set up yet)
+            self.nblocks_for_size[i] = (page_size - self.hdrsize) // (WORD * i)
+            i += 1
+        #
+        self.max_pages_per_arena = arena_size // page_size
+        self.all_arenas = ARENA_NULL
+        self.arenas_with_free_pages = ARENA_NULL
+        #
+        # the sweeping state: the size class that is being swept, or
+        # zero if no sweeping is in progress
+        self.size_class_with_old_pages = 0
+        #
+        self.total_memory_used = 0
+        self.total_memory_alloced = 0
+
+    def _new_page_ptr_list(self, length):
+        return lltype.malloc(rffi.CArray(PAGE_PTR), length,
+                             flavor='raw', zero=True)
+
+    def malloc(self, size):
+        """Allocate a block from a page in an arena.  The caller must
+        arena_reserve() the result.  Raises MemoryError if we run out
+        of memory."""
+        nsize = llmemory.raw_malloc_usage(size)
+        ll_assert(nsize > 0, "malloc: size is null or negative")
+        ll_assert(nsize <= self.small_request_threshold,"malloc: size too big")
+        ll_assert((nsize & (WORD-1)) == 0, "malloc: size is not aligned")
+        self.total_memory_used += nsize
+        #
+        # Get the page to use from the size
+        size_class = nsize >> WORD_POWER_2
+        page = self.page_for_size[size_class]
+        if page == PAGE_NULL:
+            page = self.allocate_new_page(size_class)
+        #
+        # The result is simply 'page.freeblock'
+        result = page.freeblock
+        if page.nfree > 0:
+            #
+            # The 'result' was part of the chained list; read the next.
+            page.nfree -= 1
+            freeblock = result.address[0]
+            llarena.arena_reset(result,
+                                llmemory.sizeof(llmemory.Address),
+                                0)
+            #
+        else:
+            # The 'result' is part of the uninitialized blocks.
+            freeblock = result + nsize
+        #
+        page.freeblock = freeblock
+        #
+        pageaddr = llarena.getfakearenaaddress(llmemory.cast_ptr_to_adr(page))
+        if freeblock - pageaddr > self.page_size - nsize:
+            # This was the last free block, so unlink the page from the
+            # chained list and put it in the 'full_page_for_size' list.
+            self.page_for_size[size_class] = page.nextpage
+            page.nextpage = self.full_page_for_size[size_class]
+            self.full_page_for_size[size_class] = page
+        #
+        return result
+
+    def allocate_new_page(self, size_class):
+        """Allocate and return a new page for the given size_class."""
+        #
+        # Allocate a new arena if needed.
+        arena = self.arenas_with_free_pages
+        if arena == ARENA_NULL:
+            arena = self.allocate_new_arena()
+        #
+        # The result is simply 'arena.freepages'.
+        result = arena.freepages
+        arena.freepages = result.address[0]
+        llarena.arena_reset(result, llmemory.sizeof(llmemory.Address), 0)
+        arena.nfreepages -= 1
+        if arena.nfreepages == 0:
+            # This was the last free page, so unlink the arena from the
+            # chained list of arenas with free pages.
+            self.arenas_with_free_pages = arena.nextfreearena
+            arena.nextfreearena = ARENA_NULL
+        #
+        # Initialize the fields of the resulting page
+        llarena.arena_reserve(result, llmemory.sizeof(PAGE_HEADER))
+        page = llmemory.cast_adr_to_ptr(result, PAGE_PTR)
+        page.arena = arena
+        page.nfree = 0
+        page.freeblock = result + self.hdrsize
+        page.nextpage = PAGE_NULL
+        ll_assert(self.page_for_size[size_class] == PAGE_NULL,
+                  "allocate_new_page() called but a page is already waiting")
+        self.page_for_size[size_class] = page
+        return page
+
+    def allocate_new_arena(self):
+        """Allocate a new arena and chain all its pages as free pages."""
+        arena_base = llarena.arena_malloc(self.arena_size, False)
+        if not arena_base:
+            raise MemoryError("couldn't allocate the next arena")
+        arena = lltype.malloc(ARENA, flavor='raw')
+        arena.base = arena_base
+        arena.totalpages = self.max_pages_per_arena
+        arena.nfreepages = 0
+        arena.freepages = NULL
+        # chain the pages in order, so that the first page is used first
+        i = self.max_pages_per_arena
+        while i > 0:
+            i -= 1
+            self._add_free_page(arena, arena_base + i * self.page_size)
+        arena.nextarena = self.all_arenas
+        self.all_arenas = arena
+        arena.nextfreearena = self.arenas_with_free_pages
+        self.arenas_with_free_pages = arena
+        self.total_memory_alloced += self.arena_size
+        return arena
+
+    def _add_free_page(self, arena, pageaddr):
+        llarena.arena_reserve(pageaddr, llmemory.sizeof(llmemory.Address))
+        pageaddr.address[0] = arena.freepages
+        arena.freepages = pageaddr
+        arena.nfreepages += 1
+
+    def free_page(self, page):
+        """Free a whole page."""
+        arena = page.arena
+        pageaddr = llarena.getfakearenaaddress(llmemory.cast_ptr_to_adr(page))
+        llarena.arena_reset(pageaddr, self.page_size, 0)
+        self._add_free_page(arena, pageaddr)
+        # the arena is put back into 'arenas_with_free_pages' (or freed
+        # completely) by rehash_arena_lists(), at the end of the sweeping
+
+    # ____________________________________________________________
+    # Freeing
+
+    def mass_free_prepare(self):
+        """Prepare calls to mass_free_incremental(): moves the chained
+        lists into the 'old_*' fields.  The blocks allocated from now on
+        come from fresh pages and are never seen by the sweeping."""
+        ll_assert(self.size_class_with_old_pages == 0,
+                  "mass_free_prepare() called twice")
+        self.total_memory_used = 0
+        size_class = self.small_request_threshold >> WORD_POWER_2
+        self.size_class_with_old_pages = size_class
+        while size_class >= 1:
+            self.old_page_for_size[size_class] = (
+                self.page_for_size[size_class])
+            self.old_full_page_for_size[size_class] = (
+                self.full_page_for_size[size_class])
+            self.page_for_size[size_class] = PAGE_NULL
+            self.full_page_for_size[size_class] = PAGE_NULL
+            size_class -= 1
+
+    def mass_free_incremental(self, ok_to_free_func, max_pages):
+        """For each object, if ok_to_free_func(obj) returns True, then free
+        the object.  This only processes up to 'max_pages' pages; it
+        returns True if all pages were processed."""
+        size_class = self.size_class_with_old_pages
+        while size_class >= 1:
+            #
+            # Walk the pages in 'old_page_for_size[size_class]' and
+            # 'old_full_page_for_size[size_class]' and free some objects.
+            # Pages completely freed are added to 'arena.freepages', and
+            # become available for reuse by any size class.  Pages not
+            # completely freed are re-chained either in
+            # 'full_page_for_size[]' or 'page_for_size[]'.
+            max_pages = self.mass_free_in_pages(size_class, ok_to_free_func,
+                                                max_pages)
+            if max_pages <= 0:
+                self.size_class_with_old_pages = size_class
+                return False
+            #
+            size_class -= 1
+        #
+        self.size_class_with_old_pages = 0
+        self.rehash_arena_lists()
+        return True
+
+    def is_sweeping(self):
+        return self.size_class_with_old_pages > 0
+
+    def mass_free_in_pages(self, size_class, ok_to_free_func, max_pages):
+        nblocks = self.nblocks_for_size[size_class]
+        block_size = size_class * WORD
+        remaining_full_pages = self.old_full_page_for_size[size_class]
+        remaining_partial_pages = self.old_page_for_size[size_class]
+        #
+        step = 0
+        while step < 2:
+            if step == 0:
+                page = remaining_full_pages
+            else:
+                page = remaining_partial_pages
+            #
+            while page != PAGE_NULL:
+                if max_pages <= 0:
+                    break
+                #
+                # Collect the page.
+                surviving = self.walk_page(page, block_size, ok_to_free_func)
+                nextpage = page.nextpage
+                #
+                if surviving == nblocks:
+                    # The page is still full.  Re-insert it in the
+                    # 'full_page_for_size' chained list.
+                    ll_assert(page.nfree == 0,
+                              "fully allocated page has nfree != 0")
+                    page.nextpage = self.full_page_for_size[size_class]
+                    self.full_page_for_size[size_class] = page
+                elif surviving > 0:
+                    # There is at least 1 object surviving.  Re-insert
+                    # the page in the chained list.
+                    page.nextpage = self.page_for_size[size_class]
+                    self.page_for_size[size_class] = page
+                else:
+                    # No object survives; free the page.
+                    self.free_page(page)
+                #
+                page = nextpage
+                max_pages -= 1
+            #
+            if step == 0:
+                remaining_full_pages = page
+            else:
+                remaining_partial_pages = page
+            step += 1
+        #
+        self.old_full_page_for_size[size_class] = remaining_full_pages
+        self.old_page_for_size[size_class] = remaining_partial_pages
+        return max_pages
+
+    def walk_page(self, page, block_size, ok_to_free_func):
+        """Walk over all objects in a page, and ask ok_to_free_func()."""
+        #
+        # 'freeblock' is the next free block
+        freeblock = page.freeblock
+        #
+        # 'prevfreeblockat' is the address of where 'freeblock' was read from.
+        prevfreeblockat = lltype.direct_fieldptr(page, 'freeblock')
+        prevfreeblockat = llmemory.cast_ptr_to_adr(prevfreeblockat)
+        #
+        obj = llarena.getfakearenaaddress(llmemory.cast_ptr_to_adr(page))
+        obj += self.hdrsize
+        surviving = 0    # initially
+        skip_free_blocks = page.nfree
+        #
+        while True:
+            #
+            if obj == freeblock:
+                #
+                if skip_free_blocks == 0:
+                    #
+                    # 'obj' points to the first uninitialized block,
+                    # or to the end of the page if there are none.
+                    break
+                #
+                # 'obj' points to a free block.  It means that
+                # 'prevfreeblockat.address[0]' does not need to be updated.
+                # Just read the next free block from 'obj.address[0]'.
+                skip_free_blocks -= 1
+                prevfreeblockat = obj
+                freeblock = obj.address[0]
+                #
+            else:
+                # 'obj' points to a valid object.
+                ll_assert(freeblock > obj,
+                          "freeblocks are linked out of order")
+                #
+                if ok_to_free_func(obj):
+                    #
+                    # The object should die.
+                    llarena.arena_reset(obj, block_size, 0)
+                    llarena.arena_reserve(obj,
+                                          llmemory.sizeof(llmemory.Address))
+                    # Insert 'obj' in the linked list of free blocks.
+                    prevfreeblockat.address[0] = obj
+                    prevfreeblockat = obj
+                    obj.address[0] = freeblock
+                    #
+                    # Update the number of free objects in the page.
+                    page.nfree += 1
+                    #
+                else:
+                    # The object survives.
+                    surviving += 1
+            #
+            obj += block_size
+        #
+        # Update the global total size of objects.
+        self.total_memory_used += surviving * block_size
+        #
+        # Return the number of surviving objects.
+        return surviving
+
+    def rehash_arena_lists(self):
+        """Called at the end of the sweeping: release the arenas that
+        became completely empty, and rebuild the list of arenas that
+        have free pages."""
+        arena = self.all_arenas
+        self.all_arenas = ARENA_NULL
+        self.arenas_with_free_pages = ARENA_NULL
+        while arena != ARENA_NULL:
+            nextarena = arena.nextarena
+            if arena.nfreepages == arena.totalpages:
+                #
+                # The whole arena is empty.  Free it.
+                llarena.arena_reset(arena.base, self.arena_size, 0)
+                llarena.arena_free(arena.base)
+                lltype.free(arena, flavor='raw')
+                self.total_memory_alloced -= self.arena_size
+                #
+            else:
+                arena.nextarena = self.all_arenas
+                self.all_arenas = arena
+                if arena.nfreepages > 0:
+                    arena.nextfreearena = self.arenas_with_free_pages
+                    self.arenas_with_free_pages = arena
+                else:
+                    arena.nextfreearena = ARENA_NULL
+            arena = nextarena
+
@@ -13,7 +13,7 @@ from pypy.rlib.rarithmetic import ovfcheck, LONG_BIT
 from pypy.rpython.memory.gc.base import MovingGCBase, ARRAY_TYPEID_MAP,\
      TYPEID_MAP
 
-import sys, os
+import sys, os, time
 
 first_gcflag = 1 << (LONG_BIT//2)
 GCFLAG_FORWARDED = first_gcflag
@@ -245,7 +245,7 @@ class SemiSpaceGC(MovingGCBase):
         start_usage = self.free - self.tospace
         debug_print("| used before collection:          ",
                     start_usage, "bytes")
-        #start_time = time.time()
+        start_time = time.time()
         #llop.debug_print(lltype.Void, 'semispace_collect', int(size_changing))
 
         # Switch the spaces.  We copy everything over to the empty space
@@ -273,6 +273,9 @@ class SemiSpaceGC(MovingGCBase):
         if not size_changing:
             llarena.arena_reset(fromspace, self.space_size, True)
             self.record_red_zone()
+        self.stat_major_collections += 1
+        self.stat_record_pause(start_time)
+        if not size_changing:
             self.execute_finalizers()
         #llop.debug_print(lltype.Void, 'collected', self.space_size, size_changing, self.top_of_space - self.free)
         if have_debug_prints():
@@ -9,7 +9,9 @@ see as the list of roots (stack and prebuilt objects).
 import py
 from pypy.rpython.lltypesystem import lltype, llmemory
 from pypy.rpython.memory.gctypelayout import TypeLayoutBuilder
-from pypy.rlib.rarithmetic import LONG_BIT
+from pypy.rpython.memory.gc.base import PAUSE_HISTOGRAM_SIZE
+from pypy.rpython.memory.gc.base import pause_histogram_bucket
+from pypy.rlib.rarithmetic import LONG_BIT, r_uint
 
 WORD = LONG_BIT // 8
 
@@ -60,6 +62,16 @@ class DirectRootWalker(object):
         pass
 
 
+def test_pause_histogram_bucket():
+    assert pause_histogram_bucket(0.0) == 0
+    assert pause_histogram_bucket(-1.0) == 0
+    assert pause_histogram_bucket(0.0000009) == 0
+    assert pause_histogram_bucket(0.000001) == 1
+    assert pause_histogram_bucket(0.000003) == 2
+    assert pause_histogram_bucket(0.001) == 10      # 1000 microseconds
+    assert pause_histogram_bucket(1e9) == PAUSE_HISTOGRAM_SIZE - 1
+
+
 class DirectGCTest(object):
     GC_PARAMS = {}
 
@@ -92,7 +104,10 @@ class DirectGCTest(object):
         if self.gc.needs_write_barrier:
             newaddr = llmemory.cast_ptr_to_adr(newvalue)
             addr_struct = llmemory.cast_ptr_to_adr(p)
-            self.gc.write_barrier(newaddr, addr_struct)
+            if getattr(self.gc, 'card_page_indices', 0) > 0:
+                self.gc.write_barrier_from_array(newaddr, addr_struct, index)
+            else:
+                self.gc.write_barrier(newaddr, addr_struct)
         p[index] = newvalue
 
     def malloc(self, TYPE, n=None):
@@ -312,6 +327,85 @@ class DirectGCTest(object):
         assert isinstance(hash, (int, long))
         assert hash == self.gc.identityhash(p_const)
 
+    def test_get_stats(self):
+        stats = self.gc.get_stats()
+        major_collections = stats.major_collections
+        self.gc.collect()
+        self.gc.collect()
+        stats = self.gc.get_stats()
+        assert stats.major_collections == major_collections + 2
+        assert stats.total_pause_time >= stats.max_pause_time >= 0.0
+        assert stats.minor_collections >= 0
+        assert stats.bytes_promoted >= 0
+        # every collection, or step of one, is counted in the histogram
+        pauses = 0
+        for i in range(PAUSE_HISTOGRAM_SIZE):
+            pauses += stats.pause_histogram[i]
+        assert pauses >= stats.major_collections
+
+    def test_get_rpy_roots_and_referents(self):
+        p = self.malloc(S)
+        p.x = 42
+        self.stackroots.append(p)
+        q = self.malloc(S)
+        q.x = 43
+        self.write(self.stackroots[0], 'next', q)
+        roots = self.gc.get_rpy_roots()
+        p = self.stackroots[0]
+        gcref = lltype.cast_opaque_ptr(llmemory.GCREF, p)
+        assert gcref in list(roots)
+        referents = self.gc.get_rpy_referents(gcref)
+        assert len(referents) == 1
+        q = lltype.cast_opaque_ptr(lltype.Ptr(S), referents[0])
+        assert q.x == 43
+        #
+        size = self.gc.get_rpy_memory_usage(gcref)
+        assert size >= llmemory.raw_malloc_usage(llmemory.sizeof(S))
+        index = self.gc.get_rpy_type_index(gcref)
+        assert index == self.gc.get_member_index(self.get_type_id(S))
+
+    def test_dump_rpy_heap(self):
+        import os, array
+        p = self.malloc(S)
+        self.stackroots.append(p)
+        for i in range(2):
+            self.write(self.stackroots[0], 'next', self.malloc(S))
+            self.write(self.stackroots[0].next, 'prev', self.stackroots[0])
+        filename = str(py.test.ensuretemp('dump_rpy_heap').join('dump'))
+        fd = os.open(filename, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0666)
+        try:
+            ok = self.gc.dump_rpy_heap(fd)
+        finally:
+            os.close(fd)
+        assert ok
+        data = array.array('l')
+        data.fromstring(open(filename, 'rb').read())
+        data = list(data)
+        # the pseudo-object listing the roots comes first
+        assert data[:3] == [0, -1, 0]
+        end = data.index(-1, 3)
+        roots = data[3:end]
+        assert len(roots) >= 1
+        records = {}
+        i = end + 1
+        while i < len(data):
+            end = data.index(-1, i + 3)
+            records[data[i]] = (data[i+1], data[i+2], data[i+3:end])
+            i = end + 1
+        # p and the two objects it pointed to are reachable from the roots
+        indexS = self.gc.get_member_index(self.get_type_id(S))
+        p = self.stackroots[0]
+        p_addr = llmemory.cast_adr_to_int(llmemory.cast_ptr_to_adr(p))
+        q_addr = llmemory.cast_adr_to_int(llmemory.cast_ptr_to_adr(p.next))
+        assert p_addr in roots
+        typeindex, size, referents = records[p_addr]
+        assert typeindex == indexS
+        assert size > 0
+        assert referents == [q_addr]
+        assert records[q_addr][2] == [p_addr]
+        for addr in roots:
+            assert addr in records
+
 
 class TestSemiSpaceGC(DirectGCTest):
     from pypy.rpython.memory.gc.semispace import SemiSpaceGC as GCClass
@@ -427,7 +521,185 @@ class TestHybridGC(TestGenerationGC):
     def test_identityhash(self):
         py.test.skip("does not support raw_mallocs(sizeof(S)+sizeof(hash))")
 
+    def test_card_marking(self):
+        from pypy.rpython.memory.gc.generation import GCFLAG_NO_YOUNG_PTRS
+        from pypy.rpython.memory.gc.generation import GCFLAG_HAS_CARDS
+        from pypy.rpython.memory.gc.generation import GCFLAG_CARDS_SET
+        from pypy.rpython.memory.gc.generation import card_bit
+        gc = self.gc
+        assert gc.card_page_indices == 4
+        # a large array of GC pointers is allocated outside the nursery
+        a = self.malloc(VAR, 50)
+        self.stackroots.append(a)
+        hdr = gc.header(llmemory.cast_ptr_to_adr(a))
+        assert hdr.tid & GCFLAG_HAS_CARDS
+        assert hdr.tid & GCFLAG_NO_YOUNG_PTRS
+        p = self.malloc(S)
+        p.x = 42
+        a = self.stackroots[0]
+        assert gc.is_in_nursery(llmemory.cast_ptr_to_adr(p))
+        for i in [3, 17, 18, 49]:
+            self.writearray(a, i, p)
+        # only the cards were set, the array keeps GCFLAG_NO_YOUNG_PTRS
+        a = self.stackroots[0]
+        assert hdr.tid & GCFLAG_NO_YOUNG_PTRS
+        assert hdr.tid & GCFLAG_CARDS_SET
+        assert not gc.old_objects_pointing_to_young.non_empty()
+        addr = llmemory.cast_ptr_to_adr(a)
+        assert r_uint(gc.get_card_word(addr, 0).signed[0]) == (
+            card_bit(0) | card_bit(4) | card_bit(12))
+        #
+        traced = []
+        old_trace_partial = gc.trace_partial
+        def trace_partial(obj, start, stop, callback, arg):
+            traced.append((start, stop))
+            return old_trace_partial(obj, start, stop, callback, arg)
+        gc.trace_partial = trace_partial
+        gc.collect(0)
+        assert sorted(traced) == [(0, 4), (16, 20), (48, 50)]
+        a = self.stackroots[0]
+        for i in [3, 17, 18, 49]:
+            assert a[i].x == 42
+            assert not gc.is_in_nursery(llmemory.cast_ptr_to_adr(a[i]))
+        assert not hdr.tid & GCFLAG_CARDS_SET
+        assert gc.get_card_word(addr, 0).signed[0] == 0
+        #
+        # cards are also reset by full collections
+        p = self.malloc(S)
+        a = self.stackroots[0]
+        self.writearray(a, 10, p)
+        assert r_uint(gc.get_card_word(addr, 0).signed[0]) == card_bit(2)
+        self.gc.collect()
+        a = self.stackroots[0]
+        assert gc.get_card_word(addr, 0).signed[0] == 0
+        assert not gc.old_objects_with_cards_set.non_empty()
+        # and the objects with cards are freed correctly
+        self.stackroots.pop()
+        self.gc.collect()
+
+    def test_card_marking_write_barrier_fast_path(self):
+        # once the card of an index is set, the following stores in the
+        # same card don't call remember_young_pointer_from_array() again
+        gc = self.gc
+        calls = []
+        old_remember = gc.remember_young_pointer_from_array
+        def remember_young_pointer_from_array(addr_array, addr, index):
+            calls.append(index)
+            old_remember(addr_array, addr, index)
+        gc.remember_young_pointer_from_array = (
+            remember_young_pointer_from_array)
+        a = self.malloc(VAR, 50)
+        self.stackroots.append(a)
+        p = self.malloc(S)
+        p.x = 42
+        a = self.stackroots[0]
+        for i in range(50):
+            self.writearray(a, i, p)
+        # one call per card
+        assert calls == range(0, 50, 4)
+        del calls[:]
+        for i in range(50):
+            self.writearray(a, 49 - i, p)
+        assert calls == []
+        # after a minor collection, the cards are clear again
+        gc.collect(0)
+        a = self.stackroots[0]
+        p = self.malloc(S)
+        a = self.stackroots[0]
+        self.writearray(a, 5, p)
+        self.writearray(a, 6, p)
+        assert calls == [5]
+        gc.collect(0)
+        a = self.stackroots[0]
+        assert a[5].x == 0 and a[6].x == 0 and a[7].x == 42
+        assert not gc.is_in_nursery(llmemory.cast_ptr_to_adr(a[5]))
+
 
 class TestMarkCompactGC(DirectGCTest):
     from pypy.rpython.memory.gc.markcompact import MarkCompactGC as GCClass
 
+
+
+class TestIncrementalMarkSweepGC(TestGenerationGC):
+    from pypy.rpython.memory.gc.incmarksweep import IncrementalMarkSweepGC \
+         as GCClass
+
+    GC_PARAMS = {'nursery_size': 32*WORD,
+                 'page_size': 16*WORD,
+                 'arena_size': 64*WORD,
+                 'small_request_threshold': 5*WORD,
+                 'min_heap_size': 64*WORD,
+                 }
+
+    def test_collect_gen(self):
+        gc = self.gc
+        old_minor_collection = gc.minor_collection
+        old_major_collection_step = gc.major_collection_step
+        calls = []
+        def minor_collection():
+            calls.append('minor_collection')
+            return old_minor_collection()
+        def major_collection_step(budget):
+            calls.append('major_collection_step')
+            return old_major_collection_step(budget)
+        gc.minor_collection = minor_collection
+        gc.major_collection_step = major_collection_step
+
+        gc.collect(0)
+        assert calls == ['minor_collection']
+        del calls[:]
+
+        gc.collect()
+        assert calls[0] == 'minor_collection'
+        assert calls.count('major_collection_step') >= 2
+        assert 'minor_collection' not in calls[1:]
+        assert gc.gc_state == 0     # STATE_SCANNING
+
+    def test_incremental_major_collection(self):
+        from pypy.rpython.memory.gc import incmarksweep
+        gc = self.gc
+        # a long linked list attached to a stack root
+        head = self.malloc(S)
+        self.stackroots.append(head)
+        for i in range(30):
+            p = self.malloc(S)
+            p.x = i
+            self.write(p, 'next', self.stackroots[0].next)
+            self.write(self.stackroots[0], 'next', p)
+        states = {}
+        for i in range(2000):
+            states[gc.gc_state] = True
+            garbage = self.malloc(S)
+            if i % 7 == 0:
+                # move the end of the list to a new object, while the
+                # major collection may be in progress
+                p = self.stackroots[0]
+                while p.next.next:
+                    p = p.next
+                self.stackroots.append(p)
+                x = p.next.x
+                new = self.malloc(S)
+                new.x = x
+                self.write(self.stackroots.pop(), 'next', new)
+        assert incmarksweep.STATE_MARKING in states
+        assert incmarksweep.STATE_SWEEPING in states
+        p = self.stackroots[0].next
+        expected = range(30)
+        expected.reverse()
+        for x in expected:
+            assert p.x == x
+            p = p.next
+        assert not p
+        self.gc.collect()
+        assert self.stackroots[0].next.x == 29
+
+    def test_malloc_nonmovable(self):
+        addr = self.gc.malloc_nonmovable(self.get_type_id(VAR), 100, True)
+        p = llmemory.cast_adr_to_ptr(addr, lltype.Ptr(VAR))
+        assert not self.gc.can_move(addr)
+        self.stackroots.append(p)
+        self.writearray(p, 99, self.malloc(S))
+        p[99].x = 42
+        self.gc.collect()
+        assert self.stackroots[0][99].x == 42
+        assert llmemory.cast_ptr_to_adr(self.stackroots[0]) == addr
@@ -305,6 +305,27 @@ class FrameworkGCTransformer(GCTransformer):
                 [s_gc, annmodel.SomeInteger(knowntype=llgroup.r_halfword)],
                 annmodel.SomeInteger())
 
+        # heap inspection and statistics
+        from pypy.rpython.memory.gc.base import GC_STATS, ARRAY_OF_GCREF
+        s_gcref = annmodel.SomePtr(llmemory.GCREF)
+        self.get_stats_ptr = getfn(GCClass.get_stats.im_func,
+                [s_gc], annmodel.SomePtr(lltype.Ptr(GC_STATS)),
+                minimal_transform=False)
+        self.get_rpy_roots_ptr = getfn(GCClass.get_rpy_roots.im_func,
+                [s_gc], annmodel.SomePtr(lltype.Ptr(ARRAY_OF_GCREF)),
+                minimal_transform=False)
+        self.get_rpy_referents_ptr = getfn(GCClass.get_rpy_referents.im_func,
+                [s_gc, s_gcref], annmodel.SomePtr(lltype.Ptr(ARRAY_OF_GCREF)),
+                minimal_transform=False)
+        self.get_rpy_memory_usage_ptr = getfn(
+                GCClass.get_rpy_memory_usage.im_func,
+                [s_gc, s_gcref], annmodel.SomeInteger())
+        self.get_rpy_type_index_ptr = getfn(
+                GCClass.get_rpy_type_index.im_func,
+                [s_gc, s_gcref], annmodel.SomeInteger())
+        self.dump_rpy_heap_ptr = getfn(GCClass.dump_rpy_heap.im_func,
+                [s_gc, annmodel.SomeInteger()], annmodel.s_Bool)
+
         if hasattr(GCClass, 'writebarrier_before_copy'):
             self.wb_before_copy_ptr = \
                     getfn(GCClass.writebarrier_before_copy.im_func,
@@ -410,6 +431,31 @@ class FrameworkGCTransformer(GCTransformer):
                                                annmodel.s_None)
         else:
             self.write_barrier_ptr = None
+        if (GCClass.needs_write_barrier and
+                getattr(gcdata.gc, 'card_page_indices', 0) > 0):
+            # the GC uses card marking for large arrays: the stores into
+            # arrays call a variant of the write barrier that also gets
+            # the index
+            self.write_barrier_from_array_ptr = getfn(
+                GCClass.write_barrier_from_array.im_func,
+                [s_gc,
+                 annmodel.SomeAddress(),
+                 annmodel.SomeAddress(),
+                 annmodel.SomeInteger()],
+                annmodel.s_None,
+                inline=True)
+            func = getattr(gcdata.gc, 'remember_young_pointer_from_array',
+                           None)
+            if func is not None:
+                # func should not be a bound method, but a real function
+                assert isinstance(func, types.FunctionType)
+                self.write_barrier_from_array_failing_case_ptr = getfn(func,
+                                               [annmodel.SomeAddress(),
+                                                annmodel.SomeAddress(),
+                                                annmodel.SomeInteger()],
+                                               annmodel.s_None)
+        else:
+            self.write_barrier_from_array_ptr = None
         self.statistics_ptr = getfn(GCClass.statistics.im_func,
                                     [s_gc, annmodel.SomeInteger()],
                                     annmodel.SomeInteger())
@@ -558,9 +604,14 @@ class FrameworkGCTransformer(GCTransformer):
                                 % func.__name__)
             
         if self.write_barrier_ptr:
-            self.clean_sets = (
-                find_clean_setarrayitems(self.collect_analyzer, graph).union(
-                find_initializing_stores(self.collect_analyzer, graph)))
+            self.clean_sets = find_initializing_stores(self.collect_analyzer,
+                                                       graph)
+            if self.write_barrier_from_array_ptr is None:
+                # Not valid with card marking: moving an item from one
+                # index to another of the same array would need the
+                # card of the new index to be set too.
+                self.clean_sets = self.clean_sets.union(
+                    find_clean_setarrayitems(self.collect_analyzer, graph))
         super(FrameworkGCTransformer, self).transform_graph(graph)
         if self.write_barrier_ptr:
             self.clean_sets = None
@@ -684,6 +735,50 @@ class FrameworkGCTransformer(GCTransformer):
                   resultvar=op.result)
         self.pop_roots(hop, livevars)
 
+    def gct_gc_get_stats(self, hop):
+        op = hop.spaceop
+        livevars = self.push_roots(hop)
+        hop.genop("direct_call", [self.get_stats_ptr, self.c_const_gc],
+                  resultvar=op.result)
+        self.pop_roots(hop, livevars)
+
+    def gct_gc_get_rpy_roots(self, hop):
+        op = hop.spaceop
+        livevars = self.push_roots(hop)
+        hop.genop("direct_call", [self.get_rpy_roots_ptr, self.c_const_gc],
+                  resultvar=op.result)
+        self.pop_roots(hop, livevars)
+
+    def gct_gc_get_rpy_referents(self, hop):
+        op = hop.spaceop
+        livevars = self.push_roots(hop)
+        hop.genop("direct_call",
+                  [self.get_rpy_referents_ptr, self.c_const_gc, op.args[0]],
+                  resultvar=op.result)
+        self.pop_roots(hop, livevars)
+
+    def gct_gc_get_rpy_memory_usage(self, hop):
+        op = hop.spaceop
+        hop.genop("direct_call",
+                  [self.get_rpy_memory_usage_ptr, self.c_const_gc, op.args[0]],
+                  resultvar=op.result)
+
+    def gct_gc_get_rpy_type_index(self, hop):
+        op = hop.spaceop
+        hop.genop("direct_call",
+                  [self.get_rpy_type_index_ptr, self.c_const_gc, op.args[0]],
+                  resultvar=op.result)
+
+    def gct_gc_dump_rpy_heap(self, hop):
+        # push the roots so that the live variables of the caller are
+        # part of the dump, even though no collection can occur
+        op = hop.spaceop
+        livevars = self.push_roots(hop)
+        hop.genop("direct_call",
+                  [self.dump_rpy_heap_ptr, self.c_const_gc, op.args[0]],
+                  resultvar=op.result)
+        self.pop_roots(hop, livevars)
+
     def gct_get_member_index(self, hop):
         op = hop.spaceop
         v_typeid = op.args[0]
@@ -766,6 +861,12 @@ class FrameworkGCTransformer(GCTransformer):
                   [self.write_barrier_failing_case_ptr],
                   resultvar=op.result)
 
+    def gct_get_write_barrier_from_array_failing_case(self, hop):
+        op = hop.spaceop
+        hop.genop("same_as",
+                  [self.write_barrier_from_array_failing_case_ptr],
+                  resultvar=op.result)
+
     def gct_zero_gc_pointers_inside(self, hop):
         if not self.malloc_zero_filled:
             v_ob = hop.spaceop.args[0]
@@ -915,10 +1016,20 @@ class FrameworkGCTransformer(GCTransformer):
                                    resulttype = llmemory.Address)
             v_structaddr = hop.genop("cast_ptr_to_adr", [v_struct],
                                      resulttype = llmemory.Address)
-            hop.genop("direct_call", [self.write_barrier_ptr,
-                                      self.c_const_gc,
-                                      v_newvalue,
-                                      v_structaddr])
+            if (self.write_barrier_from_array_ptr is not None and
+                    opname == 'setarrayitem'):
+                v_index = hop.spaceop.args[1]
+                assert v_index.concretetype == lltype.Signed
+                hop.genop("direct_call", [self.write_barrier_from_array_ptr,
+                                          self.c_const_gc,
+                                          v_newvalue,
+                                          v_structaddr,
+                                          v_index])
+            else:
+                hop.genop("direct_call", [self.write_barrier_ptr,
+                                          self.c_const_gc,
+                                          v_newvalue,
+                                          v_structaddr])
         hop.rename('bare_' + opname)
 
     def transform_getfield_typeptr(self, hop):
@@ -404,6 +404,27 @@ class BaseGCTransformer(object):
         return hop.cast_result(rmodel.inputconst(lltype.Ptr(ARRAY_TYPEID_MAP),
                                         lltype.nullptr(ARRAY_TYPEID_MAP)))
 
+    # the heap inspection operations are only supported by the framework
+    # GCs: the others return NULL or -1
+
+    def gct_gc_get_stats(self, hop):
+        from pypy.rpython.memory.gc.base import GC_STATS
+        return hop.cast_result(rmodel.inputconst(lltype.Ptr(GC_STATS),
+                                                 lltype.nullptr(GC_STATS)))
+
+    def gct_gc_get_rpy_roots(self, hop):
+        from pypy.rpython.memory.gc.base import ARRAY_OF_GCREF
+        return hop.cast_result(rmodel.inputconst(lltype.Ptr(ARRAY_OF_GCREF),
+                                                 lltype.nullptr(ARRAY_OF_GCREF)))
+    gct_gc_get_rpy_referents = gct_gc_get_rpy_roots
+
+    def gct_gc_get_rpy_memory_usage(self, hop):
+        return hop.cast_result(rmodel.inputconst(lltype.Signed, -1))
+    gct_gc_get_rpy_type_index = gct_gc_get_rpy_memory_usage
+
+    def gct_gc_dump_rpy_heap(self, hop):
+        return hop.cast_result(rmodel.inputconst(lltype.Bool, False))
+
 class MinimalGCTransformer(BaseGCTransformer):
     def __init__(self, parenttransformer):
         BaseGCTransformer.__init__(self, parenttransformer.translator)
@@ -762,3 +762,8 @@ class TestHybridGCSmallHeap(GCTest):
 
     def test_malloc_nonmovable_fixsize(self):
         py.test.skip("Not supported")
+
+class TestIncrementalMarkSweepGC(TestGenerationalGC):
+    from pypy.rpython.memory.gc.incmarksweep import IncrementalMarkSweepGC \
+         as GCClass
+    GC_CANNOT_MALLOC_NONMOVABLE = False
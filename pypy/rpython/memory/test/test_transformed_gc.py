@@ -6,6 +6,7 @@ from pypy.annotation import model as annmodel
 from pypy.annotation import policy as annpolicy
 from pypy.rpython.lltypesystem import lltype, llmemory, llarena, rffi, llgroup
 from pypy.rpython.memory.gctransform import framework
+from pypy.rpython.memory.gc.base import PAUSE_HISTOGRAM_SIZE
 from pypy.rpython.lltypesystem.lloperation import llop, void
 from pypy.rpython.memory.gc.marksweep import X_CLONE, X_POOL, X_POOL_PTR
 from pypy.rlib.objectmodel import compute_unique_id, we_are_translated
@@ -678,6 +679,83 @@ class GenericGCTests(GCTest):
         res = fn([])
         assert res == ord('y')
 
+    def define_get_stats(cls):
+        def f():
+            n = rgc.get_stats().major_collections
+            llop.gc__collect(lltype.Void)
+            stats = rgc.get_stats()
+            pauses = 0
+            for i in range(PAUSE_HISTOGRAM_SIZE):
+                pauses += stats.pause_histogram[i]
+            return ((stats.major_collections - n) * 100 +
+                    (stats.total_pause_time >= stats.max_pause_time >= 0.0)
+                    * 10 + (pauses >= 1))
+        return f
+
+    def test_get_stats(self):
+        run = self.runner("get_stats")
+        res = run([])
+        assert res == 111
+
+    def define_get_rpy_roots_and_referents(cls):
+        S = lltype.GcForwardReference()
+        S.become(lltype.GcStruct('S', ('x', lltype.Signed),
+                                      ('next', lltype.Ptr(S))))
+        def f():
+            s = lltype.malloc(S)
+            s.x = 42
+            s.next = lltype.malloc(S)
+            s.next.x = 43
+            llop.gc__collect(lltype.Void)
+            roots = rgc.get_rpy_roots()
+            gcref = lltype.cast_opaque_ptr(llmemory.GCREF, s)
+            found = 0
+            for i in range(len(roots)):
+                if roots[i] == gcref:
+                    found = 1
+            referents = rgc.get_rpy_referents(gcref)
+            t = lltype.cast_opaque_ptr(lltype.Ptr(S), referents[0])
+            size = rgc.get_rpy_memory_usage(gcref)
+            index = rgc.get_rpy_type_index(gcref)
+            return (found * 1000 + len(referents) * 100 + (t.x - 40) * 10 +
+                    (size > 0) + (index >= 0) * 10000)
+        return f
+
+    def test_get_rpy_roots_and_referents(self):
+        run = self.runner("get_rpy_roots_and_referents")
+        res = run([])
+        assert res == 11131
+
+    def define_dump_rpy_heap(cls):
+        S = lltype.GcForwardReference()
+        S.become(lltype.GcStruct('S', ('x', lltype.Signed),
+                                      ('next', lltype.Ptr(S))))
+        def f(fd, unused):
+            s = lltype.malloc(S)
+            s.next = lltype.malloc(S)
+            s.next.next = s
+            ok = rgc.dump_rpy_heap(fd)
+            keepalive_until_here(s)
+            return int(ok)
+        return f
+
+    def test_dump_rpy_heap(self):
+        import os, array
+        run = self.runner("dump_rpy_heap")
+        filename = str(py.test.ensuretemp('dump_rpy_heap').join(
+            self.__class__.__name__))
+        fd = os.open(filename, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0666)
+        try:
+            res = run([fd, 0])
+        finally:
+            os.close(fd)
+        assert res == 1
+        data = array.array('l')
+        data.fromstring(open(filename, 'rb').read())
+        assert list(data[:3]) == [0, -1, 0]
+        assert data[-1] == -1
+        assert data.count(-1) >= 4    # the roots and at least 3 objects
+
 class GenericMovingGCTests(GenericGCTests):
     GC_CAN_MOVE = True
     GC_CANNOT_MALLOC_NONMOVABLE = True
@@ -1330,6 +1408,21 @@ class TestGenerationGC(GenericMovingGCTests):
         run = self.runner("adr_of_nursery")
         res = run([])        
 
+class TestIncrementalMarkSweepGC(TestGenerationGC):
+    gcname = "incmarksweep"
+    GC_CANNOT_MALLOC_NONMOVABLE = False
+
+    class gcpolicy(gc.FrameworkGcPolicy):
+        class transformerclass(framework.FrameworkGCTransformer):
+            from pypy.rpython.memory.gc.incmarksweep import \
+                 IncrementalMarkSweepGC as GCClass
+            GC_PARAMS = {'nursery_size': 32*WORD,
+                         'page_size': 16*WORD,
+                         'arena_size': 64*WORD,
+                         'small_request_threshold': 5*WORD,
+                         'min_heap_size': 256*WORD}
+            root_stack_depth = 200
+
 class TestGenerationalNoFullCollectGC(GCTest):
     # test that nursery is doing its job and that no full collection
     # is needed when most allocated objects die quickly
@@ -1413,6 +1506,34 @@ class TestHybridGC(TestGenerationGC):
         res = run([100, 100])
         assert res == 200
 
+    def define_card_marking(cls):
+        S = lltype.GcStruct('S', ('x', lltype.Signed))
+        A = lltype.GcArray(lltype.Ptr(S))
+        def f(n, m):
+            # 'a' is large enough to be allocated with card marking;
+            # the items are young objects written over many minor
+            # collections
+            a = lltype.malloc(A, n)
+            i = 0
+            while i < m:
+                s = lltype.malloc(S)
+                s.x = i
+                a[(i * 7) % n] = s
+                i += 1
+            total = 0
+            i = 0
+            while i < n:
+                if a[i]:
+                    total += a[i].x
+                i += 1
+            return total
+        return f
+
+    def test_card_marking(self):
+        run = self.runner("card_marking")
+        res = run([100, 100])
+        assert res == sum(range(100))
+
     def define_assume_young_pointers(cls):
         from pypy.rlib import rgc
         S = lltype.GcForwardReference()
@@ -24,12 +24,12 @@ class __extend__(annmodel.SomeDict):
                                           rtyper.getrepr(dictkey.s_rdict_hashfn))
             else:
                 custom_eq_hash = None
-            return rtyper.type_system.rdict.DictRepr(rtyper,
-                                                     lambda: rtyper.getrepr(s_key),
-                                                     lambda: rtyper.getrepr(s_value),
-                                                     dictkey,
-                                                     dictvalue,
-                                                     custom_eq_hash)
+            return ll_dict_module(rtyper).DictRepr(rtyper,
+                                                lambda: rtyper.getrepr(s_key),
+                                                lambda: rtyper.getrepr(s_value),
+                                                dictkey,
+                                                dictvalue,
+                                                custom_eq_hash)
 
     def rtyper_makekey(self):
         self.dictdef.dictkey  .dont_change_any_more = True
@@ -37,6 +37,17 @@ class __extend__(annmodel.SomeDict):
         return (self.__class__, self.dictdef.dictkey, self.dictdef.dictvalue)
 
 
+def ll_dict_module(rtyper):
+    """Return the module that implements the dicts of this rtyper: the
+    compact ones of rordereddict if the translation.compactdicts option
+    is set, otherwise the usual ones of the type system."""
+    if rtyper.type_system.name == 'lltypesystem':
+        config = rtyper.annotator.translator.config
+        if config.translation.compactdicts:
+            from pypy.rpython.lltypesystem import rordereddict
+            return rordereddict
+    return rtyper.type_system.rdict
+
 
 class AbstractDictRepr(rmodel.Repr):
 
@@ -65,7 +76,7 @@ def rtype_newdict(hop):
         cdict = hop.inputconst(robject.pyobj_repr, dict)
         return hop.genop('simple_call', [cdict], resulttype = robject.pyobj_repr)
     cDICT = hop.inputconst(lltype.Void, r_dict.DICT)
-    v_result = hop.gendirectcall(hop.rtyper.type_system.rdict.ll_newdict, cDICT)
+    v_result = hop.gendirectcall(ll_dict_module(hop.rtyper).ll_newdict, cDICT)
     return v_result
 
 
@@ -0,0 +1,113 @@
+from pypy.rpython.lltypesystem import rordereddict
+from pypy.rpython import rint
+from pypy.rpython.test import test_rdict
+from pypy.rpython.test.tool import LLRtypeMixin
+
+
+class TestLLtypeOrdered(test_rdict.BaseTestRdict, LLRtypeMixin):
+
+    def interpret(self, fn, args, **kwds):
+        kwds.setdefault('compactdicts', True)
+        return test_rdict.BaseTestRdict.interpret(self, fn, args, **kwds)
+
+    def test_uses_compact_dict(self):
+        def func(i):
+            d = {i: i}
+            return d
+        res = self.interpret(func, [5])
+        assert hasattr(res, 'indexes')
+        assert res.lookup_function_no == rordereddict.FUNC_BYTE
+
+    def test_insertion_order(self):
+        def func(n):
+            d = {}
+            for i in range(n):
+                d[(i * 7) % n] = i
+            del d[3]
+            del d[0]
+            d[0] = 42
+            d[6] = 43      # already present: keeps its position
+            return d.keys()
+        res = self.interpret(func, [11])
+        keys = [(i * 7) % 11 for i in range(11)]
+        keys.remove(3)
+        keys.remove(0)
+        keys.append(0)
+        assert self.ll_to_list(res) == keys
+
+    def test_iteration_order_after_resize(self):
+        def func(n):
+            d = {}
+            for i in range(n):
+                d[n - i] = i
+            for i in range(0, n, 2):
+                del d[n - i]
+            return [value for key, value in d.iteritems()]
+        res = self.interpret(func, [500])
+        assert self.ll_to_list(res) == range(1, 500, 2)
+
+    def test_large_dict_uses_bigger_indexes(self):
+        def func(n):
+            d = {}
+            for i in range(n):
+                d[i] = i
+            return d
+        res = self.interpret(func, [300])
+        assert res.lookup_function_no == rordereddict.FUNC_SHORT
+        assert res.num_live_items == 300
+
+
+class TestStress:
+
+    def test_stress(self):
+        from pypy.annotation.dictdef import DictKey, DictValue
+        from pypy.annotation import model as annmodel
+        dictrepr = rordereddict.DictRepr(None, rint.signed_repr,
+                                         rint.signed_repr,
+                                         DictKey(None, annmodel.SomeInteger()),
+                                         DictValue(None, annmodel.SomeInteger()))
+        dictrepr.setup()
+        l_dict = rordereddict.ll_newdict(dictrepr.DICT)
+        referencetable = [None] * 400
+        referenceorder = []
+        value = 0
+
+        def complete_check():
+            for n, refvalue in zip(range(len(referencetable)), referencetable):
+                try:
+                    gotvalue = rordereddict.ll_dict_getitem(l_dict, n)
+                except KeyError:
+                    assert refvalue is None
+                else:
+                    assert gotvalue == refvalue
+            entries = l_dict.entries
+            keys = [entries[i].key
+                    for i in range(l_dict.num_ever_used_items)
+                    if entries.valid(i)]
+            assert keys == referenceorder
+
+        for x in test_rdict.not_really_random():
+            n = int(x*100.0)    # 0 <= x < 400
+            op = repr(x)[-1]
+            if op <= '2' and referencetable[n] is not None:
+                rordereddict.ll_dict_delitem(l_dict, n)
+                referencetable[n] = None
+                referenceorder.remove(n)
+            elif op <= '6':
+                rordereddict.ll_dict_setitem(l_dict, n, value)
+                if referencetable[n] is None:
+                    referenceorder.append(n)
+                referencetable[n] = value
+                value += 1
+            else:
+                try:
+                    gotvalue = rordereddict.ll_dict_getitem(l_dict, n)
+                except KeyError:
+                    assert referencetable[n] is None
+                else:
+                    assert gotvalue == referencetable[n]
+            if 1.38 <= x <= 1.39:
+                complete_check()
+                print 'current dict length:', len(referenceorder)
+            assert l_dict.num_live_items == len(referenceorder)
+        complete_check()